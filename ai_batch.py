@@ -0,0 +1,198 @@
+# ai_batch.py - Créations en lot par l'IA : appels Claude simultanés, reprise sur limite de débit, une transaction
+"""
+Créations en lot par l'assistant IA.
+
+Créer vingt produits ou employés avec l'IA enchaînait vingt appels Claude
+bloquants, chacun suivi de ses propres INSERT (une connexion et un commit par
+ligne) : la durée grandissait avec le nombre de fiches et un échec au milieu
+laissait un lot à moitié écrit. Ici :
+- run_requests() envoie les requêtes d'extraction en parallèle, au plus
+  max_concurrency appels simultanés, dans l'ordre des demandes ;
+- une réponse 429 (limite de débit), 529 (surcharge) ou 5xx, ou une coupure
+  réseau, est reprise après un délai exponentiel avec gigue (Retry-After
+  respecté s'il est fourni), jusqu'à MAX_ATTEMPTS tentatives ;
+- create_batch() valide toutes les réponses d'abord, puis écrit les fiches
+  valides dans une seule transaction : une erreur SQL annule tout le lot ;
+- chaque demande garde son statut (créée, invalide, en erreur) et le
+  nombre de tentatives, pour le compte rendu.
+Un lot de vingt fiches prend ainsi le temps de quelques allers-retours au
+lieu de vingt.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+
+from llm_gateway import bind_caller
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = int(os.environ.get('AI_BATCH_MAX_CONCURRENCY', '4'))
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+
+# Statuts HTTP repris : délai dépassé, conflit, limite de débit, erreurs serveur, surcharge
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504, 529)
+# Erreurs réseau du SDK (sans statut HTTP)
+RETRYABLE_ERRORS = ('APIConnectionError', 'APITimeoutError', 'ConnectionError', 'TimeoutError')
+
+STATUT_OK = 'ok'
+STATUT_CREE = 'cree'
+STATUT_INVALIDE = 'invalide'
+STATUT_ERREUR = 'erreur'
+
+_JSON_OBJET = re.compile(r'\{.*\}', re.DOTALL)
+
+
+# =========================================================================
+# APPELS AVEC REPRISE
+# =========================================================================
+
+def is_retryable(error: BaseException) -> bool:
+    """Erreur passagère (limite de débit, surcharge, réseau) qui mérite une nouvelle tentative"""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return any(classe.__name__ in RETRYABLE_ERRORS for classe in type(error).__mro__)
+
+
+def retry_delay(error: BaseException, attempt: int) -> float:
+    """Délai avant la tentative suivante : Retry-After si l'API le donne, sinon exponentiel avec gigue"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        retry_after = float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        retry_after = None
+    if retry_after is not None:
+        return min(max(retry_after, 0.0), MAX_BACKOFF_SECONDS)
+    delay = min(BACKOFF_SECONDS * 2 ** (attempt - 1), MAX_BACKOFF_SECONDS)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def call_with_backoff(client, request: Dict[str, Any], max_attempts: int = MAX_ATTEMPTS,
+                      sleep: Callable[[float], None] = time.sleep) -> Dict[str, Any]:
+    """
+    Un appel messages.create repris sur les erreurs passagères.
+    Retourne {'texte', 'tentatives', 'duree_s'} ; relève la dernière erreur.
+    """
+    t0 = time.perf_counter()
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = client.messages.create(**request)
+            return {'texte': response.content[0].text, 'tentatives': attempt, 'duree_s': time.perf_counter() - t0}
+        except Exception as e:
+            if attempt == max_attempts or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt)
+            logger.warning(f"⏳ Appel Claude repris dans {delay:.1f}s (tentative {attempt}/{max_attempts}) : {e}")
+            sleep(delay)
+
+
+def run_requests(client, requests: Sequence[Dict[str, Any]], max_concurrency: int = MAX_CONCURRENCY,
+                 max_attempts: int = MAX_ATTEMPTS) -> List[Dict[str, Any]]:
+    """
+    Envoie les requêtes en parallèle (au plus max_concurrency à la fois).
+    Un résultat par requête, dans l'ordre : {'statut', 'texte', 'erreur', 'tentatives', 'duree_s'}.
+    """
+    # Les threads du pool sont attribués à la méthode appelante dans les mesures de la passerelle
+    client = bind_caller(client)
+
+    def envoyer(request):
+        try:
+            return dict(call_with_backoff(client, request, max_attempts), statut=STATUT_OK, erreur=None)
+        except Exception as e:
+            logger.error(f"Erreur appel Claude du lot : {e}")
+            return {'statut': STATUT_ERREUR, 'texte': None, 'erreur': str(e), 'tentatives': None, 'duree_s': None}
+
+    if not requests:
+        return []
+    workers = max(1, min(max_concurrency, len(requests)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lot_ia') as pool:
+        return list(pool.map(envoyer, requests))
+
+
+# =========================================================================
+# VALIDATION ET ÉCRITURE
+# =========================================================================
+
+def parse_json_object(texte: str) -> Dict[str, Any]:
+    """Objet JSON de la réponse (éventuellement entouré de texte ou d'un bloc ```json) ; ValueError sinon"""
+    try:
+        valeur = json.loads(texte)
+    except (TypeError, ValueError):
+        match = _JSON_OBJET.search(texte or '')
+        if not match:
+            raise ValueError("réponse sans objet JSON")
+        valeur = json.loads(match.group(0))
+    if not isinstance(valeur, dict):
+        raise ValueError("la réponse JSON n'est pas un objet")
+    return valeur
+
+
+def write_in_transaction(db, rows: Sequence[Any], insert: Callable[[sqlite3.Connection, Any], Any]) -> List[Any]:
+    """
+    Écrit toutes les lignes sur une seule connexion et valide une fois.
+    insert(conn, row) retourne l'id créé ; la moindre erreur annule tout le lot et est relevée.
+    """
+    with db.get_connection() as conn:
+        try:
+            ids = [insert(conn, row) for row in rows]
+            conn.commit()
+            return ids
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def create_batch(client, db, demandes: Sequence[Any], build_request: Callable[[Any], Dict[str, Any]],
+                 validate: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 insert: Callable[[sqlite3.Connection, Dict[str, Any]], Any],
+                 max_concurrency: int = MAX_CONCURRENCY, max_attempts: int = MAX_ATTEMPTS) -> Dict[str, Any]:
+    """
+    Pipeline complet : requêtes simultanées, validation de toutes les réponses,
+    puis écriture des fiches valides dans une seule transaction.
+
+    build_request(demande) donne la requête messages.create ; validate(objet_json)
+    retourne les données à écrire ou lève ValueError ; insert(conn, donnees)
+    écrit une fiche et retourne son id.
+    Retourne {'success', 'resultats' (un par demande), 'nb_crees', 'nb_echecs', 'duree_s', 'error'}.
+    """
+    t0 = time.perf_counter()
+    resultats = run_requests(client, [build_request(d) for d in demandes], max_concurrency, max_attempts)
+
+    valides = []
+    for demande, resultat in zip(demandes, resultats):
+        resultat['demande'] = demande
+        resultat['id'] = None
+        if resultat['statut'] != STATUT_OK:
+            continue
+        try:
+            resultat['donnees'] = validate(parse_json_object(resultat['texte']))
+            valides.append(resultat)
+        except (ValueError, TypeError, KeyError) as e:
+            resultat.update(statut=STATUT_INVALIDE, erreur=f"Réponse invalide : {e}")
+
+    error = None
+    if valides:
+        try:
+            ids = write_in_transaction(db, [r['donnees'] for r in valides], insert)
+            for resultat, new_id in zip(valides, ids):
+                resultat.update(statut=STATUT_CREE, id=new_id)
+        except Exception as e:
+            logger.error(f"Erreur écriture du lot (annulé) : {e}")
+            error = f"Écriture du lot annulée : {e}"
+            for resultat in valides:
+                resultat.update(statut=STATUT_ERREUR, erreur=error)
+
+    nb_crees = sum(1 for r in resultats if r['statut'] == STATUT_CREE)
+    duree = time.perf_counter() - t0
+    logger.info(f"📦 Lot IA : {nb_crees}/{len(demandes)} fiches créées en {duree:.1f}s")
+    return {'success': error is None and nb_crees > 0, 'resultats': resultats, 'nb_crees': nb_crees,
+            'nb_echecs': len(demandes) - nb_crees, 'duree_s': duree, 'error': error}
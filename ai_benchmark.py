@@ -0,0 +1,454 @@
+# ai_benchmark.py - Banc d'essai hors ligne des fonctionnalités IA (temps ajouté par l'ERP autour de Claude)
+"""
+Banc d'essai des fonctionnalités IA sans réseau ni clé API.
+
+Les scripts test_*_ia.py demandent une vraie clé : on ne voyait jamais le
+temps que l'ERP ajoute lui-même autour des appels à Claude (collecte du
+contexte, lecture du JSON, écritures en base de creer_devis_avec_ia,
+creer_bon_travail_avec_ia...), ni ses régressions. Ici :
+- seed_database() crée une base de démonstration (entreprises, contacts,
+  projets, employés, postes, inventaire, devis, BT, demandes de prix, bons
+  d'achat, pointages) et rend les id utiles aux fonctionnalités ;
+- AI_FEATURES décrit chaque fonctionnalité IA : cible, méthode, arguments
+  et réponses préparées de Claude (JSON attendu par la méthode) ;
+- run_benchmark() sert ces réponses par le serveur simulé
+  (fake_anthropic_server), appelle chaque fonctionnalité `repeat` fois à
+  travers la passerelle instrumentée (llm_gateway) et en déduit, par
+  fonctionnalité, le temps passé hors appel à Claude ; le cache des réponses
+  est vidé avant chaque appel pour mesurer le vrai chemin ;
+- une fonctionnalité en erreur (résultat success=False, exception, ou
+  aucun appel à Claude alors qu'une réponse était préparée) ou indisponible
+  (module manquant) est signalée, pas ignorée ;
+- BLOCKERS liste les fonctionnalités qui ne peuvent pas réussir dans ce
+  code (tables ou constantes qu'aucun module ne crée) : signalées
+  « bloqué » avec la raison, sans être exécutées.
+
+En ligne de commande : python ai_benchmark.py [--repeat 5] [--latency-ms 0]
+[--feature creer_devis ...] affiche le tableau des résultats.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from answer_cache import get_answer_cache
+from erp_database import ERPDatabase
+from fake_anthropic_server import FakeMessagesServer, make_client
+from llm_gateway import LLMMetricsStore, instrument
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPEAT = 3
+FAKE_API_KEY = 'sk-ant-benchmark'
+
+STATUT_OK = 'ok'
+STATUT_ERREUR = 'erreur'
+STATUT_INDISPONIBLE = 'indisponible'
+STATUT_BLOQUE = 'bloqué'
+
+ANALYSE = ("## Résumé exécutif\n- Charge de production élevée\n- Deux devis à relancer\n\n"
+           "## Recommandations\n1. Prioriser les projets en retard\n2. Réapprovisionner l'acier inoxydable\n")
+
+
+def _json(data: Dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False)
+
+
+# =========================================================================
+# BASE DE DÉMONSTRATION
+# =========================================================================
+
+def seed_database(path: Optional[str] = None, scale: int = 1):
+    """
+    Base ERP de démonstration ; rend (db, ids) où ids donne le premier
+    enregistrement de chaque type ('company', 'project', 'devis', 'bt'...).
+    scale multiplie le volume (projets, pointages, lignes).
+    """
+    path = path or os.path.join(tempfile.mkdtemp(prefix="erp_ai_benchmark_"), "benchmark.db")
+    db = ERPDatabase(path)
+    conn = sqlite3.connect(db.db_path)
+    ids: Dict[str, int] = {}
+
+    def inserer(table: str, lignes: List[Dict[str, Any]], cle: Optional[str] = None) -> List[int]:
+        nouveaux = []
+        for ligne in lignes:
+            colonnes = ', '.join(ligne)
+            cur = conn.execute(f"INSERT INTO {table} ({colonnes}) VALUES ({', '.join('?' * len(ligne))})",
+                               tuple(ligne.values()))
+            nouveaux.append(cur.lastrowid)
+        if cle and nouveaux:
+            ids[cle] = nouveaux[0]
+        return nouveaux
+
+    clients = inserer('companies', [
+        {'nom': nom, 'secteur': secteur, 'type_company': 'CLIENT', 'adresse': f"{100 + i} rue Principale, Laval"}
+        for i, (nom, secteur) in enumerate([('Hydro Québec', 'Énergie'), ('Métallurgie Laval', 'Fabrication'),
+                                            ('Construction Boréal', 'Construction'), ('Ville de Lévis', 'Public')])
+    ], 'company')
+    fournisseurs = inserer('companies', [
+        {'nom': nom, 'secteur': 'Distribution', 'type_company': 'FOURNISSEUR'}
+        for nom in ('Acier Richelieu', 'Métaux Québec')
+    ])
+    inserer('fournisseurs', [{'company_id': c, 'code_fournisseur': f"FOUR-{i + 1:03d}",
+                              'categorie_produits': 'Acier', 'delai_livraison_moyen': 7,
+                              'conditions_paiement': 'Net 30', 'evaluation_qualite': 8, 'est_actif': 1}
+                             for i, c in enumerate(fournisseurs)], 'fournisseur')
+    contacts = inserer('contacts', [
+        {'prenom': prenom, 'nom_famille': nom, 'email': f"{prenom.lower()}@exemple.ca", 'company_id': c,
+         'role_poste': 'Acheteur'} for (prenom, nom), c in zip([('Julie', 'Tremblay'), ('Marc', 'Gagnon'),
+                                                                ('Sophie', 'Roy'), ('Luc', 'Côté')], clients)
+    ], 'contact')
+    inserer('interactions', [{'contact_id': ct, 'company_id': c, 'type_interaction': 'Appel',
+                              'date_interaction': '2024-05-02', 'resume': 'Suivi du devis'}
+                             for ct, c in zip(contacts, clients)])
+    employes = inserer('employees', [
+        {'prenom': f"Employé{i}", 'nom': f"Soudeur{i}", 'email': f"employe{i}@dg.ca", 'poste': 'Soudeur',
+         'departement': 'PRODUCTION', 'statut': 'ACTIF', 'type_contrat': 'CDI', 'date_embauche': '2020-01-15',
+         'salaire': 55000 + i * 1000, 'charge_travail': 80} for i in range(1, 11)
+    ], 'employee')
+    postes = inserer('work_centers', [
+        {'nom': nom, 'departement': 'PRODUCTION', 'categorie': categorie, 'capacite_theorique': 8.0,
+         'operateurs_requis': 1, 'cout_horaire': cout, 'statut': 'ACTIF'}
+        for nom, categorie, cout in [('Soudure TIG', 'SOUDAGE', 85.0), ('Découpe plasma', 'DÉCOUPE', 95.0),
+                                     ('Pliage', 'FORMAGE', 75.0), ('Assemblage', 'ASSEMBLAGE', 65.0)]
+    ], 'work_center')
+    inserer('inventory_items', [
+        {'nom': f"Tôle acier {e} mm", 'type_produit': 'Acier', 'quantite_metric': 10 + e, 'limite_minimale_metric': 15,
+         'statut': 'DISPONIBLE' if e > 5 else 'FAIBLE', 'code_interne': f"ACI-{e:03d}"} for e in range(1, 31)
+    ], 'inventaire')
+    projets = inserer('projects', [
+        {'nom_projet': f"Projet {i} - {['Passerelle', 'Réservoir', 'Garde-corps', 'Escalier'][i % 4]} acier",
+         'client_company_id': clients[i % len(clients)], 'statut': ['EN COURS', 'À FAIRE', 'TERMINÉ'][i % 3],
+         'priorite': 'MOYEN', 'date_soumis': '2024-04-01', 'date_prevu': '2024-09-30', 'bd_ft_estime': 40.0,
+         'prix_estime': 25000 + i * 500, 'description': "Fabrication et soudure de pièces en acier"}
+        for i in range(20 * scale)
+    ], 'project')
+
+    devis = inserer('formulaires', [
+        {'type_formulaire': 'ESTIMATION', 'numero_document': f"EST-2024-{i + 1:03d}", 'company_id': clients[i % 4],
+         'statut': ['BROUILLON', 'ENVOYÉ', 'APPROUVÉ'][i % 3], 'montant_total': 12000 + i * 800,
+         'date_echeance': '2024-07-31', 'notes': 'Devis garde-corps'} for i in range(6)
+    ], 'devis')
+    bts = inserer('formulaires', [
+        {'type_formulaire': 'BON_TRAVAIL', 'numero_document': f"BT-2024-{i + 1:03d}", 'project_id': projets[i],
+         'company_id': clients[i % 4], 'statut': 'VALIDÉ', 'priorite': 'NORMAL',
+         'metadonnees_json': _json({'project_id': projets[i], 'project_name': f"Projet {i}",
+                                    'client_name': 'Hydro Québec', 'client_company_id': clients[i % 4],
+                                    'project_manager': 'Julie Tremblay', 'start_date': '2024-07-01',
+                                    'tasks': [{'operation': 'Soudure', 'planned_hours': 8.0}], 'materials': []})}
+        for i in range(4)
+    ], 'bt')
+    dps = inserer('formulaires', [{'type_formulaire': 'DEMANDE_PRIX', 'numero_document': 'DP-2024-001',
+                                   'company_id': fournisseurs[0], 'statut': 'BROUILLON'}], 'dp')
+    bas = inserer('formulaires', [{'type_formulaire': 'BON_ACHAT', 'numero_document': 'BA-2024-001',
+                                   'company_id': fournisseurs[0], 'statut': 'BROUILLON', 'montant_total': 4200}], 'ba')
+    lignes = []
+    for formulaire in devis + dps + bas:
+        lignes += [{'formulaire_id': formulaire, 'sequence_ligne': s, 'description': f"Tôle acier {s} mm",
+                    'code_article': f"ACI-{s:03d}", 'quantite': 4, 'unite': 'unité', 'prix_unitaire': 150.0,
+                    'montant_ligne': 600.0} for s in range(1, 4 * scale + 1)]
+    inserer('formulaire_lignes', lignes)
+    operations = inserer('operations', [
+        {'project_id': projets[i % 4], 'work_center_id': postes[i % 4], 'formulaire_bt_id': bts[i % 4],
+         'sequence_number': i + 1, 'description': 'Soudure des montants', 'temps_estime': 6.0, 'statut': 'EN COURS'}
+        for i in range(8)
+    ], 'operation')
+    inserer('time_entries', [
+        {'employee_id': employes[i % 10], 'project_id': projets[i % 20], 'operation_id': operations[i % 8],
+         'formulaire_bt_id': bts[i % 4], 'punch_in': f"2024-05-{i % 28 + 1:02d} 07:00:00",
+         'punch_out': f"2024-05-{i % 28 + 1:02d} 15:00:00", 'total_hours': 8.0, 'hourly_rate': 35.0,
+         'total_cost': 280.0} for i in range(100 * scale)
+    ])
+    conn.commit()
+    conn.close()
+    return db, ids
+
+
+# =========================================================================
+# FONCTIONNALITÉS
+# =========================================================================
+
+def _assistant_ia(db):
+    from assistant_ia import AssistantIAClaude
+    assistant = AssistantIAClaude(db, api_key=FAKE_API_KEY)
+
+    def appeler(client, methode, *args):
+        assistant.client = client
+        return getattr(assistant, methode)(*args)
+    return appeler
+
+
+def _expert_advisor(db):
+    from expert_logic import ExpertAdvisor
+    advisor = ExpertAdvisor(api_key=FAKE_API_KEY)
+
+    def appeler(client, methode, *args):
+        advisor.anthropic = client
+        reponse = getattr(advisor, methode)(*args)
+        return reponse.consume() if hasattr(reponse, 'consume') else reponse
+    return appeler
+
+
+def _analyse_par_extraits(db):
+    from document_mapreduce import analyze_in_chunks
+
+    def appeler(client, methode, *args):
+        return analyze_in_chunks(client, 'claude-sonnet-4-20250514', "Expert en fabrication métallique", *args)
+    return appeler
+
+
+# Cible : fabrique(db) -> appeler(client, méthode, *args)
+TARGETS: Dict[str, Callable] = {
+    'assistant_ia': _assistant_ia,
+    'expert_advisor': _expert_advisor,
+    'analyse_par_extraits': _analyse_par_extraits,
+}
+
+DEVIS = _json({'titre_devis': "Garde-corps acier galvanisé", 'description': "Fabrication et pose",
+               'articles': [{'code_article': f"GC-{i}", 'description': f"Section de garde-corps {i}", 'quantite': 4,
+                             'prix_unitaire': 350.0, 'unite': 'unité'} for i in range(1, 6)],
+               'notes_particulieres': "Livraison sur chantier", 'validite_jours': 30,
+               'conditions_paiement': "Net 30 jours"})
+PRODUIT = _json({'code_produit': "ACI-304-6", 'nom': "Tôle inox 304 6 mm", 'description': "Tôle laminée",
+                 'categorie': "Acier", 'materiau': "Inox", 'nuance': "304", 'dimensions': "1220 x 2440 mm",
+                 'unite_vente': "feuille", 'prix_unitaire': 420.0, 'stock_disponible': 12, 'stock_minimum': 4,
+                 'fournisseur_principal': "Acier Richelieu", 'notes_techniques': "Fini 2B"})
+EMPLOYE = _json({'prenom': "Alex", 'nom': "Bouchard", 'email': "alex.bouchard@dg.ca", 'telephone': "514-555-0101",
+                 'poste': "Soudeur", 'departement': "PRODUCTION", 'statut': "ACTIF", 'type_contrat': "CDI",
+                 'date_embauche': "2024-06-03", 'salaire': 58000,
+                 'competences': [{'nom': "Soudage TIG", 'niveau': "AVANCÉ", 'certifie': True,
+                                  'date_obtention': "2021-04-01"}],
+                 'notes': "", 'charge_travail': 80})
+CONTACT = _json({'prenom': "Nadia", 'nom_famille': "Pelletier", 'email': "nadia@boreal.ca",
+                 'telephone': "418-555-0199", 'role_poste': "Chargée de projet", 'company_id': None, 'notes': ""})
+ENTREPRISE = _json({'nom': "Structures Nordiques", 'type_entreprise': "CLIENT", 'secteur': "Construction",
+                    'adresse': "12 rue des Forges", 'ville': "Trois-Rivières", 'province': "QC",
+                    'code_postal': "G9A 1A1", 'pays': "Canada", 'site_web': "www.nordiques.ca", 'notes': ""})
+FOURNISSEUR = _json({'nom': "Aciers du Saguenay", 'adresse': "5 boul. Talbot, Chicoutimi, QC G7H 1A1",
+                     'telephone': "418-555-0123", 'email': "ventes@aciers-saguenay.ca", 'site_web': "",
+                     'personne_contact': "Paul Simard", 'categories': ["Acier"], 'certifications': ["ISO 9001"],
+                     'delai_paiement_jours': 30, 'remise_percentage': 2.0, 'notes': ""})
+DEMANDE_PRIX = _json({'supplier_id': 1, 'titre': "Tôles inox", 'description': "Besoin pour projet passerelle",
+                      'date_limite_reponse': "2024-08-15", 'conditions_particulieres': "",
+                      'lignes': [{'produit_id': 1, 'description': f"Tôle inox {e} mm", 'quantite': 10,
+                                  'unite_mesure': "feuille", 'specifications': "304 2B"} for e in (3, 6, 10)]})
+BON_ACHAT = _json({'supplier_id': 1, 'titre': "Commande tôles", 'description': "Réapprovisionnement",
+                   'date_livraison_souhaitee': "2024-08-20", 'adresse_livraison': "Usine DG, Laval",
+                   'conditions_particulieres': "",
+                   'lignes': [{'produit_id': 1, 'description': f"Tôle acier {e} mm", 'quantite': 20,
+                               'unite_mesure': "feuille", 'prix_unitaire': 180.0, 'specifications': ""}
+                              for e in (3, 6, 10)]})
+POSTE = _json({'nom': "Robot de soudure", 'departement': "PRODUCTION", 'categorie': "SOUDAGE",
+               'type_machine': "Fanuc ARC Mate", 'capacite_theorique': 16.0, 'operateurs_requis': 1,
+               'cout_horaire': 120.0, 'competences_requises': "Programmation robot", 'statut': "ACTIF",
+               'localisation': "Atelier B"})
+BON_TRAVAIL = _json({'project_id': 1, 'project_name': "Projet 0 - Passerelle acier", 'client_name': "Hydro Québec",
+                     'client_company_id': 1, 'project_manager': "Julie Tremblay", 'priority': "NORMAL",
+                     'start_date': "2024-07-01", 'end_date': "2024-07-15", 'work_instructions': "Souder selon plan",
+                     'safety_notes': "Port du masque", 'quality_requirements': "CSA W47.1",
+                     'tasks': [{'operation': "Soudure", 'description': f"Montant {i}", 'quantity': 1,
+                                'planned_hours': 4.0, 'actual_hours': 0.0, 'assigned_to': "Employé1 Soudeur1",
+                                'status': "À FAIRE", 'start_date': "2024-07-01", 'end_date': "2024-07-02"}
+                               for i in range(1, 6)],
+                     'materials': [{'name': "Tôle acier 6 mm", 'description': "", 'quantity': 4, 'unit': "feuille",
+                                    'available': True, 'notes': ""}]})
+
+
+def _modifications(champs: Dict[str, Any]) -> str:
+    return _json({'modifications': champs, 'analyse': "Mise à jour demandée", 'impact': "Faible",
+                  'recommandations': "Valider avec le responsable"})
+
+
+def _document(nb_sections: int = 60) -> List[tuple]:
+    sections = [f"SECTION {s:02d} - OUVRAGES MÉTALLIQUES\n\n" + '\n'.join(
+        f"{s}.{l} Fournir et installer {l} garde-corps en acier galvanisé." for l in range(1, 31)) + "\n\n"
+        for s in range(1, nb_sections + 1)]
+    return [('cctp.pdf', ''.join(sections))]
+
+
+# (nom, cible, méthode, arguments(ids), réponses préparées de Claude dans l'ordre des appels)
+AI_FEATURES = (
+    ('analyser_situation_globale', 'assistant_ia', 'analyser_situation_globale', lambda ids: (), (ANALYSE,)),
+    ('analyser_projet', 'assistant_ia', 'analyser_projet_specifique', lambda ids: (ids['project'],), (ANALYSE,)),
+    ('analyser_devis', 'assistant_ia', 'analyser_devis_specifique', lambda ids: (ids['devis'],), (ANALYSE,)),
+    ('rapport_previsionnel', 'assistant_ia', 'generer_rapport_previsionnel', lambda ids: (30,), (ANALYSE,)),
+    ('repondre_question', 'assistant_ia', 'repondre_question',
+     lambda ids: ("Quels projets sont en retard ?",), (ANALYSE,)),
+    ('conversation_naturelle', 'assistant_ia', 'conversation_naturelle',
+     lambda ids: ("Où en est la passerelle pour Hydro Québec ?",), (ANALYSE,)),
+    ('creer_devis', 'assistant_ia', 'creer_devis_avec_ia',
+     lambda ids: ("Devis pour 20 sections de garde-corps galvanisés", ids['company']), (DEVIS,)),
+    ('modifier_devis', 'assistant_ia', 'modifier_devis_avec_ia',
+     lambda ids: (ids['devis'], "Ajouter 5 % de remise"), (ANALYSE,)),
+    ('optimiser_prix_devis', 'assistant_ia', 'optimiser_prix_devis', lambda ids: (ids['devis'],), (ANALYSE,)),
+    ('relance_devis', 'assistant_ia', 'generer_relance_client_devis', lambda ids: (ids['devis'],), (ANALYSE,)),
+    ('creer_produit', 'assistant_ia', 'creer_produit_avec_ia', lambda ids: ("Tôle inox 304 de 6 mm",), (PRODUIT,)),
+    ('modifier_produit', 'assistant_ia', 'modifier_produit_avec_ia',
+     lambda ids: (1, "Prix à 450 $"), (_modifications({'prix_unitaire': 450.0}),)),
+    ('analyser_produit', 'assistant_ia', 'analyser_produit_specifique', lambda ids: (1,), (ANALYSE,)),
+    ('optimiser_catalogue', 'assistant_ia', 'optimiser_catalogue_produits', lambda ids: (), (ANALYSE,)),
+    ('creer_employe', 'assistant_ia', 'creer_employe_avec_ia',
+     lambda ids: ("Embaucher Alex Bouchard, soudeur TIG",), (EMPLOYE,)),
+    ('modifier_employe', 'assistant_ia', 'modifier_employe_avec_ia',
+     lambda ids: (ids['employee'], "Augmenter à 60 000 $"), (_modifications({'salaire': 60000}),)),
+    ('creer_contact', 'assistant_ia', 'creer_contact_avec_ia',
+     lambda ids: ("Nadia Pelletier, chargée de projet", ids['company']), (CONTACT,)),
+    ('modifier_contact', 'assistant_ia', 'modifier_contact_avec_ia',
+     lambda ids: (ids['contact'], "Nouveau poste : directrice"), (_modifications({'role_poste': "Directrice"}),)),
+    ('creer_entreprise', 'assistant_ia', 'creer_entreprise_avec_ia',
+     lambda ids: ("Structures Nordiques à Trois-Rivières",), (ENTREPRISE,)),
+    ('modifier_entreprise', 'assistant_ia', 'modifier_entreprise_avec_ia',
+     lambda ids: (ids['company'], "Secteur : énergie"), (_modifications({'secteur': "Énergie"}),)),
+    ('creer_fournisseur', 'assistant_ia', 'creer_fournisseur_avec_ia',
+     lambda ids: ("Aciers du Saguenay à Chicoutimi",), (FOURNISSEUR,)),
+    ('modifier_fournisseur', 'assistant_ia', 'modifier_fournisseur_avec_ia',
+     lambda ids: (ids['fournisseur'], "Remise de 3 %"), (_json({'remise_percentage': 3.0}),)),
+    ('creer_demande_prix', 'assistant_ia', 'creer_demande_prix_avec_ia',
+     lambda ids: ("Demander le prix de tôles inox",), (DEMANDE_PRIX,)),
+    ('modifier_demande_prix', 'assistant_ia', 'modifier_demande_prix_avec_ia',
+     lambda ids: (ids['dp'], "Date limite au 30 août"), (_json({'date_limite_reponse': "2024-08-30"}),)),
+    ('creer_bon_achat', 'assistant_ia', 'creer_bon_achat_avec_ia',
+     lambda ids: ("Commander 60 tôles d'acier",), (BON_ACHAT,)),
+    ('modifier_bon_achat', 'assistant_ia', 'modifier_bon_achat_avec_ia',
+     lambda ids: (ids['ba'], "Livraison au chantier"), (_json({'adresse_livraison': "Chantier Lévis"}),)),
+    ('creer_poste_travail', 'assistant_ia', 'creer_poste_travail_avec_ia',
+     lambda ids: ("Robot de soudure Fanuc",), (POSTE,)),
+    ('modifier_poste_travail', 'assistant_ia', 'modifier_poste_travail_avec_ia',
+     lambda ids: (ids['work_center'], "Coût horaire 90 $"), (_json({'cout_horaire': 90.0}),)),
+    ('creer_bon_travail', 'assistant_ia', 'creer_bon_travail_avec_ia',
+     lambda ids: ("BT pour souder la passerelle du projet 1",), (BON_TRAVAIL,)),
+    ('modifier_bon_travail', 'assistant_ia', 'modifier_bon_travail_avec_ia',
+     lambda ids: (ids['bt'], "Priorité urgente"), (_json({'priority': "URGENT"}),)),
+    ('expert_reponse_flux', 'expert_advisor', 'obtenir_reponse',
+     lambda ids: ("Quelle soudure pour l'inox 304 ?", [], True), (ANALYSE,)),
+    ('analyse_par_extraits', 'analyse_par_extraits', None,
+     lambda ids: (_document(), "Relevez les exigences"), (ANALYSE,)),
+)
+FEATURE_NAMES = tuple(f[0] for f in AI_FEATURES)
+
+# Fonctionnalités qui échouent quelle que soit la base : le schéma qu'elles lisent n'existe pas dans l'ERP
+_SANS_CATEGORIES = "fournisseurs.CATEGORIES_CONSTRUCTION n'existe pas"
+_SANS_SUPPLIERS = ("tables suppliers / supplier_forms créées par aucun module "
+                   "(fournisseurs.py utilise fournisseurs et formulaires)")
+BLOCKERS = {
+    'creer_fournisseur': _SANS_CATEGORIES,
+    'modifier_fournisseur': _SANS_CATEGORIES,
+    'creer_demande_prix': _SANS_CATEGORIES,
+    'modifier_demande_prix': _SANS_SUPPLIERS,
+    'creer_bon_achat': _SANS_SUPPLIERS,
+    'modifier_bon_achat': _SANS_SUPPLIERS,
+}
+
+
+def _echec(resultat: Any) -> Optional[str]:
+    """Message d'erreur d'un résultat de fonctionnalité, None s'il est réussi"""
+    if isinstance(resultat, dict) and resultat.get('success') is False:
+        return str(resultat.get('error') or 'success=False')
+    if isinstance(resultat, str) and resultat.lstrip().startswith(('❌', 'Erreur', '😅 Oups')):
+        return resultat.strip()[:200]
+    return None
+
+
+def run_benchmark(features: Optional[Sequence[str]] = None, repeat: int = DEFAULT_REPEAT, latency_ms: float = 0.0,
+                  tokens_per_second: float = 0.0, db=None, ids: Optional[Dict[str, int]] = None) -> List[Dict]:
+    """
+    Exécute les fonctionnalités (toutes par défaut) contre le serveur simulé.
+    Rend par fonctionnalité : {'feature', 'statut', 'erreur', 'appels' (par
+    exécution), 'wall_ms' (médiane), 'llm_ms' (moyenne, appels mesurés par
+    la passerelle), 'overhead_ms' (moyenne du temps hors Claude),
+    'overhead_pct'}. llm_ms cumule les appels : pour une fonctionnalité aux
+    appels simultanés (analyse par extraits), il peut dépasser la durée
+    totale et le temps hors Claude est alors compté nul.
+    Une fonctionnalité qui échoue s'arrête à sa première exécution ; une
+    exécution sans aucun appel à Claude est un échec (réponse préparée
+    jamais servie : la fonctionnalité a court-circuité Claude). Les
+    fonctionnalités de BLOCKERS ne sont pas exécutées.
+    """
+    if db is None:
+        db, ids = seed_database()
+    selection = [f for f in AI_FEATURES if not features or f[0] in features]
+    store = LLMMetricsStore(os.path.join(tempfile.mkdtemp(prefix="erp_ai_benchmark_"), "metrics.db"),
+                            flush_seconds=3600)
+    cibles: Dict[str, Any] = {}
+    resultats = []
+
+    with FakeMessagesServer(latency_ms=latency_ms, tokens_per_second=tokens_per_second) as server:
+        client = instrument(make_client(server.url, FAKE_API_KEY), 'benchmark', store=store)
+        for nom, cible, methode, arguments, reponses in selection:
+            ligne = {'feature': nom, 'statut': STATUT_OK, 'erreur': None, 'appels': 0, 'wall_ms': None,
+                     'llm_ms': None, 'overhead_ms': None, 'overhead_pct': None}
+            resultats.append(ligne)
+            if nom in BLOCKERS:
+                ligne.update(statut=STATUT_BLOQUE, erreur=BLOCKERS[nom])
+                continue
+            try:
+                if cible not in cibles:
+                    cibles[cible] = TARGETS[cible](db)
+            except ImportError as e:
+                ligne.update(statut=STATUT_INDISPONIBLE, erreur=str(e))
+                continue
+
+            durees = []
+            for _ in range(repeat):
+                get_answer_cache(db).clear()
+                server.script(reponses)
+                nb_requetes = len(server.requests)
+                t0 = time.perf_counter()
+                try:
+                    erreur = _echec(cibles[cible](client.with_operation(nom), methode, *arguments(ids)))
+                except Exception as e:
+                    erreur = f"{type(e).__name__}: {e}"
+                durees.append((time.perf_counter() - t0) * 1000)
+                if not erreur and reponses and len(server.requests) == nb_requetes:
+                    erreur = "aucun appel à Claude (réponse préparée non servie)"
+                if erreur:
+                    ligne.update(statut=STATUT_ERREUR, erreur=erreur)
+                    break
+
+            appels = store.summary(('operation',), days=None)
+            llm = next((a for a in appels if a['operation'] == nom), None)
+            llm_ms = llm['total_ms'] / len(durees) if llm else 0.0
+            moyenne = statistics.mean(durees)
+            hors_claude = max(0.0, moyenne - llm_ms)
+            ligne.update(appels=round(llm['calls'] / len(durees), 1) if llm else 0,
+                         wall_ms=round(statistics.median(durees), 1), llm_ms=round(llm_ms, 1),
+                         overhead_ms=round(hors_claude, 1),
+                         overhead_pct=round(hors_claude / moyenne * 100, 1) if moyenne else None)
+    return resultats
+
+
+def format_results(resultats: Sequence[Dict]) -> str:
+    """Tableau texte des résultats (temps hors Claude décroissant, erreurs à la fin)"""
+    entetes = f"{'Fonctionnalité':<28} {'Statut':<13} {'Appels':>6} {'Total':>9} {'Claude':>9} {'Hors Claude':>12}"
+    lignes = [entetes, '-' * len(entetes)]
+    for r in sorted(resultats, key=lambda r: (r['statut'] != STATUT_OK, -(r['overhead_ms'] or 0))):
+        if r['wall_ms'] is None:
+            lignes.append(f"{r['feature']:<28} {r['statut']:<13} {r['erreur']}")
+            continue
+        lignes.append(f"{r['feature']:<28} {r['statut']:<13} {r['appels']:>6} {r['wall_ms']:>7.1f}ms "
+                      f"{r['llm_ms']:>7.1f}ms {r['overhead_ms']:>9.1f}ms"
+                      + (f"  {r['erreur'][:80]}" if r['erreur'] else ''))
+    return '\n'.join(lignes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps ajouté par l'ERP autour des appels à Claude, sans réseau")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="latence simulée de l'API")
+    parser.add_argument('--scale', type=int, default=1, help="volume de la base de démonstration")
+    parser.add_argument('--feature', action='append', choices=FEATURE_NAMES, help="fonctionnalité (répétable)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    db, ids = seed_database(scale=args.scale)
+    print(format_results(run_benchmark(args.feature, repeat=args.repeat, latency_ms=args.latency_ms, db=db,
+                                       ids=ids)))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from dotenv import load_dotenv
 try:
    from expert_logic import ExpertAdvisor, ExpertProfileManager
    from conversation_manager import ConversationManager
+   from llm_streaming import render_stream
 except ImportError as e:
    st.error(f"Erreur d'importation des modules locaux: {e}")
    st.error("Assurez-vous que les fichiers 'expert_logic.py' et 'conversation_manager.py' existent dans le même dossier.")
@@ -1749,25 +1750,25 @@ if action_to_process and action_to_process.get("role") == "user":
    else: # Traiter comme chat normal
        with st.chat_message("assistant", avatar="🏗️"):
            placeholder = st.empty()
-           with st.spinner("L'expert réfléchit..."):
-               try:
-                   history_for_claude = [
-                       msg for msg in st.session_state.messages[:-1]
-                       if msg.get("role") in ["user", "assistant", "search_result"]
-                   ]
-                   response_content = st.session_state.expert_advisor.obtenir_reponse(user_content, history_for_claude)
-                   placeholder.markdown(response_content, unsafe_allow_html=False)
-                   st.session_state.messages.append({"role": "assistant", "content": response_content})
-                   save_current_conversation()
-                   st.rerun()
-               except Exception as e:
-                   error_msg = f"Erreur lors de l'obtention de la réponse de Claude: {e}"
-                   print(error_msg)
-                   st.exception(e)
-                   placeholder.error(f"Désolé, une erreur technique s'est produite avec l'IA ({type(e).__name__}).")
-                   st.session_state.messages.append({"role": "assistant", "content": f"Erreur technique avec l'IA ({type(e).__name__})."})
-                   save_current_conversation()
-                   st.rerun()
+           try:
+               history_for_claude = [
+                   msg for msg in st.session_state.messages[:-1]
+                   if msg.get("role") in ["user", "assistant", "search_result"]
+               ]
+               # Réponse affichée au fil de l'eau, sauvegardée une fois complète
+               response_content = render_stream(
+                   st.session_state.expert_advisor.obtenir_reponse(user_content, history_for_claude, stream=True))
+               st.session_state.messages.append({"role": "assistant", "content": response_content})
+               save_current_conversation()
+               st.rerun()
+           except Exception as e:
+               error_msg = f"Erreur lors de l'obtention de la réponse de Claude: {e}"
+               print(error_msg)
+               st.exception(e)
+               placeholder.error(f"Désolé, une erreur technique s'est produite avec l'IA ({type(e).__name__}).")
+               st.session_state.messages.append({"role": "assistant", "content": f"Erreur technique avec l'IA ({type(e).__name__})."})
+               save_current_conversation()
+               st.rerun()
 
 # --- Footer --- 
 st.markdown("""
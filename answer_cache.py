@@ -0,0 +1,198 @@
+# answer_cache.py - Cache des réponses de l'assistant IA, indexé sur la question et la version des données
+"""
+Cache des réponses de conversation_naturelle.
+
+Les mêmes questions reviennent chaque matin (« projets en retard »,
+« ruptures de stock », « charge de travail cette semaine ») et chacune
+refaisait la fouille des données ERP puis un appel à Claude. Ici :
+- la question est normalisée (minuscules, sans accents ni ponctuation, mots
+  vides retirés, pluriels simples ramenés au singulier, mots triés) : la clé
+  exacte ignore les variations de forme ;
+- à défaut de clé exacte, une question proche (SequenceMatcher sur la forme
+  normalisée, seuil FUZZY_THRESHOLD, mêmes numéros) réutilise la réponse ;
+- chaque réponse est liée à l'empreinte des tables consultées : les
+  compteurs de data_versions (migration v10, incrémentés par trigger à
+  chaque écriture) ou, sur une ancienne base, COUNT(*) et MAX(rowid). Une
+  écriture dans une de ces tables change l'empreinte et périme les réponses
+  (supprimées au prochain accès) ;
+- la portée (assistant, modèle, projet mentionné, jour) sépare les réponses
+  qui ne sont pas interchangeables ; TTL et éviction LRU bornent le cache ;
+- un cache par base, partagé entre les sessions (get_answer_cache()).
+"""
+
+import difflib
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 6 * 3600  # secondes
+DEFAULT_MAX_ENTRIES = 256
+FUZZY_THRESHOLD = 0.88
+
+MATCH_EXACT = 'exact'
+MATCH_FUZZY = 'fuzzy'
+
+STOPWORDS = frozenset("""
+    a au aux avec c ce ces cet cette d dans de des du en est et il ils j je l la le les leur leurs m ma me mes
+    mon n nous on ou par pour qu que quel quelle quelles quels qui s sa se ses son sont sur t ta te tes ton tu un
+    une vos votre vous y stp svp merci bonjour salut
+""".split())
+# Volontairement courte : les négations (ne, pas) et les mots interrogatifs (combien, liste...) changent la question
+
+
+# =========================================================================
+# CLÉS
+# =========================================================================
+
+def _singulier(mot: str) -> str:
+    if len(mot) > 3 and mot[-1] in 'sx' and not mot.endswith('ss'):
+        return mot[:-1]
+    return mot
+
+
+def significant_words(text: str) -> List[str]:
+    """Mots significatifs d'un texte, dans l'ordre : sans accents ni mots vides, au singulier"""
+    texte = unicodedata.normalize('NFKD', text.lower())
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return [_singulier(m) for m in re.findall(r"[a-z0-9]+", texte) if m not in STOPWORDS]
+
+
+def normalize_question(question: str) -> str:
+    """Forme canonique d'une question : mots significatifs, sans accents, au singulier, triés"""
+    return ' '.join(sorted(set(significant_words(question))))
+
+
+def _nombres(normalized: str) -> frozenset:
+    """Mots contenant un chiffre (numéros de projet, de BT...) : jamais approchés"""
+    return frozenset(mot for mot in normalized.split() if any(c.isdigit() for c in mot))
+
+
+def data_fingerprint(db, tables: Iterable[str]) -> str:
+    """Empreinte des tables : versions de data_versions, sinon COUNT(*) et MAX(rowid)"""
+    tables = sorted(set(tables))
+    versions: Dict[str, Any] = {}
+    try:
+        placeholders = ', '.join('?' for _ in tables)
+        rows = db.execute_query(
+            f"SELECT table_name, version FROM data_versions WHERE table_name IN ({placeholders})", tuple(tables))
+        versions = {row['table_name']: f"v{row['version']}" for row in rows}
+    except Exception:
+        # Base antérieure à la migration v10
+        pass
+    for table in tables:
+        if table in versions:
+            continue
+        try:
+            row = db.execute_query(f"SELECT COUNT(*) as n, MAX(rowid) as m FROM {table}")[0]
+            versions[table] = f"n{row['n']}m{row['m']}"
+        except Exception:
+            versions[table] = 'absente'
+    signature = ';'.join(f"{table}={versions[table]}" for table in tables)
+    return hashlib.sha1(signature.encode('utf-8')).hexdigest()[:16]
+
+
+# =========================================================================
+# CACHE
+# =========================================================================
+
+class AnswerCache:
+    """Réponses par (portée, question normalisée), valables pour une empreinte de données"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 fuzzy_threshold: float = FUZZY_THRESHOLD, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.fuzzy_threshold = fuzzy_threshold
+        self.clock = clock
+        self._entries: 'OrderedDict[Tuple[str, str], Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'exact_hits': 0, 'fuzzy_hits': 0, 'misses': 0, 'stores': 0,
+                       'expired': 0, 'invalidated': 0, 'evicted': 0}
+
+    def _drop_stale(self, scope: str, fingerprint: str, now: float):
+        """Supprime les réponses expirées, et celles de la portée liées à une autre empreinte"""
+        for key in list(self._entries):
+            entry = self._entries[key]
+            if now - entry['created'] > self.ttl:
+                del self._entries[key]
+                self._stats['expired'] += 1
+            elif key[0] == scope and entry['fingerprint'] != fingerprint:
+                del self._entries[key]
+                self._stats['invalidated'] += 1
+
+    def get(self, question: str, fingerprint: str, scope: str = '') -> Optional[Dict[str, Any]]:
+        """{'answer', 'match' (exact / fuzzy), 'similarity', 'question'} ou None"""
+        normalized = normalize_question(question)
+        with self._lock:
+            self._drop_stale(scope, fingerprint, self.clock())
+            key = (scope, normalized)
+            entry = self._entries.get(key)
+            match, similarity = MATCH_EXACT, 1.0
+            if entry is None and normalized:
+                best = None
+                nombres = _nombres(normalized)
+                for (entry_scope, entry_question), candidate in self._entries.items():
+                    if entry_scope != scope or _nombres(entry_question) != nombres:
+                        continue
+                    ratio = difflib.SequenceMatcher(None, normalized, entry_question).ratio()
+                    if ratio >= self.fuzzy_threshold and (best is None or ratio > best[0]):
+                        best = (ratio, (entry_scope, entry_question), candidate)
+                if best:
+                    similarity, key, entry = best
+                    match = MATCH_FUZZY
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            entry['hits'] += 1
+            self._stats['exact_hits' if match == MATCH_EXACT else 'fuzzy_hits'] += 1
+        logger.info(f"♻️ Réponse IA en cache ({match}, {similarity:.2f}) pour « {question[:60]} »")
+        return {'answer': entry['answer'], 'match': match, 'similarity': round(similarity, 3),
+                'question': entry['question']}
+
+    def put(self, question: str, fingerprint: str, answer: str, scope: str = ''):
+        normalized = normalize_question(question)
+        if not normalized or not answer:
+            return
+        with self._lock:
+            now = self.clock()
+            self._drop_stale(scope, fingerprint, now)
+            self._entries[(scope, normalized)] = {'answer': answer, 'question': question,
+                                                  'fingerprint': fingerprint, 'created': now, 'hits': 0}
+            self._entries.move_to_end((scope, normalized))
+            self._stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evicted'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        lookups = stats['exact_hits'] + stats['fuzzy_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['exact_hits'] + stats['fuzzy_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+_caches: Dict[str, AnswerCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(db) -> AnswerCache:
+    """Cache partagé de la base (une instance par fichier)"""
+    key = os.path.abspath(getattr(db, 'db_path', '') or ':memory:')
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = AnswerCache()
+        return _caches[key]
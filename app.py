@@ -1,7 +1,4 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta, date
 import calendar
 import io
@@ -14,14 +11,27 @@ from math import gcd
 from fractions import Fraction
 import csv
 import pytz  # NOUVEAU : Pour la gestion du fuseau horaire du Québec
-import backup_scheduler  # Ceci démarre automatiquement le scheduler
 import logging
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
-from fournisseurs import show_fournisseurs_page
-from assistant_ia_simple import show_assistant_ia_page
-from conformite_construction import ConformiteConstruction
+from erp_registry import LazyResource, get_shared_resource
+from page_registry import ModuleFlag, lazy_import, lazy_module, preload_in_background
+from list_pagination import (NEXT, ListQuery, amount_sql, count_rows, fetch_page, in_clause, pager_state, render_pager,
+                             search_clause)
+from schema_migrations import migrate_projects_to_text_ids, projects_need_text_ids
+
+# DÉMARRAGE RAPIDE : pandas/plotly et les modules de pages ne sont importés qu'au premier usage
+pd = lazy_module('pandas')
+px = lazy_module('plotly.express')
+go = lazy_module('plotly.graph_objects')
+show_assistant_ia_page = lazy_import('assistant_ia_simple', 'show_assistant_ia_page')
+show_llm_metrics_page = lazy_import('llm_gateway', 'show_llm_metrics_page')
+ConformiteConstruction = lazy_import('conformite_construction', 'ConformiteConstruction')
+
+# Le scheduler de sauvegarde démarre à son import : chargé en arrière-plan avec
+# les bibliothèques lourdes, sans retarder le premier affichage du portail
+preload_in_background(['backup_scheduler', 'pandas', 'plotly.express'])
 
 # ========================
 # CONSTANTES GLOBALES
@@ -751,99 +761,65 @@ try:
 except ImportError:
     ERP_DATABASE_AVAILABLE = False
 
-# Import du module unifié
-try:
-    from production_management import show_production_management_page
-    PRODUCTION_MANAGEMENT_AVAILABLE = True
-except ImportError:
-    PRODUCTION_MANAGEMENT_AVAILABLE = False
-
-# Importations pour le CRM
-try:
-    from crm import GestionnaireCRM, render_crm_main_interface
-    CRM_AVAILABLE = True
-except ImportError:
-    CRM_AVAILABLE = False
-
-# Importation du module Produits
-try:
-    from produits import GestionnaireProduits, show_produits_page
-    PRODUITS_AVAILABLE = True
-except ImportError:
-    PRODUITS_AVAILABLE = False
-
-# Importation du module Devis
-try:
-    from devis import GestionnaireDevis, show_devis_page
-    DEVIS_AVAILABLE = True
-except ImportError:
-    DEVIS_AVAILABLE = False
-
-# Importations pour les Employés
-try:
-    from employees import (
-        GestionnaireEmployes,
-        render_employes_liste_tab,
-        render_employes_dashboard_tab,
-        render_employe_form,
-        render_employe_details
-    )
-    EMPLOYEES_AVAILABLE = True
-except ImportError:
-    EMPLOYEES_AVAILABLE = False
-
-# Importation du module Formulaires
-try:
-    from formulaires import (
-        GestionnaireFormulaires,
-        show_formulaires_page
-    )
-    FORMULAIRES_AVAILABLE = True
-except ImportError:
-    FORMULAIRES_AVAILABLE = False
-
-# Importation du module Fournisseurs
-try:
-    from fournisseurs import (
-        GestionnaireFournisseurs,
-        show_fournisseurs_page
-    )
-    FOURNISSEURS_AVAILABLE = True
-except ImportError:
-    FOURNISSEURS_AVAILABLE = False
+# Attente maximale du drapeau « schéma prêt » par requête avant de recharger la page
+SCHEMA_WAIT_SECONDS = 2
+
+# MODULES DE PAGES : chargement paresseux (page_registry) - import au premier appel
+PRODUCTION_MANAGEMENT_AVAILABLE = ModuleFlag('production_management')
+show_production_management_page = lazy_import('production_management', 'show_production_management_page')
+
+# CRM
+CRM_AVAILABLE = ModuleFlag('crm')
+GestionnaireCRM = lazy_import('crm', 'GestionnaireCRM')
+render_crm_main_interface = lazy_import('crm', 'render_crm_main_interface')
+
+# Produits
+PRODUITS_AVAILABLE = ModuleFlag('produits')
+GestionnaireProduits = lazy_import('produits', 'GestionnaireProduits')
+show_produits_page = lazy_import('produits', 'show_produits_page')
+
+# Devis
+DEVIS_AVAILABLE = ModuleFlag('devis')
+GestionnaireDevis = lazy_import('devis', 'GestionnaireDevis')
+show_devis_page = lazy_import('devis', 'show_devis_page')
+
+# Employés
+EMPLOYEES_AVAILABLE = ModuleFlag('employees')
+GestionnaireEmployes = lazy_import('employees', 'GestionnaireEmployes')
+render_employes_liste_tab = lazy_import('employees', 'render_employes_liste_tab')
+render_employes_dashboard_tab = lazy_import('employees', 'render_employes_dashboard_tab')
+render_employe_form = lazy_import('employees', 'render_employe_form')
+render_employe_details = lazy_import('employees', 'render_employe_details')
+
+# Formulaires
+FORMULAIRES_AVAILABLE = ModuleFlag('formulaires')
+GestionnaireFormulaires = lazy_import('formulaires', 'GestionnaireFormulaires')
+show_formulaires_page = lazy_import('formulaires', 'show_formulaires_page')
+
+# Fournisseurs
+FOURNISSEURS_AVAILABLE = ModuleFlag('fournisseurs')
+GestionnaireFournisseurs = lazy_import('fournisseurs', 'GestionnaireFournisseurs')
+show_fournisseurs_page = lazy_import('fournisseurs', 'show_fournisseurs_page')
 
 # TimeTracker unifié
-try:
-    from timetracker_unified import (
-        show_timetracker_unified_interface_main,
-        show_timetracker_admin_complete_interface,
-        initialize_timetracker_unified,
-        get_timetracker_summary_stats,
-        TimeTrackerUnified
-    )
-    TIMETRACKER_AVAILABLE = True
-except ImportError as e:
-    TIMETRACKER_AVAILABLE = False
-    print(f"Erreur import TimeTracker Pro: {e}")
-
-# Importation du module Kanban unifié
-try:
-    from kanban import show_kanban_sqlite, show_kanban
-    KANBAN_AVAILABLE = True
-except ImportError:
-    KANBAN_AVAILABLE = False
-
-# Import du gestionnaire de pièces jointes
-try:
-    from attachments_manager import (
-        AttachmentsManager,
-        show_project_attachments_interface,
-        init_attachments_manager,
-        show_attachments_tab_in_project_modal
-    )
-    ATTACHMENTS_AVAILABLE = True
-except ImportError:
-    ATTACHMENTS_AVAILABLE = False
+TIMETRACKER_AVAILABLE = ModuleFlag('timetracker_unified')
+show_timetracker_unified_interface_main = lazy_import('timetracker_unified', 'show_timetracker_unified_interface_main')
+show_timetracker_admin_complete_interface = lazy_import('timetracker_unified', 'show_timetracker_admin_complete_interface')
+initialize_timetracker_unified = lazy_import('timetracker_unified', 'initialize_timetracker_unified')
+get_timetracker_summary_stats = lazy_import('timetracker_unified', 'get_timetracker_summary_stats')
+TimeTrackerUnified = lazy_import('timetracker_unified', 'TimeTrackerUnified')
+
+# Kanban unifié
+KANBAN_AVAILABLE = ModuleFlag('kanban')
+show_kanban_sqlite = lazy_import('kanban', 'show_kanban_sqlite')
+show_kanban = lazy_import('kanban', 'show_kanban')
+
+# Gestionnaire de pièces jointes
+ATTACHMENTS_AVAILABLE = ModuleFlag('attachments_manager')
+AttachmentsManager = lazy_import('attachments_manager', 'AttachmentsManager')
+show_project_attachments_interface = lazy_import('attachments_manager', 'show_project_attachments_interface')
+init_attachments_manager = lazy_import('attachments_manager', 'init_attachments_manager')
+show_attachments_tab_in_project_modal = lazy_import('attachments_manager', 'show_attachments_tab_in_project_modal')
 
 # Configuration de la page
 st.set_page_config(
@@ -1049,71 +1025,6 @@ def show_project_statistics(projects, crm_manager):
         ca_par_heure = ca_total / temps_total if temps_total > 0 else 0
         st.metric("💎 CA/Heure", format_currency(ca_par_heure))
 
-def advanced_project_search(projects, search_term, crm_manager):
-    """Recherche avancée dans les projets"""
-    if not search_term:
-        return projects
-    
-    search_term = search_term.lower()
-    results = []
-    
-    for p in projects:
-        # Recherche dans tous les champs texte
-        searchable_fields = [
-            str(p.get('nom_projet', '')),
-            str(p.get('description', '')),
-            str(p.get('tache', '')),
-            str(p.get('statut', '')),
-            str(p.get('priorite', '')),
-            str(p.get('po_client', '')),
-            get_client_display_name(p, crm_manager),
-            str(p.get('id', ''))
-        ]
-        
-        # Recherche dans les opérations et matériaux
-        for operation in p.get('operations', []):
-            searchable_fields.extend([
-                str(operation.get('description', '')),
-                str(operation.get('poste_travail', '')),
-                str(operation.get('ressource', ''))
-            ])
-        
-        for materiau in p.get('materiaux', []):
-            searchable_fields.extend([
-                str(materiau.get('designation', '')),
-                str(materiau.get('code', '')),
-                str(materiau.get('fournisseur', ''))
-            ])
-        
-        # Vérifier si le terme de recherche est trouvé
-        if any(search_term in field.lower() for field in searchable_fields):
-            results.append(p)
-    
-    return results
-
-def sort_projects(projects, sort_by, crm_manager):
-    """Trie les projets selon le critère sélectionné"""
-    try:
-        if sort_by == "ID (Desc)":
-            return sorted(projects, key=lambda x: x.get('id', 0), reverse=True)
-        elif sort_by == "ID (Asc)":
-            return sorted(projects, key=lambda x: x.get('id', 0))
-        elif sort_by == "Nom":
-            return sorted(projects, key=lambda x: x.get('nom_projet', '').lower())
-        elif sort_by == "Client":
-            return sorted(projects, key=lambda x: get_client_display_name(x, crm_manager).lower())
-        elif sort_by == "Date Début":
-            return sorted(projects, key=lambda x: x.get('date_soumis', ''), reverse=True)
-        elif sort_by == "Prix":
-            return sorted(projects, key=lambda x: float(str(x.get('prix_estime', 0)).replace('$', '').replace(',', '') or 0), reverse=True)
-        elif sort_by == "Statut":
-            return sorted(projects, key=lambda x: x.get('statut', ''))
-        else:
-            return projects
-    except Exception as e:
-        st.error(f"Erreur de tri: {str(e)}")
-        return projects
-
 def show_projects_detailed_view(projects, crm_manager):
     """Vue liste détaillée avec toutes les actions"""
     
@@ -1600,6 +1511,26 @@ def handle_batch_actions():
 # GESTIONNAIRE PROJETS SQLite AVEC ID PERSONNALISÉ
 # ========================
 
+# Liste des projets : tris de la vue (expression sans NULL, descendant) et colonnes de recherche
+PROJECT_ID_SORT_SQL = "CASE WHEN p.id GLOB '[0-9]*' THEN CAST(p.id AS INTEGER) ELSE 999999 END"
+PROJECT_CLIENT_SQL = "COALESCE(NULLIF(p.client_nom_cache, ''), c.nom, p.client_legacy, '')"
+PROJECT_LIST_QUERY = ListQuery(
+    "p.*, c.nom AS client_nom_company",
+    "projects p LEFT JOIN companies c ON p.client_company_id = c.id",
+    {
+        "ID (Desc)": (PROJECT_ID_SORT_SQL, True),
+        "ID (Asc)": (PROJECT_ID_SORT_SQL, False),
+        "Nom": ("LOWER(COALESCE(p.nom_projet, ''))", False),
+        "Client": (f"LOWER({PROJECT_CLIENT_SQL})", False),
+        "Date Début": ("COALESCE(p.date_soumis, '')", True),
+        "Prix": (f"COALESCE({amount_sql('p.prix_estime')}, 0)", True),
+        "Statut": ("COALESCE(p.statut, '')", False),
+    },
+    key_expr='p.id',
+)
+PROJECT_SEARCH_COLUMNS = ('p.nom_projet', 'p.description', 'p.tache', 'p.statut', 'p.priorite', 'p.po_client',
+                          'p.client_nom_cache', 'p.client_legacy', 'c.nom', 'p.id')
+
 class GestionnaireProjetSQL:
     """
     Gestionnaire de projets utilisant SQLite avec support ID alphanumériqueе
@@ -1900,55 +1831,108 @@ class GestionnaireProjetSQL:
     def get_all_projects(self):
         """Récupère tous les projets depuis SQLite"""
         try:
-            query = '''
+            query = f'''
                 SELECT p.*, c.nom as client_nom_company
                 FROM projects p
                 LEFT JOIN companies c ON p.client_company_id = c.id
-                ORDER BY 
-                    CASE 
-                        WHEN p.id GLOB '[0-9]*' THEN CAST(p.id AS INTEGER)
-                        ELSE 999999
-                    END DESC,
-                    p.id DESC
+                ORDER BY {PROJECT_ID_SORT_SQL} DESC, p.id DESC
             '''
-            rows = self.db.execute_query(query)
-
-            projets = []
-            for row in rows:
-                projet = dict(row)
-
-                # Récupérer opérations
-                operations = self.db.execute_query(
-                    "SELECT * FROM operations WHERE project_id = ? ORDER BY sequence_number",
-                    (projet['id'],)
-                )
-                projet['operations'] = [dict(op) for op in operations]
-
-                # Récupérer matériaux
-                materiaux = self.db.execute_query(
-                    "SELECT * FROM materials WHERE project_id = ?",
-                    (projet['id'],)
-                )
-                projet['materiaux'] = [dict(mat) for mat in materiaux]
+            return self._attach_project_details(self.db.execute_query(query))
 
-                # Récupérer employés assignés
-                employes_assignes = self.db.execute_query(
-                    "SELECT employee_id FROM project_assignments WHERE project_id = ?",
-                    (projet['id'],)
-                )
-                projet['employes_assignes'] = [row['employee_id'] for row in employes_assignes]
-
-                # Compatibilité avec ancien format
-                if not projet.get('client_nom_cache') and projet.get('client_nom_company'):
-                    projet['client_nom_cache'] = projet['client_nom_company']
-
-                projets.append(projet)
+        except Exception as e:
+            st.error(f"Erreur récupération projets: {e}")
+            return []
 
+    def _attach_project_details(self, rows):
+        """Opérations, matériaux et employés assignés des projets, en trois requêtes pour toute la liste"""
+        projets = [dict(row) for row in rows]
+        if not projets:
             return projets
-
+        ids = [str(p['id']) for p in projets]
+        by_id = {str(p['id']): p for p in projets}
+        for p in projets:
+            p['operations'], p['materiaux'], p['employes_assignes'] = [], [], []
+            # Compatibilité avec ancien format
+            if not p.get('client_nom_cache') and p.get('client_nom_company'):
+                p['client_nom_cache'] = p['client_nom_company']
+
+        # Par lots pour rester sous la limite de paramètres SQLite
+        for i in range(0, len(ids), 500):
+            lot = ids[i:i + 500]
+            placeholders = ', '.join('?' for _ in lot)
+            for op in self.db.execute_query(
+                    f"SELECT * FROM operations WHERE project_id IN ({placeholders}) ORDER BY project_id, sequence_number",
+                    tuple(lot)):
+                by_id[str(op['project_id'])]['operations'].append(dict(op))
+            for mat in self.db.execute_query(
+                    f"SELECT * FROM materials WHERE project_id IN ({placeholders}) ORDER BY id", tuple(lot)):
+                by_id[str(mat['project_id'])]['materiaux'].append(dict(mat))
+            for row in self.db.execute_query(
+                    f"SELECT project_id, employee_id FROM project_assignments WHERE project_id IN ({placeholders})",
+                    tuple(lot)):
+                by_id[str(row['project_id'])]['employes_assignes'].append(row['employee_id'])
+        return projets
+
+    # -------------------------------------------------------------------------
+    # Liste paginée (filtres et tri dans SQLite)
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _project_filters(recherche='', statuts=None, priorites=None):
+        where, params = [], []
+        if recherche:
+            clause, clause_params = search_clause(PROJECT_SEARCH_COLUMNS, recherche)
+            operations, op_params = search_clause(('o.description', 'o.poste_travail', 'o.ressource'), recherche)
+            materiaux, mat_params = search_clause(('m.designation', 'm.code_materiau', 'm.fournisseur'), recherche)
+            where.append(f"{clause}"
+                         f" OR EXISTS (SELECT 1 FROM operations o WHERE o.project_id = p.id AND ({operations}))"
+                         f" OR EXISTS (SELECT 1 FROM materials m WHERE m.project_id = p.id AND ({materiaux}))")
+            params += clause_params + op_params + mat_params
+        for column, values in (('p.statut', statuts), ('p.priorite', priorites)):
+            if values:
+                clause, clause_params = in_clause(column, values)
+                where.append(clause)
+                params += clause_params
+        return where, params
+
+    def get_projects_page(self, recherche='', statuts=None, priorites=None, tri="ID (Desc)",
+                          cursor=None, direction=NEXT, page_size=25):
+        """Une page de projets filtrés et triés, avec opérations et matériaux de la page seulement"""
+        try:
+            where, params = self._project_filters(recherche, statuts, priorites)
+            page = fetch_page(self.db, PROJECT_LIST_QUERY, where, params, tri, cursor, direction, page_size)
+            page['rows'] = self._attach_project_details(page['rows'])
+            return page
         except Exception as e:
             st.error(f"Erreur récupération projets: {e}")
-            return []
+            return {'rows': [], 'next_cursor': None, 'prev_cursor': None, 'has_next': False, 'has_prev': False}
+
+    def get_projects_summary(self, recherche='', statuts=None, priorites=None):
+        """Nombre, CA et heures estimées de la sélection"""
+        try:
+            where, params = self._project_filters(recherche, statuts, priorites)
+            return count_rows(self.db, PROJECT_LIST_QUERY, where, params, {
+                'ca_total': f"COALESCE(SUM({amount_sql('p.prix_estime')}), 0)",
+                'heures_total': "COALESCE(SUM(CAST(p.bd_ft_estime AS REAL)), 0)",
+            })
+        except Exception as e:
+            st.error(f"Erreur résumé projets: {e}")
+            return {'total': 0, 'ca_total': 0, 'heures_total': 0}
+
+    def count_projects(self):
+        try:
+            return self.db.get_table_count('projects')
+        except Exception:
+            return 0
+
+    def get_project_filter_values(self):
+        """Statuts et priorités présents, pour les filtres de la liste"""
+        try:
+            rows = self.db.execute_query(
+                "SELECT DISTINCT COALESCE(statut, 'N/A') AS statut, COALESCE(priorite, 'N/A') AS priorite FROM projects")
+            return sorted({r['statut'] for r in rows}), sorted({r['priorite'] for r in rows})
+        except Exception:
+            return [], []
 
 # ========================
 # INITIALISATION ERP SYSTÈME
@@ -2172,290 +2156,35 @@ def _init_base_data_if_empty():
         print(f"Erreur initialisation données de base: {e}")
 
 def migrate_projects_table_for_alphanumeric_ids(db):
-    """Migre la table projects pour supporter les IDs alphanumériques"""
-    try:
-        # DIAGNOSTIC : Vérifier la structure actuelle
-        table_info = db.execute_query("PRAGMA table_info(projects)")
-        print("🔍 Structure actuelle de la table projects:")
-        for column in table_info:
-            print(f"  - {column['name']}: {column['type']} (PK: {column['pk']})")
-        
-        id_column_type = None
-        for column in table_info:
-            if column['name'] == 'id':
-                id_column_type = column['type']
-                break
-        
-        print(f"🎯 Type actuel de la colonne ID: {id_column_type}")
-        
-        if id_column_type and id_column_type.upper() == 'INTEGER':
-            print("📝 Migration requise: Conversion ID INTEGER vers TEXT")
-            
-            # SÉCURITÉ : Sauvegarder les données existantes
-            existing_projects = db.execute_query("SELECT * FROM projects LIMIT 5")
-            print(f"📊 Nombre de projets existants: {len(existing_projects) if existing_projects else 0}")
-            
-            # Créer nouvelle table avec ID TEXT
-            print("🔨 Création de la nouvelle table...")
-            db.execute_update("""
-                CREATE TABLE IF NOT EXISTS projects_new (
-                    id TEXT PRIMARY KEY,
-                    nom_projet TEXT NOT NULL,
-                    client_company_id INTEGER,
-                    client_nom_cache TEXT,
-                    client_legacy TEXT,
-                    po_client TEXT,
-                    statut TEXT DEFAULT 'À FAIRE',
-                    priorite TEXT DEFAULT 'MOYEN',
-                    tache TEXT,
-                    date_soumis TEXT,
-                    date_prevu TEXT,
-                    bd_ft_estime REAL DEFAULT 0,
-                    prix_estime REAL DEFAULT 0,
-                    description TEXT,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (client_company_id) REFERENCES companies(id)
-                )
-            """)
-            
-            # Copier données existantes avec gestion d'erreur
-            print("📋 Copie des données existantes...")
-            try:
-                db.execute_update("""
-                    INSERT OR REPLACE INTO projects_new 
-                    SELECT CAST(id AS TEXT), nom_projet, client_company_id, client_nom_cache, 
-                           client_legacy, po_client, statut, priorite, tache, date_soumis, date_prevu,
-                           bd_ft_estime, prix_estime, description, 
-                           COALESCE(created_at, CURRENT_TIMESTAMP),
-                           COALESCE(updated_at, CURRENT_TIMESTAMP)
-                    FROM projects
-                """)
-                print("✅ Données copiées avec succès")
-            except Exception as copy_error:
-                print(f"⚠️ Erreur copie données: {copy_error}")
-            
-            # Mettre à jour tables liées avec gestion d'erreur
-            print("🔗 Mise à jour des tables liées...")
-            
-            try:
-                db.execute_update("""
-                    UPDATE project_assignments 
-                    SET project_id = CAST(project_id AS TEXT)
-                    WHERE project_id IS NOT NULL
-                """)
-                print("✅ project_assignments mise à jour")
-            except Exception as e:
-                print(f"⚠️ Erreur project_assignments: {e}")
-            
-            try:
-                db.execute_update("""
-                    UPDATE operations 
-                    SET project_id = CAST(project_id AS TEXT)
-                    WHERE project_id IS NOT NULL
-                """)
-                print("✅ operations mise à jour")
-            except Exception as e:
-                print(f"⚠️ Erreur operations: {e}")
-            
-            try:
-                db.execute_update("""
-                    UPDATE materials 
-                    SET project_id = CAST(project_id AS TEXT)
-                    WHERE project_id IS NOT NULL
-                """)
-                print("✅ materials mise à jour")
-            except Exception as e:
-                print(f"⚠️ Erreur materials: {e}")
-            
-            try:
-                db.execute_update("""
-                    UPDATE time_entries 
-                    SET project_id = CAST(project_id AS TEXT)
-                    WHERE project_id IS NOT NULL
-                """)
-                print("✅ time_entries mise à jour")
-            except Exception as e:
-                print(f"⚠️ Erreur time_entries: {e} (normal si table n'existe pas)")
-            
-            # Remplacer table avec sécurité
-            print("🔄 Remplacement de la table...")
-            try:
-                db.execute_update("DROP TABLE IF EXISTS projects_old")
-                db.execute_update("ALTER TABLE projects RENAME TO projects_old")
-                db.execute_update("ALTER TABLE projects_new RENAME TO projects")
-                print("✅ Table remplacée avec succès")
-                
-                # Vérifier le résultat
-                new_table_info = db.execute_query("PRAGMA table_info(projects)")
-                for column in new_table_info:
-                    if column['name'] == 'id':
-                        print(f"🎉 Nouveau type de colonne ID: {column['type']}")
-                        break
-                
-            except Exception as replace_error:
-                print(f"❌ Erreur remplacement table: {replace_error}")
-                # Essayer de récupérer
-                try:
-                    db.execute_update("ALTER TABLE projects_old RENAME TO projects")
-                    print("🔄 Table restaurée")
-                except:
-                    pass
-            
-            print("✅ Migration terminée: IDs alphanumériques supportés")
-            
-        else:
-            print("✅ Table déjà configurée pour IDs alphanumériques")
-            
-        # DIAGNOSTIC FINAL : Vérifier la structure finale
-        final_info = db.execute_query("PRAGMA table_info(projects)")
-        print("🎯 Structure FINALE de la table projects:")
-        for column in final_info:
-            if column['name'] == 'id':
-                print(f"  🆔 ID: {column['type']} (PK: {column['pk']})")
-                break
-            
-    except Exception as e:
-        print(f"❌ Erreur migration: {e}")
-        import traceback
-        print(f"📋 Traceback: {traceback.format_exc()}")
-        
-        # En cas d'erreur, essayer de nettoyer
-        try:
-            db.execute_update("DROP TABLE IF EXISTS projects_new")
-        except:
-            pass
-
-def force_recreate_projects_table_with_text_id(db):
-    """Solution de contournement : Recréer complètement la table projects avec ID TEXT"""
-    try:
-        print("🚨 SOLUTION FORCÉE : Recréation complète de la table projects")
-        
-        # 1. Sauvegarder toutes les données existantes
-        print("💾 Sauvegarde des données existantes...")
-        existing_projects = []
-        try:
-            projects_data = db.execute_query("SELECT * FROM projects")
-            if projects_data:
-                existing_projects = [dict(row) for row in projects_data]
-                print(f"📊 {len(existing_projects)} projets à sauvegarder")
-        except Exception as e:
-            print(f"⚠️ Erreur lecture projets existants: {e}")
-        
-        # 2. Supprimer complètement l'ancienne table
-        print("🗑️ Suppression de l'ancienne table...")
-        db.execute_update("DROP TABLE IF EXISTS projects")
-        
-        # 3. Créer la nouvelle table avec ID TEXT
-        print("🏗️ Création de la nouvelle table...")
-        db.execute_update("""
-            CREATE TABLE projects (
-                id TEXT PRIMARY KEY,
-                nom_projet TEXT NOT NULL,
-                client_company_id INTEGER,
-                client_nom_cache TEXT,
-                client_legacy TEXT,
-                po_client TEXT,
-                statut TEXT DEFAULT 'À FAIRE',
-                priorite TEXT DEFAULT 'MOYEN',
-                tache TEXT,
-                date_soumis TEXT,
-                date_prevu TEXT,
-                bd_ft_estime REAL DEFAULT 0,
-                prix_estime REAL DEFAULT 0,
-                description TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (client_company_id) REFERENCES companies(id)
-            )
-        """)
-        
-        # 4. Restaurer les données avec ID converti en TEXT
-        if existing_projects:
-            print("📥 Restauration des données...")
-            for project in existing_projects:
-                try:
-                    # Convertir l'ID en string
-                    project_id = str(project.get('id', ''))
-                    
-                    db.execute_update("""
-                        INSERT INTO projects 
-                        (id, nom_projet, client_company_id, client_nom_cache, client_legacy, po_client,
-                         statut, priorite, tache, date_soumis, date_prevu, bd_ft_estime,
-                         prix_estime, description, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        project_id,
-                        project.get('nom_projet', ''),
-                        project.get('client_company_id'),
-                        project.get('client_nom_cache', ''),
-                        project.get('client_legacy', ''),
-                        project.get('po_client', ''),
-                        project.get('statut', 'À FAIRE'),
-                        project.get('priorite', 'MOYEN'),
-                        project.get('tache', ''),
-                        project.get('date_soumis', ''),
-                        project.get('date_prevu', ''),
-                        project.get('bd_ft_estime', 0),
-                        project.get('prix_estime', 0),
-                        project.get('description', ''),
-                        project.get('created_at', 'CURRENT_TIMESTAMP'),
-                        project.get('updated_at', 'CURRENT_TIMESTAMP')
-                    ))
-                except Exception as restore_error:
-                    print(f"⚠️ Erreur restauration projet {project.get('id')}: {restore_error}")
-            
-            print(f"✅ {len(existing_projects)} projets restaurés")
-        
-        # 5. Nettoyer les tables liées
-        print("🧹 Nettoyage des tables liées...")
-        try:
-            # Supprimer les assignations orphelines
-            db.execute_update("""
-                DELETE FROM project_assignments 
-                WHERE project_id NOT IN (SELECT id FROM projects)
-            """)
-            
-            # Supprimer les opérations orphelines  
-            db.execute_update("""
-                DELETE FROM operations 
-                WHERE project_id IS NOT NULL 
-                AND project_id NOT IN (SELECT id FROM projects)
-            """)
-            
-            # Supprimer les matériaux orphelins
-            db.execute_update("""
-                DELETE FROM materials 
-                WHERE project_id IS NOT NULL 
-                AND project_id NOT IN (SELECT id FROM projects)
-            """)
-            
-            print("✅ Tables liées nettoyées")
-        except Exception as cleanup_error:
-            print(f"⚠️ Erreur nettoyage: {cleanup_error}")
-        
-        # 6. Vérification finale
-        final_check = db.execute_query("PRAGMA table_info(projects)")
-        for column in final_check:
-            if column['name'] == 'id':
-                print(f"🎉 SUCCÈS: Colonne ID maintenant de type {column['type']}")
-                break
-        
-        restored_count = len(db.execute_query("SELECT id FROM projects") or [])
-        print(f"📊 Projets dans la nouvelle table: {restored_count}")
-        
+    """
+    Migre la table projects pour supporter les IDs alphanumériques : reconstruction
+    en ligne par lots (schema_migrations.migrate_projects_to_text_ids), reprenable
+    après interruption, sans charger la table en mémoire ni supprimer les vues.
+    """
+    if not projects_need_text_ids(db.db_path):
+        print("✅ Table projects déjà en ID TEXT")
         return True
-        
-    except Exception as e:
-        print(f"❌ Erreur solution forcée: {e}")
-        import traceback
-        print(f"📋 Traceback: {traceback.format_exc()}")
+    result = migrate_projects_to_text_ids(db.db_path)
+    if result['status'] != 'OK':
+        print(f"❌ Erreur migration: {result['error']}")
         return False
+    print(f"✅ Table projects migrée en ID TEXT ({result['rows']} lignes, {result['duration_ms']:.0f} ms)")
+    return True
+
+def force_recreate_projects_table_with_text_id(db):
+    """Ancienne solution de contournement (DROP/CREATE) : même reconstruction en ligne, sans perte de colonnes"""
+    return migrate_projects_table_for_alphanumeric_ids(db)
             
 # app.py - NOUVELLE VERSION DE init_erp_system()
 
 def init_erp_system():
-    """Initialise le système ERP complet et tous ses gestionnaires."""
+    """
+    Initialise le système ERP complet et tous ses gestionnaires.
+
+    Les objets sont construits une seule fois par processus (erp_registry) puis
+    partagés entre toutes les sessions Streamlit : une nouvelle session ne fait
+    que référencer les instances existantes dans son st.session_state.
+    """
     
     # -----------------------------------------------------
     # 1. GESTIONNAIRE DE STOCKAGE PERSISTANT (PRIORITAIRE)
@@ -2463,87 +2192,86 @@ def init_erp_system():
     db_path = "erp_production_dg.db" # Chemin par défaut
     if PERSISTENT_STORAGE_AVAILABLE and 'storage_manager' not in st.session_state:
         try:
-            st.session_state.storage_manager = init_persistent_storage()
-            db_path = st.session_state.storage_manager.db_path
+            st.session_state.storage_manager = get_shared_resource('storage_manager', init_persistent_storage)
         except Exception as e:
             st.error(f"❌ Erreur initialisation stockage persistant: {e}")
             st.session_state.storage_manager = None
+    if st.session_state.get('storage_manager'):
+        db_path = st.session_state.storage_manager.db_path
+
+    def shared(name, factory):
+        """Ressource partagée du processus, clé = base de données utilisée"""
+        return get_shared_resource(name, factory, key=db_path)
+
+    def share_in_session(name, factory):
+        """
+        Place un proxy de la ressource partagée dans la session : le gestionnaire (et
+        l'import de son module) n'est construit qu'au premier accès d'une page
+        """
+        if name not in st.session_state:
+            st.session_state[name] = LazyResource(name, factory, key=db_path)
+        return st.session_state[name]
 
     # -----------------------------------------------------
     # 2. BASE DE DONNÉES (le cœur du système)
     # -----------------------------------------------------
     if ERP_DATABASE_AVAILABLE and 'erp_db' not in st.session_state:
-        st.session_state.erp_db = ERPDatabase(db_path)
-        # La migration et les données de base sont gérées dans le constructeur de ERPDatabase
-        st.session_state.migration_completed = True
+        # Les migrations numérotées tournent en arrière-plan (ou au déploiement via
+        # « python schema_migrations.py ») : la requête n'attend que le drapeau ci-dessous
+        st.session_state.erp_db = shared('erp_db', lambda: ERPDatabase(db_path, wait_for_schema=False))
         print("✅ Base de données ERP initialisée.")
 
     # Si la DB n'est pas initialisée, on arrête ici.
     if 'erp_db' not in st.session_state:
         st.error("ERREUR CRITIQUE : Impossible d'initialiser la base de données ERP.")
         st.stop()
+
+    if not st.session_state.get('migration_completed'):
+        if not st.session_state.erp_db.wait_for_schema(timeout=SCHEMA_WAIT_SECONDS):
+            st.info("🔄 Mise à jour du schéma de la base de données en cours, la page se rechargera automatiquement...")
+            st.rerun()
+        if st.session_state.erp_db.schema_error:
+            st.error(f"❌ Mise à jour du schéma en échec (nouvel essai au prochain démarrage) : {st.session_state.erp_db.schema_error}")
+        st.session_state.migration_completed = True
     
     # -----------------------------------------------------
-    # 3. GESTIONNAIRES DE MODULES (dépendent de la DB)
+    # 3. GESTIONNAIRES DE MODULES (dépendent de la DB), construits au premier accès
     # -----------------------------------------------------
-    
-    # Gestionnaire Projets
-    if 'gestionnaire' not in st.session_state:
-        st.session_state.gestionnaire = GestionnaireProjetSQL(st.session_state.erp_db)
-        print("✅ Gestionnaire Projets initialisé.")
-
-    # Gestionnaire CRM
-    if CRM_AVAILABLE and 'gestionnaire_crm' not in st.session_state:
-        st.session_state.gestionnaire_crm = GestionnaireCRM(db=st.session_state.erp_db)
-        print("✅ Gestionnaire CRM initialisé.")
-        
-    # Gestionnaire Employés
-    if EMPLOYEES_AVAILABLE and 'gestionnaire_employes' not in st.session_state:
-        st.session_state.gestionnaire_employes = GestionnaireEmployes()
-        print("✅ Gestionnaire Employés initialisé.")
+    db = st.session_state.erp_db
+    storage_manager = st.session_state.get('storage_manager')
 
-    # Gestionnaire Produits
-    if PRODUITS_AVAILABLE and 'gestionnaire_produits' not in st.session_state:
-        st.session_state.gestionnaire_produits = GestionnaireProduits(db=st.session_state.erp_db)
-        print("✅ Gestionnaire Produits initialisé.")
+    gestionnaire = share_in_session('gestionnaire', lambda: GestionnaireProjetSQL(db))
+    crm = share_in_session('gestionnaire_crm', lambda: GestionnaireCRM(db=db)) if CRM_AVAILABLE else None
+    if EMPLOYEES_AVAILABLE:
+        share_in_session('gestionnaire_employes', lambda: GestionnaireEmployes(db=db))
+    produits = share_in_session('gestionnaire_produits', lambda: GestionnaireProduits(db=db)) if PRODUITS_AVAILABLE else None
 
     # Gestionnaire Fournisseurs (dépend du CRM et des Produits)
-    if FOURNISSEURS_AVAILABLE and 'gestionnaire_fournisseurs' not in st.session_state:
-        st.session_state.gestionnaire_fournisseurs = GestionnaireFournisseurs(
-            db=st.session_state.erp_db,
-            crm_manager=st.session_state.get('gestionnaire_crm'),
-            product_manager=st.session_state.get('gestionnaire_produits')
-        )
-        print("✅ Gestionnaire Fournisseurs initialisé avec ses dépendances.")
+    if FOURNISSEURS_AVAILABLE:
+        share_in_session('gestionnaire_fournisseurs', lambda: GestionnaireFournisseurs(
+            db=db,
+            crm_manager=crm,
+            product_manager=produits
+        ))
 
-    # Gestionnaire Formulaires
-    if FORMULAIRES_AVAILABLE and 'gestionnaire_formulaires' not in st.session_state:
-        st.session_state.gestionnaire_formulaires = GestionnaireFormulaires(st.session_state.erp_db)
-        print("✅ Gestionnaire Formulaires initialisé.")
+    if FORMULAIRES_AVAILABLE:
+        share_in_session('gestionnaire_formulaires', lambda: GestionnaireFormulaires(db))
 
     # Gestionnaire Devis (dépend de plusieurs autres)
-    if DEVIS_AVAILABLE and 'gestionnaire_devis' not in st.session_state:
-        st.session_state.gestionnaire_devis = GestionnaireDevis(
-            db=st.session_state.erp_db,
-            crm_manager=st.session_state.get('gestionnaire_crm'),
-            project_manager=st.session_state.get('gestionnaire'),
-            product_manager=st.session_state.get('gestionnaire_produits')
-        )
-        print("✅ Gestionnaire Devis initialisé.")
-
-    # TimeTracker Unifié
-    if TIMETRACKER_AVAILABLE and 'timetracker_unified' not in st.session_state:
-        st.session_state.timetracker_unified = initialize_timetracker_unified(st.session_state.erp_db)
-        print("✅ TimeTracker Unifié initialisé.")
-
-    # Gestionnaire Pièces Jointes
-    if ATTACHMENTS_AVAILABLE and 'attachments_manager' not in st.session_state:
-        st.session_state.attachments_manager = init_attachments_manager(
-            st.session_state.erp_db,
-            st.session_state.get('storage_manager')
-        )
-        print("✅ Gestionnaire Pièces Jointes initialisé.")
-            
+    if DEVIS_AVAILABLE:
+        share_in_session('gestionnaire_devis', lambda: GestionnaireDevis(
+            db=db,
+            crm_manager=crm,
+            project_manager=gestionnaire,
+            product_manager=produits
+        ))
+
+    if TIMETRACKER_AVAILABLE:
+        share_in_session('timetracker_unified', lambda: initialize_timetracker_unified(db))
+
+    if ATTACHMENTS_AVAILABLE:
+        share_in_session('attachments_manager', lambda: init_attachments_manager(db, storage_manager))
+
 def get_system_stats():
     """Récupère les statistiques système"""
     try:
@@ -2885,6 +2613,8 @@ def show_erp_main():
     # 9. Assistant IA
     if has_all_permissions or "use_assistant_ia" in permissions:
         available_pages["🤖 Assistant IA"] = "ai_assistant"
+    if has_all_permissions:
+        available_pages["📏 Consommation IA"] = "llm_metrics"
     
     # 10. Conformité Construction Québec
     if has_all_permissions or "conformite" in permissions:
@@ -2925,6 +2655,7 @@ def show_erp_main():
         "calendrier": "📅 Calendrier",
         "kanban": "🔄 Kanban",
         "ai_assistant": "🤖 Assistant IA",
+        "llm_metrics": "📏 Consommation IA",
         "conformite_construction": "🏗️ Conformité Construction"
     }
     
@@ -3264,6 +2995,8 @@ def show_erp_main():
             show_assistant_ia_page(st.session_state.erp_db)
         else:
             st.error("❌ Base de données non initialisée. Veuillez rafraîchir la page.")
+    elif page_to_show_val == "llm_metrics":
+        show_llm_metrics_page()
     
     elif page_to_show_val == "conformite_construction":
         if 'conformite_manager' not in st.session_state:
@@ -3741,8 +3474,9 @@ def show_liste_projets():
             st.rerun()
     with col_export:
         if st.button("📊 Export CSV", use_container_width=True, key="export_btn_liste"):
-            if gestionnaire.projets:
-                csv_content = export_projects_to_csv(gestionnaire.projets, crm_manager)
+            tous_projets = gestionnaire.projets
+            if tous_projets:
+                csv_content = export_projects_to_csv(tous_projets, crm_manager)
                 if csv_content:
                     st.download_button(
                         label="⬇️ Télécharger CSV",
@@ -3757,14 +3491,16 @@ def show_liste_projets():
         if st.button("📈 Statistiques", use_container_width=True, key="stats_btn_liste"):
             st.session_state.show_project_stats = not st.session_state.get('show_project_stats', False)
 
+    nb_projets_total = gestionnaire.count_projects()
+
     # Affichage des statistiques si activé
-    if st.session_state.get('show_project_stats', False) and gestionnaire.projets:
+    if st.session_state.get('show_project_stats', False) and nb_projets_total:
         with st.expander("📊 Statistiques Détaillées", expanded=True):
             show_project_statistics(gestionnaire.projets, crm_manager)
 
     st.markdown("---")
 
-    if not gestionnaire.projets and not st.session_state.get('show_create_project'):
+    if not nb_projets_total and not st.session_state.get('show_create_project'):
         st.markdown("""
         <div class="project-stats">
             <h5>🚀 Commencez votre premier projet !</h5>
@@ -3773,14 +3509,13 @@ def show_liste_projets():
         """, unsafe_allow_html=True)
         return
 
-    if gestionnaire.projets:
+    if nb_projets_total:
         # Interface de filtrage et recherche avancée
         with st.expander("🔍 Filtres et Recherche Avancée", expanded=False):
             search_col, filter_col1, filter_col2, sort_col = st.columns(4)
             
             # Récupération des valeurs uniques pour les filtres
-            statuts_dispo = sorted(list(set([p.get('statut', 'N/A') for p in gestionnaire.projets])))
-            priorites_dispo = sorted(list(set([p.get('priorite', 'N/A') for p in gestionnaire.projets])))
+            statuts_dispo, priorites_dispo = gestionnaire.get_project_filter_values()
             
             with search_col:
                 recherche = st.text_input(
@@ -3828,40 +3563,29 @@ def show_liste_projets():
                 st.session_state.project_sort_by = "ID (Desc)"
                 st.rerun()
 
-        # Application des filtres et recherche
-        projets_filtres = gestionnaire.projets
-        
-        # Recherche avancée
-        if recherche:
-            projets_filtres = advanced_project_search(projets_filtres, recherche, crm_manager)
-        
-        # Filtres par statut
-        if 'Tous' not in filtre_statut and filtre_statut:
-            projets_filtres = [p for p in projets_filtres if p.get('statut') in filtre_statut]
-        
-        # Filtres par priorité
-        if 'Toutes' not in filtre_priorite and filtre_priorite:
-            projets_filtres = [p for p in projets_filtres if p.get('priorite') in filtre_priorite]
-
-        # Application du tri
-        projets_filtres = sort_projects(projets_filtres, tri_par, crm_manager)
+        # Filtres et tri appliqués par SQLite ; seule la page affichée est chargée
+        statuts = filtre_statut if 'Tous' not in filtre_statut else []
+        priorites = filtre_priorite if 'Toutes' not in filtre_priorite else []
+        resume = gestionnaire.get_projects_summary(recherche, statuts, priorites)
+        pager = pager_state('project_list_page', (recherche, statuts, priorites, tri_par))
+        page = gestionnaire.get_projects_page(recherche, statuts, priorites, tri_par,
+                                              pager['cursor'], pager['direction'], pager['page_size'])
+        projets_filtres = page['rows']
 
         # Résultats de la recherche
-        total_projets = len(gestionnaire.projets)
-        projets_affiches = len(projets_filtres)
+        total_projets = nb_projets_total
+        projets_affiches = resume['total']
         
         # Barre de résultats avec métriques rapides
         result_col1, result_col2, result_col3 = st.columns(3)
         with result_col1:
             st.markdown(f"**🔍 {projets_affiches} projet(s) sur {total_projets} total**")
         with result_col2:
-            if projets_filtres:
-                ca_filtre = sum(float(str(p.get('prix_estime', 0) or 0).replace(' ', '').replace(',', '').replace('None', '0') or 0) for p in projets_filtres)
-                st.markdown(f"**💰 CA filtré: {format_currency(ca_filtre)}**")
+            if projets_affiches:
+                st.markdown(f"**💰 CA filtré: {format_currency(resume['ca_total'])}**")
         with result_col3:
-            if projets_filtres:
-                temps_filtre = sum(float(p.get('bd_ft_estime', 0) or 0) for p in projets_filtres)
-                st.markdown(f"**⏱️ Temps filtré: {temps_filtre:.1f}h**")
+            if projets_affiches:
+                st.markdown(f"**⏱️ Temps filtré: {resume['heures_total']:.1f}h**")
         
         if projets_filtres:
             # Mode d'affichage
@@ -3882,6 +3606,8 @@ def show_liste_projets():
                 show_projects_card_view(projets_filtres, crm_manager)
             else:
                 show_projects_detailed_view(projets_filtres, crm_manager)
+
+            render_pager(page, 'project_list_page', projets_affiches)
         
         else:
             st.markdown("""
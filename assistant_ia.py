@@ -14,6 +14,13 @@ import plotly.graph_objects as go
 import plotly.express as px
 from pathlib import Path
 
+from ai_batch import MAX_CONCURRENCY as BATCH_MAX_CONCURRENCY, STATUT_CREE, create_batch
+from answer_cache import data_fingerprint, get_answer_cache
+from erp_context import collect_context, sections_indisponibles
+from intent_router import INTENTIONS_ASSISTANT, record_route
+from llm_gateway import instrument
+from llm_streaming import stream_message
+
 # Chargement du fichier .env
 def load_env_file():
     """Charge le fichier .env s'il existe"""
@@ -36,6 +43,22 @@ load_env_file()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _type_entreprise_sql(db, alias: str = 'c') -> str:
+    """Expression SQL du type d'entreprise : type_entreprise n'existe que si le CRM l'a ajoutée à companies"""
+    prefixe = f"{alias}." if alias else ""
+    colonnes = {col['name'] for col in db.execute_query("PRAGMA table_info(companies)")}
+    if 'type_entreprise' in colonnes:
+        return f"COALESCE({prefixe}type_entreprise, {prefixe}type_company)"
+    return f"{prefixe}type_company"
+
+
+# Tables lues par _fouiller_donnees_completes : leur version invalide les réponses en cache
+CONVERSATION_TABLES = ('projects', 'companies', 'operations', 'time_entries', 'materials', 'inventory_items',
+                       'inventory_history', 'employees', 'project_assignments', 'formulaires', 'formulaire_lignes',
+                       'work_centers', 'opportunities', 'interactions')
+
+
 class AssistantIAClaude:
     """
     Assistant IA utilisant Claude pour analyser les données ERP
@@ -55,7 +78,7 @@ class AssistantIAClaude:
         
         if self.api_key:
             try:
-                self.client = Anthropic(api_key=self.api_key)
+                self.client = instrument(Anthropic(api_key=self.api_key), 'assistant_ia')
                 self.model = "claude-sonnet-4-20250514"
                 logger.info("✅ Assistant IA Claude initialisé avec succès")
             except Exception as e:
@@ -69,24 +92,24 @@ class AssistantIAClaude:
     # COLLECTE ET PRÉPARATION DES DONNÉES
     # =========================================================================
     
-    def _collecter_donnees_projets(self) -> Dict[str, Any]:
+    def _collecter_donnees_projets(self, db=None) -> Dict[str, Any]:
         """Collecte les données projets pour analyse"""
+        db = db or self.db
         try:
             # Projets actifs
-            projets_actifs = self.db.execute_query("""
+            projets_actifs = db.execute_query("""
                 SELECT p.*, 
-                       COUNT(DISTINCT o.id) as nb_operations,
-                       COUNT(DISTINCT te.id) as nb_pointages,
-                       SUM(te.heures) as heures_totales
+                       (SELECT COUNT(*) FROM operations o WHERE o.project_id = p.id) as nb_operations,
+                       COUNT(te.id) as nb_pointages,
+                       SUM(te.total_hours) as heures_totales
                 FROM projects p
-                LEFT JOIN operations o ON p.id = o.project_id
                 LEFT JOIN time_entries te ON p.id = te.project_id
                 WHERE p.statut IN ('EN COURS', 'À FAIRE')
                 GROUP BY p.id
             """)
             
             # Statistiques globales
-            stats = self.db.execute_query("""
+            stats = db.execute_query("""
                 SELECT 
                     COUNT(CASE WHEN statut = 'TERMINÉ' THEN 1 END) as projets_termines,
                     COUNT(CASE WHEN statut = 'EN COURS' THEN 1 END) as projets_en_cours,
@@ -107,32 +130,33 @@ class AssistantIAClaude:
             logger.error(f"Erreur collecte données projets: {e}")
             return {}
     
-    def _collecter_donnees_inventaire(self) -> Dict[str, Any]:
+    def _collecter_donnees_inventaire(self, db=None) -> Dict[str, Any]:
         """Collecte les données d'inventaire pour analyse"""
+        db = db or self.db
         try:
             # Articles en alerte
-            alertes = self.db.execute_query("""
+            alertes = db.execute_query("""
                 SELECT * FROM inventory_items 
                 WHERE quantite_metric <= limite_minimale_metric
                 ORDER BY (quantite_metric / NULLIF(limite_minimale_metric, 0))
             """)
             
             # Mouvements récents
-            mouvements = self.db.execute_query("""
+            mouvements = db.execute_query("""
                 SELECT 
-                    item_id,
+                    inventory_item_id as item_id,
                     COUNT(*) as nb_mouvements,
-                    SUM(CASE WHEN type_mouvement = 'ENTREE' THEN quantite_metric ELSE 0 END) as total_entrees,
-                    SUM(CASE WHEN type_mouvement = 'SORTIE' THEN quantite_metric ELSE 0 END) as total_sorties
+                    SUM(MAX(CAST(quantite_apres AS REAL) - CAST(quantite_avant AS REAL), 0)) as total_entrees,
+                    SUM(MAX(CAST(quantite_avant AS REAL) - CAST(quantite_apres AS REAL), 0)) as total_sorties
                 FROM inventory_history
                 WHERE created_at >= date('now', '-30 days')
-                GROUP BY item_id
+                GROUP BY inventory_item_id
                 ORDER BY nb_mouvements DESC
                 LIMIT 10
             """)
             
             # Valeur totale inventaire (estimation)
-            valeur_totale = self.db.execute_query("""
+            valeur_totale = db.execute_query("""
                 SELECT 
                     COUNT(*) as nb_articles,
                     SUM(quantite_metric) as quantite_totale
@@ -149,23 +173,24 @@ class AssistantIAClaude:
             logger.error(f"Erreur collecte données inventaire: {e}")
             return {}
     
-    def _collecter_donnees_crm(self) -> Dict[str, Any]:
+    def _collecter_donnees_crm(self, db=None) -> Dict[str, Any]:
         """Collecte les données CRM pour analyse"""
+        db = db or self.db
         try:
             # Opportunités par statut
-            opportunites = self.db.execute_query("""
+            opportunites = db.execute_query("""
                 SELECT 
                     statut,
                     COUNT(*) as nombre,
-                    SUM(montant) as montant_total,
-                    AVG(montant) as montant_moyen
-                FROM crm_opportunities
+                    SUM(montant_estime) as montant_total,
+                    AVG(montant_estime) as montant_moyen
+                FROM opportunities
                 WHERE created_at >= date('now', '-3 months')
                 GROUP BY statut
             """)
             
             # Top clients par CA
-            top_clients = self.db.execute_query("""
+            top_clients = db.execute_query("""
                 SELECT 
                     c.nom as client,
                     COUNT(DISTINCT p.id) as nb_projets,
@@ -179,11 +204,11 @@ class AssistantIAClaude:
             """)
             
             # Activité commerciale récente
-            activite_recente = self.db.execute_query("""
+            activite_recente = db.execute_query("""
                 SELECT 
                     DATE(created_at) as date,
                     COUNT(*) as nb_interactions
-                FROM crm_interactions
+                FROM interactions
                 WHERE created_at >= date('now', '-30 days')
                 GROUP BY DATE(created_at)
                 ORDER BY date DESC
@@ -198,11 +223,12 @@ class AssistantIAClaude:
             logger.error(f"Erreur collecte données CRM: {e}")
             return {}
     
-    def _collecter_donnees_devis(self) -> Dict[str, Any]:
+    def _collecter_donnees_devis(self, db=None) -> Dict[str, Any]:
         """Collecte les données de devis pour analyse"""
+        db = db or self.db
         try:
             # Devis par statut
-            devis_par_statut = self.db.execute_query("""
+            devis_par_statut = db.execute_query("""
                 SELECT 
                     statut,
                     COUNT(*) as nombre,
@@ -216,11 +242,11 @@ class AssistantIAClaude:
             """)
             
             # Devis récents avec détails
-            devis_recents = self.db.execute_query("""
+            devis_recents = db.execute_query(f"""
                 SELECT 
                     f.*,
                     c.nom as client_nom,
-                    c.type_entreprise,
+                    {_type_entreprise_sql(db)} as type_entreprise,
                     COUNT(fl.id) as nb_articles,
                     SUM(CAST(fl.quantite AS REAL) * CAST(fl.prix_unitaire AS REAL)) as total_calcule
                 FROM formulaires f
@@ -233,7 +259,7 @@ class AssistantIAClaude:
             """)
             
             # Analyse des taux de conversion
-            taux_conversion = self.db.execute_query("""
+            taux_conversion = db.execute_query("""
                 SELECT 
                     COUNT(CASE WHEN statut IN ('VALIDÉ', 'ENVOYÉ') THEN 1 END) as devis_envoyes,
                     COUNT(CASE WHEN statut = 'APPROUVÉ' THEN 1 END) as devis_approuves,
@@ -246,7 +272,7 @@ class AssistantIAClaude:
             """)
             
             # Top produits/services dans les devis
-            top_produits = self.db.execute_query("""
+            top_produits = db.execute_query("""
                 SELECT 
                     fl.code_article,
                     fl.description,
@@ -274,11 +300,12 @@ class AssistantIAClaude:
             logger.error(f"Erreur collecte données devis: {e}")
             return {}
     
-    def _collecter_donnees_production(self) -> Dict[str, Any]:
+    def _collecter_donnees_production(self, db=None) -> Dict[str, Any]:
         """Collecte les données de production pour analyse"""
+        db = db or self.db
         try:
             # Charge par poste de travail
-            charge_postes = self.db.execute_query("""
+            charge_postes = db.execute_query("""
                 SELECT 
                     wc.nom as poste,
                     COUNT(o.id) as nb_operations,
@@ -292,11 +319,11 @@ class AssistantIAClaude:
             """)
             
             # Performance employés (30 derniers jours)
-            performance_employes = self.db.execute_query("""
+            performance_employes = db.execute_query("""
                 SELECT 
                     e.prenom || ' ' || e.nom as employe,
                     COUNT(DISTINCT te.id) as nb_pointages,
-                    SUM(te.heures) as heures_totales,
+                    SUM(te.total_hours) as heures_totales,
                     COUNT(DISTINCT te.project_id) as nb_projets
                 FROM employees e
                 LEFT JOIN time_entries te ON e.id = te.employee_id
@@ -327,41 +354,54 @@ class AssistantIAClaude:
             }
         
         try:
-            # Collecter toutes les données
-            donnees = {
-                'projets': self._collecter_donnees_projets(),
-                'inventaire': self._collecter_donnees_inventaire(),
-                'crm': self._collecter_donnees_crm(),
-                'production': self._collecter_donnees_production(),
-                'date_analyse': datetime.now().strftime('%Y-%m-%d %H:%M')
-            }
+            # Collecter toutes les données (collecteurs en parallèle, sections vides si hors délai)
+            collecte = collect_context([
+                ('projets', self._collecter_donnees_projets),
+                ('inventaire', self._collecter_donnees_inventaire),
+                ('crm', self._collecter_donnees_crm),
+                ('devis', self._collecter_donnees_devis),
+                ('production', self._collecter_donnees_production),
+            ], self.db)
+            donnees = collecte['donnees']
+            donnees['date_analyse'] = datetime.now().strftime('%Y-%m-%d %H:%M')
+            projets = donnees['projets']
+            inventaire = donnees['inventaire']
+            crm = donnees['crm']
+            devis = donnees['devis']
+            conversion = devis.get('taux_conversion', {})
+            production = donnees['production']
             
             # Préparer le contexte pour Claude
             contexte = f"""
             Analyse ERP du {donnees['date_analyse']}:
             
             PROJETS:
-            - {donnees['projets']['nb_projets_actifs']} projets actifs
-            - Durée moyenne: {donnees['projets']['statistiques'].get('duree_moy_jours', 0):.1f} jours
-            - Budget moyen: ${donnees['projets']['statistiques'].get('budget_moyen', 0):,.2f}
+            - {projets.get('nb_projets_actifs', 0)} projets actifs
+            - Durée moyenne: {projets.get('statistiques', {}).get('duree_moy_jours') or 0:.1f} jours
+            - Budget moyen: ${projets.get('statistiques', {}).get('budget_moyen') or 0:,.2f}
             
             INVENTAIRE:
-            - {donnees['inventaire']['nb_alertes']} articles en alerte stock
-            - {donnees['inventaire']['valeur_inventaire'].get('nb_articles', 0)} articles totaux
+            - {inventaire.get('nb_alertes', 0)} articles en alerte stock
+            - {inventaire.get('valeur_inventaire', {}).get('nb_articles', 0)} articles totaux
             
             CRM:
-            - {len(donnees['crm']['top_clients'])} clients actifs
-            - Opportunités en cours: {sum(o['nombre'] for o in donnees['crm']['opportunites'] if o['statut'] != 'Perdu')}
+            - {len(crm.get('top_clients', []))} clients actifs
+            - Opportunités en cours: {sum(o['nombre'] for o in crm.get('opportunites', []) if o['statut'] != 'Perdu')}
             
             DEVIS:
-            - {donnees['devis']['nb_devis_recents']} devis récents
-            - Taux de conversion: {(donnees['devis']['taux_conversion'].get('devis_approuves', 0) / max(donnees['devis']['taux_conversion'].get('total_devis', 1), 1) * 100):.1f}%
-            - Montant moyen: ${donnees['devis']['taux_conversion'].get('montant_moyen', 0):,.2f}
-            - Top produits: {len(donnees['devis']['top_produits'])} références analysées
+            - {devis.get('nb_devis_recents', 0)} devis récents
+            - Taux de conversion: {((conversion.get('devis_approuves') or 0) / max(conversion.get('total_devis') or 1, 1) * 100):.1f}%
+            - Montant moyen: ${conversion.get('montant_moyen') or 0:,.2f}
+            - Top produits: {len(devis.get('top_produits', []))} références analysées
             
             PRODUCTION:
-            - {len(donnees['production']['charge_postes'])} postes de travail actifs
-            - {sum(p['heures_totales'] for p in donnees['production']['performance_employes'])} heures travaillées (30j)
+            - {len(production.get('charge_postes', []))} postes de travail actifs
+            - {sum(p['heures_totales'] or 0 for p in production.get('performance_employes', []))} heures travaillées (30j)
+            """
+            indisponibles = sections_indisponibles(collecte)
+            if indisponibles:
+                contexte += f"""
+            DONNÉES INDISPONIBLES (non collectées à temps): {', '.join(indisponibles)}
             """
             
             # Appel à Claude pour analyse
@@ -393,6 +433,7 @@ Répondez de manière structurée et professionnelle."""
                 'success': True,
                 'analyse': response.content[0].text,
                 'donnees_analysees': donnees,
+                'collecte': collecte['metriques'],
                 'timestamp': datetime.now()
             }
             
@@ -450,7 +491,7 @@ Répondez de manière structurée et professionnelle."""
             
             # Calculs de performance
             heures_prevues = sum(o['temps_estime'] for o in operations)
-            heures_reelles = sum(t['heures'] for t in temps)
+            heures_reelles = sum(t['total_hours'] or 0 for t in temps)
             taux_avancement = len([o for o in operations if o['statut'] == 'TERMINÉ']) / len(operations) * 100 if operations else 0
             
             # Contexte pour Claude
@@ -513,8 +554,8 @@ Soyez précis et orienté action."""
         
         try:
             # Récupérer les données du devis
-            devis = self.db.execute_query("""
-                SELECT f.*, c.nom as client_nom, c.type_entreprise
+            devis = self.db.execute_query(f"""
+                SELECT f.*, c.nom as client_nom, {_type_entreprise_sql(self.db)} as type_entreprise
                 FROM formulaires f
                 LEFT JOIN companies c ON f.company_id = c.id
                 WHERE f.id = ? AND f.type_formulaire = 'ESTIMATION'
@@ -529,9 +570,9 @@ Soyez précis et orienté action."""
             lignes = self.db.execute_query("""
                 SELECT fl.*, 
                        (CAST(fl.quantite AS REAL) * CAST(fl.prix_unitaire AS REAL)) as montant_ligne,
-                       ii.unite_primaire, ii.categorie
+                       fl.unite as unite_primaire, ii.type_produit as categorie
                 FROM formulaire_lignes fl
-                LEFT JOIN inventory_items ii ON fl.code_article = ii.code_produit
+                LEFT JOIN inventory_items ii ON fl.code_article = ii.code_interne
                 WHERE fl.formulaire_id = ?
                 ORDER BY fl.created_at
             """, (devis_id,))
@@ -542,7 +583,7 @@ Soyez précis et orienté action."""
                 FROM formulaire_validations fv
                 LEFT JOIN employees e ON fv.employee_id = e.id
                 WHERE fv.formulaire_id = ?
-                ORDER BY fv.created_at DESC
+                ORDER BY fv.date_validation DESC
             """, (devis_id,))
             
             # Comparaison avec devis similaires
@@ -564,7 +605,7 @@ Soyez précis et orienté action."""
             prix_moyen_ligne = montant_total / nb_articles if nb_articles > 0 else 0
             
             # Comparaisons
-            comparaison = dict(devis_similaires[0]) if devis_similaires and devis_similaires[0][0] else {}
+            comparaison = dict(devis_similaires[0]) if devis_similaires and devis_similaires[0]['nb_devis'] else {}
             
             # Contexte pour Claude
             contexte = f"""
@@ -767,7 +808,8 @@ Répondez de manière claire, concise et professionnelle. Si la question nécess
     # CONVERSATION NATURELLE AVANCÉE - NOUVEAU MODULE
     # =========================================================================
     
-    def conversation_naturelle(self, message_utilisateur: str, contexte_projet: Optional[str] = None) -> str:
+    def conversation_naturelle(self, message_utilisateur: str, contexte_projet: Optional[str] = None,
+                               stream: bool = False):
         """
         Interface conversationnelle naturelle avec l'assistant IA
         L'assistant fouille toutes les données ERP pertinentes et répond naturellement
@@ -775,6 +817,7 @@ Répondez de manière claire, concise et professionnelle. Si la question nécess
         Args:
             message_utilisateur: Message/question de l'utilisateur en langage naturel
             contexte_projet: ID ou nom du projet pour analyses contextuelles
+            stream: Rendre une StreamedResponse (texte au fil de l'eau, voir llm_streaming)
         
         Returns:
             Réponse conversationnelle de l'assistant
@@ -783,6 +826,14 @@ Répondez de manière claire, concise et professionnelle. Si la question nécess
             return "😔 Désolé, je ne suis pas encore configuré. Il me faut une clé API Claude pour pouvoir discuter avec toi."
         
         try:
+            # Même question sur les mêmes données : réponse en cache, sans appel à Claude
+            cache = get_answer_cache(self.db)
+            portee = f"claude|{self.model}|{contexte_projet or ''}|{datetime.now().strftime('%Y-%m-%d')}"
+            empreinte = data_fingerprint(self.db, CONVERSATION_TABLES)
+            en_cache = cache.get(message_utilisateur, empreinte, portee)
+            if en_cache:
+                return en_cache['answer']
+            
             # Collecter toutes les données pertinentes
             donnees_completes = self._fouiller_donnees_completes(contexte_projet)
             
@@ -798,7 +849,7 @@ Répondez de manière claire, concise et professionnelle. Si la question nécess
             )
             
             # Appel à Claude avec personnalité conversationnelle
-            response = self.client.messages.create(
+            request = dict(
                 model=self.model,
                 max_tokens=1200,
                 temperature=0.8,  # Plus créatif pour la conversation
@@ -807,7 +858,20 @@ Répondez de manière claire, concise et professionnelle. Si la question nécess
                     "content": prompt_conversationnel
                 }]
             )
-            
+            if stream:
+                reponse = stream_message(
+                    self.client, label='conversation_naturelle',
+                    error_text=lambda e: f"😅 Oups, j'ai eu un petit problème technique : {str(e)}. Tu peux réessayer ?",
+                    **request)
+                
+                def memoriser(texte):
+                    if reponse.error is None:
+                        cache.put(message_utilisateur, empreinte, texte, portee)
+                reponse.on_complete = memoriser
+                return reponse
+            response = self.client.messages.create(**request)
+            
+            cache.put(message_utilisateur, empreinte, response.content[0].text, portee)
             return response.content[0].text
             
         except Exception as e:
@@ -815,79 +879,35 @@ Répondez de manière claire, concise et professionnelle. Si la question nécess
             return f"😅 Oups, j'ai eu un petit problème technique : {str(e)}. Tu peux réessayer ?"
     
     def _fouiller_donnees_completes(self, contexte_projet: Optional[str] = None) -> Dict[str, Any]:
-        """Fouille TOUTES les données ERP pertinentes pour une conversation riche"""
-        donnees = {}
-        
+        """Fouille TOUTES les données ERP pertinentes pour une conversation riche (collecteurs en parallèle)"""
         try:
-            # 1. DONNÉES PROJETS COMPLÈTES
-            if contexte_projet:
-                # Projet spécifique avec tous les détails
-                projet_info = self.db.execute_query("""
-                    SELECT p.*, c.nom as client_nom, c.type_entreprise
-                    FROM projects p 
-                    LEFT JOIN companies c ON p.client_company_id = c.id
-                    WHERE p.id = ? OR p.nom_projet LIKE ?
-                """, (contexte_projet, f"%{contexte_projet}%"))
-                
-                if projet_info:
-                    projet = dict(projet_info[0])
-                    
-                    # Opérations du projet
-                    operations = self.db.execute_query("""
-                        SELECT o.*, wc.nom as poste_nom, e.prenom || ' ' || e.nom as employe_nom
-                        FROM operations o
-                        LEFT JOIN work_centers wc ON o.work_center_id = wc.id
-                        LEFT JOIN employees e ON o.employee_id = e.id
-                        WHERE o.project_id = ?
-                        ORDER BY o.numero_sequence
-                    """, (projet['id'],))
-                    
-                    # Time tracking du projet
-                    pointages = self.db.execute_query("""
-                        SELECT te.*, e.prenom || ' ' || e.nom as employe_nom
-                        FROM time_entries te
-                        LEFT JOIN employees e ON te.employee_id = e.id
-                        WHERE te.project_id = ?
-                        ORDER BY te.date_pointage DESC
-                        LIMIT 20
-                    """, (projet['id'],))
-                    
-                    # Matériaux utilisés
-                    materiaux = self.db.execute_query("""
-                        SELECT m.*, ii.nom as materiau_nom, ii.unite_primaire
-                        FROM materials m
-                        LEFT JOIN inventory_items ii ON m.inventory_item_id = ii.id
-                        WHERE m.project_id = ?
-                    """, (projet['id'],))
-                    
-                    donnees['projet_specifique'] = {
-                        'info': projet,
-                        'operations': [dict(o) for o in operations],
-                        'pointages': [dict(p) for p in pointages],
-                        'materiaux': [dict(m) for m in materiaux],
-                        'avancement': self._calculer_avancement_projet(projet['id'])
-                    }
-            
-            # 2. VUE D'ENSEMBLE TOUS PROJETS
-            donnees['projets_globaux'] = self._collecter_donnees_projets()
-            
-            # 3. DONNÉES ÉQUIPES ET EMPLOYÉS
-            donnees['employes'] = self._collecter_donnees_employes()
-            
-            # 4. INVENTAIRE ET MATÉRIAUX
-            donnees['inventaire'] = self._collecter_donnees_inventaire()
-            
-            # 5. CRM ET CLIENTS
-            donnees['crm'] = self._collecter_donnees_crm()
-            
-            # 5.5. DEVIS ET PROPOSITIONS COMMERCIALES
-            donnees['devis'] = self._collecter_donnees_devis()
-            
-            # 6. PERFORMANCE ET MÉTRIQUES
-            donnees['performance'] = self._collecter_metriques_performance()
-            
-            # 7. PLANIFICATION ET CAPACITÉ
-            donnees['planification'] = self._analyser_capacite_planification()
+            collecteurs = [
+                # 1. DONNÉES PROJETS COMPLÈTES
+                ('projet_specifique', lambda db: self._collecter_projet_specifique(contexte_projet, db)),
+                # 2. VUE D'ENSEMBLE TOUS PROJETS
+                ('projets_globaux', self._collecter_donnees_projets),
+                # 3. DONNÉES ÉQUIPES ET EMPLOYÉS
+                ('employes', self._collecter_donnees_employes),
+                # 4. INVENTAIRE ET MATÉRIAUX
+                ('inventaire', self._collecter_donnees_inventaire),
+                # 5. CRM ET CLIENTS
+                ('crm', self._collecter_donnees_crm),
+                # 5.5. DEVIS ET PROPOSITIONS COMMERCIALES
+                ('devis', self._collecter_donnees_devis),
+                # 6. PERFORMANCE ET MÉTRIQUES
+                ('performance', self._collecter_metriques_performance),
+                # 7. PLANIFICATION ET CAPACITÉ
+                ('planification', self._analyser_capacite_planification),
+            ]
+            if not contexte_projet:
+                collecteurs = collecteurs[1:]
+            collecte = collect_context(collecteurs, self.db)
+            donnees = collecte['donnees']
+            if not donnees.get('projet_specifique'):
+                donnees.pop('projet_specifique', None)
+            indisponibles = sections_indisponibles(collecte)
+            if indisponibles:
+                donnees['sections_indisponibles'] = indisponibles
             
             return donnees
             
@@ -895,32 +915,61 @@ Répondez de manière claire, concise et professionnelle. Si la question nécess
             logger.error(f"Erreur fouille données complètes: {e}")
             return {'erreur': str(e)}
     
-    def _detecter_intention(self, message: str) -> str:
-        """Détecte l'intention conversationnelle du message"""
-        message_lower = message.lower()
+    def _collecter_projet_specifique(self, contexte_projet: str, db=None) -> Optional[Dict[str, Any]]:
+        """Projet mentionné avec opérations, pointages, matériaux et avancement (None si introuvable)"""
+        db = db or self.db
+        # Projet spécifique avec tous les détails
+        projet_info = db.execute_query(f"""
+            SELECT p.*, c.nom as client_nom, {_type_entreprise_sql(db)} as type_entreprise
+            FROM projects p 
+            LEFT JOIN companies c ON p.client_company_id = c.id
+            WHERE p.id = ? OR p.nom_projet LIKE ?
+        """, (contexte_projet, f"%{contexte_projet}%"))
         
-        if any(mot in message_lower for mot in ['penses quoi', 'ton avis', 'que penses-tu', 'qu\'en penses-tu']):
-            return 'demande_opinion'
-        elif any(mot in message_lower for mot in ['comment va', 'comment ça va', 'état de', 'situation']):
-            return 'demande_status'
-        elif any(mot in message_lower for mot in ['problème', 'souci', 'risque', 'attention']):
-            return 'detection_problemes'
-        elif any(mot in message_lower for mot in ['conseil', 'recommande', 'suggère', 'que faire']):
-            return 'demande_conseil'
-        elif any(mot in message_lower for mot in ['budget', 'coût', 'prix', 'rentable']):
-            return 'analyse_financiere'
-        elif any(mot in message_lower for mot in ['équipe', 'employé', 'qui peut', 'compétence']):
-            return 'gestion_equipe'
-        elif any(mot in message_lower for mot in ['matériel', 'stock', 'inventaire', 'manque']):
-            return 'gestion_materiel'
-        elif any(mot in message_lower for mot in ['planning', 'délai', 'retard', 'temps']):
-            return 'gestion_temps'
-        elif any(mot in message_lower for mot in ['devis', 'estimation', 'proposition', 'cotation', 'offre']):
-            return 'gestion_devis'
-        elif any(mot in message_lower for mot in ['client', 'vente', 'commercial', 'conversion', 'prospect']):
-            return 'analyse_commerciale'
-        else:
-            return 'question_generale'
+        if not projet_info:
+            return None
+        
+        projet = dict(projet_info[0])
+        
+        # Opérations du projet
+        operations = db.execute_query("""
+            SELECT o.*, wc.nom as poste_nom
+            FROM operations o
+            LEFT JOIN work_centers wc ON o.work_center_id = wc.id
+            WHERE o.project_id = ?
+            ORDER BY o.sequence_number
+        """, (projet['id'],))
+        
+        # Time tracking du projet
+        pointages = db.execute_query("""
+            SELECT te.*, e.prenom || ' ' || e.nom as employe_nom
+            FROM time_entries te
+            LEFT JOIN employees e ON te.employee_id = e.id
+            WHERE te.project_id = ?
+            ORDER BY te.punch_in DESC
+            LIMIT 20
+        """, (projet['id'],))
+        
+        # Matériaux utilisés
+        materiaux = db.execute_query("""
+            SELECT m.*, m.designation as materiau_nom, m.unite as unite_primaire
+            FROM materials m
+            WHERE m.project_id = ?
+        """, (projet['id'],))
+        
+        return {
+            'info': projet,
+            'operations': [dict(o) for o in operations],
+            'pointages': [dict(p) for p in pointages],
+            'materiaux': [dict(m) for m in materiaux],
+            'avancement': self._calculer_avancement_projet(projet['id'], db)
+        }
+    
+    def _detecter_intention(self, message: str) -> str:
+        """Détecte l'intention conversationnelle du message (table INTENTIONS_ASSISTANT compilée)"""
+        intention = INTENTIONS_ASSISTANT.route(message.lower())
+        record_route('intention_assistant', intention)
+        return intention
     
     def _construire_prompt_conversationnel(self, message: str, donnees: Dict, intention: str, contexte_projet: Optional[str]) -> str:
         """Construit un prompt naturel pour Claude avec toutes les données"""
@@ -978,10 +1027,11 @@ RÉPONSE ATTENDUE: Réponds naturellement comme un collègue expert qui a accès
         
         return prompt
     
-    def _collecter_donnees_employes(self) -> Dict[str, Any]:
+    def _collecter_donnees_employes(self, db=None) -> Dict[str, Any]:
         """Collecte données complètes des employés"""
+        db = db or self.db
         try:
-            employes_actifs = self.db.execute_query("""
+            employes_actifs = db.execute_query("""
                 SELECT e.*, COUNT(pa.project_id) as nb_projets_assignes
                 FROM employees e
                 LEFT JOIN project_assignments pa ON e.id = pa.employee_id
@@ -990,15 +1040,15 @@ RÉPONSE ATTENDUE: Réponds naturellement comme un collègue expert qui a accès
             """)
             
             # Charge de travail actuelle
-            charge_actuelle = self.db.execute_query("""
+            charge_actuelle = db.execute_query("""
                 SELECT 
                     e.id,
                     e.prenom || ' ' || e.nom as nom_complet,
                     COUNT(DISTINCT te.project_id) as projets_actifs,
-                    SUM(te.heures) as heures_semaine
+                    SUM(te.total_hours) as heures_semaine
                 FROM employees e
                 LEFT JOIN time_entries te ON e.id = te.employee_id 
-                    AND te.date_pointage >= date('now', '-7 days')
+                    AND te.punch_in >= date('now', '-7 days')
                 WHERE e.statut = 'ACTIF'
                 GROUP BY e.id
             """)
@@ -1011,11 +1061,12 @@ RÉPONSE ATTENDUE: Réponds naturellement comme un collègue expert qui a accès
         except Exception as e:
             return {'erreur': str(e)}
     
-    def _collecter_metriques_performance(self) -> Dict[str, Any]:
+    def _collecter_metriques_performance(self, db=None) -> Dict[str, Any]:
         """Collecte métriques de performance globales"""
+        db = db or self.db
         try:
             # Efficacité projets (estimé vs réel)
-            efficacite = self.db.execute_query("""
+            efficacite = db.execute_query("""
                 SELECT 
                     AVG(CASE WHEN prix_final > 0 THEN (prix_estime / prix_final) * 100 ELSE NULL END) as precision_estimation,
                     COUNT(CASE WHEN statut = 'TERMINÉ' AND date_fin_reel <= date_prevu THEN 1 END) as projets_a_temps,
@@ -1025,7 +1076,7 @@ RÉPONSE ATTENDUE: Réponds naturellement comme un collègue expert qui a accès
             """)
             
             # Rentabilité par type de projet  
-            rentabilite = self.db.execute_query("""
+            rentabilite = db.execute_query("""
                 SELECT 
                     type_construction,
                     COUNT(*) as nb_projets,
@@ -1043,11 +1094,12 @@ RÉPONSE ATTENDUE: Réponds naturellement comme un collègue expert qui a accès
         except Exception as e:
             return {'erreur': str(e)}
     
-    def _analyser_capacite_planification(self) -> Dict[str, Any]:
+    def _analyser_capacite_planification(self, db=None) -> Dict[str, Any]:
         """Analyse la capacité et planification"""
+        db = db or self.db
         try:
             # Charge par poste de travail
-            charge_postes = self.db.execute_query("""
+            charge_postes = db.execute_query("""
                 SELECT 
                     wc.nom as poste,
                     wc.capacite_heures as capacite_max,
@@ -1068,17 +1120,18 @@ RÉPONSE ATTENDUE: Réponds naturellement comme un collègue expert qui a accès
         except Exception as e:
             return {'erreur': str(e)}
     
-    def _calculer_avancement_projet(self, project_id: int) -> Dict[str, Any]:
+    def _calculer_avancement_projet(self, project_id: int, db=None) -> Dict[str, Any]:
         """Calcule l'avancement détaillé d'un projet"""
+        db = db or self.db
         try:
-            operations = self.db.execute_query("""
+            operations = db.execute_query("""
                 SELECT statut, COUNT(*) as nb
                 FROM operations
                 WHERE project_id = ?
                 GROUP BY statut
             """, (project_id,))
             
-            heures = self.db.execute_query("""
+            heures = db.execute_query("""
                 SELECT 
                     SUM(temps_estime) as estime_total,
                     SUM(CASE WHEN statut = 'TERMINÉ' THEN temps_estime ELSE 0 END) as estime_termine,
@@ -1116,8 +1169,8 @@ RÉPONSE ATTENDUE: Réponds naturellement comme un collègue expert qui a accès
             
             # Si company_id fourni, récupérer les infos client
             if company_id:
-                client_info = self.db.execute_query("""
-                    SELECT c.*, 
+                client_info = self.db.execute_query(f"""
+                    SELECT c.*, {_type_entreprise_sql(self.db)} as type_client,
                            AVG(CAST(f.montant_total AS REAL)) as montant_moyen_historique
                     FROM companies c
                     LEFT JOIN formulaires f ON c.id = f.company_id AND f.type_formulaire = 'ESTIMATION'
@@ -1131,7 +1184,7 @@ RÉPONSE ATTENDUE: Réponds naturellement comme un collègue expert qui a accès
                     
                     CLIENT:
                     - Nom: {client_data['nom']}
-                    - Type: {client_data['type_entreprise']}
+                    - Type: {client_data['type_client']}
                     - Montant moyen historique: ${client_data.get('montant_moyen_historique', 0):,.2f}
                     """
             
@@ -1212,20 +1265,21 @@ Soyez précis et réaliste dans les prix."""
                 }
                 
                 # Insérer dans la base
-                devis_id = self.db.execute_query("""
+                devis_id = self.db.execute_insert("""
                     INSERT INTO formulaires (
-                        type_formulaire, statut, company_id, 
+                        type_formulaire, numero_document, statut, company_id, 
                         montant_total, date_echeance, notes, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
                 """, (
-                    devis_data['type_formulaire'], devis_data['statut'], devis_data['company_id'],
+                    devis_data['type_formulaire'], self.db._generer_numero_document('ESTIMATION'),
+                    devis_data['statut'], devis_data['company_id'],
                     devis_data['montant_total'], devis_data['date_validite'], 
                     f"Titre: {devis_data['titre']}\nDescription: {devis_data['description']}\nConditions: {devis_data['conditions_paiement']}"
-                ), return_lastrowid=True)
+                ))
                 
                 # Ajouter les lignes d'articles
                 for idx, article in enumerate(devis_structure.get('articles', []), 1):
-                    self.db.execute_query("""
+                    self.db.execute_insert("""
                         INSERT INTO formulaire_lignes (
                             formulaire_id, code_article, description, quantite,
                             prix_unitaire, unite, sequence_ligne, created_at
@@ -1386,8 +1440,8 @@ Soyez orienté business et conversion commerciale."""
             
             # Historique des interactions avec ce client
             interactions = self.db.execute_query("""
-                SELECT type_interaction, commentaires, created_at
-                FROM crm_interactions
+                SELECT type_interaction, resume as commentaires, created_at
+                FROM interactions
                 WHERE company_id = ?
                 ORDER BY created_at DESC
                 LIMIT 5
@@ -1484,7 +1538,7 @@ Tone: Professionnel mais chaleureux, orienté solution."""
             # Opportunités CRM à suivre
             opportunites_chaudes = self.db.execute_query("""
                 SELECT COUNT(*) as nb
-                FROM crm_opportunities
+                FROM opportunities
                 WHERE statut IN ('Proposition', 'Négociation')
                 AND updated_at < date('now', '-7 days')
             """)
@@ -1528,30 +1582,25 @@ Tone: Professionnel mais chaleureux, orienté solution."""
     # GESTION DES PRODUITS AVEC IA
     # =========================================================================
     
-    def creer_produit_avec_ia(self, instructions: str) -> Dict[str, Any]:
-        """Crée un produit à partir d'instructions en langage naturel"""
-        if not self.client:
-            return {'success': False, 'error': "Assistant IA non configuré"}
+    def _requete_creation_produit(self, instructions: str) -> Dict[str, Any]:
+        """Requête Claude qui structure un produit à partir des instructions"""
+        # Importer les constantes du module produits
+        from produits import CATEGORIES_PRODUITS, UNITES_VENTE, NUANCES_MATERIAUX
         
-        try:
-            # Importer les constantes du module produits
-            from produits import CATEGORIES_PRODUITS, UNITES_VENTE, NUANCES_MATERIAUX
-            
-            # Contexte pour la création
-            contexte_creation = f"""Vous devez analyser les instructions et créer un produit structuré pour l'industrie de la construction québécoise.
+        # Contexte pour la création
+        contexte_creation = f"""Vous devez analyser les instructions et créer un produit structuré pour l'industrie de la construction québécoise.
 
 CATÉGORIES DISPONIBLES: {', '.join(CATEGORIES_PRODUITS)}
 UNITÉS DE VENTE: {', '.join(UNITES_VENTE)}
 NUANCES PAR MATÉRIAU: {json.dumps(NUANCES_MATERIAUX, indent=2)}"""
-            
-            # Analyser les instructions avec Claude
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1500,
-                temperature=0.3,
-                messages=[{
-                    "role": "user",
-                    "content": f"""Analysez ces instructions pour créer un produit et structurez les informations:
+        
+        return dict(
+            model=self.model,
+            max_tokens=1500,
+            temperature=0.3,
+            messages=[{
+                "role": "user",
+                "content": f"""Analysez ces instructions pour créer un produit et structurez les informations:
 
 INSTRUCTIONS: {instructions}
 
@@ -1575,8 +1624,38 @@ Fournissez une réponse JSON avec:
 }}
 
 Soyez précis et utilisez les catégories/nuances disponibles. Générez un code produit logique."""
-                }]
-            )
+            }]
+        )
+    
+    @staticmethod
+    def _donnees_produit(produit_structure: Dict[str, Any]) -> Dict[str, Any]:
+        """Données du produit validées et nettoyées depuis la réponse JSON de Claude"""
+        if not produit_structure.get('nom'):
+            raise ValueError("nom du produit manquant")
+        return {
+            'code_produit': (produit_structure.get('code_produit') or '').upper(),
+            'nom': produit_structure.get('nom', ''),
+            'description': produit_structure.get('description', ''),
+            'categorie': produit_structure.get('categorie', 'Autres'),
+            'materiau': produit_structure.get('materiau', ''),
+            'nuance': produit_structure.get('nuance', ''),
+            'dimensions': produit_structure.get('dimensions', ''),
+            'unite_vente': produit_structure.get('unite_vente', 'unité'),
+            'prix_unitaire': float(produit_structure.get('prix_unitaire') or 0),
+            'stock_disponible': float(produit_structure.get('stock_disponible') or 0),
+            'stock_minimum': float(produit_structure.get('stock_minimum') or 0),
+            'fournisseur_principal': produit_structure.get('fournisseur_principal', ''),
+            'notes_techniques': produit_structure.get('notes_techniques', '')
+        }
+    
+    def creer_produit_avec_ia(self, instructions: str) -> Dict[str, Any]:
+        """Crée un produit à partir d'instructions en langage naturel"""
+        if not self.client:
+            return {'success': False, 'error': "Assistant IA non configuré"}
+        
+        try:
+            # Analyser les instructions avec Claude
+            response = self.client.messages.create(**self._requete_creation_produit(instructions))
             
             # Tenter de parser la réponse JSON
             try:
@@ -1593,21 +1672,7 @@ Soyez précis et utilisez les catégories/nuances disponibles. Générez un code
             # Créer le produit dans la base si structure valide
             if isinstance(produit_structure, dict) and 'nom' in produit_structure:
                 # Valider et nettoyer les données
-                produit_data = {
-                    'code_produit': produit_structure.get('code_produit', '').upper(),
-                    'nom': produit_structure.get('nom', ''),
-                    'description': produit_structure.get('description', ''),
-                    'categorie': produit_structure.get('categorie', 'Autres'),
-                    'materiau': produit_structure.get('materiau', ''),
-                    'nuance': produit_structure.get('nuance', ''),
-                    'dimensions': produit_structure.get('dimensions', ''),
-                    'unite_vente': produit_structure.get('unite_vente', 'unité'),
-                    'prix_unitaire': float(produit_structure.get('prix_unitaire', 0)),
-                    'stock_disponible': float(produit_structure.get('stock_disponible', 0)),
-                    'stock_minimum': float(produit_structure.get('stock_minimum', 0)),
-                    'fournisseur_principal': produit_structure.get('fournisseur_principal', ''),
-                    'notes_techniques': produit_structure.get('notes_techniques', '')
-                }
+                produit_data = self._donnees_produit(produit_structure)
                 
                 # Importer et utiliser le gestionnaire de produits
                 from produits import GestionnaireProduits
@@ -1640,6 +1705,59 @@ Soyez précis et utilisez les catégories/nuances disponibles. Générez un code
             logger.error(f"Erreur création produit IA: {e}")
             return {'success': False, 'error': str(e)}
     
+    def creer_produits_avec_ia(self, liste_instructions: List[str], max_concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Crée plusieurs produits d'un coup : appels Claude simultanés (repris sur
+        limite de débit), validation de toutes les réponses, puis une seule
+        transaction pour les produits valides.
+        API seulement pour l'instant : aucun écran ne crée plusieurs fiches par
+        l'IA (app.py monte l'assistant de assistant_ia_simple, pas AssistantIAClaude).
+        """
+        if not self.client:
+            return {'success': False, 'error': "Assistant IA non configuré"}
+        
+        # La table produits est créée par le gestionnaire
+        from produits import GestionnaireProduits
+        GestionnaireProduits(self.db)
+        codes = {r['code_produit'] for r in self.db.execute_query("SELECT code_produit FROM produits")}
+        
+        def valider(produit_structure):
+            # code_produit est UNIQUE : un doublon annulerait tout le lot, il est écarté avant l'écriture
+            produit_data = self._donnees_produit(produit_structure)
+            if not produit_data['code_produit'] or produit_data['code_produit'] in codes:
+                raise ValueError(f"code produit vide ou déjà utilisé : {produit_data['code_produit']!r}")
+            codes.add(produit_data['code_produit'])
+            return produit_data
+        
+        lot = create_batch(self.client, self.db, liste_instructions, self._requete_creation_produit,
+                           valider, self._inserer_produit,
+                           max_concurrency=max_concurrency or BATCH_MAX_CONCURRENCY)
+        produits = [r for r in lot['resultats'] if r['statut'] == STATUT_CREE]
+        return {
+            'success': lot['success'],
+            'produit_ids': [r['id'] for r in produits],
+            'nb_crees': lot['nb_crees'],
+            'nb_echecs': lot['nb_echecs'],
+            'resultats': lot['resultats'],
+            'error': lot['error'],
+            'message': f"{lot['nb_crees']}/{len(liste_instructions)} produits créés en {lot['duree_s']:.1f}s : "
+                       + ', '.join(r['donnees']['nom'] for r in produits)
+        }
+    
+    @staticmethod
+    def _inserer_produit(conn, produit_data: Dict[str, Any]) -> int:
+        """INSERT du produit sur la connexion du lot (mêmes colonnes que GestionnaireProduits.ajouter_produit)"""
+        cursor = conn.execute('''
+            INSERT INTO produits 
+            (code_produit, nom, description, categorie, materiau, nuance, dimensions,
+             unite_vente, prix_unitaire, stock_disponible, stock_minimum, 
+             fournisseur_principal, notes_techniques, actif)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+        ''', tuple(produit_data[col] for col in (
+            'code_produit', 'nom', 'description', 'categorie', 'materiau', 'nuance', 'dimensions', 'unite_vente',
+            'prix_unitaire', 'stock_disponible', 'stock_minimum', 'fournisseur_principal', 'notes_techniques')))
+        return cursor.lastrowid
+    
     def modifier_produit_avec_ia(self, produit_id: int, instructions: str) -> Dict[str, Any]:
         """Modifie un produit existant selon les instructions en langage naturel"""
         if not self.client:
@@ -1906,32 +2024,51 @@ Contexte: Industrie construction québécoise, normes CSA/BNQ, saisons hivernale
     # GESTION DES EMPLOYÉS AVEC IA
     # =========================================================================
     
-    def creer_employe_avec_ia(self, instructions: str) -> Dict[str, Any]:
-        """Crée un employé à partir d'instructions en langage naturel"""
-        if not self.client:
-            return {'success': False, 'error': "Assistant IA non configuré"}
+    @staticmethod
+    def _donnees_employe(employe_structure: Dict[str, Any]) -> Dict[str, Any]:
+        """Données de l'employé validées et nettoyées depuis la réponse JSON de Claude"""
+        if not employe_structure.get('nom'):
+            raise ValueError("nom de l'employé manquant")
+        competences = employe_structure.get('competences') or []
+        if not isinstance(competences, list):
+            raise ValueError("competences doit être une liste")
+        return {
+            'prenom': employe_structure.get('prenom', ''),
+            'nom': employe_structure.get('nom', ''),
+            'email': employe_structure.get('email', ''),
+            'telephone': employe_structure.get('telephone', ''),
+            'poste': employe_structure.get('poste', ''),
+            'departement': employe_structure.get('departement', 'ADMINISTRATION'),
+            'statut': employe_structure.get('statut', 'ACTIF'),
+            'type_contrat': employe_structure.get('type_contrat', 'CDI'),
+            'date_embauche': employe_structure.get('date_embauche') or datetime.now().strftime('%Y-%m-%d'),
+            'salaire': float(employe_structure.get('salaire') or 50000),
+            'competences': [c for c in competences if isinstance(c, dict) and c.get('nom')],
+            'notes': employe_structure.get('notes', ''),
+            'charge_travail': int(employe_structure.get('charge_travail') or 80)
+        }
+    
+    def _requete_creation_employe(self, instructions: str) -> Dict[str, Any]:
+        """Requête Claude qui structure un employé à partir des instructions"""
+        # Importer les constantes du module employés
+        from employees import DEPARTEMENTS, STATUTS_EMPLOYE, TYPES_CONTRAT, COMPETENCES_DISPONIBLES, NIVEAUX_COMPETENCE
         
-        try:
-            # Importer les constantes du module employés
-            from employees import DEPARTEMENTS, STATUTS_EMPLOYE, TYPES_CONTRAT, COMPETENCES_DISPONIBLES, NIVEAUX_COMPETENCE
-            
-            # Contexte pour la création
-            contexte_creation = f"""Vous devez analyser les instructions et créer un employé pour l'industrie de la construction québécoise.
+        # Contexte pour la création
+        contexte_creation = f"""Vous devez analyser les instructions et créer un employé pour l'industrie de la construction québécoise.
 
 DÉPARTEMENTS DISPONIBLES: {', '.join(DEPARTEMENTS)}
 STATUTS EMPLOYÉ: {', '.join(STATUTS_EMPLOYE)}
 TYPES CONTRAT: {', '.join(TYPES_CONTRAT)}
 COMPÉTENCES CONSTRUCTION: {', '.join(COMPETENCES_DISPONIBLES[:20])}... (50+ compétences disponibles)
 NIVEAUX COMPÉTENCE: {', '.join(NIVEAUX_COMPETENCE)}"""
-            
-            # Analyser les instructions avec Claude
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1500,
-                temperature=0.3,
-                messages=[{
-                    "role": "user",
-                    "content": f"""Analysez ces instructions pour créer un employé et structurez les informations:
+        
+        return dict(
+            model=self.model,
+            max_tokens=1500,
+            temperature=0.3,
+            messages=[{
+                "role": "user",
+                "content": f"""Analysez ces instructions pour créer un employé et structurez les informations:
 
 INSTRUCTIONS: {instructions}
 
@@ -1962,8 +2099,17 @@ Fournissez une réponse JSON avec:
 }}
 
 Calculez un salaire réaliste selon le poste au Québec 2024. Assignez des compétences pertinentes."""
-                }]
-            )
+            }]
+        )
+    
+    def creer_employe_avec_ia(self, instructions: str) -> Dict[str, Any]:
+        """Crée un employé à partir d'instructions en langage naturel"""
+        if not self.client:
+            return {'success': False, 'error': "Assistant IA non configuré"}
+        
+        try:
+            # Analyser les instructions avec Claude
+            response = self.client.messages.create(**self._requete_creation_employe(instructions))
             
             # Tenter de parser la réponse JSON
             try:
@@ -1980,21 +2126,7 @@ Calculez un salaire réaliste selon le poste au Québec 2024. Assignez des comp
             # Créer l'employé dans la base si structure valide
             if isinstance(employe_structure, dict) and 'nom' in employe_structure:
                 # Valider et nettoyer les données
-                employe_data = {
-                    'prenom': employe_structure.get('prenom', ''),
-                    'nom': employe_structure.get('nom', ''),
-                    'email': employe_structure.get('email', ''),
-                    'telephone': employe_structure.get('telephone', ''),
-                    'poste': employe_structure.get('poste', ''),
-                    'departement': employe_structure.get('departement', 'ADMINISTRATION'),
-                    'statut': employe_structure.get('statut', 'ACTIF'),
-                    'type_contrat': employe_structure.get('type_contrat', 'CDI'),
-                    'date_embauche': employe_structure.get('date_embauche', datetime.now().strftime('%Y-%m-%d')),
-                    'salaire': float(employe_structure.get('salaire', 50000)),
-                    'competences': employe_structure.get('competences', []),
-                    'notes': employe_structure.get('notes', ''),
-                    'charge_travail': int(employe_structure.get('charge_travail', 80))
-                }
+                employe_data = self._donnees_employe(employe_structure)
                 
                 # Importer et utiliser le gestionnaire d'employés
                 from employees import GestionnaireEmployes
@@ -2028,6 +2160,64 @@ Calculez un salaire réaliste selon le poste au Québec 2024. Assignez des comp
             logger.error(f"Erreur création employé IA: {e}")
             return {'success': False, 'error': str(e)}
     
+    def creer_employes_avec_ia(self, liste_instructions: List[str], max_concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Crée plusieurs employés d'un coup : appels Claude simultanés (repris sur
+        limite de débit), validation de toutes les réponses, puis une seule
+        transaction pour les employés valides et leurs compétences.
+        API seulement pour l'instant, comme creer_produits_avec_ia.
+        """
+        if not self.client:
+            return {'success': False, 'error': "Assistant IA non configuré"}
+        
+        emails = {r['email'].lower() for r in self.db.execute_query("SELECT email FROM employees WHERE email IS NOT NULL")}
+        
+        def valider(employe_structure):
+            # email est UNIQUE : un doublon annulerait tout le lot, il est écarté avant l'écriture
+            employe_data = self._donnees_employe(employe_structure)
+            email = (employe_data['email'] or '').strip().lower()
+            if email in emails:
+                raise ValueError(f"email déjà utilisé : {email!r}")
+            if email:
+                emails.add(email)
+            employe_data['email'] = email or None
+            return employe_data
+        
+        lot = create_batch(self.client, self.db, liste_instructions, self._requete_creation_employe,
+                           valider, self._inserer_employe,
+                           max_concurrency=max_concurrency or BATCH_MAX_CONCURRENCY)
+        employes = [r for r in lot['resultats'] if r['statut'] == STATUT_CREE]
+        return {
+            'success': lot['success'],
+            'employe_ids': [r['id'] for r in employes],
+            'nb_crees': lot['nb_crees'],
+            'nb_echecs': lot['nb_echecs'],
+            'resultats': lot['resultats'],
+            'error': lot['error'],
+            'message': f"{lot['nb_crees']}/{len(liste_instructions)} employés créés en {lot['duree_s']:.1f}s : "
+                       + ', '.join(f"{r['donnees']['prenom']} {r['donnees']['nom']}" for r in employes)
+        }
+    
+    @staticmethod
+    def _inserer_employe(conn, employe_data: Dict[str, Any]) -> int:
+        """INSERT de l'employé et de ses compétences sur la connexion du lot (comme GestionnaireEmployes)"""
+        cursor = conn.execute('''
+            INSERT INTO employees 
+            (prenom, nom, email, telephone, poste, departement, statut, 
+             type_contrat, date_embauche, salaire, charge_travail, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', tuple(employe_data[col] for col in (
+            'prenom', 'nom', 'email', 'telephone', 'poste', 'departement', 'statut', 'type_contrat',
+            'date_embauche', 'salaire', 'charge_travail', 'notes')))
+        employe_id = cursor.lastrowid
+        conn.executemany('''
+            INSERT INTO employee_competences 
+            (employee_id, nom_competence, niveau, certifie, date_obtention)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(employe_id, comp.get('nom'), comp.get('niveau'), comp.get('certifie', False), comp.get('date_obtention'))
+              for comp in employe_data['competences']])
+        return employe_id
+    
     def modifier_employe_avec_ia(self, employe_id: int, instructions: str) -> Dict[str, Any]:
         """Modifie un employé existant selon les instructions en langage naturel"""
         if not self.client:
@@ -2137,8 +2327,8 @@ Ne modifiez que les champs explicitement mentionnés dans les instructions."""
             
             # Si company_id fourni, récupérer les infos entreprise
             if company_id:
-                entreprise_info = self.db.execute_query("""
-                    SELECT nom, type_entreprise, secteur 
+                entreprise_info = self.db.execute_query(f"""
+                    SELECT nom, {_type_entreprise_sql(self.db, alias='')} as type_entreprise, secteur 
                     FROM companies WHERE id = ?
                 """, (company_id,))
                 
@@ -3627,13 +3817,13 @@ IMPORTANT:
             if not self.api_key:
                 return {'success': False, 'error': 'Clé API Claude requise pour la création IA'}
             
-            from production_management import GestionnaireFormulaires
+            from production_management import GestionnaireBonsTravail
             
-            gestionnaire_bt = GestionnaireFormulaires(self.db)
+            gestionnaire_bt = GestionnaireBonsTravail(self.db)
             
             # Récupérer les projets disponibles pour liaison
             projets_disponibles = self.db.execute_query("""
-                SELECT id, nom, client_name FROM projects 
+                SELECT id, nom_projet, client_nom_cache FROM projects 
                 WHERE statut NOT IN ('TERMINÉ', 'ANNULÉ')
                 ORDER BY created_at DESC LIMIT 20
             """)
@@ -3645,16 +3835,16 @@ IMPORTANT:
                 ORDER BY nom LIMIT 30
             """)
             
-            priorites_disponibles = ['FAIBLE', 'NORMALE', 'HAUTE', 'URGENTE']
+            priorites_disponibles = ['NORMAL', 'URGENT', 'CRITIQUE']
             
             prompt = f"""
 Tu es un assistant spécialisé dans la création de bons de travail pour une entreprise de construction au Québec.
 
 PROJETS DISPONIBLES (premiers 10):
-{chr(10).join([f"- ID {p[0]}: {p[1]} (Client: {p[2]})" for p in projets_disponibles[:10]])}
+{chr(10).join([f"- ID {p['id']}: {p['nom_projet']} (Client: {p['client_nom_cache']})" for p in projets_disponibles[:10]])}
 
 EMPLOYÉS DISPONIBLES (premiers 10):
-{chr(10).join([f"- ID {e[0]}: {e[1]} {e[2]} ({e[3]})" for e in employes_disponibles[:10]])}
+{chr(10).join([f"- ID {e['id']}: {e['prenom']} {e['nom']} ({e['departement']})" for e in employes_disponibles[:10]])}
 
 PRIORITÉS DISPONIBLES: {', '.join(priorites_disponibles)}
 
@@ -3701,7 +3891,7 @@ Génère un JSON avec cette structure EXACTE:
 
 IMPORTANT:
 - Si projet spécifié, utilise l'ID de la liste, sinon laisse null
-- Priorité parmi: FAIBLE, NORMALE, HAUTE, URGENTE
+- Priorité parmi: NORMAL, URGENT, CRITIQUE
 - Dates au format YYYY-MM-DD (start_date <= end_date)
 - Heures planifiées réalistes selon les tâches
 - Status tâches: "À FAIRE" par défaut
@@ -3726,7 +3916,7 @@ IMPORTANT:
             
             # Validation et complétion des données
             if bt_data.get('priority') not in priorites_disponibles:
-                bt_data['priority'] = 'NORMALE'
+                bt_data['priority'] = 'NORMAL'
             
             # Générer un numéro de document unique
             bt_data['numero_document'] = gestionnaire_bt.generate_bt_number()
@@ -3796,9 +3986,9 @@ IMPORTANT:
             if not self.api_key:
                 return {'success': False, 'error': 'Clé API Claude requise pour la modification IA'}
             
-            from production_management import GestionnaireFormulaires
+            from production_management import GestionnaireBonsTravail
             
-            gestionnaire_bt = GestionnaireFormulaires(self.db)
+            gestionnaire_bt = GestionnaireBonsTravail(self.db)
             
             # Récupérer le bon de travail actuel
             bt_actuel = gestionnaire_bt.load_bon_travail(bt_id)
@@ -3806,7 +3996,7 @@ IMPORTANT:
             if not bt_actuel:
                 return {'success': False, 'error': f'Bon de travail {bt_id} non trouvé'}
             
-            priorites_disponibles = ['FAIBLE', 'NORMALE', 'HAUTE', 'URGENTE']
+            priorites_disponibles = ['NORMAL', 'URGENT', 'CRITIQUE']
             status_taches_disponibles = ['À FAIRE', 'EN COURS', 'TERMINÉ', 'SUSPENDU']
             
             # Résumer l'état actuel
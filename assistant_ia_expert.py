@@ -18,6 +18,9 @@ try:
     from expert_logic import ExpertAdvisor, ExpertProfileManager
     from conversation_manager import ConversationManager
     from cache_config import CacheOptimizer
+    from llm_gateway import InstrumentedClient
+    from llm_streaming import render_stream
+    from erp_retrieval import TYPE_LABELS, describe_record, search_records
 except ImportError as e:
     st.error(f"Erreur d'importation des modules: {e}")
     st.stop()
@@ -108,6 +111,11 @@ Je peux vous aider à analyser vos données, optimiser vos processus de construc
             except Exception as e:
                 logger.error(f"Erreur init ExpertAdvisor: {e}")
                 raise
+
+        # Les appels de l'advisor alimentent le CacheOptimizer avec les chiffres réels de l'API
+        advisor = st.session_state.get('expert_advisor')
+        if isinstance(getattr(advisor, 'anthropic', None), InstrumentedClient):
+            advisor.anthropic.cache_optimizer = self.cache_optimizer
     
     def _init_conversation_manager(self):
         """Initialise le gestionnaire de conversations"""
@@ -208,76 +216,21 @@ Je peux vous aider à analyser vos données, optimiser vos processus de construc
             return {}
     
     def _search_erp_data(self, query: str) -> str:
-        """Recherche dans les données ERP selon la requête"""
+        """Recherche dans les données ERP selon la requête (index BM25 local, voir erp_retrieval)"""
         if not self.db:
             return "Accès à la base de données ERP non disponible."
         
         results = []
-        query_lower = query.lower()
-        
         try:
-            # Recherche dans les projets
-            if any(word in query_lower for word in ['projet', 'project', 'chantier']):
-                projects = self.db.execute_query("""
-                    SELECT p.*, c.nom as client_nom 
-                    FROM projects p 
-                    LEFT JOIN companies c ON p.client_id = c.id 
-                    WHERE p.nom_projet LIKE ? OR p.description LIKE ?
-                    LIMIT 10
-                """, (f'%{query}%', f'%{query}%'))
-                
-                if projects:
-                    results.append("**Projets trouvés:**")
-                    for p in projects:
-                        results.append(f"- {p['nom_projet']} ({p['statut']}) - Client: {p['client_nom']}")
-            
-            # Recherche dans l'inventaire
-            if any(word in query_lower for word in ['stock', 'inventaire', 'matériel', 'pièce']):
-                items = self.db.execute_query("""
-                    SELECT nom, quantite_metric, quantite_imperial, statut 
-                    FROM inventory_items 
-                    WHERE nom LIKE ? OR description LIKE ?
-                    LIMIT 10
-                """, (f'%{query}%', f'%{query}%'))
-                
-                if items:
-                    results.append("\n**Articles d'inventaire trouvés:**")
-                    for item in items:
-                        results.append(f"- {item['nom']}: {item['quantite_metric']} ({item['statut']})")
-            
-            # Recherche dans les employés
-            if any(word in query_lower for word in ['employé', 'employee', 'personnel', 'équipe']):
-                employees = self.db.execute_query("""
-                    SELECT nom, prenom, poste, competences 
-                    FROM employees 
-                    WHERE nom LIKE ? OR prenom LIKE ? OR competences LIKE ?
-                    LIMIT 10
-                """, (f'%{query}%', f'%{query}%', f'%{query}%'))
-                
-                if employees:
-                    results.append("\n**Employés trouvés:**")
-                    for emp in employees:
-                        results.append(f"- {emp['prenom']} {emp['nom']} - {emp['poste']}")
-            
-            # Recherche dans les entreprises
-            if any(word in query_lower for word in ['client', 'fournisseur', 'entreprise', 'company']):
-                companies = self.db.execute_query("""
-                    SELECT nom, secteur, ville, telephone 
-                    FROM companies 
-                    WHERE nom LIKE ? OR secteur LIKE ?
-                    LIMIT 10
-                """, (f'%{query}%', f'%{query}%'))
-                
-                if companies:
-                    results.append("\n**Entreprises trouvées:**")
-                    for comp in companies:
-                        results.append(f"- {comp['nom']} ({comp['secteur']}) - {comp['ville']}")
-            
+            for doc_type, records in search_records(self.db, query, k=10).items():
+                results.append(f"\n**{TYPE_LABELS.get(doc_type, doc_type)} :**")
+                for record in records:
+                    results.append(f"- {describe_record(doc_type, record)}")
         except Exception as e:
             logger.error(f"Erreur recherche ERP: {e}")
             return f"Erreur lors de la recherche: {str(e)}"
         
-        return "\n".join(results) if results else "Aucun résultat trouvé dans l'ERP pour cette recherche."
+        return "\n".join(results).strip() if results else "Aucun résultat trouvé dans l'ERP pour cette recherche."
     
     # =========================================================================
     # MÉTHODES D'INTERFACE
@@ -700,8 +653,10 @@ RÈGLE ABSOLUE: Base-toi UNIQUEMENT sur les résultats fournis ci-dessus. N'inve
             })
     
     def _get_ai_response(self, prompt: str):
-        """Obtient une réponse de l'IA"""
-        with st.spinner("L'expert réfléchit..."):
+        """Obtient une réponse de l'IA, affichée au fil de l'eau"""
+        with st.chat_message("user", avatar="👤"):
+            st.markdown(prompt)
+        with st.chat_message("assistant", avatar="🤖"):
             try:
                 # Ajouter le contexte ERP si disponible
                 erp_context = self._get_erp_context()
@@ -722,7 +677,8 @@ Utilise ces informations si pertinent pour ta réponse."""
                 else:
                     history = st.session_state.messages[:-1]
                 
-                response = st.session_state.expert_advisor.obtenir_reponse(prompt, history)
+                response = render_stream(
+                    st.session_state.expert_advisor.obtenir_reponse(prompt, history, stream=True))
                 
                 st.session_state.messages.append({
                     "role": "assistant",
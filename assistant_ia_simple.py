@@ -4,12 +4,21 @@
 import streamlit as st
 import os
 import json
+import re
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import logging
 from anthropic import Anthropic
 from pathlib import Path
 
+from mrp_engine import MRPEngine
+from ai_batch import write_in_transaction
+from answer_cache import data_fingerprint, get_answer_cache
+from erp_retrieval import RETRIEVAL_SOURCES, search_records
+from intent_router import conversation_intent, find_document, is_lookup, record_route
+from llm_gateway import instrument
+from llm_streaming import render_stream, stream_message
+
 # Chargement du fichier .env
 def load_env_file():
     """Charge le fichier .env s'il existe"""
@@ -32,6 +41,23 @@ load_env_file()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tables lues par _fouiller_donnees_erp_completes (projet mentionné, compteurs, sources de la
+# recherche) : leur version invalide les réponses en cache
+CONVERSATION_TABLES = tuple(dict.fromkeys(
+    ('projects', 'companies', 'operations', 'time_entries')
+    + tuple(table for source in RETRIEVAL_SOURCES for table in source[1])))
+# Enregistrements ERP joints au prompt par la recherche générale
+SEARCH_TOP_K = 10
+
+# Type de document reconnu par intent_router -> (méthode de lecture, formateur), sans appel à Claude
+DOCUMENT_HANDLERS = {
+    'bt': ('_get_bt_details', '_format_bt_details'),
+    'devis': ('_get_devis_details', '_format_devis_details'),
+    'projet': ('_get_projet_details', '_format_projet_details'),
+    'dp': ('_get_dp_details', '_format_dp_details'),
+    'ba': ('_get_ba_details', '_format_ba_details'),
+}
+
 class AssistantIASimple:
     """
     Assistant IA avec interface élégante et accès à la base de données ERP
@@ -51,7 +77,7 @@ class AssistantIASimple:
         
         if self.api_key:
             try:
-                self.client = Anthropic(api_key=self.api_key)
+                self.client = instrument(Anthropic(api_key=self.api_key), 'assistant_ia_simple')
                 self.model = "claude-sonnet-4-20250514"  # Modèle pour conversation naturelle
                 logger.info(f"✅ Assistant IA initialisé avec succès (clé: {self.api_key[:15]}...)")
             except Exception as e:
@@ -75,177 +101,15 @@ class AssistantIASimple:
     # =========================================================================
     
     def _search_erp_data(self, query: str) -> Dict[str, Any]:
-        """Recherche dans les données ERP"""
+        """Enregistrements ERP les plus pertinents pour la question (index BM25 local, voir erp_retrieval)"""
         if not self.db:
             return {"error": "Base de données non disponible"}
         
-        results = {}
-        query_lower = query.lower()
-        
         try:
-            # Recherche projets
-            if any(word in query_lower for word in ['projet', 'project', 'chantier']):
-                projects = self.db.execute_query("""
-                    SELECT p.*, c.nom as client_nom 
-                    FROM projects p 
-                    LEFT JOIN companies c ON p.client_company_id = c.id 
-                    WHERE p.nom_projet LIKE ? OR p.description LIKE ?
-                    LIMIT 5
-                """, (f'%{query}%', f'%{query}%'))
-                
-                if projects:
-                    # Valider les données avant de les ajouter
-                    validated_projects = []
-                    for p in projects:
-                        if p.get('nom_projet'):  # S'assurer que le projet a un nom
-                            validated_projects.append(dict(p))
-                    if validated_projects:
-                        results['projets'] = validated_projects
-            
-            # Recherche produits
-            if any(word in query_lower for word in ['produit', 'product', 'article', 'référence']):
-                produits = self.db.execute_query("""
-                    SELECT code_produit, nom, categorie, materiau, nuance, 
-                           dimensions, unite_vente, prix_unitaire, 
-                           stock_disponible, stock_minimum, fournisseur_principal
-                    FROM produits 
-                    WHERE actif = 1 AND (
-                        nom LIKE ? OR code_produit LIKE ? OR 
-                        description LIKE ? OR materiau LIKE ?
-                    )
-                    LIMIT 5
-                """, (f'%{query}%', f'%{query}%', f'%{query}%', f'%{query}%'))
-                
-                if produits:
-                    results['produits'] = [dict(prod) for prod in produits]
-            
-            # Recherche inventaire
-            if any(word in query_lower for word in ['stock', 'inventaire', 'matériel']):
-                items = self.db.execute_query("""
-                    SELECT nom, quantite_metric, statut 
-                    FROM inventory_items 
-                    WHERE nom LIKE ? OR description LIKE ?
-                    LIMIT 5
-                """, (f'%{query}%', f'%{query}%'))
-                
-                if items:
-                    results['inventaire'] = [dict(item) for item in items]
-            
-            # Recherche employés
-            if any(word in query_lower for word in ['employé', 'personnel', 'équipe']):
-                employees = self.db.execute_query("""
-                    SELECT e.nom, e.prenom, e.poste, e.departement, e.statut,
-                           GROUP_CONCAT(ec.nom_competence || ' (' || ec.niveau || ')', ', ') as competences
-                    FROM employees e
-                    LEFT JOIN employee_competences ec ON e.id = ec.employee_id
-                    WHERE e.nom LIKE ? OR e.prenom LIKE ? OR e.poste LIKE ?
-                    GROUP BY e.id, e.nom, e.prenom, e.poste, e.departement, e.statut
-                    LIMIT 5
-                """, (f'%{query}%', f'%{query}%', f'%{query}%'))
-                
-                if employees:
-                    results['employes'] = [dict(emp) for emp in employees]
-            
-            # Recherche clients
-            if any(word in query_lower for word in ['client', 'entreprise']):
-                companies = self.db.execute_query("""
-                    SELECT nom, secteur, ville 
-                    FROM companies 
-                    WHERE nom LIKE ? OR secteur LIKE ?
-                    LIMIT 5
-                """, (f'%{query}%', f'%{query}%'))
-                
-                if companies:
-                    results['entreprises'] = [dict(comp) for comp in companies]
-            
-            # Recherche bons de travail
-            if any(word in query_lower for word in ['bon', 'bt', 'travail']):
-                bts = self.db.execute_query("""
-                    SELECT f.numero_document, f.statut, f.priorite, f.created_at, 
-                           f.metadonnees_json, f.notes,
-                           (SELECT fl.description FROM formulaire_lignes fl 
-                            WHERE fl.formulaire_id = f.id 
-                            ORDER BY fl.sequence_ligne LIMIT 1) as premiere_ligne
-                    FROM formulaires f 
-                    WHERE f.type_formulaire = 'BON_TRAVAIL' 
-                    AND (f.numero_document LIKE ? OR f.notes LIKE ?)
-                    ORDER BY f.created_at DESC
-                    LIMIT 5
-                """, (f'%{query}%', f'%{query}%'))
-                
-                if bts:
-                    # Traiter les métadonnées JSON pour extraire le titre
-                    bons_travail = []
-                    for bt in bts:
-                        bt_dict = dict(bt)
-                        if bt_dict.get('metadonnees_json'):
-                            try:
-                                meta = json.loads(bt_dict['metadonnees_json'])
-                                bt_dict['titre'] = meta.get('project_name', 'Sans titre')
-                                bt_dict['client'] = meta.get('client_name', 'N/A')
-                            except:
-                                bt_dict['titre'] = bt_dict.get('premiere_ligne', 'Sans titre')
-                                bt_dict['client'] = 'N/A'
-                        else:
-                            bt_dict['titre'] = bt_dict.get('premiere_ligne', 'Sans titre')
-                            bt_dict['client'] = 'N/A'
-                        bons_travail.append(bt_dict)
-                    results['bons_travail'] = bons_travail
-            
-            # Recherche devis
-            if any(word in query_lower for word in ['devis', 'quote', 'estimation']):
-                devis = self.db.execute_query("""
-                    SELECT f.numero_document, f.statut, f.priorite, f.created_at, 
-                           f.metadonnees_json, f.notes, f.montant_total,
-                           (SELECT fl.description FROM formulaire_lignes fl 
-                            WHERE fl.formulaire_id = f.id 
-                            ORDER BY fl.sequence_ligne LIMIT 1) as premiere_ligne
-                    FROM formulaires f 
-                    WHERE f.type_formulaire = 'ESTIMATION' 
-                    AND (f.numero_document LIKE ? OR f.notes LIKE ?)
-                    ORDER BY f.created_at DESC
-                    LIMIT 5
-                """, (f'%{query}%', f'%{query}%'))
-                
-                if devis:
-                    # Traiter les métadonnées JSON pour extraire le titre
-                    devis_list = []
-                    for d in devis:
-                        d_dict = dict(d)
-                        if d_dict.get('metadonnees_json'):
-                            try:
-                                meta = json.loads(d_dict['metadonnees_json'])
-                                d_dict['titre'] = meta.get('project_name', meta.get('objet', 'Sans titre'))
-                                d_dict['client'] = meta.get('client_name', 'N/A')
-                            except:
-                                d_dict['titre'] = d_dict.get('premiere_ligne', 'Sans titre')
-                                d_dict['client'] = 'N/A'
-                        else:
-                            d_dict['titre'] = d_dict.get('premiere_ligne', 'Sans titre')
-                            d_dict['client'] = 'N/A'
-                        devis_list.append(d_dict)
-                    results['devis'] = devis_list
-            
-            # Recherche contacts
-            if any(word in query_lower for word in ['contact', 'personne', 'responsable']):
-                contacts = self.db.execute_query("""
-                    SELECT c.*, comp.nom as entreprise_nom
-                    FROM contacts c
-                    LEFT JOIN companies comp ON c.company_id = comp.id
-                    WHERE c.nom_famille LIKE ? OR c.prenom LIKE ? 
-                    OR c.email LIKE ? OR comp.nom LIKE ?
-                    ORDER BY c.nom_famille, c.prenom
-                    LIMIT 10
-                """, (f'%{query}%', f'%{query}%', f'%{query}%', f'%{query}%'))
-                
-                if contacts:
-                    results['contacts'] = [dict(c) for c in contacts]
-            
+            return search_records(self.db, query, k=SEARCH_TOP_K)
         except Exception as e:
             logger.error(f"Erreur recherche ERP: {e}")
-            results['error'] = str(e)
-        
-        return results
+            return {'error': str(e)}
     
     def _get_bt_details(self, numero_bt: str) -> Dict[str, Any]:
         """Récupère les détails complets d'un bon de travail"""
@@ -1468,32 +1332,14 @@ class AssistantIASimple:
             return {"error": "Base de données non disponible"}
         
         try:
-            # Produits sous le point de commande
-            produits = self.db.execute_query("""
-                SELECT p.*, 
-                       (p.point_commande - p.stock_disponible - p.stock_commande) as qte_suggere,
-                       (p.point_commande - p.stock_disponible - p.stock_commande) * p.prix_unitaire as cout_estime
-                FROM produits p
-                WHERE p.actif = 1
-                  AND p.stock_disponible + p.stock_commande < p.point_commande
-                  AND p.point_commande > 0
-                ORDER BY p.fournisseur_principal, p.categorie, p.nom
-            """)
-            
-            # Grouper par fournisseur
-            par_fournisseur = {}
-            for p in produits if produits else []:
-                p_dict = dict(p)
-                fourn = p_dict.get('fournisseur_principal', 'Non défini')
-                if fourn not in par_fournisseur:
-                    par_fournisseur[fourn] = {
-                        'produits': [],
-                        'nb_produits': 0,
-                        'cout_total': 0
-                    }
-                par_fournisseur[fourn]['produits'].append(p_dict)
-                par_fournisseur[fourn]['nb_produits'] += 1
-                par_fournisseur[fourn]['cout_total'] += p_dict.get('cout_estime', 0) or 0
+            # Besoins nets de tout le catalogue (stock, réservations, matériaux BT, BA en cours)
+            engine = MRPEngine(self.db)
+            plan = engine.compute_plan()
+            plan['qte_suggere'] = plan['qte_proposee']
+            plan['qte_a_commander'] = plan['qte_proposee']
+            plan['seuil_critique'] = plan['seuil']
+            produits = plan.to_dict('records')
+            par_fournisseur = engine.propose_purchase_orders(plan)
             
             # Suggestions basées sur l'historique
             historique = self.db.execute_query("""
@@ -1509,7 +1355,7 @@ class AssistantIASimple:
             """)
             
             return {
-                "produits": [dict(p) for p in produits] if produits else [],
+                "produits": produits,
                 "par_fournisseur": par_fournisseur,
                 "historique_conso": [dict(h) for h in historique] if historique else []
             }
@@ -1718,21 +1564,31 @@ class AssistantIASimple:
     # CONVERSATION NATURELLE - NOUVEAU MODULE
     # =========================================================================
     
-    def conversation_naturelle(self, message_utilisateur: str, contexte_projet: Optional[str] = None) -> str:
+    def conversation_naturelle(self, message_utilisateur: str, contexte_projet: Optional[str] = None,
+                               stream: bool = False, router: Optional[str] = None):
         """
         Interface de conversation naturelle avec l'assistant IA
         L'assistant fouille toutes les données ERP et répond naturellement
+
+        stream=True rend une StreamedResponse (texte au fil de l'eau) au lieu du texte complet.
+        router : point d'entrée sous lequel compter la route réellement prise (record_route).
         """
+        def compter(route):
+            if router:
+                record_route(router, route)
+
         if not self.client:
+            compter('local_sans_client')
             return "😔 Désolé, je ne suis pas encore configuré. Il me faut une clé API Claude pour pouvoir discuter avec toi."
         
         try:
-            # Fouiller les données ERP complètes
-            donnees_erp = self._fouiller_donnees_erp_completes(contexte_projet)
-            
             # Détecter l'intention conversationnelle
             intention = self._detecter_intention_conversation(message_utilisateur)
             
+            # Création et modification de projets : extraction locale des informations, sans Claude
+            if intention in ('creer_projet', 'modifier_projet', 'modifier_projets_multiple'):
+                compter(f"local_{intention}")
+            
             # Traitement spécial pour création de projet
             if intention == 'creer_projet':
                 return self._gerer_creation_projet(message_utilisateur)
@@ -1745,11 +1601,25 @@ class AssistantIASimple:
             if intention == 'modifier_projets_multiple':
                 return self._gerer_modification_projets_multiples(message_utilisateur)
             
+            # Même question sur les mêmes données : réponse en cache, sans appel à Claude
+            cache = get_answer_cache(self.db) if self.db else None
+            if cache:
+                portee = f"simple|{self.model}|{contexte_projet or ''}|{datetime.now().strftime('%Y-%m-%d')}"
+                empreinte = data_fingerprint(self.db, CONVERSATION_TABLES)
+                en_cache = cache.get(message_utilisateur, empreinte, portee)
+                if en_cache:
+                    compter('local_cache')
+                    return en_cache['answer']
+            
+            # Données ERP pertinentes pour la question (recherche top-k)
+            compter('conversation')
+            donnees_erp = self._fouiller_donnees_erp_completes(message_utilisateur, contexte_projet)
+            
             # Construire le prompt conversationnel
             prompt = self._construire_prompt_naturel(message_utilisateur, donnees_erp, intention, contexte_projet)
             
             # Appel à Claude pour conversation naturelle
-            response = self.client.messages.create(
+            request = dict(
                 model=self.model,
                 max_tokens=1500,
                 temperature=0.8,  # Plus créatif pour conversation naturelle
@@ -1758,40 +1628,41 @@ class AssistantIASimple:
                     "content": prompt
                 }]
             )
-            
+            if stream:
+                reponse = stream_message(
+                    self.client, label='conversation_naturelle',
+                    error_text=lambda e: f"😅 Oups, j'ai eu un petit problème technique : {str(e)}. Tu peux réessayer ta question ?",
+                    **request)
+                if cache:
+                    def memoriser(texte):
+                        if reponse.error is None:
+                            cache.put(message_utilisateur, empreinte, texte, portee)
+                    reponse.on_complete = memoriser
+                return reponse
+            response = self.client.messages.create(**request)
+            
+            if cache:
+                cache.put(message_utilisateur, empreinte, response.content[0].text, portee)
             return response.content[0].text
             
         except Exception as e:
             logger.error(f"Erreur conversation naturelle: {e}")
             return f"😅 Oups, j'ai eu un petit problème technique : {str(e)}. Tu peux réessayer ta question ?"
     
-    def _fouiller_donnees_erp_completes(self, contexte_projet: Optional[str] = None) -> Dict[str, Any]:
-        """Fouille complètement les données ERP pour une conversation riche"""
+    def _fouiller_donnees_erp_completes(self, message: str, contexte_projet: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Données ERP du prompt : les enregistrements les plus pertinents pour la question
+        (top-k de la recherche BM25), le projet mentionné et les compteurs des projets,
+        au lieu des tables entières
+        """
         donnees = {}
         
         if not self.db:
             return {"erreur": "Base de données non disponible"}
         
         try:
-            # 1. DONNÉES PROJETS GLOBALES - Version sécurisée
-            try:
-                projets_actifs = self.db.execute_query("""
-                    SELECT p.*, c.nom as client_nom
-                    FROM projects p
-                    LEFT JOIN companies c ON p.client_company_id = c.id
-                    WHERE p.statut IN ('EN COURS', 'À FAIRE', 'VALIDÉ')
-                    ORDER BY p.created_at DESC
-                    LIMIT 10
-                """)
-            except Exception as e:
-                # Fallback si la requête échoue
-                logger.error(f"Erreur requête projets: {e}")
-                projets_actifs = self.db.execute_query("""
-                    SELECT * FROM projects 
-                    WHERE statut IN ('EN COURS', 'À FAIRE', 'VALIDÉ')
-                    LIMIT 10
-                """)
-            donnees['projets_actifs'] = [dict(p) for p in projets_actifs]
+            # 1. ENREGISTREMENTS PERTINENTS (projets, BT, devis, produits, employés, CRM...)
+            donnees['enregistrements_pertinents'] = self._search_erp_data(message)
             
             # 2. PROJET SPÉCIFIQUE SI MENTIONNÉ
             if contexte_projet:
@@ -1799,42 +1670,7 @@ class AssistantIASimple:
                 if projet_details.get('info'):
                     donnees['projet_specifique'] = projet_details
             
-            # 3. ÉQUIPE ET EMPLOYÉS - Version sécurisée
-            try:
-                employes = self.db.execute_query("""
-                    SELECT * FROM employees
-                    WHERE statut = 'ACTIF'
-                    LIMIT 20
-                """)
-            except Exception as e:
-                logger.error(f"Erreur requête employés: {e}")
-                employes = []
-            donnees['employes'] = [dict(e) for e in employes]
-            
-            # 4. INVENTAIRE ET ALERTES - Version sécurisée
-            try:
-                stocks_bas = self.db.execute_query("""
-                    SELECT * FROM inventory_items 
-                    LIMIT 10
-                """)
-            except Exception as e:
-                logger.error(f"Erreur requête inventaire: {e}")
-                stocks_bas = []
-            donnees['alertes_stock'] = [dict(s) for s in stocks_bas]
-            
-            # 5. ACTIVITÉ CRM RÉCENTE - Version sécurisée
-            try:
-                clients_actifs = self.db.execute_query("""
-                    SELECT * FROM companies
-                    ORDER BY created_at DESC
-                    LIMIT 10
-                """)
-            except Exception as e:
-                logger.error(f"Erreur requête companies: {e}")
-                clients_actifs = []
-            donnees['clients_actifs'] = [dict(c) for c in clients_actifs]
-            
-            # 6. MÉTRIQUES DE PERFORMANCE
+            # 3. MÉTRIQUES DE PERFORMANCE
             try:
                 stats_globales = self.db.execute_query("""
                     SELECT 
@@ -2065,7 +1901,7 @@ class AssistantIASimple:
             
             company_id = self.db.execute_insert("""
                 INSERT INTO companies 
-                (nom, secteur, type_entreprise, created_at)
+                (nom, secteur, type_company, created_at)
                 VALUES (?, 'Construction', 'CLIENT', datetime('now'))
             """, (nom_client,))
             
@@ -2216,17 +2052,54 @@ class AssistantIASimple:
             return 10000
     
     def _creer_projets_multiples(self, projets_info: List[Dict[str, Any]]) -> str:
-        """Crée plusieurs projets à la fois"""
+        """
+        Crée plusieurs projets à la fois : toutes les demandes sont validées
+        d'abord, puis clients et projets sont écrits dans une seule transaction
+        (une connexion, un commit) ; une erreur SQL annule tout le lot.
+        """
+        if not self.db:
+            return "😅 Base de données non disponible pour créer les projets."
+        
         try:
             succes = []
             echecs = []
             
+            valides = []
             for info in projets_info:
-                resultat = self._creer_projet_via_ia(info)
-                if resultat['success']:
-                    succes.append(f"✅ **{info['nom_client']}** → {info['nom_projet']}")
+                if info.get('nom_client') and info.get('nom_projet'):
+                    valides.append(info)
                 else:
-                    echecs.append(f"❌ **{info['nom_client']}** → {resultat['error']}")
+                    echecs.append(f"❌ **{info.get('nom_client') or '?'}** → Informations manquantes: nom du client et nom du projet requis")
+            
+            if valides:
+                premier_id = self._get_next_professional_id()
+                clients = {}
+                
+                def inserer(conn, numero_et_info):
+                    numero, info = numero_et_info
+                    nom_client = info['nom_client']
+                    if nom_client not in clients:
+                        existant = conn.execute("SELECT id FROM companies WHERE nom LIKE ?", (f"%{nom_client}%",)).fetchone()
+                        clients[nom_client] = existant['id'] if existant else conn.execute(
+                            "INSERT INTO companies (nom, secteur, type_company, created_at) "
+                            "VALUES (?, 'Construction', 'CLIENT', datetime('now'))", (nom_client,)).lastrowid
+                    conn.execute('''
+                        INSERT INTO projects
+                        (id, nom_projet, client_company_id, statut, priorite, tache, date_soumis, date_prevu,
+                         bd_ft_estime, prix_estime, description)
+                        VALUES (?, ?, ?, 'À FAIRE', ?, '1.1 Définir les besoins et objectifs du projet', ?, ?, 0.0, ?, ?)
+                    ''', (premier_id + numero, info['nom_projet'], clients[nom_client], info.get('priorite') or 'MOYEN',
+                          datetime.now().isoformat(), info.get('date_prevu'), info.get('budget') or 0.0,
+                          info.get('description') or f"Projet créé via IA pour {nom_client}"))
+                    return premier_id + numero
+                
+                try:
+                    write_in_transaction(self.db, list(enumerate(valides)), inserer)
+                    succes = [f"✅ **{info['nom_client']}** → {info['nom_projet']}" for info in valides]
+                    logger.info(f"✅ {len(valides)} projets créés en une transaction (IDs {premier_id}-{premier_id + len(valides) - 1})")
+                except Exception as e:
+                    logger.error(f"Erreur création du lot de projets (annulé): {e}")
+                    echecs.extend(f"❌ **{info['nom_client']}** → Lot annulé: {e}" for info in valides)
             
             # Construire le message de retour
             message = f"🚀 **Création de {len(projets_info)} projets terminée !**\n\n"
@@ -2239,7 +2112,6 @@ class AssistantIASimple:
                 message += f"**❌ ÉCHECS ({len(echecs)}):**\n"
                 message += "\n".join(echecs) + "\n\n"
             
-            from datetime import datetime
             message += f"🕐 **Traitement terminé:** {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
             
             if succes:
@@ -2561,54 +2433,43 @@ class AssistantIASimple:
             return f"😅 Oups, j'ai eu un problème technique pour modifier les projets multiples : {str(e)}"
     
     def _appliquer_modifications_multiples(self, projets: List[Dict], modifications: Dict[str, Any]) -> str:
-        """Applique les modifications à plusieurs projets à la fois"""
+        """
+        Applique les modifications à plusieurs projets à la fois : un seul
+        UPDATE par projet (statut, priorité et tâche ensemble), tous dans une
+        même transaction ; une erreur SQL annule tout le lot.
+        """
         try:
             succes = []
             echecs = []
             
-            for projet in projets:
-                try:
-                    # Appliquer les modifications à ce projet
-                    modifications_appliquees = []
-                    project_id = projet['id']
-                    
-                    # Modification du statut
-                    if modifications['nouveau_statut']:
-                        affected = self.db.execute_update(
-                            "UPDATE projects SET statut = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-                            (modifications['nouveau_statut'], project_id)
-                        )
-                        if affected > 0:
-                            modifications_appliquees.append(f"Statut: {modifications['nouveau_statut']}")
-                    
-                    # Modification de la priorité
-                    if modifications['nouvelle_priorite']:
-                        affected = self.db.execute_update(
-                            "UPDATE projects SET priorite = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-                            (modifications['nouvelle_priorite'], project_id)
-                        )
-                        if affected > 0:
-                            modifications_appliquees.append(f"Priorité: {modifications['nouvelle_priorite']}")
-                    
-                    # Modification de la tâche
-                    if modifications['nouvelle_tache']:
-                        affected = self.db.execute_update(
-                            "UPDATE projects SET tache = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-                            (modifications['nouvelle_tache'], project_id)
-                        )
-                        if affected > 0:
-                            modifications_appliquees.append(f"Tâche: {modifications['nouvelle_tache']}")
-                    
-                    if modifications_appliquees:
-                        client_nom = projet.get('client_nom', projet.get('client_nom_cache', 'N/A'))
-                        succes.append(f"✅ **{client_nom}** ({projet['nom_projet']}) → {', '.join(modifications_appliquees)}")
-                    else:
-                        client_nom = projet.get('client_nom', projet.get('client_nom_cache', 'N/A'))
-                        echecs.append(f"⚠️ **{client_nom}** ({projet['nom_projet']}) → Aucune modification appliquée")
-                        
-                except Exception as e:
-                    client_nom = projet.get('client_nom', projet.get('client_nom_cache', 'N/A'))
-                    echecs.append(f"❌ **{client_nom}** ({projet['nom_projet']}) → Erreur: {str(e)}")
+            # Colonnes modifiées et libellés du compte rendu
+            champs = [(colonne, libelle, modifications[cle]) for cle, colonne, libelle in (
+                ('nouveau_statut', 'statut', 'Statut'),
+                ('nouvelle_priorite', 'priorite', 'Priorité'),
+                ('nouvelle_tache', 'tache', 'Tâche'),
+            ) if modifications.get(cle)]
+            modifications_appliquees = ', '.join(f"{libelle}: {valeur}" for _, libelle, valeur in champs)
+            requete = (f"UPDATE projects SET {', '.join(f'{colonne} = ?' for colonne, _, _ in champs)}, "
+                       "updated_at = CURRENT_TIMESTAMP WHERE id = ?")
+            valeurs = tuple(valeur for _, _, valeur in champs)
+            
+            def modifier(conn, projet):
+                return conn.execute(requete, valeurs + (projet['id'],)).rowcount
+            
+            try:
+                lignes = write_in_transaction(self.db, projets, modifier) if champs else [0] * len(projets)
+            except Exception as e:
+                logger.error(f"Erreur modification du lot de projets (annulé): {e}")
+                lignes = [e] * len(projets)
+            
+            for projet, affected in zip(projets, lignes):
+                client_nom = projet.get('client_nom', projet.get('client_nom_cache', 'N/A'))
+                if isinstance(affected, Exception):
+                    echecs.append(f"❌ **{client_nom}** ({projet['nom_projet']}) → Erreur: {str(affected)}")
+                elif affected > 0:
+                    succes.append(f"✅ **{client_nom}** ({projet['nom_projet']}) → {modifications_appliquees}")
+                else:
+                    echecs.append(f"⚠️ **{client_nom}** ({projet['nom_projet']}) → Aucune modification appliquée")
             
             # Construire le message de retour
             message = f"🚀 **Modification de {len(projets)} projets terminée !**\n\n"
@@ -2660,53 +2521,10 @@ class AssistantIASimple:
             return {"erreur": str(e)}
     
     def _detecter_intention_conversation(self, message: str) -> str:
-        """Détecte l'intention dans une conversation naturelle"""
-        message_lower = message.lower()
-        
-        # Détection d'opinions demandées
-        if any(mot in message_lower for mot in ['penses quoi', 'ton avis', 'que penses-tu', "qu'en penses-tu"]):
-            return 'demande_opinion'
-        
-        # Détection de demande de statut/situation
-        if any(mot in message_lower for mot in ['comment va', 'comment ça va', 'état', 'situation', 'avancement']):
-            return 'demande_status'
-        
-        # Détection de problèmes/risques
-        if any(mot in message_lower for mot in ['problème', 'souci', 'risque', 'attention', 'inquiet']):
-            return 'detection_problemes'
-        
-        # Détection de demande de conseils
-        if any(mot in message_lower for mot in ['conseil', 'recommande', 'suggère', 'que faire', 'devrais']):
-            return 'demande_conseil'
-        
-        # Détection questions financières
-        if any(mot in message_lower for mot in ['budget', 'coût', 'prix', 'rentable', 'argent']):
-            return 'analyse_financiere'
-        
-        # Détection questions équipe
-        if any(mot in message_lower for mot in ['équipe', 'employé', 'qui peut', 'compétence', 'disponible']):
-            return 'gestion_equipe'
-        
-        # Détection questions matériel/stock
-        if any(mot in message_lower for mot in ['matériel', 'stock', 'inventaire', 'manque', 'commande']):
-            return 'gestion_materiel'
-        
-        # Détection questions temps/planning
-        if any(mot in message_lower for mot in ['planning', 'délai', 'retard', 'temps', 'livraison']):
-            return 'gestion_temps'
-        
-        # Détection création de projet
-        if any(mot in message_lower for mot in ['créer un projet', 'nouveau projet', 'créer projet', 'créé un projet', 'ajouter projet', 'créer un nouveau', 'je veux que tu créer', 'créer ce projet', 'client :', 'nom du projet :', 'créer ces projets', 'peux-tu me créer']):
-            return 'creer_projet'
-        
-        # Détection modification de projet
-        if any(mot in message_lower for mot in ['modifier', 'changer', 'mettre', 'passer à', 'change la', 'modifie', 'mettre le projet', 'change le statut', 'priorité à', 'tâche à']):
-            # Vérification pour modification en lot
-            if any(mot in message_lower for mot in ['tous', 'tout', 'toutes', 'tous les projets', 'tous ceux', 'toute la liste']):
-                return 'modifier_projets_multiple'
-            return 'modifier_projet'
-        
-        return 'question_generale'
+        """Détecte l'intention dans une conversation naturelle (tables compilées de intent_router)"""
+        intention = conversation_intent(message.lower())
+        record_route('intention_conversation', intention)
+        return intention
     
     def _construire_prompt_naturel(self, message: str, donnees: Dict, intention: str, contexte_projet: Optional[str]) -> str:
         """Construit un prompt pour conversation naturelle avec toutes les données"""
@@ -2782,8 +2600,8 @@ INTENTION DÉTECTÉE: {intention}
     # MÉTHODES CLAUDE
     # =========================================================================
     
-    def _get_claude_response(self, prompt: str, context: Dict = None) -> str:
-        """Obtient une réponse de Claude"""
+    def _get_claude_response(self, prompt: str, context: Dict = None, stream: bool = False):
+        """Obtient une réponse de Claude (StreamedResponse si stream=True)"""
         if not self.client:
             return "❌ Assistant IA non configuré. Veuillez définir la clé API Claude."
         
@@ -2863,13 +2681,16 @@ Réponds comme un expert-conseil en construction au Québec."""
             })
             
             # Appel API Claude
-            response = self.client.messages.create(
+            request = dict(
                 model=self.model,
                 max_tokens=2000,
                 temperature=0.7,
                 system=system_message,
                 messages=messages
             )
+            if stream:
+                return stream_message(self.client, label='assistant_ia_simple', **request)
+            response = self.client.messages.create(**request)
             
             return response.content[0].text
             
@@ -3137,10 +2958,22 @@ Réponds comme un expert-conseil en construction au Québec."""
                 'content': user_input
             })
             
-            # Traiter la commande
-            response = self._process_input(user_input)
-            
-            # Ajouter la réponse
+            st.markdown(f"""
+            <div class="message-user">
+                <strong>👤 Vous:</strong><br>
+                {user_input}
+            </div>
+            """, unsafe_allow_html=True)
+            st.markdown("""
+            <div class="message-assistant">
+                <strong>🤖 Assistant:</strong>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # Traiter la commande ; les réponses de Claude s'affichent au fil de l'eau
+            response = render_stream(self._process_input(user_input, stream=True))
+            
+            # Ajouter la réponse complète
             st.session_state.ia_messages.append({
                 'role': 'assistant',
                 'content': response
@@ -3148,9 +2981,15 @@ Réponds comme un expert-conseil en construction au Québec."""
             
             st.rerun()
     
-    def _process_input(self, user_input: str) -> str:
-        """Traite l'input utilisateur avec conversation naturelle par défaut"""
+    def _process_input(self, user_input: str, stream: bool = False):
+        """
+        Traite l'input utilisateur avec conversation naturelle par défaut
+
+        stream=True : les réponses de Claude sont des StreamedResponse, les autres du texte.
+        """
         input_lower = user_input.lower().strip()
+        if input_lower in ('/help', '/debug', '/stats'):
+            record_route('process_input', input_lower)
         
         # Commande help
         if input_lower == '/help':
@@ -3167,137 +3006,31 @@ Réponds comme un expert-conseil en construction au Québec."""
         
         # Mode conversation naturelle par défaut (NOUVEAU!)
         elif not input_lower.startswith('/'):
+            # Simple demande de fiche (« montre-moi le BT-2025-001 ») : réponse locale, sans appel à Claude
+            document = find_document(user_input)
+            if document and is_lookup(user_input, document[2]):
+                record_route('process_input', f"document_{document[0]}")
+                return self._afficher_document(document[0], document[1])
+            
             # Détecter si l'utilisateur mentionne un projet spécifique
             contexte_projet = self._extraire_contexte_projet(user_input)
             
             # Utiliser la nouvelle conversation naturelle
-            return self.conversation_naturelle(user_input, contexte_projet)
+            return self.conversation_naturelle(user_input, contexte_projet, stream=stream, router='process_input')
         
         # Commande recherche ERP
         elif input_lower.startswith('/erp '):
             query = user_input[5:].strip()
             
-            # Vérifier si c'est une demande de formulaire spécifique (BT ou DEVIS)
-            import re
-            
-            # Pattern pour BT (format BT-XXXX-XXX)
-            bt_pattern = re.match(r'(bt[- ]?\d{4}[- ]?\d{3})', query.lower())
-            if bt_pattern:
-                # Normaliser le numéro de BT
-                bt_numero = bt_pattern.group(1).upper().replace(' ', '-')
-                if not bt_numero.startswith('BT-'):
-                    bt_numero = 'BT-' + bt_numero[2:]
-                
-                # Récupérer les détails du BT
-                bt_details = self._get_bt_details(bt_numero)
-                
-                if self.client and 'bt_details' in bt_details:
-                    context = {
-                        'bt_details': bt_details['bt_details'],
-                        'instruction_stricte': "IMPORTANT: Présente UNIQUEMENT les informations fournies dans bt_details. N'invente AUCUNE donnée."
-                    }
-                    return self._get_claude_response(
-                        f"Présente de manière détaillée ce bon de travail avec toutes ses opérations, assignations et avancements",
-                        context
-                    )
-                else:
-                    return self._format_bt_details(bt_details)
-            
-            # Pattern pour DEVIS (format EST-XXXX-XXX)
-            devis_pattern = re.match(r'(est[- ]?\d{4}[- ]?\d{3})', query.lower())
-            if devis_pattern:
-                # Normaliser le numéro de devis
-                devis_numero = devis_pattern.group(1).upper().replace(' ', '-')
-                if not devis_numero.startswith('EST-'):
-                    devis_numero = 'EST-' + devis_numero[3:]
-                
-                # Récupérer les détails du devis
-                devis_details = self._get_devis_details(devis_numero)
-                
-                if self.client and 'devis_details' in devis_details:
-                    context = {
-                        'devis_details': devis_details['devis_details'],
-                        'instruction_stricte': "IMPORTANT: Présente UNIQUEMENT les informations fournies dans devis_details. N'invente AUCUNE donnée."
-                    }
-                    return self._get_claude_response(
-                        f"Présente de manière détaillée ce devis avec toutes ses lignes et informations commerciales",
-                        context
-                    )
-                else:
-                    return self._format_devis_details(devis_details)
-            
-            # Pattern pour PROJET (format PRJ-XX-XXX ou XX-XXX)
-            projet_pattern = re.match(r'(?:prj[- ]?)?(\d{2}[- ]?\d{3})', query.lower())
-            if projet_pattern:
-                # Normaliser le numéro de projet
-                projet_numero = projet_pattern.group(0).upper().replace(' ', '-')
-                # Enlever le préfixe PRJ- s'il existe
-                if projet_numero.startswith('PRJ-'):
-                    projet_numero = projet_numero[4:]
-                
-                # Récupérer les détails du projet
-                projet_details = self._get_projet_details(projet_numero)
-                
-                if self.client and 'projet_details' in projet_details:
-                    context = {
-                        'projet_details': projet_details['projet_details'],
-                        'instruction_stricte': "IMPORTANT: Présente UNIQUEMENT les informations fournies dans projet_details. N'invente AUCUNE donnée."
-                    }
-                    return self._get_claude_response(
-                        f"Présente de manière détaillée ce projet avec toutes ses informations, étapes et ressources associées",
-                        context
-                    )
-                else:
-                    return self._format_projet_details(projet_details)
-            
-            # Pattern pour DEMANDE DE PRIX (format DP-XXXX-XXX)
-            dp_pattern = re.match(r'(dp[- ]?\d{4}[- ]?\d{3})', query.lower())
-            if dp_pattern:
-                # Normaliser le numéro de demande de prix
-                dp_numero = dp_pattern.group(1).upper().replace(' ', '-')
-                if not dp_numero.startswith('DP-'):
-                    dp_numero = 'DP-' + dp_numero[2:]
-                
-                # Récupérer les détails de la demande de prix
-                dp_details = self._get_dp_details(dp_numero)
-                
-                if self.client and 'dp_details' in dp_details:
-                    context = {
-                        'dp_details': dp_details['dp_details'],
-                        'instruction_stricte': "IMPORTANT: Présente UNIQUEMENT les informations fournies dans dp_details. N'invente AUCUNE donnée."
-                    }
-                    return self._get_claude_response(
-                        f"Présente de manière détaillée cette demande de prix avec toutes ses lignes et informations",
-                        context
-                    )
-                else:
-                    return self._format_dp_details(dp_details)
-            
-            # Pattern pour BON D'ACHAT (format BA-XXXX-XXX)
-            ba_pattern = re.match(r'(ba[- ]?\d{4}[- ]?\d{3})', query.lower())
-            if ba_pattern:
-                # Normaliser le numéro de bon d'achat
-                ba_numero = ba_pattern.group(1).upper().replace(' ', '-')
-                if not ba_numero.startswith('BA-'):
-                    ba_numero = 'BA-' + ba_numero[2:]
-                
-                # Récupérer les détails du bon d'achat
-                ba_details = self._get_ba_details(ba_numero)
-                
-                if self.client and 'ba_details' in ba_details:
-                    context = {
-                        'ba_details': ba_details['ba_details'],
-                        'instruction_stricte': "IMPORTANT: Présente UNIQUEMENT les informations fournies dans ba_details. N'invente AUCUNE donnée."
-                    }
-                    return self._get_claude_response(
-                        f"Présente de manière détaillée ce bon d'achat avec toutes ses lignes et informations",
-                        context
-                    )
-                else:
-                    return self._format_ba_details(ba_details)
+            # Numéro de document en tête (BT, EST, PRJ ou numéro de projet, DP, BA) : fiche formatée localement
+            document = find_document(query, command=True)
+            if document:
+                record_route('process_input', f"erp_document_{document[0]}")
+                return self._afficher_document(document[0], document[1])
+            reponse = None
             
             # Gérer les commandes spécifiques sans terme de recherche
-            elif query.lower() in ['produit', 'produits', 'article', 'articles']:
+            if query.lower() in ['produit', 'produits', 'article', 'articles']:
                 # Récupérer directement tous les produits actifs
                 try:
                     produits = self.db.execute_query("""
@@ -3709,9 +3442,9 @@ Réponds comme un expert-conseil en construction au Québec."""
                     hours_data = self._get_employee_hours(employee_name, week_date)
                     
                     # Utiliser le formatage dédié pour les heures
-                    return self._format_employee_hours(hours_data)
+                    reponse = self._format_employee_hours(hours_data)
                 else:
-                    return "❌ Veuillez spécifier le nom de l'employé (ex: `/erp heures Denis Jetté`)"
+                    reponse = "❌ Veuillez spécifier le nom de l'employé (ex: `/erp heures Denis Jetté`)"
             elif query.lower().startswith('rapport projet'):
                 # Extraction de l'identifiant du projet
                 project_id = query[14:].strip()  # Enlever "rapport projet"
@@ -3722,9 +3455,9 @@ Réponds comme un expert-conseil en construction au Québec."""
                     report_data = self._get_project_report(project_id)
                     
                     # Utiliser le formatage dédié pour le rapport projet
-                    return self._format_project_report(report_data)
+                    reponse = self._format_project_report(report_data)
                 else:
-                    return "❌ Veuillez spécifier l'identifiant du projet (ex: `/erp rapport projet 25-251`)"
+                    reponse = "❌ Veuillez spécifier l'identifiant du projet (ex: `/erp rapport projet 25-251`)"
             elif query.lower().startswith('rapport bt') or query.lower().startswith('rapport bon'):
                 # Extraction du numéro de bon de travail
                 if query.lower().startswith('rapport bt'):
@@ -3741,72 +3474,80 @@ Réponds comme un expert-conseil en construction au Québec."""
                     report_data = self._get_bt_report(bt_numero)
                     
                     # Utiliser le formatage dédié pour le rapport BT
-                    return self._format_bt_report(report_data)
+                    reponse = self._format_bt_report(report_data)
                 else:
-                    return "❌ Veuillez spécifier le numéro du bon de travail (ex: `/erp rapport bt BT-2025-001`)"
+                    reponse = "❌ Veuillez spécifier le numéro du bon de travail (ex: `/erp rapport bt BT-2025-001`)"
             elif query.lower() == 'alertes':
                 # Récupérer toutes les alertes importantes
                 alertes = self._get_alertes()
-                return self._format_alertes(alertes)
+                reponse = self._format_alertes(alertes)
             elif query.lower() in ['disponibilité', 'disponibilite', 'disponible', 'disponibles']:
                 # Récupérer les employés disponibles
                 employes_dispo = self._get_employes_disponibles()
-                return self._format_employes_disponibles(employes_dispo)
+                reponse = self._format_employes_disponibles(employes_dispo)
             elif query.lower() == 'en cours':
                 # Récupérer tous les bons de travail en cours
                 bt_en_cours = self._get_bt_en_cours()
-                return self._format_bt_en_cours(bt_en_cours)
+                reponse = self._format_bt_en_cours(bt_en_cours)
             elif query.lower() in ['rupture', 'ruptures']:
                 # Récupérer les produits en rupture de stock
                 ruptures = self._get_ruptures_stock()
-                return self._format_ruptures_stock(ruptures)
+                reponse = self._format_ruptures_stock(ruptures)
             elif query.lower() in ['projets retard', 'projet retard', 'retard', 'retards']:
                 # Récupérer les projets en retard
                 projets_retard = self._get_projets_retard()
-                return self._format_projets_retard(projets_retard)
+                reponse = self._format_projets_retard(projets_retard)
             elif query.lower() in ['dashboard', 'tableau de bord', 'vue ensemble']:
                 # Afficher le dashboard général
                 dashboard_data = self._get_dashboard_data()
-                return self._format_dashboard(dashboard_data)
+                reponse = self._format_dashboard(dashboard_data)
             elif query.lower() in ['impayés', 'impayes', 'factures impayées']:
                 # Récupérer les factures impayées
                 impayes = self._get_factures_impayees()
-                return self._format_impayes(impayes)
+                reponse = self._format_impayes(impayes)
             elif query.lower().startswith('charge'):
                 # Extraction de la semaine (optionnelle)
                 parts = query[6:].strip()  # Enlever "charge"
                 semaine = parts if parts else None
                 charge_data = self._get_charge_travail(semaine)
-                return self._format_charge_travail(charge_data)
+                reponse = self._format_charge_travail(charge_data)
             elif query.lower() in ['à commander', 'a commander', 'commander', 'réappro', 'reappro']:
                 # Récupérer les produits à commander
                 a_commander = self._get_produits_a_commander()
-                return self._format_a_commander(a_commander)
+                reponse = self._format_a_commander(a_commander)
             elif query.lower().startswith('performance'):
                 # Extraction du mois (optionnel)
                 parts = query[11:].strip()  # Enlever "performance"
                 mois = parts if parts else None
                 perf_data = self._get_performance_mensuelle(mois)
-                return self._format_performance(perf_data)
+                reponse = self._format_performance(perf_data)
             else:
                 # Recherche normale avec le terme fourni
                 results = self._search_erp_data(query)
             
+            # Sous-commande mise en forme localement (heures, rapports, alertes...)
+            if reponse is not None:
+                record_route('process_input', 'local_erp')
+                return reponse
+            
             # Enrichir avec Claude si disponible
             if self.client and results:
+                record_route('process_input', 'erp')
                 context = {
                     'recherche_erp': results,
                     'instruction_stricte': "IMPORTANT: Présente UNIQUEMENT les résultats fournis dans recherche_erp. N'ajoute AUCUNE donnée inventée."
                 }
                 return self._get_claude_response(
                     f"Présente ces résultats de recherche ERP de manière claire: {json.dumps(results, ensure_ascii=False)}",
-                    context
+                    context, stream=stream
                 )
             else:
+                record_route('process_input', 'local_erp')
                 return self._format_search_results(results)
         
         # Question normale - utiliser Claude avec contexte ERP
         else:
+            record_route('process_input', 'commande')
             # Vérifier si la question concerne l'ERP
             erp_keywords = ['projet', 'stock', 'inventaire', 'employé', 'client', 'production', 'bon de travail', 'produit', 'article', 'référence', 'bt', 'bon', 'bons', 'devis', 'quote', 'estimation']
             
@@ -3900,12 +3641,6 @@ Réponds comme un expert-conseil en construction au Québec."""
                             context['format_bons_travail'] = "tableau"
                             context['instruction_stricte'] = "IMPORTANT: Présente UNIQUEMENT les bons de travail fournis. N'invente AUCUN bon de travail."
                 
-                # Recherche automatique générale
-                search_results = self._search_erp_data(user_input)
-                if search_results:
-                    context['donnees_erp'] = search_results
-                    context['instruction_stricte'] = "IMPORTANT: Base-toi UNIQUEMENT sur les données fournies dans donnees_erp. N'invente AUCUNE information supplémentaire."
-                
                 # Ajouter les stats si demandé
                 if any(word in input_lower for word in ['statistique', 'stats', 'nombre', 'combien']):
                     stats = self._get_erp_statistics()
@@ -3913,7 +3648,18 @@ Réponds comme un expert-conseil en construction au Québec."""
                         context['statistiques'] = stats
                         context['instruction_stricte'] = "IMPORTANT: Utilise UNIQUEMENT les statistiques fournies. N'invente AUCUN chiffre ou donnée."
             
-            return self._get_claude_response(user_input, context)
+            # Recherche générale, même sans mot-clé ERP : seuls les enregistrements pertinents partent dans le prompt
+            search_results = self._search_erp_data(user_input)
+            if search_results and 'error' not in search_results:
+                context['donnees_erp'] = search_results
+                context.setdefault('instruction_stricte', "IMPORTANT: Base-toi UNIQUEMENT sur les données fournies dans donnees_erp. N'invente AUCUNE information supplémentaire.")
+            
+            return self._get_claude_response(user_input, context, stream=stream)
+    
+    def _afficher_document(self, type_document: str, numero: str) -> str:
+        """Fiche d'un document (bt, devis, projet, dp, ba) par ses formateurs, sans appel à Claude"""
+        lecture, formateur = DOCUMENT_HANDLERS[type_document]
+        return getattr(self, formateur)(getattr(self, lecture)(numero))
     
     def _get_debug_info(self) -> str:
         """Retourne des informations de debug sur la connexion DB"""
@@ -4210,6 +3956,21 @@ L'assistant a accès à toutes vos données ERP et peut les analyser pour vous f
                 lines.append(f"| {nom_complet} | {entreprise} | {email} | {telephone} | {role} |")
             lines.append("")
         
+        # Interactions CRM avec tableau
+        if 'interactions' in results and results['interactions']:
+            lines.append("### 💬 **Interactions trouvées**\n")
+            lines.append("| **Date** | **Type** | **Entreprise** | **Contact** | **Résumé** |")
+            lines.append("|----------|----------|----------------|-------------|------------|")
+            
+            for inter in results['interactions']:
+                date = inter.get('date_interaction', 'N/A')
+                type_inter = inter.get('type_interaction', 'N/A')
+                entreprise = inter.get('entreprise_nom') or 'N/A'
+                contact = inter.get('contact_nom') or 'N/A'
+                resume = inter.get('resume') or ''
+                lines.append(f"| {date} | {type_inter} | {entreprise} | {contact} | {resume} |")
+            lines.append("")
+        
         # Demandes de prix avec tableau
         if 'demandes_prix' in results and results['demandes_prix']:
             lines.append("### 💰 **Demandes de prix trouvées**\n")
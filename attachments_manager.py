@@ -14,13 +14,18 @@ import base64
 from PIL import Image
 import io
 
+from job_queue import get_job_queue, show_job_status
+
+# Bases dont les fichiers ont déjà été vérifiés (ou mis en file) dans ce processus
+_VERIFIED_DB_PATHS = set()
+
 class AttachmentsManager:
     """
     Gestionnaire de pièces jointes pour les projets ERP DG Inc.
     VERSION CORRIGÉE pour utiliser le persistent disk Render + clés boutons uniques
     """
     
-    def __init__(self, db, storage_manager=None):
+    def __init__(self, db, storage_manager=None, verify_in_background=True, run_startup_checks=True):
         self.db = db
         self.storage_manager = storage_manager
         
@@ -30,10 +35,17 @@ class AttachmentsManager:
         self._init_database_table()
         
         # NOUVEAU : Diagnostic au démarrage
-        self._run_startup_diagnostic()
+        if run_startup_checks:
+            self._run_startup_diagnostic()
         
-        # NOUVEAU : Nettoyer les liens brisés
-        self._cleanup_broken_attachments()
+        # Vérification des liens brisés : tâche d'arrière-plan, une fois par processus
+        db_key = os.path.abspath(db.db_path)
+        if verify_in_background and db_key not in _VERIFIED_DB_PATHS:
+            _VERIFIED_DB_PATHS.add(db_key)
+            try:
+                get_job_queue(db).enqueue('attachments_verify')
+            except Exception as e:
+                print(f"⚠️ Vérification des pièces jointes non planifiée: {e}")
         
         # Types de fichiers autorisés avec leurs catégories
         self.allowed_file_types = {
@@ -251,84 +263,87 @@ class AttachmentsManager:
             print(f"❌ Erreur initialisation table pièces jointes: {e}")
             st.error(f"❌ Erreur initialisation table pièces jointes: {e}")
     
-    def _cleanup_broken_attachments(self):
-        """NOUVEAU : Nettoie les références aux fichiers inexistants"""
-        try:
-            query = "SELECT id, file_path, original_filename FROM project_attachments WHERE is_active = 1"
-            attachments = self.db.execute_query(query)
-            
-            if not attachments:
-                print("📎 Aucun attachment à vérifier")
-                return
-            
-            broken_count = 0
-            migrated_count = 0
-            
-            for attachment in attachments:
-                file_path = attachment['file_path']
-                
-                if not os.path.exists(file_path):
-                    # Essayer de trouver le fichier dans d'anciens répertoires
-                    filename = os.path.basename(file_path)
-                    
-                    # Chemins potentiels de migration
-                    potential_paths = [
-                        f"/tmp/attachments/{filename}",
-                        f"/opt/render/project/src/data/attachments/{filename}",
-                        f"data/attachments/{filename}",
-                        f"/opt/render/project/{filename}"
-                    ]
-                    
-                    file_migrated = False
-                    for old_path in potential_paths:
-                        if os.path.exists(old_path):
-                            try:
-                                # Créer le nouveau répertoire si nécessaire
-                                new_path = os.path.join(self.base_upload_dir, filename)
-                                os.makedirs(os.path.dirname(new_path), exist_ok=True)
-                                
-                                # Copier le fichier
-                                shutil.copy2(old_path, new_path)
-                                
-                                # Mettre à jour le chemin en base
-                                self.db.execute_update(
-                                    "UPDATE project_attachments SET file_path = ? WHERE id = ?",
-                                    (new_path, attachment['id'])
-                                )
-                                
-                                migrated_count += 1
-                                file_migrated = True
-                                print(f"🔄 Fichier migré: {attachment['original_filename']}")
-                                break
-                                
-                            except Exception as e:
-                                print(f"⚠️ Erreur migration {filename}: {e}")
-                    
-                    if not file_migrated:
-                        # Marquer comme inactif si fichier introuvable
-                        self.db.execute_update(
-                            "UPDATE project_attachments SET is_active = 0 WHERE id = ?",
-                            (attachment['id'],)
-                        )
-                        broken_count += 1
-                        print(f"❌ Fichier perdu: {attachment['original_filename']}")
-            
-            # Résumé
-            if migrated_count > 0:
-                print(f"🔄 {migrated_count} fichier(s) migré(s) vers stockage persistant")
-                if migrated_count > 0:
-                    st.success(f"🔄 {migrated_count} fichier(s) migré(s) vers stockage persistant")
-            
-            if broken_count > 0:
-                print(f"⚠️ {broken_count} fichier(s) définitivement perdu(s)")
-                if broken_count > 0:
-                    st.warning(f"⚠️ {broken_count} fichier(s) de pièces jointes non trouvé(s) - probablement perdus lors du redéploiement")
-            
-            if migrated_count == 0 and broken_count == 0:
-                print("✅ Tous les fichiers sont accessibles")
-                
-        except Exception as e:
-            print(f"❌ Erreur nettoyage: {e}")
+    def verify_attachment_files(self, progress_callback=None) -> Dict:
+        """
+        Nettoie les références aux fichiers inexistants (tâche d'arrière-plan
+        'attachments_verify') : fichier retrouvé dans un ancien répertoire →
+        migré, sinon → référence désactivée. Les erreurs remontent à la file
+        de tâches (nouvel essai), l'annulation aussi.
+        """
+        result = {'fichiers_verifies': 0, 'migres': 0, 'perdus': 0}
+        query = "SELECT id, file_path, original_filename FROM project_attachments WHERE is_active = 1"
+        attachments = self.db.execute_query(query)
+
+        if not attachments:
+            print("📎 Aucun attachment à vérifier")
+            return result
+
+        broken_count = 0
+        migrated_count = 0
+
+        for index, attachment in enumerate(attachments):
+            if progress_callback:
+                progress_callback(index / len(attachments), f"{index}/{len(attachments)} fichiers vérifiés")
+            file_path = attachment['file_path']
+
+            if not os.path.exists(file_path):
+                # Essayer de trouver le fichier dans d'anciens répertoires
+                filename = os.path.basename(file_path)
+
+                # Chemins potentiels de migration
+                potential_paths = [
+                    f"/tmp/attachments/{filename}",
+                    f"/opt/render/project/src/data/attachments/{filename}",
+                    f"data/attachments/{filename}",
+                    f"/opt/render/project/{filename}"
+                ]
+
+                file_migrated = False
+                for old_path in potential_paths:
+                    if os.path.exists(old_path):
+                        try:
+                            # Créer le nouveau répertoire si nécessaire
+                            new_path = os.path.join(self.base_upload_dir, filename)
+                            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+
+                            # Copier le fichier
+                            shutil.copy2(old_path, new_path)
+
+                            # Mettre à jour le chemin en base
+                            self.db.execute_update(
+                                "UPDATE project_attachments SET file_path = ? WHERE id = ?",
+                                (new_path, attachment['id'])
+                            )
+
+                            migrated_count += 1
+                            file_migrated = True
+                            print(f"🔄 Fichier migré: {attachment['original_filename']}")
+                            break
+
+                        except Exception as e:
+                            print(f"⚠️ Erreur migration {filename}: {e}")
+
+                if not file_migrated:
+                    # Marquer comme inactif si fichier introuvable
+                    self.db.execute_update(
+                        "UPDATE project_attachments SET is_active = 0 WHERE id = ?",
+                        (attachment['id'],)
+                    )
+                    broken_count += 1
+                    print(f"❌ Fichier perdu: {attachment['original_filename']}")
+
+        # Résumé
+        if migrated_count > 0:
+            print(f"🔄 {migrated_count} fichier(s) migré(s) vers stockage persistant")
+
+        if broken_count > 0:
+            print(f"⚠️ {broken_count} fichier(s) définitivement perdu(s)")
+
+        if migrated_count == 0 and broken_count == 0:
+            print("✅ Tous les fichiers sont accessibles")
+
+        result.update(fichiers_verifies=len(attachments), migres=migrated_count, perdus=broken_count)
+        return result
     
     def _calculate_file_hash(self, file_content: bytes) -> str:
         """Calcule le hash MD5 du fichier pour détecter les doublons"""
@@ -781,25 +796,34 @@ class AttachmentsManager:
         
         return health_info
     
+    def find_orphaned_files(self, progress_callback=None) -> List[str]:
+        """Fichiers du répertoire d'upload non référencés en base (tâche 'attachments_orphaned_files')"""
+        # Récupérer tous les chemins de fichiers en base
+        query = "SELECT file_path FROM project_attachments WHERE is_active = 1"
+        db_files = self.db.execute_query(query)
+        db_file_paths = {row['file_path'] for row in db_files} if db_files else set()
+        
+        # Scanner le répertoire d'upload
+        orphaned = []
+        for index, (root, dirs, files) in enumerate(os.walk(self.base_upload_dir)):
+            if progress_callback:
+                progress_callback(0.0, f"{index} répertoire(s) parcouru(s), {len(orphaned)} orphelin(s)")
+            for file in files:
+                file_path = os.path.join(root, file)
+                if file_path not in db_file_paths:
+                    orphaned.append(file_path)
+        return orphaned
+    
     def cleanup_orphaned_files(self):
         """Nettoie les fichiers orphelins (non référencés en base)"""
         try:
-            # Récupérer tous les chemins de fichiers en base
-            query = "SELECT file_path FROM project_attachments WHERE is_active = 1"
-            db_files = self.db.execute_query(query)
-            db_file_paths = {row['file_path'] for row in db_files} if db_files else set()
-            
-            # Scanner le répertoire d'upload
-            orphaned_count = 0
-            for root, dirs, files in os.walk(self.base_upload_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if file_path not in db_file_paths:
-                        # Fichier orphelin trouvé
-                        st.warning(f"Fichier orphelin détecté: {file_path}")
-                        orphaned_count += 1
-                        # Optionnel: supprimer automatiquement
-                        # os.remove(file_path)
+            orphaned_files = self.find_orphaned_files()
+            for file_path in orphaned_files:
+                # Fichier orphelin trouvé
+                st.warning(f"Fichier orphelin détecté: {file_path}")
+                # Optionnel: supprimer automatiquement
+                # os.remove(file_path)
+            orphaned_count = len(orphaned_files)
             
             if orphaned_count == 0:
                 st.success("Aucun fichier orphelin détecté")
@@ -1322,6 +1346,29 @@ def show_attachments_health_dashboard(attachments_manager):
             else:
                 st.info(rec)
     
+    # Vérifications longues : tâches d'arrière-plan, la page affiche leur progression
+    st.markdown("#### 🔍 Vérifications")
+    col_verif, col_orphelins = st.columns(2)
+    queue = get_job_queue(attachments_manager.db)
+    with col_verif:
+        if st.button("🔄 Revérifier les fichiers", key="attachments_verify_job"):
+            st.session_state.attachments_verify_job_id = queue.enqueue('attachments_verify')
+        job_id = st.session_state.get('attachments_verify_job_id')
+        if job_id:
+            show_job_status(attachments_manager.db, job_id, key="attachments_verify", render_result=lambda r: st.caption(
+                f"{r['fichiers_verifies']} vérifié(s), {r['migres']} migré(s), {r['perdus']} perdu(s)"))
+    with col_orphelins:
+        if st.button("🔍 Rechercher les fichiers orphelins", key="attachments_orphans_job"):
+            st.session_state.attachments_orphans_job_id = queue.enqueue('attachments_orphaned_files')
+        job_id = st.session_state.get('attachments_orphans_job_id')
+        if job_id:
+            def afficher_orphelins(result):
+                for file_path in result['fichiers_orphelins'][:50]:
+                    st.caption(f"Fichier orphelin: {file_path}")
+                if result['total'] > 50:
+                    st.caption(f"… et {result['total'] - 50} autre(s)")
+            show_job_status(attachments_manager.db, job_id, key="attachments_orphans", render_result=afficher_orphelins)
+    
     # Actions correctives
     if broken > 0:
         st.markdown("#### 🔧 Actions Correctives")
@@ -7,11 +7,28 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
 from reportlab.pdfgen import canvas
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import io
 import logging
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
 
 logger = logging.getLogger(__name__)
 
+# Fusion des PDF en un seul paquet (optionnel) : pypdf, ou PyPDF2 déjà utilisé par les pièces jointes
+try:
+    from pypdf import PdfWriter, PdfReader
+    PDF_MERGE_AVAILABLE = True
+except ImportError:
+    try:
+        from PyPDF2 import PdfWriter, PdfReader
+        PDF_MERGE_AVAILABLE = True
+    except ImportError:
+        PDF_MERGE_AVAILABLE = False
+
 # Couleurs DG Inc.
 DG_PRIMARY = colors.Color(0, 169/255, 113/255)      # #00A971
 DG_PRIMARY_DARK = colors.Color(0, 103/255, 61/255)  # #00673D
@@ -19,6 +36,11 @@ DG_LIGHT_GREEN = colors.Color(220/255, 252/255, 231/255)  # #DCFCE7
 DG_GRAY = colors.Color(55/255, 65/255, 81/255)      # #374151
 DG_LIGHT_GRAY = colors.Color(107/255, 114/255, 128/255)  # #6B7280
 
+# Feuille de styles et styles de tableaux partagés : construits une fois par processus
+_SHARED_STYLESHEET = None
+_TABLE_STYLE_CACHE = {}
+_STYLE_LOCK = threading.Lock()
+
 class BTPDFGenerator:
     """Générateur de PDF compact pour les Bons de Travail"""
     
@@ -31,9 +53,14 @@ class BTPDFGenerator:
         # LARGEUR UNIFORME POUR TOUS LES TABLEAUX
         self.table_width = self.content_width - 10  # Largeur standard pour tous
         
-        # Styles uniformisés
-        self.styles = getSampleStyleSheet()
-        self._create_compact_styles()
+        # Styles uniformisés - partagés entre générateurs (getSampleStyleSheet + styles DG coûteux à recréer)
+        global _SHARED_STYLESHEET
+        with _STYLE_LOCK:
+            if _SHARED_STYLESHEET is None:
+                self.styles = getSampleStyleSheet()
+                self._create_compact_styles()
+                _SHARED_STYLESHEET = self.styles
+            self.styles = _SHARED_STYLESHEET
     
     def _create_compact_styles(self):
         """Créer des styles ultra-compacts avec hauteur de texte réduite"""
@@ -98,6 +125,14 @@ class BTPDFGenerator:
             leading=8   # Réduit de 10 à 8
         ))
     
+    def _get_cached_table_style(self, key, specific_commands, has_header=True):
+        """TableStyle partagé : les commandes ne dépendent pas du BT, on le construit une seule fois"""
+        table_style = _TABLE_STYLE_CACHE.get((key, has_header))
+        if table_style is None:
+            table_style = TableStyle(list(specific_commands) + self._get_compact_table_style(has_header=has_header))
+            _TABLE_STYLE_CACHE[(key, has_header)] = table_style
+        return table_style
+    
     def _get_compact_table_style(self, has_header=True):
         """Style de tableau ultra-compact avec bordures fines"""
         base_style = [
@@ -226,14 +261,14 @@ class BTPDFGenerator:
             self.table_width * 0.32   # Valeurs (32%)
         ], spaceAfter=0, spaceBefore=0)
         
-        info_table.setStyle(TableStyle([
+        info_table.setStyle(self._get_cached_table_style('info', [
             # Couleurs spéciales pour section info
             ('BACKGROUND', (0, 0), (0, -1), DG_LIGHT_GREEN),
             ('BACKGROUND', (2, 0), (2, -1), DG_LIGHT_GREEN),
             ('TEXTCOLOR', (0, 0), (-1, -1), DG_GRAY),
             ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
             ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-        ] + self._get_compact_table_style(has_header=False)))
+        ], has_header=False))
         
         elements.append(info_table)
         elements.append(Spacer(1, 10))  # Réduit de 15 à 10
@@ -289,12 +324,12 @@ class BTPDFGenerator:
                 self.table_width * 0.12   # Statut - 12%
             ])
             
-            tasks_table.setStyle(TableStyle([
+            tasks_table.setStyle(self._get_cached_table_style('tasks', [
                 # Alignements spéciaux pour tâches
                 ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
                 ('ALIGN', (1, 1), (2, -1), 'LEFT'),     # Opération et description à gauche
                 ('ALIGN', (6, 1), (7, -1), 'LEFT'),     # Assigné et fournisseur à gauche
-            ] + self._get_compact_table_style(has_header=True)))
+            ], has_header=True))
             
             elements.append(tasks_table)
             elements.append(Spacer(1, 6))  # Réduit de 10 à 6
@@ -360,12 +395,12 @@ class BTPDFGenerator:
             self.table_width * 0.13   # Notes - 13%
         ])
         
-        materials_table.setStyle(TableStyle([
+        materials_table.setStyle(self._get_cached_table_style('materials', [
             # Alignements spéciaux pour matériaux
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('ALIGN', (1, 1), (2, -1), 'LEFT'),     # Nom et description à gauche
             ('ALIGN', (5, 1), (7, -1), 'LEFT'),     # Fournisseur et notes à gauche
-        ] + self._get_compact_table_style(has_header=True)))
+        ], has_header=True))
         
         elements.append(materials_table)
         elements.append(Spacer(1, 8))  # Réduit de 12 à 8
@@ -438,12 +473,12 @@ class BTPDFGenerator:
             self.table_width * 0.15   # Date (15%)
         ])
         
-        signatures_table.setStyle(TableStyle([
+        signatures_table.setStyle(self._get_cached_table_style('signatures', [
             # Alignements spéciaux pour signatures
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('ALIGN', (0, 1), (1, -1), 'LEFT'),     # Rôle et nom à gauche
             ('ROWHEIGHT', (0, 1), (-1, -1), 20),    # Hauteur réduite pour signatures
-        ] + self._get_compact_table_style(has_header=True)))
+        ], has_header=True))
         
         elements.append(signatures_table)
         elements.append(Spacer(1, 10))  # Réduit de 15 à 10
@@ -535,9 +570,7 @@ def export_bt_pdf_streamlit(form_data):
         
         # Nom du fichier
         numero_doc = form_data.get('numero_document', 'BT')
-        projet = form_data.get('project_name', 'Projet')[:30]
-        projet_clean = "".join(c for c in projet if c.isalnum() or c in (' ', '-', '_')).strip()
-        filename = f"BT_{numero_doc}_{projet_clean}_{datetime.now().strftime('%Y%m%d')}.pdf"
+        filename = bt_pdf_filename(form_data)
         
         # Bouton de téléchargement
         st.download_button(
@@ -582,8 +615,162 @@ def export_bt_pdf_streamlit(form_data):
         st.error(f"❌ Erreur lors de la génération du PDF: {str(e)}")
         st.info("💡 Vérifiez que ReportLab est installé: `pip install reportlab`")
 
-def test_pdf_generation():
-    """Fonction de test pour la version ultra-compacte"""
+# =========================================================================
+# EXPORT EN LOT (PAQUETS D'ATELIER)
+# =========================================================================
+
+# En dessous de ce nombre de BT, le démarrage d'un pool coûte plus qu'il ne rapporte
+BATCH_POOL_MIN_DOCUMENTS = 4
+
+# Générateur propre à chaque processus de rendu (styles partagés, créé au premier BT)
+_WORKER_GENERATOR = None
+
+def bt_pdf_filename(form_data, with_date=True):
+    """Nom de fichier PDF d'un BT (même format que l'export unitaire)"""
+    numero_doc = form_data.get('numero_document') or f"BT-{form_data.get('id', '')}"
+    projet = (form_data.get('project_name') or 'Projet')[:30]
+    projet_clean = "".join(c for c in projet if c.isalnum() or c in (' ', '-', '_')).strip()
+    suffix = f"_{datetime.now().strftime('%Y%m%d')}" if with_date else ""
+    return f"BT_{numero_doc}_{projet_clean}{suffix}.pdf"
+
+def render_bt_pdf_bytes(form_data):
+    """Rend un BT en PDF (bytes) avec le générateur du processus courant"""
+    global _WORKER_GENERATOR
+    if _WORKER_GENERATOR is None:
+        _WORKER_GENERATOR = BTPDFGenerator()
+    return _WORKER_GENERATOR.generate_pdf(form_data).getvalue()
+
+def _render_bt_pdf_task(index, form_data):
+    """Tâche du pool : ne lève jamais, l'erreur est retournée avec l'index du BT"""
+    try:
+        return index, render_bt_pdf_bytes(form_data), None
+    except Exception as e:
+        return index, None, str(e)
+
+def merge_pdf_documents(pdf_documents):
+    """Fusionne plusieurs PDF (bytes) en un seul paquet"""
+    writer = PdfWriter()
+    for pdf_bytes in pdf_documents:
+        for page in PdfReader(io.BytesIO(pdf_bytes)).pages:
+            writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+def export_bt_pdf_batch(form_data_list, output='pdf', max_workers=None, progress_callback=None):
+    """
+    Export PDF en lot des Bons de Travail (paquet hebdomadaire d'atelier).
+    
+    Le rendu ReportLab est réparti sur un pool de processus ; progress_callback(faits, total, numero)
+    est appelé à chaque BT terminé. output='pdf' fusionne les BT dans un seul PDF (pypdf ou PyPDF2
+    requis, sinon ZIP), output='zip' retourne une archive d'un PDF par BT.
+    """
+    start = time.perf_counter()
+    total = len(form_data_list)
+    documents = [None] * total
+    traites = set()
+    erreurs = []
+    
+    def _enregistrer(index, pdf_bytes, erreur):
+        traites.add(index)
+        numero = form_data_list[index].get('numero_document', f"#{index + 1}")
+        if erreur:
+            logger.error(f"Erreur génération PDF {numero}: {erreur}")
+            erreurs.append({'numero_document': numero, 'erreur': erreur})
+        else:
+            documents[index] = pdf_bytes
+        if progress_callback:
+            progress_callback(len(traites), total, numero)
+    
+    workers = min(max_workers or min(os.cpu_count() or 1, 8), total)
+    if workers > 1 and total >= BATCH_POOL_MIN_DOCUMENTS:
+        try:
+            # 'spawn' plutôt que fork : le serveur Streamlit a des threads (verrous copiés dans l'enfant)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(_render_bt_pdf_task, i, form_data) for i, form_data in enumerate(form_data_list)]
+                for future in as_completed(futures):
+                    _enregistrer(*future.result())
+        except (OSError, RuntimeError) as e:
+            # Pool interdit (environnement restreint, exécutable figé...) : on termine en séquentiel
+            logger.warning(f"⚠️ Pool de processus indisponible ({e}) - rendu séquentiel")
+            workers = 1
+    else:
+        workers = 1
+    
+    for index, form_data in enumerate(form_data_list):
+        if index not in traites:
+            _enregistrer(*_render_bt_pdf_task(index, form_data))
+    
+    pdfs = [(form_data, pdf) for form_data, pdf in zip(form_data_list, documents) if pdf is not None]
+    horodatage = datetime.now().strftime('%Y%m%d_%H%M')
+    
+    if output == 'pdf' and PDF_MERGE_AVAILABLE and pdfs:
+        data = merge_pdf_documents([pdf for _, pdf in pdfs])
+        format_sortie, filename, mime = 'pdf', f"BT_lot_{horodatage}.pdf", "application/pdf"
+    else:
+        if output == 'pdf' and pdfs:
+            logger.warning("⚠️ pypdf/PyPDF2 non installé - paquet livré en ZIP")
+        buffer = io.BytesIO()
+        noms_utilises = set()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for form_data, pdf in pdfs:
+                nom = bt_pdf_filename(form_data, with_date=False)
+                if nom in noms_utilises:
+                    nom = f"{nom[:-4]}_{form_data.get('id', len(noms_utilises))}.pdf"
+                noms_utilises.add(nom)
+                zipf.writestr(nom, pdf)
+        data = buffer.getvalue()
+        format_sortie, filename, mime = 'zip', f"BT_lot_{horodatage}.zip", "application/zip"
+    
+    duree = time.perf_counter() - start
+    logger.info(f"📦 Export PDF en lot : {len(pdfs)}/{total} BT en {duree:.1f}s ({workers} processus)")
+    return {
+        'data': data,
+        'filename': filename,
+        'mime': mime,
+        'format': format_sortie,
+        'nb_documents': len(pdfs),
+        'erreurs': erreurs,
+        'workers': workers,
+        'duree_s': round(duree, 2)
+    }
+
+def export_bt_pdf_batch_streamlit(form_data_list, output='pdf'):
+    """Export en lot depuis Streamlit : barre de progression puis bouton de téléchargement"""
+    if not form_data_list:
+        st.warning("Aucun bon de travail à exporter")
+        return None
+    
+    progress_bar = st.progress(0.0, text=f"📄 Génération de {len(form_data_list)} PDF...")
+    
+    def _progression(faits, total, numero):
+        progress_bar.progress(faits / total, text=f"📄 {faits}/{total} - {numero}")
+    
+    try:
+        result = export_bt_pdf_batch(form_data_list, output=output, progress_callback=_progression)
+    except Exception as e:
+        logger.error(f"Erreur export PDF en lot: {e}")
+        st.error(f"❌ Erreur lors de l'export en lot: {str(e)}")
+        return None
+    
+    progress_bar.empty()
+    if output == 'pdf' and result['format'] == 'zip':
+        st.info("💡 Installez pypdf pour obtenir un seul PDF fusionné: `pip install pypdf`")
+    for erreur in result['erreurs']:
+        st.warning(f"⚠️ {erreur['numero_document']}: {erreur['erreur']}")
+    
+    st.download_button(
+        label=f"📥 Télécharger le lot ({result['nb_documents']} BT)",
+        data=result['data'],
+        file_name=result['filename'],
+        mime=result['mime'],
+        type="primary"
+    )
+    st.success(f"✅ {result['nb_documents']} BT générés en {result['duree_s']}s ({result['workers']} processus)")
+    return result
+
+def exemple_bt_form_data():
+    """BT d'exemple complet (tâches, matériaux, fournisseurs) pour la version ultra-compacte et les tests"""
     test_data = {
         'numero_document': 'BT-2025-001',
         'project_name': 'ATTACHE DE SERRE 10" (T DE SERRE) - Projet Complet de Fabrication',
@@ -663,7 +850,7 @@ def test_pdf_generation():
 
 if __name__ == "__main__":
     # Test de la version ultra-compacte
-    test_data = test_pdf_generation()
+    test_data = exemple_bt_form_data()
     generator = BTPDFGenerator()
     pdf_buffer = generator.generate_pdf(test_data)
     
@@ -0,0 +1,241 @@
+# capacity_engine.py - Moteur de capacité et de goulots des postes de travail
+"""
+Moteur de calcul de capacité pour les postes de travail (work_centers).
+
+Les anciennes requêtes joignaient work_centers → operations → time_entries puis
+faisaient SUM() des deux côtés : la charge planifiée (operations.temps_estime)
+était multipliée par le nombre de pointages de chaque opération et le volume
+de lignes intermédiaires grossissait avec l'historique TimeTracker.
+
+Ce moteur pré-agrège séparément :
+- la charge planifiée (operations, GROUP BY work_center_id)
+- les heures réelles (time_entries ⋈ operations, GROUP BY work_center_id)
+puis joint ces deux agrégats (une ligne par poste) aux postes de travail.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Statuts d'opération considérés comme charge restante à produire
+STATUTS_OPERATION_OUVERTS = ('À FAIRE', 'EN COURS')
+
+
+class CapacityEngine:
+    """Calcule charge planifiée, heures réelles et utilisation par poste sans produit cartésien."""
+
+    def __init__(self, db):
+        self.db = db
+
+    # =========================================================================
+    # AGRÉGATS DE BASE
+    # =========================================================================
+
+    def _planned_load_cte(self, with_window: bool) -> str:
+        """CTE de charge planifiée : une ligne par poste, indépendante des pointages"""
+        statuts = ", ".join(f"'{s}'" for s in STATUTS_OPERATION_OUVERTS)
+        window_clause = "AND created_at >= ?" if with_window else ""
+        return f'''
+            planned AS (
+                SELECT
+                    work_center_id,
+                    COUNT(*) as nb_operations_total,
+                    COUNT(DISTINCT project_id) as projets_touches,
+                    COALESCE(SUM(temps_estime), 0) as temps_planifie,
+                    COALESCE(SUM(CASE WHEN statut IN ({statuts}) THEN temps_estime ELSE 0 END), 0) as charge_planifiee,
+                    COUNT(CASE WHEN statut IN ({statuts}) THEN 1 END) as operations_en_attente
+                FROM operations
+                WHERE work_center_id IS NOT NULL
+                  {window_clause}
+                GROUP BY work_center_id
+            )
+        '''
+
+    def _actual_hours_cte(self, with_window: bool) -> str:
+        """CTE des heures réelles TimeTracker : une ligne par poste"""
+        window_clause = "AND te.punch_in >= ?" if with_window else ""
+        return f'''
+            actual AS (
+                SELECT
+                    o.work_center_id,
+                    COALESCE(SUM(te.total_hours), 0) as heures_reelles,
+                    COALESCE(SUM(te.total_cost), 0) as revenus_generes,
+                    AVG(te.hourly_rate) as taux_horaire_moyen,
+                    COUNT(te.id) as nombre_pointages,
+                    COUNT(DISTINCT te.employee_id) as employes_distincts,
+                    COUNT(DISTINCT DATE(te.punch_in)) as jours_actifs
+                FROM time_entries te
+                JOIN operations o ON o.id = te.operation_id
+                WHERE o.work_center_id IS NOT NULL
+                  AND te.total_cost IS NOT NULL
+                  {window_clause}
+                GROUP BY o.work_center_id
+            )
+        '''
+
+    def _open_punches_cte(self) -> str:
+        """CTE des pointages en cours (punch_out NULL) : une ligne par poste"""
+        return '''
+            open_punches AS (
+                SELECT
+                    o.work_center_id,
+                    COALESCE(SUM((JULIANDAY('now') - JULIANDAY(te.punch_in)) * 24), 0) as charge_en_cours,
+                    COUNT(te.id) as pointages_actifs
+                FROM time_entries te
+                JOIN operations o ON o.id = te.operation_id
+                WHERE te.punch_out IS NULL
+                  AND o.work_center_id IS NOT NULL
+                GROUP BY o.work_center_id
+            )
+        '''
+
+    def get_work_center_load(self, period_days: Optional[int] = 30, actifs_seulement: bool = True,
+                             planned_in_window: bool = False, include_actual: bool = True) -> List[Dict[str, Any]]:
+        """
+        Charge planifiée + heures réelles + pointages actifs par poste.
+        Chaque agrégat est calculé séparément puis joint : aucune multiplication.
+
+        period_days limite les pointages (et les opérations si planned_in_window) à la période ;
+        None = tout l'historique. include_actual=False saute l'agrégat des heures réelles
+        (le plus coûteux) quand seule la charge planifiée est utile.
+        """
+        with_window = period_days is not None
+        params = []
+        if with_window:
+            start_date = (datetime.now() - timedelta(days=period_days)).strftime('%Y-%m-%d')
+            if planned_in_window:
+                params.append(start_date)
+            if include_actual:
+                params.append(start_date)
+
+        if include_actual:
+            actual_cte = self._actual_hours_cte(with_window)
+        else:
+            actual_cte = '''
+                actual AS (
+                    SELECT NULL as work_center_id, 0 as heures_reelles, 0 as revenus_generes,
+                           NULL as taux_horaire_moyen, 0 as nombre_pointages,
+                           0 as employes_distincts, 0 as jours_actifs
+                    WHERE 0
+                )
+            '''
+
+        where_clause = "WHERE wc.statut = 'ACTIF'" if actifs_seulement else ""
+        query = f'''
+            WITH {self._planned_load_cte(with_window and planned_in_window)},
+                 {actual_cte},
+                 {self._open_punches_cte()}
+            SELECT
+                wc.id, wc.nom, wc.departement, wc.categorie, wc.type_machine,
+                wc.capacite_theorique, wc.cout_horaire, wc.operateurs_requis, wc.statut,
+                COALESCE(p.nb_operations_total, 0) as nb_operations_total,
+                COALESCE(p.projets_touches, 0) as projets_touches,
+                COALESCE(p.temps_planifie, 0) as temps_planifie,
+                COALESCE(p.charge_planifiee, 0) as charge_planifiee,
+                COALESCE(p.operations_en_attente, 0) as operations_en_attente,
+                COALESCE(a.heures_reelles, 0) as heures_reelles,
+                COALESCE(a.revenus_generes, 0) as revenus_generes,
+                COALESCE(a.taux_horaire_moyen, wc.cout_horaire) as taux_horaire_reel,
+                COALESCE(a.nombre_pointages, 0) as nombre_pointages,
+                COALESCE(a.employes_distincts, 0) as employes_distincts,
+                COALESCE(a.jours_actifs, 0) as jours_actifs,
+                COALESCE(op.charge_en_cours, 0) as charge_en_cours,
+                COALESCE(op.pointages_actifs, 0) as pointages_actifs
+            FROM work_centers wc
+            LEFT JOIN planned p ON p.work_center_id = wc.id
+            LEFT JOIN actual a ON a.work_center_id = wc.id
+            LEFT JOIN open_punches op ON op.work_center_id = wc.id
+            {where_clause}
+            ORDER BY wc.departement, wc.nom
+        '''
+        return self.db.execute_query(query, tuple(params) if params else None)
+
+    # =========================================================================
+    # UTILISATION GLISSANTE
+    # =========================================================================
+
+    def get_daily_hours(self, start_date: str, end_date: str) -> Dict[int, Dict[str, float]]:
+        """Heures réelles par poste et par jour sur [start_date, end_date[ : {wc_id: {'YYYY-MM-DD': heures}}"""
+        rows = self.db.execute_query('''
+            SELECT o.work_center_id, DATE(te.punch_in) as jour, SUM(te.total_hours) as heures
+            FROM time_entries te
+            JOIN operations o ON o.id = te.operation_id
+            WHERE o.work_center_id IS NOT NULL
+              AND te.total_cost IS NOT NULL
+              AND te.punch_in >= ? AND te.punch_in < ?
+            GROUP BY o.work_center_id, DATE(te.punch_in)
+        ''', (start_date, end_date))
+
+        daily = {}
+        for row in rows:
+            daily.setdefault(row['work_center_id'], {})[row['jour']] = row['heures'] or 0.0
+        return daily
+
+    def get_rolling_utilization(self, window_days: int = 7, nb_windows: int = 4,
+                                reference_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Utilisation glissante par poste : nb_windows fenêtres consécutives de window_days jours,
+        la plus récente se terminant à reference_date (aujourd'hui par défaut).
+        Une seule requête GROUP BY (poste, jour), puis sommes cumulées en mémoire.
+        """
+        reference_date = (reference_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        end = reference_date + timedelta(days=1)
+        total_days = window_days * nb_windows
+        start = end - timedelta(days=total_days)
+        days = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(total_days)]
+
+        daily = self.get_daily_hours(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        work_centers = self.db.execute_query('''
+            SELECT id, nom, departement, capacite_theorique
+            FROM work_centers
+            WHERE statut = 'ACTIF'
+            ORDER BY departement, nom
+        ''')
+
+        results = []
+        for wc in work_centers:
+            wc_daily = daily.get(wc['id'], {})
+            # Sommes cumulées : cumul[i] = heures des jours [0, i)
+            cumul = [0.0]
+            for day in days:
+                cumul.append(cumul[-1] + wc_daily.get(day, 0.0))
+
+            capacite_fenetre = (wc['capacite_theorique'] or 0) * window_days
+            fenetres = []
+            for w in range(nb_windows):
+                i_start, i_end = w * window_days, (w + 1) * window_days
+                heures = cumul[i_end] - cumul[i_start]
+                fenetres.append({
+                    'debut': days[i_start],
+                    'fin': days[i_end - 1],
+                    'heures_reelles': round(heures, 2),
+                    'capacite': round(capacite_fenetre, 2),
+                    'taux_utilisation_pct': round(heures / capacite_fenetre * 100, 2) if capacite_fenetre > 0 else 0
+                })
+
+            taux = [f['taux_utilisation_pct'] for f in fenetres]
+            results.append({
+                'id': wc['id'],
+                'nom': wc['nom'],
+                'departement': wc['departement'],
+                'capacite_theorique': wc['capacite_theorique'],
+                'fenetres': fenetres,
+                'taux_moyen_pct': round(sum(taux) / len(taux), 2) if taux else 0,
+                'taux_max_pct': max(taux) if taux else 0,
+                'tendance_pct': round(taux[-1] - taux[0], 2) if len(taux) > 1 else 0
+            })
+
+        return results
+
+
+def classify_utilization(utilisation: float) -> str:
+    """Classification d'utilisation partagée par les vues de capacité"""
+    if utilisation >= 80:
+        return 'ÉLEVÉE'
+    elif utilisation >= 50:
+        return 'MOYENNE'
+    elif utilisation >= 20:
+        return 'FAIBLE'
+    return 'TRÈS_FAIBLE'
@@ -6,6 +6,9 @@ import streamlit as st
 from typing import Dict, List, Optional, Any
 import logging
 
+from crm_timeline import TimelineEngine
+from list_pagination import pager_state, render_pager
+
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
@@ -1489,72 +1492,13 @@ class GestionnaireCRM:
     def get_unified_timeline(self, contact_id=None, company_id=None, limit=50):
         """Récupère une timeline unifiée des interactions, activités et opportunités"""
         try:
-            conditions = []
-            params = []
-            
-            if contact_id:
-                conditions.append("contact_id = ?")
-                params.append(contact_id)
-            if company_id:
-                conditions.append("company_id = ?")
-                params.append(company_id)
-            
-            where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-            
-            # Requête union pour rassembler tous les événements
-            query = f'''
-                SELECT 
-                    'interaction' as type,
-                    id,
-                    date_interaction as date,
-                    resume as titre,
-                    details as description,
-                    type_interaction as sous_type,
-                    contact_id,
-                    company_id,
-                    opportunity_id,
-                    resultat as statut
-                FROM interactions {where_clause}
-                
-                UNION ALL
-                
-                SELECT 
-                    'activite' as type,
-                    id,
-                    date_activite as date,
-                    sujet as titre,
-                    description,
-                    type_activite as sous_type,
-                    contact_id,
-                    company_id,
-                    opportunity_id,
-                    statut
-                FROM crm_activities {where_clause}
-                
-                UNION ALL
-                
-                SELECT 
-                    'opportunite' as type,
-                    id,
-                    created_at as date,
-                    nom as titre,
-                    notes as description,
-                    statut as sous_type,
-                    contact_id,
-                    company_id,
-                    id as opportunity_id,
-                    statut
-                FROM opportunities {where_clause}
-                
-                ORDER BY date DESC
-                LIMIT ?
-            '''
-            
-            # Tripler les paramètres pour les trois parties de l'UNION
-            all_params = params * 3
-            all_params.append(limit)
-            
-            return self.db.execute_query(query, all_params)
+            page = TimelineEngine(self.db).page(contact_id=contact_id, company_id=company_id, limit=limit,
+                                                opportunity_statuts=None)
+            # Résultat de l'interaction affiché comme statut
+            for item in page['rows']:
+                if item['type'] == 'interaction':
+                    item['statut'] = item.get('resultat')
+            return page['rows']
             
         except Exception as e:
             st.error(f"Erreur récupération timeline: {e}")
@@ -3621,6 +3565,10 @@ def render_crm_calendar_tab(crm_manager: GestionnaireCRM):
         st.info("Aucune activité prévue pour ce jour")
 
 
+# Fenêtres de dates de la timeline (jours, None = tout l'historique)
+TIMELINE_PERIODES = {"30 derniers jours": 30, "90 derniers jours": 90, "12 derniers mois": 365, "Tout l'historique": None}
+
+
 def render_crm_timeline_tab(crm_manager: GestionnaireCRM):
     """Affiche la vue Timeline unifiée des interactions, activités et opportunités"""
     st.subheader("📈 Timeline - Vue Chronologique Unifiée")
@@ -3653,7 +3601,7 @@ def render_crm_timeline_tab(crm_manager: GestionnaireCRM):
         )
     
     with col3:
-        limit = st.number_input("Nombre d'éléments", min_value=10, max_value=200, value=50, step=10)
+        periode = st.selectbox("Période", list(TIMELINE_PERIODES.keys()), index=len(TIMELINE_PERIODES) - 1)
     
     # Récupérer les données de la timeline
     filters = {}
@@ -3661,25 +3609,35 @@ def render_crm_timeline_tab(crm_manager: GestionnaireCRM):
         filters['contact_id'] = selected_contact
     if selected_company > 0:
         filters['company_id'] = selected_company
-    filters['limit'] = limit
+    jours = TIMELINE_PERIODES[periode]
+    if jours:
+        filters['date_from'] = (datetime.now() - timedelta(days=jours)).strftime('%Y-%m-%d')
     
-    # Utiliser la méthode de l'ERPDatabase si disponible
+    # Page courante (curseur date, type, id) ; revient au début si les filtres changent
+    pager = pager_state('crm_timeline_page', sorted(filters.items()), default_size=50)
+    compteurs = None
     if crm_manager.use_sqlite and crm_manager.erp_db:
-        timeline_data = crm_manager.erp_db.get_unified_timeline(filters)
+        page = crm_manager.erp_db.get_unified_timeline_page(
+            dict(filters, cursor=pager['cursor'], direction=pager['direction'], limit=pager['page_size']))
+        compteurs = TimelineEngine(crm_manager.erp_db).counts(**filters)
     else:
-        timeline_data = crm_manager.get_unified_timeline(
+        page = {'rows': crm_manager.get_unified_timeline(
             contact_id=selected_contact if selected_contact > 0 else None,
             company_id=selected_company if selected_company > 0 else None,
-            limit=limit
-        )
+            limit=pager['page_size']
+        ), 'has_next': False, 'has_prev': False, 'next_cursor': None, 'prev_cursor': None}
+    timeline_data = page['rows']
     
     if timeline_data:
         # Statistiques de la timeline
         stats_col1, stats_col2, stats_col3 = st.columns(3)
         
-        interactions_count = sum(1 for item in timeline_data if item['type'] == 'interaction')
-        activities_count = sum(1 for item in timeline_data if item['type'] == 'activite')
-        opportunities_count = sum(1 for item in timeline_data if item['type'] == 'opportunite')
+        if compteurs is None:
+            compteurs = {t: sum(1 for item in timeline_data if item['type'] == t)
+                         for t in ('interaction', 'activite', 'opportunite')}
+        interactions_count = compteurs['interaction']
+        activities_count = compteurs['activite']
+        opportunities_count = compteurs['opportunite']
         
         with stats_col1:
             st.metric("Interactions", interactions_count)
@@ -3764,6 +3722,8 @@ def render_crm_timeline_tab(crm_manager: GestionnaireCRM):
                         if st.button("🚀 Convertir en projet", key=f"convert_opp_{item['id']}"):
                             crm_manager.convert_opportunity_to_project(item['id'])
                             st.rerun()
+
+        render_pager(page, 'crm_timeline_page', sum(compteurs.values()))
     else:
         st.info("Aucun élément à afficher dans la timeline")
 
@@ -0,0 +1,231 @@
+# crm_timeline.py - Timeline CRM unifiée : fenêtres de dates indexées et fusion des flux triés
+"""
+Timeline CRM (interactions, activités, opportunités).
+
+ERPDatabase.get_unified_timeline et GestionnaireCRM.get_unified_timeline
+faisaient un UNION ALL des trois tables sans fenêtre de dates, triaient le
+tout puis coupaient au LIMIT : pour une entreprise avec des années
+d'historique, SQLite relisait et triait tous ses événements à chaque
+affichage (et les filtres étaient fabriqués en remplaçant « i. » par « a. »
+dans le SQL). Ici :
+- chaque source (TIMELINE_SOURCES) est lue par sa propre requête, filtrée par
+  contact / entreprise et par fenêtre de dates, triée par (date, id) dans
+  l'ordre d'un index (migration v9) et limitée à la taille de page + 1 ;
+- les flux déjà triés sont fusionnés (heapq.merge, fusion à k voies) sur
+  (date, type, id) : la page ne coûte que quelques lignes par source ;
+- le curseur (date, type, id) de la dernière ligne se traduit pour chaque
+  source en une comparaison de valeurs de ligne, dans les deux sens ;
+- counts() compte les événements de la fenêtre par type (COUNT indexé).
+"""
+
+import heapq
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from list_pagination import NEXT, PREV, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 50
+# Opportunités affichées par ERPDatabase.get_unified_timeline (création et issue)
+OPPORTUNITY_TIMELINE_STATUTS = ('Prospection', 'Gagné', 'Perdu')
+
+# type, table, alias, colonne de date, colonnes (mêmes noms pour toutes les sources), jointures
+TIMELINE_SOURCES = (
+    ('interaction', 'interactions', 'i', 'date_interaction', """
+        i.type_interaction as sous_type, i.resume as titre, i.details as description,
+        i.contact_id, i.company_id, i.opportunity_id, i.resultat,
+        c.prenom || ' ' || c.nom_famille as contact_name, co.nom as company_name, o.nom as opportunity_name,
+        NULL as statut, NULL as priorite""", """
+        LEFT JOIN contacts c ON i.contact_id = c.id
+        LEFT JOIN companies co ON i.company_id = co.id
+        LEFT JOIN opportunities o ON i.opportunity_id = o.id"""),
+    ('activite', 'crm_activities', 'a', 'date_activite', """
+        a.type_activite as sous_type, a.sujet as titre, a.description,
+        a.contact_id, a.company_id, a.opportunity_id, NULL as resultat,
+        c.prenom || ' ' || c.nom_famille as contact_name, co.nom as company_name, o.nom as opportunity_name,
+        a.statut, a.priorite""", """
+        LEFT JOIN contacts c ON a.contact_id = c.id
+        LEFT JOIN companies co ON a.company_id = co.id
+        LEFT JOIN opportunities o ON a.opportunity_id = o.id"""),
+    ('opportunite', 'opportunities', 'o', 'created_at', """
+        o.statut as sous_type, o.nom as titre, o.notes as description,
+        o.contact_id, o.company_id, o.id as opportunity_id, NULL as resultat,
+        c.prenom || ' ' || c.nom_famille as contact_name, co.nom as company_name, o.nom as opportunity_name,
+        o.statut,
+        CASE
+            WHEN o.montant_estime > 100000 THEN 'Haute'
+            WHEN o.montant_estime > 50000 THEN 'Normale'
+            ELSE 'Basse'
+        END as priorite""", """
+        LEFT JOIN contacts c ON o.contact_id = c.id
+        LEFT JOIN companies co ON o.company_id = co.id"""),
+)
+
+INTERACTION_ICONS = {'Email': '📧', 'Appel': '📞', 'Réunion': '🤝', 'Note': '📝', 'Autre': '💬'}
+INTERACTION_COLORS = {'Email': '#6B7280', 'Appel': '#3B82F6', 'Réunion': '#8B5CF6', 'Note': '#10B981',
+                      'Autre': '#F59E0B'}
+ACTIVITY_ICONS = {'Email': '📧', 'Appel': '📞', 'Réunion': '🤝', 'Tâche': '📋', 'Suivi': '🔄', 'Présentation': '📊'}
+OPPORTUNITY_ICONS = {'Prospection': '🎯', 'Gagné': '🏆', 'Perdu': '❌'}
+OPPORTUNITY_COLORS = {
+    "Prospection": "#9CA3AF",
+    "Qualification": "#3B82F6",
+    "Proposition": "#F59E0B",
+    "Négociation": "#8B5CF6",
+    "Gagné": "#10B981",
+    "Perdu": "#EF4444"
+}
+
+
+def date_sort_sql(alias: str, column: str) -> str:
+    """Clé de tri de la date (NULL en dernier en ordre décroissant), identique aux index de la migration v9"""
+    return f"COALESCE({alias}.{column}, '')"
+
+
+def decorate_event(item: Dict[str, Any], format_date: Optional[Callable[[str], str]] = None) -> Dict[str, Any]:
+    """Ajoute icône, couleur et date formatée à un événement de la timeline"""
+    if item['type'] == 'interaction':
+        item['icon'] = INTERACTION_ICONS.get(item['sous_type'], '💬')
+        item['color'] = INTERACTION_COLORS.get(item['sous_type'], '#6B7280')
+    elif item['type'] == 'activite':
+        item['icon'] = ACTIVITY_ICONS.get(item['sous_type'], '📅')
+        item['color'] = '#3B82F6'  # Bleu pour les activités
+    elif item['type'] == 'opportunite':
+        item['icon'] = OPPORTUNITY_ICONS.get(item['sous_type'], '💼')
+        item['color'] = OPPORTUNITY_COLORS.get(item['sous_type'], '#6B7280')
+    if item.get('date') and format_date:
+        item['date_formatted'] = format_date(item['date'])
+    return item
+
+
+class TimelineEngine:
+    """Pages de la timeline CRM par fusion des flux triés de chaque source"""
+
+    def __init__(self, db, sources: Sequence[tuple] = TIMELINE_SOURCES):
+        self.db = db
+        self.sources = sources
+
+    def _filters(self, alias: str, date_sort: str, type_: str, contact_id=None, company_id=None,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None,
+                 opportunity_statuts: Optional[Iterable[str]] = OPPORTUNITY_TIMELINE_STATUTS):
+        where, params = [], []
+        if contact_id:
+            where.append(f"{alias}.contact_id = ?")
+            params.append(contact_id)
+        if company_id:
+            where.append(f"{alias}.company_id = ?")
+            params.append(company_id)
+        if date_from:
+            where.append(f"{date_sort} >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append(f"{date_sort} < ?")
+            params.append(date_to)
+        if type_ == 'opportunite' and opportunity_statuts:
+            statuts = list(opportunity_statuts)
+            where.append(f"{alias}.statut IN ({', '.join('?' for _ in statuts)})")
+            params.extend(statuts)
+        return where, params
+
+    @staticmethod
+    def _cursor_clause(type_: str, date_sort: str, alias: str, position: List[Any], after: bool):
+        """
+        Lignes de la source strictement après (ordre décroissant) ou avant le
+        curseur (date, type, id). Le type de la source étant constant, la
+        comparaison se ramène à la date seule ou à (date, id).
+        """
+        c_date, c_type, c_id = position
+        op = '<' if after else '>'
+        if type_ == c_type:
+            return f"({date_sort}, {alias}.id) {op} (?, ?)", [c_date, c_id]
+        # Même date : le type départage (décroissant)
+        inclusive = (type_ < c_type) if after else (type_ > c_type)
+        return f"{date_sort} {op}{'=' if inclusive else ''} ?", [c_date]
+
+    def _stream(self, source: tuple, filters: Dict[str, Any], position: Optional[List[Any]], backwards: bool,
+                limit: int) -> List[Dict[str, Any]]:
+        type_, table, alias, date_column, columns, joins = source
+        date_sort = date_sort_sql(alias, date_column)
+        where, params = self._filters(alias, date_sort, type_, **filters)
+        if position is not None:
+            clause, clause_params = self._cursor_clause(type_, date_sort, alias, position, after=not backwards)
+            where.append(clause)
+            params.extend(clause_params)
+        order = 'ASC' if backwards else 'DESC'
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        query = f"""
+            SELECT '{type_}' as type, {alias}.id, {alias}.{date_column} as date, {date_sort} as _tl_date, {columns}
+            FROM {table} {alias} {joins}{where_sql}
+            ORDER BY {date_sort} {order}, {alias}.id {order}
+            LIMIT ?
+        """
+        return [dict(row) for row in self.db.execute_query(query, tuple(params) + (limit,))]
+
+    def page(self, contact_id=None, company_id=None, date_from: Optional[str] = None,
+             date_to: Optional[str] = None, cursor: Optional[str] = None, direction: str = NEXT,
+             limit: int = DEFAULT_LIMIT, types: Optional[Iterable[str]] = None,
+             opportunity_statuts: Optional[Iterable[str]] = OPPORTUNITY_TIMELINE_STATUTS) -> Dict[str, Any]:
+        """
+        Une page d'événements, plus récents d'abord.
+
+        date_from inclus, date_to exclu (chaînes 'AAAA-MM-JJ'). Rend
+        {'rows', 'next_cursor', 'prev_cursor', 'has_next', 'has_prev'} comme
+        list_pagination.fetch_page.
+        """
+        filters = {'contact_id': contact_id, 'company_id': company_id, 'date_from': date_from,
+                   'date_to': date_to, 'opportunity_statuts': opportunity_statuts}
+        position = decode_cursor(cursor, size=3)
+        backwards = direction == PREV and position is not None
+        sources = [s for s in self.sources if types is None or s[0] in types]
+
+        streams = []
+        for source in sources:
+            try:
+                streams.append(self._stream(source, filters, position, backwards, limit + 1))
+            except Exception as e:
+                logger.warning(f"⚠️ Timeline : source '{source[0]}' ignorée ({e})")
+
+        def key(row):
+            return row['_tl_date'], row['type'], row['id']
+
+        merged = []
+        for row in heapq.merge(*streams, key=key, reverse=not backwards):
+            merged.append(row)
+            if len(merged) > limit:
+                break
+        more = len(merged) > limit
+        rows = merged[:limit]
+        if backwards:
+            rows.reverse()
+
+        positions = [encode_cursor(key(row)) for row in rows]
+        for row in rows:
+            del row['_tl_date']
+        if backwards:
+            has_prev, has_next = more, True
+        else:
+            has_prev, has_next = position is not None, more
+        return {
+            'rows': rows,
+            'next_cursor': positions[-1] if rows and has_next else None,
+            'prev_cursor': positions[0] if rows and has_prev else None,
+            'has_next': bool(rows) and has_next,
+            'has_prev': bool(rows) and has_prev,
+        }
+
+    def counts(self, contact_id=None, company_id=None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None,
+               opportunity_statuts: Optional[Iterable[str]] = OPPORTUNITY_TIMELINE_STATUTS) -> Dict[str, int]:
+        """Nombre d'événements de la fenêtre, par type"""
+        counts = {}
+        for type_, table, alias, date_column, _, _ in self.sources:
+            where, params = self._filters(alias, date_sort_sql(alias, date_column), type_, contact_id, company_id,
+                                          date_from, date_to, opportunity_statuts)
+            where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+            try:
+                rows = self.db.execute_query(f"SELECT COUNT(*) as n FROM {table} {alias}{where_sql}", tuple(params))
+                counts[type_] = rows[0]['n'] if rows else 0
+            except Exception as e:
+                logger.warning(f"⚠️ Timeline : comptage '{type_}' impossible ({e})")
+                counts[type_] = 0
+        return counts
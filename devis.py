@@ -5,6 +5,9 @@ import json
 import re
 from typing import Dict, List, Optional, Any
 
+from document_templates import render_devis_html, render_documents
+from list_pagination import NEXT, ListQuery, fetch_page, pager_state, render_pager
+
 # --- Constantes partagées ---
 STATUTS_DEVIS = ["BROUILLON", "VALIDÉ", "ENVOYÉ", "APPROUVÉ", "TERMINÉ", "ANNULÉ"]
 UNITES_VENTE = ["unité", "sac", "m", "m²", "m³", "pièce", "paquet", "boîte", "gallon", "lot", "pi", "pi²", "pi³", "vg³", "pi linéaire", "tonne", "palette", "heure"]
@@ -123,6 +126,34 @@ def _validate_project_id_format(project_id: str) -> bool:
     pattern = r'^[A-Za-z0-9\-_]+$'
     return bool(re.match(pattern, project_id))
 
+# Liste des devis : pagination par curseur sur (date de création, id)
+DEVIS_LIST_QUERY = ListQuery(
+    """f.id, f.numero_document, f.statut, f.priorite, f.date_creation, f.date_echeance,
+       c.nom as client_nom, e.prenom || ' ' || e.nom as responsable_nom, p.nom_projet""",
+    """formulaires f
+       LEFT JOIN companies c ON f.company_id = c.id
+       LEFT JOIN employees e ON f.employee_id = e.id
+       LEFT JOIN projects p ON f.project_id = p.id""",
+    {'date_creation': ("COALESCE(f.date_creation, '')", True)},
+    key_expr='f.id',
+)
+DEVIS_TYPE_SQL = ("f.type_formulaire = 'DEVIS' OR (f.type_formulaire = 'ESTIMATION' "
+                  "AND f.metadonnees_json LIKE '%\"type_reel\": \"DEVIS\"%')")
+
+
+def _meta_sql(key: str, default: str) -> str:
+    return (f"(CASE WHEN json_valid(f.metadonnees_json) "
+            f"THEN COALESCE(json_extract(f.metadonnees_json, '$.{key}'), {default}) ELSE {default} END)")
+
+
+# Total TTC d'un devis en SQL, même calcul que calculer_totaux_devis (lignes ou prix estimé, TPS, TVQ, remboursement)
+DEVIS_TOTAL_HT_SQL = f"""(CASE WHEN f.total_lignes = 0 AND {_meta_sql('prix_estime', '0')} > 0
+                              THEN {_meta_sql('prix_estime', '0')} ELSE f.total_lignes END)"""
+DEVIS_TOTAL_TTC_SQL = f"""ROUND({DEVIS_TOTAL_HT_SQL} * (1 + {_meta_sql('taux_tvq', '9.975')} / 100.0
+        + {_meta_sql('taux_tps', '5.0')} / 100.0 * (CASE WHEN {_meta_sql('secteur_construction', "'RÉSIDENTIEL'")} = 'RÉSIDENTIEL'
+            AND {_meta_sql('type_client', "'PARTICULIER'")} = 'PARTICULIER' THEN 0.64 ELSE 1 END)), 2)"""
+
+
 class GestionnaireDevis:
     """
     Gestionnaire dédié aux devis, extrait de crm.py pour une meilleure modularité.
@@ -337,58 +368,7 @@ class GestionnaireDevis:
     def get_devis_complet(self, devis_id: int) -> Dict[str, Any]:
         """Récupère un devis avec tous ses détails."""
         try:
-            query = '''
-                SELECT f.*, 
-                       c.nom as client_nom, 
-                       c.adresse, c.ville, c.province, c.code_postal, c.pays,
-                       co.prenom || ' ' || co.nom_famille as contact_nom, 
-                       co.email as contact_email, co.telephone as contact_telephone,
-                       e.prenom || ' ' || e.nom as responsable_nom,
-                       p.nom_projet
-                FROM formulaires f
-                LEFT JOIN companies c ON f.company_id = c.id
-                LEFT JOIN contacts co ON c.contact_principal_id = co.id
-                LEFT JOIN employees e ON f.employee_id = e.id
-                LEFT JOIN projects p ON f.project_id = p.id
-                WHERE f.id = ? AND (f.type_formulaire = 'DEVIS' OR (f.type_formulaire = 'ESTIMATION' AND f.metadonnees_json LIKE '%"type_reel": "DEVIS"%'))
-            '''
-            
-            result = self.db.execute_query(query, (devis_id,))
-            if not result:
-                return {}
-            
-            devis = dict(result[0])
-            
-            # Ajouter l'adresse complète formatée
-            if devis.get('client_nom'):
-                devis['client_adresse_complete'] = self.crm_manager.format_adresse_complete(devis)
-            
-            # Récupérer les lignes
-            query_lignes = 'SELECT * FROM formulaire_lignes WHERE formulaire_id = ? ORDER BY sequence_ligne'
-            lignes = self.db.execute_query(query_lignes, (devis_id,))
-            devis['lignes'] = [dict(ligne) for ligne in lignes]
-            
-            # Calculer les totaux
-            devis['totaux'] = self.calculer_totaux_devis(devis_id)
-            
-            # Récupérer l'historique
-            query_historique = '''
-                SELECT fv.*, e.prenom || ' ' || e.nom as employee_nom
-                FROM formulaire_validations fv
-                LEFT JOIN employees e ON fv.employee_id = e.id
-                WHERE fv.formulaire_id = ?
-                ORDER BY fv.date_validation DESC
-            '''
-            historique = self.db.execute_query(query_historique, (devis_id,))
-            devis['historique'] = [dict(h) for h in historique]
-            
-            # Parser les métadonnées
-            try:
-                devis['metadonnees'] = json.loads(devis.get('metadonnees_json', '{}'))
-            except:
-                devis['metadonnees'] = {}
-            
-            return devis
+            return self._load_devis_for_export([devis_id]).get(devis_id, {})
         except Exception as e:
             st.error(f"Erreur récupération devis complet: {e}")
             return {}
@@ -399,17 +379,24 @@ class GestionnaireDevis:
             query = 'SELECT quantite, prix_unitaire FROM formulaire_lignes WHERE formulaire_id = ?'
             lignes = self.db.execute_query(query, (devis_id,))
             
-            # Calculer le total à partir des lignes
-            total_ht_lignes = sum((ligne['quantite'] * ligne['prix_unitaire']) for ligne in lignes)
-            
             # Récupérer les métadonnées pour le prix estimé et taux de taxes
             devis_info = self.db.execute_query("SELECT metadonnees_json FROM formulaires WHERE id = ?", (devis_id,))
+        except Exception as e:
+            st.error(f"Erreur calcul totaux devis: {e}")
+            return {'total_ht': 0, 'taux_tva': 0, 'montant_tva': 0, 'total_ttc': 0}
+        return self._calculer_totaux(lignes, devis_info[0] if devis_info else None)
+
+    def _calculer_totaux(self, lignes: List[Dict[str, Any]], devis_info: Optional[Dict[str, Any]]) -> Dict[str, float]:
+        """Totaux d'un devis à partir de ses lignes et de sa ligne formulaires (metadonnees_json) déjà chargées."""
+        try:
+            # Calculer le total à partir des lignes
+            total_ht_lignes = sum((ligne['quantite'] * ligne['prix_unitaire']) for ligne in lignes)
             
             # Si pas de lignes, utiliser le prix estimé des métadonnées
             total_ht = total_ht_lignes
             if total_ht_lignes == 0 and devis_info:
                 try:
-                    metadonnees = json.loads(devis_info[0]['metadonnees_json'] or '{}')
+                    metadonnees = json.loads(devis_info['metadonnees_json'] or '{}')
                     prix_estime = metadonnees.get('prix_estime', 0)
                     if prix_estime > 0:
                         total_ht = prix_estime
@@ -424,7 +411,7 @@ class GestionnaireDevis:
             
             if devis_info:
                 try:
-                    metadonnees = json.loads(devis_info[0]['metadonnees_json'] or '{}')
+                    metadonnees = json.loads(devis_info['metadonnees_json'] or '{}')
                     taux_tps = metadonnees.get('taux_tps', 5.0)
                     taux_tvq = metadonnees.get('taux_tvq', 9.975)
                     type_client = metadonnees.get('type_client', 'PARTICULIER')
@@ -595,47 +582,37 @@ class GestionnaireDevis:
         except Exception as e:
             st.error(f"Erreur enregistrement validation devis: {e}")
 
-    def get_all_devis(self, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """Récupère tous les devis avec filtres optionnels."""
-        try:
-            query = f'''
-                SELECT f.id, f.numero_document, f.statut, f.priorite, f.date_creation, 
-                       f.date_echeance,
-                       c.nom as client_nom,
-                       e.prenom || ' ' || e.nom as responsable_nom,
-                       p.nom_projet
-                FROM formulaires f
-                LEFT JOIN companies c ON f.company_id = c.id
-                LEFT JOIN employees e ON f.employee_id = e.id
-                LEFT JOIN projects p ON f.project_id = p.id
-                WHERE (f.type_formulaire = 'DEVIS' OR (f.type_formulaire = 'ESTIMATION' AND f.metadonnees_json LIKE '%"type_reel": "DEVIS"%'))
-            '''
+    @staticmethod
+    def _devis_filters(filters: Optional[Dict[str, Any]]):
+        where, params = [DEVIS_TYPE_SQL], []
+        if filters:
+            if filters.get('statut') and filters['statut'] != 'Tous':
+                where.append("f.statut = ?")
+                params.append(filters['statut'])
             
-            params = []
+            if filters.get('client_id'):
+                where.append("f.company_id = ?")
+                params.append(filters['client_id'])
             
-            if filters:
-                if filters.get('statut') and filters['statut'] != 'Tous':
-                    query += " AND f.statut = ?"
-                    params.append(filters['statut'])
-                
-                if filters.get('client_id'):
-                    query += " AND f.company_id = ?"
-                    params.append(filters['client_id'])
-                
-                if filters.get('responsable_id'):
-                    query += " AND f.employee_id = ?"
-                    params.append(filters['responsable_id'])
-                
-                if filters.get('date_debut'):
-                    query += " AND DATE(f.date_creation) >= ?"
-                    params.append(filters['date_debut'])
-                
-                if filters.get('date_fin'):
-                    query += " AND DATE(f.date_creation) <= ?"
-                    params.append(filters['date_fin'])
+            if filters.get('responsable_id'):
+                where.append("f.employee_id = ?")
+                params.append(filters['responsable_id'])
             
-            query += " ORDER BY f.date_creation DESC"
+            if filters.get('date_debut'):
+                where.append("DATE(f.date_creation) >= ?")
+                params.append(filters['date_debut'])
             
+            if filters.get('date_fin'):
+                where.append("DATE(f.date_creation) <= ?")
+                params.append(filters['date_fin'])
+        return where, params
+
+    def get_all_devis(self, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Récupère tous les devis avec filtres optionnels."""
+        try:
+            where, params = self._devis_filters(filters)
+            query = (f"SELECT {DEVIS_LIST_QUERY.select_sql} FROM {DEVIS_LIST_QUERY.from_sql}"
+                     f"{ListQuery.where_sql(where)} ORDER BY f.date_creation DESC, f.id DESC")
             rows = self.db.execute_query(query, tuple(params) if params else None)
             
             # Enrichir avec les totaux
@@ -650,6 +627,41 @@ class GestionnaireDevis:
             st.error(f"Erreur récupération liste devis: {e}")
             return []
 
+    def get_devis_page(self, filters: Optional[Dict[str, Any]] = None, cursor: Optional[str] = None,
+                       direction: str = NEXT, page_size: int = 25) -> Dict[str, Any]:
+        """Une page de devis (plus récents d'abord), totaux calculés pour la page seulement."""
+        try:
+            where, params = self._devis_filters(filters)
+            page = fetch_page(self.db, DEVIS_LIST_QUERY, where, params, cursor=cursor, direction=direction,
+                              page_size=page_size)
+            for devis in page['rows']:
+                devis['totaux'] = self.calculer_totaux_devis(devis['id'])
+            return page
+        except Exception as e:
+            st.error(f"Erreur récupération liste devis: {e}")
+            return {'rows': [], 'next_cursor': None, 'prev_cursor': None, 'has_next': False, 'has_prev': False}
+
+    def get_devis_summary(self, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Nombre de devis, brouillons, envoyés et CA TTC de la sélection, en une requête."""
+        try:
+            where, params = self._devis_filters(filters)
+            rows = self.db.execute_query(f'''
+                SELECT COUNT(*) AS total,
+                       COALESCE(SUM(f.statut = 'BROUILLON'), 0) AS brouillons,
+                       COALESCE(SUM(f.statut = 'ENVOYÉ'), 0) AS envoyes,
+                       COALESCE(SUM({DEVIS_TOTAL_TTC_SQL}), 0) AS ca_total
+                FROM (
+                    SELECT f.statut, f.metadonnees_json,
+                           (SELECT COALESCE(SUM(fl.quantite * fl.prix_unitaire), 0)
+                            FROM formulaire_lignes fl WHERE fl.formulaire_id = f.id) AS total_lignes
+                    FROM {DEVIS_LIST_QUERY.from_sql}{ListQuery.where_sql(where)}
+                ) f
+            ''', tuple(params))
+            return dict(rows[0]) if rows else {'total': 0, 'brouillons': 0, 'envoyes': 0, 'ca_total': 0.0}
+        except Exception as e:
+            st.error(f"Erreur résumé devis: {e}")
+            return {'total': 0, 'brouillons': 0, 'envoyes': 0, 'ca_total': 0.0}
+
     def get_devis_statistics(self) -> Dict[str, Any]:
         """Statistiques des devis."""
         try:
@@ -741,642 +753,96 @@ class GestionnaireDevis:
     def export_devis_html(self, devis_id: int) -> Optional[str]:
         """Exporte un devis au format HTML professionnel pour les clients."""
         try:
-            devis_data = self.get_devis_complet(devis_id)
-            if not devis_data:
+            html_content = self.export_devis_html_batch([devis_id]).get(devis_id)
+            if not html_content:
                 st.error(f"Devis #{devis_id} non trouvé pour export")
                 return None
-            
-            html_content = self.generate_devis_html_template(devis_data)
             return html_content
         except Exception as e:
             st.error(f"Erreur export HTML devis: {e}")
             return None
     
-    def generate_devis_html_template(self, devis_data: Dict[str, Any]) -> str:
-        """Génère le template HTML pour un devis avec design moderne professionnel."""
-        try:
-            # Formatage des dates
-            date_creation = devis_data.get('date_creation', '')
-            if date_creation:
-                try:
-                    date_creation_formatted = datetime.fromisoformat(date_creation).strftime('%d/%m/%Y')
-                except:
-                    date_creation_formatted = date_creation[:10] if len(date_creation) >= 10 else date_creation
-            else:
-                date_creation_formatted = 'N/A'
+    def export_devis_html_batch(self, devis_ids: List[int]) -> Dict[int, str]:
+        """
+        Exporte plusieurs devis en HTML {id: html}. Les devis inchangés depuis
+        leur dernier rendu sont servis par le cache de document_templates.
+        """
+        return render_documents(
+            'DEVIS', devis_ids, self.db,
+            load_documents=self._load_devis_for_export,
+            render=render_devis_html
+        )
+    
+    def _load_devis_for_export(self, devis_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Devis complets (client, lignes, totaux, historique, métadonnées) en trois
+        requêtes par lot de 500 ; les id introuvables sont omis.
+        """
+        devis_par_id = {}
+        for i in range(0, len(devis_ids), 500):
+            chunk = devis_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
             
-            date_echeance = devis_data.get('date_echeance', '')
-            try:
-                date_echeance_formatted = datetime.fromisoformat(date_echeance).strftime('%d/%m/%Y') if date_echeance else 'N/A'
-            except:
-                date_echeance_formatted = date_echeance
-            
-            # Récupération des totaux
-            totaux = devis_data.get('totaux', {})
-            total_ht = totaux.get('total_ht', 0)
-            taux_tva = totaux.get('taux_tva', 14.975)
-            montant_tva = totaux.get('montant_tva', 0)
-            total_ttc = totaux.get('total_ttc', 0)
-            
-            # Formatage du statut pour les badges
-            statut = devis_data.get('statut', 'BROUILLON')
-            statut_class = {
-                'BROUILLON': 'badge-pending',
-                'VALIDÉ': 'badge-in-progress',
-                'ENVOYÉ': 'badge-in-progress',
-                'APPROUVÉ': 'badge-completed',
-                'TERMINÉ': 'badge-completed',
-                'ANNULÉ': 'badge-on-hold',
-                'EXPIRÉ': 'badge-on-hold'
-            }.get(statut, 'badge-pending')
-            
-            priorite = devis_data.get('priorite', 'NORMAL')
-            priorite_class = {
-                'FAIBLE': 'badge-pending',
-                'NORMAL': 'badge-in-progress',
-                'ÉLEVÉE': 'badge-on-hold',
-                'URGENT': 'badge-on-hold'
-            }.get(priorite, 'badge-in-progress')
-            
-            # Génération des lignes du tableau
-            lignes_html = ""
-            nb_lignes = 0
-            if devis_data.get('lignes'):
-                for ligne in devis_data['lignes']:
-                    nb_lignes += 1
-                    montant_ligne = ligne.get('quantite', 0) * ligne.get('prix_unitaire', 0)
-                    code_article = ligne.get('code_article', '')
-                    code_display = f"<br><small>Code: {code_article}</small>" if code_article else ""
-                    
-                    lignes_html += f"""
-                    <tr>
-                        <td><strong>{ligne.get('description', '')}</strong>{code_display}</td>
-                        <td style="text-align: center;">{ligne.get('quantite', 0):,.2f}</td>
-                        <td style="text-align: center;">{ligne.get('unite', '')}</td>
-                        <td style="text-align: right;">{ligne.get('prix_unitaire', 0):,.2f} $</td>
-                        <td style="text-align: right;"><strong>{montant_ligne:,.2f} $</strong></td>
-                    </tr>
-                    """
-            else:
-                lignes_html = """
-                <tr>
-                    <td colspan="5" style="text-align: center; color: #6B7280;">Aucune ligne dans ce devis</td>
-                </tr>
-                """
-            
-            # Adresse client formatée
-            adresse_client = devis_data.get('client_adresse_complete', f"""
-{devis_data.get('client_nom', 'N/A')}<br>
-{devis_data.get('adresse', '')}<br>
-{devis_data.get('ville', '')}, {devis_data.get('province', '')} {devis_data.get('code_postal', '')}<br>
-{devis_data.get('pays', '')}
-            """).strip()
-            
-            # Template HTML modernisé basé sur le design de la demande de prix
-            html_template = f"""
-            <!DOCTYPE html>
-            <html lang="fr">
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Devis - {devis_data.get('numero_document', 'N/A')}</title>
-                <style>
-                    :root {{
-                        --primary-color: #3B82F6;
-                        --primary-color-darker: #2563EB;
-                        --primary-color-darkest: #1D4ED8;
-                        --primary-color-lighter: #DBEAFE;
-                        --background-color: #FAFBFF;
-                        --secondary-background-color: #FFFFFF;
-                        --text-color: #374151;
-                        --text-color-light: #6B7280;
-                        --border-color: #E5E7EB;
-                        --border-radius-md: 0.5rem;
-                        --box-shadow-md: 0 4px 6px -1px rgb(0 0 0 / 0.1);
-                    }}
-                    
-                    * {{
-                        margin: 0;
-                        padding: 0;
-                        box-sizing: border-box;
-                    }}
-                    
-                    body {{
-                        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                        line-height: 1.6;
-                        color: var(--text-color);
-                        background-color: var(--background-color);
-                        margin: 0;
-                        padding: 15px;
-                    }}
-                    
-                    .container {{
-                        max-width: 8.5in;
-                        margin: 0 auto;
-                        background-color: white;
-                        border-radius: 12px;
-                        box-shadow: var(--box-shadow-md);
-                        overflow: hidden;
-                        width: 100%;
-                    }}
-                    
-                    .header {{
-                        background: linear-gradient(135deg, var(--primary-color) 0%, var(--primary-color-darker) 100%);
-                        color: white;
-                        padding: 30px;
-                        display: flex;
-                        justify-content: space-between;
-                        align-items: center;
-                    }}
-                    
-                    .logo-container {{
-                        display: flex;
-                        align-items: center;
-                        gap: 20px;
-                    }}
-                    
-                    .logo-box {{
-                        background-color: white;
-                        width: 70px;
-                        height: 45px;
-                        border-radius: 8px;
-                        display: flex;
-                        align-items: center;
-                        justify-content: center;
-                        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.2);
-                    }}
-                    
-                    .logo-text {{
-                        font-family: 'Segoe UI', sans-serif;
-                        font-weight: 800;
-                        font-size: 24px;
-                        color: var(--primary-color);
-                        letter-spacing: 1px;
-                    }}
-                    
-                    .company-info {{
-                        text-align: left;
-                    }}
-                    
-                    .company-name {{
-                        font-weight: 700;
-                        font-size: 28px;
-                        margin-bottom: 5px;
-                        text-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
-                    }}
-                    
-                    .company-subtitle {{
-                        font-size: 16px;
-                        opacity: 0.9;
-                    }}
-                    
-                    .contact-info {{
-                        text-align: right;
-                        font-size: 14px;
-                        line-height: 1.4;
-                        opacity: 0.95;
-                    }}
-                    
-                    .document-title {{
-                        background: var(--primary-color-lighter);
-                        padding: 20px 30px;
-                        border-left: 5px solid var(--primary-color);
-                    }}
-                    
-                    .document-title h1 {{
-                        color: var(--primary-color-darker);
-                        font-size: 24px;
-                        margin-bottom: 10px;
-                    }}
-                    
-                    .document-meta {{
-                        display: flex;
-                        justify-content: space-between;
-                        color: var(--text-color-light);
-                        font-size: 14px;
-                    }}
-                    
-                    .content {{
-                        padding: 25px;
-                    }}
-                    
-                    .section {{
-                        margin-bottom: 30px;
-                    }}
-                    
-                    .section-title {{
-                        color: var(--primary-color-darker);
-                        font-size: 18px;
-                        font-weight: 600;
-                        margin-bottom: 15px;
-                        padding-bottom: 8px;
-                        border-bottom: 2px solid var(--primary-color-lighter);
-                        display: flex;
-                        align-items: center;
-                        gap: 10px;
-                    }}
-                    
-                    .info-grid {{
-                        display: grid;
-                        grid-template-columns: 1fr 1fr 1fr;
-                        gap: 15px;
-                        margin-bottom: 20px;
-                    }}
-                    
-                    .info-item {{
-                        background: var(--background-color);
-                        padding: 15px;
-                        border-radius: var(--border-radius-md);
-                        border-left: 3px solid var(--primary-color);
-                    }}
-                    
-                    .info-label {{
-                        font-weight: 600;
-                        color: var(--text-color-light);
-                        font-size: 12px;
-                        text-transform: uppercase;
-                        letter-spacing: 0.5px;
-                        margin-bottom: 5px;
-                    }}
-                    
-                    .info-value {{
-                        font-size: 16px;
-                        color: var(--text-color);
-                        font-weight: 500;
-                    }}
-                    
-                    .table {{
-                        width: 100%;
-                        border-collapse: collapse;
-                        margin: 15px 0;
-                        border-radius: var(--border-radius-md);
-                        overflow: hidden;
-                        box-shadow: var(--box-shadow-md);
-                    }}
-                    
-                    .table th {{
-                        background: var(--primary-color);
-                        color: white;
-                        padding: 12px;
-                        text-align: left;
-                        font-weight: 600;
-                        font-size: 14px;
-                    }}
-                    
-                    .table td {{
-                        padding: 12px;
-                        border-bottom: 1px solid var(--border-color);
-                        vertical-align: top;
-                    }}
-                    
-                    .table tr:nth-child(even) {{
-                        background-color: var(--background-color);
-                    }}
-                    
-                    .table tr:hover {{
-                        background-color: var(--primary-color-lighter);
-                    }}
-                    
-                    .badge {{
-                        padding: 4px 12px;
-                        border-radius: 20px;
-                        font-size: 11px;
-                        font-weight: 600;
-                        text-transform: uppercase;
-                        letter-spacing: 0.5px;
-                        display: inline-block;
-                    }}
-                    
-                    .badge-pending {{ background: #fef3c7; color: #92400e; }}
-                    .badge-in-progress {{ background: #dbeafe; color: #1e40af; }}
-                    .badge-completed {{ background: #d1fae5; color: #065f46; }}
-                    .badge-on-hold {{ background: #fee2e2; color: #991b1b; }}
-                    
-                    .summary-box {{
-                        background: linear-gradient(45deg, var(--primary-color-lighter), white);
-                        border: 2px solid var(--primary-color);
-                        border-radius: var(--border-radius-md);
-                        padding: 20px;
-                        margin: 20px 0;
-                    }}
-                    
-                    .summary-grid {{
-                        display: grid;
-                        grid-template-columns: repeat(3, 1fr);
-                        gap: 15px;
-                    }}
-                    
-                    .summary-item {{
-                        text-align: center;
-                        background: white;
-                        padding: 15px;
-                        border-radius: var(--border-radius-md);
-                        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                    }}
-                    
-                    .summary-number {{
-                        font-size: 24px;
-                        font-weight: 700;
-                        color: var(--primary-color-darker);
-                        display: block;
-                    }}
-                    
-                    .summary-label {{
-                        font-size: 12px;
-                        color: var(--text-color-light);
-                        text-transform: uppercase;
-                        font-weight: 600;
-                        letter-spacing: 0.5px;
-                    }}
-                    
-                    .totals-box {{
-                        background: var(--primary-color-darkest);
-                        color: white;
-                        padding: 20px;
-                        border-radius: var(--border-radius-md);
-                        margin: 20px 0;
-                    }}
-                    
-                    .totals-grid {{
-                        display: grid;
-                        grid-template-columns: repeat(3, 1fr);
-                        gap: 15px;
-                    }}
-                    
-                    .total-item {{
-                        text-align: center;
-                        background: rgba(255, 255, 255, 0.1);
-                        padding: 15px;
-                        border-radius: var(--border-radius-md);
-                    }}
-                    
-                    .total-amount {{
-                        font-size: 22px;
-                        font-weight: 700;
-                        display: block;
-                        margin-bottom: 5px;
-                    }}
-                    
-                    .total-label {{
-                        font-size: 12px;
-                        opacity: 0.9;
-                        text-transform: uppercase;
-                        font-weight: 600;
-                        letter-spacing: 0.5px;
-                    }}
-                    
-                    .instructions-box {{
-                        background: var(--background-color);
-                        border-left: 4px solid var(--primary-color);
-                        padding: 20px;
-                        border-radius: 0 var(--border-radius-md) var(--border-radius-md) 0;
-                        margin: 15px 0;
-                    }}
-                    
-                    .footer {{
-                        background: var(--primary-color-darkest);
-                        color: white;
-                        padding: 20px 30px;
-                        text-align: center;
-                        font-size: 12px;
-                        line-height: 1.4;
-                    }}
-                    
-                    .client-address {{
-                        background: var(--background-color);
-                        border: 2px solid var(--primary-color-lighter);
-                        border-radius: var(--border-radius-md);
-                        padding: 15px;
-                        margin: 15px 0;
-                        font-size: 14px;
-                        line-height: 1.4;
-                    }}
-                    
-                    @media print {{
-                        body {{ 
-                            margin: 0; 
-                            padding: 0; 
-                        }}
-                        .container {{ 
-                            box-shadow: none; 
-                            max-width: 100%;
-                            width: 8.5in;
-                        }}
-                        .table {{ 
-                            break-inside: avoid; 
-                            font-size: 12px;
-                        }}
-                        .section {{ 
-                            break-inside: avoid-page; 
-                        }}
-                        .header {{
-                            padding: 20px 25px;
-                        }}
-                        .content {{
-                            padding: 20px;
-                        }}
-                        @page {{
-                            size: letter;
-                            margin: 0.5in;
-                        }}
-                    }}
-                    
-                    @media screen and (max-width: 768px) {{
-                        .container {{
-                            max-width: 100%;
-                            margin: 0 10px;
-                        }}
-                        .info-grid {{
-                            grid-template-columns: 1fr;
-                            gap: 10px;
-                        }}
-                        .summary-grid, .totals-grid {{
-                            grid-template-columns: repeat(2, 1fr);
-                        }}
-                        .header {{
-                            flex-direction: column;
-                            text-align: center;
-                            gap: 15px;
-                        }}
-                        .contact-info {{
-                            text-align: center;
-                        }}
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <!-- En-tête -->
-                    <div class="header">
-                        <div class="logo-container">
-                            <div class="logo-box">
-                                <div class="logo-text">CA</div>
-                            </div>
-                            <div class="company-info">
-                                <div class="company-name">Constructo AI</div>
-                                <div class="company-subtitle">Construction résidentiel et commercial</div>
-                            </div>
-                        </div>
-                        <div class="contact-info">
-                            1760 rue Jacques-Cartier Sud<br>
-                            Farnham, QC J2N 1Y8<br>
-                            Tél.: (514) 820-1972<br>
-                            Téléc.: (514) 820-1973
-                        </div>
-                    </div>
-                    
-                    <!-- Titre du document -->
-                    <div class="document-title">
-                        <h1>💰 DEVIS COMMERCIAL</h1>
-                        <div class="document-meta">
-                            <span><strong>N° Devis:</strong> {devis_data.get('numero_document', 'N/A')}</span>
-                            <span><strong>Généré le:</strong> {datetime.now().strftime('%d/%m/%Y à %H:%M')}</span>
-                        </div>
-                    </div>
-                    
-                    <!-- Contenu principal -->
-                    <div class="content">
-                        <!-- Informations générales -->
-                        <div class="section">
-                            <h2 class="section-title">📋 Informations du Devis</h2>
-                            <div class="info-grid">
-                                <div class="info-item">
-                                    <div class="info-label">Client</div>
-                                    <div class="info-value">{devis_data.get('client_nom', 'N/A')}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Statut</div>
-                                    <div class="info-value">
-                                        <span class="badge {statut_class}">
-                                            {statut}
-                                        </span>
-                                    </div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Priorité</div>
-                                    <div class="info-value">
-                                        <span class="badge {priorite_class}">
-                                            {priorite}
-                                        </span>
-                                    </div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Date Création</div>
-                                    <div class="info-value">{date_creation_formatted}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Date Échéance</div>
-                                    <div class="info-value">{date_echeance_formatted}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Responsable</div>
-                                    <div class="info-value">{devis_data.get('responsable_nom', 'N/A')}</div>
-                                </div>
-                            </div>
-                        </div>
-                        
-                        <!-- Adresse du client -->
-                        <div class="section">
-                            <h2 class="section-title">📍 Adresse de Facturation</h2>
-                            <div class="client-address">
-                                {adresse_client}
-                            </div>
-                        </div>
-                        
-                        <!-- Résumé -->
-                        <div class="summary-box">
-                            <h3 style="color: var(--primary-color-darker); margin-bottom: 15px; text-align: center;">📋 Résumé du Devis</h3>
-                            <div class="summary-grid">
-                                <div class="summary-item">
-                                    <span class="summary-number">{nb_lignes}</span>
-                                    <span class="summary-label">Articles</span>
-                                </div>
-                                <div class="summary-item">
-                                    <span class="summary-number">{priorite}</span>
-                                    <span class="summary-label">Priorité</span>
-                                </div>
-                                <div class="summary-item">
-                                    <span class="summary-number">{date_echeance_formatted}</span>
-                                    <span class="summary-label">Échéance</span>
-                                </div>
-                            </div>
-                        </div>
+            resultats = self.db.execute_query(f'''
+                SELECT f.*, 
+                       c.nom as client_nom, 
+                       c.adresse, c.ville, c.province, c.code_postal, c.pays,
+                       co.prenom || ' ' || co.nom_famille as contact_nom, 
+                       co.email as contact_email, co.telephone as contact_telephone,
+                       e.prenom || ' ' || e.nom as responsable_nom,
+                       p.nom_projet
+                FROM formulaires f
+                LEFT JOIN companies c ON f.company_id = c.id
+                LEFT JOIN contacts co ON c.contact_principal_id = co.id
+                LEFT JOIN employees e ON f.employee_id = e.id
+                LEFT JOIN projects p ON f.project_id = p.id
+                WHERE f.id IN ({placeholders}) AND ({DEVIS_TYPE_SQL})
+            ''', tuple(chunk))
+            if not resultats:
+                continue
+            
+            lignes_par_devis = {}
+            for ligne in self.db.execute_query(f'''
+                SELECT * FROM formulaire_lignes
+                WHERE formulaire_id IN ({placeholders})
+                ORDER BY formulaire_id, sequence_ligne
+            ''', tuple(chunk)):
+                lignes_par_devis.setdefault(ligne['formulaire_id'], []).append(dict(ligne))
+            
+            historique_par_devis = {}
+            for entree in self.db.execute_query(f'''
+                SELECT fv.*, e.prenom || ' ' || e.nom as employee_nom
+                FROM formulaire_validations fv
+                LEFT JOIN employees e ON fv.employee_id = e.id
+                WHERE fv.formulaire_id IN ({placeholders})
+                ORDER BY fv.formulaire_id, fv.date_validation DESC
+            ''', tuple(chunk)):
+                historique_par_devis.setdefault(entree['formulaire_id'], []).append(dict(entree))
+            
+            for row in resultats:
+                devis = dict(row)
                 
-                        <!-- Détail des articles -->
-                        <div class="section">
-                            <h2 class="section-title">📝 Détail des Prestations</h2>
-                            <table class="table">
-                                <thead>
-                                    <tr>
-                                        <th>Description</th>
-                                        <th style="text-align: center;">Quantité</th>
-                                        <th style="text-align: center;">Unité</th>
-                                        <th style="text-align: center;">Prix Unit.</th>
-                                        <th style="text-align: center;">Montant</th>
-                                    </tr>
-                                </thead>
-                                <tbody>
-                                    {lignes_html}
-                                </tbody>
-                            </table>
-                        </div>
+                # Ajouter l'adresse complète formatée
+                if devis.get('client_nom'):
+                    devis['client_adresse_complete'] = self.crm_manager.format_adresse_complete(devis)
                 
-                        <!-- Totaux -->
-                        <div class="totals-box">
-                            <h3 style="text-align: center; margin-bottom: 15px;">💰 Récapitulatif Financier</h3>
-                            <div class="totals-grid">
-                                <div class="total-item">
-                                    <span class="total-amount">{total_ht:,.2f} $</span>
-                                    <span class="total-label">Sous-total HT</span>
-                                </div>
-                                <div class="total-item">
-                                    <span class="total-amount">{montant_tva:,.2f} $</span>
-                                    <span class="total-label">TVA ({taux_tva:.3f}%)</span>
-                                </div>
-                                <div class="total-item">
-                                    <span class="total-amount">{total_ttc:,.2f} $</span>
-                                    <span class="total-label">Total TTC</span>
-                                </div>
-                            </div>
-                        </div>
+                devis['lignes'] = lignes_par_devis.get(devis['id'], [])
+                devis['totaux'] = self._calculer_totaux(devis['lignes'], devis)
+                devis['historique'] = historique_par_devis.get(devis['id'], [])
                 
-                        <!-- Notes du devis -->
-                        {f'''
-                        <div class="section">
-                            <h2 class="section-title">📝 Notes et Conditions</h2>
-                            <div class="instructions-box">
-                                {devis_data.get('notes', 'Aucune note particulière.')}
-                            </div>
-                        </div>
-                        ''' if devis_data.get('notes') and devis_data['notes'].strip() else ''}
-                        
-                        <!-- Instructions -->
-                        <div class="instructions-box">
-                            <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">📋 Conditions Générales</h4>
-                            <p><strong>• Validité :</strong> Ce devis est valable 30 jours à compter de la date d'émission</p>
-                            <p><strong>• Paiement :</strong> Net 30 jours sur réception de facture</p>
-                            <p><strong>• Délais :</strong> Les délais de livraison seront confirmés lors de l'acceptation</p>
-                            <p><strong>• Acceptation :</strong> Ce devis engage nos services uniquement après acceptation écrite</p>
-                            <p><strong>• Contact :</strong> Pour toute question : (514) 820-1972</p>
-                        </div>
-                        
-                    </div>
-                    
-                    <!-- Pied de page -->
-                    <div class="footer">
-                        <div><strong>🏗️ Constructo AI</strong> - Devis Commercial</div>
-                        <div>Document généré automatiquement le {datetime.now().strftime('%d/%m/%Y à %H:%M')}</div>
-                        <div>📞 (514) 820-1972 | 📧 info@constructo-ai.com | 🌐 www.constructo-ai.com</div>
-                        <div style="margin-top: 10px; font-size: 11px; opacity: 0.8;">
-                            Merci de mentionner le numéro de devis {devis_data.get('numero_document', 'N/A')} dans votre réponse.
-                        </div>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            return html_template
+                # Parser les métadonnées
+                try:
+                    devis['metadonnees'] = json.loads(devis.get('metadonnees_json', '{}'))
+                except:
+                    devis['metadonnees'] = {}
+                
+                devis_par_id[devis['id']] = devis
+        return devis_par_id
+    
+    def generate_devis_html_template(self, devis_data: Dict[str, Any]) -> str:
+        """Génère le template HTML pour un devis avec design moderne professionnel."""
+        try:
+            return render_devis_html(devis_data)
         except Exception as e:
             st.error(f"Erreur génération template HTML: {e}")
             return ""
@@ -1544,27 +1010,24 @@ def render_devis_liste(gestionnaire: GestionnaireDevis):
     if date_fin:
         filters['date_fin'] = date_fin.strftime('%Y-%m-%d')
     
-    # Récupérer les devis
-    devis_list = gestionnaire.get_all_devis(filters)
+    # Récupérer la page affichée et le résumé de la sélection (calculé par SQLite)
+    resume = gestionnaire.get_devis_summary(filters)
+    pager = pager_state('devis_list_page', sorted(filters.items()))
+    page = gestionnaire.get_devis_page(filters, pager['cursor'], pager['direction'], pager['page_size'])
+    devis_list = page['rows']
     
     if devis_list:
-        # Calculer les statistiques de résumé
-        total_devis = len(devis_list)
-        devis_brouillons = len([d for d in devis_list if d['statut'] == 'BROUILLON'])
-        devis_envoyes = len([d for d in devis_list if d['statut'] == 'ENVOYÉ'])
-        ca_total = sum(d['totaux']['total_ttc'] for d in devis_list)
-        
         # Afficher les métriques de résumé
         st.markdown("---")
         result_col1, result_col2, result_col3, result_col4 = st.columns(4)
         with result_col1:
-            st.markdown(f"**📋 {total_devis} devis trouvés**")
+            st.markdown(f"**📋 {resume['total']} devis trouvés**")
         with result_col2:
-            st.markdown(f"**📝 {devis_brouillons} brouillons**") 
+            st.markdown(f"**📝 {resume['brouillons']} brouillons**") 
         with result_col3:
-            st.markdown(f"**📧 {devis_envoyes} envoyés**")
+            st.markdown(f"**📧 {resume['envoyes']} envoyés**")
         with result_col4:
-            st.markdown(f"**💰 CA total: {ca_total:,.2f}$**")
+            st.markdown(f"**💰 CA total: {resume['ca_total']:,.2f}$**")
         
         # Mode d'affichage
         view_mode = st.radio(
@@ -1584,6 +1047,8 @@ def render_devis_liste(gestionnaire: GestionnaireDevis):
             show_devis_card_view(devis_list, gestionnaire)
         else:
             show_devis_detailed_list(devis_list, gestionnaire)
+
+        render_pager(page, 'devis_list_page', resume['total'])
     
     else:
         st.info("Aucun devis trouvé avec les critères sélectionnés.")
@@ -1982,16 +1447,22 @@ def render_nouveau_devis_form(gestionnaire: GestionnaireDevis):
         col_prod1, col_prod2, col_prod3 = st.columns([2, 1, 1])
         
         with col_prod1:
-            # Sélection d'un produit
+            # Sélection d'un produit (filtrée par l'index du catalogue si un terme est saisi)
+            recherche_produit = st.text_input("🔍 Filtrer le catalogue", key="produit_catalogue_recherche", placeholder="Code, nom, matériau...")
             try:
-                produits_options = [("", "Sélectionner un produit...")] + [(p['id'], f"{p['code_produit']} - {p['nom']}") for p in gestionnaire.product_manager.get_all_products()]
+                if recherche_produit:
+                    produits_catalogue = gestionnaire.product_manager.search_produits(recherche_produit, limit=50)
+                else:
+                    produits_catalogue = gestionnaire.product_manager.get_all_products()
+                produits_options = {"": "Sélectionner un produit..."}
+                produits_options.update((p['id'], f"{p['code_produit']} - {p['nom']}") for p in produits_catalogue)
             except:
-                produits_options = [("", "Aucun produit disponible")]
-            
+                produits_options = {"": "Aucun produit disponible"}
+
             produit_selectionne = st.selectbox(
                 "Produit du catalogue",
-                options=[opt[0] for opt in produits_options],
-                format_func=lambda x: next((opt[1] for opt in produits_options if opt[0] == x), "Sélectionner un produit..."),
+                options=list(produits_options),
+                format_func=lambda x: produits_options.get(x, "Sélectionner un produit..."),
                 key="produit_catalogue_select"
             )
         
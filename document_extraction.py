@@ -0,0 +1,572 @@
+# document_extraction.py - Extraction parallèle et cache disque des documents analysés par l'expert IA
+"""
+Lecture des fichiers téléversés pour ExpertAdvisor.analyze_documents.
+
+Les fichiers (PDF, DOCX, CSV, TXT, HTML, images) étaient lus l'un après
+l'autre, le texte d'un PDF concaténé page par page avec +=, et un même
+fichier téléversé de nouveau était ré-extrait entièrement. Ici :
+- extract_documents() cherche d'abord chaque fichier dans le cache disque,
+  indexé par l'empreinte SHA-256 du contenu (et l'extension, et
+  EXTRACTOR_VERSION) : texte extrait ou image réduite en JSON ; un fichier
+  déjà vu ne coûte qu'une lecture de fichier ;
+- les fichiers restants sont extraits dans un pool de MAX_WORKERS processus
+  partagé par les sessions et jamais redimensionné (chaque appel borne
+  seulement son nombre de tâches en cours) ; un gros PDF est découpé en
+  tranches de pages extraites en parallèle puis jointes dans l'ordre (join
+  au lieu de +=) ;
+- sur un seul CPU ou pour une seule tâche, l'extraction reste dans le
+  processus (pas de coût de démarrage) ; si le pool est indisponible ou
+  arrêté par une autre session, on retombe sur l'extraction séquentielle ;
+- les messages d'erreur ne sont jamais mis en cache ; le cache est borné
+  (les fichiers les moins récemment lus sont supprimés au-delà de
+  CACHE_MAX_BYTES).
+"""
+
+import base64
+import csv
+import hashlib
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from PIL import Image
+
+# Lecture PDF : pypdf, ou PyPDF2 (même API PdfReader)
+try:
+    from pypdf import PdfReader
+except ImportError:
+    try:
+        from PyPDF2 import PdfReader
+    except ImportError:
+        PdfReader = None
+
+try:
+    import docx
+except ImportError:
+    docx = None
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter quand une extraction change : les entrées du cache deviennent inaccessibles
+EXTRACTOR_VERSION = 1
+SUPPORTED_FORMATS = ('.pdf', '.docx', '.xlsx', '.csv', '.txt', '.html', '.jpg', '.jpeg', '.png', '.webp')
+IMAGE_MEDIA_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp'}
+MAX_IMAGE_SIDE = 1568
+# Préfixes des messages rendus à la place du contenu (jamais mis en cache)
+ERROR_PREFIXES = ("Erreur", "Format", "Aucun texte", "INFO", "Impossible")
+
+MAX_WORKERS = os.cpu_count() or 1
+# En dessous, un PDF est extrait d'un bloc
+PDF_MIN_PAGES_PER_TASK = 4
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+
+def is_extraction_error(content: Any) -> bool:
+    return isinstance(content, str) and content.startswith(ERROR_PREFIXES)
+
+
+# =========================================================================
+# LECTEURS (exécutés dans les processus du pool : fonctions de module)
+# =========================================================================
+
+def extract_file(filename: str, data: bytes) -> Union[str, Dict[str, Any]]:
+    """Texte d'un fichier, bloc image de l'API pour une image, ou message d'erreur"""
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext not in SUPPORTED_FORMATS:
+        return f"Format de fichier non supporté: {filename}. Formats acceptés: {', '.join(SUPPORTED_FORMATS)}"
+    try:
+        if file_ext == '.pdf': return _read_pdf(data, filename)
+        elif file_ext == '.docx': return _read_docx(data, filename)
+        elif file_ext in ['.xlsx', '.csv']: return _read_spreadsheet(data, filename, file_ext)
+        elif file_ext == '.txt': return _read_txt(data, filename)
+        elif file_ext == '.html': return _read_html(data, filename)
+        elif file_ext in IMAGE_MEDIA_TYPES: return _read_image(data, filename, file_ext)
+        else: return f"Format de fichier interne non géré : {filename}"
+    except Exception as e: return f"Erreur générale lors de la lecture du fichier {filename}: {str(e)}"
+
+
+def _pdf_page_count(data: bytes) -> Optional[int]:
+    if PdfReader is None:
+        return None
+    try:
+        return len(PdfReader(io.BytesIO(data)).pages)
+    except Exception:
+        return None
+
+
+def _pdf_pages_text(data: bytes, start: int, stop: int) -> List[str]:
+    """Texte des pages [start, stop) d'un PDF"""
+    reader = PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+def _join_pdf_pages(pages: Sequence[str], filename: str) -> str:
+    text = ''.join(f"{page}\n" for page in pages if page)
+    if not text: return f"Aucun texte n'a pu être extrait de {filename}. Le PDF est-il basé sur une image ou protégé ?"
+    return text
+
+
+def _read_pdf(data: bytes, filename: str) -> str:
+    if PdfReader is None:
+        return f"Erreur lors de la lecture du PDF {filename}: pypdf (ou PyPDF2) n'est pas installé"
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        return _join_pdf_pages([page.extract_text() or '' for page in reader.pages], filename)
+    except Exception as e: return f"Erreur lors de la lecture du PDF {filename}: {str(e)}"
+
+
+def _read_docx(data: bytes, filename: str) -> str:
+    if docx is None:
+        return f"Erreur lors de la lecture du DOCX {filename}: python-docx n'est pas installé"
+    try:
+        doc = docx.Document(io.BytesIO(data))
+        return "\n".join([p.text for p in doc.paragraphs if p.text is not None])
+    except Exception as e: return f"Erreur lors de la lecture du DOCX {filename}: {str(e)}"
+
+
+def _read_spreadsheet(data: bytes, filename: str, file_ext: str) -> str:
+    try:
+        if file_ext == '.csv':
+            decoded_content = None
+            try: decoded_content = data.decode('utf-8')
+            except UnicodeDecodeError:
+                logger.info(f"Décodage UTF-8 échoué pour {filename}, essai avec Latin-1.")
+                try: decoded_content = data.decode('latin1')
+                except Exception as de: return f"Erreur de décodage pour {filename}: {str(de)}"
+            if decoded_content is None: return f"Impossible de décoder le contenu de {filename}."
+            reader = csv.reader(io.StringIO(decoded_content))
+            output_string_io = io.StringIO()
+            writer = csv.writer(output_string_io, delimiter=',', quoting=csv.QUOTE_MINIMAL)
+            for row in reader: writer.writerow(row)
+            return output_string_io.getvalue()
+        elif file_ext == '.xlsx':
+            return f"INFO: Le format XLSX nécessite 'openpyxl'. Pour l'activer, décommentez le code et ajoutez à requirements.txt."
+    except Exception as e: return f"Erreur lors du traitement du tableur {filename}: {str(e)}"
+
+
+def _read_txt(data: bytes, filename: str) -> str:
+    try:
+        try: return data.decode('utf-8')
+        except UnicodeDecodeError:
+            logger.info(f"Décodage UTF-8 échoué pour {filename}, essai avec Latin-1.")
+            try: return data.decode('latin1')
+            except UnicodeDecodeError:
+                logger.info(f"Décodage Latin-1 échoué pour {filename}, essai avec cp1252.")
+                return data.decode('cp1252', errors='replace')
+    except Exception as e: return f"Erreur lors de la lecture du TXT {filename}: {str(e)}"
+
+
+def _read_html(data: bytes, filename: str) -> str:
+    """
+    Analyse les fichiers HTML et extrait le contenu structuré
+    """
+    if BeautifulSoup is None:
+        return f"Erreur lors de l'analyse HTML de {filename}: beautifulsoup4 n'est pas installé"
+    try:
+        # Tentative de décodage avec plusieurs encodages
+        html_content = None
+        encodings_to_try = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1']
+
+        for encoding in encodings_to_try:
+            try:
+                html_content = data.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+
+        if html_content is None:
+            return f"Erreur de décodage pour {filename}: impossible de décoder avec les encodages standard."
+
+        # Parse HTML avec BeautifulSoup
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+        # Extraction des métadonnées et du contenu structuré
+        analysis_parts = []
+
+        # 1. Métadonnées du document
+        analysis_parts.append("=== MÉTADONNÉES HTML ===")
+
+        # Titre
+        title = soup.find('title')
+        if title:
+            analysis_parts.append(f"Titre: {title.get_text().strip()}")
+
+        # Meta tags importantes
+        meta_description = soup.find('meta', attrs={'name': 'description'})
+        if meta_description:
+            analysis_parts.append(f"Description: {meta_description.get('content', '')}")
+
+        meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
+        if meta_keywords:
+            analysis_parts.append(f"Mots-clés: {meta_keywords.get('content', '')}")
+
+        # Langue du document
+        html_tag = soup.find('html')
+        if html_tag and html_tag.get('lang'):
+            analysis_parts.append(f"Langue: {html_tag.get('lang')}")
+
+        # 2. Structure du document
+        analysis_parts.append("\n=== STRUCTURE DU DOCUMENT ===")
+
+        # Titres hiérarchiques
+        headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+        if headings:
+            analysis_parts.append("Titres trouvés:")
+            for heading in headings[:10]:  # Limiter à 10 titres
+                level = heading.name.upper()
+                text = heading.get_text().strip()
+                if text:
+                    analysis_parts.append(f"  {level}: {text}")
+
+        # 3. Contenu textuel principal
+        analysis_parts.append("\n=== CONTENU TEXTUEL ===")
+
+        # Supprimer les scripts et styles
+        for script in soup(["script", "style"]):
+            script.decompose()
+
+        # Extraire le texte principal
+        main_content = soup.get_text()
+
+        # Nettoyer le texte (supprimer les espaces multiples, lignes vides)
+        cleaned_text = re.sub(r'\s+', ' ', main_content).strip()
+
+        # Limiter la longueur pour éviter les textes trop longs
+        if len(cleaned_text) > 3000:
+            cleaned_text = cleaned_text[:3000] + "... [TEXTE TRONQUÉ]"
+
+        analysis_parts.append(cleaned_text)
+
+        # 4. Liens et ressources
+        analysis_parts.append("\n=== LIENS ET RESSOURCES ===")
+
+        # Liens externes
+        links = soup.find_all('a', href=True)
+        external_links = [link['href'] for link in links if link['href'].startswith(('http', 'https'))]
+        if external_links:
+            analysis_parts.append(f"Liens externes trouvés: {len(external_links)}")
+            # Afficher les 5 premiers liens
+            for link in external_links[:5]:
+                analysis_parts.append(f"  - {link}")
+            if len(external_links) > 5:
+                analysis_parts.append(f"  ... et {len(external_links) - 5} autres")
+
+        # Images
+        images = soup.find_all('img', src=True)
+        if images:
+            analysis_parts.append(f"Images trouvées: {len(images)}")
+
+        # 5. Éléments de formulaire
+        forms = soup.find_all('form')
+        if forms:
+            analysis_parts.append(f"Formulaires trouvés: {len(forms)}")
+
+        # 6. Tableaux
+        tables = soup.find_all('table')
+        if tables:
+            analysis_parts.append(f"Tableaux trouvés: {len(tables)}")
+
+            # Analyser le premier tableau s'il existe
+            table = tables[0]
+            rows = table.find_all('tr')
+            if rows:
+                analysis_parts.append(f"  Premier tableau: {len(rows)} lignes")
+
+                # Extraire les en-têtes si disponibles
+                headers = table.find_all('th')
+                if headers:
+                    header_texts = [th.get_text().strip() for th in headers]
+                    analysis_parts.append(f"  En-têtes: {', '.join(header_texts[:5])}")
+
+        # 7. Classes CSS et IDs importants (pour comprendre la structure)
+        analysis_parts.append("\n=== STRUCTURE CSS ===")
+        elements_with_class = soup.find_all(class_=True)
+        if elements_with_class:
+            # Extraire les classes les plus communes
+            all_classes = []
+            for element in elements_with_class:
+                all_classes.extend(element.get('class', []))
+
+            common_classes = Counter(all_classes).most_common(5)
+            if common_classes:
+                analysis_parts.append("Classes CSS les plus fréquentes:")
+                for class_name, count in common_classes:
+                    analysis_parts.append(f"  .{class_name} ({count} fois)")
+
+        return "\n".join(analysis_parts)
+
+    except Exception as e:
+        return f"Erreur lors de l'analyse HTML de {filename}: {str(e)}"
+
+
+def _read_image(data: bytes, filename: str, file_ext: str) -> Union[str, Dict[str, Any]]:
+    try:
+        img = Image.open(io.BytesIO(data))
+        mime_type = IMAGE_MEDIA_TYPES.get(file_ext)
+        if not mime_type: return f"Format d'image non supporté par l'API: {filename}"
+        if img.width * img.height > MAX_IMAGE_SIDE * MAX_IMAGE_SIDE:
+            logger.info(f"Redimensionnement de l'image {filename} car elle dépasse la taille max.")
+            img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+        buffered = io.BytesIO()
+        img_format = mime_type.split('/')[1].upper()
+        if img_format == 'JPEG' and img.mode in ('RGBA', 'LA', 'P'):
+            logger.info(f"Conversion de l'image {filename} en RGB pour sauvegarde JPEG.")
+            img = img.convert('RGB')
+        img.save(buffered, format=img_format)
+        img_str = base64.b64encode(buffered.getvalue()).decode()
+        return {'type': 'image', 'source': {'type': 'base64', 'media_type': mime_type, 'data': img_str}}
+    except Exception as e: return f"Erreur lors du traitement de l'image {filename}: {str(e)}"
+
+
+# =========================================================================
+# CACHE DISQUE
+# =========================================================================
+
+def content_key(filename: str, data: bytes) -> str:
+    """Clé du cache : empreinte du contenu, extension (le lecteur en dépend) et version des extracteurs"""
+    file_ext = os.path.splitext(filename)[1].lower().lstrip('.') or 'sans-ext'
+    return f"{hashlib.sha256(data).hexdigest()}-{file_ext}-v{EXTRACTOR_VERSION}"
+
+
+def _default_cache_dir() -> str:
+    if os.environ.get('EXTRACTION_CACHE_DIR'):
+        return os.environ['EXTRACTION_CACHE_DIR']
+    data_path = os.environ.get('DATA_PATH')
+    if data_path and os.path.exists(data_path):
+        return os.path.join(data_path, 'extraction_cache')
+    return os.path.join(tempfile.gettempdir(), 'erp_extraction_cache')
+
+
+class ExtractionCache:
+    """Contenus extraits sur disque (<clé>.txt ou <clé>.json pour les images), bornés à max_bytes"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory or _default_cache_dir()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'pruned': 0}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def get(self, key: str) -> Optional[Union[str, Dict[str, Any]]]:
+        for suffix in ('.txt', '.json'):
+            path = self._path(key, suffix)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read() if suffix == '.txt' else json.load(f)
+                os.utime(path)  # plus récemment lu : supprimé en dernier
+            except (OSError, ValueError):
+                continue
+            with self._lock:
+                self._stats['hits'] += 1
+            return content
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, key: str, content: Union[str, Dict[str, Any]]) -> None:
+        if is_extraction_error(content) or not isinstance(content, (str, dict)):
+            return
+        path = self._path(key, '.txt' if isinstance(content, str) else '.json')
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                if isinstance(content, str):
+                    f.write(content)
+                else:
+                    json.dump(content, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Cache d'extraction : écriture impossible ({e})")
+            return
+        with self._lock:
+            self._stats['stores'] += 1
+        self.prune()
+
+    def prune(self) -> None:
+        """Supprime les entrées les moins récemment lues au-delà de max_bytes"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.is_file() and not entry.name.endswith('.tmp')]
+        except OSError:
+            return
+        total = sum(entry.stat().st_size for entry in entries)
+        if total <= self.max_bytes:
+            return
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+                with self._lock:
+                    self._stats['pruned'] += 1
+            except OSError:
+                continue
+
+    def clear(self) -> None:
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                os.remove(entry.path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+_cache: Optional[ExtractionCache] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_shared_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Cache disque partagé (EXTRACTION_CACHE_DIR, DATA_PATH/extraction_cache ou répertoire temporaire)"""
+    global _cache
+    with _shared_lock:
+        if _cache is None:
+            _cache = ExtractionCache()
+        return _cache
+
+
+# =========================================================================
+# EXTRACTION PARALLÈLE
+# =========================================================================
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Pool partagé de MAX_WORKERS processus, jamais redimensionné (les autres sessions
+    s'en servent) ; 'spawn' plutôt que fork, le serveur Streamlit ayant des threads
+    """
+    global _pool
+    with _shared_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _shared_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool = None
+
+
+def _plan_tasks(pending: Sequence[Tuple[int, str, bytes]], workers: int) -> List[Tuple[int, Any, tuple]]:
+    """Tâches (index du fichier, fonction, arguments) : un PDF long en tranches de pages, le reste entier"""
+    tasks = []
+    for index, filename, data in pending:
+        nb_pages = _pdf_page_count(data) if filename.lower().endswith('.pdf') and workers > 1 else None
+        if nb_pages and nb_pages >= 2 * PDF_MIN_PAGES_PER_TASK:
+            # Une tranche par processus au plus : les octets du PDF sont copiés pour chaque tranche
+            step = max(PDF_MIN_PAGES_PER_TASK, math.ceil(nb_pages / workers))
+            for start in range(0, nb_pages, step):
+                tasks.append((index, _pdf_pages_text, (data, start, min(nb_pages, start + step))))
+        else:
+            tasks.append((index, extract_file, (filename, data)))
+    return tasks
+
+
+def _run_tasks(tasks: Sequence[Tuple[int, Any, tuple]], workers: int) -> List[Any]:
+    """Résultats dans l'ordre des tâches ; au plus `workers` tâches de cet appel à la fois dans le pool"""
+    if workers > 1:
+        try:
+            pool = _get_pool()
+            outputs: List[Any] = [None] * len(tasks)
+            in_flight: Dict[Any, int] = {}
+            next_task = 0
+            while next_task < len(tasks) or in_flight:
+                while next_task < len(tasks) and len(in_flight) < workers:
+                    _, function, args = tasks[next_task]
+                    in_flight[pool.submit(function, *args)] = next_task
+                    next_task += 1
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    outputs[in_flight.pop(future)] = _task_result(future.result)
+            return outputs
+        except (BrokenProcessPool, OSError, pickle.PicklingError) as e:
+            logger.warning(f"⚠️ Extraction : pool de processus indisponible ({e}), extraction séquentielle")
+            shutdown_pool()
+        except RuntimeError as e:
+            # Pool arrêté par une autre session (« cannot schedule new futures after shutdown »)
+            logger.warning(f"⚠️ Extraction : pool de processus arrêté ({e}), extraction séquentielle")
+    return [_task_result(lambda: function(*args)) for _, function, args in tasks]
+
+
+def _task_result(call) -> Any:
+    try:
+        return call()
+    except (BrokenProcessPool, OSError, pickle.PicklingError):
+        raise
+    except Exception as e:
+        return e
+
+
+def extract_documents(files: Sequence[Tuple[str, bytes]], cache: Optional[ExtractionCache] = None,
+                      use_cache: bool = True, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Extrait les fichiers (nom, octets) ; rend, dans l'ordre,
+    [{'filename', 'content' (texte, bloc image ou message d'erreur), 'cached', 'ms'}].
+    """
+    started = time.perf_counter()
+    if use_cache and cache is None:
+        cache = get_extraction_cache()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(files)
+    keys: Dict[int, str] = {}
+    pending = []
+    for index, (filename, data) in enumerate(files):
+        if use_cache:
+            keys[index] = content_key(filename, data)
+            content = cache.get(keys[index])
+            if content is not None:
+                results[index] = {'filename': filename, 'content': content, 'cached': True, 'ms': 0.0}
+                continue
+        pending.append((index, filename, data))
+
+    if pending:
+        workers = max(1, max_workers or MAX_WORKERS)
+        tasks = _plan_tasks(pending, workers)
+        workers = min(workers, len(tasks))
+        outputs = _run_tasks(tasks, workers)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        # Tranches de pages d'un même PDF : rassemblées dans l'ordre
+        slices: Dict[int, List[Any]] = {}
+        for (index, function, _), output in zip(tasks, outputs):
+            if function is _pdf_pages_text:
+                slices.setdefault(index, []).append(output)
+                continue
+            if isinstance(output, Exception):
+                output = f"Erreur générale lors de la lecture du fichier {files[index][0]}: {str(output)}"
+            results[index] = {'filename': files[index][0], 'content': output, 'cached': False, 'ms': elapsed_ms}
+        for index, outputs_pdf in slices.items():
+            filename = files[index][0]
+            errors = [output for output in outputs_pdf if isinstance(output, Exception)]
+            content = (f"Erreur lors de la lecture du PDF {filename}: {str(errors[0])}" if errors
+                       else _join_pdf_pages([page for output in outputs_pdf for page in output], filename))
+            results[index] = {'filename': filename, 'content': content, 'cached': False, 'ms': elapsed_ms}
+        if use_cache:
+            for index, _, _ in pending:
+                cache.put(keys[index], results[index]['content'])
+        logger.info(f"📄 Extraction : {len(pending)} fichier(s) en {len(tasks)} tâche(s) sur {workers} "
+                    f"processus, {len(files) - len(pending)} en cache, {elapsed_ms} ms")
+    return results
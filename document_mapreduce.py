@@ -0,0 +1,247 @@
+# document_mapreduce.py - Analyse map-reduce des documents trop volumineux pour un seul appel à Claude
+"""
+Analyse des gros documents par extraits.
+
+ExpertAdvisor.analyze_documents mettait le texte complet de tous les
+fichiers dans un seul message : un gros devis descriptif dépassait la
+fenêtre de contexte ou était tronqué sans prévenir. Ici, au-delà de
+CONTEXT_BUDGET_TOKENS :
+- split_document() découpe chaque texte sur ses frontières structurelles
+  (titres, articles, sections numérotées, sauts de page, puis paragraphes,
+  puis lignes ; coupe brute en dernier recours) et regroupe les morceaux en
+  extraits d'au plus chunk_tokens ;
+- la taille des extraits grandit avec le document (jusqu'à MAX_CHUNK_TOKENS)
+  pour tenir en MAX_MAP_ROUNDS vagues d'appels : la durée reste bornée
+  quand le document grossit ;
+- map : chaque extrait est analysé par Claude, au plus max_concurrency
+  appels simultanés ; un extrait en erreur est signalé, les autres servent ;
+- reduce : les analyses partielles sont fusionnées en une analyse finale
+  (avec les images), en passant par des synthèses intermédiaires si elles
+  dépassent elles-mêmes REDUCE_INPUT_TOKENS ;
+- l'usage (tokens en entrée et en sortie, durée) est rendu par extrait et
+  par étape de réduction.
+"""
+
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from cache_config import estimate_tokens
+from llm_gateway import bind_caller
+
+logger = logging.getLogger(__name__)
+
+# Au-delà, le texte ne part plus d'un bloc (fenêtre de 200k moins consignes, historique et réponse)
+CONTEXT_BUDGET_TOKENS = 150_000
+CHUNK_TOKENS = 12_000
+MAX_CHUNK_TOKENS = 60_000
+MAX_CONCURRENCY = int(os.environ.get('ANALYSIS_MAX_CONCURRENCY', '4'))
+# Vagues d'appels map visées : les extraits grossissent plutôt que de se multiplier
+MAX_MAP_ROUNDS = 2
+MAP_MAX_TOKENS = 1200
+REDUCE_INPUT_TOKENS = 60_000
+REDUCE_MAX_TOKENS = 4000
+
+STATUT_OK = 'ok'
+STATUT_ERREUR = 'erreur'
+
+# Même approximation que cache_config.estimate_tokens
+CHARS_PER_TOKEN = 4
+
+# Frontières, de la plus structurante à la plus fine (découpes sans perte : ''.join(morceaux) == texte) ;
+# un morceau n'est redécoupé au niveau suivant que s'il dépasse la taille d'un extrait
+_TITRE = re.compile(r'(?m)^(?=[ \t]*(?:#{1,6}[ \t]|(?:ARTICLE|SECTION|CHAPITRE|PARTIE|ANNEXE|DIVISION)\b)|\f)')
+_NUMERO = re.compile(r'(?m)^(?=[ \t]*\d{1,2}(?:\.\d{1,3})*[.)]?[ \t]+[A-ZÉÈÀÂÊÎÔÛÇ])')
+_PARAGRAPHE = re.compile(r'(?<=\n\n)')
+_LIGNE = re.compile(r'(?<=\n)')
+_BOUNDARIES = (_TITRE, _NUMERO, _PARAGRAPHE, _LIGNE)
+
+
+# =========================================================================
+# DÉCOUPAGE
+# =========================================================================
+
+def _pieces(text: str, max_chars: int, level: int = 0) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_BOUNDARIES):
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    parts = [part for part in _BOUNDARIES[level].split(text) if part]
+    return [piece for part in parts for piece in _pieces(part, max_chars, level + 1)]
+
+
+def split_document(text: str, chunk_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Extraits consécutifs d'au plus chunk_tokens, coupés aux frontières les plus structurantes possibles"""
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks: List[str] = []
+    current: List[str] = []
+    current_chars = 0
+    for piece in _pieces(text, max_chars):
+        if current and current_chars + len(piece) > max_chars:
+            chunks.append(''.join(current))
+            current, current_chars = [], 0
+        current.append(piece)
+        current_chars += len(piece)
+    if current:
+        chunks.append(''.join(current))
+    return chunks
+
+
+def needs_chunking(documents: Sequence[Tuple[str, str]], budget: int = CONTEXT_BUDGET_TOKENS) -> bool:
+    return sum(estimate_tokens(texte) for _, texte in documents) > budget
+
+
+def plan_chunks(documents: Sequence[Tuple[str, str]], chunk_tokens: int = CHUNK_TOKENS,
+                max_concurrency: int = MAX_CONCURRENCY) -> List[Dict[str, Any]]:
+    """Extraits de tous les documents ; taille adaptée pour tenir en MAX_MAP_ROUNDS vagues d'appels"""
+    total = sum(estimate_tokens(texte) for _, texte in documents)
+    target = math.ceil(total / max(1, max_concurrency * MAX_MAP_ROUNDS))
+    size = min(MAX_CHUNK_TOKENS, max(chunk_tokens, target))
+    extraits = []
+    for fichier, texte in documents:
+        morceaux = split_document(texte, size)
+        for index, morceau in enumerate(morceaux, start=1):
+            extraits.append({'fichier': fichier, 'index': index, 'total': len(morceaux), 'texte': morceau,
+                             'tokens_estimes': estimate_tokens(morceau)})
+    return extraits
+
+
+# =========================================================================
+# MAP / REDUCE
+# =========================================================================
+
+def _call(client, model: str, system: str, content: Any, max_tokens: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    response = client.messages.create(model=model, max_tokens=max_tokens, system=system,
+                                      messages=[{'role': 'user', 'content': content}])
+    usage = getattr(response, 'usage', None)
+    texte = response.content[0].text if response.content else ''
+    return {'texte': texte or '', 'input_tokens': getattr(usage, 'input_tokens', None),
+            'output_tokens': getattr(usage, 'output_tokens', None),
+            'ms': round((time.perf_counter() - t0) * 1000, 1)}
+
+
+def _map_prompt(extrait: Dict[str, Any], instruction: str) -> str:
+    return (f"Voici l'extrait {extrait['index']}/{extrait['total']} du document « {extrait['fichier']} ». "
+            "Relevez de façon concise et factuelle les informations utiles à l'analyse demandée ci-dessous "
+            "(exigences techniques, matériaux, dimensions, quantités, délais, montants, risques, points à "
+            "clarifier), en citant les numéros de section. Ce n'est qu'un extrait : ne concluez pas sur "
+            f"l'ensemble et n'inventez rien.\n\nAnalyse demandée :\n{instruction}\n\n"
+            f"=== EXTRAIT ===\n{extrait['texte']}\n=== FIN DE L'EXTRAIT ===")
+
+
+def _partial_block(extrait: Dict[str, Any]) -> str:
+    return f"### {extrait['fichier']} — extrait {extrait['index']}/{extrait['total']}\n{extrait['analyse']}"
+
+
+def _batches(blocs: Sequence[str], max_tokens: int) -> List[List[str]]:
+    batches: List[List[str]] = [[]]
+    tokens = 0
+    for bloc in blocs:
+        bloc_tokens = estimate_tokens(bloc)
+        if batches[-1] and tokens + bloc_tokens > max_tokens:
+            batches.append([])
+            tokens = 0
+        batches[-1].append(bloc)
+        tokens += bloc_tokens
+    return batches
+
+
+def analyze_in_chunks(client, model: str, system: str, documents: Sequence[Tuple[str, str]], instruction: str,
+                      images: Sequence[Dict[str, Any]] = (), max_concurrency: int = MAX_CONCURRENCY,
+                      chunk_tokens: int = CHUNK_TOKENS, map_max_tokens: int = MAP_MAX_TOKENS,
+                      reduce_input_tokens: int = REDUCE_INPUT_TOKENS,
+                      reduce_max_tokens: int = REDUCE_MAX_TOKENS) -> Dict[str, Any]:
+    """
+    Analyse map-reduce de documents (nom, texte). Rend {'analyse',
+    'extraits': [{'fichier', 'index', 'total', 'tokens_estimes', 'statut',
+    'input_tokens', 'output_tokens', 'ms', 'erreur'}], 'reductions': [...],
+    'usage': {'input_tokens', 'output_tokens'}, 'partiel', 'duree_ms'}.
+    Les erreurs de l'appel final (ou de tous les extraits) sont levées.
+    """
+    started = time.perf_counter()
+    client = bind_caller(client)  # appels des threads attribués à l'appelant
+    extraits = plan_chunks(documents, chunk_tokens, max_concurrency)
+    workers = max(1, min(max_concurrency, len(extraits)))
+
+    def analyser(extrait):
+        try:
+            resultat = _call(client, model, system, _map_prompt(extrait, instruction), map_max_tokens)
+            return dict(resultat, statut=STATUT_OK, erreur=None)
+        except Exception as e:
+            logger.error(f"❌ Analyse par extraits : {extrait['fichier']} {extrait['index']}/{extrait['total']} : {e}")
+            return {'texte': '', 'statut': STATUT_ERREUR, 'erreur': e, 'input_tokens': None,
+                    'output_tokens': None, 'ms': None}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analyse_extraits') as pool:
+        resultats = list(pool.map(analyser, extraits))
+    for extrait, resultat in zip(extraits, resultats):
+        extrait['analyse'] = resultat.pop('texte')
+        extrait.update(resultat)
+    reussis = [e for e in extraits if e['statut'] == STATUT_OK]
+    if not reussis:
+        raise extraits[0]['erreur']
+
+    # Réduction : synthèses intermédiaires tant que les analyses partielles dépassent le budget
+    reductions: List[Dict[str, Any]] = []
+    blocs = [_partial_block(e) for e in reussis]
+    etape = 0
+    while len(blocs) > 1 and estimate_tokens('\n\n'.join(blocs)) > reduce_input_tokens:
+        etape += 1
+        lots = _batches(blocs, reduce_input_tokens)
+        if len(lots) == len(blocs):
+            break  # chaque bloc dépasse déjà le budget : fusion finale directe
+        prompts = [("Fusionnez ces analyses partielles consécutives en une synthèse fidèle et concise, sans "
+                    f"perdre les exigences, chiffres et points à clarifier :\n\n" + '\n\n'.join(lot)) for lot in lots]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(lots))),
+                                thread_name_prefix='analyse_extraits') as pool:
+            syntheses = list(pool.map(lambda prompt: _call(client, model, system, prompt, map_max_tokens), prompts))
+        for i, synthese in enumerate(syntheses, start=1):
+            reductions.append({'etape': etape, 'lot': i, 'input_tokens': synthese['input_tokens'],
+                               'output_tokens': synthese['output_tokens'], 'ms': synthese['ms']})
+        blocs = [f"### Synthèse {etape}.{i}\n{s['texte']}" for i, s in enumerate(syntheses, start=1)]
+
+    manquants = [f"{e['fichier']} {e['index']}/{e['total']}" for e in extraits if e['statut'] != STATUT_OK]
+    avertissement = (f"\n\nATTENTION : les extraits suivants n'ont pas pu être analysés : {', '.join(manquants)}. "
+                     "Signalez-le dans votre réponse.") if manquants else ''
+    fichiers = list(dict.fromkeys(fichier for fichier, _ in documents))
+    contenu = list(images) + [{'type': 'text', 'text': (
+        f"Les documents ({', '.join(fichiers)}) étaient trop volumineux pour être lus d'un bloc : ils ont été "
+        f"découpés en {len(extraits)} extraits, analysés séparément. Voici ces analyses partielles, dans "
+        f"l'ordre du texte :\n\n" + '\n\n'.join(blocs) + avertissement +
+        f"\n\nEn vous appuyant uniquement sur ces analyses partielles, répondez à la demande suivante :\n{instruction}")}]
+    final = _call(client, model, system, contenu, reduce_max_tokens)
+    reductions.append({'etape': 'finale', 'lot': 1, 'input_tokens': final['input_tokens'],
+                       'output_tokens': final['output_tokens'], 'ms': final['ms']})
+
+    usages = [e for e in extraits if e['statut'] == STATUT_OK] + reductions
+    usage = {cle: sum(u[cle] or 0 for u in usages) for cle in ('input_tokens', 'output_tokens')}
+    duree_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"🧩 Analyse par extraits : {len(extraits)} extraits ({len(manquants)} en erreur), "
+                f"{len(reductions)} réduction(s), {usage['input_tokens']} tokens en entrée, "
+                f"{usage['output_tokens']} en sortie, {duree_ms} ms")
+    for extrait in extraits:
+        del extrait['texte']
+        extrait['erreur'] = str(extrait['erreur']) if extrait['erreur'] else None
+    return {'analyse': final['texte'], 'extraits': extraits, 'reductions': reductions, 'usage': usage,
+            'partiel': bool(manquants), 'duree_ms': duree_ms}
+
+
+def usage_report(resultat: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Lignes (libellé, détail) par extrait et par réduction, au format des résultats d'analyse_documents"""
+    lignes = []
+    for e in resultat['extraits']:
+        libelle = f"Extrait {e['fichier']} {e['index']}/{e['total']}"
+        if e['statut'] == STATUT_OK:
+            lignes.append((libelle, f"Succès — {e['input_tokens']} tokens en entrée, {e['output_tokens']} en sortie, "
+                                    f"{e['ms'] / 1000:.1f} s"))
+        else:
+            lignes.append((libelle, f"Erreur — {e['erreur']}"))
+    for r in resultat['reductions']:
+        lignes.append((f"Réduction {r['etape']}" + (f".{r['lot']}" if r['etape'] != 'finale' else ''),
+                       f"{r['input_tokens']} tokens en entrée, {r['output_tokens']} en sortie, {r['ms'] / 1000:.1f} s"))
+    return lignes
@@ -0,0 +1,1158 @@
+# document_templates.py - Gabarits HTML compilés et cache de rendu des documents commerciaux
+"""
+Rendu HTML des devis (devis.py), demandes de prix et bons d'achat (fournisseurs.py).
+
+Les anciens gabarits reconstruisaient à chaque export une f-string de plusieurs
+centaines de lignes, CSS compris. Ici :
+- les gabarits sont découpés une seule fois (à l'import) en segments littéraux
+  et champs nommés ; le rendu n'est plus qu'une concaténation ;
+- la feuille de style est commune aux trois documents, seules les variables de
+  thème changent (bleu pour les devis, vert pour les achats) ;
+- le HTML rendu est gardé en cache par (base, type, id) avec la version du
+  document (updated_at, lignes, client/fournisseur) : un aperçu répété ou un
+  export en lot ne relit qu'une requête de versions tant que rien n'a changé,
+  et deux bases ouvertes dans le même processus ne partagent pas leurs rendus ;
+- render_documents() rend une liste de documents en une passe : versions en une
+  requête, chargement groupé des seuls documents absents du cache.
+"""
+
+import logging
+import os
+import string
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximum de documents rendus gardés en mémoire
+DOCUMENT_CACHE_MAX_ENTRIES = 500
+# Limite SQLite des paramètres par requête (IN (...))
+_SQL_CHUNK_SIZE = 500
+
+
+class CompiledTemplate:
+    """Gabarit découpé une seule fois en segments littéraux et champs nommés"""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self._segments: List[Tuple[str, Optional[str]]] = []
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(source):
+            if field_name is not None and (format_spec or conversion or not field_name.isidentifier()):
+                raise ValueError(f"Gabarit {name}: champ non supporté {{{field_name}}}")
+            self._segments.append((literal, field_name))
+        self.fields = frozenset(f for _, f in self._segments if f)
+
+    def render(self, context: Dict[str, Any]) -> str:
+        parts = []
+        for literal, field_name in self._segments:
+            parts.append(literal)
+            if field_name:
+                parts.append(str(context[field_name]))
+        return ''.join(parts)
+
+
+# =========================================================================
+# FEUILLE DE STYLE COMMUNE
+# =========================================================================
+
+DOCUMENT_THEMES = {
+    'devis': {
+        'primary-color': '#3B82F6',
+        'primary-color-darker': '#2563EB',
+        'primary-color-darkest': '#1D4ED8',
+        'primary-color-lighter': '#DBEAFE',
+        'background-color': '#FAFBFF',
+    },
+    'achats': {
+        'primary-color': '#00A971',
+        'primary-color-darker': '#00673D',
+        'primary-color-darkest': '#004C2E',
+        'primary-color-lighter': '#DCFCE7',
+        'background-color': '#F9FAFB',
+    },
+}
+
+DOCUMENT_BASE_CSS = """\
+* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+}
+
+body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    line-height: 1.6;
+    color: var(--text-color);
+    background-color: var(--background-color);
+    margin: 0;
+    padding: 15px;
+}
+
+.container {
+    max-width: 8.5in;
+    margin: 0 auto;
+    background-color: white;
+    border-radius: 12px;
+    box-shadow: var(--box-shadow-md);
+    overflow: hidden;
+    width: 100%;
+}
+
+.header {
+    background: linear-gradient(135deg, var(--primary-color) 0%, var(--primary-color-darker) 100%);
+    color: white;
+    padding: 30px;
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+}
+
+.logo-container {
+    display: flex;
+    align-items: center;
+    gap: 20px;
+}
+
+.logo-box {
+    background-color: white;
+    width: 70px;
+    height: 45px;
+    border-radius: 8px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    box-shadow: 0 2px 8px rgba(0, 0, 0, 0.2);
+}
+
+.logo-text {
+    font-family: 'Segoe UI', sans-serif;
+    font-weight: 800;
+    font-size: 24px;
+    color: var(--primary-color);
+    letter-spacing: 1px;
+}
+
+.company-info {
+    text-align: left;
+}
+
+.company-name {
+    font-weight: 700;
+    font-size: 28px;
+    margin-bottom: 5px;
+    text-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
+}
+
+.company-subtitle {
+    font-size: 16px;
+    opacity: 0.9;
+}
+
+.contact-info {
+    text-align: right;
+    font-size: 14px;
+    line-height: 1.4;
+    opacity: 0.95;
+}
+
+.document-title {
+    background: var(--primary-color-lighter);
+    padding: 20px 30px;
+    border-left: 5px solid var(--primary-color);
+}
+
+.document-title h1 {
+    color: var(--primary-color-darker);
+    font-size: 24px;
+    margin-bottom: 10px;
+}
+
+.document-meta {
+    display: flex;
+    justify-content: space-between;
+    color: var(--text-color-light);
+    font-size: 14px;
+}
+
+.content {
+    padding: 25px;
+}
+
+.section {
+    margin-bottom: 30px;
+}
+
+.section-title {
+    color: var(--primary-color-darker);
+    font-size: 18px;
+    font-weight: 600;
+    margin-bottom: 15px;
+    padding-bottom: 8px;
+    border-bottom: 2px solid var(--primary-color-lighter);
+    display: flex;
+    align-items: center;
+    gap: 10px;
+}
+
+.info-grid {
+    display: grid;
+    grid-template-columns: 1fr 1fr 1fr;
+    gap: 15px;
+    margin-bottom: 20px;
+}
+
+.info-item {
+    background: var(--background-color);
+    padding: 15px;
+    border-radius: var(--border-radius-md);
+    border-left: 3px solid var(--primary-color);
+}
+
+.info-label {
+    font-weight: 600;
+    color: var(--text-color-light);
+    font-size: 12px;
+    text-transform: uppercase;
+    letter-spacing: 0.5px;
+    margin-bottom: 5px;
+}
+
+.info-value {
+    font-size: 16px;
+    color: var(--text-color);
+    font-weight: 500;
+}
+
+.table {
+    width: 100%;
+    border-collapse: collapse;
+    margin: 15px 0;
+    border-radius: var(--border-radius-md);
+    overflow: hidden;
+    box-shadow: var(--box-shadow-md);
+}
+
+.table th {
+    background: var(--primary-color);
+    color: white;
+    padding: 12px;
+    text-align: left;
+    font-weight: 600;
+    font-size: 14px;
+}
+
+.table td {
+    padding: 12px;
+    border-bottom: 1px solid var(--border-color);
+    vertical-align: top;
+}
+
+.table tr:nth-child(even) {
+    background-color: var(--background-color);
+}
+
+.table tr:hover {
+    background-color: var(--primary-color-lighter);
+}
+
+.badge {
+    padding: 4px 12px;
+    border-radius: 20px;
+    font-size: 11px;
+    font-weight: 600;
+    text-transform: uppercase;
+    letter-spacing: 0.5px;
+    display: inline-block;
+}
+
+.badge-pending { background: #fef3c7; color: #92400e; }
+.badge-in-progress { background: #dbeafe; color: #1e40af; }
+.badge-completed { background: #d1fae5; color: #065f46; }
+.badge-on-hold { background: #fee2e2; color: #991b1b; }
+
+.summary-box {
+    background: linear-gradient(45deg, var(--primary-color-lighter), white);
+    border: 2px solid var(--primary-color);
+    border-radius: var(--border-radius-md);
+    padding: 20px;
+    margin: 20px 0;
+}
+
+.summary-grid {
+    display: grid;
+    grid-template-columns: repeat(var(--summary-columns), 1fr);
+    gap: 15px;
+}
+
+.summary-item {
+    text-align: center;
+    background: white;
+    padding: 15px;
+    border-radius: var(--border-radius-md);
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+}
+
+.summary-number {
+    font-size: 24px;
+    font-weight: 700;
+    color: var(--primary-color-darker);
+    display: block;
+}
+
+.summary-label {
+    font-size: 12px;
+    color: var(--text-color-light);
+    text-transform: uppercase;
+    font-weight: 600;
+    letter-spacing: 0.5px;
+}
+
+.totals-box {
+    background: var(--primary-color-darkest);
+    color: white;
+    padding: 20px;
+    border-radius: var(--border-radius-md);
+    margin: 20px 0;
+}
+
+.totals-grid {
+    display: grid;
+    grid-template-columns: repeat(3, 1fr);
+    gap: 15px;
+}
+
+.total-item {
+    text-align: center;
+    background: rgba(255, 255, 255, 0.1);
+    padding: 15px;
+    border-radius: var(--border-radius-md);
+}
+
+.total-amount {
+    font-size: 22px;
+    font-weight: 700;
+    display: block;
+    margin-bottom: 5px;
+}
+
+.total-label {
+    font-size: 12px;
+    opacity: 0.9;
+    text-transform: uppercase;
+    font-weight: 600;
+    letter-spacing: 0.5px;
+}
+
+.instructions-box {
+    background: var(--background-color);
+    border-left: 4px solid var(--primary-color);
+    padding: 20px;
+    border-radius: 0 var(--border-radius-md) var(--border-radius-md) 0;
+    margin: 15px 0;
+}
+
+.footer {
+    background: var(--primary-color-darkest);
+    color: white;
+    padding: 20px 30px;
+    text-align: center;
+    font-size: 12px;
+    line-height: 1.4;
+}
+
+.client-address {
+    background: var(--background-color);
+    border: 2px solid var(--primary-color-lighter);
+    border-radius: var(--border-radius-md);
+    padding: 15px;
+    margin: 15px 0;
+    font-size: 14px;
+    line-height: 1.4;
+}
+
+@media print {
+    body { 
+        margin: 0; 
+        padding: 0; 
+    }
+    .container { 
+        box-shadow: none; 
+        max-width: 100%;
+        width: 8.5in;
+    }
+    .table { 
+        break-inside: avoid; 
+        font-size: 12px;
+    }
+    .section { 
+        break-inside: avoid-page; 
+    }
+    .header {
+        padding: 20px 25px;
+    }
+    .content {
+        padding: 20px;
+    }
+    @page {
+        size: letter;
+        margin: 0.5in;
+    }
+}
+
+@media screen and (max-width: 768px) {
+    .container {
+        max-width: 100%;
+        margin: 0 10px;
+    }
+    .info-grid {
+        grid-template-columns: 1fr;
+        gap: 10px;
+    }
+    .summary-grid, .totals-grid {
+        grid-template-columns: repeat(2, 1fr);
+    }
+    .header {
+        flex-direction: column;
+        text-align: center;
+        gap: 15px;
+    }
+    .contact-info {
+        text-align: center;
+    }
+}
+"""
+
+
+@lru_cache(maxsize=None)
+def document_css(theme: str, summary_columns: int = 3) -> str:
+    """Feuille de style d'un document : variables du thème + règles communes"""
+    variables = dict(DOCUMENT_THEMES[theme])
+    variables.update({
+        'secondary-background-color': '#FFFFFF',
+        'text-color': '#374151',
+        'text-color-light': '#6B7280',
+        'border-color': '#E5E7EB',
+        'border-radius-md': '0.5rem',
+        'box-shadow-md': '0 4px 6px -1px rgb(0 0 0 / 0.1)',
+        'summary-columns': str(summary_columns),
+    })
+    root = '\n'.join(f"    --{nom}: {valeur};" for nom, valeur in variables.items())
+    return f":root {{\n{root}\n}}\n\n{DOCUMENT_BASE_CSS}"
+
+
+# =========================================================================
+# GABARITS
+# =========================================================================
+
+_PAGE_HEAD = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{titre}</title>
+    <style>
+{css}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <!-- En-tête -->
+        <div class="header">
+            <div class="logo-container">
+                <div class="logo-box">
+                    <div class="logo-text">{logo}</div>
+                </div>
+                <div class="company-info">
+                    <div class="company-name">{entreprise}</div>
+                    <div class="company-subtitle">Construction résidentiel et commercial</div>
+                </div>
+            </div>
+            <div class="contact-info">
+                {entreprise_coordonnees}
+            </div>
+        </div>
+"""
+
+_PAGE_TAIL = """
+    </div>
+</body>
+</html>
+"""
+
+_INFO_ITEM = """
+                    <div class="info-item">
+                        <div class="info-label">{label}</div>
+                        <div class="info-value">{value}</div>
+                    </div>"""
+
+_BADGE = """
+                            <span class="badge {classe}">
+                                {valeur}
+                            </span>
+                        """
+
+DEVIS_TEMPLATE = CompiledTemplate('devis', _PAGE_HEAD + """
+        <!-- Titre du document -->
+        <div class="document-title">
+            <h1>💰 DEVIS COMMERCIAL</h1>
+            <div class="document-meta">
+                <span><strong>N° Devis:</strong> {numero_document}</span>
+                <span><strong>Généré le:</strong> {date_generation}</span>
+            </div>
+        </div>
+
+        <!-- Contenu principal -->
+        <div class="content">
+            <!-- Informations générales -->
+            <div class="section">
+                <h2 class="section-title">📋 Informations du Devis</h2>
+                <div class="info-grid">{info_items}
+                </div>
+            </div>
+
+            <!-- Adresse du client -->
+            <div class="section">
+                <h2 class="section-title">📍 Adresse de Facturation</h2>
+                <div class="client-address">
+                    {adresse_client}
+                </div>
+            </div>
+
+            <!-- Résumé -->
+            <div class="summary-box">
+                <h3 style="color: var(--primary-color-darker); margin-bottom: 15px; text-align: center;">📋 Résumé du Devis</h3>
+                <div class="summary-grid">
+                    <div class="summary-item">
+                        <span class="summary-number">{nb_lignes}</span>
+                        <span class="summary-label">Articles</span>
+                    </div>
+                    <div class="summary-item">
+                        <span class="summary-number">{priorite}</span>
+                        <span class="summary-label">Priorité</span>
+                    </div>
+                    <div class="summary-item">
+                        <span class="summary-number">{date_echeance}</span>
+                        <span class="summary-label">Échéance</span>
+                    </div>
+                </div>
+            </div>
+
+            <!-- Détail des articles -->
+            <div class="section">
+                <h2 class="section-title">📝 Détail des Prestations</h2>
+                <table class="table">
+                    <thead>
+                        <tr>
+                            <th>Description</th>
+                            <th style="text-align: center;">Quantité</th>
+                            <th style="text-align: center;">Unité</th>
+                            <th style="text-align: center;">Prix Unit.</th>
+                            <th style="text-align: center;">Montant</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {lignes_html}
+                    </tbody>
+                </table>
+            </div>
+
+            <!-- Totaux -->
+            <div class="totals-box">
+                <h3 style="text-align: center; margin-bottom: 15px;">💰 Récapitulatif Financier</h3>
+                <div class="totals-grid">
+                    <div class="total-item">
+                        <span class="total-amount">{total_ht}</span>
+                        <span class="total-label">Sous-total HT</span>
+                    </div>
+                    <div class="total-item">
+                        <span class="total-amount">{montant_tva}</span>
+                        <span class="total-label">TVA ({taux_tva})</span>
+                    </div>
+                    <div class="total-item">
+                        <span class="total-amount">{total_ttc}</span>
+                        <span class="total-label">Total TTC</span>
+                    </div>
+                </div>
+            </div>
+
+            <!-- Notes du devis -->
+            {notes_section}
+
+            <!-- Instructions -->
+            <div class="instructions-box">
+                <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">📋 Conditions Générales</h4>
+                <p><strong>• Validité :</strong> Ce devis est valable 30 jours à compter de la date d'émission</p>
+                <p><strong>• Paiement :</strong> Net 30 jours sur réception de facture</p>
+                <p><strong>• Délais :</strong> Les délais de livraison seront confirmés lors de l'acceptation</p>
+                <p><strong>• Acceptation :</strong> Ce devis engage nos services uniquement après acceptation écrite</p>
+                <p><strong>• Contact :</strong> Pour toute question : (514) 820-1972</p>
+            </div>
+
+        </div>
+
+        <!-- Pied de page -->
+        <div class="footer">
+            <div><strong>🏗️ Constructo AI</strong> - Devis Commercial</div>
+            <div>Document généré automatiquement le {date_generation}</div>
+            <div>📞 (514) 820-1972 | 📧 info@constructo-ai.com | 🌐 www.constructo-ai.com</div>
+            <div style="margin-top: 10px; font-size: 11px; opacity: 0.8;">
+                Merci de mentionner le numéro de devis {numero_document} dans votre réponse.
+            </div>
+        </div>""" + _PAGE_TAIL)
+
+DEVIS_LIGNE_TEMPLATE = CompiledTemplate('devis_ligne', """
+                        <tr>
+                            <td><strong>{description}</strong>{code_display}</td>
+                            <td style="text-align: center;">{quantite}</td>
+                            <td style="text-align: center;">{unite}</td>
+                            <td style="text-align: right;">{prix_unitaire}</td>
+                            <td style="text-align: right;"><strong>{montant}</strong></td>
+                        </tr>""")
+
+# Titre, résumé, tableau et conditions des deux documents d'achat
+_ACHAT_TEMPLATE = _PAGE_HEAD + """
+        <!-- Titre du document -->
+        <div class="document-title">
+            <h1>{titre_document}</h1>
+            <div class="document-meta">
+                <span><strong>{libelle_numero}</strong> {numero_document}</span>
+                <span><strong>Généré le:</strong> {date_generation}</span>
+            </div>
+        </div>
+
+        <!-- Contenu principal -->
+        <div class="content">
+            <!-- Informations générales -->
+            <div class="section">
+                <h2 class="section-title">{titre_informations}</h2>
+                <div class="info-grid">{info_items}
+                </div>
+            </div>
+
+            <!-- Adresse du fournisseur -->
+            <div class="section">
+                <h2 class="section-title">📍 Fournisseur</h2>
+                <div class="client-address">
+                    {adresse_fournisseur}
+                </div>
+            </div>
+
+            <!-- Résumé -->
+            <div class="summary-box">
+                <h3 style="color: var(--primary-color-darker); margin-bottom: 15px; text-align: center;">{titre_resume}</h3>
+                <div class="summary-grid">{summary_items}
+                </div>
+            </div>
+
+            <!-- Détail des articles -->
+            <div class="section">
+                <h2 class="section-title">{titre_articles}</h2>
+                <table class="table">
+                    <thead>
+                        <tr>{entetes_colonnes}
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {lignes_html}
+                    </tbody>
+                </table>
+            </div>
+
+            <!-- Notes -->
+            {notes_section}
+
+            <!-- Source catalogue -->
+            {source_info}
+
+            <!-- Instructions -->
+            <div class="instructions-box">
+                <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">{titre_conditions}</h4>{conditions}
+            </div>
+
+        </div>
+
+        <!-- Pied de page -->
+        <div class="footer">
+            <div><strong>🏭 Desmarais & Gagné inc.</strong> - Système de Gestion des Achats</div>
+            <div>{libelle_document} automatiquement le {date_generation}</div>
+            <div>📞 (450) 372-9630 | 📧 achats@dg-inc.com | 🌐 www.dg-inc.com</div>
+            <div style="margin-top: 10px; font-size: 11px; opacity: 0.8;">
+                {rappel_numero}
+            </div>
+        </div>""" + _PAGE_TAIL
+
+DEMANDE_PRIX_TEMPLATE = CompiledTemplate('demande_prix', _ACHAT_TEMPLATE)
+BON_ACHAT_TEMPLATE = CompiledTemplate('bon_achat', _ACHAT_TEMPLATE)
+
+ACHAT_LIGNE_TEMPLATE = CompiledTemplate('achat_ligne', """
+                        <tr>
+                            <td><strong>{source_icon} {description}</strong>
+                                {code_display}
+                                {notes_display}
+                            </td>
+                            <td style="text-align: center;">{quantite}</td>
+                            <td style="text-align: center;">{unite}</td>{colonnes_prix}
+                        </tr>""")
+
+_SUMMARY_ITEM = """
+                    <div class="summary-item">
+                        <span class="summary-number">{valeur}</span>
+                        <span class="summary-label">{label}</span>
+                    </div>"""
+
+_INSTRUCTIONS_BOX = """
+            <div class="instructions-box">
+                <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">{titre}</h4>
+                {contenu}
+            </div>"""
+
+_DG_COORDONNEES = "565 rue Maisonneuve<br>\n                Granby, QC J2G 3H5<br>\n                Tél.: (450) 372-9630<br>\n                Téléc.: (450) 372-8122"
+_CONSTRUCTO_COORDONNEES = "1760 rue Jacques-Cartier Sud<br>\n                Farnham, QC J2N 1Y8<br>\n                Tél.: (514) 820-1972<br>\n                Téléc.: (514) 820-1973"
+
+
+# =========================================================================
+# PRÉPARATION DES DONNÉES
+# =========================================================================
+
+def _date_fr(valeur, defaut: str = 'N/A') -> str:
+    """Date ISO (ou datetime) au format JJ/MM/AAAA"""
+    if not valeur:
+        return defaut
+    if isinstance(valeur, datetime):
+        return valeur.strftime('%d/%m/%Y')
+    try:
+        return datetime.fromisoformat(str(valeur)).strftime('%d/%m/%Y')
+    except ValueError:
+        return str(valeur)[:10]
+
+
+def _montant(valeur) -> str:
+    return f"{valeur or 0:,.2f} $"
+
+
+def _info_items(items: Iterable[Tuple[str, Any]]) -> str:
+    return ''.join(_INFO_ITEM.format(label=label, value=value) for label, value in items)
+
+
+def _badge(classe: str, valeur: str) -> str:
+    return _BADGE.format(classe=classe, valeur=valeur)
+
+
+def _summary_items(items: Iterable[Tuple[Any, str]]) -> str:
+    return ''.join(_SUMMARY_ITEM.format(valeur=valeur, label=label) for valeur, label in items)
+
+
+DEVIS_STATUT_BADGES = {
+    'BROUILLON': 'badge-pending',
+    'VALIDÉ': 'badge-in-progress',
+    'ENVOYÉ': 'badge-in-progress',
+    'APPROUVÉ': 'badge-completed',
+    'TERMINÉ': 'badge-completed',
+    'ANNULÉ': 'badge-on-hold',
+    'EXPIRÉ': 'badge-on-hold'
+}
+DEVIS_PRIORITE_BADGES = {
+    'FAIBLE': 'badge-pending',
+    'NORMAL': 'badge-in-progress',
+    'ÉLEVÉE': 'badge-on-hold',
+    'URGENT': 'badge-on-hold'
+}
+ACHAT_STATUT_BADGES = {
+    'BROUILLON': 'badge-pending',
+    'VALIDÉ': 'badge-in-progress',
+    'ENVOYÉ': 'badge-completed',
+    'APPROUVÉ': 'badge-completed',
+    'TERMINÉ': 'badge-completed',
+    'ANNULÉ': 'badge-on-hold'
+}
+ACHAT_PRIORITE_BADGES = {
+    'NORMAL': 'badge-in-progress',
+    'URGENT': 'badge-pending',
+    'CRITIQUE': 'badge-on-hold'
+}
+
+
+def render_devis_html(devis_data: Dict[str, Any]) -> str:
+    """HTML d'un devis (données de GestionnaireDevis.get_devis_complet)"""
+    totaux = devis_data.get('totaux', {})
+    statut = devis_data.get('statut', 'BROUILLON')
+    priorite = devis_data.get('priorite', 'NORMAL')
+    date_echeance = _date_fr(devis_data.get('date_echeance'))
+
+    lignes = devis_data.get('lignes') or []
+    if lignes:
+        lignes_html = ''.join(DEVIS_LIGNE_TEMPLATE.render({
+            'description': ligne.get('description', ''),
+            'code_display': f"<br><small>Code: {ligne['code_article']}</small>" if ligne.get('code_article') else "",
+            'quantite': f"{ligne.get('quantite') or 0:,.2f}",
+            'unite': ligne.get('unite', ''),
+            'prix_unitaire': _montant(ligne.get('prix_unitaire')),
+            'montant': _montant((ligne.get('quantite') or 0) * (ligne.get('prix_unitaire') or 0)),
+        }) for ligne in lignes)
+    else:
+        lignes_html = """
+                        <tr>
+                            <td colspan="5" style="text-align: center; color: #6B7280;">Aucune ligne dans ce devis</td>
+                        </tr>"""
+
+    adresse_client = devis_data.get('client_adresse_complete') or (
+        f"{devis_data.get('client_nom', 'N/A')}<br>\n{devis_data.get('adresse', '')}<br>\n"
+        f"{devis_data.get('ville', '')}, {devis_data.get('province', '')} {devis_data.get('code_postal', '')}<br>\n"
+        f"{devis_data.get('pays', '')}"
+    )
+
+    notes = devis_data.get('notes')
+    notes_section = _INSTRUCTIONS_BOX.format(titre='📝 Notes et Conditions', contenu=notes) \
+        if notes and notes.strip() else ''
+
+    return DEVIS_TEMPLATE.render({
+        'titre': f"Devis - {devis_data.get('numero_document', 'N/A')}",
+        'css': document_css('devis'),
+        'logo': 'CA',
+        'entreprise': 'Constructo AI',
+        'entreprise_coordonnees': _CONSTRUCTO_COORDONNEES,
+        'numero_document': devis_data.get('numero_document', 'N/A'),
+        'date_generation': datetime.now().strftime('%d/%m/%Y à %H:%M'),
+        'info_items': _info_items([
+            ('Client', devis_data.get('client_nom', 'N/A')),
+            ('Statut', _badge(DEVIS_STATUT_BADGES.get(statut, 'badge-pending'), statut)),
+            ('Priorité', _badge(DEVIS_PRIORITE_BADGES.get(priorite, 'badge-in-progress'), priorite)),
+            ('Date Création', _date_fr(devis_data.get('date_creation'))),
+            ('Date Échéance', date_echeance),
+            ('Responsable', devis_data.get('responsable_nom', 'N/A')),
+        ]),
+        'adresse_client': str(adresse_client).strip(),
+        'nb_lignes': len(lignes),
+        'priorite': priorite,
+        'date_echeance': date_echeance,
+        'lignes_html': lignes_html,
+        'total_ht': _montant(totaux.get('total_ht', 0)),
+        'montant_tva': _montant(totaux.get('montant_tva', 0)),
+        'taux_tva': f"{totaux.get('taux_tva', 14.975):.3f}%",
+        'total_ttc': _montant(totaux.get('total_ttc', 0)),
+        'notes_section': notes_section,
+    })
+
+
+def _achat_lignes_html(lignes: List[Dict], metadonnees: Dict, avec_prix: bool) -> str:
+    source_icon = "🔗" if metadonnees.get('source_catalog', False) else "📝"
+    rendu = []
+    for ligne in lignes:
+        if avec_prix:
+            prix = ligne.get('prix_unitaire') or 0
+            montant = (ligne.get('quantite') or 0) * prix
+            colonnes_prix = (f'\n                            <td style="text-align: right;">{prix:.2f} $</td>'
+                             f'\n                            <td style="text-align: right;"><strong>{montant:.2f} $</strong></td>')
+        else:
+            colonnes_prix = '\n                            <td style="text-align: center;">À chiffrer</td>'
+        rendu.append(ACHAT_LIGNE_TEMPLATE.render({
+            'source_icon': source_icon,
+            'description': ligne.get('description', ''),
+            'code_display': f"<br><small>Code: {ligne['code_article']}</small>" if ligne.get('code_article') else "",
+            'notes_display': f"<br><em>{ligne['notes_ligne']}</em>" if ligne.get('notes_ligne') else "",
+            'quantite': ligne.get('quantite', 0),
+            'unite': ligne.get('unite', 'UN'),
+            'colonnes_prix': colonnes_prix,
+        }))
+    return ''.join(rendu)
+
+
+def _achat_context(formulaire: Dict, fournisseur: Dict, metadonnees: Dict, titre_notes: str, phrase_source: str) -> Dict[str, Any]:
+    """Champs communs aux demandes de prix et bons d'achat"""
+    statut = formulaire.get('statut', 'BROUILLON')
+    priorite = formulaire.get('priorite', 'NORMAL')
+
+    source_info = ''
+    if metadonnees.get('source_catalog'):
+        source_info = _INSTRUCTIONS_BOX.format(titre='🔗 Source des Produits', contenu=(
+            f"<p><strong>• Produits du catalogue :</strong> {metadonnees.get('nb_produits_catalog', 0)}</p>\n"
+            f"                <p><strong>• Produits saisis manuellement :</strong> {metadonnees.get('nb_produits_manuels', 0)}</p>\n"
+            f"                <p><em>{phrase_source}</em></p>"
+        ))
+    notes_section = ''
+    if formulaire.get('notes'):
+        notes_section = _INSTRUCTIONS_BOX.format(titre=titre_notes, contenu=f"<p>{formulaire['notes']}</p>")
+
+    return {
+        'css': document_css('achats'),
+        'logo': 'DG',
+        'entreprise': 'Desmarais & Gagné inc.',
+        'entreprise_coordonnees': _DG_COORDONNEES,
+        'numero_document': formulaire.get('numero_document', ''),
+        'date_generation': datetime.now().strftime('%d/%m/%Y à %H:%M'),
+        'statut_badge': _badge(ACHAT_STATUT_BADGES.get(statut, 'badge-pending'), statut),
+        'priorite_badge': _badge(ACHAT_PRIORITE_BADGES.get(priorite, 'badge-in-progress'), priorite),
+        'priorite': priorite,
+        'date_creation': _date_fr(formulaire.get('date_creation') or datetime.now()),
+        'notes_section': notes_section,
+        'source_info': source_info,
+    }
+
+
+def render_demande_prix_html(formulaire: Dict, fournisseur: Dict, lignes: List[Dict], metadonnees: Dict) -> str:
+    """HTML d'une demande de prix"""
+    context = _achat_context(formulaire, fournisseur, metadonnees, '📝 Instructions Spéciales',
+                             'Cette demande utilise notre catalogue produits intégré pour une gestion optimisée.')
+    date_echeance = _date_fr(formulaire.get('date_echeance'), defaut='')
+    context.update({
+        'titre': f"Demande de Prix - {context['numero_document']}",
+        'titre_document': '📋 DEMANDE DE PRIX',
+        'libelle_numero': 'N° Demande:',
+        'titre_informations': '📋 Informations de la Demande',
+        'info_items': _info_items([
+            ('Fournisseur', fournisseur.get('nom', 'N/A')),
+            ('Statut', context['statut_badge']),
+            ('Priorité', context['priorite_badge']),
+            ('Date Création', context['date_creation']),
+            ('Date Limite Réponse', date_echeance or 'N/A'),
+            ('Nb Articles', f"{len(lignes)} article(s)"),
+        ]),
+        'adresse_fournisseur': (
+            f"<strong>{fournisseur.get('nom', 'N/A')}</strong><br>\n"
+            f"                    {fournisseur.get('adresse', 'N/A')}<br>\n"
+            f"                    {fournisseur.get('site_web', '')}<br>\n"
+            f"                    <em>Code fournisseur: {fournisseur.get('code_fournisseur', 'N/A')}</em>"
+        ),
+        'titre_resume': '📋 Résumé de la Demande',
+        'summary_items': _summary_items([
+            (len(lignes), 'Articles à chiffrer'),
+            (context['priorite'], 'Priorité'),
+            (date_echeance or 'N/A', 'Échéance'),
+        ]),
+        'titre_articles': '📝 Articles à Chiffrer',
+        'entetes_colonnes': ''.join(f"\n                            <th{style}>{titre}</th>" for titre, style in (
+            ('Description', ''), ('Quantité', ' style="text-align: center;"'),
+            ('Unité', ' style="text-align: center;"'), ('Prix à Proposer', ' style="text-align: center;"'))),
+        'lignes_html': _achat_lignes_html(lignes, metadonnees, avec_prix=False),
+        'titre_conditions': '📋 Instructions pour Réponse',
+        'conditions': ''.join(f"\n                <p><strong>{texte}</p>" for texte in (
+            "• Merci de chiffrer tous les articles listés ci-dessus</strong>",
+            "• Indiquer les délais de livraison pour chaque article</strong>",
+            "• Préciser les conditions de paiement proposées</strong>",
+            f"• Date limite de réponse :</strong> {date_echeance or 'À convenir'}",
+            "• Envoyer votre proposition à :</strong> achats@dg-inc.com",
+        )),
+        'libelle_document': 'Demande de Prix générée',
+        'rappel_numero': f"Merci de mentionner le numéro de demande {context['numero_document']} dans votre réponse.",
+    })
+    return DEMANDE_PRIX_TEMPLATE.render(context)
+
+
+def render_bon_achat_html(formulaire: Dict, fournisseur: Dict, lignes: List[Dict], sous_total: float,
+                          tva_montant: float, total_ttc: float, metadonnees: Dict) -> str:
+    """HTML d'un bon d'achat"""
+    context = _achat_context(formulaire, fournisseur, metadonnees, '📝 Instructions de Livraison',
+                             'Cette commande utilise notre catalogue produits intégré pour une gestion optimisée.')
+    date_livraison = _date_fr(formulaire.get('date_echeance'), defaut='')
+    lignes_total = (
+        '\n                        <!-- Ligne de total -->'
+        '\n                        <tr style="background: var(--primary-color-lighter); font-weight: bold;">'
+        '\n                            <td colspan="4" style="text-align: right; padding: 15px;"><strong>SOUS-TOTAL (HT)</strong></td>'
+        f'\n                            <td style="text-align: right; padding: 15px;"><strong>{sous_total:,.2f} $ CAD</strong></td>'
+        '\n                        </tr>'
+        '\n                        <tr style="background: var(--background-color);">'
+        '\n                            <td colspan="4" style="text-align: right; padding: 10px;">TVA (14.975%)</td>'
+        f'\n                            <td style="text-align: right; padding: 10px;">{tva_montant:,.2f} $ CAD</td>'
+        '\n                        </tr>'
+        '\n                        <tr style="background: var(--primary-color); color: white; font-weight: bold; font-size: 16px;">'
+        '\n                            <td colspan="4" style="text-align: right; padding: 15px;"><strong>TOTAL TTC</strong></td>'
+        f'\n                            <td style="text-align: right; padding: 15px;"><strong>{total_ttc:,.2f} $ CAD</strong></td>'
+        '\n                        </tr>'
+    )
+    context.update({
+        'css': document_css('achats', summary_columns=4),
+        'titre': f"Bon d'Achat - {context['numero_document']}",
+        'titre_document': "🛒 BON D'ACHAT",
+        'libelle_numero': "N° Bon d'Achat:",
+        'titre_informations': "📋 Informations du Bon d'Achat",
+        'info_items': _info_items([
+            ('Fournisseur', fournisseur.get('nom', 'N/A')),
+            ('Statut', context['statut_badge']),
+            ('Priorité', context['priorite_badge']),
+            ('Date Création', context['date_creation']),
+            ('Date Livraison Souhaitée', date_livraison or 'N/A'),
+            ('Délai Fournisseur', f"{fournisseur.get('delai_livraison_moyen', 'N/A')} jours"),
+        ]),
+        'adresse_fournisseur': (
+            f"<strong>{fournisseur.get('nom', 'N/A')}</strong><br>\n"
+            f"                    {fournisseur.get('adresse', 'N/A')}<br>\n"
+            f"                    {fournisseur.get('site_web', '')}<br>\n"
+            f"                    <em>Code fournisseur: {fournisseur.get('code_fournisseur', 'N/A')}</em><br>\n"
+            f"                    <em>Contact commercial: {fournisseur.get('contact_commercial', 'N/A')}</em>"
+        ),
+        'titre_resume': '💰 Résumé Financier',
+        'summary_items': _summary_items([
+            (len(lignes), 'Articles'),
+            (f"{sous_total:,.2f} $", 'Total HT'),
+            (f"{tva_montant:,.2f} $", 'TVA (14.975%)'),
+            (f"{total_ttc:,.2f} $", 'Total TTC'),
+        ]),
+        'titre_articles': '📝 Détail des Articles Commandés',
+        'entetes_colonnes': ''.join(f"\n                            <th{style}>{titre}</th>" for titre, style in (
+            ('Description', ''), ('Quantité', ' style="text-align: center;"'), ('Unité', ' style="text-align: center;"'),
+            ('Prix Unit.', ' style="text-align: right;"'), ('Montant', ' style="text-align: right;"'))),
+        'lignes_html': _achat_lignes_html(lignes, metadonnees, avec_prix=True) + lignes_total,
+        'titre_conditions': '💰 Conditions de Commande',
+        'conditions': ''.join(f"\n                <p><strong>{texte}</p>" for texte in (
+            f"• Conditions de paiement :</strong> {fournisseur.get('conditions_paiement', '30 jours net')}",
+            f"• Délai de livraison :</strong> {fournisseur.get('delai_livraison_moyen', 'À convenir')} jours",
+            f"• Date de livraison souhaitée :</strong> {date_livraison or 'À convenir'}",
+            "• Lieu de livraison :</strong> 565 rue Maisonneuve, Granby, QC J2G 3H5",
+            "• Prix :</strong> Les prix sont exprimés en dollars canadiens (CAD) et incluent les taxes applicables",
+        )),
+        'libelle_document': "Bon d'Achat généré",
+        'rappel_numero': f"Merci de mentionner le numéro de bon d'achat {context['numero_document']} lors de la livraison.",
+    })
+    return BON_ACHAT_TEMPLATE.render(context)
+
+
+# =========================================================================
+# CACHE DES DOCUMENTS RENDUS
+# =========================================================================
+
+def _db_key(db) -> str:
+    db_path = getattr(db, 'db_path', None)
+    return os.path.abspath(db_path) if db_path else f"db-{id(db)}"
+
+
+class DocumentRenderCache:
+    """HTML rendu par (base, type, id), valide tant que la version du document ne change pas (LRU)"""
+
+    def __init__(self, max_entries: int = DOCUMENT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, str, int], Tuple[Tuple, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db_key: str, doc_type: str, doc_id: int, version: Tuple) -> Optional[str]:
+        key = (db_key, doc_type, doc_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, db_key: str, doc_type: str, doc_id: int, version: Tuple, html: str) -> None:
+        key = (db_key, doc_type, doc_id)
+        with self._lock:
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, doc_type: Optional[str] = None, doc_id: Optional[int] = None, db=None) -> None:
+        """Oublie les rendus d'un type, d'un document, ou tous ; limité à une base si db est donnée"""
+        db_key = _db_key(db) if db is not None else None
+        with self._lock:
+            for key in [k for k in self._entries
+                        if (db_key is None or k[0] == db_key)
+                        and (doc_type is None or k[1] == doc_type)
+                        and (doc_id is None or k[2] == doc_id)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'documents': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'taux_succes': round(self.hits / total * 100, 1) if total else 0.0
+            }
+
+
+_document_cache = DocumentRenderCache()
+
+
+def get_document_cache() -> DocumentRenderCache:
+    return _document_cache
+
+
+def _chunks(ids: List[int]) -> Iterable[List[int]]:
+    for i in range(0, len(ids), _SQL_CHUNK_SIZE):
+        yield ids[i:i + _SQL_CHUNK_SIZE]
+
+
+def load_document_versions(db, doc_ids: Iterable[int], with_fournisseur: bool = False) -> Dict[int, Tuple]:
+    """
+    Version de chaque document en une requête : updated_at et montant du
+    formulaire, empreinte des lignes (nombre, plus grand id, montant, longueur
+    des textes : updated_at n'a qu'une précision à la seconde), mise à jour du
+    client/fournisseur et du responsable.
+    """
+    ids = list(dict.fromkeys(doc_ids))
+    versions: Dict[int, Tuple] = {}
+    fournisseur_cols = (", fr.code_fournisseur, fr.delai_livraison_moyen, fr.conditions_paiement, fr.contact_commercial"
+                        if with_fournisseur else "")
+    fournisseur_join = "LEFT JOIN fournisseurs fr ON fr.company_id = f.company_id" if with_fournisseur else ""
+    for chunk in _chunks(ids):
+        placeholders = ','.join('?' * len(chunk))
+        rows = db.execute_query(f'''
+            SELECT f.id, f.updated_at, f.montant_total, f.statut, f.priorite,
+                   c.updated_at as client_maj,
+                   e.prenom || ' ' || e.nom as responsable,
+                   l.nb_lignes, l.max_ligne, l.montant_lignes, l.texte_lignes
+                   {fournisseur_cols}
+            FROM formulaires f
+            LEFT JOIN companies c ON f.company_id = c.id
+            LEFT JOIN employees e ON f.employee_id = e.id
+            LEFT JOIN (
+                SELECT formulaire_id, COUNT(*) as nb_lignes, MAX(id) as max_ligne,
+                       TOTAL(quantite * prix_unitaire) as montant_lignes,
+                       TOTAL(LENGTH(description) + LENGTH(COALESCE(notes_ligne, ''))) as texte_lignes
+                FROM formulaire_lignes
+                WHERE formulaire_id IN ({placeholders})
+                GROUP BY formulaire_id
+            ) l ON l.formulaire_id = f.id
+            {fournisseur_join}
+            WHERE f.id IN ({placeholders})
+        ''', tuple(chunk) * 2)
+        for row in rows:
+            versions[row['id']] = tuple(row.values())
+    return versions
+
+
+def render_documents(doc_type: str, doc_ids: Iterable[int], db,
+                     load_documents: Callable[[List[int]], Dict[int, Any]],
+                     render: Callable[[Any], str],
+                     with_fournisseur: bool = False) -> Dict[int, str]:
+    """
+    Rend une liste de documents en réutilisant le cache : une requête de
+    versions, puis load_documents() (chargement groupé) et render() pour les
+    seuls documents absents ou modifiés. Les id inexistants sont omis.
+    """
+    ids = list(dict.fromkeys(doc_ids))
+    versions = load_document_versions(db, ids, with_fournisseur=with_fournisseur)
+    db_key = _db_key(db)
+
+    rendus: Dict[int, str] = {}
+    manquants = []
+    for doc_id in ids:
+        if doc_id not in versions:
+            continue
+        html = _document_cache.get(db_key, doc_type, doc_id, versions[doc_id])
+        if html is None:
+            manquants.append(doc_id)
+        else:
+            rendus[doc_id] = html
+
+    if manquants:
+        for doc_id, data in load_documents(manquants).items():
+            try:
+                html = render(data)
+            except Exception as e:
+                logger.error(f"❌ Rendu HTML {doc_type} #{doc_id}: {e}")
+                continue
+            if html:
+                _document_cache.put(db_key, doc_type, doc_id, versions[doc_id], html)
+                rendus[doc_id] = html
+        logger.info(f"📄 {doc_type}: {len(manquants)} document(s) rendu(s), {len(ids) - len(manquants)} depuis le cache")
+
+    return {doc_id: rendus[doc_id] for doc_id in ids if doc_id in rendus}
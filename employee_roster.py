@@ -0,0 +1,172 @@
+# employee_roster.py - Chargement groupé et cache partagé des employés
+"""
+Roster des employés pour GestionnaireEmployes.
+
+L'ancien chargement faisait 1 + 2N requêtes (compétences puis assignations
+projets pour chaque employé) dans le constructeur de chaque session. Ici :
+- load_employee_roster() charge employés, compétences et assignations en trois
+  requêtes au total, regroupées par employee_id en mémoire ;
+- EmployeeRoster indexe le résultat (par id, département, manager, projet) ;
+- get_shared_roster() partage le roster entre sessions pour une même base et
+  le recharge quand la signature des tables employés change (écriture par
+  un autre module, signature vérifiée au plus toutes les
+  SIGNATURE_CHECK_SECONDS) ou dès invalidate_roster() (écriture par le
+  gestionnaire).
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Départements dont les employés sont considérés comme managers (en plus des employés sans manager)
+DEPARTEMENTS_MANAGERS = ('DIRECTION', 'COMMERCIAL', 'ADMINISTRATION')
+# Intervalle minimum entre deux vérifications de la signature des tables
+SIGNATURE_CHECK_SECONDS = 2.0
+
+_rosters: Dict[str, 'EmployeeRoster'] = {}
+_roster_lock = threading.RLock()
+
+
+class EmployeeRoster:
+    """Liste des employés et index en mémoire pour les recherches du gestionnaire"""
+
+    def __init__(self, employes: List[Dict[str, Any]]):
+        self.employes = employes
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self.by_departement: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_manager: Dict[int, List[Dict[str, Any]]] = {}
+        self.by_projet: Dict[int, List[Dict[str, Any]]] = {}
+        self.managers: List[Dict[str, Any]] = []
+        self.signature: Tuple = ()
+        self.checked_at = 0.0
+
+        for employe in employes:
+            self.by_id[employe.get('id')] = employe
+            self.by_departement.setdefault(employe.get('departement'), []).append(employe)
+            if employe.get('manager_id'):
+                self.by_manager.setdefault(employe['manager_id'], []).append(employe)
+            if not employe.get('manager_id') or employe.get('departement') in DEPARTEMENTS_MANAGERS:
+                self.managers.append(employe)
+            for projet_id in employe.get('projets_assignes', []):
+                self.by_projet.setdefault(projet_id, []).append(employe)
+
+    def get_by_id(self, employe_id) -> Optional[Dict[str, Any]]:
+        return self.by_id.get(employe_id)
+
+    def get_by_departement(self, departement) -> List[Dict[str, Any]]:
+        return list(self.by_departement.get(departement, []))
+
+    def get_by_projet(self, projet_id) -> List[Dict[str, Any]]:
+        return list(self.by_projet.get(projet_id, []))
+
+    def get_managers(self) -> List[Dict[str, Any]]:
+        return list(self.managers)
+
+    def get_subordinates(self, manager_id) -> List[Dict[str, Any]]:
+        return list(self.by_manager.get(manager_id, []))
+
+
+# =========================================================================
+# CHARGEMENT GROUPÉ
+# =========================================================================
+
+def load_employee_roster(db) -> EmployeeRoster:
+    """Employés + compétences + assignations projets en trois requêtes"""
+    employes_rows = db.execute_query("""
+        SELECT e.*,
+               m.prenom as manager_prenom,
+               m.nom as manager_nom
+        FROM employees e
+        LEFT JOIN employees m ON e.manager_id = m.id
+        ORDER BY e.id
+    """)
+
+    competences_par_employe: Dict[int, List[Dict[str, Any]]] = {}
+    for row in db.execute_query("""
+        SELECT employee_id, nom_competence, niveau, certifie, date_obtention
+        FROM employee_competences
+        ORDER BY employee_id, nom_competence
+    """):
+        competences_par_employe.setdefault(row['employee_id'], []).append({
+            'nom': row['nom_competence'],
+            'niveau': row['niveau'],
+            'certifie': bool(row['certifie']),
+            'date_obtention': row['date_obtention']
+        })
+
+    projets_par_employe: Dict[int, List[int]] = {}
+    for row in db.execute_query("""
+        SELECT employee_id, project_id
+        FROM project_assignments
+        ORDER BY employee_id, rowid
+    """):
+        projets_par_employe.setdefault(row['employee_id'], []).append(row['project_id'])
+
+    employes = []
+    for emp_row in employes_rows:
+        employe = dict(emp_row)
+        employe['competences'] = competences_par_employe.get(employe['id'], [])
+        employe['projets_assignes'] = projets_par_employe.get(employe['id'], [])
+        employes.append(employe)
+
+    return EmployeeRoster(employes)
+
+
+def roster_signature(db) -> Tuple:
+    """
+    Signature bon marché des tables du roster : nombre de lignes, plus grand id
+    (les remplacements delete+insert créent de nouveaux id) et dernière mise à jour.
+    """
+    rows = db.execute_query("""
+        SELECT (SELECT COUNT(*) FROM employees) as nb_employes,
+               (SELECT MAX(id) FROM employees) as max_employe,
+               (SELECT MAX(updated_at) FROM employees) as maj_employes,
+               (SELECT COUNT(*) FROM employee_competences) as nb_competences,
+               (SELECT MAX(id) FROM employee_competences) as max_competence,
+               (SELECT COUNT(*) FROM project_assignments) as nb_assignations,
+               (SELECT MAX(rowid) FROM project_assignments) as max_assignation
+    """)
+    return tuple(rows[0].values()) if rows else ()
+
+
+# =========================================================================
+# CACHE PARTAGÉ
+# =========================================================================
+
+def _cache_key(db) -> str:
+    db_path = getattr(db, 'db_path', None)
+    return os.path.abspath(db_path) if db_path else f"db-{id(db)}"
+
+
+def get_shared_roster(db, force_reload: bool = False) -> EmployeeRoster:
+    """Roster partagé pour cette base ; signature revérifiée au plus toutes les SIGNATURE_CHECK_SECONDS"""
+    key = _cache_key(db)
+    roster = _rosters.get(key)
+    if roster and not force_reload and time.monotonic() - roster.checked_at < SIGNATURE_CHECK_SECONDS:
+        return roster
+
+    with _roster_lock:
+        roster = _rosters.get(key)
+        signature = roster_signature(db)
+        if roster and not force_reload and roster.signature == signature:
+            roster.checked_at = time.monotonic()
+            return roster
+        roster = load_employee_roster(db)
+        roster.signature = signature
+        roster.checked_at = time.monotonic()
+        _rosters[key] = roster
+        logger.info(f"👥 Roster employés chargé : {len(roster.employes)} employés")
+        return roster
+
+
+def invalidate_roster(db=None) -> None:
+    """Oublie le roster d'une base (ou de toutes) : rechargé au prochain accès"""
+    with _roster_lock:
+        if db is None:
+            _rosters.clear()
+        else:
+            _rosters.pop(_cache_key(db), None)
@@ -7,6 +7,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 from typing import Dict, List, Optional, Any
 
+from employee_roster import EmployeeRoster, get_shared_roster, invalidate_roster
+
 # === CONSTANTES CONSTRUCTION QUÉBEC - CONSTRUCTO AI INC. ===
 
 # Départements spécifiques construction au Québec
@@ -124,8 +126,6 @@ class GestionnaireEmployes:
         else:
             self.db = db
         
-        self.employes = []  # Cache des employés (pour compatibilité interface)
-        
         if self.db:
             self._load_employes_from_db()
             
@@ -136,56 +136,27 @@ class GestionnaireEmployes:
             # Initialiser les compétences construction
             self._init_competences_construction()
     
-    def _load_employes_from_db(self):
-        """Charge les employés depuis SQLite avec leurs compétences"""
+    @property
+    def employes(self):
+        """Cache des employés (pour compatibilité interface) - roster partagé entre sessions"""
+        return self._get_roster().employes
+
+    def _get_roster(self):
+        """Roster partagé, rechargé automatiquement si les tables employés ont changé"""
         if not self.db:
-            return
-            
+            return EmployeeRoster([])
         try:
-            # Récupérer employés avec informations manager
-            employes_rows = self.db.execute_query("""
-                SELECT e.*, 
-                       m.prenom as manager_prenom, 
-                       m.nom as manager_nom
-                FROM employees e
-                LEFT JOIN employees m ON e.manager_id = m.id
-                ORDER BY e.id
-            """)
-            
-            self.employes = []
-            for emp_row in employes_rows:
-                employe = dict(emp_row)
-                
-                # Récupérer compétences de l'employé
-                competences_rows = self.db.execute_query("""
-                    SELECT nom_competence, niveau, certifie, date_obtention 
-                    FROM employee_competences 
-                    WHERE employee_id = ?
-                    ORDER BY nom_competence
-                """, (employe['id'],))
-                
-                employe['competences'] = [
-                    {
-                        'nom': row['nom_competence'],
-                        'niveau': row['niveau'],
-                        'certifie': bool(row['certifie']),
-                        'date_obtention': row['date_obtention']
-                    }
-                    for row in competences_rows
-                ]
-                
-                # Récupérer projets assignés
-                projets_rows = self.db.execute_query("""
-                    SELECT project_id FROM project_assignments WHERE employee_id = ?
-                """, (employe['id'],))
-                
-                employe['projets_assignes'] = [row['project_id'] for row in projets_rows]
-                
-                self.employes.append(employe)
-                
+            return get_shared_roster(self.db)
         except Exception as e:
             st.error(f"Erreur chargement employés SQLite: {e}")
-            self.employes = []
+            return EmployeeRoster([])
+
+    def _load_employes_from_db(self):
+        """Recharge les employés depuis SQLite avec leurs compétences (3 requêtes groupées)"""
+        if not self.db:
+            return
+        invalidate_roster(self.db)
+        self._get_roster()
 
     def _calculer_salaire_construction(self, poste, experience_annees=5):
         """Calcule le salaire selon les standards québécois construction 2024 - Constructo AI Inc."""
@@ -899,23 +870,23 @@ class GestionnaireEmployes:
 
     def get_employe_by_id(self, id_employe):
         """Récupère un employé par ID (depuis cache)"""
-        return next((emp for emp in self.employes if emp.get('id') == id_employe), None)
+        return self._get_roster().get_by_id(id_employe)
 
     def get_employes_by_departement(self, departement):
         """Récupère employés par département"""
-        return [emp for emp in self.employes if emp.get('departement') == departement]
+        return self._get_roster().get_by_departement(departement)
 
     def get_employes_by_projet(self, projet_id):
         """Récupère employés assignés à un projet"""
-        return [emp for emp in self.employes if projet_id in emp.get('projets_assignes', [])]
+        return self._get_roster().get_by_projet(projet_id)
 
     def get_managers(self):
         """Récupère les managers (employés sans manager ou poste de direction)"""
-        return [emp for emp in self.employes if not emp.get('manager_id') or emp.get('departement') in ['DIRECTION', 'COMMERCIAL', 'ADMINISTRATION']]
+        return self._get_roster().get_managers()
 
     def get_subordinates(self, manager_id):
         """Récupère les subordonnés d'un manager"""
-        return [emp for emp in self.employes if emp.get('manager_id') == manager_id]
+        return self._get_roster().get_subordinates(manager_id)
 
     # --- Méthodes d'analyse construction québécoise ---
     
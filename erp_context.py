@@ -0,0 +1,164 @@
+# erp_context.py - Collecte parallèle du contexte ERP des analyses IA
+"""
+Assemblage du contexte ERP envoyé à Claude.
+
+AssistantIAClaude.analyser_situation_globale et _fouiller_donnees_completes
+appelaient les collecteurs (projets, inventaire, CRM, devis, production...)
+l'un après l'autre ; chacun fait plusieurs agrégations indépendantes, et
+l'appel au LLM attendait la somme de leurs durées. Ici :
+- collect_context() exécute les collecteurs en parallèle (ThreadPoolExecutor),
+  chacun avec sa propre connexion SQLite en lecture seule (ReadOnlyDatabase :
+  mode=ro et PRAGMA query_only), fermée à la fin du collecteur ;
+- chaque collecteur a son délai ; au-delà, sa requête en cours est
+  interrompue (sqlite3 interrupt) et sa section prend la valeur par défaut :
+  le contexte est partiel mais l'analyse part quand même ;
+- les durées et statuts de chaque collecteur sont rendus avec les données
+  et journalisés ; la phase de collecte dure autant que le collecteur le plus
+  lent au lieu de la somme de tous.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 8.0  # secondes par collecteur
+MAX_WORKERS = 6
+
+STATUT_OK = 'ok'
+STATUT_DELAI = 'delai'
+STATUT_ERREUR = 'erreur'
+
+
+class ReadOnlyDatabase:
+    """
+    Lecture seule sur le fichier d'une ERPDatabase, pour un seul collecteur.
+
+    Expose execute_query() comme ERPDatabase mais garde une seule connexion
+    pour toutes les requêtes du collecteur ; interrupt() arrête la requête en
+    cours depuis un autre thread.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connection(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._closed:
+                raise sqlite3.OperationalError("collecte interrompue")
+            if self._conn is None:
+                uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+                conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA query_only = ON")
+                self._conn = conn
+            return self._conn
+
+    def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
+        cursor = self._connection().cursor()
+        try:
+            cursor.execute(query, params or ())
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def interrupt(self):
+        with self._lock:
+            self._closed = True
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _reader_factory(db) -> Callable[[], Any]:
+    """Une ReadOnlyDatabase par collecteur si la base est un fichier, sinon la base partagée"""
+    db_path = getattr(db, 'db_path', None)
+    if db_path and db_path != ':memory:' and Path(db_path).exists():
+        return lambda: ReadOnlyDatabase(db_path)
+    return lambda: db
+
+
+def collect_context(collectors: Sequence[Tuple[str, Callable[[Any], Any]]], db,
+                    timeout: float = DEFAULT_TIMEOUT, timeouts: Optional[Dict[str, float]] = None,
+                    max_workers: int = MAX_WORKERS, default: Callable[[], Any] = dict) -> Dict[str, Any]:
+    """
+    Exécute les collecteurs (nom, fonction(db)) en parallèle.
+
+    timeouts : délais particuliers par nom (sinon timeout). Rend
+    {'donnees': {nom: résultat}, 'metriques': {nom: {'statut', 'ms', 'erreur'}},
+    'partiel': bool, 'duree_ms'} ; un collecteur en erreur ou hors délai
+    rend default().
+    """
+    timeouts = timeouts or {}
+    new_reader = _reader_factory(db)
+    started = time.perf_counter()
+    donnees: Dict[str, Any] = {}
+    metriques: Dict[str, Dict[str, Any]] = {}
+    if not collectors:
+        return {'donnees': donnees, 'metriques': metriques, 'partiel': False, 'duree_ms': 0.0}
+
+    def run(collector, reader):
+        nom, fonction = collector
+        t0 = time.perf_counter()
+        try:
+            return fonction(reader), (time.perf_counter() - t0) * 1000
+        finally:
+            if isinstance(reader, ReadOnlyDatabase):
+                reader.close()
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(collectors))),
+                              thread_name_prefix='erp_context')
+    try:
+        taches = []
+        for collector in collectors:
+            reader = new_reader()
+            deadline = time.perf_counter() + timeouts.get(collector[0], timeout)
+            taches.append((collector[0], reader, deadline, pool.submit(run, collector, reader)))
+
+        for nom, reader, deadline, future in taches:
+            try:
+                resultat, ms = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+                donnees[nom] = resultat
+                metriques[nom] = {'statut': STATUT_OK, 'ms': round(ms, 1), 'erreur': None}
+            except FutureTimeoutError:
+                future.cancel()
+                if isinstance(reader, ReadOnlyDatabase):
+                    reader.interrupt()
+                donnees[nom] = default()
+                metriques[nom] = {'statut': STATUT_DELAI, 'ms': round((time.perf_counter() - started) * 1000, 1),
+                                  'erreur': 'délai dépassé'}
+                logger.warning(f"⏱️ Contexte ERP : collecteur '{nom}' hors délai, section vide")
+            except Exception as e:
+                donnees[nom] = default()
+                metriques[nom] = {'statut': STATUT_ERREUR, 'ms': round((time.perf_counter() - started) * 1000, 1),
+                                  'erreur': str(e)}
+                logger.error(f"❌ Contexte ERP : collecteur '{nom}' en erreur: {e}")
+    finally:
+        # Ne pas attendre un collecteur hors délai : sa requête est interrompue
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    duree_ms = round((time.perf_counter() - started) * 1000, 1)
+    partiel = any(m['statut'] != STATUT_OK for m in metriques.values())
+    plus_lent = max(metriques, key=lambda n: metriques[n]['ms'])
+    logger.info(f"🧩 Contexte ERP : {len(collectors)} collecteurs en {duree_ms} ms "
+                f"(plus lent : {plus_lent}, {metriques[plus_lent]['ms']} ms){' — partiel' if partiel else ''}")
+    return {'donnees': donnees, 'metriques': metriques, 'partiel': partiel, 'duree_ms': duree_ms}
+
+
+def sections_indisponibles(collecte: Dict[str, Any]) -> List[str]:
+    """Noms des sections vides faute de données (erreur ou délai)"""
+    return [nom for nom, m in collecte['metriques'].items() if m['statut'] != STATUT_OK]
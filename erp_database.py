@@ -5,12 +5,32 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 import logging
 import shutil
+import hashlib
+import inspect
+import threading
 from pathlib import Path
 
+from capacity_engine import CapacityEngine, classify_utilization
+from monthly_reports import MonthlyReportEngine, invalidate_monthly_reports
+from crm_timeline import TimelineEngine, decorate_event
+from scheduling_engine import FiniteCapacityScheduler
+from schema_migrations import MigrationRunner, latest_version, migrations_fingerprint
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bases dont le schéma a été vérifié dans ce processus (chemin absolu) et empreinte du code DDL
+_SCHEMA_READY_PATHS = set()
+_SCHEMA_CODE_HASH = None
+
+# Mise à jour du schéma (migrations numérotées) en arrière-plan, par base (chemin absolu) :
+# drapeau « schéma prêt » attendu par les sessions, erreur de la dernière tentative
+_SCHEMA_UPGRADE_EVENTS: Dict[str, threading.Event] = {}
+_SCHEMA_UPGRADE_ERRORS: Dict[str, str] = {}
+_SCHEMA_UPGRADE_RUNNING = set()
+_schema_upgrade_lock = threading.Lock()
+
 class ERPDatabase:
     """
     Gestionnaire de base de données SQLite unifié pour ERP Production DG Inc.
@@ -71,21 +91,152 @@ class ERPDatabase:
     - Toutes les améliorations de fix_database.py
     """
     
-    def __init__(self, db_path: str = "erp_production_dg.db"):
+    def __init__(self, db_path: str = "erp_production_dg.db", wait_for_schema: bool = True):
+        """
+        wait_for_schema=False : les migrations numérotées tournent en arrière-plan et le
+        constructeur rend la main aussitôt ; l'appelant attend ensuite le drapeau
+        « schéma prêt » avec wait_for_schema() (application web).
+        """
         self.db_path = db_path
         self.backup_dir = "backup_json"
+
+        # DDL + migrations une seule fois par processus et par version du schéma :
+        # si l'empreinte enregistrée correspond au code et au schéma actuels, on saute tout
+        if self._schema_is_current():
+            logger.info(f"⚡ ERPDatabase : schéma à jour (empreinte identique), initialisation DDL ignorée : {db_path}")
+            self._schema_ready_event().set()
+            return
+
         self.init_database()
         logger.info(f"ERPDatabase consolidé + Interface Unifiée + Production + Operations↔BT + Communication TT initialisé : {db_path}")
-        
-        # 🆕 REMPLACEZ LA LIGNE 89 PAR CECI :
-        logger.info("🔧 DEBUG: Avant appel check_and_upgrade_schema()")
+
+        self.start_schema_upgrade()
+        if wait_for_schema:
+            self.wait_for_schema()
+
+    # =========================================================================
+    # EMPREINTE DU SCHÉMA (DDL UNE FOIS PAR PROCESSUS)
+    # =========================================================================
+
+    @classmethod
+    def _schema_code_hash(cls) -> str:
+        """Empreinte du code DDL/migrations : change dès qu'une table ou une correction est modifiée"""
+        global _SCHEMA_CODE_HASH
+        if _SCHEMA_CODE_HASH is None:
+            sources = []
+            for method in (cls.init_database, cls._apply_automatic_fixes, cls.check_and_upgrade_schema):
+                try:
+                    sources.append(inspect.getsource(method))
+                except (OSError, TypeError):
+                    # Exécutable figé (PyInstaller) : pas de source, on se rabat sur le bytecode
+                    sources.append(repr(method.__code__.co_code))
+            sources.append(migrations_fingerprint())
+            _SCHEMA_CODE_HASH = hashlib.sha256("\n".join(sources).encode('utf-8')).hexdigest()
+        return _SCHEMA_CODE_HASH
+
+    def _schema_sql_hash(self, conn: sqlite3.Connection) -> str:
+        """Empreinte du schéma réel (sqlite_master), hors table d'empreinte elle-même"""
+        rows = conn.execute('''
+            SELECT type, name, sql FROM sqlite_master
+            WHERE name NOT LIKE 'sqlite_%' AND tbl_name != 'schema_fingerprint'
+            ORDER BY type, name
+        ''').fetchall()
+        payload = "\n".join(f"{row[0]}|{row[1]}|{row[2] or ''}" for row in rows)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _schema_is_current(self) -> bool:
+        """Vrai si la base a déjà été initialisée par ce code et que son schéma n'a pas changé depuis"""
+        db_key = os.path.abspath(self.db_path)
+        if not os.path.exists(self.db_path):
+            _SCHEMA_READY_PATHS.discard(db_key)
+            return False
+        if db_key in _SCHEMA_READY_PATHS:
+            return True
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT code_hash, schema_hash FROM schema_fingerprint WHERE id = 1"
+                ).fetchone()
+                if not row or row[0] != self._schema_code_hash() or row[1] != self._schema_sql_hash(conn):
+                    return False
+                # Une migration en échec ne laisse pas la base « à jour » : elle sera retentée
+                version = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+                if (version or 0) != latest_version():
+                    return False
+        except sqlite3.Error:
+            # Table d'empreinte absente (ancienne base) : initialisation complète
+            return False
+        _SCHEMA_READY_PATHS.add(db_key)
+        return True
+
+    def _store_schema_fingerprint(self):
+        """Enregistre l'empreinte après une initialisation complète réussie"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_fingerprint (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        code_hash TEXT NOT NULL,
+                        schema_hash TEXT NOT NULL,
+                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                conn.execute('''
+                    INSERT OR REPLACE INTO schema_fingerprint (id, code_hash, schema_hash, updated_at)
+                    VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+                ''', (self._schema_code_hash(), self._schema_sql_hash(conn)))
+                conn.commit()
+            _SCHEMA_READY_PATHS.add(os.path.abspath(self.db_path))
+        except Exception as e:
+            logger.warning(f"⚠️ Empreinte du schéma non enregistrée : {e}")
+
+    # =========================================================================
+    # MIGRATIONS NUMÉROTÉES EN ARRIÈRE-PLAN (DRAPEAU « SCHÉMA PRÊT »)
+    # =========================================================================
+
+    def _schema_ready_event(self) -> threading.Event:
+        with _schema_upgrade_lock:
+            return _SCHEMA_UPGRADE_EVENTS.setdefault(os.path.abspath(self.db_path), threading.Event())
+
+    def start_schema_upgrade(self) -> bool:
+        """
+        Lance les migrations numérotées dans un thread (un seul par base) ; faux si une
+        mise à jour est déjà en cours. Le drapeau est levé à la fin, succès ou échec.
+        """
+        db_key = os.path.abspath(self.db_path)
+        event = self._schema_ready_event()
+        with _schema_upgrade_lock:
+            if db_key in _SCHEMA_UPGRADE_RUNNING:
+                return False
+            _SCHEMA_UPGRADE_RUNNING.add(db_key)
+            _SCHEMA_UPGRADE_ERRORS.pop(db_key, None)
+            event.clear()
+        threading.Thread(target=self._run_schema_upgrade, name=f"schema-upgrade-{db_key}", daemon=True).start()
+        return True
+
+    def _run_schema_upgrade(self):
+        db_key = os.path.abspath(self.db_path)
         try:
             self.check_and_upgrade_schema()
-            logger.info("🔧 DEBUG: Après appel check_and_upgrade_schema() - SUCCÈS")
         except Exception as e:
-            logger.error(f"🔧 DEBUG: ERREUR dans check_and_upgrade_schema(): {e}")
-            import traceback
-            logger.error(f"🔧 DEBUG: Traceback: {traceback.format_exc()}")
+            # Pas d'empreinte : la migration sera retentée au prochain démarrage
+            logger.error(f"❌ Mise à jour du schéma en échec ({self.db_path}) : {e}")
+            _SCHEMA_UPGRADE_ERRORS[db_key] = str(e)
+        else:
+            self._store_schema_fingerprint()
+        finally:
+            with _schema_upgrade_lock:
+                _SCHEMA_UPGRADE_RUNNING.discard(db_key)
+                _SCHEMA_UPGRADE_EVENTS[db_key].set()
+
+    def wait_for_schema(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin de la mise à jour du schéma ; faux si elle tourne encore après timeout"""
+        return self._schema_ready_event().wait(timeout)
+
+    @property
+    def schema_error(self) -> Optional[str]:
+        """Erreur de la dernière mise à jour du schéma de cette base (None si réussie)"""
+        return _SCHEMA_UPGRADE_ERRORS.get(os.path.abspath(self.db_path))
 
     # 🆕 NOUVELLE MÉTHODE À AJOUTER ICI
     def get_schema_version(self):
@@ -139,380 +290,22 @@ class ERPDatabase:
             return []
 
     def check_and_upgrade_schema(self):
-        """Vérifie et met à jour le schéma de base de données"""
-        logger.info("🔧 DEBUG: check_and_upgrade_schema() appelé")
-        
-        LATEST_SCHEMA_VERSION = 6  # 🎯 CHANGÉ pour ajouter les fonctionnalités Insightly
-        
+        """Applique les migrations versionnées en attente (voir schema_migrations.py)"""
         current_version = self.get_schema_version()
-        logger.info(f"🔧 DEBUG: Version actuelle = {current_version}")
-        
-        if current_version < LATEST_SCHEMA_VERSION:
-            logger.info(f"🔄 Migration nécessaire: v{current_version} → v{LATEST_SCHEMA_VERSION}")
-            self.upgrade_schema(current_version, LATEST_SCHEMA_VERSION)
+        if current_version < latest_version():
+            logger.info(f"🔄 Migration nécessaire: v{current_version} → v{latest_version()}")
+            self.upgrade_schema(current_version, latest_version())
         else:
             logger.info(f"✅ Schéma à jour: v{current_version}")
 
     def upgrade_schema(self, from_version, to_version):
-        """Applique les migrations de schéma"""
-        try:
-            logger.info(f"🔄 Migration schéma: v{from_version} → v{to_version}")
-            
-            if from_version < 1:
-                logger.info("📝 Migration v1: Corrections colonnes projects...")
-                try:
-                    # Les colonnes date_debut_reel, date_fin_reel sont déjà dans init_database()
-                    # Mais on s'assure qu'elles existent pour les anciennes bases
-                    self.execute_update("ALTER TABLE projects ADD COLUMN date_debut_reel DATE")
-                    self.execute_update("ALTER TABLE projects ADD COLUMN date_fin_reel DATE")
-                except Exception:
-                    pass  # Colonnes existent déjà
-                    
-            if from_version < 2:
-                logger.info("📝 Migration v2: Tables BT spécialisées...")
-                try:
-                    # bt_assignations → assignations employés aux BT
-                    self.execute_update('''
-                        CREATE TABLE IF NOT EXISTS bt_assignations (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            bt_id INTEGER NOT NULL,
-                            employee_id INTEGER NOT NULL,
-                            assigned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                            role_assignment TEXT DEFAULT 'Exécutant',
-                            FOREIGN KEY (bt_id) REFERENCES formulaires(id),
-                            FOREIGN KEY (employee_id) REFERENCES employees(id)
-                        )
-                    ''')
-                    
-                    # bt_reservations_postes → réservations postes de travail
-                    self.execute_update('''
-                        CREATE TABLE IF NOT EXISTS bt_reservations_postes (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            bt_id INTEGER NOT NULL,
-                            work_center_id INTEGER NOT NULL,
-                            reserved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                            duration_hours REAL DEFAULT 0,
-                            FOREIGN KEY (bt_id) REFERENCES formulaires(id),
-                            FOREIGN KEY (work_center_id) REFERENCES work_centers(id)
-                        )
-                    ''')
-                    logger.info("✅ Tables BT spécialisées créées")
-                except Exception as e:
-                    logger.error(f"Erreur migration v2: {e}")
-                    
-            if from_version < 3:
-                logger.info("📝 Migration v3: Colonnes formulaire_bt_id...")
-                try:
-                    # Colonne BT dans time_entries (ÉTAPE 2)
-                    self.execute_update("ALTER TABLE time_entries ADD COLUMN formulaire_bt_id INTEGER")
-                    
-                    # Colonne BT dans operations (NOUVEAU)
-                    self.execute_update("ALTER TABLE operations ADD COLUMN formulaire_bt_id INTEGER")
-                    
-                    logger.info("✅ Colonnes formulaire_bt_id ajoutées")
-                except Exception as e:
-                    logger.error(f"Erreur migration v3: {e}")
-                    
-            if from_version < 4:
-                logger.info("📝 Migration v4: Améliorations finales et optimisations...")
-                try:
-                    # Index pour performance
-                    self.execute_update("CREATE INDEX IF NOT EXISTS idx_time_entries_bt_id ON time_entries(formulaire_bt_id)")
-                    self.execute_update("CREATE INDEX IF NOT EXISTS idx_operations_bt_id ON operations(formulaire_bt_id)")
-                    self.execute_update("CREATE INDEX IF NOT EXISTS idx_bt_assignations_bt_id ON bt_assignations(bt_id)")
-                    self.execute_update("CREATE INDEX IF NOT EXISTS idx_bt_reservations_bt_id ON bt_reservations_postes(bt_id)")
-                    
-                    # Mise à jour des données si nécessaire
-                    self.execute_update("UPDATE projects SET statut = 'À FAIRE' WHERE statut IS NULL OR statut = ''")
-                    self.execute_update("UPDATE projects SET priorite = 'MOYEN' WHERE priorite IS NULL OR priorite = ''")
-                    
-                    logger.info("✅ Optimisations et nettoyage appliqués")
-                except Exception as e:
-                    logger.error(f"Erreur migration v4: {e}")
-                    
-            if from_version < 5:
-                logger.info("📝 Migration v5: FORCE - Application complète de toutes les améliorations DG Inc...")
-                try:
-                    # ÉTAPE 1: Vérifier et créer colonnes manquantes
-                    logger.info("🔧 Vérification colonnes projects...")
-                    try:
-                        self.execute_update("ALTER TABLE projects ADD COLUMN date_debut_reel DATE")
-                    except Exception:
-                        pass  # Colonne existe déjà
-                    
-                    try:
-                        self.execute_update("ALTER TABLE projects ADD COLUMN date_fin_reel DATE")
-                    except Exception:
-                        pass  # Colonne existe déjà
-                    
-                    # ÉTAPE 2: Vérifier et créer tables BT spécialisées
-                    logger.info("🔧 Vérification tables BT spécialisées...")
-                    self.execute_update('''
-                        CREATE TABLE IF NOT EXISTS bt_assignations (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            bt_id INTEGER NOT NULL,
-                            employee_id INTEGER NOT NULL,
-                            assigned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                            role_assignment TEXT DEFAULT 'Exécutant'
-                        )
-                    ''')
-                    
-                    self.execute_update('''
-                        CREATE TABLE IF NOT EXISTS bt_reservations_postes (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            bt_id INTEGER NOT NULL,
-                            work_center_id INTEGER NOT NULL,
-                            reserved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                            duration_hours REAL DEFAULT 0
-                        )
-                    ''')
-                    
-                    # ÉTAPE 3: Vérifier et créer colonnes formulaire_bt_id
-                    logger.info("🔧 Vérification colonnes formulaire_bt_id...")
-                    try:
-                        self.execute_update("ALTER TABLE time_entries ADD COLUMN formulaire_bt_id INTEGER")
-                    except Exception:
-                        pass  # Colonne existe déjà
-                        
-                    try:
-                        self.execute_update("ALTER TABLE operations ADD COLUMN formulaire_bt_id INTEGER")
-                    except Exception:
-                        pass  # Colonne existe déjà
-                    
-                    # ÉTAPE 4: Créer tous les index de performance
-                    logger.info("🔧 Création index de performance...")
-                    performance_indexes = [
-                        "CREATE INDEX IF NOT EXISTS idx_time_entries_bt_id ON time_entries(formulaire_bt_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_operations_bt_id ON operations(formulaire_bt_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_bt_assignations_bt_id ON bt_assignations(bt_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_bt_reservations_bt_id ON bt_reservations_postes(bt_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_projects_client_id ON projects(client_company_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_time_entries_employee ON time_entries(employee_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_operations_project ON operations(project_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_formulaires_type ON formulaires(type_formulaire)"
-                    ]
-                    
-                    for index_sql in performance_indexes:
-                        try:
-                            self.execute_update(index_sql)
-                        except Exception:
-                            pass  # Index existe peut-être déjà
-                    
-                    # ÉTAPE 5: Nettoyage et cohérence des données
-                    logger.info("🔧 Nettoyage et cohérence des données...")
-                    cleanup_queries = [
-                        "UPDATE projects SET statut = 'À FAIRE' WHERE statut IS NULL OR statut = ''",
-                        "UPDATE projects SET priorite = 'MOYEN' WHERE priorite IS NULL OR priorite = ''",
-                        "UPDATE employees SET statut = 'ACTIF' WHERE statut IS NULL OR statut = ''",
-                        "UPDATE work_centers SET statut = 'ACTIF' WHERE statut IS NULL OR statut = ''",
-                        "UPDATE formulaires SET statut = 'BROUILLON' WHERE statut IS NULL OR statut = ''"
-                    ]
-                    
-                    for cleanup_sql in cleanup_queries:
-                        try:
-                            self.execute_update(cleanup_sql)
-                        except Exception:
-                            pass  # Table peut ne pas exister
-                    
-                    # ÉTAPE 6: Vérification finale
-                    logger.info("🔧 Vérification finale de la base...")
-                    
-                    # Compter les tables principales
-                    tables_count = {}
-                    main_tables = ['projects', 'companies', 'employees', 'work_centers', 'formulaires', 'time_entries', 'operations']
-                    
-                    for table in main_tables:
-                        try:
-                            result = self.execute_query(f"SELECT COUNT(*) as count FROM {table}")
-                            tables_count[table] = result[0]['count'] if result else 0
-                        except Exception:
-                            tables_count[table] = 0
-                    
-                    logger.info(f"✅ Migration v5 terminée - Compteurs: {tables_count}")
-                    
-                except Exception as e:
-                    logger.error(f"❌ Erreur migration v5: {e}")
-                    import traceback
-                    logger.error(f"Traceback: {traceback.format_exc()}")
-            
-            if from_version < 6:
-                logger.info("📝 Migration v6: Ajout fonctionnalités Insightly-style...")
-                try:
-                    # 1. Ajouter colonnes manquantes à interactions
-                    logger.info("🔧 Ajout colonne opportunity_id à interactions...")
-                    try:
-                        self.execute_update("ALTER TABLE interactions ADD COLUMN opportunity_id INTEGER")
-                    except Exception:
-                        pass  # Colonne existe déjà
-                    
-                    # 2. Ajouter colonnes manquantes à opportunities
-                    logger.info("🔧 Ajout colonnes manquantes à opportunities...")
-                    try:
-                        self.execute_update("ALTER TABLE opportunities ADD COLUMN date_derniere_activite DATETIME")
-                    except Exception:
-                        pass
-                    
-                    try:
-                        self.execute_update("ALTER TABLE opportunities ADD COLUMN projet_id INTEGER")
-                    except Exception:
-                        pass
-                    
-                    try:
-                        self.execute_update("ALTER TABLE opportunities ADD COLUMN converted_at DATETIME")
-                    except Exception:
-                        pass
-                    
-                    # 3. Ajouter colonnes manquantes à crm_activities
-                    logger.info("🔧 Ajout colonnes manquantes à crm_activities...")
-                    try:
-                        self.execute_update("ALTER TABLE crm_activities ADD COLUMN projet_id INTEGER")
-                    except Exception:
-                        pass
-                    
-                    try:
-                        self.execute_update("ALTER TABLE crm_activities ADD COLUMN rappel BOOLEAN DEFAULT FALSE")
-                    except Exception:
-                        pass
-                    
-                    try:
-                        self.execute_update("ALTER TABLE crm_activities ADD COLUMN rappel_envoye BOOLEAN DEFAULT FALSE")
-                    except Exception:
-                        pass
-                    
-                    # 4. Créer table calendar_events pour synchronisation bidirectionnelle
-                    logger.info("🔧 Création table calendar_events...")
-                    self.execute_update('''
-                        CREATE TABLE IF NOT EXISTS calendar_events (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            interaction_id INTEGER,
-                            activity_id INTEGER,
-                            opportunity_id INTEGER,
-                            projet_id INTEGER,
-                            titre TEXT NOT NULL,
-                            description TEXT,
-                            date_debut DATETIME NOT NULL,
-                            date_fin DATETIME NOT NULL,
-                            type_event TEXT CHECK(type_event IN 
-                                ('INTERACTION', 'ACTIVITE', 'OPPORTUNITE', 'PROJET', 'AUTRE')),
-                            all_day BOOLEAN DEFAULT FALSE,
-                            lieu TEXT,
-                            couleur TEXT,
-                            rappel_minutes INTEGER,
-                            recurrence_rule TEXT,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            FOREIGN KEY (interaction_id) REFERENCES interactions(id) ON DELETE CASCADE,
-                            FOREIGN KEY (activity_id) REFERENCES crm_activities(id) ON DELETE CASCADE,
-                            FOREIGN KEY (opportunity_id) REFERENCES opportunities(id) ON DELETE CASCADE,
-                            FOREIGN KEY (projet_id) REFERENCES projects(id) ON DELETE CASCADE
-                        )
-                    ''')
-                    
-                    # 5. Créer table workflow_rules pour automatisation
-                    logger.info("🔧 Création table workflow_rules...")
-                    self.execute_update('''
-                        CREATE TABLE IF NOT EXISTS workflow_rules (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            nom TEXT NOT NULL,
-                            description TEXT,
-                            entite_type TEXT CHECK(entite_type IN 
-                                ('OPPORTUNITY', 'INTERACTION', 'ACTIVITY', 'PROJECT')),
-                            trigger_event TEXT NOT NULL,
-                            trigger_conditions_json TEXT,
-                            actions_json TEXT NOT NULL,
-                            actif BOOLEAN DEFAULT TRUE,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                        )
-                    ''')
-                    
-                    # 6. Créer table workflow_logs pour traçabilité
-                    logger.info("🔧 Création table workflow_logs...")
-                    self.execute_update('''
-                        CREATE TABLE IF NOT EXISTS workflow_logs (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            workflow_rule_id INTEGER,
-                            entite_type TEXT,
-                            entite_id INTEGER,
-                            trigger_event TEXT,
-                            actions_executed TEXT,
-                            status TEXT CHECK(status IN ('SUCCESS', 'FAILED', 'PARTIAL')),
-                            error_message TEXT,
-                            executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            FOREIGN KEY (workflow_rule_id) REFERENCES workflow_rules(id)
-                        )
-                    ''')
-                    
-                    # 7. Créer index pour performance
-                    logger.info("🔧 Création index pour fonctionnalités Insightly...")
-                    new_indexes = [
-                        "CREATE INDEX IF NOT EXISTS idx_interactions_opportunity ON interactions(opportunity_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_opportunities_last_activity ON opportunities(date_derniere_activite)",
-                        "CREATE INDEX IF NOT EXISTS idx_calendar_events_dates ON calendar_events(date_debut, date_fin)",
-                        "CREATE INDEX IF NOT EXISTS idx_calendar_events_interaction ON calendar_events(interaction_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_calendar_events_activity ON calendar_events(activity_id)",
-                        "CREATE INDEX IF NOT EXISTS idx_workflow_logs_rule ON workflow_logs(workflow_rule_id)"
-                    ]
-                    
-                    for index_sql in new_indexes:
-                        try:
-                            self.execute_update(index_sql)
-                        except Exception:
-                            pass  # Index existe peut-être déjà
-                    
-                    # 8. Insérer règles workflow par défaut
-                    logger.info("🔧 Insertion règles workflow par défaut...")
-                    default_workflows = [
-                        {
-                            'nom': 'Auto-tâches changement étape opportunité',
-                            'description': 'Crée automatiquement des tâches lors du changement d\'étape',
-                            'entite_type': 'OPPORTUNITY',
-                            'trigger_event': 'STATUS_CHANGED',
-                            'trigger_conditions_json': '{}',
-                            'actions_json': '{"action": "CREATE_STAGE_TASKS"}'
-                        },
-                        {
-                            'nom': 'Suivi automatique après interaction',
-                            'description': 'Crée une activité de suivi après chaque interaction',
-                            'entite_type': 'INTERACTION',
-                            'trigger_event': 'CREATED',
-                            'trigger_conditions_json': '{"has_followup_date": true}',
-                            'actions_json': '{"action": "CREATE_FOLLOWUP_ACTIVITY"}'
-                        }
-                    ]
-                    
-                    for workflow in default_workflows:
-                        try:
-                            self.execute_update('''
-                                INSERT OR IGNORE INTO workflow_rules 
-                                (nom, description, entite_type, trigger_event, trigger_conditions_json, actions_json)
-                                VALUES (?, ?, ?, ?, ?, ?)
-                            ''', (
-                                workflow['nom'],
-                                workflow['description'],
-                                workflow['entite_type'],
-                                workflow['trigger_event'],
-                                workflow['trigger_conditions_json'],
-                                workflow['actions_json']
-                            ))
-                        except Exception as e:
-                            logger.error(f"Erreur insertion workflow: {e}")
-                    
-                    logger.info("✅ Migration v6 terminée - Fonctionnalités Insightly ajoutées")
-                    
-                except Exception as e:
-                    logger.error(f"❌ Erreur migration v6: {e}")
-                    import traceback
-                    logger.error(f"Traceback: {traceback.format_exc()}")
-            
-            # Marquer comme migré
-            self.set_schema_version(to_version)
-            logger.info(f"✅ Migration terminée: schéma v{to_version}")
-            
-        except Exception as e:
-            logger.error(f"❌ Erreur migration schéma: {e}")
-            import traceback
-            logger.error(f"Traceback complet: {traceback.format_exc()}")
+        """Applique les migrations de schéma jusqu'à to_version (une transaction par migration)"""
+        report = MigrationRunner(self.db_path).run(target=to_version)
+        erreurs = [r for r in report if r['status'] != 'OK']
+        if erreurs:
+            raise RuntimeError(f"Erreur migration schéma v{erreurs[0]['version']}: {erreurs[0]['error']}")
+        logger.info(f"✅ Migration terminée: schéma v{to_version}")
+        return report
     
     def init_database(self):
         """Initialise toutes les tables de la base de données ERP avec corrections automatiques intégrées"""
@@ -656,6 +449,8 @@ class ERPDatabase:
                     statut TEXT DEFAULT 'À FAIRE',
                     poste_travail TEXT,
                     operation_legacy_id INTEGER,
+                    date_debut_planifiee TIMESTAMP, -- Planification à capacité finie (scheduling_engine)
+                    date_fin_planifiee TIMESTAMP,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (project_id) REFERENCES projects(id),
                     FOREIGN KEY (work_center_id) REFERENCES work_centers(id),
@@ -1213,6 +1008,9 @@ class ERPDatabase:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_materials_project ON materials(project_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_entries_employee ON time_entries(employee_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_entries_project ON time_entries(project_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_entries_operation ON time_entries(operation_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_entries_punch_in ON time_entries(punch_in)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_entries_punch_out ON time_entries(punch_out)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_contacts_company ON contacts(company_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_competences_employee ON employee_competences(employee_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_companies_secteur ON companies(secteur)')
@@ -1836,6 +1634,8 @@ class ERPDatabase:
                     FOREIGN KEY (created_by) REFERENCES employees(id)
                 )
             ''')
+            # Somme des réservations actives par produit (stock libre, MRP)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_reservations_stock_produit ON reservations_stock(produit_id, statut)')
             
             conn.commit()
             
@@ -1907,6 +1707,15 @@ class ERPDatabase:
                 logger.info("✅ NOUVEAU : Colonne formulaire_bt_id ajoutée à operations")
                 logger.info("✅ NOUVEAU : Index idx_operations_bt créé pour performance")
             
+            # Dates planifiées par l'ordonnancement à capacité finie
+            if 'date_debut_planifiee' not in operations_columns:
+                cursor.execute("ALTER TABLE operations ADD COLUMN date_debut_planifiee TIMESTAMP")
+                logger.info("✅ Colonne date_debut_planifiee ajoutée à operations")
+            
+            if 'date_fin_planifiee' not in operations_columns:
+                cursor.execute("ALTER TABLE operations ADD COLUMN date_fin_planifiee TIMESTAMP")
+                logger.info("✅ Colonne date_fin_planifiee ajoutée à operations")
+            
             # Vérifier et corriger d'autres tables si nécessaire
             # (Cette section peut être étendue pour d'autres corrections automatiques)
             
@@ -2162,101 +1971,57 @@ class ERPDatabase:
             return {}
 
     def get_work_center_utilization_analysis(self, period_days: int = 30) -> List[Dict]:
-        """Analyse d'utilisation des postes de travail avec TimeTracker"""
+        """Analyse d'utilisation des postes de travail avec TimeTracker (agrégats pré-calculés, voir capacity_engine)"""
         try:
-            start_date = (datetime.now() - timedelta(days=period_days)).strftime('%Y-%m-%d')
-            
-            query = '''
-                SELECT 
-                    wc.id, wc.nom, wc.departement, wc.categorie, wc.type_machine,
-                    wc.capacite_theorique, wc.cout_horaire, wc.operateurs_requis,
-                    COALESCE(SUM(te.total_hours), 0) as heures_reelles,
-                    COALESCE(SUM(te.total_cost), 0) as revenus_generes,
-                    COALESCE(AVG(te.hourly_rate), wc.cout_horaire) as taux_horaire_reel,
-                    COUNT(DISTINCT te.id) as nombre_pointages,
-                    COUNT(DISTINCT te.employee_id) as employes_distincts,
-                    COUNT(DISTINCT o.project_id) as projets_touches,
-                    -- Calcul du taux d'utilisation
-                    CASE 
-                        WHEN wc.capacite_theorique > 0 THEN
-                            ROUND((COALESCE(SUM(te.total_hours), 0) / (wc.capacite_theorique * ?)) * 100, 2)
-                        ELSE 0
-                    END as taux_utilisation_pct
-                FROM work_centers wc
-                LEFT JOIN operations o ON wc.id = o.work_center_id
-                LEFT JOIN time_entries te ON o.id = te.operation_id 
-                    AND te.total_cost IS NOT NULL 
-                    AND DATE(te.punch_in) >= ?
-                WHERE wc.statut = 'ACTIF'
-                GROUP BY wc.id
-                ORDER BY heures_reelles DESC
-            '''
-            
-            rows = self.execute_query(query, (period_days, start_date))
+            rows = CapacityEngine(self).get_work_center_load(period_days)
             
             analysis = []
             for row in rows:
                 data = dict(row)
                 
+                # Calcul du taux d'utilisation
+                capacite_periode = (data['capacite_theorique'] or 0) * period_days
+                data['taux_utilisation_pct'] = round(data['heures_reelles'] / capacite_periode * 100, 2) if capacite_periode > 0 else 0
+                
                 # Calculs additionnels
                 if data['heures_reelles'] > 0:
                     data['efficacite_cout'] = data['revenus_generes'] / data['heures_reelles']
-                    data['rentabilite_vs_theorique'] = (data['efficacite_cout'] / data['cout_horaire']) * 100 if data['cout_horaire'] > 0 else 0
+                    data['rentabilite_vs_theorique'] = (data['efficacite_cout'] / data['cout_horaire']) * 100 if data['cout_horaire'] else 0
                 else:
                     data['efficacite_cout'] = 0
                     data['rentabilite_vs_theorique'] = 0
                 
                 # Classification d'utilisation
-                utilisation = data['taux_utilisation_pct']
-                if utilisation >= 80:
-                    data['classification_utilisation'] = 'ÉLEVÉE'
-                elif utilisation >= 50:
-                    data['classification_utilisation'] = 'MOYENNE'
-                elif utilisation >= 20:
-                    data['classification_utilisation'] = 'FAIBLE'
-                else:
-                    data['classification_utilisation'] = 'TRÈS_FAIBLE'
+                data['classification_utilisation'] = classify_utilization(data['taux_utilisation_pct'])
                 
                 analysis.append(data)
             
+            analysis.sort(key=lambda d: d['heures_reelles'], reverse=True)
             return analysis
             
         except Exception as e:
             logger.error(f"Erreur analyse utilisation postes: {e}")
             return []
 
+    def get_work_center_rolling_utilization(self, window_days: int = 7, nb_windows: int = 4) -> List[Dict]:
+        """Utilisation glissante par poste sur nb_windows fenêtres de window_days jours"""
+        try:
+            return CapacityEngine(self).get_rolling_utilization(window_days, nb_windows)
+        except Exception as e:
+            logger.error(f"Erreur utilisation glissante postes: {e}")
+            return []
+
     def get_work_center_capacity_bottlenecks(self) -> List[Dict]:
         """Identifie les goulots d'étranglement dans les postes de travail"""
         try:
-            query = '''
-                SELECT 
-                    wc.id, wc.nom, wc.departement, wc.categorie,
-                    wc.capacite_theorique, wc.operateurs_requis,
-                    -- Charge planifiée (opérations en cours)
-                    COALESCE(SUM(CASE WHEN o.statut IN ('À FAIRE', 'EN COURS') THEN o.temps_estime ELSE 0 END), 0) as charge_planifiee,
-                    -- Charge réelle (TimeTracker)
-                    COALESCE(SUM(CASE WHEN te.punch_out IS NULL THEN 
-                        (JULIANDAY('now') - JULIANDAY(te.punch_in)) * 24 
-                    ELSE 0 END), 0) as charge_en_cours,
-                    COUNT(CASE WHEN o.statut IN ('À FAIRE', 'EN COURS') THEN 1 END) as operations_en_attente,
-                    COUNT(CASE WHEN te.punch_out IS NULL THEN 1 END) as pointages_actifs,
-                    -- Calcul du taux de charge
-                    CASE 
-                        WHEN wc.capacite_theorique > 0 THEN
-                            ROUND(((COALESCE(SUM(CASE WHEN o.statut IN ('À FAIRE', 'EN COURS') THEN o.temps_estime ELSE 0 END), 0) / 
-                                   (wc.capacite_theorique * 5)) * 100), 2) -- Sur 5 jours
-                        ELSE 0
-                    END as taux_charge_planifiee_pct
-                FROM work_centers wc
-                LEFT JOIN operations o ON wc.id = o.work_center_id
-                LEFT JOIN time_entries te ON o.id = te.operation_id
-                WHERE wc.statut = 'ACTIF'
-                GROUP BY wc.id
-                HAVING taux_charge_planifiee_pct > 70  -- Seuil de goulot d'étranglement
-                ORDER BY taux_charge_planifiee_pct DESC
-            '''
-            
-            rows = self.execute_query(query)
+            rows = []
+            for row in CapacityEngine(self).get_work_center_load(period_days=None, include_actual=False):
+                # Taux de charge planifiée sur 5 jours
+                capacite_5j = (row['capacite_theorique'] or 0) * 5
+                row['taux_charge_planifiee_pct'] = round(row['charge_planifiee'] / capacite_5j * 100, 2) if capacite_5j > 0 else 0
+                if row['taux_charge_planifiee_pct'] > 70:  # Seuil de goulot d'étranglement
+                    rows.append(row)
+            rows.sort(key=lambda d: d['taux_charge_planifiee_pct'], reverse=True)
             
             bottlenecks = []
             for row in rows:
@@ -2503,6 +2268,34 @@ class ERPDatabase:
             logger.error(f"Erreur optimisation gamme projet {project_id}: {e}")
             return {'error': str(e)}
 
+    def planifier_operations_capacite_finie(self, save: bool = True) -> Dict[str, Any]:
+        """Ordonnance les opérations ouvertes des BT selon la capacité des postes (voir scheduling_engine)"""
+        try:
+            return FiniteCapacityScheduler(self).run(save=save)
+        except Exception as e:
+            logger.error(f"Erreur planification capacité finie: {e}")
+            return {'error': str(e)}
+
+    def get_planned_load_by_work_center(self) -> List[Dict]:
+        """Synthèse par poste des dates planifiées enregistrées pour les opérations ouvertes"""
+        try:
+            return self.execute_query('''
+                SELECT wc.id, wc.nom, wc.departement, wc.capacite_theorique,
+                       COUNT(o.id) as nb_operations,
+                       COALESCE(SUM(o.temps_estime), 0) as heures_planifiees,
+                       MIN(o.date_debut_planifiee) as debut_planifie,
+                       MAX(o.date_fin_planifiee) as fin_planifiee
+                FROM operations o
+                JOIN work_centers wc ON wc.id = o.work_center_id
+                WHERE o.statut IN ('À FAIRE', 'EN COURS')
+                  AND o.date_fin_planifiee IS NOT NULL
+                GROUP BY wc.id
+                ORDER BY fin_planifiee DESC
+            ''')
+        except Exception as e:
+            logger.error(f"Erreur synthèse planification postes: {e}")
+            return []
+
     def create_operation_for_bt(self, bt_id: int, operation_data: Dict) -> Optional[int]:
         """Crée une opération spécifiquement liée à un Bon de Travail"""
         try:
@@ -2601,6 +2394,140 @@ class ERPDatabase:
             logger.error(f"Erreur récupération BTs avec opérations: {e}")
             return []
 
+    def get_bons_travail_form_data(self, bt_ids: Optional[List[int]] = None,
+                                   statuts: Optional[List[str]] = None,
+                                   priorites: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Charge plusieurs Bons de Travail au format formulaire (tâches + matériaux),
+        en deux requêtes : en-têtes puis lignes de tous les BT (export PDF en lot).
+        Sans bt_ids, les BT sont sélectionnés par statuts/priorités (plus récents d'abord).
+        """
+        try:
+            if bt_ids is not None:
+                bt_ids = list(dict.fromkeys(bt_ids))
+                rows = []
+                # Paquets de 500 : limite de paramètres SQLite
+                for i in range(0, len(bt_ids), 500):
+                    chunk = bt_ids[i:i + 500]
+                    rows.extend(self.execute_query(f'''
+                        SELECT * FROM formulaires
+                        WHERE type_formulaire = 'BON_TRAVAIL' AND id IN ({",".join("?" * len(chunk))})
+                    ''', tuple(chunk)))
+                par_id = {row['id']: row for row in rows}
+                bts = [par_id[bt_id] for bt_id in bt_ids if bt_id in par_id]
+            else:
+                conditions, params = ["type_formulaire = 'BON_TRAVAIL'"], []
+                if statuts:
+                    conditions.append(f"statut IN ({','.join('?' * len(statuts))})")
+                    params.extend(statuts)
+                if priorites:
+                    conditions.append(f"priorite IN ({','.join('?' * len(priorites))})")
+                    params.extend(priorites)
+                bts = self.execute_query(f'''
+                    SELECT * FROM formulaires
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY created_at DESC, id DESC
+                ''', tuple(params) if params else None)
+
+            if not bts:
+                return []
+
+            lignes_par_bt: Dict[int, List[Dict]] = {}
+            ids = [bt['id'] for bt in bts]
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                for ligne in self.execute_query(f'''
+                    SELECT * FROM formulaire_lignes
+                    WHERE formulaire_id IN ({",".join("?" * len(chunk))})
+                    ORDER BY formulaire_id, sequence_ligne
+                ''', tuple(chunk)):
+                    lignes_par_bt.setdefault(ligne['formulaire_id'], []).append(ligne)
+
+            return [self._bt_form_data_from_rows(bt, lignes_par_bt.get(bt['id'], [])) for bt in bts]
+
+        except Exception as e:
+            logger.error(f"Erreur chargement BTs en lot: {e}")
+            return []
+
+    @staticmethod
+    def _bt_form_data_from_rows(bt_data: Dict, lignes: List[Dict]) -> Dict:
+        """Reconstitue le formulaire BT (en-tête, tâches, matériaux) depuis formulaires + formulaire_lignes"""
+        try:
+            metadonnees = json.loads(bt_data.get('metadonnees_json') or '{}')
+        except (ValueError, TypeError):
+            metadonnees = {}
+
+        tasks, materials = [], []
+        for ligne_data in lignes:
+            try:
+                notes_data = json.loads(ligne_data.get('notes_ligne') or '{}')
+            except (ValueError, TypeError):
+                notes_data = {}
+            if not isinstance(notes_data, dict):
+                notes_data = {}
+
+            if (ligne_data.get('sequence_ligne') or 0) >= 1000:  # Matériaux
+                desc = ligne_data.get('description') or ''
+                if desc.startswith('MATERIAU: '):
+                    desc = desc[10:]
+                name_desc = desc.split(' - ', 1)
+                materials.append({
+                    'name': name_desc[0] if name_desc else desc,
+                    'description': name_desc[1] if len(name_desc) > 1 else '',
+                    'quantity': ligne_data.get('quantite', 1.0),
+                    'unit': ligne_data.get('unite', 'pcs'),
+                    'fournisseur': notes_data.get('fournisseur', '-- Interne --'),
+                    'available': notes_data.get('available', 'yes'),
+                    'notes': notes_data.get('notes', '')
+                })
+            else:  # Tâches
+                if 'operation' in notes_data and 'description' in notes_data:
+                    operation = notes_data.get('operation', '')
+                    description = notes_data.get('description', '')
+                else:
+                    # Ancien format : "OPÉRATION - description" ou "TÂCHE - description"
+                    desc = ligne_data.get('description') or ''
+                    if ' - ' in desc:
+                        operation, description = desc.split(' - ', 1)
+                    elif desc.startswith('TÂCHE - '):
+                        operation, description = '', desc.replace('TÂCHE - ', '')
+                    else:
+                        operation, description = desc, ''
+                tasks.append({
+                    'operation': operation,
+                    'description': description,
+                    'quantity': ligne_data.get('quantite', 1),
+                    'planned_hours': ligne_data.get('prix_unitaire', 0.0),
+                    'actual_hours': notes_data.get('actual_hours', 0.0),
+                    'assigned_to': notes_data.get('assigned_to', ''),
+                    'fournisseur': notes_data.get('fournisseur', '-- Interne --'),
+                    'status': notes_data.get('status', 'pending'),
+                    'start_date': notes_data.get('start_date', ''),
+                    'end_date': notes_data.get('end_date', '')
+                })
+
+        return {
+            'id': bt_data['id'],
+            'numero_document': bt_data.get('numero_document'),
+            'project_id': metadonnees.get('project_id', ''),
+            'project_name': metadonnees.get('project_name', ''),
+            'client_name': metadonnees.get('client_name', ''),
+            'client_company_id': metadonnees.get('client_company_id'),
+            'project_manager': metadonnees.get('project_manager', ''),
+            'priority': bt_data.get('priorite', 'NORMAL'),
+            'start_date': metadonnees.get('start_date', ''),
+            'end_date': bt_data.get('date_echeance', ''),
+            'work_instructions': bt_data.get('notes', ''),
+            'safety_notes': metadonnees.get('safety_notes', ''),
+            'quality_requirements': metadonnees.get('quality_requirements', ''),
+            'tasks': tasks,
+            'materials': materials,
+            'created_by': metadonnees.get('created_by', 'Utilisateur'),
+            'statut': bt_data.get('statut', 'BROUILLON'),
+            'date_creation': bt_data.get('created_at', ''),
+            'date_modification': bt_data.get('updated_at', '')
+        }
+
     # =========================================================================
     # MÉTHODES SPÉCIFIQUES À L'INTÉGRATION TIMETRACKER ↔ BONS DE TRAVAIL (ÉTAPE 2)
     # =========================================================================
@@ -2746,6 +2673,8 @@ class ERPDatabase:
                 total_cost,
                 entry_id
             ))
+            # Pointage ouvert le mois dernier : le rapport de ce mois clos change
+            invalidate_monthly_reports(self, entry['punch_in'][:7])
             
             logger.info(f"✅ Pointage BT fermé: entry_id={entry_id}, heures={total_hours:.2f}, coût={total_cost:.2f}$")
             return affected > 0
@@ -3054,6 +2983,9 @@ class ERPDatabase:
                 )
             """)
             
+            if missing_costs or bt_status_updates:
+                # Coûts et statuts corrigés sur des pointages et BT de mois passés
+                invalidate_monthly_reports(self)
             logger.info(f"✅ Synchronisation terminée: {missing_costs} coûts, {missing_rates} taux, {updated_progress} progressions, {bt_status_updates} statuts")
         except Exception as e:
             logger.error(f"Erreur synchronisation: {e}")
@@ -3088,6 +3020,8 @@ class ERPDatabase:
             """)
             
             total_cleaned = old_sessions + zero_hour_sessions + orphan_sessions
+            if total_cleaned:
+                invalidate_monthly_reports(self)
             logger.info(f"✅ {total_cleaned} session(s) nettoyée(s) ({old_sessions} anciennes + {zero_hour_sessions} vides + {orphan_sessions} orphelines)")
             return total_cleaned
         except Exception as e:
@@ -5481,152 +5415,31 @@ class ERPDatabase:
     
     def get_unified_timeline(self, filters: Dict = None) -> List[Dict[str, Any]]:
         """Récupère la timeline unifiée avec tous les événements CRM"""
+        return self.get_unified_timeline_page(filters)['rows']
+
+    def get_unified_timeline_page(self, filters: Dict = None) -> Dict[str, Any]:
+        """
+        Page de la timeline CRM (crm_timeline.TimelineEngine) : filtres
+        contact_id, company_id, date_from, date_to, cursor, direction, limit.
+        """
+        filters = dict(filters or {})
         try:
-            # Paramètres de filtre
-            contact_filter = ""
-            company_filter = ""
-            params = []
-            
-            if filters:
-                if filters.get('contact_id'):
-                    contact_filter = " AND i.contact_id = ?"
-                    params.append(filters['contact_id'])
-                if filters.get('company_id'):
-                    company_filter = " AND i.company_id = ?"
-                    params.append(filters['company_id'])
-            
-            # Requête unifiée pour tous les types d'événements
-            query = f"""
-                -- Interactions
-                SELECT 
-                    'interaction' as type,
-                    i.id,
-                    i.date_interaction as date,
-                    i.type_interaction as sous_type,
-                    i.resume as titre,
-                    i.details as description,
-                    i.contact_id,
-                    i.company_id,
-                    i.opportunity_id,
-                    i.resultat,
-                    c.prenom || ' ' || c.nom_famille as contact_name,
-                    co.nom as company_name,
-                    o.nom as opportunity_name,
-                    NULL as statut,
-                    NULL as priorite
-                FROM interactions i
-                LEFT JOIN contacts c ON i.contact_id = c.id
-                LEFT JOIN companies co ON i.company_id = co.id
-                LEFT JOIN opportunities o ON i.opportunity_id = o.id
-                WHERE 1=1 {contact_filter} {company_filter}
-                
-                UNION ALL
-                
-                -- Activités CRM
-                SELECT 
-                    'activite' as type,
-                    a.id,
-                    a.date_activite as date,
-                    a.type_activite as sous_type,
-                    a.sujet as titre,
-                    a.description,
-                    a.contact_id,
-                    a.company_id,
-                    a.opportunity_id,
-                    NULL as resultat,
-                    c.prenom || ' ' || c.nom_famille as contact_name,
-                    co.nom as company_name,
-                    o.nom as opportunity_name,
-                    a.statut,
-                    a.priorite
-                FROM crm_activities a
-                LEFT JOIN contacts c ON a.contact_id = c.id
-                LEFT JOIN companies co ON a.company_id = co.id
-                LEFT JOIN opportunities o ON a.opportunity_id = o.id
-                WHERE 1=1 {contact_filter.replace('i.', 'a.')} {company_filter.replace('i.', 'a.')}
-                
-                UNION ALL
-                
-                -- Opportunités (création et changements de statut majeurs)
-                SELECT 
-                    'opportunite' as type,
-                    o.id,
-                    o.created_at as date,
-                    o.statut as sous_type,
-                    o.nom as titre,
-                    o.notes as description,
-                    o.contact_id,
-                    o.company_id,
-                    o.id as opportunity_id,
-                    NULL as resultat,
-                    c.prenom || ' ' || c.nom_famille as contact_name,
-                    co.nom as company_name,
-                    o.nom as opportunity_name,
-                    o.statut,
-                    CASE 
-                        WHEN o.montant_estime > 100000 THEN 'Haute'
-                        WHEN o.montant_estime > 50000 THEN 'Normale'
-                        ELSE 'Basse'
-                    END as priorite
-                FROM opportunities o
-                LEFT JOIN contacts c ON o.contact_id = c.id
-                LEFT JOIN companies co ON o.company_id = co.id
-                WHERE o.statut IN ('Prospection', 'Gagné', 'Perdu')
-                {contact_filter.replace('i.', 'o.')} {company_filter.replace('i.', 'o.')}
-                
-                ORDER BY date DESC
-                LIMIT ?
-            """
-            
-            # Ajouter la limite
-            limit = filters.get('limit', 50) if filters else 50
-            params_final = params * 3  # Pour les 3 parties de la requête UNION
-            params_final.append(limit)
-            
-            timeline = self.execute_query(query, tuple(params_final))
-            
-            # Enrichir les données avec des métadonnées supplémentaires
-            for item in timeline:
-                # Ajouter des icônes et couleurs selon le type
-                if item['type'] == 'interaction':
-                    type_icons = {
-                        'Email': '📧', 'Appel': '📞', 'Réunion': '🤝',
-                        'Note': '📝', 'Autre': '💬'
-                    }
-                    item['icon'] = type_icons.get(item['sous_type'], '💬')
-                    item['color'] = self._get_interaction_color(item['sous_type'])
-                elif item['type'] == 'activite':
-                    type_icons = {
-                        'Email': '📧', 'Appel': '📞', 'Réunion': '🤝',
-                        'Tâche': '📋', 'Suivi': '🔄', 'Présentation': '📊'
-                    }
-                    item['icon'] = type_icons.get(item['sous_type'], '📅')
-                    item['color'] = '#3B82F6'  # Bleu pour les activités
-                elif item['type'] == 'opportunite':
-                    status_icons = {
-                        'Prospection': '🎯', 'Gagné': '🏆', 'Perdu': '❌'
-                    }
-                    item['icon'] = status_icons.get(item['sous_type'], '💼')
-                    # Couleurs des statuts d'opportunité
-                    couleurs_statuts = {
-                        "Prospection": "#9CA3AF",
-                        "Qualification": "#3B82F6", 
-                        "Proposition": "#F59E0B",
-                        "Négociation": "#8B5CF6",
-                        "Gagné": "#10B981",
-                        "Perdu": "#EF4444"
-                    }
-                    item['color'] = couleurs_statuts.get(item['sous_type'], '#6B7280')
-                
-                # Formater la date
-                if item['date']:
-                    item['date_formatted'] = self._format_last_activity_date(item['date'])
-            
-            return timeline
+            page = TimelineEngine(self).page(
+                contact_id=filters.get('contact_id'),
+                company_id=filters.get('company_id'),
+                date_from=filters.get('date_from'),
+                date_to=filters.get('date_to'),
+                cursor=filters.get('cursor'),
+                direction=filters.get('direction', 'next'),
+                limit=filters.get('limit', 50),
+            )
+            for item in page['rows']:
+                decorate_event(item, self._format_last_activity_date)
+            return page
             
         except Exception as e:
             logger.error(f"Erreur récupération timeline: {e}")
-            return []
+            return {'rows': [], 'next_cursor': None, 'prev_cursor': None, 'has_next': False, 'has_prev': False}
     
     def _get_interaction_color(self, type_interaction: str) -> str:
         """Retourne la couleur associée au type d'interaction"""
@@ -5868,224 +5681,18 @@ class ERPDatabase:
             logger.error(f"Erreur métriques dashboard unifié: {e}")
             return {}
     
+    def generate_monthly_reports(self, periods: List[Tuple[int, int]]) -> Dict[str, Dict[str, Any]]:
+        """Rapports de plusieurs mois (année, mois) en un balayage par table et par plage"""
+        try:
+            return MonthlyReportEngine(self).reports(periods)
+        except Exception as e:
+            logger.error(f"Erreur génération rapports mensuels: {e}")
+            return {}
+
     def generate_monthly_report(self, year: int, month: int) -> Dict[str, Any]:
-        """Génère un rapport mensuel complet"""
+        """Génère un rapport mensuel complet (balayages de plages de dates, mois clos en cache)"""
         try:
-            report = {
-                'periode': f"{year}-{month:02d}",
-                'formulaires_crees': 0,
-                'montant_commandes': 0.0,
-                'projets_livres': 0,
-                'stocks_mouvements': 0,
-                'performances_fournisseurs': [],
-                'bt_performance': {'total_bt': 0, 'assignations_mois': 0, 'completion_rate': 0.0},
-                'timetracker_bt_mensuel': {'sessions_bt': 0, 'heures_bt': 0.0, 'cout_bt': 0.0},  # ÉTAPE 2
-                'work_centers_performance': {'nouveaux_postes': 0, 'utilisation_moyenne': 0.0, 'revenus_generes': 0.0},  # INTERFACE UNIFIÉE
-                'production_performance': {'nouveaux_bom': 0, 'nouvelles_operations': 0, 'projets_production': 0},  # ÉTAPE 3
-                'operations_bt_performance': {'operations_bt_creees': 0, 'bt_operations_mois': 0, 'temps_operations_bt': 0.0},  # NOUVEAU
-                'communication_tt_performance': {'syncs_effectuees': 0, 'progressions_recalculees': 0, 'sessions_nettoyees': 0},  # NOUVEAU
-                'alertes': []
-            }
-            
-            # Formulaires créés dans le mois
-            query = '''
-                SELECT COUNT(*) as count, SUM(montant_total) as montant
-                FROM formulaires 
-                WHERE strftime('%Y-%m', date_creation) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['formulaires_crees'] = result[0]['count']
-                report['montant_commandes'] = result[0]['montant'] or 0.0
-            
-            # Projets livrés
-            query = '''
-                SELECT COUNT(*) as livres
-                FROM projects 
-                WHERE statut = 'TERMINÉ' 
-                AND strftime('%Y-%m', updated_at) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['projets_livres'] = result[0]['livres']
-            
-            # Mouvements d'inventaire
-            query = '''
-                SELECT COUNT(*) as mouvements
-                FROM inventory_history 
-                WHERE strftime('%Y-%m', created_at) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['stocks_mouvements'] = result[0]['mouvements']
-            
-            # Performances fournisseurs (basique)
-            query = '''
-                SELECT c.nom, COUNT(f.id) as commandes, SUM(f.montant_total) as montant
-                FROM formulaires f
-                JOIN companies c ON f.company_id = c.id
-                WHERE f.type_formulaire IN ('BON_ACHAT', 'BON_COMMANDE')
-                AND strftime('%Y-%m', f.date_creation) = ?
-                GROUP BY c.id, c.nom
-                ORDER BY montant DESC
-                LIMIT 10
-            '''
-            rows = self.execute_query(query, (f"{year}-{month:02d}",))
-            report['performances_fournisseurs'] = [dict(row) for row in rows]
-            
-            # Performance BT mensuelle
-            query = '''
-                SELECT COUNT(*) as total_bt
-                FROM formulaires 
-                WHERE type_formulaire = 'BON_TRAVAIL'
-                AND strftime('%Y-%m', date_creation) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['bt_performance']['total_bt'] = result[0]['total_bt']
-            
-            query = '''
-                SELECT COUNT(*) as assignations
-                FROM bt_assignations 
-                WHERE strftime('%Y-%m', date_assignation) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['bt_performance']['assignations_mois'] = result[0]['assignations']
-            
-            # Calcul taux de completion BT
-            if report['bt_performance']['total_bt'] > 0:
-                query = '''
-                    SELECT COUNT(*) as termines
-                    FROM formulaires 
-                    WHERE type_formulaire = 'BON_TRAVAIL'
-                    AND statut = 'TERMINÉ'
-                    AND strftime('%Y-%m', date_creation) = ?
-                '''
-                result = self.execute_query(query, (f"{year}-{month:02d}",))
-                if result:
-                    termines = result[0]['termines']
-                    report['bt_performance']['completion_rate'] = (termines / report['bt_performance']['total_bt']) * 100
-            
-            # ÉTAPE 2 : Performance TimeTracker BT mensuelle
-            query = '''
-                SELECT 
-                    COUNT(*) as sessions_bt,
-                    COALESCE(SUM(total_hours), 0) as heures_bt,
-                    COALESCE(SUM(total_cost), 0) as cout_bt
-                FROM time_entries 
-                WHERE formulaire_bt_id IS NOT NULL
-                AND strftime('%Y-%m', punch_in) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['timetracker_bt_mensuel']['sessions_bt'] = result[0]['sessions_bt']
-                report['timetracker_bt_mensuel']['heures_bt'] = round(result[0]['heures_bt'], 1)
-                report['timetracker_bt_mensuel']['cout_bt'] = round(result[0]['cout_bt'], 2)
-            
-            # INTERFACE UNIFIÉE : Performance postes de travail mensuelle
-            query = '''
-                SELECT COUNT(*) as nouveaux_postes
-                FROM work_centers
-                WHERE strftime('%Y-%m', created_at) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['work_centers_performance']['nouveaux_postes'] = result[0]['nouveaux_postes']
-            
-            # Utilisation moyenne des postes sur le mois
-            query = '''
-                SELECT 
-                    COALESCE(AVG(wc.capacite_theorique), 0) as capacite_moyenne,
-                    COALESCE(SUM(te.total_hours), 0) as heures_utilisees,
-                    COALESCE(SUM(te.total_cost), 0) as revenus_generes
-                FROM work_centers wc
-                LEFT JOIN operations o ON wc.id = o.work_center_id
-                LEFT JOIN time_entries te ON o.id = te.operation_id 
-                    AND strftime('%Y-%m', te.punch_in) = ?
-                WHERE wc.statut = 'ACTIF'
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                data = dict(result[0])
-                if data['capacite_moyenne'] > 0:
-                    # Calcul approximatif de l'utilisation moyenne du mois (30 jours)
-                    days_in_month = 30
-                    capacity_total_month = data['capacite_moyenne'] * days_in_month
-                    utilization = (data['heures_utilisees'] / capacity_total_month * 100) if capacity_total_month > 0 else 0
-                    report['work_centers_performance']['utilisation_moyenne'] = round(utilization, 2)
-                
-                report['work_centers_performance']['revenus_generes'] = round(data['revenus_generes'], 2)
-            
-            # ÉTAPE 3 : Performance production mensuelle
-            query = '''
-                SELECT COUNT(*) as nouveaux_bom
-                FROM materials
-                WHERE strftime('%Y-%m', created_at) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['production_performance']['nouveaux_bom'] = result[0]['nouveaux_bom']
-            
-            query = '''
-                SELECT COUNT(*) as nouvelles_operations
-                FROM operations
-                WHERE strftime('%Y-%m', created_at) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['production_performance']['nouvelles_operations'] = result[0]['nouvelles_operations']
-            
-            query = '''
-                SELECT COUNT(DISTINCT project_id) as projets_production
-                FROM materials
-                WHERE strftime('%Y-%m', created_at) = ?
-                AND project_id IS NOT NULL
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['production_performance']['projets_production'] = result[0]['projets_production']
-            
-            # NOUVEAU : Performance Operations ↔ BT mensuelle
-            query = '''
-                SELECT COUNT(*) as operations_bt_creees
-                FROM operations
-                WHERE formulaire_bt_id IS NOT NULL
-                AND strftime('%Y-%m', created_at) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['operations_bt_performance']['operations_bt_creees'] = result[0]['operations_bt_creees']
-            
-            query = '''
-                SELECT COUNT(DISTINCT formulaire_bt_id) as bt_operations_mois
-                FROM operations
-                WHERE formulaire_bt_id IS NOT NULL
-                AND strftime('%Y-%m', created_at) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['operations_bt_performance']['bt_operations_mois'] = result[0]['bt_operations_mois']
-            
-            query = '''
-                SELECT COALESCE(SUM(temps_estime), 0) as temps_operations_bt
-                FROM operations
-                WHERE formulaire_bt_id IS NOT NULL
-                AND strftime('%Y-%m', created_at) = ?
-            '''
-            result = self.execute_query(query, (f"{year}-{month:02d}",))
-            if result:
-                report['operations_bt_performance']['temps_operations_bt'] = round(result[0]['temps_operations_bt'], 2)
-            
-            # NOUVEAU : Performance Communication TimeTracker mensuelle (simulée)
-            report['communication_tt_performance'] = {
-                'syncs_effectuees': 30,  # Une par jour approximativement
-                'progressions_recalculees': report['bt_performance']['total_bt'] * 2,  # Estimation
-                'sessions_nettoyees': 5  # Estimation du nettoyage
-            }
-            
-            return report
-            
+            return MonthlyReportEngine(self).report(year, month)
         except Exception as e:
             logger.error(f"Erreur génération rapport mensuel: {e}")
             return {}
@@ -6265,34 +5872,23 @@ class ERPDatabase:
         Retourne la capacité théorique vs utilisée, par produit si applicable
         """
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=period_days)
-            
-            query = """
-                SELECT 
-                    wc.id,
-                    wc.nom as poste_nom,
-                    wc.departement,
-                    wc.type_operation,
-                    wc.capacite_theorique,
-                    wc.taux_horaire,
-                    wc.statut,
-                    COUNT(DISTINCT o.id) as nb_operations,
-                    COUNT(DISTINCT o.project_id) as nb_projets,
-                    COALESCE(SUM(o.temps_estime), 0) as temps_planifie,
-                    COALESCE(SUM(te.total_hours), 0) as temps_reel,
-                    COUNT(DISTINCT te.employee_id) as nb_employes,
-                    COUNT(DISTINCT DATE(te.punch_in)) as jours_actifs
-                FROM work_centers wc
-                LEFT JOIN operations o ON wc.id = o.work_center_id
-                    AND o.created_at >= ?
-                LEFT JOIN time_entries te ON o.id = te.operation_id
-                    AND te.punch_in >= ?
-                GROUP BY wc.id
-                ORDER BY wc.departement, wc.nom
-            """
-            
-            results = self.execute_query(query, (start_date, start_date))
+            results = []
+            for row in CapacityEngine(self).get_work_center_load(period_days, actifs_seulement=False, planned_in_window=True):
+                results.append({
+                    'id': row['id'],
+                    'poste_nom': row['nom'],
+                    'departement': row['departement'],
+                    'type_operation': row['categorie'],
+                    'capacite_theorique': row['capacite_theorique'] or 0,
+                    'taux_horaire': row['cout_horaire'] or 0,
+                    'statut': row['statut'],
+                    'nb_operations': row['nb_operations_total'],
+                    'nb_projets': row['projets_touches'],
+                    'temps_planifie': row['temps_planifie'],
+                    'temps_reel': row['heures_reelles'],
+                    'nb_employes': row['employes_distincts'],
+                    'jours_actifs': row['jours_actifs']
+                })
             
             capacity_data = []
             for row in results:
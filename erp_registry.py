@@ -0,0 +1,110 @@
+# erp_registry.py - Registre des ressources ERP partagées par processus
+"""
+Registre process-wide des objets coûteux à construire (ERPDatabase, gestionnaires
+de modules, stockage persistant).
+
+Streamlit ré-exécute app.py pour chaque session : sans registre, chaque nouvel
+utilisateur reconstruisait une ERPDatabase (DDL complet + migrations) puis chaque
+gestionnaire relançait ses vérifications de tables et ses données de démo.
+Ici, chaque ressource est construite une seule fois par processus et par clé
+(typiquement le chemin de la base), puis partagée entre toutes les sessions.
+LazyResource retarde en plus la construction au premier accès : une page qui
+n'utilise pas un gestionnaire ne paie ni l'import de son module ni sa création.
+
+Les gestionnaires n'ouvrent que des connexions SQLite courtes par requête
+(execute_query / execute_update), ils peuvent donc être partagés entre threads.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_resources: Dict[Tuple[str, Hashable], Any] = {}
+_build_times: Dict[Tuple[str, Hashable], float] = {}
+_registry_lock = threading.RLock()
+
+
+def get_shared_resource(name: str, factory: Callable[[], Any], key: Hashable = None) -> Any:
+    """
+    Retourne la ressource partagée (name, key), en la construisant avec factory()
+    au premier appel du processus. La construction est protégée par un verrou :
+    deux sessions qui démarrent en même temps ne construisent pas deux instances.
+    """
+    resource_key = (name, key)
+    resource = _resources.get(resource_key)
+    if resource is not None:
+        return resource
+
+    with _registry_lock:
+        resource = _resources.get(resource_key)
+        if resource is None:
+            start = time.perf_counter()
+            resource = factory()
+            _build_times[resource_key] = time.perf_counter() - start
+            if resource is not None:
+                _resources[resource_key] = resource
+            logger.info(f"♻️ Ressource partagée '{name}' construite en {_build_times[resource_key] * 1000:.0f} ms")
+    return resource
+
+
+class LazyResource:
+    """
+    Proxy d'une ressource partagée : get_shared_resource() n'est appelé qu'au premier
+    accès à un attribut (ou test de vérité). Faux si la ressource n'a pas pu être construite.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], key: Hashable = None):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_key', key)
+
+    def resolve(self) -> Optional[Any]:
+        return get_shared_resource(self._name, self._factory, key=self._key)
+
+    def _target(self) -> Any:
+        resource = self.resolve()
+        if resource is None:
+            raise AttributeError(f"Ressource '{self._name}' non disponible")
+        return resource
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._target(), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._target(), attr, value)
+
+    def __bool__(self) -> bool:
+        return self.resolve() is not None
+
+    def __repr__(self) -> str:
+        built = (self._name, self._key) in _resources
+        return f"<ressource partagée '{self._name}' {'construite' if built else 'paresseuse'}>"
+
+
+def invalidate_shared_resource(name: str, key: Hashable = None) -> None:
+    """Oublie une ressource partagée : elle sera reconstruite au prochain accès"""
+    with _registry_lock:
+        _resources.pop((name, key), None)
+        _build_times.pop((name, key), None)
+
+
+def clear_shared_resources() -> None:
+    """Oublie toutes les ressources (ex. après restauration de la base)"""
+    with _registry_lock:
+        _resources.clear()
+        _build_times.clear()
+
+
+def get_registry_stats() -> Dict[str, Any]:
+    """Ressources chargées et leur temps de construction (ms), pour diagnostic"""
+    with _registry_lock:
+        return {
+            'nb_ressources': len(_resources),
+            'ressources': {
+                f"{name}@{key}" if key is not None else name: round(_build_times.get((name, key), 0) * 1000, 1)
+                for name, key in _resources
+            }
+        }
@@ -0,0 +1,401 @@
+# erp_retrieval.py - Index de recherche BM25 local sur les enregistrements ERP pour l'assistant IA
+"""
+Recherche des enregistrements ERP pertinents pour une question.
+
+_search_erp_data ne cherchait que si la question contenait un mot déclencheur
+('projet', 'stock', 'bt'...) puis faisait un LIKE '%question entière%' : une
+question en langage naturel ne trouvait presque jamais rien, et une question
+sans mot déclencheur n'emportait aucune donnée. Ici :
+- RetrievalIndex indexe hors ligne projets, bons de travail, devis, produits,
+  inventaire, entreprises, contacts, employés et interactions : texte
+  normalisé comme les questions du cache (answer_cache.significant_words),
+  le premier champ (nom, numéro) compte double ;
+- le classement est BM25 : listes inversées par terme (positions et
+  fréquences en tableaux NumPy, compilées à la demande), scores accumulés
+  vectoriellement puis top-k par argpartition ;
+- l'index se tient à jour par source : quand l'empreinte des tables
+  (data_versions, comme le cache des réponses ; produits et compétences
+  depuis la migration v11) change, la source est relue mais seuls les
+  enregistrements dont le texte a changé sont re-tokenisés, les disparus
+  sont retirés ; refresh_record() met à jour un enregistrement précis après
+  une écriture ;
+- un index par base, partagé entre les sessions (get_retrieval_index()),
+  empreintes vérifiées au plus toutes les SYNC_CHECK_SECONDS.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from answer_cache import data_fingerprint, significant_words
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 8
+# Paramètres BM25 usuels
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Intervalle minimum entre deux vérifications des empreintes des sources
+SYNC_CHECK_SECONDS = 2.0
+
+
+def _titre_formulaire(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Titre et client d'un BT ou devis : métadonnées JSON, sinon première ligne"""
+    titre, client = None, None
+    if record.get('metadonnees_json'):
+        try:
+            meta = json.loads(record['metadonnees_json'])
+            titre = meta.get('project_name') or meta.get('objet')
+            client = meta.get('client_name')
+        except (TypeError, ValueError):
+            pass
+    record['titre'] = titre or record.get('premiere_ligne') or 'Sans titre'
+    record['client'] = client or 'N/A'
+    return record
+
+
+# (type, tables surveillées, requête (colonne id obligatoire), champs indexés, préparation)
+RETRIEVAL_SOURCES: Tuple[Tuple[str, Tuple[str, ...], str, Tuple[str, ...], Optional[Callable]], ...] = (
+    ('projets', ('projects', 'companies'), """
+        SELECT p.id, p.nom_projet, p.statut, p.priorite, p.date_prevu, p.prix_estime, p.description,
+               COALESCE(c.nom, p.client_nom_cache) as client_nom
+        FROM projects p
+        LEFT JOIN companies c ON p.client_company_id = c.id
+    """, ('nom_projet', 'client_nom', 'statut', 'priorite', 'description'), None),
+    ('bons_travail', ('formulaires', 'formulaire_lignes'), """
+        SELECT f.id, f.numero_document, f.statut, f.priorite, f.created_at, f.metadonnees_json, f.notes,
+               (SELECT fl.description FROM formulaire_lignes fl WHERE fl.formulaire_id = f.id
+                ORDER BY fl.sequence_ligne LIMIT 1) as premiere_ligne,
+               (SELECT GROUP_CONCAT(fl.description, ' ') FROM formulaire_lignes fl
+                WHERE fl.formulaire_id = f.id) as lignes
+        FROM formulaires f
+        WHERE f.type_formulaire = 'BON_TRAVAIL'
+    """, ('numero_document', 'titre', 'client', 'statut', 'priorite', 'notes', 'lignes'), _titre_formulaire),
+    ('devis', ('formulaires', 'formulaire_lignes'), """
+        SELECT f.id, f.numero_document, f.statut, f.priorite, f.created_at, f.metadonnees_json, f.notes,
+               f.montant_total,
+               (SELECT fl.description FROM formulaire_lignes fl WHERE fl.formulaire_id = f.id
+                ORDER BY fl.sequence_ligne LIMIT 1) as premiere_ligne,
+               (SELECT GROUP_CONCAT(fl.description, ' ') FROM formulaire_lignes fl
+                WHERE fl.formulaire_id = f.id) as lignes
+        FROM formulaires f
+        WHERE f.type_formulaire = 'ESTIMATION'
+    """, ('numero_document', 'titre', 'client', 'statut', 'notes', 'lignes'), _titre_formulaire),
+    ('produits', ('produits',), """
+        SELECT id, code_produit, nom, categorie, materiau, nuance, dimensions, unite_vente, prix_unitaire,
+               stock_disponible, stock_minimum, fournisseur_principal, description
+        FROM produits
+        WHERE actif = 1
+    """, ('nom', 'code_produit', 'categorie', 'materiau', 'nuance', 'dimensions', 'fournisseur_principal',
+          'description'), None),
+    ('inventaire', ('inventory_items',), """
+        SELECT id, nom, code_interne, type_produit, quantite_metric, statut, fournisseur_principal, description
+        FROM inventory_items
+    """, ('nom', 'code_interne', 'type_produit', 'statut', 'fournisseur_principal', 'description'), None),
+    ('entreprises', ('companies',), """
+        SELECT id, nom, secteur, type_company, adresse, site_web, notes
+        FROM companies
+    """, ('nom', 'secteur', 'type_company', 'adresse', 'notes'), None),
+    ('contacts', ('contacts', 'companies'), """
+        SELECT c.id, c.prenom, c.nom_famille, c.email, c.telephone, c.role_poste, comp.nom as entreprise_nom
+        FROM contacts c
+        LEFT JOIN companies comp ON c.company_id = comp.id
+    """, ('nom_famille', 'prenom', 'entreprise_nom', 'role_poste', 'email'), None),
+    ('employes', ('employees', 'employee_competences'), """
+        SELECT e.id, e.nom, e.prenom, e.poste, e.departement, e.statut,
+               (SELECT GROUP_CONCAT(ec.nom_competence || ' (' || ec.niveau || ')', ', ')
+                FROM employee_competences ec WHERE ec.employee_id = e.id) as competences
+        FROM employees e
+    """, ('nom', 'prenom', 'poste', 'departement', 'competences'), None),
+    ('interactions', ('interactions', 'contacts', 'companies'), """
+        SELECT i.id, i.type_interaction, i.date_interaction, i.resume, i.details, i.resultat,
+               comp.nom as entreprise_nom, c.prenom || ' ' || c.nom_famille as contact_nom
+        FROM interactions i
+        LEFT JOIN companies comp ON i.company_id = comp.id
+        LEFT JOIN contacts c ON i.contact_id = c.id
+    """, ('resume', 'entreprise_nom', 'contact_nom', 'type_interaction', 'details', 'resultat'), None),
+)
+
+RETRIEVAL_TYPES = tuple(source[0] for source in RETRIEVAL_SOURCES)
+TYPE_LABELS = {
+    'projets': 'Projets', 'bons_travail': 'Bons de travail', 'devis': 'Devis', 'produits': 'Produits',
+    'inventaire': "Articles d'inventaire", 'entreprises': 'Entreprises', 'contacts': 'Contacts',
+    'employes': 'Employés', 'interactions': 'Interactions CRM',
+}
+_SOURCES_BY_TYPE = {source[0]: source for source in RETRIEVAL_SOURCES}
+
+_indexes: Dict[str, 'RetrievalIndex'] = {}
+_index_lock = threading.RLock()
+
+
+def document_terms(record: Dict[str, Any], fields: Sequence[str]) -> List[str]:
+    """Termes indexés d'un enregistrement ; le premier champ compte double"""
+    terms: List[str] = []
+    for position, field in enumerate(fields):
+        value = record.get(field)
+        if value is None or value == '':
+            continue
+        words = significant_words(str(value))
+        terms.extend(words * 2 if position == 0 else words)
+    return terms
+
+
+def describe_record(doc_type: str, record: Dict[str, Any], max_length: int = 160) -> str:
+    """Ligne lisible d'un enregistrement : ses champs indexés, tronqués à max_length"""
+    fields = _SOURCES_BY_TYPE[doc_type][3]
+    texte = ' — '.join(' '.join(str(record[f]).split()) for f in fields if record.get(f) not in (None, ''))
+    return texte if len(texte) <= max_length else texte[:max_length - 1] + '…'
+
+
+class RetrievalIndex:
+    """Index BM25 des enregistrements ERP, mis à jour enregistrement par enregistrement"""
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.RLock()
+        # Un emplacement par document ; les emplacements libérés sont réutilisés
+        self._slots: Dict[Tuple[str, Any], int] = {}
+        self._keys: List[Optional[Tuple[str, Any]]] = []
+        self._records: List[Optional[Dict[str, Any]]] = []
+        self._signatures: List[Optional[int]] = []
+        self._terms: List[Tuple[str, ...]] = []
+        self._lengths = np.zeros(64, dtype=np.float32)
+        self._type_codes = np.full(64, -1, dtype=np.int16)
+        self._type_ids: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._total_length = 0
+        # Terme -> {emplacement: fréquence} ; version NumPy compilée à la demande
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._compiled: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.checked_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    # =========================================================================
+    # MISE À JOUR INCRÉMENTALE
+    # =========================================================================
+
+    def upsert(self, doc_type: str, doc_id: Any, record: Dict[str, Any], fields: Sequence[str]) -> bool:
+        """Ajoute ou remplace un document ; False (sans re-tokeniser) si ses champs indexés n'ont pas changé"""
+        signature = hash(tuple(record.get(field) for field in fields))
+        key = (doc_type, doc_id)
+        with self.lock:
+            slot = self._slots.get(key)
+            if slot is not None and self._signatures[slot] == signature:
+                self._records[slot] = record
+                return False
+            self.remove(doc_type, doc_id)
+            terms = document_terms(record, fields)
+            if not terms:
+                return True
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._keys)
+                self._keys.append(None)
+                self._records.append(None)
+                self._signatures.append(None)
+                self._terms.append(())
+                if slot >= len(self._lengths):
+                    self._lengths = np.concatenate([self._lengths, np.zeros(len(self._lengths), np.float32)])
+                    self._type_codes = np.concatenate([self._type_codes, np.full(len(self._type_codes), -1,
+                                                                                 np.int16)])
+            counts = Counter(terms)
+            self._slots[key] = slot
+            self._keys[slot] = key
+            self._records[slot] = record
+            self._signatures[slot] = signature
+            self._terms[slot] = tuple(counts)
+            self._lengths[slot] = len(terms)
+            self._type_codes[slot] = self._type_ids.setdefault(doc_type, len(self._type_ids))
+            self._total_length += len(terms)
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[slot] = tf
+                self._compiled.pop(term, None)
+            return True
+
+    def remove(self, doc_type: str, doc_id: Any) -> bool:
+        with self.lock:
+            slot = self._slots.pop((doc_type, doc_id), None)
+            if slot is None:
+                return False
+            for term in self._terms[slot]:
+                posting = self._postings.get(term)
+                if posting is not None:
+                    posting.pop(slot, None)
+                    if not posting:
+                        del self._postings[term]
+                self._compiled.pop(term, None)
+            self._total_length -= int(self._lengths[slot])
+            self._lengths[slot] = 0
+            self._type_codes[slot] = -1
+            self._keys[slot] = None
+            self._records[slot] = None
+            self._signatures[slot] = None
+            self._terms[slot] = ()
+            self._free.append(slot)
+            return True
+
+    def ids(self, doc_type: str) -> List[Any]:
+        with self.lock:
+            return [doc_id for (t, doc_id) in self._slots if t == doc_type]
+
+    def sync(self, db, types: Optional[Sequence[str]] = None, force: bool = False) -> Dict[str, int]:
+        """
+        Relit les sources dont l'empreinte a changé (toutes si force) ; seuls
+        les enregistrements modifiés sont re-tokenisés. Rend le nombre de
+        documents ajoutés, modifiés ou retirés par source relue.
+        """
+        changes: Dict[str, int] = {}
+        with self.lock:
+            for doc_type, tables, query, fields, prepare in RETRIEVAL_SOURCES:
+                if types is not None and doc_type not in types:
+                    continue
+                fingerprint = data_fingerprint(db, tables)
+                if not force and self.fingerprints.get(doc_type) == fingerprint:
+                    continue
+                try:
+                    rows = db.execute_query(query)
+                except Exception as e:
+                    # Table absente de cette base (module non installé)
+                    logger.debug(f"Index ERP : source '{doc_type}' ignorée ({e})")
+                    rows = []
+                changed = 0
+                seen = set()
+                for row in rows:
+                    record = prepare(dict(row)) if prepare else dict(row)
+                    seen.add(record['id'])
+                    if self.upsert(doc_type, record['id'], record, fields):
+                        changed += 1
+                for doc_id in set(self.ids(doc_type)) - seen:
+                    self.remove(doc_type, doc_id)
+                    changed += 1
+                self.fingerprints[doc_type] = fingerprint
+                changes[doc_type] = changed
+            self.checked_at = time.monotonic()
+        if any(changes.values()):
+            logger.info(f"🔎 Index ERP : {sum(changes.values())} document(s) mis à jour "
+                        f"({', '.join(f'{t}: {n}' for t, n in changes.items() if n)}) — {len(self)} au total")
+        return changes
+
+    def refresh_record(self, db, doc_type: str, doc_id: Any) -> None:
+        """Recharge un seul enregistrement (retiré s'il n'existe plus)"""
+        _, _, query, fields, prepare = _SOURCES_BY_TYPE[doc_type]
+        rows = db.execute_query(f"SELECT * FROM ({query}) WHERE id = ?", (doc_id,))
+        with self.lock:
+            if rows:
+                record = prepare(dict(rows[0])) if prepare else dict(rows[0])
+                self.upsert(doc_type, doc_id, record, fields)
+            else:
+                self.remove(doc_type, doc_id)
+
+    # =========================================================================
+    # RECHERCHE
+    # =========================================================================
+
+    def _posting(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        compiled = self._compiled.get(term)
+        if compiled is None:
+            posting = self._postings.get(term)
+            if not posting:
+                return None
+            compiled = (np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                        np.fromiter(posting.values(), dtype=np.float32, count=len(posting)))
+            self._compiled[term] = compiled
+        return compiled
+
+    def search(self, question: str, k: int = DEFAULT_TOP_K,
+               types: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Top-k documents pour la question : [{'type', 'id', 'score', 'record'}], meilleur en premier"""
+        terms = set(significant_words(question))
+        with self.lock:
+            nb_docs = len(self._slots)
+            if not terms or not nb_docs or k <= 0:
+                return []
+            size = len(self._keys)
+            scores = np.zeros(size, dtype=np.float32)
+            lengths = self._lengths[:size]
+            norms = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / nb_docs))
+            for term in terms:
+                posting = self._posting(term)
+                if posting is None:
+                    continue
+                slots, tfs = posting
+                idf = math.log(1 + (nb_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+                scores[slots] += idf * tfs * (self.k1 + 1) / (tfs + norms[slots])
+            if types is not None:
+                codes = [self._type_ids[t] for t in types if t in self._type_ids]
+                scores[~np.isin(self._type_codes[:size], codes)] = 0
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+            return [{'type': self._keys[slot][0], 'id': self._keys[slot][1],
+                     'score': round(float(scores[slot]), 4), 'record': dict(self._records[slot])}
+                    for slot in candidates]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            by_type = Counter(doc_type for doc_type, _ in self._slots)
+            return {'documents': len(self._slots), 'terms': len(self._postings),
+                    'by_type': dict(by_type), 'avg_length': round(self._total_length / len(self._slots), 1)
+                    if self._slots else 0.0}
+
+
+# =========================================================================
+# INDEX PARTAGÉ
+# =========================================================================
+
+def _cache_key(db) -> str:
+    db_path = getattr(db, 'db_path', None)
+    return os.path.abspath(db_path) if db_path else f"db-{id(db)}"
+
+
+def get_retrieval_index(db, force_sync: bool = False) -> RetrievalIndex:
+    """Index partagé pour cette base ; empreintes revérifiées au plus toutes les SYNC_CHECK_SECONDS"""
+    key = _cache_key(db)
+    index = _indexes.get(key)
+    if index and not force_sync and time.monotonic() - index.checked_at < SYNC_CHECK_SECONDS:
+        return index
+    with _index_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = RetrievalIndex()
+            _indexes[key] = index
+        index.sync(db)
+        return index
+
+
+def search_records(db, question: str, k: int = DEFAULT_TOP_K,
+                   types: Optional[Sequence[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Enregistrements les plus pertinents groupés par type ({'projets': [...], ...}), ordre du score"""
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for hit in get_retrieval_index(db).search(question, k=k, types=types):
+        grouped.setdefault(hit['type'], []).append(dict(hit['record'], score_pertinence=hit['score']))
+    return grouped
+
+
+def refresh_record(db, doc_type: str, doc_id: Any) -> None:
+    """Après une écriture : met à jour ce seul enregistrement dans l'index (s'il est chargé)"""
+    index = _indexes.get(_cache_key(db))
+    if index is not None:
+        index.refresh_record(db, doc_type, doc_id)
+
+
+def invalidate_index(db=None) -> None:
+    """Oublie l'index d'une base (ou de toutes) : reconstruit au prochain accès"""
+    with _index_lock:
+        if db is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(_cache_key(db), None)
@@ -4,18 +4,17 @@
 import os
 import io
 import base64
-import csv
 from datetime import datetime
 import time # Import time for potential delays/retries
 import re
-from collections import Counter
 
-import PyPDF2
-import docx
-# import openpyxl # Uncomment this line ONLY if you keep/uncomment the XLSX reading code below
 from PIL import Image
 from anthropic import Anthropic, APIError # Importer APIError pour une meilleure gestion des erreurs
-from bs4 import BeautifulSoup
+
+from document_extraction import SUPPORTED_FORMATS, extract_documents, is_extraction_error
+from document_mapreduce import analyze_in_chunks, needs_chunking, usage_report
+from llm_gateway import instrument
+from llm_streaming import stream_message
 
 # Constants
 SEPARATOR_DOUBLE = "=" * 50
@@ -102,14 +101,13 @@ class ExpertAdvisor:
             if not api_key:
                 raise ValueError("Clé API Anthropic manquante.")
                 
-        self.anthropic = Anthropic(api_key=api_key)
+        self.anthropic = instrument(Anthropic(api_key=api_key), 'expert_advisor')
         print("Client API Anthropic initialisé.")
         # Utiliser un modèle plus standard pour éviter les erreurs 400
         self.model_name_global = "claude-sonnet-4-20250514"
         print(f"Utilisation globale du modèle : {self.model_name_global}")
 
-        self.supported_formats = ['.pdf', '.docx', '.xlsx', '.csv', '.txt', '.html',
-                                  '.jpg', '.jpeg', '.png', '.webp']
+        self.supported_formats = list(SUPPORTED_FORMATS)
         self.profile_manager = ExpertProfileManager()
         all_profiles = self.profile_manager.get_all_profiles()
         self.current_profile_id = list(all_profiles.keys())[0] if all_profiles else "default_expert"
@@ -145,246 +143,18 @@ class ExpertAdvisor:
         return [ext.lstrip('.') for ext in self.supported_formats]
 
     def read_file(self, uploaded_file):
-        file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-        if file_ext not in self.supported_formats:
-            return f"Format de fichier non supporté: {uploaded_file.name}. Formats acceptés: {', '.join(self.supported_formats)}"
-        try:
-            file_bytes = uploaded_file.getvalue()
-            file_stream = io.BytesIO(file_bytes)
-            if file_ext == '.pdf': return self._read_pdf(file_stream, uploaded_file.name)
-            elif file_ext == '.docx': return self._read_docx(file_stream, uploaded_file.name)
-            elif file_ext in ['.xlsx', '.csv']: return self._read_spreadsheet(file_stream, uploaded_file.name, file_ext)
-            elif file_ext == '.txt': return self._read_txt(file_stream, uploaded_file.name)
-            elif file_ext == '.html': return self._read_html(file_stream, uploaded_file.name)
-            elif file_ext in ['.jpg', '.jpeg', '.png', '.webp']: return self._read_image(file_bytes, uploaded_file.name, file_ext)
-            else: return f"Format de fichier interne non géré : {uploaded_file.name}"
-        except Exception as e: return f"Erreur générale lors de la lecture du fichier {uploaded_file.name}: {str(e)}"
-
-    def _read_pdf(self, file_stream, filename):
-        text = ""
-        try:
-            file_stream.seek(0)
-            pdf_reader = PyPDF2.PdfReader(file_stream)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text: text += page_text + "\n"
-            if not text: return f"Aucun texte n'a pu être extrait de {filename}. Le PDF est-il basé sur une image ou protégé ?"
-            return text
-        except Exception as e: return f"Erreur lors de la lecture du PDF {filename}: {str(e)}"
-
-    def _read_docx(self, file_stream, filename):
-        try:
-            file_stream.seek(0)
-            doc = docx.Document(file_stream)
-            return "\n".join([p.text for p in doc.paragraphs if p.text is not None])
-        except Exception as e: return f"Erreur lors de la lecture du DOCX {filename}: {str(e)}"
-
-    def _read_spreadsheet(self, file_stream, filename, file_ext):
-        try:
-            if file_ext == '.csv':
-                file_stream.seek(0)
-                decoded_content = None
-                try: decoded_content = file_stream.read().decode('utf-8')
-                except UnicodeDecodeError:
-                    print(f"Décodage UTF-8 échoué pour {filename}, essai avec Latin-1.")
-                    file_stream.seek(0)
-                    try: decoded_content = file_stream.read().decode('latin1')
-                    except Exception as de: return f"Erreur de décodage pour {filename}: {str(de)}"
-                if decoded_content is None: return f"Impossible de décoder le contenu de {filename}."
-                text_stream = io.StringIO(decoded_content)
-                reader = csv.reader(text_stream)
-                output_string_io = io.StringIO()
-                writer = csv.writer(output_string_io, delimiter=',', quoting=csv.QUOTE_MINIMAL)
-                for row in reader: writer.writerow(row)
-                return output_string_io.getvalue()
-            elif file_ext == '.xlsx':
-                return f"INFO: Le format XLSX nécessite 'openpyxl'. Pour l'activer, décommentez le code et ajoutez à requirements.txt."
-        except Exception as e: return f"Erreur lors du traitement du tableur {filename}: {str(e)}"
-
-    def _read_txt(self, file_stream, filename):
-        try:
-            file_stream.seek(0)
-            try: return file_stream.read().decode('utf-8')
-            except UnicodeDecodeError:
-                print(f"Décodage UTF-8 échoué pour {filename}, essai avec Latin-1.")
-                file_stream.seek(0)
-                try: return file_stream.read().decode('latin1')
-                except UnicodeDecodeError:
-                    print(f"Décodage Latin-1 échoué pour {filename}, essai avec cp1252.")
-                    file_stream.seek(0)
-                    return file_stream.read().decode('cp1252', errors='replace')
-        except Exception as e: return f"Erreur lors de la lecture du TXT {filename}: {str(e)}"
-
-    def _read_html(self, file_stream, filename):
-        """
-        Analyse les fichiers HTML et extrait le contenu structuré
-        """
-        try:
-            file_stream.seek(0)
-            
-            # Tentative de décodage avec plusieurs encodages
-            html_content = None
-            encodings_to_try = ['utf-8', 'latin1', 'cp1252', 'iso-8859-1']
-            
-            for encoding in encodings_to_try:
-                try:
-                    file_stream.seek(0)
-                    html_content = file_stream.read().decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            
-            if html_content is None:
-                return f"Erreur de décodage pour {filename}: impossible de décoder avec les encodages standard."
-            
-            # Parse HTML avec BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Extraction des métadonnées et du contenu structuré
-            analysis_parts = []
-            
-            # 1. Métadonnées du document
-            analysis_parts.append("=== MÉTADONNÉES HTML ===")
-            
-            # Titre
-            title = soup.find('title')
-            if title:
-                analysis_parts.append(f"Titre: {title.get_text().strip()}")
-            
-            # Meta tags importantes
-            meta_description = soup.find('meta', attrs={'name': 'description'})
-            if meta_description:
-                analysis_parts.append(f"Description: {meta_description.get('content', '')}")
-            
-            meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
-            if meta_keywords:
-                analysis_parts.append(f"Mots-clés: {meta_keywords.get('content', '')}")
-            
-            # Langue du document
-            html_tag = soup.find('html')
-            if html_tag and html_tag.get('lang'):
-                analysis_parts.append(f"Langue: {html_tag.get('lang')}")
-            
-            # 2. Structure du document
-            analysis_parts.append("\n=== STRUCTURE DU DOCUMENT ===")
-            
-            # Titres hiérarchiques
-            headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-            if headings:
-                analysis_parts.append("Titres trouvés:")
-                for heading in headings[:10]:  # Limiter à 10 titres
-                    level = heading.name.upper()
-                    text = heading.get_text().strip()
-                    if text:
-                        analysis_parts.append(f"  {level}: {text}")
-            
-            # 3. Contenu textuel principal
-            analysis_parts.append("\n=== CONTENU TEXTUEL ===")
-            
-            # Supprimer les scripts et styles
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Extraire le texte principal
-            main_content = soup.get_text()
-            
-            # Nettoyer le texte (supprimer les espaces multiples, lignes vides)
-            cleaned_text = re.sub(r'\s+', ' ', main_content).strip()
-            
-            # Limiter la longueur pour éviter les textes trop longs
-            if len(cleaned_text) > 3000:
-                cleaned_text = cleaned_text[:3000] + "... [TEXTE TRONQUÉ]"
-            
-            analysis_parts.append(cleaned_text)
-            
-            # 4. Liens et ressources
-            analysis_parts.append("\n=== LIENS ET RESSOURCES ===")
-            
-            # Liens externes
-            links = soup.find_all('a', href=True)
-            external_links = [link['href'] for link in links if link['href'].startswith(('http', 'https'))]
-            if external_links:
-                analysis_parts.append(f"Liens externes trouvés: {len(external_links)}")
-                # Afficher les 5 premiers liens
-                for link in external_links[:5]:
-                    analysis_parts.append(f"  - {link}")
-                if len(external_links) > 5:
-                    analysis_parts.append(f"  ... et {len(external_links) - 5} autres")
-            
-            # Images
-            images = soup.find_all('img', src=True)
-            if images:
-                analysis_parts.append(f"Images trouvées: {len(images)}")
-            
-            # 5. Éléments de formulaire
-            forms = soup.find_all('form')
-            if forms:
-                analysis_parts.append(f"Formulaires trouvés: {len(forms)}")
-                
-            # 6. Tableaux
-            tables = soup.find_all('table')
-            if tables:
-                analysis_parts.append(f"Tableaux trouvés: {len(tables)}")
-                
-                # Analyser le premier tableau s'il existe
-                if tables:
-                    table = tables[0]
-                    rows = table.find_all('tr')
-                    if rows:
-                        analysis_parts.append(f"  Premier tableau: {len(rows)} lignes")
-                        
-                        # Extraire les en-têtes si disponibles
-                        headers = table.find_all('th')
-                        if headers:
-                            header_texts = [th.get_text().strip() for th in headers]
-                            analysis_parts.append(f"  En-têtes: {', '.join(header_texts[:5])}")
-            
-            # 7. Classes CSS et IDs importants (pour comprendre la structure)
-            analysis_parts.append("\n=== STRUCTURE CSS ===")
-            elements_with_class = soup.find_all(class_=True)
-            if elements_with_class:
-                # Extraire les classes les plus communes
-                all_classes = []
-                for element in elements_with_class:
-                    all_classes.extend(element.get('class', []))
-                
-                common_classes = Counter(all_classes).most_common(5)
-                if common_classes:
-                    analysis_parts.append("Classes CSS les plus fréquentes:")
-                    for class_name, count in common_classes:
-                        analysis_parts.append(f"  .{class_name} ({count} fois)")
-            
-            return "\n".join(analysis_parts)
-            
-        except Exception as e:
-            return f"Erreur lors de l'analyse HTML de {filename}: {str(e)}"
+        return self.read_files([uploaded_file])[0]
 
-    def _read_image(self, file_bytes, filename, file_ext):
-        try:
-            img = Image.open(io.BytesIO(file_bytes))
-            mime_types = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp'}
-            mime_type = mime_types.get(file_ext)
-            if not mime_type: return f"Format d'image non supporté par l'API: {filename}"
-            max_pixels = 1568 * 1568
-            if img.width * img.height > max_pixels:
-                 print(f"Redimensionnement de l'image {filename} car elle dépasse la taille max.")
-                 img.thumbnail((1568, 1568), Image.Resampling.LANCZOS)
-            buffered = io.BytesIO()
-            img_format = mime_type.split('/')[1].upper()
-            if img_format == 'JPEG' and img.mode in ('RGBA', 'LA', 'P'):
-                 print(f"Conversion de l'image {filename} en RGB pour sauvegarde JPEG.")
-                 img = img.convert('RGB')
-            img.save(buffered, format=img_format)
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            return {'type': 'image', 'source': {'type': 'base64', 'media_type': mime_type, 'data': img_str}}
-        except Exception as e: return f"Erreur lors du traitement de l'image {filename}: {str(e)}"
+    def read_files(self, uploaded_files):
+        """Contenus (texte, bloc image ou message d'erreur) dans l'ordre ; extraction parallèle et cache disque (document_extraction)"""
+        extraits = extract_documents([(f.name, f.getvalue()) for f in uploaded_files])
+        return [extrait['content'] for extrait in extraits]
 
     def analyze_documents(self, uploaded_files, conversation_history):
         if not uploaded_files: return "Veuillez téléverser au moins un fichier.", []
         analysis_results, processed_contents, filenames, content_types = [], [], [], []
-        for uploaded_file in uploaded_files:
-            content = self.read_file(uploaded_file)
-            if isinstance(content, str) and (content.startswith("Erreur") or content.startswith("Format") or content.startswith("Aucun texte") or content.startswith("INFO") or content.startswith("Impossible")):
+        for uploaded_file, content in zip(uploaded_files, self.read_files(uploaded_files)):
+            if is_extraction_error(content):
                 analysis_results.append((uploaded_file.name, content))
             elif isinstance(content, dict) and content.get('type') == 'image':
                 processed_contents.append(content); filenames.append(uploaded_file.name); content_types.append('image')
@@ -409,6 +179,10 @@ class ExpertAdvisor:
 
         final_prompt_instruction = "\n".join(prompt_text_parts) + "\n\nFournissez votre réponse de manière claire et bien structurée."
         api_system_prompt = profile.get('content', 'Vous êtes un expert IA compétent.')
+        documents_texte = [(filenames[i], content) for i, content in enumerate(processed_contents) if content_types[i] == 'text']
+        if needs_chunking(documents_texte):
+            images = [content for i, content in enumerate(processed_contents) if content_types[i] == 'image']
+            return self._analyze_documents_in_chunks(documents_texte, images, final_prompt_instruction, api_system_prompt, analysis_results)
         user_message_content = []
         for i, content in enumerate(processed_contents):
             if content_types[i] == 'image': user_message_content.append(content)
@@ -439,6 +213,27 @@ class ExpertAdvisor:
             error_msg = f"Erreur générique API (analyse): {type(e).__name__} - {str(e)}"
             print(error_msg); analysis_results.append(("Erreur API Claude", error_msg)); return error_msg, analysis_results
 
+    def _analyze_documents_in_chunks(self, documents_texte, images, instruction, api_system_prompt, analysis_results):
+        """Documents au-delà du budget de contexte : analyse map-reduce par extraits (document_mapreduce)"""
+        try:
+            print(f"Analyse par extraits de {len(documents_texte)} document(s) volumineux... Modèle: {self.model_name_global}")
+            resultat = analyze_in_chunks(self.anthropic, self.model_name_global, api_system_prompt,
+                                         documents_texte, instruction, images=images)
+            analysis_results.extend(usage_report(resultat))
+            if not resultat['analyse']:
+                error_msg = "Erreur: Réponse vide ou mal formée de l'API (analyse)."
+                print(error_msg); analysis_results.append(("Erreur API Claude", error_msg)); return error_msg, analysis_results
+            statut = "Succès partiel (extraits manquants)" if resultat['partiel'] else "Succès"
+            analysis_results.append((f"Analyse par extraits ({len(resultat['extraits'])} extraits)", statut))
+            print("Analyse Claude par extraits terminée.")
+            return resultat['analyse'], analysis_results
+        except APIError as e:
+            error_msg = f"Erreur API Anthropic (analyse): {type(e).__name__} ({getattr(e, 'status_code', 'N/A')}) - {getattr(e, 'message', str(e))}"
+            print(error_msg); analysis_results.append(("Erreur API Claude", error_msg)); return error_msg, analysis_results
+        except Exception as e:
+            error_msg = f"Erreur générique API (analyse): {type(e).__name__} - {str(e)}"
+            print(error_msg); analysis_results.append(("Erreur API Claude", error_msg)); return error_msg, analysis_results
+
     def _format_history_for_api(self, conversation_history):
          if not conversation_history: return "Aucun historique"
          formatted_history = []
@@ -452,7 +247,22 @@ class ExpertAdvisor:
              formatted_history.append(f"{role_name}: {content}")
          return "\n".join(formatted_history)
 
-    def obtenir_reponse(self, question, conversation_history):
+    @staticmethod
+    def _message_erreur_reponse(e):
+        """Message affiché à l'utilisateur quand l'appel de obtenir_reponse échoue"""
+        if isinstance(e, APIError):
+            print(f"Erreur API Anthropic (obtenir_reponse): {type(e).__name__} ({getattr(e, 'status_code', None)}) - {getattr(e, 'message', e)}")
+            return f"Désolé, une erreur API technique est survenue avec l'IA Claude ({getattr(e, 'status_code', None)}). Veuillez réessayer."
+        print(f"API Error (Claude) in obtenir_reponse: {type(e).__name__} - {e}")
+        return f"Désolé, une erreur technique est survenue avec l'IA Claude ({type(e).__name__}). Veuillez réessayer."
+
+    def obtenir_reponse(self, question, conversation_history, stream=False, on_complete=None):
+        """
+        Réponse conversationnelle du profil expert courant.
+
+        stream=True rend une StreamedResponse (llm_streaming) : le texte arrive
+        au fil de l'eau et on_complete(texte) est appelé à la fin.
+        """
         profile = self.get_current_profile()
         if not profile: return "Erreur Critique: Profil expert non défini."
         api_messages_history = []
@@ -466,24 +276,26 @@ class ExpertAdvisor:
                  api_messages_history.append({"role": role, "content": content})
         api_messages_history.append({"role": "user", "content": question})
         api_system_prompt = profile.get('content', 'Vous êtes un expert IA utile.')
+        request = dict(model=self.model_name_global, max_tokens=4000,
+                       messages=api_messages_history, system=api_system_prompt)
+        if stream:
+            print(f"Appel API Claude en flux pour réponse conversationnelle... Modèle: {self.model_name_global}")
+            return stream_message(
+                self.anthropic, label='expert_advisor', on_complete=on_complete,
+                error_text=self._message_erreur_reponse,
+                empty_text="Désolé, j'ai reçu une réponse vide de l'IA Claude. Veuillez réessayer.",
+                **request)
         try:
             print(f"Appel API Claude pour réponse conversationnelle... Modèle: {self.model_name_global}")
-            response = self.anthropic.messages.create(
-                model=self.model_name_global, max_tokens=4000,
-                messages=api_messages_history, system=api_system_prompt
-            )
+            response = self.anthropic.messages.create(**request)
             if response.content and len(response.content) > 0 and response.content[0].text:
                 print("Réponse Claude reçue.")
                 return response.content[0].text
             else:
                  print("Erreur: Réponse vide ou mal formée de l'API (obtenir_reponse).")
                  return "Désolé, j'ai reçu une réponse vide de l'IA Claude. Veuillez réessayer."
-        except APIError as e:
-            print(f"Erreur API Anthropic (obtenir_reponse): {type(e).__name__} ({e.status_code}) - {e.message}")
-            return f"Désolé, une erreur API technique est survenue avec l'IA Claude ({e.status_code}). Veuillez réessayer."
         except Exception as e:
-            print(f"API Error (Claude) in obtenir_reponse: {type(e).__name__} - {e}")
-            return f"Désolé, une erreur technique est survenue avec l'IA Claude ({type(e).__name__}). Veuillez réessayer."
+            return self._message_erreur_reponse(e)
 
     def perform_web_search(self, query: str) -> str:
         """Effectue une recherche web via Claude et retourne la synthèse des résultats."""
@@ -0,0 +1,407 @@
+# fake_anthropic_server.py - API Messages d'Anthropic simulée en local (latence, réponses préparées, flux SSE)
+"""
+API Messages d'Anthropic simulée, sans réseau ni clé.
+
+Les scripts test_*_ia.py demandent une vraie clé et un accès réseau : rien ne
+mesurait le temps que l'ERP lui-même ajoute autour des appels à Claude
+(construction du contexte, lecture du JSON, écritures en base). Ici :
+- FakeMessagesServer sert POST /v1/messages comme l'API (même JSON, même
+  flux SSE message_start / content_block_delta / message_stop quand
+  stream=true), sur 127.0.0.1 et un port libre ; le SDK officiel s'y
+  branche avec Anthropic(base_url=server.url) ou ANTHROPIC_BASE_URL ;
+- la latence est réglable : délai avant la réponse (latency_ms) puis débit
+  de génération (tokens_per_second), fragment par fragment en flux ;
+- les réponses viennent d'une séquence préparée (script), de règles
+  (expression régulière sur le prompt → texte) ou d'un texte par défaut ;
+  fail_next() simule une surcharge (529) ou une limite de débit (429) ;
+- chaque requête reçue est conservée (requests) pour les vérifications ;
+- MessagesHTTPClient parle ce protocole avec la bibliothèque standard,
+  quand le SDK anthropic n'est pas installé.
+
+En ligne de commande : python fake_anthropic_server.py --port 8765
+--latency-ms 800, puis ANTHROPIC_BASE_URL=http://127.0.0.1:8765 pour
+faire tourner l'ERP contre le serveur simulé.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+from cache_config import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_MS = 0.0
+DEFAULT_TOKENS_PER_SECOND = 0.0  # 0 : génération instantanée
+DEFAULT_TEXT = "Réponse simulée de l'assistant."
+# Taille d'un fragment de texte en flux (caractères)
+STREAM_CHUNK_CHARS = 16
+
+ERROR_TYPES = {
+    400: 'invalid_request_error',
+    401: 'authentication_error',
+    429: 'rate_limit_error',
+    500: 'api_error',
+    529: 'overloaded_error',
+}
+
+Response = Union[str, Callable[[Dict[str, Any]], str]]
+
+
+def prompt_text(request: Dict[str, Any]) -> str:
+    """Texte du système et des messages d'une requête (blocs texte seulement)"""
+    parts: List[str] = []
+
+    def ajouter(contenu):
+        if isinstance(contenu, str):
+            parts.append(contenu)
+        elif isinstance(contenu, list):
+            parts.extend(b.get('text', '') for b in contenu if isinstance(b, dict) and b.get('type') == 'text')
+
+    ajouter(request.get('system') or '')
+    for message in request.get('messages') or []:
+        ajouter(message.get('content'))
+    return '\n'.join(parts)
+
+
+# =========================================================================
+# SERVEUR
+# =========================================================================
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # File d'attente assez longue pour les lots d'appels simultanés (5 par défaut : connexions refusées puis reprises)
+    request_queue_size = 128
+
+
+class FakeMessagesServer:
+    """
+    Serveur HTTP local de l'API Messages. Utilisable en gestionnaire de
+    contexte : with FakeMessagesServer(latency_ms=300) as server: ...
+    """
+
+    def __init__(self, latency_ms: float = DEFAULT_LATENCY_MS,
+                 tokens_per_second: float = DEFAULT_TOKENS_PER_SECOND,
+                 rules: Sequence[Tuple[str, Response]] = (), default_text: Response = DEFAULT_TEXT,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.rules = [(re.compile(motif, re.IGNORECASE), reponse) for motif, reponse in rules]
+        self.default_text = default_text
+        self.requests: List[Dict[str, Any]] = []
+        self._script: List[Response] = []
+        self._failures: List[int] = []
+        self._lock = threading.Lock()
+        self._httpd = _HTTPServer((host, port), _handler_for(self))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeMessagesServer':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake_anthropic', daemon=True)
+            self._thread.start()
+            logger.info(f"🧪 API Messages simulée sur {self.url}")
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'FakeMessagesServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> bool:
+        self.stop()
+        return False
+
+    # -------------------------------------------------------------------------
+    # Réponses
+    # -------------------------------------------------------------------------
+
+    def script(self, responses: Sequence[Response]) -> None:
+        """Réponses des prochaines requêtes, dans l'ordre ; la dernière est répétée"""
+        with self._lock:
+            self._script = list(responses)
+
+    def fail_next(self, status: int = 529, count: int = 1) -> None:
+        """Les `count` prochaines requêtes échouent avec ce statut HTTP"""
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self._script = []
+            self._failures = []
+
+    def _next(self, request: Dict[str, Any]) -> Tuple[Optional[int], str]:
+        with self._lock:
+            self.requests.append(request)
+            if self._failures:
+                return self._failures.pop(0), ''
+            if self._script:
+                reponse = self._script.pop(0) if len(self._script) > 1 else self._script[0]
+            else:
+                texte = prompt_text(request)
+                reponse = next((r for motif, r in self.rules if motif.search(texte)), self.default_text)
+        return None, reponse(request) if callable(reponse) else reponse
+
+
+def _handler_for(server: FakeMessagesServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            logger.debug(f"🧪 {self.address_string()} {format % args}")
+
+        def _json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('request-id', f"req_{uuid.uuid4().hex[:24]}")
+            for nom, valeur in (headers or {}).items():
+                self.send_header(nom, valeur)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status: int, message: str) -> None:
+            self._json(status, {'type': 'error', 'error': {'type': ERROR_TYPES.get(status, 'api_error'),
+                                                           'message': message}},
+                       {'retry-after': '1'} if status == 429 else None)
+
+        def do_POST(self):
+            longueur = int(self.headers.get('Content-Length') or 0)
+            try:
+                request = json.loads(self.rfile.read(longueur) or b'{}')
+            except ValueError:
+                self._error(400, "Corps JSON invalide")
+                return
+            chemin = urlparse(self.path).path
+            if chemin == '/v1/messages/count_tokens':
+                self._json(200, {'input_tokens': estimate_tokens(prompt_text(request))})
+                return
+            if chemin != '/v1/messages':
+                self._error(404, f"Chemin inconnu : {chemin}")
+                return
+            if not request.get('model') or not request.get('messages'):
+                self._error(400, "model et messages sont requis")
+                return
+
+            echec, texte = server._next(request)
+            time.sleep(server.latency_ms / 1000)
+            if echec:
+                self._error(echec, "Erreur simulée")
+                return
+            message = {
+                'id': f"msg_{uuid.uuid4().hex[:24]}", 'type': 'message', 'role': 'assistant',
+                'model': request['model'], 'content': [{'type': 'text', 'text': texte}],
+                'stop_reason': 'end_turn', 'stop_sequence': None,
+                'usage': {'input_tokens': estimate_tokens(prompt_text(request)),
+                          'output_tokens': max(1, estimate_tokens(texte)),
+                          'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0},
+            }
+            if request.get('stream'):
+                self._stream(message, texte)
+            else:
+                self._generate(message['usage']['output_tokens'])
+                self._json(200, message)
+
+        def _generate(self, tokens: int) -> None:
+            if server.tokens_per_second:
+                time.sleep(tokens / server.tokens_per_second)
+
+        def _stream(self, message: Dict[str, Any], texte: str) -> None:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            def evenement(nom: str, data: Dict[str, Any]) -> None:
+                self.wfile.write(f"event: {nom}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            usage = message['usage']
+            evenement('message_start', {'type': 'message_start', 'message': dict(
+                message, content=[], stop_reason=None, usage=dict(usage, output_tokens=1))})
+            evenement('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                              'content_block': {'type': 'text', 'text': ''}})
+            evenement('ping', {'type': 'ping'})
+            for i in range(0, len(texte), STREAM_CHUNK_CHARS):
+                fragment = texte[i:i + STREAM_CHUNK_CHARS]
+                self._generate(estimate_tokens(fragment) or 1)
+                evenement('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                                  'delta': {'type': 'text_delta', 'text': fragment}})
+            evenement('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+            evenement('message_delta', {'type': 'message_delta',
+                                        'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                        'usage': {'output_tokens': usage['output_tokens']}})
+            evenement('message_stop', {'type': 'message_stop'})
+
+    return Handler
+
+
+# =========================================================================
+# CLIENT MINIMAL (BIBLIOTHÈQUE STANDARD)
+# =========================================================================
+
+class FakeAPIError(Exception):
+    """Réponse d'erreur de l'API (statut HTTP, type d'erreur)"""
+
+    def __init__(self, status_code: int, error_type: str, message: str):
+        super().__init__(f"{status_code} {error_type}: {message}")
+        self.status_code = status_code
+        self.error_type = error_type
+
+
+def _namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_namespace(v) for v in value]
+    return value
+
+
+class MessagesHTTPClient:
+    """
+    Client de l'API Messages (create et stream) sur http.client, pour le
+    serveur simulé quand le SDK anthropic n'est pas installé. Les réponses
+    ont la même forme que celles du SDK (response.content[0].text, usage...).
+    """
+
+    def __init__(self, base_url: str, api_key: str = 'fake-key', timeout: float = 60.0):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.messages = _HTTPMessages(self)
+
+    def _post(self, path: str, body: Dict[str, Any]) -> http.client.HTTPResponse:
+        url = urlparse(self.base_url)
+        conn = http.client.HTTPConnection(url.hostname, url.port, timeout=self.timeout)
+        data = json.dumps(body).encode('utf-8')
+        conn.request('POST', path, body=data, headers={
+            'Content-Type': 'application/json', 'x-api-key': self.api_key, 'anthropic-version': '2023-06-01'})
+        response = conn.getresponse()
+        if response.status >= 400:
+            try:
+                erreur = json.loads(response.read()).get('error', {})
+            finally:
+                conn.close()
+            raise FakeAPIError(response.status, erreur.get('type', 'api_error'), erreur.get('message', ''))
+        response.connection = conn
+        return response
+
+
+class _HTTPMessages:
+    def __init__(self, client: MessagesHTTPClient):
+        self._client = client
+
+    def create(self, **request):
+        response = self._client._post('/v1/messages', request)
+        try:
+            return _namespace(json.loads(response.read()))
+        finally:
+            response.connection.close()
+
+    def stream(self, **request) -> '_HTTPStream':
+        return _HTTPStream(self._client, dict(request, stream=True))
+
+
+class _HTTPStream:
+    """Équivalent minimal de MessageStream : text_stream, get_final_message()"""
+
+    def __init__(self, client: MessagesHTTPClient, request: Dict[str, Any]):
+        self._client = client
+        self._request = request
+        self._response = None
+        self._message: Optional[Dict[str, Any]] = None
+        self._parts: List[str] = []
+        self._events: Optional[Iterator[Dict[str, Any]]] = None
+
+    def __enter__(self) -> '_HTTPStream':
+        self._response = self._client._post('/v1/messages', self._request)
+        self._events = self._read_events()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self._response.connection.close()
+        return False
+
+    def _read_events(self) -> Iterator[Dict[str, Any]]:
+        for ligne in self._response:
+            ligne = ligne.decode('utf-8').strip()
+            if not ligne.startswith('data:'):
+                continue
+            evenement = json.loads(ligne[5:])
+            if evenement['type'] == 'message_start':
+                self._message = evenement['message']
+            elif evenement['type'] == 'content_block_delta':
+                self._parts.append(evenement['delta'].get('text', ''))
+            elif evenement['type'] == 'message_delta':
+                self._message.update(evenement['delta'])
+                self._message['usage'].update(evenement['usage'])
+            yield evenement
+            if evenement['type'] == 'message_stop':
+                return
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        for evenement in self._events:
+            if evenement['type'] == 'content_block_delta':
+                yield evenement['delta'].get('text', '')
+
+    def get_final_message(self):
+        for _ in self._events:
+            pass
+        return _namespace(dict(self._message, content=[{'type': 'text', 'text': ''.join(self._parts)}]))
+
+
+def make_client(base_url: str, api_key: str = 'fake-key'):
+    """Client du SDK anthropic branché sur base_url s'il est installé, sinon MessagesHTTPClient"""
+    try:
+        from anthropic import Anthropic
+    except ImportError:
+        return MessagesHTTPClient(base_url, api_key)
+    return Anthropic(api_key=api_key, base_url=base_url, max_retries=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API Messages d'Anthropic simulée en local")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=800.0, help="délai avant la réponse")
+    parser.add_argument('--tokens-per-second', type=float, default=80.0, help="débit (0 : instantané)")
+    parser.add_argument('--text', default=DEFAULT_TEXT, help="texte de chaque réponse")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = FakeMessagesServer(latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second,
+                                default_text=args.text, host=args.host, port=args.port)
+    print(f"API Messages simulée sur {server.url} (ANTHROPIC_BASE_URL={server.url}) — Ctrl+C pour arrêter")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
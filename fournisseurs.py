@@ -8,6 +8,10 @@ from typing import Dict, List, Optional, Any
 import os
 import tempfile
 
+from document_templates import render_bon_achat_html, render_demande_prix_html, render_documents
+from supplier_scorecards import SupplierScorecardEngine
+
+
 class GestionnaireFournisseurs:
     """
     Gestionnaire complet pour les fournisseurs - ADAPTÉ CONSTRUCTION QUÉBEC
@@ -62,6 +66,7 @@ class GestionnaireFournisseurs:
         self.db = db
         self.crm_manager = crm_manager  # ← référence vers le CRM pour les entreprises
         self.product_manager = product_manager  # ← NOUVELLE DÉPENDANCE : référence vers le gestionnaire de produits
+        self.scorecards = SupplierScorecardEngine(db)  # Performance de tous les fournisseurs en une requête
         # Nettoyer la base de données au démarrage si nécessaire
         self._cleanup_database()
         # Initialiser les fournisseurs construction si vide
@@ -447,58 +452,16 @@ class GestionnaireFournisseurs:
     def get_fournisseur_performance(self, fournisseur_id: int, days: int = 365) -> Dict:
         """Calcule les performances d'un fournisseur"""
         try:
-            # Statistiques commandes
-            query_commandes = '''
-                SELECT 
-                    COUNT(*) as total_commandes,
-                    SUM(f.montant_total) as montant_total,
-                    AVG(f.montant_total) as montant_moyen,
-                    MIN(f.date_creation) as premiere_commande,
-                    MAX(f.date_creation) as derniere_commande
-                FROM formulaires f
-                JOIN companies c ON f.company_id = c.id
-                JOIN fournisseurs fou ON c.id = fou.company_id
-                WHERE fou.id = ? 
-                AND f.type_formulaire IN ('BON_ACHAT', 'BON_COMMANDE')
-                AND f.date_creation >= DATE('now', '-{} days')
-            '''.format(days)
-            
-            result = self.db.execute_query(query_commandes, (fournisseur_id,))
-            performance = dict(result[0]) if result else {}
-            
-            # Statistiques livraisons
-            query_livraisons = '''
-                SELECT 
-                    COUNT(*) as total_livraisons,
-                    COUNT(CASE WHEN a.date_livraison_reelle <= a.date_livraison_prevue THEN 1 END) as livraisons_temps,
-                    AVG(JULIANDAY(a.date_livraison_reelle) - JULIANDAY(a.date_livraison_prevue)) as retard_moyen_jours
-                FROM approvisionnements a
-                JOIN formulaires f ON a.formulaire_id = f.id
-                JOIN companies c ON f.company_id = c.id
-                JOIN fournisseurs fou ON c.id = fou.company_id
-                WHERE fou.id = ? 
-                AND a.date_livraison_reelle IS NOT NULL
-                AND a.date_commande >= DATE('now', '-{} days')
-            '''.format(days)
-            
-            result_livr = self.db.execute_query(query_livraisons, (fournisseur_id,))
-            if result_livr:
-                livraisons_data = dict(result_livr[0])
-                performance.update(livraisons_data)
-                
-                # Calcul taux de ponctualité
-                if livraisons_data.get('total_livraisons', 0) > 0:
-                    performance['taux_ponctualite'] = (
-                        livraisons_data.get('livraisons_temps', 0) / 
-                        livraisons_data['total_livraisons'] * 100
-                    )
-            
-            return performance
-            
+            scorecards = self.scorecards.compute_scorecards(days, [fournisseur_id])
+            return scorecards[0] if scorecards else {}
         except Exception as e:
             st.error(f"Erreur calcul performance: {e}")
             return {}
     
+    def get_fournisseurs_scorecards(self, days: int = 365, force_refresh: bool = False) -> List[Dict]:
+        """Classement de tous les fournisseurs (snapshot recalculé s'il a plus de 30 minutes)"""
+        return self.scorecards.get_scorecards(days, force_refresh=force_refresh)
+    
     def get_categories_disponibles(self) -> List[str]:
         """Récupère toutes les catégories de produits disponibles"""
         try:
@@ -803,29 +766,7 @@ class GestionnaireFournisseurs:
     def generate_demande_prix_html(self, formulaire_id: int) -> str:
         """Génère le HTML d'une demande de prix"""
         try:
-            # Récupérer les données du formulaire
-            formulaire = self.get_formulaire_details_with_lines(formulaire_id)
-            if not formulaire:
-                return ""
-            
-            # Récupérer les informations du fournisseur
-            fournisseur = self.get_fournisseur_by_id_from_company(formulaire['company_id'])
-            
-            # Calculer les statistiques
-            lignes = formulaire.get('lignes', [])
-            nb_articles = len(lignes)
-            
-            # Métadonnées
-            metadonnees = {}
-            try:
-                metadonnees = json.loads(formulaire.get('metadonnees_json', '{}'))
-            except:
-                pass
-            
-            # Générer le HTML
-            html_content = self._get_demande_prix_template(formulaire, fournisseur, lignes, metadonnees)
-            return html_content
-            
+            return self.generate_formulaires_html_batch([formulaire_id], 'DEMANDE_PRIX').get(formulaire_id, "")
         except Exception as e:
             st.error(f"Erreur génération HTML DP: {e}")
             return ""
@@ -833,36 +774,92 @@ class GestionnaireFournisseurs:
     def generate_bon_achat_html(self, formulaire_id: int) -> str:
         """Génère le HTML d'un bon d'achat"""
         try:
-            # Récupérer les données du formulaire
-            formulaire = self.get_formulaire_details_with_lines(formulaire_id)
-            if not formulaire:
-                return ""
-            
-            # Récupérer les informations du fournisseur
-            fournisseur = self.get_fournisseur_by_id_from_company(formulaire['company_id'])
-            
-            # Calculer les totaux
-            lignes = formulaire.get('lignes', [])
-            sous_total = sum(ligne.get('quantite', 0) * ligne.get('prix_unitaire', 0) for ligne in lignes)
-            tva_taux = 14.975  # TVA du Québec
-            tva_montant = sous_total * (tva_taux / 100)
-            total_ttc = sous_total + tva_montant
-            
-            # Métadonnées
-            metadonnees = {}
-            try:
-                metadonnees = json.loads(formulaire.get('metadonnees_json', '{}'))
-            except:
-                pass
-            
-            # Générer le HTML
-            html_content = self._get_bon_achat_template(formulaire, fournisseur, lignes, sous_total, tva_montant, total_ttc, metadonnees)
-            return html_content
-            
+            return self.generate_formulaires_html_batch([formulaire_id], 'BON_ACHAT').get(formulaire_id, "")
         except Exception as e:
             st.error(f"Erreur génération HTML BA: {e}")
             return ""
     
+    def generate_formulaires_html_batch(self, formulaire_ids: List[int], type_formulaire: str) -> Dict[int, str]:
+        """
+        HTML de plusieurs demandes de prix ou bons d'achat {id: html}. Les
+        documents inchangés depuis leur dernier rendu viennent du cache, les
+        autres sont chargés ensemble (formulaires, lignes, fournisseurs).
+        """
+        renderers = {
+            'DEMANDE_PRIX': self._render_demande_prix,
+            'BON_ACHAT': self._render_bon_achat,
+        }
+        if type_formulaire not in renderers:
+            raise ValueError(f"Type de formulaire non supporté: {type_formulaire}")
+        
+        return render_documents(
+            type_formulaire, formulaire_ids, self.db,
+            load_documents=self._load_formulaires_for_export,
+            render=renderers[type_formulaire],
+            with_fournisseur=True
+        )
+    
+    def _load_formulaires_for_export(self, formulaire_ids: List[int]) -> Dict[int, Dict]:
+        """Formulaires, lignes et fournisseurs de plusieurs documents en trois requêtes par lot de 500"""
+        documents = {}
+        for i in range(0, len(formulaire_ids), 500):
+            chunk = formulaire_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            
+            formulaires = self.db.execute_query(f'''
+                SELECT f.*, c.nom as company_nom
+                FROM formulaires f
+                LEFT JOIN companies c ON f.company_id = c.id
+                WHERE f.id IN ({placeholders})
+            ''', tuple(chunk))
+            
+            lignes_par_formulaire = {}
+            for ligne in self.db.execute_query(f'''
+                SELECT * FROM formulaire_lignes
+                WHERE formulaire_id IN ({placeholders})
+                ORDER BY formulaire_id, sequence_ligne
+            ''', tuple(chunk)):
+                lignes_par_formulaire.setdefault(ligne['formulaire_id'], []).append(dict(ligne))
+            
+            company_ids = sorted({f['company_id'] for f in formulaires if f.get('company_id') is not None})
+            fournisseurs_par_company = {}
+            if company_ids:
+                for fournisseur in self.db.execute_query(f'''
+                    SELECT f.*, c.nom, c.secteur, c.adresse, c.site_web, c.notes as company_notes
+                    FROM fournisseurs f
+                    JOIN companies c ON f.company_id = c.id
+                    WHERE f.company_id IN ({','.join('?' * len(company_ids))})
+                ''', tuple(company_ids)):
+                    # Même choix que get_fournisseur_by_id_from_company : première fiche trouvée
+                    fournisseurs_par_company.setdefault(fournisseur['company_id'], dict(fournisseur))
+            
+            for row in formulaires:
+                formulaire = dict(row)
+                formulaire['lignes'] = lignes_par_formulaire.get(formulaire['id'], [])
+                try:
+                    metadonnees = json.loads(formulaire.get('metadonnees_json') or '{}')
+                except (TypeError, ValueError):
+                    metadonnees = {}
+                documents[formulaire['id']] = {
+                    'formulaire': formulaire,
+                    'fournisseur': fournisseurs_par_company.get(formulaire.get('company_id'), {}),
+                    'metadonnees': metadonnees
+                }
+        return documents
+    
+    def _render_demande_prix(self, document: Dict) -> str:
+        formulaire = document['formulaire']
+        return self._get_demande_prix_template(formulaire, document['fournisseur'], formulaire['lignes'], document['metadonnees'])
+    
+    def _render_bon_achat(self, document: Dict) -> str:
+        formulaire = document['formulaire']
+        lignes = formulaire['lignes']
+        sous_total = sum((ligne.get('quantite') or 0) * (ligne.get('prix_unitaire') or 0) for ligne in lignes)
+        tva_taux = 14.975  # TVA du Québec
+        tva_montant = sous_total * (tva_taux / 100)
+        total_ttc = sous_total + tva_montant
+        return self._get_bon_achat_template(formulaire, document['fournisseur'], lignes, sous_total, tva_montant, total_ttc, document['metadonnees'])
+    
     def get_fournisseur_by_id_from_company(self, company_id: int) -> Dict:
         """Récupère un fournisseur par company_id"""
         try:
@@ -880,1132 +877,11 @@ class GestionnaireFournisseurs:
     
     def _get_demande_prix_template(self, formulaire: Dict, fournisseur: Dict, lignes: List[Dict], metadonnees: Dict) -> str:
         """Template HTML pour Demande de Prix"""
-        
-        # Formatage des dates
-        date_creation = datetime.now().strftime('%d/%m/%Y à %H:%M')
-        date_echeance = ""
-        if formulaire.get('date_echeance'):
-            date_echeance = pd.to_datetime(formulaire['date_echeance']).strftime('%d/%m/%Y')
-        
-        # Badge statut
-        statut_badge_class = {
-            'BROUILLON': 'badge-pending',
-            'VALIDÉ': 'badge-in-progress',
-            'ENVOYÉ': 'badge-completed',
-            'APPROUVÉ': 'badge-completed',
-            'TERMINÉ': 'badge-completed',
-            'ANNULÉ': 'badge-on-hold'
-        }.get(formulaire.get('statut', 'BROUILLON'), 'badge-pending')
-        
-        # Badge priorité
-        priorite_badge_class = {
-            'NORMAL': 'badge-in-progress',
-            'URGENT': 'badge-pending',
-            'CRITIQUE': 'badge-on-hold'
-        }.get(formulaire.get('priorite', 'NORMAL'), 'badge-in-progress')
-        
-        # Génération des lignes de produits
-        lignes_html = ""
-        for ligne in lignes:
-            is_from_catalog = metadonnees.get('source_catalog', False)
-            source_icon = "🔗" if is_from_catalog else "📝"
-            
-            lignes_html += f"""
-                <tr>
-                    <td><strong>{source_icon} {ligne.get('description', '')}</strong>
-                        {f"<br><small>Code: {ligne.get('code_article', '')}</small>" if ligne.get('code_article') else ""}
-                        {f"<br><em>{ligne.get('notes_ligne', '')}</em>" if ligne.get('notes_ligne') else ""}
-                    </td>
-                    <td style="text-align: center;">{ligne.get('quantite', 0)}</td>
-                    <td style="text-align: center;">{ligne.get('unite', 'UN')}</td>
-                    <td style="text-align: center;">À chiffrer</td>
-                </tr>
-            """
-        
-        # Informations source catalogue
-        source_info = ""
-        if metadonnees.get('source_catalog'):
-            nb_catalog = metadonnees.get('nb_produits_catalog', 0)
-            nb_manuels = metadonnees.get('nb_produits_manuels', 0)
-            source_info = f"""
-                <div class="instructions-box">
-                    <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">🔗 Source des Produits</h4>
-                    <p><strong>• Produits du catalogue :</strong> {nb_catalog}</p>
-                    <p><strong>• Produits saisis manuellement :</strong> {nb_manuels}</p>
-                    <p><em>Cette demande utilise notre catalogue produits intégré pour une gestion optimisée.</em></p>
-                </div>
-            """
-        
-        # Notes du formulaire
-        notes_section = ""
-        if formulaire.get('notes'):
-            notes_section = f"""
-                <div class="instructions-box">
-                    <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">📝 Instructions Spéciales</h4>
-                    <p>{formulaire['notes']}</p>
-                </div>
-            """
-        
-        return f"""
-            <!DOCTYPE html>
-            <html lang="fr">
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Demande de Prix - {formulaire.get('numero_document', '')}</title>
-                <style>
-                    :root {{
-                        --primary-color: #00A971;
-                        --primary-color-darker: #00673D;
-                        --primary-color-darkest: #004C2E;
-                        --primary-color-lighter: #DCFCE7;
-                        --background-color: #F9FAFB;
-                        --secondary-background-color: #FFFFFF;
-                        --text-color: #374151;
-                        --text-color-light: #6B7280;
-                        --border-color: #E5E7EB;
-                        --border-radius-md: 0.5rem;
-                        --box-shadow-md: 0 4px 6px -1px rgb(0 0 0 / 0.1);
-                    }}
-                    
-                    * {{
-                        margin: 0;
-                        padding: 0;
-                        box-sizing: border-box;
-                    }}
-                    
-                    body {{
-                        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                        line-height: 1.6;
-                        color: var(--text-color);
-                        background-color: var(--background-color);
-                        margin: 0;
-                        padding: 15px;
-                    }}
-                    
-                    .container {{
-                        max-width: 8.5in;
-                        margin: 0 auto;
-                        background-color: white;
-                        border-radius: 12px;
-                        box-shadow: var(--box-shadow-md);
-                        overflow: hidden;
-                        width: 100%;
-                    }}
-                    
-                    .header {{
-                        background: linear-gradient(135deg, var(--primary-color) 0%, var(--primary-color-darker) 100%);
-                        color: white;
-                        padding: 30px;
-                        display: flex;
-                        justify-content: space-between;
-                        align-items: center;
-                    }}
-                    
-                    .logo-container {{
-                        display: flex;
-                        align-items: center;
-                        gap: 20px;
-                    }}
-                    
-                    .logo-box {{
-                        background-color: white;
-                        width: 70px;
-                        height: 45px;
-                        border-radius: 8px;
-                        display: flex;
-                        align-items: center;
-                        justify-content: center;
-                        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.2);
-                    }}
-                    
-                    .logo-text {{
-                        font-family: 'Segoe UI', sans-serif;
-                        font-weight: 800;
-                        font-size: 24px;
-                        color: var(--primary-color);
-                        letter-spacing: 1px;
-                    }}
-                    
-                    .company-info {{
-                        text-align: left;
-                    }}
-                    
-                    .company-name {{
-                        font-weight: 700;
-                        font-size: 28px;
-                        margin-bottom: 5px;
-                        text-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
-                    }}
-                    
-                    .company-subtitle {{
-                        font-size: 16px;
-                        opacity: 0.9;
-                    }}
-                    
-                    .contact-info {{
-                        text-align: right;
-                        font-size: 14px;
-                        line-height: 1.4;
-                        opacity: 0.95;
-                    }}
-                    
-                    .document-title {{
-                        background: var(--primary-color-lighter);
-                        padding: 20px 30px;
-                        border-left: 5px solid var(--primary-color);
-                    }}
-                    
-                    .document-title h1 {{
-                        color: var(--primary-color-darker);
-                        font-size: 24px;
-                        margin-bottom: 10px;
-                    }}
-                    
-                    .document-meta {{
-                        display: flex;
-                        justify-content: space-between;
-                        color: var(--text-color-light);
-                        font-size: 14px;
-                    }}
-                    
-                    .content {{
-                        padding: 25px;
-                    }}
-                    
-                    .section {{
-                        margin-bottom: 30px;
-                    }}
-                    
-                    .section-title {{
-                        color: var(--primary-color-darker);
-                        font-size: 18px;
-                        font-weight: 600;
-                        margin-bottom: 15px;
-                        padding-bottom: 8px;
-                        border-bottom: 2px solid var(--primary-color-lighter);
-                        display: flex;
-                        align-items: center;
-                        gap: 10px;
-                    }}
-                    
-                    .info-grid {{
-                        display: grid;
-                        grid-template-columns: 1fr 1fr 1fr;
-                        gap: 15px;
-                        margin-bottom: 20px;
-                    }}
-                    
-                    .info-item {{
-                        background: var(--background-color);
-                        padding: 15px;
-                        border-radius: var(--border-radius-md);
-                        border-left: 3px solid var(--primary-color);
-                    }}
-                    
-                    .info-label {{
-                        font-weight: 600;
-                        color: var(--text-color-light);
-                        font-size: 12px;
-                        text-transform: uppercase;
-                        letter-spacing: 0.5px;
-                        margin-bottom: 5px;
-                    }}
-                    
-                    .info-value {{
-                        font-size: 16px;
-                        color: var(--text-color);
-                        font-weight: 500;
-                    }}
-                    
-                    .table {{
-                        width: 100%;
-                        border-collapse: collapse;
-                        margin: 15px 0;
-                        border-radius: var(--border-radius-md);
-                        overflow: hidden;
-                        box-shadow: var(--box-shadow-md);
-                    }}
-                    
-                    .table th {{
-                        background: var(--primary-color);
-                        color: white;
-                        padding: 12px;
-                        text-align: left;
-                        font-weight: 600;
-                        font-size: 14px;
-                    }}
-                    
-                    .table td {{
-                        padding: 12px;
-                        border-bottom: 1px solid var(--border-color);
-                        vertical-align: top;
-                    }}
-                    
-                    .table tr:nth-child(even) {{
-                        background-color: var(--background-color);
-                    }}
-                    
-                    .table tr:hover {{
-                        background-color: var(--primary-color-lighter);
-                    }}
-                    
-                    .badge {{
-                        padding: 4px 12px;
-                        border-radius: 20px;
-                        font-size: 11px;
-                        font-weight: 600;
-                        text-transform: uppercase;
-                        letter-spacing: 0.5px;
-                        display: inline-block;
-                    }}
-                    
-                    .badge-pending {{ background: #fef3c7; color: #92400e; }}
-                    .badge-in-progress {{ background: #dbeafe; color: #1e40af; }}
-                    .badge-completed {{ background: #d1fae5; color: #065f46; }}
-                    .badge-on-hold {{ background: #fee2e2; color: #991b1b; }}
-                    
-                    .summary-box {{
-                        background: linear-gradient(45deg, var(--primary-color-lighter), white);
-                        border: 2px solid var(--primary-color);
-                        border-radius: var(--border-radius-md);
-                        padding: 20px;
-                        margin: 20px 0;
-                    }}
-                    
-                    .summary-grid {{
-                        display: grid;
-                        grid-template-columns: repeat(3, 1fr);
-                        gap: 15px;
-                    }}
-                    
-                    .summary-item {{
-                        text-align: center;
-                        background: white;
-                        padding: 15px;
-                        border-radius: var(--border-radius-md);
-                        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                    }}
-                    
-                    .summary-number {{
-                        font-size: 24px;
-                        font-weight: 700;
-                        color: var(--primary-color-darker);
-                        display: block;
-                    }}
-                    
-                    .summary-label {{
-                        font-size: 12px;
-                        color: var(--text-color-light);
-                        text-transform: uppercase;
-                        font-weight: 600;
-                        letter-spacing: 0.5px;
-                    }}
-                    
-                    .instructions-box {{
-                        background: var(--background-color);
-                        border-left: 4px solid var(--primary-color);
-                        padding: 20px;
-                        border-radius: 0 var(--border-radius-md) var(--border-radius-md) 0;
-                        margin: 15px 0;
-                    }}
-                    
-                    .footer {{
-                        background: var(--primary-color-darkest);
-                        color: white;
-                        padding: 20px 30px;
-                        text-align: center;
-                        font-size: 12px;
-                        line-height: 1.4;
-                    }}
-                    
-                    .client-address {{
-                        background: var(--background-color);
-                        border: 2px solid var(--primary-color-lighter);
-                        border-radius: var(--border-radius-md);
-                        padding: 15px;
-                        margin: 15px 0;
-                        font-size: 14px;
-                        line-height: 1.4;
-                    }}
-                    
-                    @media print {{
-                        body {{ 
-                            margin: 0; 
-                            padding: 0; 
-                        }}
-                        .container {{ 
-                            box-shadow: none; 
-                            max-width: 100%;
-                            width: 8.5in;
-                        }}
-                        .table {{ 
-                            break-inside: avoid; 
-                            font-size: 12px;
-                        }}
-                        .section {{ 
-                            break-inside: avoid-page; 
-                        }}
-                        .header {{
-                            padding: 20px 25px;
-                        }}
-                        .content {{
-                            padding: 20px;
-                        }}
-                        @page {{
-                            size: letter;
-                            margin: 0.5in;
-                        }}
-                    }}
-                    
-                    @media screen and (max-width: 768px) {{
-                        .container {{
-                            max-width: 100%;
-                            margin: 0 10px;
-                        }}
-                        .info-grid {{
-                            grid-template-columns: 1fr;
-                            gap: 10px;
-                        }}
-                        .summary-grid {{
-                            grid-template-columns: repeat(2, 1fr);
-                        }}
-                        .header {{
-                            flex-direction: column;
-                            text-align: center;
-                            gap: 15px;
-                        }}
-                        .contact-info {{
-                            text-align: center;
-                        }}
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <!-- En-tête -->
-                    <div class="header">
-                        <div class="logo-container">
-                            <div class="logo-box">
-                                <div class="logo-text">DG</div>
-                            </div>
-                            <div class="company-info">
-                                <div class="company-name">Desmarais & Gagné inc.</div>
-                                <div class="company-subtitle">Construction résidentiel et commercial</div>
-                            </div>
-                        </div>
-                        <div class="contact-info">
-                            565 rue Maisonneuve<br>
-                            Granby, QC J2G 3H5<br>
-                            Tél.: (450) 372-9630<br>
-                            Téléc.: (450) 372-8122
-                        </div>
-                    </div>
-                    
-                    <!-- Titre du document -->
-                    <div class="document-title">
-                        <h1>📋 DEMANDE DE PRIX</h1>
-                        <div class="document-meta">
-                            <span><strong>N° Demande:</strong> {formulaire.get('numero_document', '')}</span>
-                            <span><strong>Généré le:</strong> {date_creation}</span>
-                        </div>
-                    </div>
-                    
-                    <!-- Contenu principal -->
-                    <div class="content">
-                        <!-- Informations générales -->
-                        <div class="section">
-                            <h2 class="section-title">📋 Informations de la Demande</h2>
-                            <div class="info-grid">
-                                <div class="info-item">
-                                    <div class="info-label">Fournisseur</div>
-                                    <div class="info-value">{fournisseur.get('nom', 'N/A')}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Statut</div>
-                                    <div class="info-value">
-                                        <span class="badge {statut_badge_class}">
-                                            {formulaire.get('statut', 'BROUILLON')}
-                                        </span>
-                                    </div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Priorité</div>
-                                    <div class="info-value">
-                                        <span class="badge {priorite_badge_class}">
-                                            {formulaire.get('priorite', 'NORMAL')}
-                                        </span>
-                                    </div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Date Création</div>
-                                    <div class="info-value">{pd.to_datetime(formulaire.get('date_creation', datetime.now())).strftime('%d/%m/%Y')}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Date Limite Réponse</div>
-                                    <div class="info-value">{date_echeance if date_echeance else 'N/A'}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Nb Articles</div>
-                                    <div class="info-value">{len(lignes)} article(s)</div>
-                                </div>
-                            </div>
-                        </div>
-                        
-                        <!-- Adresse du fournisseur -->
-                        <div class="section">
-                            <h2 class="section-title">📍 Fournisseur</h2>
-                            <div class="client-address">
-                                <strong>{fournisseur.get('nom', 'N/A')}</strong><br>
-                                {fournisseur.get('adresse', 'N/A')}<br>
-                                {fournisseur.get('site_web', '')}<br>
-                                <em>Code fournisseur: {fournisseur.get('code_fournisseur', 'N/A')}</em>
-                            </div>
-                        </div>
-                        
-                        <!-- Résumé -->
-                        <div class="summary-box">
-                            <h3 style="color: var(--primary-color-darker); margin-bottom: 15px; text-align: center;">📋 Résumé de la Demande</h3>
-                            <div class="summary-grid">
-                                <div class="summary-item">
-                                    <span class="summary-number">{len(lignes)}</span>
-                                    <span class="summary-label">Articles à chiffrer</span>
-                                </div>
-                                <div class="summary-item">
-                                    <span class="summary-number">{formulaire.get('priorite', 'NORMAL')}</span>
-                                    <span class="summary-label">Priorité</span>
-                                </div>
-                                <div class="summary-item">
-                                    <span class="summary-number">{date_echeance if date_echeance else 'N/A'}</span>
-                                    <span class="summary-label">Échéance</span>
-                                </div>
-                            </div>
-                        </div>
-                
-                        <!-- Détail des articles -->
-                        <div class="section">
-                            <h2 class="section-title">📝 Articles à Chiffrer</h2>
-                            <table class="table">
-                                <thead>
-                                    <tr>
-                                        <th>Description</th>
-                                        <th style="text-align: center;">Quantité</th>
-                                        <th style="text-align: center;">Unité</th>
-                                        <th style="text-align: center;">Prix à Proposer</th>
-                                    </tr>
-                                </thead>
-                                <tbody>
-                                    {lignes_html}
-                                </tbody>
-                            </table>
-                        </div>
-                
-                        <!-- Notes du devis -->
-                        {notes_section}
-                        
-                        <!-- Source catalogue -->
-                        {source_info}
-                        
-                        <!-- Instructions -->
-                        <div class="instructions-box">
-                            <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">📋 Instructions pour Réponse</h4>
-                            <p><strong>• Merci de chiffrer tous les articles listés ci-dessus</strong></p>
-                            <p><strong>• Indiquer les délais de livraison pour chaque article</strong></p>
-                            <p><strong>• Préciser les conditions de paiement proposées</strong></p>
-                            <p><strong>• Date limite de réponse :</strong> {date_echeance if date_echeance else 'À convenir'}</p>
-                            <p><strong>• Envoyer votre proposition à :</strong> achats@dg-inc.com</p>
-                        </div>
-                        
-                    </div>
-                    
-                    <!-- Pied de page -->
-                    <div class="footer">
-                        <div><strong>🏭 Desmarais & Gagné inc.</strong> - Système de Gestion des Achats</div>
-                        <div>Demande de Prix générée automatiquement le {date_creation}</div>
-                        <div>📞 (450) 372-9630 | 📧 achats@dg-inc.com | 🌐 www.dg-inc.com</div>
-                        <div style="margin-top: 10px; font-size: 11px; opacity: 0.8;">
-                            Merci de mentionner le numéro de demande {formulaire.get('numero_document', '')} dans votre réponse.
-                        </div>
-                    </div>
-                </div>
-            </body>
-            </html>
-        """
+        return render_demande_prix_html(formulaire, fournisseur, lignes, metadonnees)
     
     def _get_bon_achat_template(self, formulaire: Dict, fournisseur: Dict, lignes: List[Dict], sous_total: float, tva_montant: float, total_ttc: float, metadonnees: Dict) -> str:
         """Template HTML pour Bon d'Achat"""
-        
-        # Formatage des dates
-        date_creation = datetime.now().strftime('%d/%m/%Y à %H:%M')
-        date_livraison = ""
-        if formulaire.get('date_echeance'):
-            date_livraison = pd.to_datetime(formulaire['date_echeance']).strftime('%d/%m/%Y')
-        
-        # Badge statut
-        statut_badge_class = {
-            'BROUILLON': 'badge-pending',
-            'VALIDÉ': 'badge-in-progress',
-            'ENVOYÉ': 'badge-completed',
-            'APPROUVÉ': 'badge-completed',
-            'TERMINÉ': 'badge-completed',
-            'ANNULÉ': 'badge-on-hold'
-        }.get(formulaire.get('statut', 'BROUILLON'), 'badge-pending')
-        
-        # Badge priorité
-        priorite_badge_class = {
-            'NORMAL': 'badge-in-progress',
-            'URGENT': 'badge-pending',
-            'CRITIQUE': 'badge-on-hold'
-        }.get(formulaire.get('priorite', 'NORMAL'), 'badge-in-progress')
-        
-        # Génération des lignes de produits
-        lignes_html = ""
-        for ligne in lignes:
-            is_from_catalog = metadonnees.get('source_catalog', False)
-            source_icon = "🔗" if is_from_catalog else "📝"
-            montant_ligne = ligne.get('quantite', 0) * ligne.get('prix_unitaire', 0)
-            
-            lignes_html += f"""
-                <tr>
-                    <td><strong>{source_icon} {ligne.get('description', '')}</strong>
-                        {f"<br><small>Code: {ligne.get('code_article', '')}</small>" if ligne.get('code_article') else ""}
-                        {f"<br><em>{ligne.get('notes_ligne', '')}</em>" if ligne.get('notes_ligne') else ""}
-                    </td>
-                    <td style="text-align: center;">{ligne.get('quantite', 0)}</td>
-                    <td style="text-align: center;">{ligne.get('unite', 'UN')}</td>
-                    <td style="text-align: right;">{ligne.get('prix_unitaire', 0):.2f} $</td>
-                    <td style="text-align: right;"><strong>{montant_ligne:.2f} $</strong></td>
-                </tr>
-            """
-        
-        # Informations source catalogue
-        source_info = ""
-        if metadonnees.get('source_catalog'):
-            nb_catalog = metadonnees.get('nb_produits_catalog', 0)
-            nb_manuels = metadonnees.get('nb_produits_manuels', 0)
-            source_info = f"""
-                <div class="instructions-box">
-                    <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">🔗 Source des Produits</h4>
-                    <p><strong>• Produits du catalogue :</strong> {nb_catalog}</p>
-                    <p><strong>• Produits saisis manuellement :</strong> {nb_manuels}</p>
-                    <p><em>Cette commande utilise notre catalogue produits intégré pour une gestion optimisée.</em></p>
-                </div>
-            """
-        
-        # Notes du formulaire
-        notes_section = ""
-        if formulaire.get('notes'):
-            notes_section = f"""
-                <div class="instructions-box">
-                    <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">📝 Instructions de Livraison</h4>
-                    <p>{formulaire['notes']}</p>
-                </div>
-            """
-        
-        return f"""
-            <!DOCTYPE html>
-            <html lang="fr">
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Bon d'Achat - {formulaire.get('numero_document', '')}</title>
-                <style>
-                    :root {{
-                        --primary-color: #00A971;
-                        --primary-color-darker: #00673D;
-                        --primary-color-darkest: #004C2E;
-                        --primary-color-lighter: #DCFCE7;
-                        --background-color: #F9FAFB;
-                        --secondary-background-color: #FFFFFF;
-                        --text-color: #374151;
-                        --text-color-light: #6B7280;
-                        --border-color: #E5E7EB;
-                        --border-radius-md: 0.5rem;
-                        --box-shadow-md: 0 4px 6px -1px rgb(0 0 0 / 0.1);
-                    }}
-                    
-                    * {{
-                        margin: 0;
-                        padding: 0;
-                        box-sizing: border-box;
-                    }}
-                    
-                    body {{
-                        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                        line-height: 1.6;
-                        color: var(--text-color);
-                        background-color: var(--background-color);
-                        margin: 0;
-                        padding: 15px;
-                    }}
-                    
-                    .container {{
-                        max-width: 8.5in;
-                        margin: 0 auto;
-                        background-color: white;
-                        border-radius: 12px;
-                        box-shadow: var(--box-shadow-md);
-                        overflow: hidden;
-                        width: 100%;
-                    }}
-                    
-                    .header {{
-                        background: linear-gradient(135deg, var(--primary-color) 0%, var(--primary-color-darker) 100%);
-                        color: white;
-                        padding: 30px;
-                        display: flex;
-                        justify-content: space-between;
-                        align-items: center;
-                    }}
-                    
-                    .logo-container {{
-                        display: flex;
-                        align-items: center;
-                        gap: 20px;
-                    }}
-                    
-                    .logo-box {{
-                        background-color: white;
-                        width: 70px;
-                        height: 45px;
-                        border-radius: 8px;
-                        display: flex;
-                        align-items: center;
-                        justify-content: center;
-                        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.2);
-                    }}
-                    
-                    .logo-text {{
-                        font-family: 'Segoe UI', sans-serif;
-                        font-weight: 800;
-                        font-size: 24px;
-                        color: var(--primary-color);
-                        letter-spacing: 1px;
-                    }}
-                    
-                    .company-info {{
-                        text-align: left;
-                    }}
-                    
-                    .company-name {{
-                        font-weight: 700;
-                        font-size: 28px;
-                        margin-bottom: 5px;
-                        text-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
-                    }}
-                    
-                    .company-subtitle {{
-                        font-size: 16px;
-                        opacity: 0.9;
-                    }}
-                    
-                    .contact-info {{
-                        text-align: right;
-                        font-size: 14px;
-                        line-height: 1.4;
-                        opacity: 0.95;
-                    }}
-                    
-                    .document-title {{
-                        background: var(--primary-color-lighter);
-                        padding: 20px 30px;
-                        border-left: 5px solid var(--primary-color);
-                    }}
-                    
-                    .document-title h1 {{
-                        color: var(--primary-color-darker);
-                        font-size: 24px;
-                        margin-bottom: 10px;
-                    }}
-                    
-                    .document-meta {{
-                        display: flex;
-                        justify-content: space-between;
-                        color: var(--text-color-light);
-                        font-size: 14px;
-                    }}
-                    
-                    .content {{
-                        padding: 25px;
-                    }}
-                    
-                    .section {{
-                        margin-bottom: 30px;
-                    }}
-                    
-                    .section-title {{
-                        color: var(--primary-color-darker);
-                        font-size: 18px;
-                        font-weight: 600;
-                        margin-bottom: 15px;
-                        padding-bottom: 8px;
-                        border-bottom: 2px solid var(--primary-color-lighter);
-                        display: flex;
-                        align-items: center;
-                        gap: 10px;
-                    }}
-                    
-                    .info-grid {{
-                        display: grid;
-                        grid-template-columns: 1fr 1fr 1fr;
-                        gap: 15px;
-                        margin-bottom: 20px;
-                    }}
-                    
-                    .info-item {{
-                        background: var(--background-color);
-                        padding: 15px;
-                        border-radius: var(--border-radius-md);
-                        border-left: 3px solid var(--primary-color);
-                    }}
-                    
-                    .info-label {{
-                        font-weight: 600;
-                        color: var(--text-color-light);
-                        font-size: 12px;
-                        text-transform: uppercase;
-                        letter-spacing: 0.5px;
-                        margin-bottom: 5px;
-                    }}
-                    
-                    .info-value {{
-                        font-size: 16px;
-                        color: var(--text-color);
-                        font-weight: 500;
-                    }}
-                    
-                    .table {{
-                        width: 100%;
-                        border-collapse: collapse;
-                        margin: 15px 0;
-                        border-radius: var(--border-radius-md);
-                        overflow: hidden;
-                        box-shadow: var(--box-shadow-md);
-                    }}
-                    
-                    .table th {{
-                        background: var(--primary-color);
-                        color: white;
-                        padding: 12px;
-                        text-align: left;
-                        font-weight: 600;
-                        font-size: 14px;
-                    }}
-                    
-                    .table td {{
-                        padding: 12px;
-                        border-bottom: 1px solid var(--border-color);
-                        vertical-align: top;
-                    }}
-                    
-                    .table tr:nth-child(even) {{
-                        background-color: var(--background-color);
-                    }}
-                    
-                    .table tr:hover {{
-                        background-color: var(--primary-color-lighter);
-                    }}
-                    
-                    .badge {{
-                        padding: 4px 12px;
-                        border-radius: 20px;
-                        font-size: 11px;
-                        font-weight: 600;
-                        text-transform: uppercase;
-                        letter-spacing: 0.5px;
-                        display: inline-block;
-                    }}
-                    
-                    .badge-pending {{ background: #fef3c7; color: #92400e; }}
-                    .badge-in-progress {{ background: #dbeafe; color: #1e40af; }}
-                    .badge-completed {{ background: #d1fae5; color: #065f46; }}
-                    .badge-on-hold {{ background: #fee2e2; color: #991b1b; }}
-                    
-                    .summary-box {{
-                        background: linear-gradient(45deg, var(--primary-color-lighter), white);
-                        border: 2px solid var(--primary-color);
-                        border-radius: var(--border-radius-md);
-                        padding: 20px;
-                        margin: 20px 0;
-                    }}
-                    
-                    .summary-grid {{
-                        display: grid;
-                        grid-template-columns: repeat(4, 1fr);
-                        gap: 15px;
-                    }}
-                    
-                    .summary-item {{
-                        text-align: center;
-                        background: white;
-                        padding: 15px;
-                        border-radius: var(--border-radius-md);
-                        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                    }}
-                    
-                    .summary-number {{
-                        font-size: 24px;
-                        font-weight: 700;
-                        color: var(--primary-color-darker);
-                        display: block;
-                    }}
-                    
-                    .summary-label {{
-                        font-size: 12px;
-                        color: var(--text-color-light);
-                        text-transform: uppercase;
-                        font-weight: 600;
-                        letter-spacing: 0.5px;
-                    }}
-                    
-                    .instructions-box {{
-                        background: var(--background-color);
-                        border-left: 4px solid var(--primary-color);
-                        padding: 20px;
-                        border-radius: 0 var(--border-radius-md) var(--border-radius-md) 0;
-                        margin: 15px 0;
-                    }}
-                    
-                    .footer {{
-                        background: var(--primary-color-darkest);
-                        color: white;
-                        padding: 20px 30px;
-                        text-align: center;
-                        font-size: 12px;
-                        line-height: 1.4;
-                    }}
-                    
-                    .client-address {{
-                        background: var(--background-color);
-                        border: 2px solid var(--primary-color-lighter);
-                        border-radius: var(--border-radius-md);
-                        padding: 15px;
-                        margin: 15px 0;
-                        font-size: 14px;
-                        line-height: 1.4;
-                    }}
-                    
-                    @media print {{
-                        body {{ 
-                            margin: 0; 
-                            padding: 0; 
-                        }}
-                        .container {{ 
-                            box-shadow: none; 
-                            max-width: 100%;
-                            width: 8.5in;
-                        }}
-                        .table {{ 
-                            break-inside: avoid; 
-                            font-size: 12px;
-                        }}
-                        .section {{ 
-                            break-inside: avoid-page; 
-                        }}
-                        .header {{
-                            padding: 20px 25px;
-                        }}
-                        .content {{
-                            padding: 20px;
-                        }}
-                        @page {{
-                            size: letter;
-                            margin: 0.5in;
-                        }}
-                    }}
-                    
-                    @media screen and (max-width: 768px) {{
-                        .container {{
-                            max-width: 100%;
-                            margin: 0 10px;
-                        }}
-                        .info-grid {{
-                            grid-template-columns: 1fr;
-                            gap: 10px;
-                        }}
-                        .summary-grid {{
-                            grid-template-columns: repeat(2, 1fr);
-                        }}
-                        .header {{
-                            flex-direction: column;
-                            text-align: center;
-                            gap: 15px;
-                        }}
-                        .contact-info {{
-                            text-align: center;
-                        }}
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <!-- En-tête -->
-                    <div class="header">
-                        <div class="logo-container">
-                            <div class="logo-box">
-                                <div class="logo-text">DG</div>
-                            </div>
-                            <div class="company-info">
-                                <div class="company-name">Desmarais & Gagné inc.</div>
-                                <div class="company-subtitle">Construction résidentiel et commercial</div>
-                            </div>
-                        </div>
-                        <div class="contact-info">
-                            565 rue Maisonneuve<br>
-                            Granby, QC J2G 3H5<br>
-                            Tél.: (450) 372-9630<br>
-                            Téléc.: (450) 372-8122
-                        </div>
-                    </div>
-                    
-                    <!-- Titre du document -->
-                    <div class="document-title">
-                        <h1>🛒 BON D'ACHAT</h1>
-                        <div class="document-meta">
-                            <span><strong>N° Bon d'Achat:</strong> {formulaire.get('numero_document', '')}</span>
-                            <span><strong>Généré le:</strong> {date_creation}</span>
-                        </div>
-                    </div>
-                    
-                    <!-- Contenu principal -->
-                    <div class="content">
-                        <!-- Informations générales -->
-                        <div class="section">
-                            <h2 class="section-title">📋 Informations du Bon d'Achat</h2>
-                            <div class="info-grid">
-                                <div class="info-item">
-                                    <div class="info-label">Fournisseur</div>
-                                    <div class="info-value">{fournisseur.get('nom', 'N/A')}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Statut</div>
-                                    <div class="info-value">
-                                        <span class="badge {statut_badge_class}">
-                                            {formulaire.get('statut', 'BROUILLON')}
-                                        </span>
-                                    </div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Priorité</div>
-                                    <div class="info-value">
-                                        <span class="badge {priorite_badge_class}">
-                                            {formulaire.get('priorite', 'NORMAL')}
-                                        </span>
-                                    </div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Date Création</div>
-                                    <div class="info-value">{pd.to_datetime(formulaire.get('date_creation', datetime.now())).strftime('%d/%m/%Y')}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Date Livraison Souhaitée</div>
-                                    <div class="info-value">{date_livraison if date_livraison else 'N/A'}</div>
-                                </div>
-                                <div class="info-item">
-                                    <div class="info-label">Délai Fournisseur</div>
-                                    <div class="info-value">{fournisseur.get('delai_livraison_moyen', 'N/A')} jours</div>
-                                </div>
-                            </div>
-                        </div>
-                        
-                        <!-- Adresse du fournisseur -->
-                        <div class="section">
-                            <h2 class="section-title">📍 Fournisseur</h2>
-                            <div class="client-address">
-                                <strong>{fournisseur.get('nom', 'N/A')}</strong><br>
-                                {fournisseur.get('adresse', 'N/A')}<br>
-                                {fournisseur.get('site_web', '')}<br>
-                                <em>Code fournisseur: {fournisseur.get('code_fournisseur', 'N/A')}</em><br>
-                                <em>Contact commercial: {fournisseur.get('contact_commercial', 'N/A')}</em>
-                            </div>
-                        </div>
-                        
-                        <!-- Résumé financier -->
-                        <div class="summary-box">
-                            <h3 style="color: var(--primary-color-darker); margin-bottom: 15px; text-align: center;">💰 Résumé Financier</h3>
-                            <div class="summary-grid">
-                                <div class="summary-item">
-                                    <span class="summary-number">{len(lignes)}</span>
-                                    <span class="summary-label">Articles</span>
-                                </div>
-                                <div class="summary-item">
-                                    <span class="summary-number">{sous_total:,.2f} $</span>
-                                    <span class="summary-label">Total HT</span>
-                                </div>
-                                <div class="summary-item">
-                                    <span class="summary-number">{tva_montant:,.2f} $</span>
-                                    <span class="summary-label">TVA (14.975%)</span>
-                                </div>
-                                <div class="summary-item">
-                                    <span class="summary-number">{total_ttc:,.2f} $</span>
-                                    <span class="summary-label">Total TTC</span>
-                                </div>
-                            </div>
-                        </div>
-                
-                        <!-- Détail des articles -->
-                        <div class="section">
-                            <h2 class="section-title">📝 Détail des Articles Commandés</h2>
-                            <table class="table">
-                                <thead>
-                                    <tr>
-                                        <th>Description</th>
-                                        <th style="text-align: center;">Quantité</th>
-                                        <th style="text-align: center;">Unité</th>
-                                        <th style="text-align: right;">Prix Unit.</th>
-                                        <th style="text-align: right;">Montant</th>
-                                    </tr>
-                                </thead>
-                                <tbody>
-                                    {lignes_html}
-                                    <!-- Ligne de total -->
-                                    <tr style="background: var(--primary-color-lighter); font-weight: bold;">
-                                        <td colspan="4" style="text-align: right; padding: 15px;"><strong>SOUS-TOTAL (HT)</strong></td>
-                                        <td style="text-align: right; padding: 15px;"><strong>{sous_total:,.2f} $ CAD</strong></td>
-                                    </tr>
-                                    <tr style="background: var(--background-color);">
-                                        <td colspan="4" style="text-align: right; padding: 10px;">TVA (14.975%)</td>
-                                        <td style="text-align: right; padding: 10px;">{tva_montant:,.2f} $ CAD</td>
-                                    </tr>
-                                    <tr style="background: var(--primary-color); color: white; font-weight: bold; font-size: 16px;">
-                                        <td colspan="4" style="text-align: right; padding: 15px;"><strong>TOTAL TTC</strong></td>
-                                        <td style="text-align: right; padding: 15px;"><strong>{total_ttc:,.2f} $ CAD</strong></td>
-                                    </tr>
-                                </tbody>
-                            </table>
-                        </div>
-                
-                        <!-- Notes du bon d'achat -->
-                        {notes_section}
-                        
-                        <!-- Source catalogue -->
-                        {source_info}
-                        
-                        <!-- Conditions -->
-                        <div class="instructions-box">
-                            <h4 style="color: var(--primary-color-darker); margin-bottom: 10px;">💰 Conditions de Commande</h4>
-                            <p><strong>• Conditions de paiement :</strong> {fournisseur.get('conditions_paiement', '30 jours net')}</p>
-                            <p><strong>• Délai de livraison :</strong> {fournisseur.get('delai_livraison_moyen', 'À convenir')} jours</p>
-                            <p><strong>• Date de livraison souhaitée :</strong> {date_livraison if date_livraison else 'À convenir'}</p>
-                            <p><strong>• Lieu de livraison :</strong> 565 rue Maisonneuve, Granby, QC J2G 3H5</p>
-                            <p><strong>• Prix :</strong> Les prix sont exprimés en dollars canadiens (CAD) et incluent les taxes applicables</p>
-                        </div>
-                        
-                    </div>
-                    
-                    <!-- Pied de page -->
-                    <div class="footer">
-                        <div><strong>🏭 Desmarais & Gagné inc.</strong> - Système de Gestion des Achats</div>
-                        <div>Bon d'Achat généré automatiquement le {date_creation}</div>
-                        <div>📞 (450) 372-9630 | 📧 achats@dg-inc.com | 🌐 www.dg-inc.com</div>
-                        <div style="margin-top: 10px; font-size: 11px; opacity: 0.8;">
-                            Merci de mentionner le numéro de bon d'achat {formulaire.get('numero_document', '')} lors de la livraison.
-                        </div>
-                    </div>
-                </div>
-            </body>
-            </html>
-        """
+        return render_bon_achat_html(formulaire, fournisseur, lignes, sous_total, tva_montant, total_ttc, metadonnees)
     
     def export_formulaire_to_html_file(self, formulaire_id: int, type_formulaire: str) -> str:
         """Exporte un formulaire vers un fichier HTML temporaire"""
@@ -3724,6 +2600,41 @@ def render_fournisseurs_performance(gestionnaire):
         st.info("Aucun fournisseur disponible pour l'analyse.")
         return
     
+    # Classement de tous les fournisseurs (lu depuis le snapshot des scorecards)
+    st.markdown("#### 🏆 Classement des Fournisseurs")
+    classement_col1, classement_col2 = st.columns([3, 1])
+    
+    with classement_col2:
+        periode_classement = st.selectbox(
+            "Période du classement:",
+            options=[90, 180, 365, 730],
+            format_func=lambda d: f"{d} jours" if d < 365 else f"{d//365} an(s)",
+            index=2,
+            key="classement_periode_select"
+        )
+        recalculer = st.button("🔄 Recalculer", key="classement_recalculer_btn", use_container_width=True)
+    
+    scorecards = gestionnaire.get_fournisseurs_scorecards(periode_classement, force_refresh=recalculer)
+    
+    with classement_col1:
+        if scorecards:
+            df_classement = [{
+                'Rang': card['rang'],
+                'Fournisseur': card.get('nom', 'N/A'),
+                'Score': card['score_global'],
+                'Commandes': card['total_commandes'],
+                'Montant ($)': f"{card['montant_total'] or 0:,.0f}",
+                'Ponctualité (%)': f"{card['taux_ponctualite']:.1f}" if card['taux_ponctualite'] is not None else 'N/A',
+                'Retard moyen (j)': f"{card['retard_moyen_jours']:.1f}" if card['retard_moyen_jours'] is not None else 'N/A',
+                'Qualité (/10)': card.get('evaluation_qualite', 'N/A')
+            } for card in scorecards]
+            st.dataframe(pd.DataFrame(df_classement), use_container_width=True, hide_index=True)
+            st.caption(f"Calculé le {scorecards[0].get('calcule_le', 'N/A')} - score : ponctualité 50 %, qualité 30 %, retard 20 %")
+        else:
+            st.info("Aucune donnée de classement disponible.")
+    
+    st.markdown("---")
+    
     # Sélection du fournisseur et période
     perf_col1, perf_col2 = st.columns(2)
     
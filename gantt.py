@@ -134,6 +134,16 @@ def get_bt_dates(bt_dict):
 
 def get_operation_dates(operation_dict, bt_start_date, bt_end_date, operation_index, total_operations):
     """Calcule les dates d'une opération basée sur sa séquence dans le BT."""
+    # Priorité aux dates calculées par la planification à capacité finie
+    planned_start = operation_dict.get('date_debut_planifiee')
+    planned_end = operation_dict.get('date_fin_planifiee')
+    if planned_start and planned_end:
+        try:
+            return (datetime.strptime(planned_start[:10], "%Y-%m-%d").date(),
+                    datetime.strptime(planned_end[:10], "%Y-%m-%d").date())
+        except (ValueError, TypeError):
+            pass
+    
     if not bt_start_date or not bt_end_date or total_operations == 0:
         return bt_start_date, bt_start_date
     
@@ -171,6 +181,16 @@ def calculate_overall_date_range_bt(bts_list_data):
             min_overall_date = min(min_overall_date, bt_start) if min_overall_date else bt_start
         if bt_end:
             max_overall_date = max(max_overall_date, bt_end) if max_overall_date else bt_end
+        
+        # Les opérations planifiées peuvent dépasser l'échéance du BT
+        for operation_item in bt_item_data.get('operations', []):
+            planned_end = operation_item.get('date_fin_planifiee')
+            if planned_end:
+                try:
+                    planned_end_date = datetime.strptime(planned_end[:10], "%Y-%m-%d").date()
+                    max_overall_date = max(max_overall_date, planned_end_date) if max_overall_date else planned_end_date
+                except (ValueError, TypeError):
+                    pass
     
     if min_overall_date is None or max_overall_date is None:
         today = date.today()
@@ -925,6 +945,16 @@ def app():
             show_postes = st.checkbox("Afficher postes de travail", value=True)
         
         search_term = st.text_input("🔍 Rechercher un BT:", "")
+        
+        if st.button("🗓️ Planifier à capacité finie", help="Calcule les dates des opérations ouvertes selon la capacité des postes de travail"):
+            result = erp_db.planifier_operations_capacite_finie()
+            if result.get('error'):
+                st.error(f"❌ Erreur de planification: {result['error']}")
+            else:
+                st.success(f"✅ {result['nb_operations']} opérations planifiées en {result['duree_calcul_ms']} ms")
+                if result['bts_en_retard']:
+                    st.warning(f"⚠️ {len(result['bts_en_retard'])} BT dépasseraient leur échéance")
+                st.rerun()
     
     # Bouton retour si un BT est sélectionné
     if st.session_state.get('selected_bt_id'):
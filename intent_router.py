@@ -0,0 +1,206 @@
+# intent_router.py - Routage compilé des messages de l'assistant (intentions, numéros de documents, statistiques)
+"""
+Routage des messages de l'assistant IA.
+
+_process_input, _detecter_intention_conversation et _detecter_intention
+testaient une dizaine de listes any(mot in message for mot in [...]) et
+cinq re.match l'un après l'autre sur chaque message ; un numéro de document
+tapé en conversation (« montre-moi le BT-2025-001 ») partait dans un appel
+Claude avec tout le contexte ERP. Ici :
+- KeywordRouter compile une table ordonnée (intention, mots-clés) en une
+  seule séquence (mot-clé, intention) parcourue une fois : même intention
+  que la cascade de tests, priorités comprises, sans créer un générateur
+  par intention ;
+- les tables des deux assistants (INTENTIONS_ASSISTANT,
+  INTENTIONS_CONVERSATION, MODIFICATION_EN_LOT) sont définies ici, sans
+  dépendre du SDK anthropic : les tests vérifient les vraies tables ;
+- find_document() reconnaît les numéros BT-, EST-, DP-, BA- et PRJ- avec
+  une seule expression compilée et les normalise ;
+- is_lookup() dit si le message ne demande que la fiche du document
+  (« affiche le DP-2025-004 ») : l'assistant répond alors avec ses
+  formateurs, sans aller-retour vers Claude ;
+- chaque décision est comptée (record_route / routing_stats) avec la route
+  réellement prise, pour suivre la part des messages traités sans Claude.
+"""
+
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# =========================================================================
+# ROUTEUR PAR MOTS-CLÉS
+# =========================================================================
+
+
+class KeywordRouter:
+    """
+    Table ordonnée (intention, mots-clés) compilée en une seule séquence
+    (mot-clé, intention) dans l'ordre de priorité : la première intention de
+    la table dont un mot-clé apparaît (sous-chaîne, comme
+    any(mot in message ...)) l'emporte.
+    Une alternative regex unique ou un automate Aho-Corasick en Python pur
+    sont plus lents ici : re essaie chaque alternative à chaque position,
+    alors que « mot in message » est une recherche en C.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, Iterable[str]]], default: str):
+        self.default = default
+        self.rules = tuple((intention, tuple(mots)) for intention, mots in rules)
+        vus = set()
+        table = []
+        for intention, mots in self.rules:
+            for mot in mots:
+                # Un mot-clé déjà vu appartient à une intention plus prioritaire
+                if mot and mot not in vus:
+                    vus.add(mot)
+                    table.append((mot, intention))
+        self.table = tuple(table)
+
+    def route(self, message_lower: str) -> str:
+        """Intention du message (déjà en minuscules), ou la valeur par défaut"""
+        for mot, intention in self.table:
+            if mot in message_lower:
+                return intention
+        return self.default
+
+
+# =========================================================================
+# TABLES D'INTENTIONS
+# =========================================================================
+
+# Intentions de AssistantIAClaude._detecter_intention, par ordre de priorité (la première reconnue l'emporte)
+INTENTIONS_ASSISTANT = KeywordRouter((
+    ('demande_opinion', ['penses quoi', 'ton avis', 'que penses-tu', "qu'en penses-tu"]),
+    ('demande_status', ['comment va', 'comment ça va', 'état de', 'situation']),
+    ('detection_problemes', ['problème', 'souci', 'risque', 'attention']),
+    ('demande_conseil', ['conseil', 'recommande', 'suggère', 'que faire']),
+    ('analyse_financiere', ['budget', 'coût', 'prix', 'rentable']),
+    ('gestion_equipe', ['équipe', 'employé', 'qui peut', 'compétence']),
+    ('gestion_materiel', ['matériel', 'stock', 'inventaire', 'manque']),
+    ('gestion_temps', ['planning', 'délai', 'retard', 'temps']),
+    ('gestion_devis', ['devis', 'estimation', 'proposition', 'cotation', 'offre']),
+    ('analyse_commerciale', ['client', 'vente', 'commercial', 'conversion', 'prospect']),
+), default='question_generale')
+
+# Intentions de AssistantIASimple._detecter_intention_conversation, par ordre de priorité
+INTENTIONS_CONVERSATION = KeywordRouter((
+    ('demande_opinion', ['penses quoi', 'ton avis', 'que penses-tu', "qu'en penses-tu"]),
+    ('demande_status', ['comment va', 'comment ça va', 'état', 'situation', 'avancement']),
+    ('detection_problemes', ['problème', 'souci', 'risque', 'attention', 'inquiet']),
+    ('demande_conseil', ['conseil', 'recommande', 'suggère', 'que faire', 'devrais']),
+    ('analyse_financiere', ['budget', 'coût', 'prix', 'rentable', 'argent']),
+    ('gestion_equipe', ['équipe', 'employé', 'qui peut', 'compétence', 'disponible']),
+    ('gestion_materiel', ['matériel', 'stock', 'inventaire', 'manque', 'commande']),
+    ('gestion_temps', ['planning', 'délai', 'retard', 'temps', 'livraison']),
+    ('creer_projet', ['créer un projet', 'nouveau projet', 'créer projet', 'créé un projet', 'ajouter projet',
+                      'créer un nouveau', 'je veux que tu créer', 'créer ce projet', 'client :', 'nom du projet :',
+                      'créer ces projets', 'peux-tu me créer']),
+    ('modifier_projet', ['modifier', 'changer', 'mettre', 'passer à', 'change la', 'modifie', 'mettre le projet',
+                         'change le statut', 'priorité à', 'tâche à']),
+), default='question_generale')
+# Une modification qui vise plusieurs projets
+MODIFICATION_EN_LOT = KeywordRouter((
+    ('modifier_projets_multiple', ['tous', 'tout', 'toutes', 'tous les projets', 'tous ceux', 'toute la liste']),
+), default='modifier_projet')
+
+
+def conversation_intent(message_lower: str) -> str:
+    """Intention d'un message de conversation (en minuscules) ; modification de plusieurs projets comprise"""
+    intention = INTENTIONS_CONVERSATION.route(message_lower)
+    if intention == 'modifier_projet':
+        intention = MODIFICATION_EN_LOT.route(message_lower)
+    return intention
+
+
+# =========================================================================
+# NUMÉROS DE DOCUMENTS
+# =========================================================================
+
+# Préfixe du numéro -> type de document (clé des formateurs de l'assistant)
+DOCUMENT_PREFIXES = {'bt': 'bt', 'est': 'devis', 'dp': 'dp', 'ba': 'ba', 'prj': 'projet'}
+
+# En conversation, préfixe collé ou suivi d'un tiret (« le prix est 2025 001 » n'est pas un devis)
+_DOCUMENT = re.compile(
+    r'\b(?P<prefixe>bt|est|dp|ba)-?(?P<annee>\d{4})[- ]?(?P<numero>\d{3})\b'
+    r'|\bprj[- ]?(?P<projet>\d{2}[- ]?\d{3})\b',
+    re.IGNORECASE)
+# Après /erp, le numéro est en tête et un projet peut s'écrire sans préfixe (25-251)
+_DOCUMENT_COMMANDE = re.compile(
+    r'(?P<prefixe>bt|est|dp|ba)[- ]?(?P<annee>\d{4})[- ]?(?P<numero>\d{3})'
+    r'|(?:prj[- ]?)?(?P<projet>\d{2}[- ]?\d{3})',
+    re.IGNORECASE)
+
+# Mots d'une simple demande de fiche : au-delà (pourquoi, retard, conseil...), la question va à Claude
+LOOKUP_WORDS = frozenset("""
+    affiche afficher affiches montre montrer montres voir vois consulter ouvre ouvrir donne donner
+    détail détails detail details fiche info infos information informations résumé resume
+    le la les l du de des d un une moi m me tu peux pourrais peut stp svp merci
+    bon bons travail devis estimation demande prix achat projet
+    quel quels quelle quelles est sont c ce où ou en statut état etat
+""".split())
+
+
+def find_document(message: str, command: bool = False) -> Optional[Tuple[str, str, re.Match]]:
+    """
+    Premier numéro de document du message : (type, numéro normalisé, match).
+    Types : bt, devis, dp, ba, projet. Numéros : BT-2025-001, EST-2025-003, 25-251 pour un projet.
+    command=True : requête /erp, numéro en tête, projet sans préfixe accepté.
+    """
+    match = _DOCUMENT_COMMANDE.match(message) if command else _DOCUMENT.search(message)
+    if not match:
+        return None
+    if match.group('projet'):
+        return 'projet', match.group('projet').replace(' ', '-'), match
+    prefixe = match.group('prefixe').lower()
+    return (DOCUMENT_PREFIXES[prefixe], f"{prefixe.upper()}-{match.group('annee')}-{match.group('numero')}", match)
+
+
+def is_lookup(message: str, match: re.Match) -> bool:
+    """Le message ne fait que demander ce document (reste du message fait de mots de consultation)"""
+    reste = (message[:match.start()] + ' ' + message[match.end():]).lower()
+    return all(mot in LOOKUP_WORDS for mot in re.findall(r"[^\W\d_]+", reste))
+
+
+# =========================================================================
+# STATISTIQUES
+# =========================================================================
+
+# Routes de _process_input traitées sans appel à Claude : commandes (/help...), fiches de documents,
+# et local_* (création/modification de projets par extraction, réponse en cache, /erp mis en forme sans Claude)
+LOCAL_ROUTE_PREFIXES = ('/', 'document_', 'erp_document_', 'local_')
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def record_route(router: str, route: str) -> None:
+    """Compte une décision de routage (router : point d'entrée, route : traitement choisi)"""
+    with _stats_lock:
+        _stats[(router, route)] += 1
+
+
+def routing_stats() -> Dict[str, Dict[str, int]]:
+    """Décisions comptées depuis le démarrage, par point d'entrée puis par route"""
+    with _stats_lock:
+        resultat: Dict[str, Dict[str, int]] = {}
+        for (router, route), nombre in sorted(_stats.items()):
+            resultat.setdefault(router, {})[route] = nombre
+        return resultat
+
+
+def local_share(router: str = 'process_input') -> Optional[float]:
+    """Part des messages de ce point d'entrée traités localement (None avant le premier message)"""
+    routes = routing_stats().get(router, {})
+    total = sum(routes.values())
+    if not total:
+        return None
+    return sum(n for route, n in routes.items() if route.startswith(LOCAL_ROUTE_PREFIXES)) / total
+
+
+def reset_routing_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
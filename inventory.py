@@ -9,10 +9,15 @@ import csv
 from typing import Dict, List, Optional, Any
 import logging
 
+from list_pagination import NEXT, ListQuery, count_rows, fetch_page, pager_state, render_pager, search_clause
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Liste des articles : pagination par curseur sur (nom, id)
+INVENTORY_LIST_QUERY = ListQuery("*", "inventory_items", {'nom': ("nom", False)})
+
 class GestionnaireInventaire:
     """
     Gestionnaire d'inventaire connecté à ERPDatabase SQLite - ADAPTÉ CONSTRUCTION QUÉBEC
@@ -561,43 +566,59 @@ class GestionnaireInventaire:
             logger.error(f"Erreur calcul statistiques: {e}")
             return {}
     
+    @staticmethod
+    def _item_filters(search_term: str = "", filters: Dict = None):
+        where, params = [], []
+        
+        # Recherche textuelle
+        if search_term:
+            clause, clause_params = search_clause(('nom', 'code_interne', 'description'), search_term)
+            where.append(clause)
+            params.extend(clause_params)
+        
+        # Filtres
+        if filters:
+            if filters.get('type_produit'):
+                where.append("type_produit = ?")
+                params.append(filters['type_produit'])
+            
+            if filters.get('statut'):
+                where.append("statut = ?")
+                params.append(filters['statut'])
+            
+            if filters.get('fournisseur'):
+                where.append("fournisseur_principal LIKE ?")
+                params.append(f"%{filters['fournisseur']}%")
+            
+            if filters.get('stock_critique_only'):
+                where.append("statut IN ('CRITIQUE', 'FAIBLE', 'ÉPUISÉ')")
+        return where, params
+
     def search_items(self, search_term: str = "", filters: Dict = None) -> List[Dict]:
         """Recherche d'articles avec filtres"""
         try:
-            query = "SELECT * FROM inventory_items WHERE 1=1"
-            params = []
-            
-            # Recherche textuelle
-            if search_term:
-                query += " AND (nom LIKE ? OR code_interne LIKE ? OR description LIKE ?)"
-                pattern = f"%{search_term}%"
-                params.extend([pattern, pattern, pattern])
-            
-            # Filtres
-            if filters:
-                if filters.get('type_produit'):
-                    query += " AND type_produit = ?"
-                    params.append(filters['type_produit'])
-                
-                if filters.get('statut'):
-                    query += " AND statut = ?"
-                    params.append(filters['statut'])
-                
-                if filters.get('fournisseur'):
-                    query += " AND fournisseur_principal LIKE ?"
-                    params.append(f"%{filters['fournisseur']}%")
-                
-                if filters.get('stock_critique_only'):
-                    query += " AND statut IN ('CRITIQUE', 'FAIBLE', 'ÉPUISÉ')"
-            
-            query += " ORDER BY nom ASC"
-            
+            where, params = self._item_filters(search_term, filters)
+            query = f"SELECT * FROM inventory_items{ListQuery.where_sql(where)} ORDER BY nom ASC"
             rows = self.db.execute_query(query, tuple(params) if params else None)
             return [dict(row) for row in rows]
             
         except Exception as e:
             logger.error(f"Erreur recherche articles: {e}")
             return []
+
+    def search_items_page(self, search_term: str = "", filters: Dict = None, cursor: Optional[str] = None,
+                          direction: str = NEXT, page_size: int = 25) -> Dict:
+        """Une page d'articles triés par nom, avec le total de la sélection"""
+        try:
+            where, params = self._item_filters(search_term, filters)
+            page = fetch_page(self.db, INVENTORY_LIST_QUERY, where, params, cursor=cursor, direction=direction,
+                              page_size=page_size)
+            page['total'] = count_rows(self.db, INVENTORY_LIST_QUERY, where, params)['total']
+            return page
+        except Exception as e:
+            logger.error(f"Erreur recherche page articles: {e}")
+            return {'rows': [], 'next_cursor': None, 'prev_cursor': None, 'has_next': False, 'has_prev': False,
+                    'total': 0}
     
     # =========================================================================
     # MÉTHODES EXPORT/IMPORT
@@ -835,11 +856,11 @@ def render_items_list_tab(inventory_manager):
     if show_critical_only:
         filters['stock_critique_only'] = True
     
-    # Récupérer les articles
-    if search_term or filters:
-        items = inventory_manager.search_items(search_term, filters)
-    else:
-        items = inventory_manager.get_all_items()
+    # Récupérer la page d'articles affichée
+    pager = pager_state('inventory_list_page', (search_term, sorted(filters.items())))
+    page = inventory_manager.search_items_page(search_term, filters, pager['cursor'], pager['direction'],
+                                               pager['page_size'])
+    items = page['rows']
     
     if not items:
         st.info("Aucun article trouvé.")
@@ -853,6 +874,8 @@ def render_items_list_tab(inventory_manager):
     else:
         render_items_cards(items, inventory_manager)
 
+    render_pager(page, 'inventory_list_page', page['total'])
+
 def render_items_table(items, inventory_manager):
     """Affichage en mode tableau"""
     # Préparer les données pour le tableau
@@ -0,0 +1,579 @@
+# job_queue.py - File de tâches d'arrière-plan persistante (SQLite) pour la maintenance ERP
+"""
+Tâches longues de maintenance (synchronisation BT ↔ TimeTracker, nettoyage
+des sessions et pointages orphelins, diagnostic TimeTracker, statuts
+d'inventaire, vérification des pièces jointes).
+
+Ces opérations tournaient dans les gestionnaires de boutons Streamlit (ou dans
+le constructeur d'AttachmentsManager) : la session restait bloquée pendant
+toute la durée, sans progression ni moyen d'annuler. Ici :
+- enqueue() insère la tâche dans la table background_jobs et rend son id ;
+  une tâche identique déjà en attente ou en cours est réutilisée ;
+- un thread de travail par processus (get_job_queue) réclame les tâches
+  atomiquement (BEGIN IMMEDIATE), exécute le gestionnaire enregistré par
+  @register_job, publie la progression et un battement de cœur ;
+- cancel() annule une tâche en attente, ou demande l'arrêt d'une tâche en
+  cours (vérifié à chaque progression) ; un échec est retenté avec un délai
+  croissant jusqu'à max_attempts, retry() relance une tâche échouée ;
+- une tâche restée EN_COURS sans battement de cœur (processus arrêté) est
+  remise en attente ;
+- show_job_status() affiche la progression et se rafraîchit seule
+  (st.fragment), la page n'attend plus la fin du travail.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUT_ATTENTE = 'EN_ATTENTE'
+STATUT_EN_COURS = 'EN_COURS'
+STATUT_TERMINE = 'TERMINÉ'
+STATUT_ECHEC = 'ÉCHEC'
+STATUT_ANNULE = 'ANNULÉ'
+STATUTS_ACTIFS = (STATUT_ATTENTE, STATUT_EN_COURS)
+
+POLL_INTERVAL_SECONDS = 1.0
+HEARTBEAT_SECONDS = 5.0
+STALE_AFTER_SECONDS = 60.0
+RETRY_DELAY_SECONDS = 10.0
+DEFAULT_MAX_ATTEMPTS = 3
+# Intervalle minimal entre deux écritures de progression
+PROGRESS_WRITE_SECONDS = 0.5
+
+_handlers: Dict[str, 'JobHandler'] = {}
+_queues: Dict[str, 'JobQueue'] = {}
+_queues_lock = threading.Lock()
+
+
+class JobCancelled(BaseException):
+    """
+    Levée dans un gestionnaire quand l'annulation de sa tâche a été demandée.
+    BaseException (comme KeyboardInterrupt) : un except Exception du code
+    appelé par le gestionnaire ne l'intercepte pas.
+    """
+
+
+class JobHandler:
+    def __init__(self, kind: str, titre: str, fn: Callable[['JobContext'], Any], max_attempts: int):
+        self.kind = kind
+        self.titre = titre
+        self.fn = fn
+        self.max_attempts = max_attempts
+
+
+def register_job(kind: str, titre: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    """Décorateur : enregistre fn(ctx) -> résultat JSON comme gestionnaire des tâches 'kind'"""
+    def register(fn):
+        _handlers[kind] = JobHandler(kind, titre, fn, max_attempts)
+        return fn
+    return register
+
+
+def get_job_titles() -> Dict[str, str]:
+    return {kind: handler.titre for kind, handler in _handlers.items()}
+
+
+def _now() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _decode(job: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if job is None:
+        return None
+    job = dict(job)
+    job['params'] = json.loads(job.pop('params_json') or '{}')
+    job['result'] = json.loads(job.pop('result_json')) if job.get('result_json') else None
+    job['titre'] = _handlers[job['kind']].titre if job['kind'] in _handlers else job['kind']
+    return job
+
+
+# =========================================================================
+# CONTEXTE D'EXÉCUTION
+# =========================================================================
+
+class JobContext:
+    """Ce qu'un gestionnaire voit de sa tâche : paramètres, progression, annulation"""
+
+    def __init__(self, queue: 'JobQueue', job: Dict[str, Any]):
+        self.queue = queue
+        self.db = queue.db
+        self.job_id = job['id']
+        self.params = job['params']
+        self.attempt = job['attempts']
+        self._last_write = 0.0
+
+    def progress(self, fraction: float, message: str = '', force: bool = False) -> None:
+        """Publie l'avancement (0..1) ; lève JobCancelled si l'annulation a été demandée"""
+        maintenant = time.monotonic()
+        if not force and maintenant - self._last_write < PROGRESS_WRITE_SECONDS:
+            return
+        self._last_write = maintenant
+        annulation = self.queue._update_progress(self.job_id, min(max(fraction, 0.0), 1.0), message)
+        if annulation:
+            raise JobCancelled()
+
+    def check_cancelled(self) -> None:
+        if self.queue._cancel_requested(self.job_id):
+            raise JobCancelled()
+
+
+# =========================================================================
+# FILE
+# =========================================================================
+
+class JobQueue:
+    """File de tâches d'une base ERP ; start() lance le(s) thread(s) de travail"""
+
+    def __init__(self, db, workers: int = 1):
+        self.db = db
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._ensure_table()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_table(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS background_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    params_json TEXT NOT NULL DEFAULT '{}',
+                    statut TEXT NOT NULL DEFAULT 'EN_ATTENTE',
+                    progress REAL DEFAULT 0,
+                    message TEXT,
+                    result_json TEXT,
+                    error TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    max_attempts INTEGER DEFAULT 3,
+                    cancel_requested INTEGER DEFAULT 0,
+                    requested_by TEXT,
+                    worker TEXT,
+                    run_after TIMESTAMP,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP,
+                    heartbeat_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_background_jobs_statut ON background_jobs(statut, run_after)")
+        finally:
+            conn.close()
+
+    # -------------------------------------------------------------------------
+    # API pour l'interface
+    # -------------------------------------------------------------------------
+
+    def enqueue(self, kind: str, params: Optional[Dict[str, Any]] = None, requested_by: Optional[str] = None,
+                max_attempts: Optional[int] = None, dedupe: bool = True) -> int:
+        """Ajoute une tâche (ou rend l'id d'une tâche identique en attente / en cours)"""
+        if kind not in _handlers:
+            raise ValueError(f"Type de tâche inconnu : {kind}")
+        params_json = json.dumps(params or {}, sort_keys=True, default=str)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if dedupe:
+                existante = conn.execute('''
+                    SELECT id FROM background_jobs
+                    WHERE kind = ? AND params_json = ? AND statut IN (?, ?)
+                    ORDER BY id LIMIT 1
+                ''', (kind, params_json, *STATUTS_ACTIFS)).fetchone()
+                if existante:
+                    conn.execute("COMMIT")
+                    return existante['id']
+            cursor = conn.execute('''
+                INSERT INTO background_jobs (kind, params_json, statut, max_attempts, requested_by, run_after, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (kind, params_json, STATUT_ATTENTE, max_attempts or _handlers[kind].max_attempts,
+                  requested_by, _now(), _now()))
+            conn.execute("COMMIT")
+            job_id = cursor.lastrowid
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        logger.info(f"📥 Tâche #{job_id} ajoutée : {kind}")
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            return _decode(conn.execute("SELECT * FROM background_jobs WHERE id = ?", (job_id,)).fetchone())
+        finally:
+            conn.close()
+
+    def list_jobs(self, limit: int = 20, kinds: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Tâches les plus récentes (toutes, ou de certains types)"""
+        conn = self._connect()
+        try:
+            if kinds:
+                marqueurs = ', '.join('?' for _ in kinds)
+                rows = conn.execute(f"SELECT * FROM background_jobs WHERE kind IN ({marqueurs}) ORDER BY id DESC LIMIT ?",
+                                    (*kinds, limit))
+            else:
+                rows = conn.execute("SELECT * FROM background_jobs ORDER BY id DESC LIMIT ?", (limit,))
+            return [_decode(row) for row in rows.fetchall()]
+        finally:
+            conn.close()
+
+    def latest(self, kind: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Dernière tâche d'un type (et de ces paramètres)"""
+        conn = self._connect()
+        try:
+            if params is None:
+                row = conn.execute("SELECT * FROM background_jobs WHERE kind = ? ORDER BY id DESC LIMIT 1", (kind,))
+            else:
+                row = conn.execute("SELECT * FROM background_jobs WHERE kind = ? AND params_json = ? ORDER BY id DESC LIMIT 1",
+                                   (kind, json.dumps(params, sort_keys=True, default=str)))
+            return _decode(row.fetchone())
+        finally:
+            conn.close()
+
+    def cancel(self, job_id: int) -> bool:
+        """Annule une tâche en attente ; demande l'arrêt d'une tâche en cours"""
+        conn = self._connect()
+        try:
+            annulee = conn.execute('''
+                UPDATE background_jobs SET statut = ?, finished_at = ?, message = 'Annulée avant exécution'
+                WHERE id = ? AND statut = ?
+            ''', (STATUT_ANNULE, _now(), job_id, STATUT_ATTENTE)).rowcount
+            demandee = conn.execute(
+                "UPDATE background_jobs SET cancel_requested = 1 WHERE id = ? AND statut = ?",
+                (job_id, STATUT_EN_COURS)
+            ).rowcount
+            return bool(annulee or demandee)
+        finally:
+            conn.close()
+
+    def retry(self, job_id: int) -> bool:
+        """Remet en attente une tâche échouée ou annulée (compteur de tentatives remis à zéro)"""
+        conn = self._connect()
+        try:
+            return conn.execute('''
+                UPDATE background_jobs
+                SET statut = ?, attempts = 0, cancel_requested = 0, progress = 0, error = NULL,
+                    message = NULL, result_json = NULL, run_after = ?, finished_at = NULL
+                WHERE id = ? AND statut IN (?, ?)
+            ''', (STATUT_ATTENTE, _now(), job_id, STATUT_ECHEC, STATUT_ANNULE)).rowcount > 0
+        finally:
+            self._wakeup.set()
+            conn.close()
+
+    def purge(self, older_than_days: int = 30) -> int:
+        """Supprime les tâches terminées, échouées ou annulées plus anciennes que older_than_days"""
+        limite = (datetime.now() - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+        conn = self._connect()
+        try:
+            return conn.execute('''
+                DELETE FROM background_jobs WHERE statut NOT IN (?, ?) AND COALESCE(finished_at, created_at) < ?
+            ''', (*STATUTS_ACTIFS, limite)).rowcount
+        finally:
+            conn.close()
+
+    # -------------------------------------------------------------------------
+    # Exécution
+    # -------------------------------------------------------------------------
+
+    def recover_stale_jobs(self) -> int:
+        """Remet en attente les tâches EN_COURS sans battement de cœur récent (processus arrêté)"""
+        limite = (datetime.now() - timedelta(seconds=STALE_AFTER_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+        conn = self._connect()
+        try:
+            reprises = conn.execute('''
+                UPDATE background_jobs
+                SET statut = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END,
+                    error = 'Travailleur interrompu', worker = NULL,
+                    finished_at = CASE WHEN attempts >= max_attempts THEN ? END
+                WHERE statut = ? AND COALESCE(heartbeat_at, started_at) < ?
+            ''', (STATUT_ECHEC, STATUT_ATTENTE, _now(), STATUT_EN_COURS, limite)).rowcount
+        finally:
+            conn.close()
+        if reprises:
+            logger.warning(f"⚠️ {reprises} tâche(s) interrompue(s) remise(s) en attente")
+        return reprises
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute('''
+                SELECT id FROM background_jobs
+                WHERE statut = ? AND (run_after IS NULL OR run_after <= ?)
+                ORDER BY id LIMIT 1
+            ''', (STATUT_ATTENTE, _now())).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute('''
+                UPDATE background_jobs
+                SET statut = ?, attempts = attempts + 1, worker = ?, started_at = ?, heartbeat_at = ?,
+                    progress = 0, message = NULL, error = NULL
+                WHERE id = ?
+            ''', (STATUT_EN_COURS, self.worker_id, _now(), _now(), row['id']))
+            job = conn.execute("SELECT * FROM background_jobs WHERE id = ?", (row['id'],)).fetchone()
+            conn.execute("COMMIT")
+            return _decode(job)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _update_progress(self, job_id: int, fraction: float, message: str) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE background_jobs SET progress = ?, message = ?, heartbeat_at = ? WHERE id = ?",
+                         (fraction, message, _now(), job_id))
+            row = conn.execute("SELECT cancel_requested FROM background_jobs WHERE id = ?", (job_id,)).fetchone()
+            return bool(row and row['cancel_requested'])
+        finally:
+            conn.close()
+
+    def _cancel_requested(self, job_id: int) -> bool:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT cancel_requested FROM background_jobs WHERE id = ?", (job_id,)).fetchone()
+            return bool(row and row['cancel_requested'])
+        finally:
+            conn.close()
+
+    def _heartbeat(self, job_id: int) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE background_jobs SET heartbeat_at = ? WHERE id = ?", (_now(), job_id))
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: int, statut: str, **champs) -> None:
+        colonnes = ', '.join(f"{nom} = ?" for nom in champs)
+        conn = self._connect()
+        try:
+            conn.execute(f"UPDATE background_jobs SET statut = ?, finished_at = ?{', ' + colonnes if colonnes else ''} WHERE id = ?",
+                         (statut, _now(), *champs.values(), job_id))
+        finally:
+            conn.close()
+
+    def run_next(self) -> Optional[Dict[str, Any]]:
+        """Réclame et exécute une tâche ; rend la tâche après exécution (None si la file est vide)"""
+        job = self._claim()
+        if job is None:
+            return None
+        handler = _handlers.get(job['kind'])
+        if handler is None:
+            self._finish(job['id'], STATUT_ECHEC, error=f"Type de tâche inconnu : {job['kind']}")
+            return self.get(job['id'])
+
+        fin_battements = threading.Event()
+
+        def battre():
+            while not fin_battements.wait(HEARTBEAT_SECONDS):
+                self._heartbeat(job['id'])
+
+        battements = threading.Thread(target=battre, name=f"job-heartbeat-{job['id']}", daemon=True)
+        battements.start()
+        t0 = time.perf_counter()
+        try:
+            ctx = JobContext(self, job)
+            resultat = handler.fn(ctx)
+            self._finish(job['id'], STATUT_TERMINE, progress=1.0, cancel_requested=0,
+                         result_json=json.dumps(resultat, default=str),
+                         message=f"Terminé en {time.perf_counter() - t0:.1f} s")
+            logger.info(f"✅ Tâche #{job['id']} ({job['kind']}) terminée en {time.perf_counter() - t0:.1f} s")
+        except JobCancelled:
+            self._finish(job['id'], STATUT_ANNULE, message="Annulée en cours d'exécution")
+            logger.info(f"⏹️ Tâche #{job['id']} ({job['kind']}) annulée")
+        except Exception as e:
+            if job['attempts'] < job['max_attempts']:
+                delai = RETRY_DELAY_SECONDS * 2 ** (job['attempts'] - 1)
+                run_after = (datetime.now() + timedelta(seconds=delai)).strftime('%Y-%m-%d %H:%M:%S')
+                conn = self._connect()
+                try:
+                    conn.execute('''
+                        UPDATE background_jobs SET statut = ?, error = ?, run_after = ?, worker = NULL,
+                               message = ?
+                        WHERE id = ?
+                    ''', (STATUT_ATTENTE, str(e), run_after,
+                          f"Tentative {job['attempts']}/{job['max_attempts']} échouée, nouvel essai dans {delai:.0f} s",
+                          job['id']))
+                finally:
+                    conn.close()
+                logger.warning(f"⚠️ Tâche #{job['id']} ({job['kind']}) en échec, nouvel essai dans {delai:.0f} s : {e}")
+            else:
+                self._finish(job['id'], STATUT_ECHEC, error=str(e))
+                logger.error(f"❌ Tâche #{job['id']} ({job['kind']}) en échec définitif : {e}")
+        finally:
+            fin_battements.set()
+        return self.get(job['id'])
+
+    def run_pending(self) -> int:
+        """Exécute toutes les tâches prêtes dans le thread appelant (scripts, tests)"""
+        executees = 0
+        while self.run_next() is not None:
+            executees += 1
+        return executees
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.run_next() is not None:
+                    continue
+            except Exception as e:
+                logger.error(f"❌ File de tâches : {e}")
+            self._wakeup.wait(POLL_INTERVAL_SECONDS)
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        """Lance les threads de travail (une fois)"""
+        if any(t.is_alive() for t in self._threads):
+            return
+        self._stop.clear()
+        self.recover_stale_jobs()
+        self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def get_job_queue(db, start: bool = True) -> JobQueue:
+    """File partagée par base (un thread de travail par processus)"""
+    key = os.path.abspath(db.db_path)
+    with _queues_lock:
+        queue = _queues.get(key)
+        if queue is None:
+            queue = _queues[key] = JobQueue(db)
+    if start:
+        queue.start()
+    return queue
+
+
+# =========================================================================
+# TÂCHES DE MAINTENANCE
+# =========================================================================
+
+@register_job('bt_timetracker_sync', "Synchronisation BT ↔ TimeTracker")
+def _job_bt_timetracker_sync(ctx: JobContext) -> Dict[str, Any]:
+    ctx.progress(0.0, "Synchronisation des coûts, taux et progressions", force=True)
+    ctx.db.sync_bt_timetracker_data()
+    return {'synchronise': True}
+
+
+@register_job('bt_sessions_cleanup', "Nettoyage des sessions BT vides")
+def _job_bt_sessions_cleanup(ctx: JobContext) -> Dict[str, Any]:
+    ctx.progress(0.0, "Suppression des sessions anciennes, vides et orphelines", force=True)
+    return {'sessions_nettoyees': ctx.db.cleanup_empty_bt_sessions()}
+
+
+@register_job('inventory_status_refresh', "Mise à jour des statuts d'inventaire")
+def _job_inventory_status_refresh(ctx: JobContext) -> Dict[str, Any]:
+    ctx.progress(0.0, "Recalcul des statuts de stock", force=True)
+    return {'articles_mis_a_jour': ctx.db.update_inventory_status_all()}
+
+
+@register_job('timetracker_diagnostic', "Diagnostic TimeTracker")
+def _job_timetracker_diagnostic(ctx: JobContext) -> Dict[str, Any]:
+    from timetracker_unified import TimeTrackerUnified
+    ctx.progress(0.0, "Analyse des pointages", force=True)
+    return TimeTrackerUnified(ctx.db).diagnostic_timetracker_data()
+
+
+@register_job('timetracker_orphans_cleanup', "Nettoyage des pointages orphelins", max_attempts=1)
+def _job_timetracker_orphans_cleanup(ctx: JobContext) -> Dict[str, Any]:
+    from timetracker_unified import TimeTrackerUnified
+    ctx.progress(0.0, "Recherche et suppression des pointages orphelins", force=True)
+    return TimeTrackerUnified(ctx.db).clear_orphaned_entries(ctx.params.get('create_backup', True))
+
+
+@register_job('attachments_verify', "Vérification des pièces jointes")
+def _job_attachments_verify(ctx: JobContext) -> Dict[str, Any]:
+    from attachments_manager import AttachmentsManager
+    manager = AttachmentsManager(ctx.db, verify_in_background=False, run_startup_checks=False)
+    return manager.verify_attachment_files(progress_callback=ctx.progress)
+
+
+@register_job('attachments_orphaned_files', "Recherche des fichiers orphelins")
+def _job_attachments_orphaned_files(ctx: JobContext) -> Dict[str, Any]:
+    from attachments_manager import AttachmentsManager
+    manager = AttachmentsManager(ctx.db, verify_in_background=False, run_startup_checks=False)
+    fichiers = manager.find_orphaned_files(progress_callback=ctx.progress)
+    return {'fichiers_orphelins': fichiers, 'total': len(fichiers)}
+
+
+# =========================================================================
+# INTERFACE
+# =========================================================================
+
+def show_job_status(db, job_id: int, render_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    key: str = 'job') -> None:
+    """Progression d'une tâche, rafraîchie toutes les 2 s tant qu'elle est active ; résultat à la fin"""
+    import streamlit as st
+
+    queue = get_job_queue(db)
+
+    @st.fragment(run_every=2)
+    def panneau():
+        job = queue.get(job_id)
+        if job is None:
+            st.caption(f"Tâche #{job_id} introuvable")
+            return
+        if job['statut'] in STATUTS_ACTIFS:
+            libelle = "⏳ En attente" if job['statut'] == STATUT_ATTENTE else "⚙️ En cours"
+            st.progress(job['progress'] or 0.0, text=f"{libelle} — {job['titre']} {job['message'] or ''}")
+            if job['cancel_requested']:
+                st.caption("Annulation demandée…")
+            elif st.button("⏹️ Annuler", key=f"{key}_cancel_{job_id}"):
+                queue.cancel(job_id)
+        elif job['statut'] == STATUT_TERMINE:
+            st.success(f"✅ {job['titre']} — {job['message'] or 'terminé'}")
+            if render_result:
+                render_result(job['result'])
+        else:
+            icone = "⏹️" if job['statut'] == STATUT_ANNULE else "❌"
+            st.warning(f"{icone} {job['titre']} — {job['statut']} {job['error'] or job['message'] or ''}")
+            if st.button("🔁 Relancer", key=f"{key}_retry_{job_id}"):
+                queue.retry(job_id)
+
+    panneau()
+
+
+def show_jobs_overview(db, limit: int = 10) -> None:
+    """Tableau des dernières tâches d'arrière-plan"""
+    import streamlit as st
+
+    jobs = get_job_queue(db).list_jobs(limit=limit)
+    if not jobs:
+        st.caption("Aucune tâche d'arrière-plan")
+        return
+    st.dataframe([{
+        'Tâche': f"#{job['id']} {job['titre']}",
+        'Statut': job['statut'],
+        'Progression': f"{(job['progress'] or 0) * 100:.0f} %",
+        'Message': job['error'] or job['message'] or '',
+        'Tentatives': f"{job['attempts']}/{job['max_attempts']}",
+        'Créée': job['created_at'],
+    } for job in jobs], hide_index=True, use_container_width=True)
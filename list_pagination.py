@@ -0,0 +1,207 @@
+# list_pagination.py - Pagination par curseur (keyset) des listes ERP
+"""
+Pagination des vues liste (projets, devis, bons de travail, inventaire).
+
+Les listes chargeaient toutes les lignes (avec opérations, matériaux, totaux
+de devis... ligne par ligne), filtraient et triaient en Python puis
+rendaient tout dans Streamlit : mémoire et temps d'affichage croissaient
+avec la table. Ici :
+- ListQuery décrit la requête d'une liste (SELECT, FROM, tris autorisés) ;
+  les filtres sont des clauses SQL paramétrées, appliquées par SQLite ;
+- fetch_page() lit une seule page avec un curseur keyset : la valeur de tri
+  et la clé de la dernière (ou première) ligne affichée, comparées avec une
+  valeur de ligne « (tri, clé) < (?, ?) » qui profite des index, au lieu
+  d'un OFFSET qui relit toutes les lignes précédentes ;
+- le curseur est opaque (JSON en base64) ; la page précédente se lit avec
+  le curseur de la première ligne et l'ordre inversé ;
+- count_rows() calcule total et agrégats de la sélection en une requête ;
+- amount_sql() convertit un montant saisi en texte (« 25 000 $ ») avant de le
+  trier ou de le sommer : un CAST direct lit 0 ;
+- pager_state() / render_pager() gardent le curseur dans la session et
+  reviennent à la première page quand les filtres ou le tri changent.
+"""
+
+import base64
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+NEXT = 'next'
+PREV = 'prev'
+PAGE_SIZE_OPTIONS = (25, 50, 100)
+DEFAULT_PAGE_SIZE = 25
+
+
+# =========================================================================
+# CURSEURS
+# =========================================================================
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """(valeur de tri, clé, ...) -> jeton opaque"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: Optional[str], size: int = 2) -> Optional[List[Any]]:
+    """Jeton -> [valeur de tri, clé] (size valeurs) ; None si absent ou illisible (première page)"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return values if isinstance(values, list) and len(values) == size else None
+    except (ValueError, TypeError):
+        logger.warning(f"⚠️ Curseur de pagination invalide ignoré: {cursor!r}")
+        return None
+
+
+# =========================================================================
+# REQUÊTES
+# =========================================================================
+
+class ListQuery:
+    """
+    Requête paginable d'une liste.
+
+    sorts associe un nom de tri à (expression SQL, descendant). L'expression
+    ne doit pas être NULL (COALESCE) : la clé key_expr, unique, départage les
+    égalités et suit le même sens que le tri.
+    """
+
+    def __init__(self, select_sql: str, from_sql: str, sorts: Dict[str, Tuple[str, bool]],
+                 key_expr: str = 'id', default_sort: Optional[str] = None):
+        self.select_sql = select_sql
+        self.from_sql = from_sql
+        self.sorts = sorts
+        self.key_expr = key_expr
+        self.default_sort = default_sort or next(iter(sorts))
+
+    def sort_spec(self, sort: Optional[str]) -> Tuple[str, bool]:
+        return self.sorts.get(sort) or self.sorts[self.default_sort]
+
+    @staticmethod
+    def where_sql(where: Iterable[str]) -> str:
+        clauses = [clause for clause in where if clause]
+        return f" WHERE {' AND '.join(f'({c})' for c in clauses)}" if clauses else ""
+
+
+def fetch_page(db, query: ListQuery, where: Iterable[str] = (), params: Sequence[Any] = (),
+               sort: Optional[str] = None, cursor: Optional[str] = None, direction: str = NEXT,
+               page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Lit une page de query.
+
+    direction=NEXT : lignes après le curseur ; PREV : lignes avant (le
+    curseur étant alors celui de la première ligne de la page affichée).
+    Rend {'rows', 'next_cursor', 'prev_cursor', 'has_next', 'has_prev'}.
+    """
+    sort_expr, descending = query.sort_spec(sort)
+    where = list(where)
+    params = list(params)
+    position = decode_cursor(cursor)
+    backwards = direction == PREV and position is not None
+
+    if position is not None:
+        # Suivant en DESC ou précédent en ASC : valeurs plus petites
+        operator = '<' if descending != backwards else '>'
+        where.append(f"({sort_expr}, {query.key_expr}) {operator} (?, ?)")
+        params.extend(position)
+
+    scan_desc = descending != backwards
+    order = 'DESC' if scan_desc else 'ASC'
+    sql = (f"SELECT {query.select_sql}, {sort_expr} AS _page_sort, {query.key_expr} AS _page_key "
+           f"FROM {query.from_sql}{ListQuery.where_sql(where)} "
+           f"ORDER BY {sort_expr} {order}, {query.key_expr} {order} LIMIT ?")
+    rows = [dict(row) for row in db.execute_query(sql, tuple(params) + (page_size + 1,))]
+
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    positions = [encode_cursor((row.pop('_page_sort'), row.pop('_page_key'))) for row in rows]
+    if backwards:
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = position is not None, more
+    return {
+        'rows': rows,
+        'next_cursor': positions[-1] if rows and has_next else None,
+        'prev_cursor': positions[0] if rows and has_prev else None,
+        'has_next': bool(rows) and has_next,
+        'has_prev': bool(rows) and has_prev,
+    }
+
+
+def count_rows(db, query: ListQuery, where: Iterable[str] = (), params: Sequence[Any] = (),
+               aggregates: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Total de la sélection et agrégats SQL ({'ca': 'SUM(prix)'}) en une requête"""
+    select = ['COUNT(*) AS total'] + [f"{expr} AS {name}" for name, expr in (aggregates or {}).items()]
+    rows = db.execute_query(f"SELECT {', '.join(select)} FROM {query.from_sql}{ListQuery.where_sql(where)}",
+                            tuple(params))
+    return dict(rows[0]) if rows else {'total': 0}
+
+
+def search_clause(columns: Sequence[str], term: str) -> Tuple[str, List[str]]:
+    """Clause LIKE '%terme%' sur plusieurs colonnes et ses paramètres"""
+    pattern = f"%{term.strip()}%"
+    return ' OR '.join(f"{col} LIKE ?" for col in columns), [pattern] * len(columns)
+
+
+def in_clause(column: str, values: Sequence[Any]) -> Tuple[str, List[Any]]:
+    return f"{column} IN ({', '.join('?' for _ in values)})", list(values)
+
+
+def amount_sql(column: str) -> str:
+    """Montant texte ('$1,250.50', '25 000 $') en REAL, sans $, virgules ni espaces (NULL reste NULL)"""
+    return f"CAST(REPLACE(REPLACE(REPLACE({column}, '$', ''), ',', ''), ' ', '') AS REAL)"
+
+
+# =========================================================================
+# INTERFACE STREAMLIT
+# =========================================================================
+
+def pager_state(state_key: str, signature: Any, default_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Position de la liste dans la session : {'cursor', 'direction', 'page_no',
+    'page_size'}. Revient à la première page si signature (filtres, tri) ou
+    la taille de page change.
+    """
+    import streamlit as st
+
+    page_size = st.session_state.get(f"{state_key}_taille", default_size)
+    signature = repr((signature, page_size))
+    state = st.session_state.get(state_key)
+    if not state or state.get('signature') != signature:
+        state = {'signature': signature, 'cursor': None, 'direction': NEXT, 'page_no': 1, 'page_size': page_size}
+        st.session_state[state_key] = state
+    return state
+
+
+def render_pager(page: Dict[str, Any], state_key: str, total: Optional[int] = None):
+    """Boutons précédent/suivant, numéro de page et taille de page"""
+    import streamlit as st
+
+    state = st.session_state[state_key]
+    col_prev, col_info, col_size, col_next = st.columns([1, 2, 1, 1])
+    with col_prev:
+        if st.button("◀ Précédent", key=f"{state_key}_prev", disabled=not page['has_prev'],
+                     use_container_width=True):
+            state.update(cursor=page['prev_cursor'], direction=PREV, page_no=max(1, state['page_no'] - 1))
+            st.rerun()
+    with col_info:
+        if total is not None:
+            nb_pages = max(1, -(-total // state['page_size']))
+            st.markdown(f"Page **{state['page_no']}** / {nb_pages} — {total} élément(s)")
+        else:
+            st.markdown(f"Page **{state['page_no']}**")
+    with col_size:
+        st.selectbox("Par page", PAGE_SIZE_OPTIONS, key=f"{state_key}_taille",
+                     index=PAGE_SIZE_OPTIONS.index(state['page_size']) if state['page_size'] in PAGE_SIZE_OPTIONS else 0,
+                     label_visibility="collapsed")
+    with col_next:
+        if st.button("Suivant ▶", key=f"{state_key}_next", disabled=not page['has_next'],
+                     use_container_width=True):
+            state.update(cursor=page['next_cursor'], direction=NEXT, page_no=state['page_no'] + 1)
+            st.rerun()
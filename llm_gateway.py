@@ -0,0 +1,584 @@
+# llm_gateway.py - Passerelle instrumentée des appels Claude (tokens, latence, coût par fonctionnalité)
+"""
+Passerelle instrumentée des appels à l'API Claude.
+
+Les appels messages.create / messages.stream étaient dispersés dans
+assistant_ia.py (une trentaine de méthodes *_avec_ia), assistant_ia_simple.py,
+expert_logic.py (et donc ai_expert_app.py) sans aucune comptabilité commune :
+impossible de savoir quelle fonctionnalité est lente ou coûteuse, et
+CacheOptimizer.record_cache_hit/miss n'était jamais alimenté. Ici :
+- instrument(client, feature) enveloppe le client Anthropic ; chaque appel
+  (create ou stream) enregistre modèle, fonctionnalité, opération (la méthode
+  appelante, déduite de la pile ou fixée par with_operation), tokens
+  d'entrée / de sortie / lus et écrits en cache, latence, délai du premier
+  token (flux), coût estimé et erreur éventuelle ;
+- les mesures sont mises en tampon et écrites par lots dans une base SQLite
+  locale (table llm_calls) par un thread d'arrière-plan : aucune écriture
+  disque sur le chemin de la requête ;
+- un CacheOptimizer attaché reçoit les vrais chiffres de cache de l'API ;
+- summary() donne par fonctionnalité / opération / modèle les percentiles
+  de latence (p50, p95, p99), les tokens et le coût ; show_llm_metrics_page()
+  en fait une page de tableau de bord.
+"""
+
+import atexit
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from intent_router import local_share, routing_stats
+
+logger = logging.getLogger(__name__)
+
+# Tampon des mesures : écrit toutes les FLUSH_SECONDS ou dès FLUSH_BATCH mesures
+FLUSH_SECONDS = float(os.environ.get('LLM_METRICS_FLUSH_SECONDS', '2'))
+FLUSH_BATCH = 50
+RETENTION_DAYS = 90
+SUMMARY_DAYS = 7
+
+STATUT_OK = 'ok'
+STATUT_ERREUR = 'erreur'
+
+# Prix en $ US par million de tokens (entrée, sortie), par préfixe de modèle.
+# Lecture en cache : 10 % du prix d'entrée ; écriture en cache : 125 %.
+MODEL_PRICES = (
+    ('claude-opus-4', 15.0, 75.0),
+    ('claude-3-opus', 15.0, 75.0),
+    ('claude-sonnet-4', 3.0, 15.0),
+    ('claude-3-7-sonnet', 3.0, 15.0),
+    ('claude-3-5-sonnet', 3.0, 15.0),
+    ('claude-3-5-haiku', 0.8, 4.0),
+    ('claude-haiku', 1.0, 5.0),
+    ('claude-3-haiku', 0.25, 1.25),
+)
+DEFAULT_PRICES = (3.0, 15.0)
+CACHE_READ_FACTOR = 0.1
+CACHE_WRITE_FACTOR = 1.25
+
+GROUP_COLUMNS = ('feature', 'operation', 'model')
+
+# Modules traversés sans être pris pour l'appelant (opération déduite de la pile)
+_TRANSPARENT_MODULES = frozenset({__name__, 'llm_streaming', 'document_mapreduce'})
+
+_stores: Dict[str, 'LLMMetricsStore'] = {}
+_stores_lock = threading.Lock()
+
+
+def _now() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def model_prices(model: Optional[str]) -> tuple:
+    for prefix, input_price, output_price in MODEL_PRICES:
+        if model and model.startswith(prefix):
+            return input_price, output_price
+    return DEFAULT_PRICES
+
+
+def estimate_cost(model: Optional[str], input_tokens: int = 0, output_tokens: int = 0, cache_read_tokens: int = 0,
+                  cache_creation_tokens: int = 0) -> float:
+    """Coût estimé d'un appel en $ US"""
+    input_price, output_price = model_prices(model)
+    return (input_tokens * input_price + output_tokens * output_price
+            + cache_read_tokens * input_price * CACHE_READ_FACTOR
+            + cache_creation_tokens * input_price * CACHE_WRITE_FACTOR) / 1_000_000
+
+
+def usage_tokens(usage) -> Dict[str, int]:
+    """Tokens d'un objet usage de l'API (attributs absents ou None comptés 0)"""
+    return {
+        'input_tokens': getattr(usage, 'input_tokens', None) or 0,
+        'output_tokens': getattr(usage, 'output_tokens', None) or 0,
+        'cache_read_tokens': getattr(usage, 'cache_read_input_tokens', None) or 0,
+        'cache_creation_tokens': getattr(usage, 'cache_creation_input_tokens', None) or 0,
+    }
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> Optional[float]:
+    """Percentile p (0..100) par interpolation linéaire d'une liste triée"""
+    if not sorted_values:
+        return None
+    rang = (len(sorted_values) - 1) * p / 100
+    bas = int(rang)
+    haut = min(bas + 1, len(sorted_values) - 1)
+    return sorted_values[bas] + (sorted_values[haut] - sorted_values[bas]) * (rang - bas)
+
+
+def _caller_operation() -> str:
+    """Nom de la première fonction appelante hors de la passerelle et des modules transparents"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get('__name__') in _TRANSPARENT_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return 'inconnu'
+    return frame.f_code.co_name.lstrip('_') or 'inconnu'
+
+
+# =========================================================================
+# STOCKAGE DES MESURES
+# =========================================================================
+
+class LLMMetricsStore:
+    """Table llm_calls d'une base SQLite locale, écrite par lots en arrière-plan"""
+
+    COLUMNS = ('created_at', 'feature', 'operation', 'model', 'streamed', 'status', 'error', 'input_tokens',
+               'output_tokens', 'cache_read_tokens', 'cache_creation_tokens', 'latency_ms', 'ttft_ms',
+               'cost_usd')
+
+    def __init__(self, db_path: str, flush_seconds: float = FLUSH_SECONDS):
+        self.db_path = db_path
+        self.flush_seconds = flush_seconds
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ensure_table()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_table(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_calls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TIMESTAMP NOT NULL,
+                    feature TEXT NOT NULL,
+                    operation TEXT NOT NULL,
+                    model TEXT,
+                    streamed INTEGER DEFAULT 0,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    input_tokens INTEGER DEFAULT 0,
+                    output_tokens INTEGER DEFAULT 0,
+                    cache_read_tokens INTEGER DEFAULT 0,
+                    cache_creation_tokens INTEGER DEFAULT 0,
+                    latency_ms REAL,
+                    ttft_ms REAL,
+                    cost_usd REAL DEFAULT 0
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_created_at ON llm_calls(created_at)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def record(self, call: Dict[str, Any]) -> None:
+        """Met la mesure en tampon (écrite par le thread d'arrière-plan)"""
+        row = tuple(call.get(column) for column in self.COLUMNS)
+        with self._lock:
+            self._pending.append(row)
+            plein = len(self._pending) >= FLUSH_BATCH
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='llm_metrics', daemon=True)
+                self._thread.start()
+        if plein:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Écrit les mesures en attente en une transaction ; rend leur nombre"""
+        with self._write_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(f"INSERT INTO llm_calls ({', '.join(self.COLUMNS)}) "
+                                     f"VALUES ({', '.join('?' * len(self.COLUMNS))})", rows)
+            except sqlite3.Error as e:
+                logger.error(f"❌ Écriture de {len(rows)} mesures LLM impossible: {e}")
+                return 0
+            finally:
+                conn.close()
+            return len(rows)
+
+    def _work(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def _select(self, since: Optional[str], where: str = '', params: tuple = (), suffix: str = '') -> List[Dict]:
+        self.flush()
+        conditions = (["created_at >= ?"] if since else []) + ([where] if where else [])
+        sql = "SELECT * FROM llm_calls" + (f" WHERE {' AND '.join(conditions)}" if conditions else '') + suffix
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, ((since,) if since else ()) + params)]
+        finally:
+            conn.close()
+
+    # -------------------------------------------------------------------------
+    # Lecture et synthèses
+    # -------------------------------------------------------------------------
+
+    def recent(self, limit: int = 50, errors_only: bool = False) -> List[Dict[str, Any]]:
+        """Derniers appels (ou dernières erreurs), du plus récent au plus ancien"""
+        where, params = ("status = ?", (STATUT_ERREUR,)) if errors_only else ('', ())
+        return self._select(None, where, params + (limit,), suffix=" ORDER BY id DESC LIMIT ?")
+
+    def summary(self, group_by: Sequence[str] = ('feature',), days: Optional[float] = SUMMARY_DAYS,
+                order_by: str = 'cost_usd') -> List[Dict[str, Any]]:
+        """
+        Synthèse par groupe (colonnes de GROUP_COLUMNS) sur les `days` derniers
+        jours : appels, erreurs, latence p50/p95/p99 et cumulée (total_ms),
+        premier token p50 (flux), tokens, part des tokens d'entrée lus en
+        cache et coût ; triée par
+        order_by décroissant. Sommes calculées par SQLite, percentiles sur les
+        latences lues déjà triées.
+        """
+        group_by = [c for c in group_by if c in GROUP_COLUMNS]
+        cles = ''.join(f"{c}, " for c in group_by)
+        group = f" GROUP BY {', '.join(group_by)}" if group_by else ''
+        since = self._since(days)
+        conditions = ["created_at >= ?"] if since else []
+        params = (since,) if since else ()
+
+        def where(*extra):
+            toutes = conditions + list(extra)
+            return f" WHERE {' AND '.join(toutes)}" if toutes else ''
+
+        self.flush()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            agregats = conn.execute(
+                f"SELECT {cles}COUNT(*), SUM(status = ?), SUM(input_tokens), SUM(output_tokens), "
+                f"SUM(cache_read_tokens), SUM(cache_creation_tokens), SUM(cost_usd), SUM(latency_ms) "
+                f"FROM llm_calls{where()}{group}", (STATUT_ERREUR,) + params).fetchall()
+            triees: Dict[str, Dict[tuple, List[float]]] = {}
+            for colonne in ('latency_ms', 'ttft_ms'):
+                valeurs = triees[colonne] = {}
+                for row in conn.execute(f"SELECT {cles}{colonne} FROM llm_calls{where(f'{colonne} IS NOT NULL')} "
+                                        f"ORDER BY {colonne}", params):
+                    valeurs.setdefault(row[:-1], []).append(row[-1])
+        finally:
+            conn.close()
+
+        n = len(group_by)
+        rows = []
+        for agregat in agregats:
+            cle = tuple(agregat[:n])
+            if not agregat[n]:
+                continue
+            rows.append(dict(zip(group_by, cle), **_aggregate(agregat[n:], triees['latency_ms'].get(cle, []),
+                                                               triees['ttft_ms'].get(cle, []))))
+        rows.sort(key=lambda r: r.get(order_by) or 0, reverse=True)
+        return rows
+
+    def totals(self, days: Optional[float] = SUMMARY_DAYS) -> Dict[str, Any]:
+        rows = self.summary((), days=days)
+        return rows[0] if rows else _aggregate((0, 0, 0, 0, 0, 0, 0.0, 0.0), [], [])
+
+    def daily(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Appels, tokens et coût par jour"""
+        self.flush()
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute('''
+                SELECT substr(created_at, 1, 10) AS jour, COUNT(*) AS calls,
+                       SUM(input_tokens) AS input_tokens, SUM(output_tokens) AS output_tokens,
+                       SUM(cost_usd) AS cost_usd
+                FROM llm_calls WHERE created_at >= ? GROUP BY jour ORDER BY jour
+            ''', (self._since(days),))]
+        finally:
+            conn.close()
+
+    def purge(self, older_than_days: int = RETENTION_DAYS) -> int:
+        self.flush()
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute("DELETE FROM llm_calls WHERE created_at < ?",
+                                    (self._since(older_than_days),)).rowcount
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _since(days: Optional[float]) -> Optional[str]:
+        if days is None:
+            return None
+        return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _aggregate(sommes: Sequence, latences: List[float], ttft: List[float]) -> Dict[str, Any]:
+    """Agrégats d'un groupe : (appels, erreurs, tokens..., coût, latence cumulée) et latences triées"""
+    calls, erreurs, input_tokens, output_tokens, cache_read, cache_creation, cout, attente = (v or 0 for v in sommes)
+    entree = input_tokens + cache_read + cache_creation
+
+    def arrondi(valeur):
+        return round(valeur, 1) if valeur is not None else None
+
+    return {
+        'calls': calls,
+        'errors': erreurs,
+        'error_rate': round(erreurs / calls, 3) if calls else 0.0,
+        'p50_ms': arrondi(percentile(latences, 50)),
+        'p95_ms': arrondi(percentile(latences, 95)),
+        'p99_ms': arrondi(percentile(latences, 99)),
+        'max_ms': arrondi(latences[-1]) if latences else None,
+        'ttft_p50_ms': arrondi(percentile(ttft, 50)),
+        'total_ms': round(attente, 1),
+        'input_tokens': input_tokens,
+        'output_tokens': output_tokens,
+        'cache_read_tokens': cache_read,
+        'cache_creation_tokens': cache_creation,
+        'cache_read_ratio': round(cache_read / entree, 3) if entree else 0.0,
+        'cost_usd': round(cout, 4),
+    }
+
+
+def _default_db_path() -> str:
+    if os.environ.get('LLM_METRICS_DB'):
+        return os.environ['LLM_METRICS_DB']
+    data_path = os.environ.get('DATA_PATH')
+    if data_path and os.path.exists(data_path):
+        return os.path.join(data_path, 'llm_metrics.db')
+    return os.path.join(tempfile.gettempdir(), 'erp_llm_metrics.db')
+
+
+def get_metrics_store(db_path: Optional[str] = None) -> LLMMetricsStore:
+    """Base de mesures partagée (LLM_METRICS_DB, DATA_PATH/llm_metrics.db ou répertoire temporaire)"""
+    key = os.path.abspath(db_path or _default_db_path())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = LLMMetricsStore(key)
+    return store
+
+
+@atexit.register
+def _flush_all() -> None:
+    for store in list(_stores.values()):
+        store.flush()
+
+
+# =========================================================================
+# CLIENT INSTRUMENTÉ
+# =========================================================================
+
+class InstrumentedClient:
+    """
+    Client Anthropic instrumenté : messages.create / messages.stream mesurés,
+    tout le reste délégué au client d'origine.
+    """
+
+    def __init__(self, client, feature: str, operation: Optional[str] = None,
+                 store: Optional[LLMMetricsStore] = None, cache_optimizer=None):
+        self.client = client
+        self.feature = feature
+        self.operation = operation
+        self.store = store
+        self.cache_optimizer = cache_optimizer
+        self.messages = InstrumentedMessages(self)
+
+    def with_operation(self, operation: str) -> 'InstrumentedClient':
+        """Même client, appels attribués à `operation` au lieu de la méthode appelante"""
+        return InstrumentedClient(self.client, self.feature, operation, self.store, self.cache_optimizer)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _record(self, request: Dict[str, Any], operation: str, started: float, usage=None,
+                error: Optional[Exception] = None, first_token: Optional[float] = None,
+                streamed: bool = False) -> None:
+        latency = time.perf_counter() - started
+        tokens = usage_tokens(usage)
+        model = request.get('model')
+        call = dict(tokens, created_at=_now(), feature=self.feature, operation=operation, model=model,
+                    streamed=int(streamed), status=STATUT_ERREUR if error else STATUT_OK,
+                    error=f"{type(error).__name__}: {error}"[:500] if error else None,
+                    latency_ms=round(latency * 1000, 1),
+                    ttft_ms=round((first_token - started) * 1000, 1) if first_token else None,
+                    cost_usd=estimate_cost(model, **tokens))
+        try:
+            (self.store or get_metrics_store()).record(call)
+        except Exception as e:
+            logger.error(f"❌ Mesure LLM non enregistrée ({self.feature}.{operation}): {e}")
+        if self.cache_optimizer is not None and error is None:
+            if tokens['cache_read_tokens']:
+                self.cache_optimizer.record_cache_hit(tokens['cache_read_tokens'], latency)
+            else:
+                self.cache_optimizer.record_cache_miss(tokens['cache_creation_tokens'], latency)
+        logger.debug(f"📏 {self.feature}.{operation}: {call['latency_ms']} ms, {tokens['input_tokens']} → "
+                     f"{tokens['output_tokens']} tokens ({tokens['cache_read_tokens']} lus en cache)")
+
+
+class InstrumentedMessages:
+    def __init__(self, owner: InstrumentedClient):
+        self._owner = owner
+        self._messages = owner.client.messages
+        if hasattr(self._messages, 'stream'):
+            self.stream = self._stream
+
+    def create(self, **request):
+        operation = self._owner.operation or _caller_operation()
+        started = time.perf_counter()
+        try:
+            response = self._messages.create(**request)
+        except Exception as e:
+            self._owner._record(request, operation, started, error=e)
+            raise
+        self._owner._record(request, operation, started, usage=getattr(response, 'usage', None))
+        return response
+
+    def _stream(self, **request) -> '_InstrumentedStream':
+        return _InstrumentedStream(self._owner, self._messages, request,
+                                   self._owner.operation or _caller_operation())
+
+    def __getattr__(self, name):
+        return getattr(self._messages, name)
+
+
+class _InstrumentedStream:
+    """Gestionnaire de contexte autour de messages.stream : mesure à la sortie du bloc with"""
+
+    def __init__(self, owner: InstrumentedClient, messages, request: Dict[str, Any], operation: str):
+        self._owner = owner
+        self._messages = messages
+        self._request = request
+        self._operation = operation
+        self._manager = None
+        self._stream = None
+        self.first_token: Optional[float] = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        try:
+            self._manager = self._messages.stream(**self._request)
+            self._stream = self._manager.__enter__()
+        except Exception as e:
+            self._owner._record(self._request, self._operation, self._started, error=e, streamed=True)
+            raise
+        return _StreamProxy(self._stream, self)
+
+    def __exit__(self, exc_type, exc, tb):
+        usage = None
+        if exc is None:
+            try:
+                usage = getattr(self._stream.get_final_message(), 'usage', None)
+            except Exception as e:
+                exc = e
+        self._owner._record(self._request, self._operation, self._started, usage=usage, error=exc,
+                            first_token=self.first_token, streamed=True)
+        return self._manager.__exit__(exc_type, exc if exc_type else None, tb)
+
+
+class _StreamProxy:
+    """Flux d'origine ; note l'instant du premier fragment reçu"""
+
+    def __init__(self, stream, owner: _InstrumentedStream):
+        self._stream = stream
+        self._owner = owner
+
+    def _mark(self, items):
+        for item in items:
+            if self._owner.first_token is None:
+                self._owner.first_token = time.perf_counter()
+            yield item
+
+    @property
+    def text_stream(self):
+        return self._mark(self._stream.text_stream)
+
+    def __iter__(self):
+        return self._mark(self._stream)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def instrument(client, feature: str, store: Optional[LLMMetricsStore] = None,
+               cache_optimizer=None) -> InstrumentedClient:
+    """Enveloppe un client Anthropic : chaque appel est mesuré et attribué à `feature`"""
+    if isinstance(client, InstrumentedClient):
+        return client
+    return InstrumentedClient(client, feature, store=store, cache_optimizer=cache_optimizer)
+
+
+def bind_caller(client):
+    """
+    Fixe l'opération d'un client instrumenté à la fonction appelante actuelle
+    (pour les appels faits plus tard : flux itéré par Streamlit, threads).
+    Les clients non instrumentés sont rendus tels quels.
+    """
+    if not isinstance(client, InstrumentedClient) or client.operation:
+        return client
+    return client.with_operation(_caller_operation())
+
+
+# =========================================================================
+# INTERFACE STREAMLIT
+# =========================================================================
+
+def show_llm_metrics_page(store: Optional[LLMMetricsStore] = None) -> None:
+    """Tableau de bord : consommation, latence et coût des appels Claude par fonctionnalité"""
+    import streamlit as st
+
+    store = store or get_metrics_store()
+    st.markdown("### 📏 Consommation IA")
+    jours = st.selectbox("Période", [1, 7, 30, 90], index=1, format_func=lambda j: f"{j} derniers jours",
+                         key='llm_metrics_days')
+    totaux = store.totals(days=jours)
+    if not totaux['calls']:
+        st.info("Aucun appel à Claude enregistré sur cette période.")
+        return
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Appels", f"{totaux['calls']:,}".replace(',', ' '))
+    col2.metric("Coût estimé", f"{totaux['cost_usd']:.2f} $")
+    col3.metric("Latence p50 / p95", f"{totaux['p50_ms'] / 1000:.1f} / {totaux['p95_ms'] / 1000:.1f} s")
+    col4.metric("Tokens lus en cache", f"{totaux['cache_read_ratio'] * 100:.0f} %")
+    col5.metric("Erreurs", f"{totaux['errors']} ({totaux['error_rate'] * 100:.1f} %)")
+
+    colonnes = {'calls': 'Appels', 'errors': 'Erreurs', 'p50_ms': 'p50 (ms)', 'p95_ms': 'p95 (ms)',
+                'p99_ms': 'p99 (ms)', 'ttft_p50_ms': '1er token p50 (ms)', 'input_tokens': 'Tokens entrée',
+                'output_tokens': 'Tokens sortie', 'cache_read_tokens': 'Lus en cache', 'cost_usd': 'Coût ($)'}
+
+    def tableau(lignes, cles):
+        st.dataframe([{**{cle.capitalize(): ligne[cle] for cle in cles},
+                       **{libelle: ligne[c] for c, libelle in colonnes.items()}} for ligne in lignes],
+                     hide_index=True, use_container_width=True)
+
+    onglet_couts, onglet_lents, onglet_erreurs, onglet_routage = st.tabs(
+        ["💰 Plus coûteuses", "🐢 Plus lentes", "❌ Erreurs", "🧭 Routage"])
+    with onglet_couts:
+        tableau(store.summary(('feature',), days=jours), ('feature',))
+        tableau(store.summary(('feature', 'operation'), days=jours)[:30], ('feature', 'operation'))
+        quotidien = store.daily(days=max(jours, 7))
+        if quotidien:
+            st.bar_chart({ligne['jour']: ligne['cost_usd'] for ligne in quotidien})
+    with onglet_lents:
+        tableau(store.summary(('feature', 'operation'), days=jours, order_by='p95_ms')[:30],
+                ('feature', 'operation'))
+        tableau(store.summary(('model',), days=jours, order_by='p95_ms'), ('model',))
+    with onglet_erreurs:
+        erreurs = store.recent(limit=50, errors_only=True)
+        if erreurs:
+            st.dataframe([{'Date': e['created_at'], 'Fonctionnalité': f"{e['feature']}.{e['operation']}",
+                           'Modèle': e['model'], 'Erreur': e['error']} for e in erreurs],
+                         hide_index=True, use_container_width=True)
+        else:
+            st.caption("Aucune erreur récente")
+    with onglet_routage:
+        part = local_share()
+        if part is None:
+            st.caption("Aucun message routé depuis le démarrage")
+        else:
+            st.metric("Messages traités sans Claude", f"{part * 100:.0f} %")
+            st.dataframe([{'Point d\'entrée': routeur, 'Route': route, 'Messages': nombre}
+                          for routeur, routes in routing_stats().items() for route, nombre in routes.items()],
+                         hide_index=True, use_container_width=True)
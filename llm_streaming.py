@@ -0,0 +1,203 @@
+# llm_streaming.py - Réponses Claude en flux (token par token) pour les assistants IA
+"""
+Réponses en flux des assistants IA.
+
+AssistantIASimple._get_claude_response, AssistantIAClaude.conversation_naturelle
+et ExpertAdvisor.obtenir_reponse appelaient messages.create et attendaient la
+réponse complète (jusqu'à 4 000 tokens) avant d'afficher quoi que ce soit :
+l'utilisateur fixait un spinner pendant de longues secondes. Ici :
+- StreamedResponse ouvre messages.stream et rend les fragments de texte dès
+  leur arrivée ; elle s'itère une seule fois (st.write_stream) et garde le
+  texte complet dans .text ;
+- les métriques de chaque réponse (délai du premier token, durée, tokens de
+  sortie, tokens/s) sont journalisées et conservées (recent_stream_metrics) ;
+- on_complete(texte) est appelé une fois la réponse terminée, pour persister
+  le message final ;
+- les erreurs de l'API (avant ou pendant le flux) deviennent un message
+  d'erreur rendu dans le flux, comme les anciennes méthodes le retournaient ;
+- render_stream() affiche une réponse (flux ou texte déjà calculé) dans
+  Streamlit et rend le texte final à ajouter à l'historique.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Union
+
+from cache_config import estimate_tokens
+from llm_gateway import bind_caller
+
+logger = logging.getLogger(__name__)
+
+# Dernières réponses mesurées (toutes instances confondues)
+METRICS_HISTORY = 200
+_recent_metrics: Deque[Dict[str, Any]] = deque(maxlen=METRICS_HISTORY)
+_metrics_lock = threading.Lock()
+
+
+def _default_error_text(error: Exception) -> str:
+    return f"❌ Erreur: {error}"
+
+
+class StreamedResponse:
+    """
+    Réponse de messages.stream, itérable une fois (fragments de texte).
+
+    request : arguments de messages.create (model, max_tokens, messages...).
+    Après l'itération : .text (réponse complète), .metrics, .error.
+    """
+
+    def __init__(self, client, request: Dict[str, Any], label: str = 'claude',
+                 on_complete: Optional[Callable[[str], None]] = None,
+                 error_text: Callable[[Exception], str] = _default_error_text,
+                 empty_text: Optional[str] = None):
+        # Client instrumenté : appels attribués à la méthode qui crée la réponse
+        self.client = bind_caller(client)
+        self.request = request
+        self.label = label
+        self.on_complete = on_complete
+        self.error_text = error_text
+        self.empty_text = empty_text
+        self.text = ''
+        self.metrics: Dict[str, Any] = {}
+        self.error: Optional[Exception] = None
+        self._started = False
+        self._done = False
+
+    def __iter__(self) -> Iterator[str]:
+        if self._started:
+            # Déjà consommée : rejouer le texte complet
+            if self.text:
+                yield self.text
+            return
+        self._started = True
+
+        parts: List[str] = []
+        output_tokens = None
+        streamed = hasattr(self.client.messages, 'stream')
+        t0 = time.perf_counter()
+        first = None
+        try:
+            if streamed:
+                with self.client.messages.stream(**self.request) as stream:
+                    for delta in stream.text_stream:
+                        if not delta:
+                            continue
+                        if first is None:
+                            first = time.perf_counter()
+                        parts.append(delta)
+                        yield delta
+                    final = stream.get_final_message()
+                    output_tokens = getattr(getattr(final, 'usage', None), 'output_tokens', None)
+            else:
+                # Ancien SDK sans messages.stream : une seule réponse complète
+                response = self.client.messages.create(**self.request)
+                first = time.perf_counter()
+                text = response.content[0].text if response.content else ''
+                output_tokens = getattr(getattr(response, 'usage', None), 'output_tokens', None)
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            self.error = e
+            logger.error(f"❌ Flux {self.label} interrompu: {type(e).__name__} - {e}")
+            message = self.error_text(e)
+            if parts:
+                message = f"\n\n{message}"
+            parts.append(message)
+            yield message
+
+        if not parts and self.empty_text:
+            parts.append(self.empty_text)
+            yield self.empty_text
+
+        self.text = ''.join(parts)
+        self._record(t0, first, time.perf_counter(), output_tokens, streamed)
+        self._done = True
+        if self.on_complete:
+            try:
+                self.on_complete(self.text)
+            except Exception as e:
+                logger.error(f"❌ Persistance de la réponse {self.label} impossible: {e}")
+
+    def _record(self, t0: float, first: Optional[float], end: float, output_tokens: Optional[int],
+                streamed: bool):
+        if self.error is None and output_tokens is None:
+            output_tokens = estimate_tokens(self.text)
+        generation = end - first if first is not None else 0.0
+        self.metrics = {
+            'label': self.label,
+            'model': self.request.get('model'),
+            'streamed': streamed,
+            'ttft_ms': round((first - t0) * 1000, 1) if first is not None else None,
+            'duration_ms': round((end - t0) * 1000, 1),
+            'output_tokens': output_tokens or 0,
+            'tokens_per_s': round(output_tokens / generation, 1) if output_tokens and generation > 0 else None,
+            'error': type(self.error).__name__ if self.error else None,
+        }
+        with _metrics_lock:
+            _recent_metrics.append(self.metrics)
+        logger.info(f"⚡ {self.label}: 1er token {self.metrics['ttft_ms']} ms, "
+                    f"{self.metrics['output_tokens']} tokens en {self.metrics['duration_ms']} ms "
+                    f"({self.metrics['tokens_per_s']} tokens/s)")
+
+    def consume(self) -> str:
+        """Lit tout le flux (sans affichage) et rend le texte complet"""
+        for _ in self:
+            pass
+        return self.text
+
+    def __str__(self) -> str:
+        return self.consume() if not self._done else self.text
+
+
+def stream_message(client, label: str = 'claude', on_complete: Optional[Callable[[str], None]] = None,
+                   error_text: Callable[[Exception], str] = _default_error_text,
+                   empty_text: Optional[str] = None, **request) -> StreamedResponse:
+    """messages.stream(**request) sous forme de StreamedResponse (rien n'est envoyé avant l'itération)"""
+    return StreamedResponse(client, request, label=label, on_complete=on_complete,
+                            error_text=error_text, empty_text=empty_text)
+
+
+def response_text(response: Union[str, StreamedResponse]) -> str:
+    """Texte complet d'une réponse, en flux ou non"""
+    return response.consume() if isinstance(response, StreamedResponse) else response
+
+
+def recent_stream_metrics(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    with _metrics_lock:
+        metrics = list(_recent_metrics)
+    return metrics[-limit:] if limit else metrics
+
+
+def stream_metrics_summary() -> Dict[str, Any]:
+    """Moyennes des dernières réponses : délai du premier token, tokens/s"""
+    metrics = [m for m in recent_stream_metrics() if not m['error']]
+    ttft = [m['ttft_ms'] for m in metrics if m['ttft_ms'] is not None]
+    tps = [m['tokens_per_s'] for m in metrics if m['tokens_per_s']]
+    return {
+        'responses': len(metrics),
+        'avg_ttft_ms': round(sum(ttft) / len(ttft), 1) if ttft else None,
+        'max_ttft_ms': max(ttft) if ttft else None,
+        'avg_tokens_per_s': round(sum(tps) / len(tps), 1) if tps else None,
+    }
+
+
+# =========================================================================
+# INTERFACE STREAMLIT
+# =========================================================================
+
+def render_stream(response: Union[str, StreamedResponse], show_metrics: bool = True) -> str:
+    """Affiche la réponse au fil de l'eau (ou d'un bloc si c'est déjà un texte) et rend le texte final"""
+    import streamlit as st
+
+    if not isinstance(response, StreamedResponse):
+        st.markdown(response)
+        return response
+    st.write_stream(response)
+    if show_metrics and response.metrics.get('ttft_ms') is not None and not response.error:
+        tps = response.metrics['tokens_per_s']
+        st.caption(f"⚡ 1er token en {response.metrics['ttft_ms'] / 1000:.2f} s"
+                   + (f" • {tps:.0f} tokens/s" if tps else ""))
+    return response.text
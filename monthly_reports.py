@@ -0,0 +1,345 @@
+# monthly_reports.py - Rapports mensuels par balayages de plages de dates, en parallèle et en cache
+"""
+Moteur des rapports mensuels (formulaires, projets livrés, stocks, BT,
+TimeTracker, postes de travail, production).
+
+ERPDatabase.generate_monthly_report faisait une vingtaine de requêtes par
+mois, toutes filtrées par strftime('%Y-%m', colonne) = ? : aucune ne pouvait
+utiliser les index de dates, et un rapport sur douze mois coûtait douze fois
+plus. Ici :
+- toutes les agrégations sont planifiées d'avance (REPORT_SCANS) : un seul
+  balayage par table et par plage, colonne >= début AND colonne < fin (index
+  utilisable), avec les compteurs conditionnels et un GROUP BY mois ;
+- des mois consécutifs forment une seule plage, des mois disjoints (rapport
+  d'une année sur l'autre) plusieurs ; les balayages s'exécutent en parallèle
+  (une connexion SQLite par requête) ;
+- un mois clos ne change plus : son rapport est gardé en mémoire par base,
+  sauf si un balayage a échoué (base verrouillée...) ; les écritures qui
+  touchent un mois passé (pointage fermé après la fin du mois, nettoyages
+  TimeTracker) appellent invalidate_monthly_reports() ;
+- iter_reports() rend les rapports un par un, les mois en cache d'abord sans
+  attendre le calcul des autres.
+"""
+
+import copy
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Jours comptés par mois pour le taux d'utilisation des postes (comme l'ancien rapport)
+JOURS_PAR_MOIS = 30
+MAX_WORKERS = 4
+
+# table, colonne de date, filtre, agrégats (nom -> expression SQL)
+REPORT_SCANS = (
+    ('formulaires', 'date_creation', None, {
+        'formulaires_crees': "COUNT(*)",
+        'montant_commandes': "COALESCE(SUM(montant_total), 0.0)",
+        'total_bt': "SUM(type_formulaire = 'BON_TRAVAIL')",
+        'bt_termines': "SUM(type_formulaire = 'BON_TRAVAIL' AND statut = 'TERMINÉ')",
+    }),
+    ('projects', 'updated_at', "statut = 'TERMINÉ'", {
+        'projets_livres': "COUNT(*)",
+    }),
+    ('inventory_history', 'created_at', None, {
+        'stocks_mouvements': "COUNT(*)",
+    }),
+    ('bt_assignations', 'date_assignation', None, {
+        'assignations_mois': "COUNT(*)",
+    }),
+    ('time_entries', 'punch_in', "formulaire_bt_id IS NOT NULL", {
+        'sessions_bt': "COUNT(*)",
+        'heures_bt': "COALESCE(SUM(total_hours), 0)",
+        'cout_bt': "COALESCE(SUM(total_cost), 0)",
+    }),
+    ('work_centers', 'created_at', None, {
+        'nouveaux_postes': "COUNT(*)",
+    }),
+    ('materials', 'created_at', None, {
+        'nouveaux_bom': "COUNT(*)",
+        'projets_production': "COUNT(DISTINCT project_id)",
+    }),
+    ('operations', 'created_at', None, {
+        'nouvelles_operations': "COUNT(*)",
+        'operations_bt_creees': "COUNT(formulaire_bt_id)",
+        'bt_operations_mois': "COUNT(DISTINCT formulaire_bt_id)",
+        'temps_operations_bt': "COALESCE(SUM(CASE WHEN formulaire_bt_id IS NOT NULL THEN temps_estime END), 0)",
+    }),
+)
+
+# Heures et revenus des postes actifs, par mois de pointage
+WORK_CENTER_USAGE_SQL = '''
+    SELECT substr(te.punch_in, 1, 7) as periode,
+           COALESCE(SUM(te.total_hours), 0) as heures_utilisees,
+           COALESCE(SUM(te.total_cost), 0) as revenus_generes
+    FROM time_entries te
+    JOIN operations o ON te.operation_id = o.id
+    JOIN work_centers wc ON o.work_center_id = wc.id AND wc.statut = 'ACTIF'
+    WHERE te.punch_in >= ? AND te.punch_in < ?
+    GROUP BY periode
+'''
+
+# Montants commandés par fournisseur, par mois (top 10 retenu ensuite)
+SUPPLIERS_SQL = '''
+    SELECT substr(f.date_creation, 1, 7) as periode, c.id as company_id, c.nom,
+           COUNT(f.id) as commandes, SUM(f.montant_total) as montant
+    FROM formulaires f
+    JOIN companies c ON f.company_id = c.id
+    WHERE f.date_creation >= ? AND f.date_creation < ?
+      AND f.type_formulaire IN ('BON_ACHAT', 'BON_COMMANDE')
+    GROUP BY periode, c.id, c.nom
+'''
+
+_closed_reports: Dict[str, Dict[str, Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+# =========================================================================
+# PÉRIODES
+# =========================================================================
+
+def period_key(year: int, month: int) -> str:
+    return f"{year}-{month:02d}"
+
+
+def next_month(year: int, month: int) -> Tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def is_closed(year: int, month: int, today: Optional[date] = None) -> bool:
+    """Vrai si le mois est entièrement écoulé"""
+    today = today or date.today()
+    return (year, month) < (today.year, today.month)
+
+
+def contiguous_ranges(periods: Iterable[Tuple[int, int]]) -> List[Tuple[str, str]]:
+    """Mois regroupés en plages [début, fin) de mois consécutifs, bornes 'YYYY-MM-01'"""
+    ranges = []
+    for year, month in sorted(set(periods)):
+        debut = f"{period_key(year, month)}-01"
+        fin = f"{period_key(*next_month(year, month))}-01"
+        if ranges and ranges[-1][1] == debut:
+            ranges[-1] = (ranges[-1][0], fin)
+        else:
+            ranges.append((debut, fin))
+    return ranges
+
+
+def empty_report(periode: str) -> Dict[str, Any]:
+    return {
+        'periode': periode,
+        'formulaires_crees': 0,
+        'montant_commandes': 0.0,
+        'projets_livres': 0,
+        'stocks_mouvements': 0,
+        'performances_fournisseurs': [],
+        'bt_performance': {'total_bt': 0, 'assignations_mois': 0, 'completion_rate': 0.0},
+        'timetracker_bt_mensuel': {'sessions_bt': 0, 'heures_bt': 0.0, 'cout_bt': 0.0},
+        'work_centers_performance': {'nouveaux_postes': 0, 'utilisation_moyenne': 0.0, 'revenus_generes': 0.0},
+        'production_performance': {'nouveaux_bom': 0, 'nouvelles_operations': 0, 'projets_production': 0},
+        'operations_bt_performance': {'operations_bt_creees': 0, 'bt_operations_mois': 0, 'temps_operations_bt': 0.0},
+        'communication_tt_performance': {'syncs_effectuees': 0, 'progressions_recalculees': 0, 'sessions_nettoyees': 0},
+        'alertes': []
+    }
+
+
+# =========================================================================
+# MOTEUR
+# =========================================================================
+
+class MonthlyReportEngine:
+    """Rapports mensuels d'une base : balayages planifiés, parallèles, mois clos en cache"""
+
+    def __init__(self, db, max_workers: int = MAX_WORKERS):
+        self.db = db
+        self.max_workers = max_workers
+
+    def _cache(self) -> Dict[str, Dict[str, Any]]:
+        return _closed_reports.setdefault(os.path.abspath(self.db.db_path), {})
+
+    # -------------------------------------------------------------------------
+    # Balayages
+    # -------------------------------------------------------------------------
+
+    def _scan(self, table: str, colonne: str, filtre: Optional[str], agregats: Dict[str, str],
+              debut: str, fin: str) -> List[Dict[str, Any]]:
+        expressions = ", ".join(f"{expr} as {nom}" for nom, expr in agregats.items())
+        query = f'''
+            SELECT substr({colonne}, 1, 7) as periode, {expressions}
+            FROM {table}
+            WHERE {colonne} >= ? AND {colonne} < ?{f" AND {filtre}" if filtre else ""}
+            GROUP BY periode
+        '''
+        return self.db.execute_query(query, (debut, fin))
+
+    def _run_scans(self, ranges: List[Tuple[str, str]]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Exécute tous les balayages sur toutes les plages.
+        Rend (periode -> métriques, balayages en échec) ; une section en échec reste à zéro.
+        """
+        taches = [('scan', scan, plage) for scan in REPORT_SCANS for plage in ranges]
+        taches += [('usage', WORK_CENTER_USAGE_SQL, plage) for plage in ranges]
+        taches += [('fournisseurs', SUPPLIERS_SQL, plage) for plage in ranges]
+
+        def executer(tache):
+            genre, definition, (debut, fin) = tache
+            nom = definition[0] if genre == 'scan' else genre
+            try:
+                if genre == 'scan':
+                    return genre, nom, self._scan(*definition, debut, fin), False
+                return genre, nom, self.db.execute_query(definition, (debut, fin)), False
+            except Exception as e:
+                # Table absente sur une ancienne base, ou base verrouillée : la section reste à zéro
+                logger.warning(f"⚠️ Rapport mensuel, balayage {nom} ignoré : {e}")
+                return genre, nom, [], True
+
+        if self.max_workers > 1 and len(taches) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(taches))) as pool:
+                resultats = list(pool.map(executer, taches))
+        else:
+            resultats = [executer(tache) for tache in taches]
+
+        metriques: Dict[str, Dict[str, Any]] = {}
+        echecs = sorted({nom for _, nom, _, echec in resultats if echec})
+        for genre, _, rows, _ in resultats:
+            for row in rows:
+                periode = row.pop('periode')
+                valeurs = metriques.setdefault(periode, {'fournisseurs': []})
+                if genre == 'fournisseurs':
+                    valeurs['fournisseurs'].append(row)
+                else:
+                    valeurs.update(row)
+        return metriques, echecs
+
+    def _capacite_moyenne(self) -> Optional[float]:
+        """Capacité moyenne des postes actifs ; None si la requête a échoué"""
+        try:
+            result = self.db.execute_query(
+                "SELECT COALESCE(AVG(capacite_theorique), 0) as capacite FROM work_centers WHERE statut = 'ACTIF'"
+            )
+            return result[0]['capacite'] if result else 0.0
+        except Exception as e:
+            logger.warning(f"⚠️ Rapport mensuel, capacité des postes ignorée : {e}")
+            return None
+
+    @staticmethod
+    def _build_report(periode: str, m: Dict[str, Any], capacite_moyenne: float) -> Dict[str, Any]:
+        report = empty_report(periode)
+        report['formulaires_crees'] = m.get('formulaires_crees', 0)
+        report['montant_commandes'] = m.get('montant_commandes') or 0.0
+        report['projets_livres'] = m.get('projets_livres', 0)
+        report['stocks_mouvements'] = m.get('stocks_mouvements', 0)
+        fournisseurs = sorted(m.get('fournisseurs', []), key=lambda f: f['montant'] or 0, reverse=True)[:10]
+        report['performances_fournisseurs'] = [
+            {'nom': f['nom'], 'commandes': f['commandes'], 'montant': f['montant']} for f in fournisseurs
+        ]
+
+        total_bt = m.get('total_bt') or 0
+        report['bt_performance'] = {
+            'total_bt': total_bt,
+            'assignations_mois': m.get('assignations_mois', 0),
+            'completion_rate': ((m.get('bt_termines') or 0) / total_bt * 100) if total_bt > 0 else 0.0
+        }
+        report['timetracker_bt_mensuel'] = {
+            'sessions_bt': m.get('sessions_bt', 0),
+            'heures_bt': round(m.get('heures_bt', 0.0), 1),
+            'cout_bt': round(m.get('cout_bt', 0.0), 2)
+        }
+
+        capacite_mois = capacite_moyenne * JOURS_PAR_MOIS
+        heures = m.get('heures_utilisees', 0.0)
+        report['work_centers_performance'] = {
+            'nouveaux_postes': m.get('nouveaux_postes', 0),
+            'utilisation_moyenne': round(heures / capacite_mois * 100, 2) if capacite_mois > 0 else 0.0,
+            'revenus_generes': round(m.get('revenus_generes', 0.0), 2)
+        }
+        report['production_performance'] = {
+            'nouveaux_bom': m.get('nouveaux_bom', 0),
+            'nouvelles_operations': m.get('nouvelles_operations', 0),
+            'projets_production': m.get('projets_production', 0)
+        }
+        report['operations_bt_performance'] = {
+            'operations_bt_creees': m.get('operations_bt_creees', 0),
+            'bt_operations_mois': m.get('bt_operations_mois', 0),
+            'temps_operations_bt': round(m.get('temps_operations_bt', 0.0), 2)
+        }
+        # Performance Communication TimeTracker (simulée, comme l'ancien rapport)
+        report['communication_tt_performance'] = {
+            'syncs_effectuees': 30,
+            'progressions_recalculees': total_bt * 2,
+            'sessions_nettoyees': 5
+        }
+        return report
+
+    # -------------------------------------------------------------------------
+    # API
+    # -------------------------------------------------------------------------
+
+    def iter_reports(self, periods: Iterable[Tuple[int, int]],
+                     today: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+        """Rapports des mois demandés : mois clos en cache d'abord, puis les autres calculés ensemble"""
+        periods = sorted(set(periods))
+        cache = self._cache()
+        a_calculer = []
+        for year, month in periods:
+            with _cache_lock:
+                report = cache.get(period_key(year, month))
+            if report is not None:
+                yield copy.deepcopy(report)
+            else:
+                a_calculer.append((year, month))
+        if not a_calculer:
+            return
+
+        metriques, echecs = self._run_scans(contiguous_ranges(a_calculer))
+        capacite_moyenne = self._capacite_moyenne()
+        if capacite_moyenne is None:
+            echecs.append('capacite_postes')
+        if echecs:
+            # Un échec passager ne doit pas figer des zéros pour un mois clos
+            logger.warning(f"⚠️ Rapports mensuels non mis en cache (balayages en échec : {', '.join(echecs)})")
+        for year, month in a_calculer:
+            periode = period_key(year, month)
+            report = self._build_report(periode, metriques.get(periode, {}), capacite_moyenne or 0.0)
+            if is_closed(year, month, today) and not echecs:
+                with _cache_lock:
+                    cache[periode] = copy.deepcopy(report)
+            yield report
+
+    def reports(self, periods: Iterable[Tuple[int, int]], today: Optional[date] = None) -> Dict[str, Dict[str, Any]]:
+        """Rapports des mois demandés, par période 'YYYY-MM', en ordre chronologique"""
+        resultats = {r['periode']: r for r in self.iter_reports(periods, today)}
+        return dict(sorted(resultats.items()))
+
+    def report(self, year: int, month: int) -> Dict[str, Any]:
+        return self.reports([(year, month)])[period_key(year, month)]
+
+    def year_over_year(self, month: int, years: Iterable[int]) -> Dict[str, Dict[str, Any]]:
+        """Le même mois sur plusieurs années (plages disjointes balayées en parallèle)"""
+        return self.reports([(year, month) for year in years])
+
+    def months_range(self, start: Tuple[int, int], end: Tuple[int, int]) -> Dict[str, Dict[str, Any]]:
+        """Tous les mois de start à end inclus : une seule plage par table"""
+        periods = []
+        courant = start
+        while courant <= end:
+            periods.append(courant)
+            courant = next_month(*courant)
+        return self.reports(periods)
+
+
+def invalidate_monthly_reports(db, periode: Optional[str] = None) -> None:
+    """Oublie les rapports de mois clos (tous, ou une période 'YYYY-MM') après une correction rétroactive"""
+    with _cache_lock:
+        cache = _closed_reports.get(os.path.abspath(db.db_path))
+        if cache is None:
+            return
+        if periode:
+            cache.pop(periode, None)
+        else:
+            cache.clear()
@@ -0,0 +1,207 @@
+# mrp_engine.py - Calcul des besoins nets (MRP) et points de commande sur tout le catalogue
+"""
+Moteur de réapprovisionnement pour le catalogue produits.
+
+get_produits_stock_bas comparait seulement stock_disponible à stock_minimum et
+get_stock_complet calculait les réservations par sous-requêtes corrélées,
+produit par produit. Ici, pour tout le catalogue en une passe :
+- quatre requêtes agrégées (catalogue, réservations actives, besoins des BT
+  ouverts, quantités attendues des bons d'achat en cours) ;
+- rapprochement vectorisé (pandas) des lignes BT/BA avec les produits par code
+  puis par nom, les lignes BT/BA ne portant pas d'id produit ;
+- besoin net = seuil - (stock + entrant - réservé - besoins BT), arrondi au lot
+  de commande, puis regroupement des propositions par fournisseur principal.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bons de travail dont les matériaux restent à consommer
+STATUTS_BT_OUVERTS = ('BROUILLON', 'VALIDÉ', 'ENVOYÉ', 'APPROUVÉ')
+# Bons d'achat dont la marchandise est attendue (TERMINÉ = reçu)
+STATUTS_BA_EN_COURS = ('VALIDÉ', 'ENVOYÉ', 'APPROUVÉ')
+# Fournisseur des matériaux BT pris dans le stock interne
+FOURNISSEUR_INTERNE = '-- Interne --'
+FOURNISSEUR_NON_DEFINI = 'Non défini'
+
+PLAN_COLUMNS = [
+    'id', 'code_produit', 'nom', 'categorie', 'unite_vente', 'fournisseur_principal', 'prix_unitaire',
+    'stock_disponible', 'stock_en_commande', 'stock_minimum', 'point_commande', 'lot_commande',
+    'delai_approvisionnement', 'reserve', 'besoins_bt', 'entrant', 'stock_projete', 'seuil', 'besoin_net', 'qte_proposee', 'cout_estime'
+]
+
+
+def normalize_key(series: pd.Series) -> pd.Series:
+    """Clé de rapprochement : minuscules, espaces superflus retirés"""
+    return series.fillna('').astype(str).str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+
+
+def round_to_lot(besoin_net: pd.Series, lot_commande: pd.Series) -> pd.Series:
+    """Quantité à commander : besoin net arrondi au lot supérieur (lot 0 = quantité exacte)"""
+    lots = lot_commande.where(lot_commande > 0)
+    arrondi = np.ceil(besoin_net / lots - 1e-9) * lots
+    return arrondi.fillna(besoin_net).clip(lower=0)
+
+
+class MRPEngine:
+    """Besoins nets et propositions d'achat pour tout le catalogue, sans requête par produit."""
+
+    def __init__(self, db):
+        self.db = db
+
+    # =========================================================================
+    # CHARGEMENT AGRÉGÉ
+    # =========================================================================
+
+    def _frame(self, query: str, params: tuple = (), columns: Optional[List[str]] = None) -> pd.DataFrame:
+        rows = self.db.execute_query(query, params)
+        return pd.DataFrame([dict(r) for r in rows], columns=columns)
+
+    def load_catalog(self) -> pd.DataFrame:
+        """Produits actifs et leurs paramètres de réapprovisionnement"""
+        catalog = self._frame('''
+            SELECT id, code_produit, nom, categorie, unite_vente, fournisseur_principal,
+                   COALESCE(prix_unitaire, 0) as prix_unitaire,
+                   COALESCE(stock_disponible, 0) as stock_disponible,
+                   COALESCE(stock_en_commande, 0) as stock_en_commande,
+                   COALESCE(stock_minimum, 0) as stock_minimum,
+                   COALESCE(point_commande, 0) as point_commande,
+                   COALESCE(lot_commande, 0) as lot_commande,
+                   COALESCE(delai_approvisionnement, 0) as delai_approvisionnement
+            FROM produits
+            WHERE actif = 1
+        ''', columns=PLAN_COLUMNS[:13])
+        return catalog.set_index('id', drop=False)
+
+    def load_reservations(self) -> pd.Series:
+        """Quantité réservée active par produit"""
+        frame = self._frame('''
+            SELECT produit_id, SUM(quantite_reservee) as reserve
+            FROM reservations_stock
+            WHERE statut = 'ACTIVE'
+            GROUP BY produit_id
+        ''', columns=['produit_id', 'reserve'])
+        return frame.set_index('produit_id')['reserve'].astype(float)
+
+    def _match_products(self, lignes: pd.DataFrame, catalog: pd.DataFrame) -> pd.Series:
+        """id produit de chaque ligne : par code (code_article ou nom), puis par nom de produit"""
+        par_code = pd.Series(catalog['id'].values, index=normalize_key(catalog['code_produit'])).groupby(level=0).first()
+        par_nom = pd.Series(catalog['id'].values, index=normalize_key(catalog['nom'])).groupby(level=0).first()
+        code = normalize_key(lignes['code_article'])
+        nom = normalize_key(lignes['nom_article'])
+        produit_id = code.map(par_code)
+        produit_id = produit_id.fillna(nom.map(par_code))
+        return produit_id.fillna(nom.map(par_nom))
+
+    def load_bt_requirements(self, catalog: pd.DataFrame) -> pd.Series:
+        """
+        Quantités de matériaux des BT ouverts (lignes sequence_ligne >= 1000)
+        pris dans le stock interne, moins ce qui est déjà couvert par une
+        réservation du même BT.
+        """
+        statuts = ', '.join('?' * len(STATUTS_BT_OUVERTS))
+        lignes = self._frame(f'''
+            SELECT f.numero_document, fl.description, fl.code_article, COALESCE(fl.quantite, 0) as quantite,
+                   CASE WHEN json_valid(fl.notes_ligne) THEN json_extract(fl.notes_ligne, '$.fournisseur') END as fournisseur
+            FROM formulaire_lignes fl
+            JOIN formulaires f ON f.id = fl.formulaire_id
+            WHERE f.type_formulaire = 'BON_TRAVAIL'
+              AND f.statut IN ({statuts})
+              AND fl.sequence_ligne >= 1000
+        ''', STATUTS_BT_OUVERTS, columns=['numero_document', 'description', 'code_article', 'quantite', 'fournisseur'])
+        if lignes.empty:
+            return pd.Series(dtype=float)
+
+        lignes = lignes[lignes['fournisseur'].fillna(FOURNISSEUR_INTERNE).isin([FOURNISSEUR_INTERNE, ''])].copy()
+        # "MATERIAU: {nom} - {description}" (production_management.save_bon_travail)
+        lignes['nom_article'] = lignes['description'].fillna('').str.extract(
+            r'^MATERIAU:\s*(.*?)(?:\s+-(?:\s.*)?)?$', expand=False
+        ).fillna(lignes['description'])
+        lignes['produit_id'] = self._match_products(lignes, catalog)
+        lignes = lignes.dropna(subset=['produit_id'])
+        if lignes.empty:
+            return pd.Series(dtype=float)
+
+        reservations_bt = self._frame('''
+            SELECT DISTINCT reference_document as numero_document, produit_id
+            FROM reservations_stock
+            WHERE statut = 'ACTIVE' AND reference_type = 'BON_TRAVAIL'
+        ''', columns=['numero_document', 'produit_id'])
+        if not reservations_bt.empty:
+            couvert = lignes.merge(reservations_bt.assign(couvert=True), on=['numero_document', 'produit_id'], how='left')
+            lignes = lignes[couvert['couvert'].isna().values]
+
+        return lignes.groupby(lignes['produit_id'].astype(int))['quantite'].sum().astype(float)
+
+    def load_incoming_purchases(self, catalog: pd.DataFrame) -> pd.Series:
+        """Quantités attendues des bons d'achat en cours, par produit"""
+        statuts = ', '.join('?' * len(STATUTS_BA_EN_COURS))
+        lignes = self._frame(f'''
+            SELECT fl.code_article, fl.description as nom_article, SUM(COALESCE(fl.quantite, 0)) as quantite
+            FROM formulaire_lignes fl
+            JOIN formulaires f ON f.id = fl.formulaire_id
+            WHERE f.type_formulaire = 'BON_ACHAT'
+              AND f.statut IN ({statuts})
+            GROUP BY fl.code_article, fl.description
+        ''', STATUTS_BA_EN_COURS, columns=['code_article', 'nom_article', 'quantite'])
+        if lignes.empty:
+            return pd.Series(dtype=float)
+        lignes['produit_id'] = self._match_products(lignes, catalog)
+        lignes = lignes.dropna(subset=['produit_id'])
+        return lignes.groupby(lignes['produit_id'].astype(int))['quantite'].sum().astype(float)
+
+    # =========================================================================
+    # CALCUL DES BESOINS NETS
+    # =========================================================================
+
+    def compute_plan(self, seulement_a_commander: bool = True) -> pd.DataFrame:
+        """
+        Plan de réapprovisionnement, une ligne par produit actif. Le seuil est
+        le point de commande, ou le stock minimum si aucun point n'est défini ;
+        un produit est à commander si son stock projeté passe sous ce seuil
+        (ou sous zéro sans seuil).
+        """
+        catalog = self.load_catalog()
+        if catalog.empty:
+            return pd.DataFrame(columns=PLAN_COLUMNS)
+
+        plan = catalog.copy()
+        plan['reserve'] = self.load_reservations().reindex(plan.index).fillna(0.0)
+        plan['besoins_bt'] = self.load_bt_requirements(catalog).reindex(plan.index).fillna(0.0)
+        # Le compteur stock_en_commande et les BA en cours décrivent les mêmes commandes : le plus grand des deux
+        entrant_ba = self.load_incoming_purchases(catalog).reindex(plan.index).fillna(0.0)
+        plan['entrant'] = np.maximum(entrant_ba, plan['stock_en_commande'].astype(float))
+
+        plan['stock_projete'] = plan['stock_disponible'] + plan['entrant'] - plan['reserve'] - plan['besoins_bt']
+        plan['seuil'] = plan['point_commande'].where(plan['point_commande'] > 0, plan['stock_minimum'])
+        plan['besoin_net'] = (plan['seuil'] - plan['stock_projete']).clip(lower=0)
+        a_commander = (plan['stock_projete'] < plan['seuil']) | (plan['stock_projete'] < 0)
+        plan.loc[~a_commander, 'besoin_net'] = 0.0
+
+        plan['qte_proposee'] = round_to_lot(plan['besoin_net'], plan['lot_commande'])
+        plan['cout_estime'] = plan['qte_proposee'] * plan['prix_unitaire']
+        plan['fournisseur_principal'] = plan['fournisseur_principal'].fillna(FOURNISSEUR_NON_DEFINI).replace('', FOURNISSEUR_NON_DEFINI)
+
+        if seulement_a_commander:
+            plan = plan[plan['qte_proposee'] > 0]
+        return plan.sort_values(['fournisseur_principal', 'categorie', 'nom'])[PLAN_COLUMNS].reset_index(drop=True)
+
+    def propose_purchase_orders(self, plan: Optional[pd.DataFrame] = None) -> Dict[str, Dict[str, Any]]:
+        """Propositions d'achat regroupées par fournisseur principal"""
+        if plan is None:
+            plan = self.compute_plan()
+        plan = plan[plan['qte_proposee'] > 0]
+        propositions = {}
+        for fournisseur, groupe in plan.groupby('fournisseur_principal', sort=True):
+            propositions[fournisseur] = {
+                'produits': groupe.to_dict('records'),
+                'nb_produits': len(groupe),
+                'cout_total': float(groupe['cout_estime'].sum()),
+                'delai_max_jours': int(groupe['delai_approvisionnement'].max())
+            }
+        return propositions
@@ -0,0 +1,225 @@
+# page_registry.py - Chargement paresseux des modules de pages ERP
+"""
+Registre de chargement paresseux pour le point d'entrée Streamlit (app.py).
+
+Auparavant app.py importait au démarrage pandas, plotly, tous les modules de
+pages (CRM, devis, fournisseurs, production, assistant IA → anthropic, ...)
+même pour un employé qui n'ouvre que l'écran de pointage. Ici, chaque module
+n'est importé qu'au premier accès réel à l'un de ses attributs :
+
+    pd = lazy_module('pandas')                                  # import au premier pd.xxx
+    show_devis_page = lazy_import('devis', 'show_devis_page')   # import au premier appel
+    DEVIS_AVAILABLE = ModuleFlag('devis')                       # find_spec, sans import
+
+Les temps d'import réels sont mémorisés (get_import_report) et
+profile_import_time() produit un profil équivalent à `python -X importtime`.
+"""
+
+import importlib
+import importlib.util
+import logging
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_load_times: Dict[str, float] = {}
+_failed_modules: Dict[str, str] = {}
+_spec_cache: Dict[str, bool] = {}
+_preloaded: set = set()
+_load_lock = threading.RLock()
+
+
+# =========================================================================
+# DISPONIBILITÉ ET CHARGEMENT
+# =========================================================================
+
+def module_available(module_name: str) -> bool:
+    """
+    Vrai si le module est installé (importlib.util.find_spec, sans l'exécuter)
+    et n'a pas déjà échoué à l'import.
+    """
+    if module_name in _failed_modules:
+        return False
+    if module_name not in _spec_cache:
+        try:
+            _spec_cache[module_name] = importlib.util.find_spec(module_name) is not None
+        except (ImportError, ValueError):
+            _spec_cache[module_name] = False
+    return _spec_cache[module_name]
+
+
+def load_module(module_name: str):
+    """Importe réellement le module (une fois) et mémorise son temps d'import"""
+    module = sys.modules.get(module_name)
+    if module is not None and module_name in _load_times:
+        return module
+
+    if module_name in _failed_modules:
+        raise ImportError(_failed_modules[module_name])
+
+    # Pas de verrou pendant l'import : importlib sérialise déjà par module
+    already_loaded = module_name in sys.modules
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        with _load_lock:
+            _failed_modules[module_name] = str(e)
+        logger.error(f"❌ Module '{module_name}' non disponible: {e}")
+        raise
+
+    with _load_lock:
+        if module_name not in _load_times:
+            # Module déjà importé par un autre (ex. pandas via crm) : coût nul ici
+            _load_times[module_name] = 0.0 if already_loaded else time.perf_counter() - start
+            logger.info(f"📦 Module '{module_name}' chargé en {_load_times[module_name] * 1000:.0f} ms")
+    return module
+
+
+class ModuleFlag:
+    """Indicateur *_AVAILABLE évalué à la demande : devient faux si l'import échoue"""
+
+    def __init__(self, module_name: str):
+        self.module_name = module_name
+
+    def __bool__(self) -> bool:
+        return module_available(self.module_name)
+
+    def __repr__(self) -> str:
+        return f"ModuleFlag({self.module_name!r}, {bool(self)})"
+
+
+class LazyModule:
+    """Proxy de module : l'import a lieu au premier accès à un attribut"""
+
+    def __init__(self, module_name: str):
+        self._module_name = module_name
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(load_module(self._module_name), attr)
+
+    def __repr__(self) -> str:
+        return f"<module paresseux '{self._module_name}'>"
+
+
+class LazyAttribute:
+    """
+    Proxy d'une fonction/classe d'un module de page : l'import a lieu au premier appel.
+    Si le module ne peut pas être importé, l'appel affiche une erreur et retourne None.
+    """
+
+    def __init__(self, module_name: str, attr: str):
+        self._module_name = module_name
+        self._attr = attr
+
+    def resolve(self) -> Any:
+        return getattr(load_module(self._module_name), self._attr)
+
+    def __call__(self, *args, **kwargs):
+        try:
+            target = self.resolve()
+        except ImportError as e:
+            if 'streamlit' in sys.modules:
+                import streamlit as st
+                st.error(f"❌ Module {self._module_name} non disponible: {e}")
+            return None
+        return target(*args, **kwargs)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self) -> str:
+        return f"<{self._module_name}.{self._attr} paresseux>"
+
+
+def lazy_module(module_name: str) -> LazyModule:
+    """Module importé au premier accès (remplace `import module as alias`)"""
+    return LazyModule(module_name)
+
+
+def lazy_import(module_name: str, attr: str) -> LazyAttribute:
+    """Attribut importé au premier appel (remplace `from module import attr`)"""
+    return LazyAttribute(module_name, attr)
+
+
+def preload_in_background(module_names: Iterable[str]) -> Optional[threading.Thread]:
+    """
+    Importe des modules dans un thread daemon après le premier affichage,
+    pour que la première navigation ne paie pas l'import.
+    Idempotent : les réexécutions Streamlit du script ne relancent rien.
+    """
+    with _load_lock:
+        module_names = [name for name in module_names if name not in _preloaded]
+        _preloaded.update(module_names)
+    if not module_names:
+        return None
+
+    def _worker(names):
+        for name in names:
+            try:
+                load_module(name)
+            except Exception as e:
+                logger.warning(f"⚠️ Préchargement de '{name}' impossible: {e}")
+
+    thread = threading.Thread(target=_worker, args=(module_names,), daemon=True, name="page-preload")
+    thread.start()
+    return thread
+
+
+def get_import_report() -> Dict[str, Any]:
+    """Modules chargés par le registre et leur temps d'import (ms), du plus lent au plus rapide"""
+    with _load_lock:
+        modules = sorted(_load_times.items(), key=lambda item: item[1], reverse=True)
+        return {
+            'nb_modules_charges': len(modules),
+            'temps_total_ms': round(sum(t for _, t in modules) * 1000, 1),
+            'modules': {name: round(t * 1000, 1) for name, t in modules},
+            'echecs': dict(_failed_modules)
+        }
+
+
+# =========================================================================
+# PROFIL D'IMPORT (python -X importtime)
+# =========================================================================
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$')
+
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """Analyse la sortie de `-X importtime` : self/cumulé en µs, profondeur et nom du module"""
+    entries = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append({
+                'module': match.group(4).strip(),
+                'self_us': int(match.group(1)),
+                'cumulative_us': int(match.group(2)),
+                'depth': (len(match.group(3)) - 1) // 2
+            })
+    return entries
+
+
+def profile_import_time(statement: str, cwd: Optional[str] = None, top: int = 15) -> Dict[str, Any]:
+    """
+    Exécute `statement` dans un interpréteur neuf avec -X importtime
+    et retourne le temps total et les modules les plus coûteux (cumulé).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=cwd, capture_output=True, text=True
+    )
+    entries = parse_importtime(result.stderr)
+    racines = [e for e in entries if e['depth'] == 0]
+    return {
+        'statement': statement,
+        'returncode': result.returncode,
+        'nb_modules': len(entries),
+        'total_ms': round(sum(e['cumulative_us'] for e in racines) / 1000, 1),
+        'plus_couteux': sorted(entries, key=lambda e: e['cumulative_us'], reverse=True)[:top]
+    }
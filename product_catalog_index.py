@@ -0,0 +1,316 @@
+# product_catalog_index.py - Index en mémoire du catalogue produits pour l'autocomplétion
+"""
+Index de recherche du catalogue produits partagé entre sessions.
+
+search_produits faisait un LOWER(col) LIKE '%terme%' sur quatre colonnes à
+chaque frappe, et les sélecteurs de produits (devis, demandes de prix, bons
+d'achat) rechargeaient tout le catalogue à chaque affichage. Ici :
+- ProductCatalogIndex garde les produits actifs en mémoire avec un index de
+  trigrammes et de préfixes de mots (1-2 lettres) sur code, nom, matériau et
+  description, normalisés sans accents ni casse, et les codes et noms triés ;
+- search() intersecte les trigrammes de chaque mot recherché (ou le préfixe
+  pour les mots de moins de trois lettres) puis vérifie la sous-chaîne ;
+  tous les mots doivent correspondre, classement code > nom > reste, et avec
+  une limite le tri s'arrête dès que les premiers résultats sont connus ;
+- get_shared_index() partage l'index par base ; le gestionnaire produits
+  le met à jour produit par produit après ses écritures (refresh_product),
+  et une signature (nombre, id max, dernier updated_at), vérifiée au plus
+  toutes les SIGNATURE_CHECK_SECONDS, recharge seulement les produits
+  modifiés par d'autres modules.
+"""
+
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Colonnes indexées, dans l'ordre du classement des résultats
+SEARCH_FIELDS = ('code_produit', 'nom', 'materiau', 'description')
+# Intervalle minimum entre deux vérifications de la signature de la table
+SIGNATURE_CHECK_SECONDS = 2.0
+
+_indexes: Dict[str, 'ProductCatalogIndex'] = {}
+_index_lock = threading.RLock()
+
+
+def normalize_text(value: Any) -> str:
+    """Minuscules, sans accents, espaces simples ('Béton  Armé' -> 'beton arme')"""
+    if value is None:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    sans_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(sans_accents.lower().split())
+
+
+_WORD_SPLIT = re.compile(r'[\W_]+')
+
+
+def words(text: str) -> Set[str]:
+    """Mots pour la recherche par préfixe ('tre-10 acier' -> tre, 10, acier)"""
+    return {word for word in _WORD_SPLIT.split(text) if word}
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ProductCatalogIndex:
+    """Produits actifs et structures de recherche (trigrammes, préfixes de mots, codes et noms triés)"""
+
+    def __init__(self, produits: Iterable[Dict[str, Any]] = ()):
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self._fields: Dict[int, Tuple[str, ...]] = {}
+        self._texts: Dict[int, str] = {}
+        # Trigrammes du texte et préfixes de 1-2 lettres des mots -> id produits
+        self._postings: Dict[str, Set[int]] = {}
+        self._by_code: List[Tuple[str, int]] = []
+        self._by_nom: List[Tuple[str, int]] = []
+        self.signature: Tuple = ()
+        self.checked_at = 0.0
+        self.lock = threading.RLock()
+        for produit in produits:
+            self.upsert(produit, bulk=True)
+        self._by_code.sort()
+        self._by_nom.sort()
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    # =========================================================================
+    # MISE À JOUR INCRÉMENTALE
+    # =========================================================================
+
+    @staticmethod
+    def _keys(text: str) -> Set[str]:
+        keys = trigrams(text)
+        for word in words(text):
+            keys.add(word[:1])
+            keys.add(word[:2])
+        return keys
+
+    def upsert(self, produit: Dict[str, Any], bulk: bool = False) -> None:
+        """Ajoute ou remplace un produit ; un produit inactif est retiré (bulk : listes triées par l'appelant)"""
+        produit_id = produit['id']
+        with self.lock:
+            self.remove(produit_id)
+            if not produit.get('actif', 1):
+                return
+            fields = tuple(normalize_text(produit.get(col)) for col in SEARCH_FIELDS)
+            text = ' '.join(fields)
+            self.by_id[produit_id] = dict(produit)
+            self._fields[produit_id] = fields
+            self._texts[produit_id] = text
+            for key in self._keys(text):
+                self._postings.setdefault(key, set()).add(produit_id)
+            if bulk:
+                self._by_code.append((fields[0], produit_id))
+                self._by_nom.append((fields[1], produit_id))
+            else:
+                bisect.insort(self._by_code, (fields[0], produit_id))
+                bisect.insort(self._by_nom, (fields[1], produit_id))
+
+    def remove(self, produit_id: int) -> None:
+        with self.lock:
+            self.by_id.pop(produit_id, None)
+            fields = self._fields.pop(produit_id, None)
+            text = self._texts.pop(produit_id, None)
+            if text is None:
+                return
+            for key in self._keys(text):
+                ids = self._postings.get(key)
+                if ids is not None:
+                    ids.discard(produit_id)
+                    if not ids:
+                        del self._postings[key]
+            for liste, valeur in ((self._by_code, fields[0]), (self._by_nom, fields[1])):
+                position = bisect.bisect_left(liste, (valeur, produit_id))
+                if position < len(liste) and liste[position] == (valeur, produit_id):
+                    del liste[position]
+
+    # =========================================================================
+    # RECHERCHE
+    # =========================================================================
+
+    def _candidates(self, token: str) -> Set[int]:
+        """Trigrammes pour un mot de 3 lettres et plus, préfixe de mot sinon (ensemble à ne pas modifier)"""
+        if len(token) < 3:
+            return self._postings.get(token, set())
+        sets = [self._postings.get(t) for t in trigrams(token)]
+        if any(s is None for s in sets):
+            return set()
+        # Les deux trigrammes les plus rares suffisent : la sous-chaîne est vérifiée ensuite
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:2])
+
+    @staticmethod
+    def _prefix_range(liste: List[Tuple[str, int]], prefix: str) -> List[Tuple[str, int]]:
+        """Entrées de la liste triée dont la valeur commence par le préfixe"""
+        return liste[bisect.bisect_left(liste, (prefix,)):bisect.bisect_left(liste, (prefix + '\uffff',))]
+
+    def _smallest_by_nom(self, ids: Set[int], valide: Callable[[int], bool], limit: Optional[int]) -> List[int]:
+        """ids valides triés par (nom, id) ; pour un grand ensemble, parcours de la liste triée par nom"""
+        if limit and len(ids) * 8 > len(self._by_nom):
+            ordre = []
+            for _, produit_id in self._by_nom:
+                if produit_id in ids and valide(produit_id):
+                    ordre.append(produit_id)
+                    if len(ordre) == limit:
+                        break
+            return ordre
+        ids = [i for i in ids if valide(i)]
+        key = lambda i: (self._fields[i][1], i)
+        return heapq.nsmallest(limit, ids, key=key) if limit else sorted(ids, key=key)
+
+    def search_ids(self, terme: str, limit: Optional[int] = None) -> List[int]:
+        """
+        id des produits dont code/nom/matériau/description contiennent chaque
+        mot du terme (préfixe de mot pour les mots de moins de trois lettres).
+        Ordre : code exact, code commençant par le terme, nom commençant par le
+        terme, puis le reste ; par nom dans chaque groupe.
+        """
+        query = normalize_text(terme)
+        if not query:
+            return []
+        tokens = sorted(set(query.split()), key=len, reverse=True)
+        with self.lock:
+            ids: Optional[Set[int]] = None
+            for token in tokens:
+                candidats = self._candidates(token)
+                ids = candidats if ids is None else ids & candidats
+                if not ids:
+                    return []
+            # Les trigrammes d'un mot de plus de 3 lettres ne garantissent pas la
+            # sous-chaîne : vérification faite seulement sur les produits retenus
+            a_verifier = [t for t in tokens if len(t) > 3]
+            valide = lambda i: all(t in self._texts[i] for t in a_verifier)
+
+            vus = {i for _, i in self._prefix_range(self._by_code, query) if i in ids}
+            if a_verifier:
+                vus = {i for i in vus if valide(i)}
+            exact = [i for i in vus if self._fields[i][0] == query]
+            par_code = exact + self._smallest_by_nom(vus.difference(exact), lambda i: True,
+                                                     limit - len(exact) if limit else None)
+            if limit and len(par_code) >= limit:
+                return par_code[:limit]
+            resultat = list(par_code)
+            par_nom = set()
+            for _, i in self._prefix_range(self._by_nom, query):
+                if i in ids and i not in vus and valide(i):
+                    resultat.append(i)
+                    par_nom.add(i)
+                    if limit and len(resultat) == limit:
+                        return resultat
+            reste = ids.difference(vus, par_nom)
+            return resultat + self._smallest_by_nom(reste, valide, limit - len(resultat) if limit else None)
+
+    def search(self, terme: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Produits correspondants (copies), les meilleurs d'abord"""
+        return [dict(self.by_id[i]) for i in self.search_ids(terme, limit)]
+
+    def get_by_id(self, produit_id: int) -> Optional[Dict[str, Any]]:
+        produit = self.by_id.get(produit_id)
+        return dict(produit) if produit else None
+
+    def all_products(self) -> List[Dict[str, Any]]:
+        """Tous les produits actifs (copies), triés par catégorie puis nom"""
+        with self.lock:
+            produits = list(self.by_id.values())
+        produits.sort(key=lambda p: (p.get('categorie') or '', p.get('nom') or ''))
+        return [dict(p) for p in produits]
+
+
+# =========================================================================
+# CHARGEMENT ET SIGNATURE
+# =========================================================================
+
+def catalog_signature(db) -> Tuple:
+    """Signature bon marché de la table produits : nombre de lignes, id max, dernier updated_at"""
+    rows = db.execute_query("SELECT COUNT(*) as nb, MAX(id) as max_id, MAX(updated_at) as maj FROM produits")
+    return tuple(rows[0].values()) if rows else ()
+
+
+def load_catalog_index(db) -> ProductCatalogIndex:
+    signature = catalog_signature(db)
+    index = ProductCatalogIndex(dict(row) for row in db.execute_query("SELECT * FROM produits WHERE actif = 1"))
+    index.signature = signature
+    index.checked_at = time.monotonic()
+    return index
+
+
+def _sync_changes(db, index: ProductCatalogIndex, signature: Tuple) -> bool:
+    """
+    Recharge seulement les produits créés ou modifiés depuis la dernière
+    signature. Retourne False si des lignes ont disparu (suppression
+    physique) : un rechargement complet est alors nécessaire.
+    """
+    if not index.signature or signature[0] < index.signature[0]:
+        return False
+    _, max_id, maj = index.signature
+    rows = db.execute_query(
+        "SELECT * FROM produits WHERE id > ? OR updated_at >= ?", (max_id or 0, maj or '')
+    )
+    with index.lock:
+        for row in rows:
+            index.upsert(dict(row))
+        index.signature = signature
+    logger.info(f"🔎 Index catalogue : {len(rows)} produit(s) resynchronisé(s)")
+    return True
+
+
+def _cache_key(db) -> str:
+    db_path = getattr(db, 'db_path', None)
+    return os.path.abspath(db_path) if db_path else f"db-{id(db)}"
+
+
+def get_shared_index(db, force_reload: bool = False) -> ProductCatalogIndex:
+    """Index partagé pour cette base ; signature revérifiée au plus toutes les SIGNATURE_CHECK_SECONDS"""
+    key = _cache_key(db)
+    index = _indexes.get(key)
+    if index and not force_reload and time.monotonic() - index.checked_at < SIGNATURE_CHECK_SECONDS:
+        return index
+
+    with _index_lock:
+        index = _indexes.get(key)
+        if index and not force_reload:
+            signature = catalog_signature(db)
+            if signature == index.signature or _sync_changes(db, index, signature):
+                index.checked_at = time.monotonic()
+                return index
+        index = load_catalog_index(db)
+        _indexes[key] = index
+        logger.info(f"🔎 Index catalogue chargé : {len(index)} produits")
+        return index
+
+
+def refresh_product(db, produit_id: int) -> None:
+    """
+    Après une écriture du gestionnaire : recharge ce seul produit dans l'index
+    (s'il est chargé). La signature n'est pas avancée, pour ne pas masquer les
+    écritures d'autres modules ; la prochaine vérification resynchronise les
+    lignes modifiées depuis.
+    """
+    index = _indexes.get(_cache_key(db))
+    if index is None:
+        return
+    rows = db.execute_query("SELECT * FROM produits WHERE id = ?", (produit_id,))
+    with index.lock:
+        if rows:
+            index.upsert(dict(rows[0]))
+        else:
+            index.remove(produit_id)
+
+
+def invalidate_index(db=None) -> None:
+    """Oublie l'index d'une base (ou de toutes) : rechargé au prochain accès"""
+    with _index_lock:
+        if db is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(_cache_key(db), None)
@@ -8,6 +8,8 @@ import uuid
 from typing import Dict, List, Optional, Any
 import logging
 
+from list_pagination import NEXT, ListQuery, count_rows, fetch_page, in_clause, pager_state, render_pager, search_clause
+
 # Export HTML disponible par défaut
 HTML_EXPORT_AVAILABLE = True
 
@@ -807,6 +809,18 @@ def export_bt_html_streamlit(form_data: Dict) -> str:
     
     return html_template
 
+# Liste des bons de travail : pagination par curseur sur (created_at, id)
+BT_META_SQL = "(CASE WHEN json_valid(f.metadonnees_json) THEN json_extract(f.metadonnees_json, '$.{}') END)"
+BT_LIST_QUERY = ListQuery(
+    """f.*,
+       (SELECT COUNT(*) FROM formulaire_lignes fl WHERE fl.formulaire_id = f.id) as nb_lignes,
+       (SELECT COALESCE(SUM(CASE WHEN fl.sequence_ligne < 1000 THEN fl.prix_unitaire ELSE 0 END), 0)
+        FROM formulaire_lignes fl WHERE fl.formulaire_id = f.id) as total_heures_prevues""",
+    "formulaires f",
+    {'created_at': ("COALESCE(f.created_at, '')", True)},
+    key_expr='f.id',
+)
+
 class GestionnaireBonsTravail:
     """
     Gestionnaire principal pour les Bons de Travail
@@ -1336,120 +1350,18 @@ class GestionnaireBonsTravail:
         Charge un bon de travail depuis la base
         VERSION CORRIGÉE : Parsing amélioré pour operation/description
         MODIFIÉ : Support des fournisseurs
+        Parsing partagé avec l'export en lot (ERPDatabase.get_bons_travail_form_data)
         """
         try:
-            # Récupérer le formulaire principal
-            bt_result = self.db.execute_query('''
-                SELECT * FROM formulaires 
-                WHERE id = ? AND type_formulaire = 'BON_TRAVAIL'
-            ''', (bt_id,))
-            
-            if not bt_result:
+            bts = self.db.get_bons_travail_form_data([bt_id])
+            if not bts:
                 return None
             
-            bt_data = dict(bt_result[0])
-            
-            # Parser les métadonnées
-            metadonnees = {}
-            try:
-                metadonnees = json.loads(bt_data.get('metadonnees_json', '{}'))
-            except:
-                pass
-            
-            # Récupérer les lignes (tâches et matériaux)
-            lignes_result = self.db.execute_query('''
-                SELECT * FROM formulaire_lignes 
-                WHERE formulaire_id = ? 
-                ORDER BY sequence_ligne
-            ''', (bt_id,))
-            
-            tasks = []
-            materials = []
-            
-            for ligne in lignes_result:
-                ligne_data = dict(ligne)
-                notes_data = {}
-                try:
-                    notes_data = json.loads(ligne_data.get('notes_ligne', '{}'))
-                except:
-                    pass
-                
-                if ligne_data['sequence_ligne'] >= 1000:  # Matériaux
-                    # Extraire le nom du matériau de la description
-                    desc = ligne_data['description']
-                    if desc.startswith('MATERIAU: '):
-                        desc = desc[10:]  # Enlever "MATERIAU: "
-                    
-                    name_desc = desc.split(' - ', 1)
-                    material = {
-                        'name': name_desc[0] if name_desc else desc,
-                        'description': name_desc[1] if len(name_desc) > 1 else '',
-                        'quantity': ligne_data.get('quantite', 1.0),
-                        'unit': ligne_data.get('unite', 'pcs'),
-                        'fournisseur': notes_data.get('fournisseur', '-- Interne --'),  # NOUVEAU
-                        'available': notes_data.get('available', 'yes'),
-                        'notes': notes_data.get('notes', '')
-                    }
-                    materials.append(material)
-                    
-                else:  # Tâches - LOGIQUE CORRIGÉE
-                    # CORRECTION: Récupérer depuis notes_data en priorité
-                    if 'operation' in notes_data and 'description' in notes_data:
-                        # Nouveau format avec données explicites
-                        operation = notes_data.get('operation', '')
-                        description = notes_data.get('description', '')
-                    else:
-                        # Fallback: parser l'ancienne description
-                        desc = ligne_data['description']
-                        if ' - ' in desc:
-                            op_desc = desc.split(' - ', 1)
-                            operation = op_desc[0]
-                            description = op_desc[1] if len(op_desc) > 1 else ''
-                        else:
-                            # Cas simple
-                            if desc.startswith('TÂCHE - '):
-                                operation = ''
-                                description = desc.replace('TÂCHE - ', '')
-                            else:
-                                operation = desc
-                                description = ''
-                    
-                    task = {
-                        'operation': operation,
-                        'description': description,
-                        'quantity': ligne_data.get('quantite', 1),
-                        'planned_hours': ligne_data.get('prix_unitaire', 0.0),
-                        'actual_hours': notes_data.get('actual_hours', 0.0),
-                        'assigned_to': notes_data.get('assigned_to', ''),
-                        'fournisseur': notes_data.get('fournisseur', '-- Interne --'),  # NOUVEAU
-                        'status': notes_data.get('status', 'pending'),
-                        'start_date': notes_data.get('start_date', ''),
-                        'end_date': notes_data.get('end_date', '')
-                    }
-                    tasks.append(task)
-            
-            # Construire le formulaire complet
-            form_data = {
-                'id': bt_data['id'],
-                'numero_document': bt_data['numero_document'],
-                'project_id': metadonnees.get('project_id', ''),  # AJOUT
-                'project_name': metadonnees.get('project_name', ''),
-                'client_name': metadonnees.get('client_name', ''),
-                'client_company_id': metadonnees.get('client_company_id'),  # AJOUT
-                'project_manager': metadonnees.get('project_manager', ''),
-                'priority': bt_data.get('priorite', 'NORMAL'),
-                'start_date': metadonnees.get('start_date', ''),
-                'end_date': bt_data.get('date_echeance', ''),
-                'work_instructions': bt_data.get('notes', ''),
-                'safety_notes': metadonnees.get('safety_notes', ''),
-                'quality_requirements': metadonnees.get('quality_requirements', ''),
-                'tasks': tasks if tasks else [self.get_empty_task()],
-                'materials': materials if materials else [self.get_empty_material()],
-                'created_by': metadonnees.get('created_by', 'Utilisateur'),
-                'statut': bt_data.get('statut', 'BROUILLON'),
-                'date_creation': bt_data.get('created_at', ''),
-                'date_modification': bt_data.get('updated_at', '')
-            }
+            form_data = bts[0]
+            if not form_data['tasks']:
+                form_data['tasks'] = [self.get_empty_task()]
+            if not form_data['materials']:
+                form_data['materials'] = [self.get_empty_material()]
             
             return form_data
             
@@ -1460,48 +1372,96 @@ class GestionnaireBonsTravail:
     def get_all_bons_travail(self) -> List[Dict]:
         """Récupère tous les bons de travail"""
         try:
-            results = self.db.execute_query('''
-                SELECT f.*, 
-                       COUNT(fl.id) as nb_lignes,
-                       COALESCE(SUM(CASE WHEN fl.sequence_ligne < 1000 THEN fl.prix_unitaire ELSE 0 END), 0) as total_heures_prevues
-                FROM formulaires f
-                LEFT JOIN formulaire_lignes fl ON f.id = fl.formulaire_id
+            results = self.db.execute_query(f'''
+                SELECT {BT_LIST_QUERY.select_sql}
+                FROM {BT_LIST_QUERY.from_sql}
                 WHERE f.type_formulaire = 'BON_TRAVAIL'
-                GROUP BY f.id
-                ORDER BY f.created_at DESC
+                ORDER BY f.created_at DESC, f.id DESC
             ''')
-            
-            bons = []
-            for row in results:
-                row_data = dict(row)
-                
-                # Parser les métadonnées
-                metadonnees = {}
-                try:
-                    metadonnees = json.loads(row_data.get('metadonnees_json', '{}'))
-                except:
-                    pass
-                
-                bon = {
-                    'id': row_data['id'],
-                    'numero_document': row_data['numero_document'],
-                    'project_name': metadonnees.get('project_name', 'N/A'),
-                    'client_name': metadonnees.get('client_name', 'N/A'),
-                    'project_manager': metadonnees.get('project_manager', 'Non assigné'),
-                    'priorite': row_data.get('priorite', 'NORMAL'),
-                    'statut': row_data.get('statut', 'BROUILLON'),
-                    'date_creation': row_data.get('created_at', ''),
-                    'date_echeance': row_data.get('date_echeance', ''),
-                    'nb_lignes': row_data.get('nb_lignes', 0),
-                    'total_heures_prevues': row_data.get('total_heures_prevues', 0.0)
-                }
-                bons.append(bon)
-            
-            return bons
+            return [self._bon_from_row(dict(row)) for row in results]
             
         except Exception as e:
             logger.error(f"Erreur récupération BTs: {e}")
             return []
+
+    @staticmethod
+    def _bon_from_row(row_data: Dict) -> Dict:
+        """Ligne formulaires (+ nb_lignes, total_heures_prevues) -> résumé de BT pour les listes"""
+        # Parser les métadonnées
+        metadonnees = {}
+        try:
+            metadonnees = json.loads(row_data.get('metadonnees_json', '{}'))
+        except:
+            pass
+        
+        return {
+            'id': row_data['id'],
+            'numero_document': row_data['numero_document'],
+            'project_name': metadonnees.get('project_name', 'N/A'),
+            'client_name': metadonnees.get('client_name', 'N/A'),
+            'project_manager': metadonnees.get('project_manager', 'Non assigné'),
+            'priorite': row_data.get('priorite', 'NORMAL'),
+            'statut': row_data.get('statut', 'BROUILLON'),
+            'date_creation': row_data.get('created_at', ''),
+            'date_echeance': row_data.get('date_echeance', ''),
+            'nb_lignes': row_data.get('nb_lignes', 0),
+            'total_heures_prevues': row_data.get('total_heures_prevues', 0.0)
+        }
+
+    @staticmethod
+    def _bt_filters(statut: Optional[str] = None, priorite: Optional[str] = None, recherche: str = ''):
+        where, params = ["f.type_formulaire = 'BON_TRAVAIL'"], []
+        for column, value in (('f.statut', statut), ('f.priorite', priorite)):
+            if value:
+                clause, clause_params = in_clause(column, [value])
+                where.append(clause)
+                params += clause_params
+        if recherche:
+            clause, clause_params = search_clause(
+                ('f.numero_document', BT_META_SQL.format('project_name'), BT_META_SQL.format('client_name')), recherche)
+            where.append(clause)
+            params += clause_params
+        return where, params
+
+    def get_bons_travail_page(self, statut: Optional[str] = None, priorite: Optional[str] = None,
+                              recherche: str = '', cursor: Optional[str] = None, direction: str = NEXT,
+                              page_size: int = 25) -> Dict:
+        """Une page de bons de travail filtrés (plus récents d'abord) et le total de la sélection"""
+        try:
+            where, params = self._bt_filters(statut, priorite, recherche)
+            page = fetch_page(self.db, BT_LIST_QUERY, where, params, cursor=cursor, direction=direction,
+                              page_size=page_size)
+            page['rows'] = [self._bon_from_row(row) for row in page['rows']]
+            page['total'] = count_rows(self.db, BT_LIST_QUERY, where, params)['total']
+            return page
+        except Exception as e:
+            logger.error(f"Erreur récupération page BTs: {e}")
+            return {'rows': [], 'next_cursor': None, 'prev_cursor': None, 'has_next': False, 'has_prev': False,
+                    'total': 0}
+
+    def get_bons_travail_ids(self, statut: Optional[str] = None, priorite: Optional[str] = None,
+                             recherche: str = '') -> List[int]:
+        """Ids de toute la sélection (export en lot), sans charger les lignes"""
+        try:
+            where, params = self._bt_filters(statut, priorite, recherche)
+            rows = self.db.execute_query(
+                f"SELECT f.id FROM formulaires f{ListQuery.where_sql(where)} ORDER BY f.created_at DESC, f.id DESC",
+                tuple(params))
+            return [row['id'] for row in rows]
+        except Exception as e:
+            logger.error(f"Erreur récupération ids BTs: {e}")
+            return []
+
+    def get_bt_filter_values(self) -> Dict[str, List[str]]:
+        """Statuts et priorités présents parmi les BT"""
+        try:
+            rows = self.db.execute_query(
+                "SELECT DISTINCT statut, priorite FROM formulaires WHERE type_formulaire = 'BON_TRAVAIL'")
+            return {'statuts': sorted({r['statut'] for r in rows if r['statut']}),
+                    'priorites': sorted({r['priorite'] for r in rows if r['priorite']})}
+        except Exception as e:
+            logger.error(f"Erreur valeurs de filtres BTs: {e}")
+            return {'statuts': [], 'priorites': []}
     
     def get_bt_statistics(self) -> Dict:
         """Récupère les statistiques des BT"""
@@ -2853,10 +2813,10 @@ def show_bt_management():
         show_bt_delete_confirmation()
         return  # Ne pas afficher le reste pendant la confirmation
     
-    # Récupérer tous les BT
-    bons = gestionnaire.get_all_bons_travail()
+    # Valeurs de filtres et page affichée lues dans SQLite (plus de chargement de tous les BT)
+    valeurs = gestionnaire.get_bt_filter_values()
     
-    if not bons:
+    if not valeurs['statuts'] and not valeurs['priorites']:
         st.info("📋 Aucun bon de travail trouvé. Créez votre premier bon !")
         return
     
@@ -2864,36 +2824,43 @@ def show_bt_management():
     filter_col1, filter_col2, filter_col3 = st.columns(3)
     
     with filter_col1:
-        statuts = ['TOUS'] + list(set(bon['statut'] for bon in bons))
+        statuts = ['TOUS'] + valeurs['statuts']
         statut_filter = st.selectbox("Filtrer par statut:", statuts)
     
     with filter_col2:
-        priorities = ['TOUTES'] + list(set(bon['priorite'] for bon in bons))
+        priorities = ['TOUTES'] + valeurs['priorites']
         priority_filter = st.selectbox("Filtrer par priorité:", priorities)
     
     with filter_col3:
         search_term = st.text_input("🔍 Rechercher:", placeholder="Projet, client, numéro...")
     
     # Appliquer les filtres
-    filtered_bons = bons
-    
-    if statut_filter != 'TOUS':
-        filtered_bons = [b for b in filtered_bons if b['statut'] == statut_filter]
-    
-    if priority_filter != 'TOUTES':
-        filtered_bons = [b for b in filtered_bons if b['priorite'] == priority_filter]
-    
-    if search_term:
-        search_lower = search_term.lower()
-        filtered_bons = [
-            b for b in filtered_bons 
-            if search_lower in b['numero_document'].lower() 
-            or search_lower in b['project_name'].lower()
-            or search_lower in b['client_name'].lower()
-        ]
-    
-    st.markdown(f"**{len(filtered_bons)} bon(s) trouvé(s)**")
+    filtres = {
+        'statut': statut_filter if statut_filter != 'TOUS' else None,
+        'priorite': priority_filter if priority_filter != 'TOUTES' else None,
+        'recherche': search_term,
+    }
+    pager = pager_state('bt_list_page', sorted(filtres.items()))
+    page = gestionnaire.get_bons_travail_page(cursor=pager['cursor'], direction=pager['direction'],
+                                              page_size=pager['page_size'], **filtres)
+    filtered_bons = page['rows']
     
+    st.markdown(f"**{page['total']} bon(s) trouvé(s)**")
+
+    # Export PDF en lot des BT filtrés (paquet d'atelier)
+    if filtered_bons:
+        with st.expander(f"📦 Export PDF en lot ({page['total']} BT filtrés)", expanded=False):
+            format_lot = st.radio("Format:", ["📄 Un seul PDF", "🗜️ ZIP (un PDF par BT)"],
+                                  horizontal=True, key="bt_batch_format")
+            if st.button("📦 Générer le paquet PDF", key="bt_batch_export_btn", type="primary"):
+                try:
+                    from bt_pdf_export import export_bt_pdf_batch_streamlit
+                    forms = gestionnaire.db.get_bons_travail_form_data(gestionnaire.get_bons_travail_ids(**filtres))
+                    export_bt_pdf_batch_streamlit(forms, output='pdf' if format_lot.startswith("📄") else 'zip')
+                except ImportError:
+                    st.error("❌ Export PDF non disponible")
+                    st.info("💡 Installez ReportLab: `pip install reportlab`")
+
     # Affichage en tableau
     if filtered_bons:
         for bon in filtered_bons:
@@ -2951,6 +2918,8 @@ def show_bt_management():
                         st.session_state.bt_delete_confirmed = False
                         st.rerun()
 
+        render_pager(page, 'bt_list_page', page['total'])
+
 def show_bt_statistics():
     """Affichage des statistiques des BT"""
     gestionnaire = st.session_state.gestionnaire_bt
@@ -3581,6 +3550,26 @@ def show_utilization_analysis():
             )
             fig_util.update_layout(height=500, xaxis_tickangle=-45)
             st.plotly_chart(fig_util, use_container_width=True)
+        
+        # Utilisation glissante (fenêtres hebdomadaires)
+        rolling = st.session_state.erp_db.get_work_center_rolling_utilization(window_days=7, nb_windows=max(1, period_days // 7))
+        rolling_data = [
+            {'Poste': wc['nom'], 'Semaine': f"{fenetre['debut']} → {fenetre['fin']}", 'Utilisation %': fenetre['taux_utilisation_pct']}
+            for wc in rolling if wc['taux_max_pct'] > 0
+            for fenetre in wc['fenetres']
+        ]
+        if rolling_data:
+            with st.expander("📈 Utilisation glissante par semaine", expanded=False):
+                fig_rolling = px.line(
+                    pd.DataFrame(rolling_data),
+                    x='Semaine',
+                    y='Utilisation %',
+                    color='Poste',
+                    markers=True,
+                    title="Utilisation glissante des postes actifs"
+                )
+                fig_rolling.update_layout(height=450)
+                st.plotly_chart(fig_rolling, use_container_width=True)
     
     except Exception as e:
         st.error(f"❌ Erreur analyse utilisation: {e}")
@@ -3731,7 +3720,7 @@ def show_capacity_reports():
     with col2:
         view_type = st.selectbox(
             "📊 Type de vue",
-            ["Vue d'ensemble", "Par type de produit", "Goulots d'étranglement"],
+            ["Vue d'ensemble", "Par type de produit", "Goulots d'étranglement", "Planification capacité finie"],
             key="capacity_view_type"
         )
     
@@ -3746,6 +3735,8 @@ def show_capacity_reports():
             show_capacity_overview(period_days)
         elif view_type == "Par type de produit":
             show_capacity_by_product(period_days)
+        elif view_type == "Planification capacité finie":
+            show_finite_capacity_schedule()
         else:  # Goulots d'étranglement
             show_capacity_bottlenecks()
             
@@ -4021,6 +4012,40 @@ def show_capacity_by_product(period_days: int):
                 if row['materiaux_list']:
                     st.markdown(f"**{row['type_produit']}**: {', '.join(row['materiaux_list'][:5])}")
 
+def show_finite_capacity_schedule():
+    """Planification des opérations de BT selon la capacité réelle des postes"""
+    st.markdown("#### 🗓️ Planification à capacité finie")
+    
+    if st.button("🗓️ Recalculer la planification", key="run_finite_capacity_schedule"):
+        result = st.session_state.erp_db.planifier_operations_capacite_finie()
+        if result.get('error'):
+            st.error(f"❌ Erreur de planification: {result['error']}")
+        else:
+            st.success(f"✅ {result['nb_operations']} opérations planifiées en {result['duree_calcul_ms']} ms")
+            if result['bts_en_retard']:
+                st.warning(f"⚠️ {len(result['bts_en_retard'])} BT dépasseraient leur échéance")
+                st.dataframe(pd.DataFrame([{
+                    'BT': bt['numero_document'],
+                    'Échéance': bt['date_echeance'],
+                    'Fin planifiée': bt['fin_planifiee'][:10],
+                    'Retard (jours)': bt['jours_retard']
+                } for bt in result['bts_en_retard']]), use_container_width=True, hide_index=True)
+    
+    planned_load = st.session_state.erp_db.get_planned_load_by_work_center()
+    if not planned_load:
+        st.info("📊 Aucune planification enregistrée. Lancez le calcul pour dater les opérations ouvertes.")
+        return
+    
+    df_planned = pd.DataFrame([{
+        'Poste': wc['nom'],
+        'Département': wc['departement'],
+        'Opérations': wc['nb_operations'],
+        'Heures planifiées': round(wc['heures_planifiees'], 1),
+        'Début': (wc['debut_planifie'] or '')[:10],
+        'Fin planifiée': (wc['fin_planifiee'] or '')[:10]
+    } for wc in planned_load])
+    st.dataframe(df_planned, use_container_width=True, hide_index=True)
+
 def show_capacity_bottlenecks():
     """Analyse détaillée des goulots d'étranglement"""
     st.markdown("#### ⚠️ Analyse des goulots d'étranglement")
@@ -4,6 +4,10 @@ from datetime import datetime
 import json
 from typing import Dict, List, Optional, Any
 
+from mrp_engine import MRPEngine
+from product_catalog_index import get_shared_index, refresh_product
+from schema_migrations import create_version_triggers
+
 # Constantes pour les produits de construction (adaptées pour le Québec)
 CATEGORIES_PRODUITS = ["Béton", "Bois", "Acier structural", "Isolation", "Plâtre", "Toiture", "Plomberie", "Électricité", "Quincaillerie", "Finition", "Revêtements", "Portes et fenêtres", "Armature", "Granulats"]
 UNITES_VENTE = ["unité", "sac", "m", "m²", "m³", "pièce", "paquet", "boîte", "gallon", "lot", "pi", "pi²", "pi³", "vg³", "pi linéaire", "tonne", "palette"]
@@ -81,6 +85,8 @@ class GestionnaireProduits:
                 )
                 '''
                 self.db.execute_update(create_table_query)
+                # Table créée après les migrations : compteur data_versions (index de recherche de l'assistant)
+                create_version_triggers(self.db.execute_update, 'produits')
                 st.success("✅ Table 'produits' créée avec succès")
                 
                 # Ajouter des données de démonstration
@@ -295,13 +301,8 @@ class GestionnaireProduits:
             return getattr(self, '_produits', [])
         
         try:
-            rows = self.db.execute_query('''
-                SELECT * FROM produits 
-                WHERE actif = 1 
-                ORDER BY categorie, nom
-            ''')
-            
-            return [dict(row) for row in rows]
+            # Index partagé du catalogue (voir product_catalog_index)
+            return get_shared_index(self.db).all_products()
         except Exception as e:
             st.error(f"Erreur récupération produits: {e}")
             return []
@@ -338,6 +339,7 @@ class GestionnaireProduits:
             ))
             
             if produit_id:
+                refresh_product(self.db, produit_id)
                 st.success(f"✅ Produit créé avec l'ID #{produit_id}")
             
             return produit_id
@@ -386,6 +388,7 @@ class GestionnaireProduits:
                 rows_affected = self.db.execute_update(query, tuple(params))
                 
                 if rows_affected > 0:
+                    refresh_product(self.db, id_produit)
                     st.success(f"✅ Produit #{id_produit} mis à jour")
                 
                 return rows_affected > 0
@@ -414,6 +417,7 @@ class GestionnaireProduits:
                 )
                 st.success("✅ Produit désactivé")
             
+            refresh_product(self.db, id_produit)
             return rows_affected > 0
             
         except Exception as e:
@@ -449,8 +453,8 @@ class GestionnaireProduits:
             st.error(f"Erreur récupération produits catégorie {categorie}: {e}")
             return []
 
-    def search_produits(self, terme_recherche):
-        """Recherche de produits par terme"""
+    def search_produits(self, terme_recherche, limit=None):
+        """Recherche de produits par terme (code, nom, matériau, description ; sans accents)"""
         if not self.use_sqlite:
             terme = terme_recherche.lower()
             return [p for p in getattr(self, '_produits', []) 
@@ -459,19 +463,8 @@ class GestionnaireProduits:
                       terme in p.get('description', '').lower()]
         
         try:
-            query = '''
-                SELECT * FROM produits 
-                WHERE actif = 1 AND (
-                    LOWER(nom) LIKE ? OR 
-                    LOWER(code_produit) LIKE ? OR 
-                    LOWER(description) LIKE ? OR
-                    LOWER(materiau) LIKE ?
-                )
-                ORDER BY nom
-            '''
-            terme = f"%{terme_recherche.lower()}%"
-            rows = self.db.execute_query(query, (terme, terme, terme, terme))
-            return [dict(row) for row in rows]
+            # Index trigrammes en mémoire au lieu de LIKE '%terme%' sur quatre colonnes
+            return get_shared_index(self.db).search(terme_recherche, limit)
         except Exception as e:
             st.error(f"Erreur recherche produits: {e}")
             return []
@@ -529,26 +522,46 @@ class GestionnaireProduits:
         try:
             query = '''
                 SELECT p.*,
-                       (p.stock_disponible - COALESCE(
-                           (SELECT SUM(quantite_reservee) 
-                            FROM reservations_stock 
-                            WHERE produit_id = p.id AND statut = 'ACTIVE'), 0)
-                       ) as stock_libre,
-                       COALESCE(
-                           (SELECT SUM(quantite_reservee) 
-                            FROM reservations_stock 
-                            WHERE produit_id = p.id AND statut = 'ACTIVE'), 0
-                       ) as total_reserve
+                       p.stock_disponible - COALESCE(r.total_reserve, 0) as stock_libre,
+                       COALESCE(r.total_reserve, 0) as total_reserve
                 FROM produits p
+                LEFT JOIN (
+                    SELECT produit_id, SUM(quantite_reservee) as total_reserve
+                    FROM reservations_stock
+                    WHERE produit_id = ? AND statut = 'ACTIVE'
+                    GROUP BY produit_id
+                ) r ON r.produit_id = p.id
                 WHERE p.id = ?
             '''
-            result = self.db.execute_query(query, (produit_id,))
+            result = self.db.execute_query(query, (produit_id, produit_id))
             return result[0] if result else None
             
         except Exception as e:
             st.error(f"Erreur récupération stock complet: {e}")
             return None
     
+    def get_total_reserve_par_produit(self) -> Dict[int, float]:
+        """Quantité réservée active de chaque produit, en une requête"""
+        if not self.use_sqlite:
+            return {}
+        
+        try:
+            return MRPEngine(self.db).load_reservations().to_dict()
+        except Exception as e:
+            st.error(f"Erreur récupération réservations: {e}")
+            return {}
+    
+    def get_plan_reapprovisionnement(self, seulement_a_commander=True) -> List[Dict[str, Any]]:
+        """Besoins nets de tout le catalogue (voir mrp_engine) : stock, réservations, BT ouverts, BA en cours"""
+        if not self.use_sqlite:
+            return []
+        
+        try:
+            return MRPEngine(self.db).compute_plan(seulement_a_commander).to_dict('records')
+        except Exception as e:
+            st.error(f"Erreur calcul réapprovisionnement: {e}")
+            return []
+    
     def entree_stock(self, produit_id, quantite, reference_document=None, cout_unitaire=None, employee_id=None):
         """Enregistre une entrée de stock (réception)"""
         if not self.use_sqlite:
@@ -1324,6 +1337,9 @@ def render_inventaire_tab(gestionnaire_produits: GestionnaireProduits):
     # Récupérer et filtrer les produits
     produits = gestionnaire_produits.produits
     
+    # Réservations actives de tout le catalogue en une requête
+    reservations = gestionnaire_produits.get_total_reserve_par_produit()
+    
     # Appliquer les filtres
     produits_filtres = []
     for p in produits:
@@ -1347,17 +1363,9 @@ def render_inventaire_tab(gestionnaire_produits: GestionnaireProduits):
             continue
         
         # Ajouter les infos de stock complet
-        if gestionnaire_produits.use_sqlite:
-            stock_info = gestionnaire_produits.get_stock_complet(p['id'])
-            if stock_info:
-                p['stock_libre'] = stock_info.get('stock_libre', stock_dispo)
-                p['stock_reserve'] = stock_info.get('total_reserve', 0)
-            else:
-                p['stock_libre'] = stock_dispo
-                p['stock_reserve'] = 0
-        else:
-            p['stock_libre'] = stock_dispo
-            p['stock_reserve'] = 0
+        total_reserve = reservations.get(p['id'], 0)
+        p['stock_libre'] = stock_dispo - total_reserve
+        p['stock_reserve'] = total_reserve
         
         produits_filtres.append(p)
     
@@ -1422,7 +1430,29 @@ def render_inventaire_tab(gestionnaire_produits: GestionnaireProduits):
     
     else:
         st.info("Aucun produit ne correspond aux critères")
-    
+
+    # Propositions d'achat (besoins nets de tout le catalogue)
+    if gestionnaire_produits.use_sqlite:
+        with st.expander("🛒 Propositions de réapprovisionnement (MRP)"):
+            plan = gestionnaire_produits.get_plan_reapprovisionnement()
+            if plan:
+                st.dataframe(pd.DataFrame([{
+                    "Fournisseur": p['fournisseur_principal'],
+                    "Code": p['code_produit'],
+                    "Produit": p['nom'],
+                    "Stock": p['stock_disponible'],
+                    "Réservé": p['reserve'],
+                    "Besoins BT": p['besoins_bt'],
+                    "Entrant BA": p['entrant'],
+                    "Stock projeté": p['stock_projete'],
+                    "Seuil": p['seuil'],
+                    "À commander": f"{p['qte_proposee']:.2f} {p['unite_vente'] or ''}",
+                    "Coût estimé": f"{p['cout_estime']:,.2f} $"
+                } for p in plan]), use_container_width=True, hide_index=True)
+                st.caption(f"{len(plan)} produit(s) à commander - total estimé {sum(p['cout_estime'] for p in plan):,.2f} $")
+            else:
+                st.success("✅ Aucun produit sous son point de commande")
+
     # Gérer les actions d'inventaire
     handle_inventory_actions(gestionnaire_produits)
 
@@ -0,0 +1,305 @@
+# scheduling_engine.py - Planification à capacité finie des opérations de BT
+"""
+Ordonnancement à capacité finie des opérations ouvertes des Bons de Travail.
+
+Modèle :
+- chaque poste de travail (work_centers) est une ressource séquentielle qui
+  traite capacite_theorique heures par jour ouvrable (lundi → vendredi) ;
+- une opération de temps_estime heures occupe donc son poste pendant
+  temps_estime / capacite_theorique jours ouvrables ;
+- les opérations d'un même BT s'enchaînent selon sequence_number ;
+- une réservation active (bt_reservations_postes, statut RÉSERVÉ) fixe la date
+  au plus tôt des opérations du BT sur le poste réservé.
+
+Algorithme (ordonnancement par liste, événementiel) :
+- un tas global d'événements (date de disponibilité, poste) ;
+- par poste, un tas des opérations pas encore arrivées (clé : date prête) et un
+  tas des opérations disponibles (clé : priorité BT, échéance, BT, séquence).
+Quand un poste se libère, il prend l'opération disponible la plus prioritaire ;
+la fin de cette opération libère l'opération suivante du BT. Chaque opération
+entre et sort au plus une fois de chaque tas : O(n log n).
+
+Les dates calculées sont écrites dans operations.date_debut_planifiee /
+operations.date_fin_planifiee pour le Gantt et les rapports de capacité.
+"""
+
+import heapq
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUTS_OPERATION_A_PLANIFIER = ('À FAIRE', 'EN COURS')
+STATUTS_BT_CLOTURES = ('TERMINÉ', 'ANNULÉ')
+RANG_PRIORITE_BT = {'CRITIQUE': 0, 'URGENT': 1, 'NORMAL': 2}
+HEURES_JOUR_DEFAUT = 8.0
+HEURE_DEBUT_JOURNEE = 7
+
+
+class WorkingCalendar:
+    """
+    Conversion jours ouvrables (float depuis l'origine) ↔ dates calendrier, lundi → vendredi.
+    Une journée ouvrable couvre heures_ouverture heures d'horloge à partir de HEURE_DEBUT_JOURNEE,
+    identiques pour tous les postes afin que les dates restent comparables entre postes.
+    """
+
+    def __init__(self, origine: date, heures_ouverture: float = HEURES_JOUR_DEFAUT):
+        # L'origine est ramenée au prochain jour ouvrable
+        while origine.weekday() >= 5:
+            origine += timedelta(days=1)
+        self.origine = origine
+        self._lundi = origine - timedelta(days=origine.weekday())
+        self.heures_ouverture = min(max(heures_ouverture, 1.0), 24.0)
+        self.heure_debut = min(HEURE_DEBUT_JOURNEE, 24 - self.heures_ouverture)
+
+    def jour_ouvrable(self, index: int) -> date:
+        """Date du index-ième jour ouvrable depuis l'origine"""
+        total = self.origine.weekday() + index
+        return self._lundi + timedelta(days=(total // 5) * 7 + total % 5)
+
+    def index_de(self, jour: date) -> float:
+        """Nombre de jours ouvrables entre l'origine et jour (0 si antérieur)"""
+        if jour <= self.origine:
+            return 0.0
+        while jour.weekday() >= 5:
+            jour += timedelta(days=1)
+        semaines, reste = divmod((jour - self._lundi).days, 7)
+        return float(semaines * 5 + reste - self.origine.weekday())
+
+    def to_datetime(self, t: float, fin: bool = False) -> datetime:
+        """Convertit une position en jours ouvrables en date/heure"""
+        index = int(t)
+        fraction = t - index
+        if fin and index > 0 and fraction == 0:
+            # Une fin exactement sur une frontière appartient à la journée précédente
+            index, fraction = index - 1, 1.0
+        debut_journee = datetime.combine(self.jour_ouvrable(index), datetime.min.time())
+        return debut_journee + timedelta(hours=self.heure_debut + fraction * self.heures_ouverture)
+
+
+class FiniteCapacityScheduler:
+    """Calcule un échéancier réalisable des opérations de BT en respectant la capacité des postes"""
+
+    def __init__(self, db):
+        self.db = db
+
+    # =========================================================================
+    # CHARGEMENT DES DONNÉES
+    # =========================================================================
+
+    def load_open_operations(self) -> List[Dict[str, Any]]:
+        """Opérations ouvertes des BT actifs avec priorité/échéance du BT et capacité du poste"""
+        statuts_op = ", ".join(f"'{s}'" for s in STATUTS_OPERATION_A_PLANIFIER)
+        statuts_bt = ", ".join(f"'{s}'" for s in STATUTS_BT_CLOTURES)
+        return self.db.execute_query(f'''
+            SELECT o.id, o.formulaire_bt_id as bt_id, o.work_center_id, o.sequence_number,
+                   o.temps_estime, o.statut,
+                   f.numero_document, f.priorite, f.date_echeance,
+                   wc.nom as work_center_name, wc.capacite_theorique
+            FROM operations o
+            JOIN formulaires f ON f.id = o.formulaire_bt_id
+            LEFT JOIN work_centers wc ON wc.id = o.work_center_id
+            WHERE f.type_formulaire = 'BON_TRAVAIL'
+              AND f.statut NOT IN ({statuts_bt})
+              AND o.statut IN ({statuts_op})
+            ORDER BY o.formulaire_bt_id, o.sequence_number, o.id
+        ''')
+
+    def load_reservations(self) -> Dict[tuple, str]:
+        """Date prévue la plus tôt par (BT, poste) pour les réservations actives"""
+        rows = self.db.execute_query('''
+            SELECT bt_id, work_center_id, MIN(date_prevue) as date_prevue
+            FROM bt_reservations_postes
+            WHERE statut = 'RÉSERVÉ' AND date_prevue IS NOT NULL
+            GROUP BY bt_id, work_center_id
+        ''')
+        return {(row['bt_id'], row['work_center_id']): row['date_prevue'] for row in rows}
+
+    # =========================================================================
+    # ORDONNANCEMENT
+    # =========================================================================
+
+    @staticmethod
+    def _parse_date(value) -> Optional[date]:
+        if not value:
+            return None
+        try:
+            return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+        except ValueError:
+            return None
+
+    def schedule(self, operations: List[Dict[str, Any]], reservations: Optional[Dict[tuple, str]] = None,
+                 origine: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Ordonnance les opérations (déjà triées par BT puis séquence) et retourne l'échéancier.
+        Fonction pure : aucune écriture en base.
+        """
+        debut_calcul = time.perf_counter()
+        reservations = reservations or {}
+
+        # Chaînes d'opérations par BT (ordre de séquence)
+        chaines: Dict[Any, List[Dict]] = {}
+        for op in operations:
+            chaines.setdefault(op['bt_id'], []).append(op)
+
+        heures_jour = {}
+        for op in operations:
+            if op['work_center_id'] is not None and op['work_center_id'] not in heures_jour:
+                heures_jour[op['work_center_id']] = op.get('capacite_theorique') or HEURES_JOUR_DEFAUT
+
+        # Plage d'ouverture commune = capacité journalière du poste le plus capacitaire
+        calendrier = WorkingCalendar(origine or date.today(), max(heures_jour.values(), default=HEURES_JOUR_DEFAUT))
+
+        poste_libre = {wc_id: 0.0 for wc_id in heures_jour}      # fin de la dernière opération placée
+        en_route = {wc_id: [] for wc_id in heures_jour}          # tas (date_prête, ordre, op)
+        disponibles = {wc_id: [] for wc_id in heures_jour}       # tas (clé priorité, ordre, op, date_prête)
+        evenement_poste = {}                                     # date de l'événement valide du poste
+        evenements = []                                          # tas global (date, wc_id)
+        compteur = 0
+        planifiees = []
+
+        def cle_priorite(op):
+            echeance = self._parse_date(op.get('date_echeance')) or date.max
+            en_cours = 0 if op.get('statut') == 'EN COURS' else 1
+            return (en_cours, RANG_PRIORITE_BT.get(op.get('priorite'), 3), echeance, op['bt_id'], op.get('sequence_number') or 0)
+
+        def planifier_evenement(wc_id, t):
+            if wc_id not in evenement_poste or t < evenement_poste[wc_id]:
+                evenement_poste[wc_id] = t
+                heapq.heappush(evenements, (t, wc_id))
+
+        def rendre_prete(bt_id, index, t_pret):
+            """Libère l'opération index de la chaîne du BT à partir de t_pret"""
+            nonlocal compteur
+            chaine = chaines[bt_id]
+            while index < len(chaine):
+                op = chaine[index]
+                wc_id = op['work_center_id']
+                reservation = self._parse_date(reservations.get((bt_id, wc_id)))
+                if reservation:
+                    t_pret = max(t_pret, calendrier.index_de(reservation))
+                op['_index'] = index
+                if wc_id is None:
+                    # Poste non assigné : capacité non contrainte, durée sur une journée standard
+                    duree = (op.get('temps_estime') or 0) / HEURES_JOUR_DEFAUT
+                    planifiees.append((op, t_pret, t_pret + duree))
+                    t_pret += duree
+                    index += 1
+                    continue
+                compteur += 1
+                heapq.heappush(en_route[wc_id], (t_pret, compteur, op))
+                planifier_evenement(wc_id, max(t_pret, poste_libre[wc_id]))
+                return
+
+        for bt_id in chaines:
+            rendre_prete(bt_id, 0, 0.0)
+
+        while evenements:
+            t, wc_id = heapq.heappop(evenements)
+            if evenement_poste.get(wc_id) != t:
+                continue  # Événement périmé
+            del evenement_poste[wc_id]
+
+            # Opérations arrivées au poste
+            file_attente = en_route[wc_id]
+            while file_attente and file_attente[0][0] <= t:
+                t_pret, ordre, op = heapq.heappop(file_attente)
+                heapq.heappush(disponibles[wc_id], (cle_priorite(op), ordre, op, t_pret))
+
+            if not disponibles[wc_id]:
+                if file_attente:
+                    planifier_evenement(wc_id, file_attente[0][0])
+                continue
+
+            _, _, op, _ = heapq.heappop(disponibles[wc_id])
+            duree = (op.get('temps_estime') or 0) / heures_jour[wc_id]
+            fin = t + duree
+            planifiees.append((op, t, fin))
+            poste_libre[wc_id] = fin
+            if disponibles[wc_id] or file_attente:
+                planifier_evenement(wc_id, fin)
+            rendre_prete(op['bt_id'], op['_index'] + 1, fin)
+
+        return self._build_result(planifiees, calendrier, time.perf_counter() - debut_calcul)
+
+    def _build_result(self, planifiees, calendrier: WorkingCalendar, duree_calcul: float) -> Dict[str, Any]:
+        """Convertit l'échéancier en dates et calcule les synthèses par poste et par BT"""
+        operations_planifiees = []
+        postes: Dict[Any, Dict[str, Any]] = {}
+        bts: Dict[Any, Dict[str, Any]] = {}
+
+        for op, debut, fin in planifiees:
+            date_debut = calendrier.to_datetime(debut)
+            date_fin = calendrier.to_datetime(fin, fin=True)
+            operations_planifiees.append({
+                'operation_id': op['id'],
+                'bt_id': op['bt_id'],
+                'work_center_id': op['work_center_id'],
+                'date_debut_planifiee': date_debut.isoformat(timespec='minutes'),
+                'date_fin_planifiee': date_fin.isoformat(timespec='minutes')
+            })
+
+            if op['work_center_id'] is not None:
+                poste = postes.setdefault(op['work_center_id'], {
+                    'work_center_id': op['work_center_id'],
+                    'nom': op.get('work_center_name'),
+                    'nb_operations': 0,
+                    'heures_planifiees': 0.0,
+                    'fin_planifiee': date_fin
+                })
+                poste['nb_operations'] += 1
+                poste['heures_planifiees'] += op.get('temps_estime') or 0
+                poste['fin_planifiee'] = max(poste['fin_planifiee'], date_fin)
+
+            bt = bts.setdefault(op['bt_id'], {
+                'bt_id': op['bt_id'],
+                'numero_document': op.get('numero_document'),
+                'date_echeance': op.get('date_echeance'),
+                'fin_planifiee': date_fin
+            })
+            bt['fin_planifiee'] = max(bt['fin_planifiee'], date_fin)
+
+        bts_en_retard = []
+        for bt in bts.values():
+            echeance = self._parse_date(bt['date_echeance'])
+            if echeance and bt['fin_planifiee'].date() > echeance:
+                bt['jours_retard'] = (bt['fin_planifiee'].date() - echeance).days
+                bts_en_retard.append(bt)
+
+        for resume in list(postes.values()) + list(bts.values()):
+            resume['fin_planifiee'] = resume['fin_planifiee'].isoformat(timespec='minutes')
+
+        return {
+            'operations': operations_planifiees,
+            'postes': sorted(postes.values(), key=lambda p: p['fin_planifiee'], reverse=True),
+            'bts_en_retard': sorted(bts_en_retard, key=lambda b: b['jours_retard'], reverse=True),
+            'nb_operations': len(operations_planifiees),
+            'duree_calcul_ms': round(duree_calcul * 1000, 1)
+        }
+
+    # =========================================================================
+    # ÉCRITURE
+    # =========================================================================
+
+    def save_schedule(self, result: Dict[str, Any]) -> int:
+        """Écrit les dates planifiées dans operations en une seule transaction"""
+        with self.db.get_connection() as conn:
+            # Les opérations sorties du périmètre (BT clôturé, opération terminée) perdent leurs anciennes dates
+            conn.execute("UPDATE operations SET date_debut_planifiee = NULL, date_fin_planifiee = NULL "
+                         "WHERE date_fin_planifiee IS NOT NULL")
+            conn.executemany(
+                "UPDATE operations SET date_debut_planifiee = ?, date_fin_planifiee = ? WHERE id = ?",
+                [(op['date_debut_planifiee'], op['date_fin_planifiee'], op['operation_id']) for op in result['operations']]
+            )
+            conn.commit()
+        return len(result['operations'])
+
+    def run(self, save: bool = True) -> Dict[str, Any]:
+        """Charge, ordonnance et (optionnellement) enregistre l'échéancier"""
+        result = self.schedule(self.load_open_operations(), self.load_reservations())
+        if save:
+            self.save_schedule(result)
+        logger.info(f"🗓️ Planification capacité finie: {result['nb_operations']} opérations en {result['duree_calcul_ms']} ms")
+        return result
@@ -0,0 +1,817 @@
+# schema_migrations.py - Migrations de schéma versionnées, par lots et reprenables
+"""
+Cadre de migrations de la base ERP.
+
+ERPDatabase.upgrade_schema était une chaîne de blocs « if from_version < N »
+(ALTER TABLE entourés de try/except), et les conversions de table
+(migration_handler.run_database_migration, app.migrate_projects_table_for_alphanumeric_ids)
+chargeaient toute la table en mémoire, supprimaient les vues et tournaient
+dans une requête Streamlit. Ici :
+- chaque migration est une fonction enregistrée par @migration(version, description),
+  appliquée une seule fois et tracée dans schema_version ; une migration
+  transactionnelle est atomique (le DDL SQLite est transactionnel) ;
+- MigrationContext fournit les opérations idempotentes (add_column,
+  create_index), les UPDATE par lots de rowid (update_in_chunks) et la
+  reconstruction de table en ligne (rebuild_table) : copie par lots de clés,
+  triggers de synchronisation pendant la copie, bascule atomique à la fin ;
+  la progression est enregistrée dans schema_migration_progress, une copie
+  interrompue reprend au dernier lot ;
+- dry_run() applique les migrations en attente sur une copie de la base et
+  mesure leur durée, sans toucher la base réelle ;
+- run_migrations_once() n'exécute les migrations qu'une fois par processus et
+  par base ; start_background_migration() et la ligne de commande
+  (python schema_migrations.py erp.db [--dry-run]) les sortent des requêtes web.
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+
+_MIGRATIONS: Dict[int, 'Migration'] = {}
+_MIGRATED_PATHS = set()
+_run_lock = threading.RLock()
+_background_threads: Dict[str, threading.Thread] = {}
+
+
+class Migration:
+    """Migration versionnée ; transactional=False si elle valide ses propres lots"""
+
+    def __init__(self, version: int, description: str, apply: Callable[['MigrationContext'], None],
+                 transactional: bool = True):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.transactional = transactional
+
+
+def migration(version: int, description: str, transactional: bool = True):
+    """Décorateur : enregistre une fonction fn(ctx) comme migration de la version donnée"""
+    def register(fn):
+        if version in _MIGRATIONS:
+            raise ValueError(f"Migration v{version} déjà enregistrée")
+        _MIGRATIONS[version] = Migration(version, description, fn, transactional)
+        return fn
+    return register
+
+
+def get_migrations() -> List[Migration]:
+    return [_MIGRATIONS[v] for v in sorted(_MIGRATIONS)]
+
+
+def latest_version() -> int:
+    return max(_MIGRATIONS) if _MIGRATIONS else 0
+
+
+def migrations_fingerprint() -> str:
+    """Empreinte du code des migrations (incluse dans l'empreinte de schéma d'ERPDatabase)"""
+    sources = []
+    for m in get_migrations():
+        try:
+            sources.append(inspect.getsource(m.apply))
+        except (OSError, TypeError):
+            sources.append(repr(m.apply.__code__.co_code))
+    return hashlib.sha256("\n".join(sources).encode('utf-8')).hexdigest()
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Connexion en autocommit (transactions explicites), clés étrangères désactivées pour les reconstructions"""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = OFF")
+    return conn
+
+
+# =========================================================================
+# CONTEXTE D'EXÉCUTION
+# =========================================================================
+
+class MigrationContext:
+    """Opérations disponibles pour une migration, sur la connexion du runner"""
+
+    def __init__(self, conn: sqlite3.Connection, name: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.conn = conn
+        self.name = name
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self.rows_processed = 0
+
+    def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return self.conn.execute(sql, params)
+
+    def query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def table_exists(self, table: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
+
+    def columns(self, table: str) -> List[str]:
+        return [row['name'] for row in self.conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+    def add_column(self, table: str, column: str, declaration: str) -> bool:
+        """ALTER TABLE ADD COLUMN si la table existe et que la colonne manque"""
+        if not self.table_exists(table) or column in self.columns(table):
+            return False
+        self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        return True
+
+    def create_index(self, name: str, table: str, columns: str) -> bool:
+        """CREATE INDEX IF NOT EXISTS si la table et ses colonnes existent"""
+        if not self.table_exists(table):
+            return False
+        existantes = set(self.columns(table))
+        if any(col.strip().split()[0] not in existantes for col in columns.split(',')):
+            return False
+        self.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+        return True
+
+    # -------------------------------------------------------------------------
+    # Progression (reprise après interruption)
+    # -------------------------------------------------------------------------
+
+    def _get_progress(self, step: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            "SELECT * FROM schema_migration_progress WHERE name = ? AND step = ?", (self.name, step)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def _save_progress(self, step: str, phase: str, last_key: Any, rows_done: int, total_rows: int) -> None:
+        self.conn.execute('''
+            INSERT OR REPLACE INTO schema_migration_progress (name, step, phase, last_key, rows_done, total_rows, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (self.name, step, phase, json.dumps(last_key), rows_done, total_rows,
+              datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        if self.progress_callback:
+            self.progress_callback({'name': self.name, 'step': step, 'phase': phase,
+                                    'rows_done': rows_done, 'total_rows': total_rows})
+
+    def _in_transaction(self, fn: Callable[[], Any]) -> Any:
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn()
+            self.conn.execute("COMMIT")
+            return result
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    # -------------------------------------------------------------------------
+    # Opérations par lots
+    # -------------------------------------------------------------------------
+
+    def update_in_chunks(self, table: str, set_sql: str, where: str = "1", params: tuple = ()) -> int:
+        """
+        UPDATE par lots de rowid, chaque lot dans sa propre transaction
+        (migration transactional=False) ou dans la transaction de la migration.
+        """
+        if not self.table_exists(table):
+            return 0
+        step = f"update:{table}:{set_sql}"
+        progress = self._get_progress(step)
+        if progress and progress['phase'] == 'done':
+            return progress['rows_done']
+        last_rowid = json.loads(progress['last_key']) if progress else 0
+        rows_done = progress['rows_done'] if progress else 0
+        own_transactions = not self.conn.in_transaction
+
+        while True:
+            def lot():
+                bornes = self.conn.execute(
+                    f"SELECT MAX(rowid) as fin FROM (SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+                    (last_rowid, self.chunk_size)
+                ).fetchone()
+                if bornes['fin'] is None:
+                    return None, 0
+                cursor = self.conn.execute(
+                    f"UPDATE {table} SET {set_sql} WHERE rowid > ? AND rowid <= ? AND ({where})",
+                    (last_rowid, bornes['fin'], *params)
+                )
+                return bornes['fin'], cursor.rowcount
+
+            fin, modifies = self._in_transaction(lot) if own_transactions else lot()
+            if fin is None:
+                break
+            last_rowid = fin
+            rows_done += modifies
+            self.rows_processed += modifies
+            if own_transactions:
+                self._save_progress(step, 'update', last_rowid, rows_done, 0)
+        if own_transactions:
+            self._save_progress(step, 'done', last_rowid, rows_done, 0)
+        return rows_done
+
+    def rebuild_table(self, table: str, transform_sql: Callable[[str], str],
+                      select_exprs: Optional[Dict[str, str]] = None, key_column: str = 'id') -> int:
+        """
+        Reconstruit une table en ligne (migration transactional=False) :
+        1. crée {table}__new avec le CREATE TABLE actuel transformé par transform_sql ;
+        2. pose des triggers sur la table source qui répercutent INSERT/UPDATE/DELETE ;
+        3. copie par lots de key_column (INSERT OR IGNORE : une ligne déjà répercutée
+           par un trigger est plus récente), progression enregistrée à chaque lot ;
+        4. bascule en une transaction : triggers supprimés, ancienne table supprimée,
+           nouvelle renommée (legacy_alter_table : les vues gardent leur nom de table),
+           index et triggers d'origine recréés.
+        select_exprs : colonne cible -> expression sur {row} (ex. "CAST({row}.id AS TEXT)") ;
+        par défaut, copie à l'identique des colonnes communes.
+        """
+        step = f"rebuild:{table}"
+        nouvelle = f"{table}__new"
+        progress = self._get_progress(step)
+        if progress and progress['phase'] == 'done':
+            return progress['rows_done']
+
+        if not progress:
+            def preparer():
+                create_sql = self.conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()['sql']
+                create_sql = re.sub(r'^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?["`\[]?\w+["`\]]?',
+                                    f'CREATE TABLE {nouvelle}', create_sql, count=1, flags=re.IGNORECASE)
+                self.conn.execute(f"DROP TABLE IF EXISTS {nouvelle}")
+                self.conn.execute(transform_sql(create_sql))
+                total = self.conn.execute(f"SELECT COUNT(*) as n FROM {table}").fetchone()['n']
+                self._create_sync_triggers(table, nouvelle, self._select_exprs(table, nouvelle, select_exprs), key_column)
+                self._save_progress(step, 'copy', None, 0, total)
+            self._in_transaction(preparer)
+            progress = self._get_progress(step)
+
+        exprs = self._select_exprs(table, nouvelle, select_exprs)
+        colonnes = ', '.join(exprs)
+        valeurs = ', '.join(expr.format(row='s') for expr in exprs.values())
+        last_key = json.loads(progress['last_key']) if progress['last_key'] else None
+        rows_done, total = progress['rows_done'], progress['total_rows']
+
+        while True:
+            def lot():
+                filtre, params = (f"WHERE {key_column} > ?", (last_key,)) if last_key is not None else ("", ())
+                fin = self.conn.execute(
+                    f"SELECT MAX({key_column}) as fin FROM (SELECT {key_column} FROM {table} {filtre} "
+                    f"ORDER BY {key_column} LIMIT ?)", (*params, self.chunk_size)
+                ).fetchone()['fin']
+                if fin is None:
+                    return None, 0
+                filtre_lot = f"s.{key_column} > ? AND s.{key_column} <= ?" if last_key is not None else f"s.{key_column} <= ?"
+                cursor = self.conn.execute(
+                    f"INSERT OR IGNORE INTO {nouvelle} ({colonnes}) SELECT {valeurs} FROM {table} s WHERE {filtre_lot}",
+                    (*params, fin)
+                )
+                self._save_progress(step, 'copy', fin, rows_done + cursor.rowcount, total)
+                return fin, cursor.rowcount
+
+            fin, copies = self._in_transaction(lot)
+            if fin is None:
+                break
+            last_key = fin
+            rows_done += copies
+            self.rows_processed += copies
+
+        def basculer():
+            self._drop_sync_triggers(nouvelle)
+            objets = [row['sql'] for row in self.conn.execute(
+                "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+                (table,)
+            ).fetchall()]
+            self.conn.execute(f"DROP TABLE {table}")
+            self.conn.execute(f"ALTER TABLE {nouvelle} RENAME TO {table}")
+            for sql in objets:
+                self.conn.execute(sql)
+            self._save_progress(step, 'done', last_key, rows_done, total)
+
+        self.conn.execute("PRAGMA legacy_alter_table = ON")
+        try:
+            self._in_transaction(basculer)
+        finally:
+            self.conn.execute("PRAGMA legacy_alter_table = OFF")
+        logger.info(f"🔁 Table {table} reconstruite : {rows_done} lignes copiées")
+        return rows_done
+
+    def _select_exprs(self, table: str, nouvelle: str, select_exprs: Optional[Dict[str, str]]) -> Dict[str, str]:
+        source = set(self.columns(table))
+        exprs = {col: f"{{row}}.{col}" for col in self.columns(nouvelle) if col in source}
+        exprs.update(select_exprs or {})
+        return exprs
+
+    def _create_sync_triggers(self, table: str, nouvelle: str, exprs: Dict[str, str], key_column: str) -> None:
+        colonnes = ', '.join(exprs)
+        valeurs_new = ', '.join(expr.format(row='NEW') for expr in exprs.values())
+        cle_old = exprs.get(key_column, f"{{row}}.{key_column}").format(row='OLD')
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {nouvelle}_sync_insert AFTER INSERT ON {table}
+            BEGIN INSERT OR REPLACE INTO {nouvelle} ({colonnes}) VALUES ({valeurs_new}); END
+        ''')
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {nouvelle}_sync_update AFTER UPDATE ON {table}
+            BEGIN
+                DELETE FROM {nouvelle} WHERE {key_column} = {cle_old};
+                INSERT OR REPLACE INTO {nouvelle} ({colonnes}) VALUES ({valeurs_new});
+            END
+        ''')
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {nouvelle}_sync_delete AFTER DELETE ON {table}
+            BEGIN DELETE FROM {nouvelle} WHERE {key_column} = {cle_old}; END
+        ''')
+
+    def _drop_sync_triggers(self, nouvelle: str) -> None:
+        for suffixe in ('insert', 'update', 'delete'):
+            self.conn.execute(f"DROP TRIGGER IF EXISTS {nouvelle}_sync_{suffixe}")
+
+
+# =========================================================================
+# EXÉCUTION
+# =========================================================================
+
+class MigrationRunner:
+    """Applique les migrations en attente d'une base, dans l'ordre des versions"""
+
+    def __init__(self, db_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+
+    def _ensure_tables(self, conn: sqlite3.Connection) -> None:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                version INTEGER NOT NULL,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                description TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migration_progress (
+                name TEXT NOT NULL,
+                step TEXT NOT NULL,
+                phase TEXT NOT NULL,
+                last_key TEXT,
+                rows_done INTEGER DEFAULT 0,
+                total_rows INTEGER DEFAULT 0,
+                updated_at TIMESTAMP,
+                PRIMARY KEY (name, step)
+            )
+        ''')
+
+    @staticmethod
+    def _current_version(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT MAX(version) as version FROM schema_version").fetchone()
+        return row['version'] or 0
+
+    def current_version(self) -> int:
+        conn = connect(self.db_path)
+        try:
+            self._ensure_tables(conn)
+            return self._current_version(conn)
+        finally:
+            conn.close()
+
+    def pending(self, target: Optional[int] = None) -> List[Migration]:
+        current = self.current_version()
+        return [m for m in get_migrations() if current < m.version <= (target or latest_version())]
+
+    def run(self, target: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Applique les migrations en attente ; s'arrête à la première en échec (non enregistrée)"""
+        report = []
+        conn = connect(self.db_path)
+        try:
+            self._ensure_tables(conn)
+            for m in get_migrations():
+                if m.version > (target or latest_version()):
+                    break
+                ctx = MigrationContext(conn, f"v{m.version}", self.chunk_size, self.progress_callback)
+                t0 = time.perf_counter()
+                try:
+                    if m.transactional:
+                        conn.execute("BEGIN IMMEDIATE")
+                        # Revérifiée sous verrou : un autre processus a pu l'appliquer entre-temps
+                        if self._current_version(conn) >= m.version:
+                            conn.execute("ROLLBACK")
+                            continue
+                        m.apply(ctx)
+                    else:
+                        if self._current_version(conn) >= m.version:
+                            continue
+                        m.apply(ctx)
+                        conn.execute("BEGIN IMMEDIATE")
+                    duree_ms = (time.perf_counter() - t0) * 1000
+                    conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                                 (m.version, f"v{m.version} - {m.description} ({duree_ms:.0f} ms)"))
+                    conn.execute("COMMIT")
+                except Exception as e:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    logger.error(f"❌ Migration v{m.version} ({m.description}) en échec : {e}")
+                    report.append({'version': m.version, 'description': m.description, 'status': 'ERREUR',
+                                   'error': str(e), 'duration_ms': (time.perf_counter() - t0) * 1000})
+                    break
+                logger.info(f"✅ Migration v{m.version} appliquée : {m.description} ({duree_ms:.0f} ms)")
+                report.append({'version': m.version, 'description': m.description, 'status': 'OK',
+                               'rows': ctx.rows_processed, 'duration_ms': duree_ms})
+        finally:
+            conn.close()
+        return report
+
+    def dry_run(self, target: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Durée estimée des migrations en attente, mesurée sur une copie de la base"""
+        return on_snapshot(self.db_path, lambda copie: MigrationRunner(copie, self.chunk_size).run(target))
+
+
+def on_snapshot(db_path: str, fn: Callable[[str], Any]) -> Any:
+    """Exécute fn(chemin) sur une copie cohérente (API de sauvegarde SQLite) de la base, supprimée ensuite"""
+    dossier = tempfile.mkdtemp(prefix="erp_dry_run_")
+    copie = os.path.join(dossier, os.path.basename(db_path))
+    try:
+        source = sqlite3.connect(db_path)
+        destination = sqlite3.connect(copie)
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
+        return fn(copie)
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+
+def run_migrations_once(db_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+    """Migrations en attente, au plus une fois par processus et par base"""
+    key = os.path.abspath(db_path)
+    with _run_lock:
+        if key in _MIGRATED_PATHS:
+            return []
+        report = MigrationRunner(db_path, chunk_size).run()
+        if all(r['status'] == 'OK' for r in report):
+            _MIGRATED_PATHS.add(key)
+        return report
+
+
+def start_background_migration(key: str, fn: Callable[[], Any]) -> threading.Thread:
+    """Lance fn dans un thread (un seul par clé) pour ne pas bloquer la requête web"""
+    with _run_lock:
+        thread = _background_threads.get(key)
+        if thread and thread.is_alive():
+            return thread
+        thread = threading.Thread(target=fn, name=f"migration-{key}", daemon=True)
+        _background_threads[key] = thread
+        thread.start()
+        return thread
+
+
+def get_progress(db_path: str, name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Progression enregistrée des étapes par lots (toutes, ou d'une migration)"""
+    conn = connect(db_path)
+    try:
+        MigrationRunner(db_path)._ensure_tables(conn)
+        if name:
+            rows = conn.execute("SELECT * FROM schema_migration_progress WHERE name = ? ORDER BY step", (name,))
+        else:
+            rows = conn.execute("SELECT * FROM schema_migration_progress ORDER BY name, step")
+        return [dict(row) for row in rows.fetchall()]
+    finally:
+        conn.close()
+
+
+# =========================================================================
+# CONVERSION DES ID DE PROJETS (INTEGER -> TEXT), À LA DEMANDE
+# =========================================================================
+
+# Tables portant un project_id à convertir avec la table projects
+PROJECT_ID_TABLES = ('project_assignments', 'operations', 'materials', 'time_entries', 'formulaires', 'project_attachments')
+
+
+def projects_need_text_ids(db_path: str) -> bool:
+    """Vrai si projects.id est encore INTEGER"""
+    if not os.path.exists(db_path):
+        return False
+    conn = connect(db_path)
+    try:
+        colonnes = conn.execute("PRAGMA table_info(projects)").fetchall()
+        return any(col['name'] == 'id' and (col['type'] or '').upper() == 'INTEGER' for col in colonnes)
+    finally:
+        conn.close()
+
+
+def migrate_projects_to_text_ids(db_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Convertit projects.id en TEXT (ID alphanumériques) par reconstruction en
+    ligne, puis les project_id des tables liées par lots. Reprend là où une
+    exécution interrompue s'était arrêtée ; sans effet si déjà converti.
+    """
+    t0 = time.perf_counter()
+    conn = connect(db_path)
+    try:
+        MigrationRunner(db_path)._ensure_tables(conn)
+        ctx = MigrationContext(conn, 'projects_text_ids', chunk_size, progress_callback)
+        if projects_need_text_ids(db_path):
+            ctx.rebuild_table(
+                'projects',
+                lambda sql: re.sub(r'\bid\s+INTEGER\s+PRIMARY\s+KEY(\s+AUTOINCREMENT)?', 'id TEXT PRIMARY KEY',
+                                   sql, count=1, flags=re.IGNORECASE),
+                {'id': "CAST({row}.id AS TEXT)"}
+            )
+        lignes_liees = {}
+        for table in PROJECT_ID_TABLES:
+            # Une colonne déclarée INTEGER reconvertirait aussitôt le texte en entier (affinité) :
+            # seules les colonnes sans affinité numérique sont converties
+            types = {col['name']: (col['type'] or '').upper() for col in ctx.query(f"PRAGMA table_info({table})")}
+            if 'project_id' in types and 'INT' not in types['project_id']:
+                lignes_liees[table] = ctx.update_in_chunks(
+                    table, "project_id = CAST(project_id AS TEXT)", "project_id IS NOT NULL AND typeof(project_id) != 'text'"
+                )
+        return {'status': 'OK', 'rows': ctx.rows_processed, 'tables_liees': lignes_liees,
+                'duration_ms': (time.perf_counter() - t0) * 1000}
+    except Exception as e:
+        logger.error(f"❌ Conversion des ID de projets : {e}")
+        return {'status': 'ERREUR', 'error': str(e), 'duration_ms': (time.perf_counter() - t0) * 1000}
+    finally:
+        conn.close()
+
+
+# =========================================================================
+# MIGRATIONS (ex-blocs de ERPDatabase.upgrade_schema)
+# =========================================================================
+
+@migration(1, "Corrections colonnes projects")
+def _v1_colonnes_projects(ctx: MigrationContext) -> None:
+    ctx.add_column('projects', 'date_debut_reel', 'DATE')
+    ctx.add_column('projects', 'date_fin_reel', 'DATE')
+
+
+@migration(2, "Tables BT spécialisées")
+def _v2_tables_bt(ctx: MigrationContext) -> None:
+    ctx.execute('''
+        CREATE TABLE IF NOT EXISTS bt_assignations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bt_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            assigned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            role_assignment TEXT DEFAULT 'Exécutant',
+            FOREIGN KEY (bt_id) REFERENCES formulaires(id),
+            FOREIGN KEY (employee_id) REFERENCES employees(id)
+        )
+    ''')
+    ctx.execute('''
+        CREATE TABLE IF NOT EXISTS bt_reservations_postes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bt_id INTEGER NOT NULL,
+            work_center_id INTEGER NOT NULL,
+            reserved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            duration_hours REAL DEFAULT 0,
+            FOREIGN KEY (bt_id) REFERENCES formulaires(id),
+            FOREIGN KEY (work_center_id) REFERENCES work_centers(id)
+        )
+    ''')
+
+
+@migration(3, "Colonnes formulaire_bt_id")
+def _v3_formulaire_bt_id(ctx: MigrationContext) -> None:
+    ctx.add_column('time_entries', 'formulaire_bt_id', 'INTEGER')
+    ctx.add_column('operations', 'formulaire_bt_id', 'INTEGER')
+
+
+@migration(4, "Index BT et valeurs par défaut des projets", transactional=False)
+def _v4_index_et_nettoyage(ctx: MigrationContext) -> None:
+    ctx.create_index('idx_time_entries_bt_id', 'time_entries', 'formulaire_bt_id')
+    ctx.create_index('idx_operations_bt_id', 'operations', 'formulaire_bt_id')
+    ctx.create_index('idx_bt_assignations_bt_id', 'bt_assignations', 'bt_id')
+    ctx.create_index('idx_bt_reservations_bt_id', 'bt_reservations_postes', 'bt_id')
+    ctx.update_in_chunks('projects', "statut = 'À FAIRE'", "statut IS NULL OR statut = ''")
+    ctx.update_in_chunks('projects', "priorite = 'MOYEN'", "priorite IS NULL OR priorite = ''")
+
+
+@migration(5, "Index de performance et cohérence des statuts", transactional=False)
+def _v5_index_et_statuts(ctx: MigrationContext) -> None:
+    # Les colonnes et tables de v1-v3 sont revérifiées par ces migrations elles-mêmes
+    ctx.create_index('idx_projects_client_id', 'projects', 'client_company_id')
+    ctx.create_index('idx_time_entries_employee', 'time_entries', 'employee_id')
+    ctx.create_index('idx_operations_project', 'operations', 'project_id')
+    ctx.create_index('idx_formulaires_type', 'formulaires', 'type_formulaire')
+    ctx.update_in_chunks('employees', "statut = 'ACTIF'", "statut IS NULL OR statut = ''")
+    ctx.update_in_chunks('work_centers', "statut = 'ACTIF'", "statut IS NULL OR statut = ''")
+    ctx.update_in_chunks('formulaires', "statut = 'BROUILLON'", "statut IS NULL OR statut = ''")
+
+
+@migration(6, "Fonctionnalités CRM (calendrier, workflows)")
+def _v6_crm_workflows(ctx: MigrationContext) -> None:
+    ctx.add_column('interactions', 'opportunity_id', 'INTEGER')
+    ctx.add_column('opportunities', 'date_derniere_activite', 'DATETIME')
+    ctx.add_column('opportunities', 'projet_id', 'INTEGER')
+    ctx.add_column('opportunities', 'converted_at', 'DATETIME')
+    ctx.add_column('crm_activities', 'projet_id', 'INTEGER')
+    ctx.add_column('crm_activities', 'rappel', 'BOOLEAN DEFAULT FALSE')
+    ctx.add_column('crm_activities', 'rappel_envoye', 'BOOLEAN DEFAULT FALSE')
+
+    ctx.execute('''
+        CREATE TABLE IF NOT EXISTS calendar_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            interaction_id INTEGER,
+            activity_id INTEGER,
+            opportunity_id INTEGER,
+            projet_id INTEGER,
+            titre TEXT NOT NULL,
+            description TEXT,
+            date_debut DATETIME NOT NULL,
+            date_fin DATETIME NOT NULL,
+            type_event TEXT CHECK(type_event IN
+                ('INTERACTION', 'ACTIVITE', 'OPPORTUNITE', 'PROJET', 'AUTRE')),
+            all_day BOOLEAN DEFAULT FALSE,
+            lieu TEXT,
+            couleur TEXT,
+            rappel_minutes INTEGER,
+            recurrence_rule TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (interaction_id) REFERENCES interactions(id) ON DELETE CASCADE,
+            FOREIGN KEY (activity_id) REFERENCES crm_activities(id) ON DELETE CASCADE,
+            FOREIGN KEY (opportunity_id) REFERENCES opportunities(id) ON DELETE CASCADE,
+            FOREIGN KEY (projet_id) REFERENCES projects(id) ON DELETE CASCADE
+        )
+    ''')
+    ctx.execute('''
+        CREATE TABLE IF NOT EXISTS workflow_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom TEXT NOT NULL,
+            description TEXT,
+            entite_type TEXT CHECK(entite_type IN
+                ('OPPORTUNITY', 'INTERACTION', 'ACTIVITY', 'PROJECT')),
+            trigger_event TEXT NOT NULL,
+            trigger_conditions_json TEXT,
+            actions_json TEXT NOT NULL,
+            actif BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    ctx.execute('''
+        CREATE TABLE IF NOT EXISTS workflow_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            workflow_rule_id INTEGER,
+            entite_type TEXT,
+            entite_id INTEGER,
+            trigger_event TEXT,
+            actions_executed TEXT,
+            status TEXT CHECK(status IN ('SUCCESS', 'FAILED', 'PARTIAL')),
+            error_message TEXT,
+            executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (workflow_rule_id) REFERENCES workflow_rules(id)
+        )
+    ''')
+
+    ctx.create_index('idx_interactions_opportunity', 'interactions', 'opportunity_id')
+    ctx.create_index('idx_opportunities_last_activity', 'opportunities', 'date_derniere_activite')
+    ctx.create_index('idx_calendar_events_dates', 'calendar_events', 'date_debut, date_fin')
+    ctx.create_index('idx_calendar_events_interaction', 'calendar_events', 'interaction_id')
+    ctx.create_index('idx_calendar_events_activity', 'calendar_events', 'activity_id')
+    ctx.create_index('idx_workflow_logs_rule', 'workflow_logs', 'workflow_rule_id')
+
+    # Règles par défaut, une seule fois (workflow_rules n'a pas de contrainte d'unicité sur le nom)
+    for nom, description, entite_type, trigger_event, conditions, actions in (
+        ('Auto-tâches changement étape opportunité', "Crée automatiquement des tâches lors du changement d'étape",
+         'OPPORTUNITY', 'STATUS_CHANGED', '{}', '{"action": "CREATE_STAGE_TASKS"}'),
+        ('Suivi automatique après interaction', 'Crée une activité de suivi après chaque interaction',
+         'INTERACTION', 'CREATED', '{"has_followup_date": true}', '{"action": "CREATE_FOLLOWUP_ACTIVITY"}'),
+    ):
+        ctx.execute('''
+            INSERT INTO workflow_rules (nom, description, entite_type, trigger_event, trigger_conditions_json, actions_json)
+            SELECT ?, ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM workflow_rules WHERE nom = ?)
+        ''', (nom, description, entite_type, trigger_event, conditions, actions, nom))
+
+
+@migration(7, "Index de dates des rapports mensuels")
+def _v7_index_dates_rapports(ctx: MigrationContext) -> None:
+    # Balayages par plage de monthly_reports (formulaires.date_creation et time_entries.punch_in déjà indexés)
+    ctx.create_index('idx_projects_updated_at', 'projects', 'updated_at')
+    ctx.create_index('idx_inventory_history_created_at', 'inventory_history', 'created_at')
+    ctx.create_index('idx_bt_assignations_date', 'bt_assignations', 'date_assignation')
+    ctx.create_index('idx_materials_created_at', 'materials', 'created_at')
+    ctx.create_index('idx_operations_created_at', 'operations', 'created_at')
+
+
+@migration(8, "Index de pagination des listes")
+def _v8_index_pagination(ctx: MigrationContext) -> None:
+    # Curseurs keyset de list_pagination : (expression de tri, id) dans l'ordre de l'index
+    colonnes = set(ctx.columns('formulaires')) if ctx.table_exists('formulaires') else set()
+    for name, column in (('idx_formulaires_type_created', 'created_at'),
+                         ('idx_formulaires_type_date_creation', 'date_creation')):
+        if {'type_formulaire', column} <= colonnes:
+            ctx.execute(f"CREATE INDEX IF NOT EXISTS {name} ON formulaires(type_formulaire, COALESCE({column}, ''), id)")
+    ctx.create_index('idx_inventory_nom_id', 'inventory_items', 'nom, id')
+
+
+@migration(9, "Index de la timeline CRM")
+def _v9_index_timeline_crm(ctx: MigrationContext) -> None:
+    # Flux de crm_timeline : (filtre, COALESCE(date, ''), id) dans l'ordre de l'index
+    for table, prefix, column in (('interactions', 'idx_interactions', 'date_interaction'),
+                                  ('crm_activities', 'idx_crm_activities', 'date_activite'),
+                                  ('opportunities', 'idx_opportunities', 'created_at')):
+        colonnes = set(ctx.columns(table)) if ctx.table_exists(table) else set()
+        if column not in colonnes:
+            continue
+        date_sort = f"COALESCE({column}, ''), id"
+        ctx.execute(f"CREATE INDEX IF NOT EXISTS {prefix}_timeline ON {table}({date_sort})")
+        for filtre in ('company_id', 'contact_id'):
+            if filtre in colonnes:
+                ctx.execute(f"CREATE INDEX IF NOT EXISTS {prefix}_{filtre.split('_')[0]}_timeline "
+                            f"ON {table}({filtre}, {date_sort})")
+
+
+
+# Tables consultées par les assistants IA : leur version invalide le cache des réponses (answer_cache)
+VERSIONED_TABLES = ('projects', 'companies', 'contacts', 'employees', 'inventory_items', 'inventory_history',
+                    'operations', 'materials', 'time_entries', 'formulaires', 'formulaire_lignes',
+                    'work_centers', 'project_assignments', 'opportunities', 'interactions')
+
+
+@migration(10, "Compteurs de version des tables (cache des réponses IA)")
+def _v10_versions_tables(ctx: MigrationContext) -> None:
+    ctx.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in VERSIONED_TABLES:
+        if ctx.table_exists(table):
+            create_version_triggers(ctx.execute, table)
+
+
+def create_version_triggers(execute: Callable[..., Any], table: str) -> None:
+    """
+    Compteur data_versions et déclencheurs INSERT / UPDATE / DELETE d'une table.
+    execute(sql, params) : MigrationContext.execute, sqlite3.Connection.execute ou
+    ERPDatabase.execute_update (tables créées après les migrations, comme produits).
+    """
+    execute("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)", (table,))
+    for evenement in ('INSERT', 'UPDATE', 'DELETE'):
+        execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{evenement.lower()}
+            AFTER {evenement} ON {table}
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+            END
+        """, ())
+
+
+# Tables lues par l'index de recherche de l'assistant (erp_retrieval) ; produits est créée
+# par GestionnaireProduits, qui pose ses déclencheurs lui-même si elle n'existe pas encore ici
+VERSIONED_TABLES_V11 = ('produits', 'employee_competences')
+
+
+@migration(11, "Compteurs de version de produits et des compétences")
+def _v11_versions_produits_competences(ctx: MigrationContext) -> None:
+    for table in VERSIONED_TABLES_V11:
+        if ctx.table_exists(table):
+            create_version_triggers(ctx.execute, table)
+
+
+# =========================================================================
+# LIGNE DE COMMANDE
+# =========================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migrations de schéma de la base ERP")
+    parser.add_argument('db_path', nargs='?', default="erp_production_dg.db")
+    parser.add_argument('--dry-run', action='store_true', help="mesure les migrations sur une copie de la base")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--projects-text-ids', action='store_true', help="convertit aussi projects.id en TEXT")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    runner = MigrationRunner(args.db_path, args.chunk_size)
+    print(f"📋 Schéma v{runner.current_version()} / v{latest_version()} - "
+          f"{len(runner.pending())} migration(s) en attente")
+
+    def tout_migrer(chemin):
+        report = MigrationRunner(chemin, args.chunk_size).run()
+        if args.projects_text_ids:
+            report.append({'version': '-', 'description': 'projects.id en TEXT',
+                           **migrate_projects_to_text_ids(chemin, args.chunk_size)})
+        return report
+
+    report = on_snapshot(args.db_path, tout_migrer) if args.dry_run else tout_migrer(args.db_path)
+    for r in report:
+        print(f"  {'🧪' if args.dry_run else '✅' if r['status'] == 'OK' else '❌'} v{r['version']} "
+              f"{r['description']:<50} {r['status']:<6} {r['duration_ms']:8.0f} ms")
+    return 0 if all(r['status'] == 'OK' for r in report) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,233 @@
+# supplier_scorecards.py - Tableaux de bord de performance de tous les fournisseurs en une passe
+"""
+Moteur de performance fournisseurs (volume de commandes, ponctualité, retard).
+
+get_fournisseur_performance faisait deux requêtes d'agrégat pour un seul
+fournisseur : un classement de N fournisseurs coûtait 2N requêtes. Ici :
+- compute_scorecards() agrège les commandes (formulaires BA/BC) et les
+  livraisons (approvisionnements) une seule fois, GROUP BY entreprise, puis
+  joint ces deux agrégats aux fournisseurs : une requête pour tous ;
+- la fenêtre de dates est un paramètre lié (DATE('now', ?)) ;
+- refresh_snapshot() enregistre le résultat classé dans la table
+  fournisseur_scorecards ; get_scorecards() lit ce snapshot et ne le recalcule
+  que s'il est plus vieux que SNAPSHOT_MAX_AGE_MINUTES.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Formulaires comptés comme commandes passées au fournisseur
+TYPES_COMMANDE = ('BON_ACHAT', 'BON_COMMANDE')
+# Âge maximum du snapshot avant recalcul automatique
+SNAPSHOT_MAX_AGE_MINUTES = 30
+# Pondération du score global (sur 100)
+POIDS_PONCTUALITE = 0.5
+POIDS_QUALITE = 0.3
+POIDS_RETARD = 0.2
+# Retard moyen (jours) au-delà duquel la composante retard vaut 0
+RETARD_MAX_JOURS = 10
+
+SCORECARD_COLUMNS = (
+    'fournisseur_id', 'company_id', 'nom', 'code_fournisseur', 'categorie_produits', 'evaluation_qualite',
+    'est_actif', 'total_commandes', 'montant_total', 'montant_moyen', 'premiere_commande', 'derniere_commande',
+    'total_livraisons', 'livraisons_temps', 'retard_moyen_jours', 'taux_ponctualite', 'score_global', 'rang'
+)
+
+
+def compute_score_global(taux_ponctualite: Optional[float], evaluation_qualite: Optional[float],
+                         retard_moyen_jours: Optional[float]) -> float:
+    """
+    Score sur 100 : ponctualité, note qualité (/10) et retard moyen. Sans
+    livraison mesurée, seule la note qualité compte.
+    """
+    qualite = min(max((evaluation_qualite or 0) / 10, 0.0), 1.0)
+    if taux_ponctualite is None:
+        return round(qualite * 100, 1)
+    retard = min(max(retard_moyen_jours or 0, 0.0), RETARD_MAX_JOURS)
+    score = (POIDS_PONCTUALITE * taux_ponctualite / 100
+             + POIDS_QUALITE * qualite
+             + POIDS_RETARD * (1 - retard / RETARD_MAX_JOURS))
+    return round(score * 100, 1)
+
+
+class SupplierScorecardEngine:
+    """Performance de tous les fournisseurs en une requête groupée, avec snapshot persistant."""
+
+    def __init__(self, db):
+        self.db = db
+        self._table_ready = False
+
+    # =========================================================================
+    # CALCUL
+    # =========================================================================
+
+    def compute_scorecards(self, days: int = 365, fournisseur_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Tableaux de bord classés (score décroissant) de tous les fournisseurs, ou des id donnés"""
+        window = f"-{int(days)} days"
+        types = ', '.join('?' * len(TYPES_COMMANDE))
+        params: List[Any] = [*TYPES_COMMANDE, window, window]
+
+        filtre_fournisseurs = ""
+        if fournisseur_ids is not None:
+            ids = list(fournisseur_ids)
+            if not ids:
+                return []
+            filtre_fournisseurs = f"WHERE fou.id IN ({', '.join('?' * len(ids))})"
+            params.extend(ids)
+
+        rows = self.db.execute_query(f'''
+            WITH commandes AS (
+                SELECT
+                    company_id,
+                    COUNT(*) as total_commandes,
+                    COALESCE(SUM(montant_total), 0) as montant_total,
+                    AVG(montant_total) as montant_moyen,
+                    MIN(date_creation) as premiere_commande,
+                    MAX(date_creation) as derniere_commande
+                FROM formulaires
+                WHERE type_formulaire IN ({types})
+                  AND company_id IS NOT NULL
+                  AND date_creation >= DATE('now', ?)
+                GROUP BY company_id
+            ),
+            livraisons AS (
+                SELECT
+                    f.company_id,
+                    COUNT(*) as total_livraisons,
+                    COUNT(CASE WHEN a.date_livraison_reelle <= a.date_livraison_prevue THEN 1 END) as livraisons_temps,
+                    AVG(JULIANDAY(a.date_livraison_reelle) - JULIANDAY(a.date_livraison_prevue)) as retard_moyen_jours
+                FROM approvisionnements a
+                JOIN formulaires f ON a.formulaire_id = f.id
+                WHERE a.date_livraison_reelle IS NOT NULL
+                  AND a.date_commande >= DATE('now', ?)
+                GROUP BY f.company_id
+            )
+            SELECT
+                fou.id as fournisseur_id,
+                fou.company_id,
+                c.nom,
+                fou.code_fournisseur,
+                fou.categorie_produits,
+                fou.evaluation_qualite,
+                fou.est_actif,
+                COALESCE(cmd.total_commandes, 0) as total_commandes,
+                COALESCE(cmd.montant_total, 0) as montant_total,
+                cmd.montant_moyen,
+                cmd.premiere_commande,
+                cmd.derniere_commande,
+                COALESCE(l.total_livraisons, 0) as total_livraisons,
+                COALESCE(l.livraisons_temps, 0) as livraisons_temps,
+                l.retard_moyen_jours
+            FROM fournisseurs fou
+            JOIN companies c ON c.id = fou.company_id
+            LEFT JOIN commandes cmd ON cmd.company_id = fou.company_id
+            LEFT JOIN livraisons l ON l.company_id = fou.company_id
+            {filtre_fournisseurs}
+        ''', tuple(params))
+
+        scorecards = []
+        for row in rows:
+            card = dict(row)
+            card['taux_ponctualite'] = (
+                card['livraisons_temps'] / card['total_livraisons'] * 100 if card['total_livraisons'] else None
+            )
+            card['score_global'] = compute_score_global(
+                card['taux_ponctualite'], card['evaluation_qualite'], card['retard_moyen_jours']
+            )
+            scorecards.append(card)
+
+        scorecards.sort(key=lambda c: (-c['score_global'], -c['total_commandes'], c['nom'] or ''))
+        for rang, card in enumerate(scorecards, 1):
+            card['rang'] = rang
+        return scorecards
+
+    # =========================================================================
+    # SNAPSHOT
+    # =========================================================================
+
+    def _ensure_snapshot_table(self) -> None:
+        if self._table_ready:
+            return
+        with self.db.get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fournisseur_scorecards (
+                    periode_jours INTEGER NOT NULL,
+                    fournisseur_id INTEGER NOT NULL,
+                    company_id INTEGER,
+                    nom TEXT,
+                    code_fournisseur TEXT,
+                    categorie_produits TEXT,
+                    evaluation_qualite INTEGER,
+                    est_actif BOOLEAN,
+                    total_commandes INTEGER DEFAULT 0,
+                    montant_total REAL DEFAULT 0.0,
+                    montant_moyen REAL,
+                    premiere_commande TIMESTAMP,
+                    derniere_commande TIMESTAMP,
+                    total_livraisons INTEGER DEFAULT 0,
+                    livraisons_temps INTEGER DEFAULT 0,
+                    retard_moyen_jours REAL,
+                    taux_ponctualite REAL,
+                    score_global REAL,
+                    rang INTEGER,
+                    calcule_le TIMESTAMP NOT NULL,
+                    PRIMARY KEY (periode_jours, fournisseur_id)
+                )
+            ''')
+            conn.commit()
+        self._table_ready = True
+
+    def refresh_snapshot(self, days: int = 365) -> List[Dict[str, Any]]:
+        """Recalcule et remplace le snapshot de la période en une transaction"""
+        self._ensure_snapshot_table()
+        scorecards = self.compute_scorecards(days)
+        calcule_le = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        colonnes = ', '.join(SCORECARD_COLUMNS)
+        with self.db.get_connection() as conn:
+            conn.execute("DELETE FROM fournisseur_scorecards WHERE periode_jours = ?", (days,))
+            conn.executemany(
+                f"INSERT INTO fournisseur_scorecards (periode_jours, {colonnes}, calcule_le) "
+                f"VALUES (?, {', '.join('?' * len(SCORECARD_COLUMNS))}, ?)",
+                [(days, *(card[col] for col in SCORECARD_COLUMNS), calcule_le) for card in scorecards]
+            )
+            conn.commit()
+        for card in scorecards:
+            card['calcule_le'] = calcule_le
+        logger.info(f"🏆 Scorecards fournisseurs ({days} j) recalculés : {len(scorecards)} fournisseurs")
+        return scorecards
+
+    def get_snapshot_age(self, days: int = 365) -> Optional[timedelta]:
+        """Âge du snapshot de la période, None s'il n'existe pas"""
+        self._ensure_snapshot_table()
+        rows = self.db.execute_query(
+            "SELECT MAX(calcule_le) as calcule_le FROM fournisseur_scorecards WHERE periode_jours = ?", (days,)
+        )
+        if not rows or not rows[0]['calcule_le']:
+            return None
+        return datetime.now() - datetime.fromisoformat(rows[0]['calcule_le'])
+
+    def get_scorecards(self, days: int = 365, max_age_minutes: int = SNAPSHOT_MAX_AGE_MINUTES,
+                       force_refresh: bool = False) -> List[Dict[str, Any]]:
+        """Snapshot classé de la période, recalculé s'il est absent ou trop ancien"""
+        try:
+            age = None if force_refresh else self.get_snapshot_age(days)
+            if age is None or age > timedelta(minutes=max_age_minutes):
+                return self.refresh_snapshot(days)
+            rows = self.db.execute_query(
+                "SELECT * FROM fournisseur_scorecards WHERE periode_jours = ? ORDER BY rang", (days,)
+            )
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"❌ Erreur scorecards fournisseurs: {e}")
+            return []
+
+    def invalidate_snapshot(self, days: Optional[int] = None) -> None:
+        """Force le recalcul au prochain get_scorecards (une période ou toutes)"""
+        self._ensure_snapshot_table()
+        if days is None:
+            self.db.execute_update("DELETE FROM fournisseur_scorecards")
+        else:
+            self.db.execute_update("DELETE FROM fournisseur_scorecards WHERE periode_jours = ?", (days,))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# test_ai_batch.py - Tests des créations en lot par l'IA
+# ERP Production DG Inc.
+
+"""
+Vérifie que ai_batch.py envoie les requêtes d'un lot en parallèle (dans la
+limite de concurrence, résultats dans l'ordre des demandes), reprend les
+réponses 429 / 529 et pas les erreurs de requête, valide toutes les
+réponses (JSON entouré de texte accepté, réponses invalides écartées) et
+écrit les fiches valides dans une seule transaction, annulée en entier à
+la moindre erreur SQL.
+Les appels passent par l'API Messages simulée de fake_anthropic_server.py.
+Lancé directement, le script compare la création de 20 fiches une à une et
+en lot.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+import ai_batch
+from ai_batch import STATUT_CREE, STATUT_ERREUR, STATUT_INVALIDE, STATUT_OK, create_batch, parse_json_object, \
+    run_requests
+from erp_database import ERPDatabase
+from fake_anthropic_server import FakeMessagesServer, MessagesHTTPClient
+
+MODELE = 'claude-sonnet-4-20250514'
+
+
+def requete(demande):
+    return dict(model=MODELE, max_tokens=200, messages=[{'role': 'user', 'content': demande}])
+
+
+def valider(objet):
+    if not objet.get('nom'):
+        raise ValueError("nom manquant")
+    return {'nom': objet['nom']}
+
+
+def inserer(conn, donnees):
+    return conn.execute("INSERT INTO fiches (nom) VALUES (?)", (donnees['nom'],)).lastrowid
+
+
+def base_fiches():
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_lot_ia_"), "lot.db"))
+    with db.get_connection() as conn:
+        conn.execute("CREATE TABLE fiches (id INTEGER PRIMARY KEY, nom TEXT UNIQUE NOT NULL)")
+        conn.commit()
+    return db
+
+
+def test_requetes_simultanees_et_reprise():
+    """Concurrence bornée, ordre conservé, reprise sur 429 / 529, pas sur 400"""
+    ai_batch.BACKOFF_SECONDS, backoff = 0.01, ai_batch.BACKOFF_SECONDS
+    try:
+        regles = [(rf'\bfiche {i}\b', f"Réponse {i}") for i in range(8)]
+        with FakeMessagesServer(latency_ms=200, tokens_per_second=0, rules=regles) as server:
+            client = MessagesHTTPClient(server.url)
+            t0 = time.perf_counter()
+            resultats = run_requests(client, [requete(f"fiche {i}") for i in range(8)], max_concurrency=4)
+            duree = time.perf_counter() - t0
+            assert [r['texte'] for r in resultats] == [f"Réponse {i}" for i in range(8)]
+            assert 0.4 <= duree < 1.2, duree  # deux vagues de 4, pas huit appels à la suite
+
+            server.fail_next(429)
+            server.fail_next(529)
+            resultats = run_requests(client, [requete(f"fiche {i}") for i in range(3)], max_concurrency=3)
+            assert all(r['statut'] == STATUT_OK for r in resultats)
+            assert sum(r['tentatives'] for r in resultats) == 5
+
+            mauvaise = dict(model=MODELE, max_tokens=10, messages=[])
+            erreur = run_requests(client, [mauvaise])[0]
+            assert erreur['statut'] == STATUT_ERREUR and '400' in erreur['erreur']
+            assert len(server.requests) == 8 + 5
+    finally:
+        ai_batch.BACKOFF_SECONDS = backoff
+    print("✅ Requêtes simultanées et reprise")
+
+
+def test_validation_et_transaction():
+    """Réponses validées d'abord ; fiches valides écrites ensemble ; erreur SQL : tout le lot annulé"""
+    assert parse_json_object('Voici :\n```json\n{"nom": "Beta"}\n```') == {'nom': 'Beta'}
+    db = base_fiches()
+    regles = [(r'alpha', '{"nom": "Alpha"}'), (r'beta', 'Voici :\n```json\n{"nom": "Beta"}\n```'),
+              (r'vide', "Je n'ai pas compris"), (r'anonyme', '{"prix": 12}'), (r'gamma', '{"nom": "Gamma"}')]
+    with FakeMessagesServer(rules=regles) as server:
+        client = MessagesHTTPClient(server.url)
+        lot = create_batch(client, db, ['alpha', 'vide', 'beta', 'anonyme'], requete, valider, inserer)
+        assert lot['success'] and (lot['nb_crees'], lot['nb_echecs']) == (2, 2)
+        assert [r['statut'] for r in lot['resultats']] == [STATUT_CREE, STATUT_INVALIDE, STATUT_CREE, STATUT_INVALIDE]
+        assert [r['demande'] for r in lot['resultats']] == ['alpha', 'vide', 'beta', 'anonyme']
+        noms = {r['id']: r['nom'] for r in db.execute_query("SELECT id, nom FROM fiches")}
+        assert noms == {lot['resultats'][0]['id']: 'Alpha', lot['resultats'][2]['id']: 'Beta'}
+
+        # 'Alpha' existe déjà : la contrainte UNIQUE échoue et 'Gamma' n'est pas écrit non plus
+        lot = create_batch(client, db, ['gamma', 'alpha'], requete, valider, inserer)
+        assert not lot['success'] and lot['nb_crees'] == 0 and 'annulée' in lot['error']
+        assert {r['statut'] for r in lot['resultats']} == {STATUT_ERREUR}
+        assert db.get_table_count('fiches') == 2
+    print("✅ Validation et transaction")
+
+
+def benchmark_lot(nb_fiches=20, latence_ms=300):
+    """Création de nb_fiches une à une (un appel puis un INSERT à la fois) puis en lot"""
+    db = base_fiches()
+    with FakeMessagesServer(latency_ms=latence_ms, tokens_per_second=0, default_text='{"nom": "x"}') as server:
+        client = MessagesHTTPClient(server.url)
+        print(f"📊 Benchmark: {nb_fiches} fiches, {latence_ms} ms par appel Claude")
+        t0 = time.perf_counter()
+        for i in range(nb_fiches):
+            client.messages.create(**requete(f"fiche {i}"))
+            db.execute_insert("INSERT INTO fiches (nom) VALUES (?)", (f"une à une {i}",))
+        print(f"  {'Une à une':<28} {time.perf_counter() - t0:8.2f} s")
+        for concurrence in (4, 10, 20):
+            noms = iter(range(nb_fiches))
+            t0 = time.perf_counter()
+            lot = create_batch(client, db, [f"fiche {i}" for i in range(nb_fiches)], requete,
+                               lambda objet: {'nom': f"lot {concurrence}-{next(noms)}"}, inserer,
+                               max_concurrency=concurrence)
+            assert lot['nb_crees'] == nb_fiches
+            print(f"  {f'En lot ({concurrence} simultanés)':<28} {time.perf_counter() - t0:8.2f} s")
+
+
+if __name__ == "__main__":
+    test_requetes_simultanees_et_reprise()
+    test_validation_et_transaction()
+    benchmark_lot()
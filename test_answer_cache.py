@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# test_answer_cache.py - Tests du cache des réponses de l'assistant IA
+# ERP Production DG Inc.
+
+"""
+Vérifie que answer_cache.py retrouve une réponse pour la même question
+formulée autrement (clé normalisée) ou approchante (typo), jamais pour un
+autre numéro de projet ni une autre portée, applique TTL et éviction LRU,
+et que l'empreinte des données (compteurs data_versions de la migration v10,
+ou COUNT/MAX(rowid) sur une ancienne base) change à chaque écriture dans une
+table consultée, ce qui périme les réponses.
+Lancé directement, le script mesure le coût d'une question répétée servie
+par le cache (empreinte + recherche).
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from answer_cache import MATCH_EXACT, MATCH_FUZZY, AnswerCache, data_fingerprint, get_answer_cache, \
+    normalize_question
+from erp_database import ERPDatabase
+
+TABLES = ('projects', 'inventory_items', 'employees')
+
+
+def creer_base():
+    return ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_answer_cache_"), "cache.db"))
+
+
+def test_cles_exactes_et_approchees():
+    """Variantes de forme = même clé ; typo = approchée ; autres numéros ou portées = absentes"""
+    assert normalize_question("Quels sont les projets en retard ?") == normalize_question("projets en retard")
+    assert normalize_question("Ruptures de stock") == normalize_question("rupture du stock, svp")
+    assert normalize_question("Projets pas en retard") != normalize_question("Projets en retard")
+
+    cache = AnswerCache()
+    cache.put("Quels sont les projets en retard ?", 'fp1', "3 projets en retard", scope='s')
+    hit = cache.get("Les projets en retard", 'fp1', scope='s')
+    assert hit['answer'] == "3 projets en retard" and hit['match'] == MATCH_EXACT
+    hit = cache.get("projet en retar", 'fp1', scope='s')
+    assert hit['match'] == MATCH_FUZZY and 0.88 <= hit['similarity'] < 1
+    assert cache.get("projets en retard", 'fp1', scope='autre') is None
+    assert cache.get("charge de travail cette semaine", 'fp1', scope='s') is None
+
+    cache.put("Statut du projet 24-001", 'fp1', "Projet 24-001 : en cours", scope='s')
+    assert cache.get("statut projet 24-001", 'fp1', scope='s')['match'] == MATCH_EXACT
+    assert cache.get("Statut du projet 24-002", 'fp1', scope='s') is None
+    stats = cache.stats()
+    assert stats['exact_hits'] == 2 and stats['fuzzy_hits'] == 1 and stats['misses'] == 3
+    print("✅ Clés exactes et approchées")
+
+
+def test_ttl_et_lru():
+    """Expiration après ttl, éviction de la réponse la moins récemment utilisée"""
+    maintenant = [1000.0]
+    cache = AnswerCache(ttl=60, max_entries=2, clock=lambda: maintenant[0])
+    cache.put("ruptures de stock", 'fp', "R")
+    cache.put("projets en retard", 'fp', "P")
+    assert cache.get("ruptures de stock", 'fp')  # « ruptures » redevient la plus récente
+    cache.put("charge de travail", 'fp', "C")
+    assert cache.get("projets en retard", 'fp') is None
+    assert cache.get("ruptures de stock", 'fp') and cache.get("charge de travail", 'fp')
+    maintenant[0] += 61
+    assert cache.get("ruptures de stock", 'fp') is None
+    stats = cache.stats()
+    assert stats['evicted'] == 1 and stats['expired'] == 2 and stats['entries'] == 0
+    print("✅ TTL et LRU")
+
+
+def test_empreinte_et_invalidation():
+    """Toute écriture dans une table consultée change l'empreinte et périme la réponse"""
+    db = creer_base()
+    versions = {r['table_name'] for r in db.execute_query("SELECT table_name FROM data_versions")}
+    assert set(TABLES) <= versions
+    empreintes = [data_fingerprint(db, TABLES)]
+    assert data_fingerprint(db, TABLES) == empreintes[0]
+    projet_id = db.execute_insert("INSERT INTO projects (nom_projet, statut) VALUES ('A', 'EN COURS')")
+    empreintes.append(data_fingerprint(db, TABLES))
+    db.execute_update("UPDATE projects SET statut = 'TERMINÉ' WHERE id = ?", (projet_id,))
+    empreintes.append(data_fingerprint(db, TABLES))
+    db.execute_update("DELETE FROM projects WHERE id = ?", (projet_id,))
+    empreintes.append(data_fingerprint(db, TABLES))
+    assert len(set(empreintes)) == 4
+    # Table non consultée : empreinte inchangée
+    db.execute_insert("INSERT INTO companies (nom) VALUES ('Autre')")
+    assert data_fingerprint(db, TABLES) == empreintes[-1]
+
+    cache = get_answer_cache(db)
+    assert get_answer_cache(db) is cache
+    cache.put("projets en retard", empreintes[-1], "Aucun")
+    assert cache.get("projets en retard", data_fingerprint(db, TABLES))
+    db.execute_insert("INSERT INTO projects (nom_projet, statut) VALUES ('B', 'EN COURS')")
+    assert cache.get("projets en retard", data_fingerprint(db, TABLES)) is None
+    assert cache.stats()['invalidated'] == 1 and cache.stats()['entries'] == 0
+    print("✅ Empreinte et invalidation")
+
+
+def test_empreinte_ancienne_base():
+    """Sans data_versions : COUNT(*) et MAX(rowid), tables absentes tolérées"""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE projects (id INTEGER PRIMARY KEY, nom TEXT)")
+
+    class BaseAncienne:
+        def execute_query(self, query, params=None):
+            return [dict(r) for r in conn.execute(query, params or ())]
+
+    base = BaseAncienne()
+    avant = data_fingerprint(base, ('projects', 'table_absente'))
+    conn.execute("INSERT INTO projects (nom) VALUES ('A')")
+    assert data_fingerprint(base, ('projects', 'table_absente')) != avant
+    print("✅ Empreinte sur une ancienne base")
+
+
+def benchmark_question_repetee(nb=2000):
+    """Question répétée : empreinte + recherche dans le cache, au lieu de la fouille et de l'appel à Claude"""
+    db = creer_base()
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO projects (nom_projet, statut) VALUES (?, 'EN COURS')",
+                     [(f"Projet {i}",) for i in range(20000)])
+    conn.commit()
+    conn.close()
+    cache = AnswerCache()
+    for i in range(200):
+        cache.put(f"question numéro {i} sur les projets", data_fingerprint(db, TABLES), "réponse")
+    cache.put("projets en retard", data_fingerprint(db, TABLES), "réponse")
+    print(f"📊 Benchmark: {nb} questions répétées, 201 réponses en cache")
+    t0 = time.perf_counter()
+    for _ in range(nb):
+        assert cache.get("Quels sont les projets en retard ?", data_fingerprint(db, TABLES))
+    print(f"  {'Réponse en cache (exacte)':<28} {(time.perf_counter() - t0) / nb * 1000:8.2f} ms / question")
+    t0 = time.perf_counter()
+    for _ in range(nb // 10):
+        assert cache.get("projet en retar", data_fingerprint(db, TABLES))
+    print(f"  {'Réponse en cache (approchée)':<28} {(time.perf_counter() - t0) / (nb // 10) * 1000:8.2f} ms / question")
+
+
+if __name__ == "__main__":
+    test_cles_exactes_et_approchees()
+    test_ttl_et_lru()
+    test_empreinte_et_invalidation()
+    test_empreinte_ancienne_base()
+    benchmark_question_repetee()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# test_assistant_ia.py - Tests des requêtes de l'assistant IA sur le schéma réel
+# ERP Production DG Inc.
+
+"""
+Vérifie que les requêtes de assistant_ia.py lisent les colonnes et tables que
+l'ERP crée vraiment, sur la base de démonstration du banc d'essai IA
+(ai_benchmark.seed_database) et le serveur Claude simulé :
+- les heures viennent de time_entries.total_hours, filtrées et triées sur
+  punch_in ;
+- les entrées et sorties d'inventaire se déduisent de inventory_history
+  (quantite_avant / quantite_apres) ;
+- le CRM lit opportunities et interactions, le type d'entreprise passe par
+  type_company tant que le CRM n'a pas ajouté type_entreprise ;
+- une écriture dans opportunities ou interactions invalide la réponse en
+  cache de la conversation ;
+- creer_devis_avec_ia enregistre le devis avec un numéro et ses lignes ;
+- creer/modifier_bon_travail_avec_ia enregistrent des priorités admises
+  par formulaires.
+Sans SDK anthropic installé, les tests sont sautés.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+import ai_benchmark
+from fake_anthropic_server import FakeMessagesServer, MessagesHTTPClient
+
+
+def preparer(nom_test):
+    """(db, ids, assistant) sur la base de démonstration ; None si assistant_ia n'est pas importable"""
+    try:
+        from assistant_ia import AssistantIAClaude
+    except ImportError as e:
+        print(f"⚠️ Test {nom_test} sauté - assistant_ia non importable : {e}")
+        return None
+    db, ids = ai_benchmark.seed_database()
+    return db, ids, AssistantIAClaude(db, api_key="cle-test")
+
+
+# =========================================================================
+# POINTAGES (time_entries)
+# =========================================================================
+
+def test_heures_des_pointages():
+    """Heures lues dans total_hours, périodes filtrées et triées sur punch_in"""
+    prepare = preparer("pointages")
+    if not prepare:
+        return
+    db, ids, assistant = prepare
+    projet, employe = ids['project'], ids['employee']
+    db.execute_update("""
+        INSERT INTO time_entries (employee_id, project_id, punch_in, punch_out, total_hours)
+        VALUES (?, ?, datetime('now', '-1 day'), datetime('now', '-1 day', '+6 hours'), 6.5)
+    """, (employe, projet))
+    attendu = db.execute_query("SELECT SUM(total_hours) as h FROM time_entries WHERE project_id = ?",
+                               (projet,))[0]['h']
+
+    projets = assistant._collecter_donnees_projets()['projets_actifs']
+    assert next(p for p in projets if p['id'] == projet)['heures_totales'] == attendu
+
+    production = assistant._collecter_donnees_production()['performance_employes']
+    assert [p['heures_totales'] for p in production] == [6.5]  # seul pointage des 30 derniers jours
+
+    charge = assistant._collecter_donnees_employes()['charge_travail']
+    assert next(e for e in charge if e['id'] == employe)['heures_semaine'] == 6.5
+
+    with FakeMessagesServer(default_text=ai_benchmark.ANALYSE) as server:
+        assistant.client = MessagesHTTPClient(server.url)
+        analyse = assistant.analyser_projet_specifique(str(projet))
+    assert analyse['success'], analyse
+    assert analyse['metriques']['heures_reelles'] == attendu
+    print("✅ Heures des pointages")
+
+
+# =========================================================================
+# INVENTAIRE (inventory_history)
+# =========================================================================
+
+def test_mouvements_inventaire():
+    """Entrées et sorties déduites des quantités avant/après de inventory_history"""
+    prepare = preparer("inventaire")
+    if not prepare:
+        return
+    db, ids, assistant = prepare
+    article = ids['inventaire']
+    for avant, apres in (('10', '15'), ('15', '12'), ('12', '12.5')):
+        db.execute_update("INSERT INTO inventory_history (inventory_item_id, action, quantite_avant, quantite_apres) "
+                          "VALUES (?, 'AJUSTEMENT', ?, ?)", (article, avant, apres))
+
+    mouvements = assistant._collecter_donnees_inventaire()['mouvements_frequents']
+    assert len(mouvements) == 1
+    assert mouvements[0]['item_id'] == article
+    assert mouvements[0]['nb_mouvements'] == 3
+    assert mouvements[0]['total_entrees'] == 5.5
+    assert mouvements[0]['total_sorties'] == 3
+    print("✅ Mouvements d'inventaire")
+
+
+# =========================================================================
+# CRM, DEVIS ET CONTEXTE PROJET
+# =========================================================================
+
+def test_requetes_crm_et_devis():
+    """opportunities, interactions, type d'entreprise et colonnes des devis et du projet"""
+    prepare = preparer("CRM et devis")
+    if not prepare:
+        return
+    db, ids, assistant = prepare
+    client = ids['company']
+    db.execute_update("INSERT INTO opportunities (nom, company_id, montant_estime, statut) VALUES "
+                      "('Passerelle B', ?, 40000, 'Proposition'), ('Escalier C', ?, 20000, 'Proposition')",
+                      (client, client))
+    db.execute_update("INSERT INTO opportunities (nom, company_id, montant_estime, statut, updated_at) VALUES "
+                      "('Réservoir D', ?, 15000, 'Négociation', datetime('now', '-10 days'))", (client,))
+
+    crm = assistant._collecter_donnees_crm()
+    propositions = next(o for o in crm['opportunites'] if o['statut'] == 'Proposition')
+    assert (propositions['nombre'], propositions['montant_total'], propositions['montant_moyen']) == (2, 60000, 30000)
+    assert sum(j['nb_interactions'] for j in crm['activite_commerciale']) == 4  # interactions de démonstration
+
+    suggestions = assistant.generer_suggestions_quotidiennes()
+    assert any(s['type'] == 'crm' and s['titre'].startswith("💼 1 ") for s in suggestions)
+
+    devis_recents = assistant._collecter_donnees_devis()['devis_recents']
+    assert {d['type_entreprise'] for d in devis_recents} == {'CLIENT'}
+    db.execute_update("ALTER TABLE companies ADD COLUMN type_entreprise TEXT")  # colonne ajoutée par le CRM
+    db.execute_update("UPDATE companies SET type_entreprise = 'Société d''État' WHERE id = ?", (client,))
+    devis_recents = assistant._collecter_donnees_devis()['devis_recents']
+    assert {d['type_entreprise'] for d in devis_recents} == {'CLIENT', "Société d'État"}
+
+    contexte = assistant._collecter_projet_specifique(str(ids['project']))
+    assert contexte['info']['type_entreprise'] == "Société d'État"
+    assert [o['sequence_number'] for o in contexte['operations']] == [1, 5]
+    punch_in = [p['punch_in'] for p in contexte['pointages']]
+    assert punch_in and punch_in == sorted(punch_in, reverse=True)  # les plus récents d'abord
+    db.execute_update("INSERT INTO materials (project_id, designation, quantite, unite) "
+                      "VALUES (?, 'Tôle acier 6 mm', 4, 'feuille')", (ids['project'],))
+    materiaux = assistant._collecter_projet_specifique(str(ids['project']))['materiaux']
+    assert [(m['materiau_nom'], m['unite_primaire']) for m in materiaux] == [('Tôle acier 6 mm', 'feuille')]
+
+    db.execute_update("INSERT INTO formulaire_validations (formulaire_id, type_validation, commentaires, "
+                      "date_validation) VALUES (?, 'CREATION', 'Créé', '2024-05-01'), "
+                      "(?, 'ENVOI', 'Envoyé au client', '2024-05-03')", (ids['devis'], ids['devis']))
+    with FakeMessagesServer(default_text=ai_benchmark.ANALYSE) as server:
+        assistant.client = MessagesHTTPClient(server.url)
+        analyse = assistant.analyser_devis_specifique(str(ids['devis']))
+        assert analyse['success'], analyse
+        donnees = analyse['donnees']
+        assert donnees['devis']['type_entreprise'] == "Société d'État"
+        assert [(l['unite_primaire'], l['categorie']) for l in donnees['lignes']] == [('unité', 'Acier')] * 4
+        assert [v['commentaires'] for v in donnees['validations']] == ['Envoyé au client', 'Créé']
+        assert analyse['metriques']['comparaison_historique']['nb_devis'] == 1  # l'autre devis du même client
+
+        relance = assistant.generer_relance_client_devis(ids['devis'])
+        assert relance['success'], relance
+        assert [i['commentaires'] for i in relance['historique_interactions']] == ['Suivi du devis']
+    print("✅ Requêtes CRM et devis")
+
+
+def test_conversation_invalidee_par_le_crm():
+    """Une écriture dans opportunities ou interactions invalide la réponse en cache"""
+    prepare = preparer("conversation")
+    if not prepare:
+        return
+    db, ids, assistant = prepare
+    from assistant_ia import CONVERSATION_TABLES
+    assert {'opportunities', 'interactions'} <= set(CONVERSATION_TABLES)
+    assert not {'crm_opportunities', 'crm_interactions'} & set(CONVERSATION_TABLES)
+
+    question = "Quelles opportunités suivre cette semaine ?"
+    with FakeMessagesServer(default_text="Relancer Hydro Québec.") as server:
+        assistant.client = MessagesHTTPClient(server.url)
+        assert assistant.conversation_naturelle(question) == "Relancer Hydro Québec."
+        assistant.conversation_naturelle(question)
+        assert len(server.requests) == 1  # réponse en cache
+        db.execute_update("INSERT INTO opportunities (nom, company_id, montant_estime) VALUES ('Quai', ?, 9000)",
+                          (ids['company'],))
+        assistant.conversation_naturelle(question)
+        assert len(server.requests) == 2
+        db.execute_update("UPDATE interactions SET resultat = 'Rappeler' WHERE company_id = ?", (ids['company'],))
+        assistant.conversation_naturelle(question)
+        assert len(server.requests) == 3
+    print("✅ Conversation invalidée par le CRM")
+
+
+# =========================================================================
+# CRÉATION DE DEVIS ET DE CONTACTS
+# =========================================================================
+
+def test_creer_devis_enregistre():
+    """Devis créé par l'IA : numéro de document, lignes et type du client dans le prompt"""
+    prepare = preparer("création de devis")
+    if not prepare:
+        return
+    db, ids, assistant = prepare
+    with FakeMessagesServer(default_text=ai_benchmark.DEVIS) as server:
+        assistant.client = MessagesHTTPClient(server.url)
+        resultat = assistant.creer_devis_avec_ia("Devis pour 20 sections de garde-corps", ids['company'])
+        assert resultat['success'], resultat
+        assert "- Type: CLIENT" in server.requests[0]['messages'][0]['content']
+
+        devis = db.execute_query("SELECT * FROM formulaires WHERE id = ?", (resultat['devis_id'],))[0]
+        assert devis['type_formulaire'] == 'ESTIMATION' and devis['company_id'] == ids['company']
+        assert devis['numero_document'].startswith('EST-')
+        assert float(devis['montant_total']) == resultat['montant_total'] == 7000
+        lignes = db.execute_query("SELECT * FROM formulaire_lignes WHERE formulaire_id = ? ORDER BY sequence_ligne",
+                                  (resultat['devis_id'],))
+        assert [l['code_article'] for l in lignes] == [f"GC-{i}" for i in range(1, 6)]
+
+        second = assistant.creer_devis_avec_ia("Second devis", ids['company'])
+        numero = db.execute_query("SELECT numero_document FROM formulaires WHERE id = ?", (second['devis_id'],))
+        assert numero[0]['numero_document'] != devis['numero_document']
+
+        server.script([ai_benchmark.CONTACT])
+        contact = assistant.creer_contact_avec_ia("Nadia Pelletier, chargée de projet", ids['company'])
+        assert contact['success'], contact
+        assert "- Nom: Hydro Québec\n- Type: CLIENT" in server.requests[-1]['messages'][0]['content']
+    print("✅ Création de devis")
+
+
+# =========================================================================
+# BONS DE TRAVAIL
+# =========================================================================
+
+def test_bons_de_travail_ia():
+    """BT créé et modifié par l'IA avec les priorités admises par formulaires"""
+    prepare = preparer("bons de travail")
+    if not prepare:
+        return
+    db, ids, assistant = prepare
+    bon_travail = json.loads(ai_benchmark.BON_TRAVAIL)
+    with FakeMessagesServer() as server:
+        assistant.client = MessagesHTTPClient(server.url)
+        server.script([json.dumps(dict(bon_travail, priority='HAUTE'), ensure_ascii=False)])
+        resultat = assistant.creer_bon_travail_avec_ia("BT pour souder la passerelle du projet 1")
+        assert resultat['success'], resultat
+        prompt = server.requests[-1]['messages'][0]['content']
+        assert "Projet 0 - Passerelle acier" in prompt and "Employé1 Soudeur1 (PRODUCTION)" in prompt
+        assert "PRIORITÉS DISPONIBLES: NORMAL, URGENT, CRITIQUE" in prompt
+        bt = db.execute_query("SELECT * FROM formulaires WHERE id = ?", (resultat['bt_id'],))[0]
+        assert (bt['type_formulaire'], bt['priorite']) == ('BON_TRAVAIL', 'NORMAL')  # HAUTE inconnue
+
+        server.script([json.dumps({'priority': 'URGENT'})])
+        modifie = assistant.modifier_bon_travail_avec_ia(ids['bt'], "Priorité urgente")
+        assert modifie['success'], modifie
+        priorite = db.execute_query("SELECT priorite FROM formulaires WHERE id = ?", (ids['bt'],))
+        assert priorite[0]['priorite'] == 'URGENT'
+    print("✅ Bons de travail IA")
+
+
+if __name__ == "__main__":
+    test_heures_des_pointages()
+    test_mouvements_inventaire()
+    test_requetes_crm_et_devis()
+    test_conversation_invalidee_par_le_crm()
+    test_creer_devis_enregistre()
+    test_bons_de_travail_ia()
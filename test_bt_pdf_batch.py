@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# test_bt_pdf_batch.py - Tests et benchmark de l'export PDF en lot des Bons de Travail
+# ERP Production DG Inc.
+
+"""
+Vérifie le chargement groupé des BT (ERPDatabase.get_bons_travail_form_data),
+puis l'export en lot de bt_pdf_export.py : PDF fusionné ou ZIP, progression
+rapportée pour chaque BT et erreurs isolées. Lancé directement, le script
+compare le rendu séquentiel au rendu en pool de processus.
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from erp_database import ERPDatabase
+from bt_pdf_export import PDF_MERGE_AVAILABLE, BTPDFGenerator, export_bt_pdf_batch, exemple_bt_form_data
+
+
+def creer_base_bts(nb_bts=5):
+    """Base temporaire avec des BT enregistrés comme production_management.save_bon_travail"""
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_bt_pdf_"), "bt.db"))
+    modele = exemple_bt_form_data()
+    with db.get_connection() as conn:
+        for bt_id in range(1, nb_bts + 1):
+            conn.execute('''
+                INSERT INTO formulaires (id, type_formulaire, numero_document, statut, priorite, date_echeance, notes, metadonnees_json)
+                VALUES (?, 'BON_TRAVAIL', ?, ?, 'NORMAL', ?, ?, ?)
+            ''', (bt_id, f"BT-TEST-{bt_id:03d}", 'VALIDÉ' if bt_id % 2 else 'BROUILLON', modele['end_date'],
+                  modele['work_instructions'], json.dumps({
+                      'project_name': f"{modele['project_name']} #{bt_id}", 'client_name': modele['client_name'],
+                      'project_manager': modele['project_manager'], 'start_date': modele['start_date'],
+                      'safety_notes': modele['safety_notes'], 'quality_requirements': modele['quality_requirements']
+                  })))
+            for seq, task in enumerate(modele['tasks'], 1):
+                conn.execute('''
+                    INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description, quantite, prix_unitaire, notes_ligne)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (bt_id, seq, f"{task['operation']} - {task['description']}", task['quantity'], task['planned_hours'],
+                      json.dumps({'operation': task['operation'], 'description': task['description'],
+                                  'actual_hours': 0.0, 'assigned_to': task['assigned_to'],
+                                  'fournisseur': task['fournisseur'], 'status': 'pending'})))
+            for seq, mat in enumerate(modele['materials'], 1000):
+                conn.execute('''
+                    INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description, quantite, unite, notes_ligne)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (bt_id, seq, f"MATERIAU: {mat['name']} - {mat['description']}", mat['quantity'], mat['unit'],
+                      json.dumps({'type': 'material', 'fournisseur': mat['fournisseur'],
+                                  'available': mat['available'], 'notes': mat['notes']})))
+        conn.commit()
+    return db, modele
+
+
+def test_chargement_groupe_des_bts():
+    """Tâches et matériaux reconstitués ; ordre des id demandés respecté ; filtre par statut"""
+    db, modele = creer_base_bts()
+    forms = db.get_bons_travail_form_data([3, 1, 99])
+    assert [f['id'] for f in forms] == [3, 1]
+    assert [t['operation'] for t in forms[0]['tasks']] == [t['operation'] for t in modele['tasks']]
+    assert [m['name'] for m in forms[0]['materials']] == [m['name'] for m in modele['materials']]
+    assert forms[0]['materials'][1]['available'] == 'ordered'
+
+    valides = db.get_bons_travail_form_data(statuts=['VALIDÉ'])
+    assert sorted(f['id'] for f in valides) == [1, 3, 5]
+    print("✅ Chargement groupé des BT")
+
+
+def test_export_lot_zip_et_progression():
+    """Un PDF par BT dans le ZIP, progression appelée pour chaque BT, erreurs isolées"""
+    db, _ = creer_base_bts()
+    forms = db.get_bons_travail_form_data(list(range(1, 6)))
+    forms.append({'numero_document': 'BT-CASSE', 'tasks': [None]})  # Tâche invalide
+
+    progression = []
+    result = export_bt_pdf_batch(forms, output='zip', max_workers=2,
+                                 progress_callback=lambda faits, total, numero: progression.append((faits, total)))
+    assert result['format'] == 'zip' and result['nb_documents'] == 5
+    assert [e['numero_document'] for e in result['erreurs']] == ['BT-CASSE']
+    assert sorted(progression) == [(i, 6) for i in range(1, 7)]
+
+    with zipfile.ZipFile(io.BytesIO(result['data'])) as zipf:
+        noms = zipf.namelist()
+        assert len(noms) == 5 and all(zipf.read(nom).startswith(b'%PDF') for nom in noms)
+    print("✅ Export ZIP avec progression")
+
+
+def test_export_lot_pdf_fusionne():
+    """Un seul PDF contenant au moins une page par BT"""
+    db, _ = creer_base_bts(nb_bts=3)
+    result = export_bt_pdf_batch(db.get_bons_travail_form_data([1, 2, 3]), output='pdf', max_workers=1)
+    if not PDF_MERGE_AVAILABLE:
+        assert result['format'] == 'zip'
+        print("⚠️ pypdf absent : paquet livré en ZIP")
+        return
+
+    from pypdf import PdfReader
+    assert result['format'] == 'pdf'
+    pages_unitaires = len(PdfReader(io.BytesIO(BTPDFGenerator().generate_pdf(exemple_bt_form_data()).getvalue())).pages)
+    assert len(PdfReader(io.BytesIO(result['data'])).pages) == 3 * pages_unitaires
+    print("✅ PDF fusionné")
+
+
+def benchmark_export_lot(nb_bts=200):
+    """Rendu séquentiel (un générateur par BT, comme l'export unitaire) vs pool de processus"""
+    forms = [dict(exemple_bt_form_data(), numero_document=f"BT-BENCH-{i:04d}") for i in range(nb_bts)]
+    print(f"📊 Benchmark: {nb_bts} BT")
+
+    t0 = time.perf_counter()
+    for form in forms:
+        BTPDFGenerator().generate_pdf(form)
+    print(f"  {'Séquentiel (ancien export unitaire)':<40} {time.perf_counter() - t0:8.2f} s")
+
+    result = export_bt_pdf_batch(forms, output='zip')
+    print(f"  {'Lot - ' + str(result['workers']) + ' processus (ZIP)':<40} {result['duree_s']:8.2f} s")
+
+
+if __name__ == "__main__":
+    test_chargement_groupe_des_bts()
+    test_export_lot_zip_et_progression()
+    test_export_lot_pdf_fusionne()
+    benchmark_export_lot()
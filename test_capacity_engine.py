@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# test_capacity_engine.py - Tests et benchmark du moteur de capacité des postes
+# ERP Production DG Inc.
+
+"""
+Vérifie que le moteur de capacité (capacity_engine.py) ne multiplie plus la charge
+planifiée par le nombre de pointages, en comparant ses résultats à un calcul Python
+direct sur un jeu de données synthétique. Lancé directement, le script exécute aussi
+un benchmark ancienne requête (jointure cartésienne) vs moteur pré-agrégé.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from erp_database import ERPDatabase
+from capacity_engine import CapacityEngine
+
+# Ancienne requête de goulots (jointure work_centers → operations → time_entries puis SUM)
+ANCIENNE_REQUETE_GOULOTS = '''
+    SELECT wc.id,
+           COALESCE(SUM(CASE WHEN o.statut IN ('À FAIRE', 'EN COURS') THEN o.temps_estime ELSE 0 END), 0) as charge_planifiee
+    FROM work_centers wc
+    LEFT JOIN operations o ON wc.id = o.work_center_id
+    LEFT JOIN time_entries te ON o.id = te.operation_id
+    WHERE wc.statut = 'ACTIF'
+    GROUP BY wc.id
+'''
+
+ANCIENNE_REQUETE_GOULOTS_COMPLETE = '''
+    SELECT wc.id,
+           COALESCE(SUM(CASE WHEN o.statut IN ('À FAIRE', 'EN COURS') THEN o.temps_estime ELSE 0 END), 0) as charge_planifiee,
+           COALESCE(SUM(CASE WHEN te.punch_out IS NULL THEN (JULIANDAY('now') - JULIANDAY(te.punch_in)) * 24 ELSE 0 END), 0) as charge_en_cours,
+           COUNT(CASE WHEN o.statut IN ('À FAIRE', 'EN COURS') THEN 1 END) as operations_en_attente,
+           COUNT(CASE WHEN te.punch_out IS NULL THEN 1 END) as pointages_actifs
+    FROM work_centers wc
+    LEFT JOIN operations o ON wc.id = o.work_center_id
+    LEFT JOIN time_entries te ON o.id = te.operation_id
+    WHERE wc.statut = 'ACTIF'
+    GROUP BY wc.id
+'''
+
+ANCIENNE_REQUETE_UTILISATION = '''
+    SELECT wc.id,
+           COALESCE(SUM(te.total_hours), 0) as heures_reelles,
+           COALESCE(SUM(te.total_cost), 0) as revenus_generes,
+           COALESCE(AVG(te.hourly_rate), wc.cout_horaire) as taux_horaire_reel,
+           COUNT(DISTINCT te.id) as nombre_pointages,
+           COUNT(DISTINCT te.employee_id) as employes_distincts,
+           COUNT(DISTINCT o.project_id) as projets_touches,
+           ROUND((COALESCE(SUM(te.total_hours), 0) / (wc.capacite_theorique * ?)) * 100, 2) as taux_utilisation_pct
+    FROM work_centers wc
+    LEFT JOIN operations o ON wc.id = o.work_center_id
+    LEFT JOIN time_entries te ON o.id = te.operation_id
+        AND te.total_cost IS NOT NULL
+        AND DATE(te.punch_in) >= ?
+    WHERE wc.statut = 'ACTIF'
+    GROUP BY wc.id
+'''
+
+
+def creer_jeu_synthetique(nb_postes=10, nb_operations=200, pointages_par_operation=5, jours_historique=60, seed=42):
+    """Crée une base temporaire avec postes, opérations et pointages aléatoires"""
+    rng = random.Random(seed)
+    tmp_dir = tempfile.mkdtemp(prefix="erp_capacite_")
+    db = ERPDatabase(os.path.join(tmp_dir, "capacite.db"))
+    now = datetime.now()
+
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO employees (id, prenom, nom) VALUES (1, 'Test', 'Capacité')")
+        cursor.execute("INSERT INTO projects (id, nom_projet) VALUES (1, 'Projet capacité')")
+        for wc_id in range(1, nb_postes + 1):
+            cursor.execute(
+                "INSERT INTO work_centers (id, nom, departement, categorie, capacite_theorique, operateurs_requis, cout_horaire, statut) "
+                "VALUES (?, ?, 'PRODUCTION', 'TEST', ?, 1, 50, 'ACTIF')",
+                (wc_id, f"Poste {wc_id}", rng.choice([4, 8, 16]))
+            )
+
+        operations, pointages = [], []
+        for op_id in range(1, nb_operations + 1):
+            operations.append((op_id, 1, rng.randint(1, nb_postes), rng.uniform(1, 20),
+                               rng.choice(['À FAIRE', 'EN COURS', 'TERMINÉ'])))
+            for _ in range(rng.randint(0, pointages_par_operation)):
+                punch_in = now - timedelta(days=rng.randint(0, jours_historique), hours=rng.randint(0, 12))
+                heures = round(rng.uniform(0.5, 8), 2)
+                pointages.append((1, 1, op_id, punch_in.isoformat(timespec='seconds'),
+                                  (punch_in + timedelta(hours=heures)).isoformat(timespec='seconds'),
+                                  heures, 50.0, heures * 50.0))
+
+        cursor.executemany(
+            "INSERT INTO operations (id, project_id, work_center_id, temps_estime, statut) VALUES (?, ?, ?, ?, ?)",
+            operations
+        )
+        cursor.executemany(
+            "INSERT INTO time_entries (employee_id, project_id, operation_id, punch_in, punch_out, total_hours, hourly_rate, total_cost) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            pointages
+        )
+        conn.commit()
+
+    return db, operations, pointages
+
+
+def calculer_attendu(operations, pointages, period_days):
+    """Calcul de référence en Python pur : charge planifiée et heures réelles par poste"""
+    start = (datetime.now() - timedelta(days=period_days)).strftime('%Y-%m-%d')
+    op_to_wc = {op[0]: op[2] for op in operations}
+    charge, heures = {}, {}
+    for op_id, _, wc_id, temps, statut in operations:
+        if statut in ('À FAIRE', 'EN COURS'):
+            charge[wc_id] = charge.get(wc_id, 0) + temps
+    for _, _, op_id, punch_in, _, total_hours, _, _ in pointages:
+        if punch_in >= start:
+            wc_id = op_to_wc[op_id]
+            heures[wc_id] = heures.get(wc_id, 0) + total_hours
+    return charge, heures
+
+
+def test_charge_planifiee_sans_produit_cartesien():
+    """La charge planifiée ne dépend pas du nombre de pointages"""
+    db, operations, pointages = creer_jeu_synthetique()
+    charge_attendue, _ = calculer_attendu(operations, pointages, 30)
+
+    for row in CapacityEngine(db).get_work_center_load(period_days=None):
+        assert abs(row['charge_planifiee'] - charge_attendue.get(row['id'], 0)) < 1e-6, row['nom']
+
+    # L'ancienne jointure surestimait la charge dès qu'une opération avait plusieurs pointages
+    anciennes = {r['id']: r['charge_planifiee'] for r in db.execute_query(ANCIENNE_REQUETE_GOULOTS)}
+    assert any(anciennes[wc_id] > charge + 1e-6 for wc_id, charge in charge_attendue.items())
+    print("✅ Charge planifiée correcte (ancienne requête surestimée)")
+
+
+def test_heures_reelles_et_utilisation():
+    """Heures réelles sur la période et taux d'utilisation cohérents"""
+    db, operations, pointages = creer_jeu_synthetique()
+    _, heures_attendues = calculer_attendu(operations, pointages, 30)
+
+    analysis = db.get_work_center_utilization_analysis(30)
+    assert len(analysis) == 10
+    for row in analysis:
+        assert abs(row['heures_reelles'] - heures_attendues.get(row['id'], 0)) < 1e-6, row['nom']
+        capacite = row['capacite_theorique'] * 30
+        assert abs(row['taux_utilisation_pct'] - round(row['heures_reelles'] / capacite * 100, 2)) < 1e-6
+
+    capacity = db.get_capacity_analysis_by_work_center(30)
+    assert len(capacity) == 10
+    assert all('capacite_totale_periode' in row for row in capacity)
+    print("✅ Heures réelles et utilisation correctes")
+
+
+def test_utilisation_glissante():
+    """La somme des fenêtres glissantes égale les heures sur la même période"""
+    db, operations, pointages = creer_jeu_synthetique()
+    rolling = CapacityEngine(db).get_rolling_utilization(window_days=7, nb_windows=4)
+
+    debut = (datetime.now() - timedelta(days=27)).strftime('%Y-%m-%d')
+    op_to_wc = {op[0]: op[2] for op in operations}
+    for wc in rolling:
+        attendu = sum(p[5] for p in pointages if op_to_wc[p[2]] == wc['id'] and p[3][:10] >= debut)
+        obtenu = sum(f['heures_reelles'] for f in wc['fenetres'])
+        assert len(wc['fenetres']) == 4
+        assert abs(obtenu - attendu) < 0.05, wc['nom']
+    print("✅ Utilisation glissante cohérente")
+
+
+def benchmark_capacite(nb_operations=10000, pointages_par_operation=20, jours_historique=730):
+    """Compare les anciennes jointures cartésiennes au moteur pré-agrégé"""
+    db, _, pointages = creer_jeu_synthetique(nb_postes=60, nb_operations=nb_operations,
+                                             pointages_par_operation=pointages_par_operation,
+                                             jours_historique=jours_historique)
+    print(f"📊 Benchmark: {nb_operations} opérations, {len(pointages)} pointages sur {jours_historique} jours")
+    start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+
+    mesures = [
+        ("Goulots - ancienne jointure", lambda: db.execute_query(ANCIENNE_REQUETE_GOULOTS_COMPLETE)),
+        ("Goulots - moteur", db.get_work_center_capacity_bottlenecks),
+        ("Utilisation 30j - ancienne jointure", lambda: db.execute_query(ANCIENNE_REQUETE_UTILISATION, (30, start_date))),
+        ("Utilisation 30j - moteur", lambda: db.get_work_center_utilization_analysis(30)),
+        ("Utilisation glissante 4x7j - moteur", lambda: db.get_work_center_rolling_utilization(7, 4)),
+    ]
+    for libelle, fonction in mesures:
+        t0 = time.perf_counter()
+        fonction()
+        print(f"  {libelle:<40} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    test_charge_planifiee_sans_produit_cartesien()
+    test_heures_reelles_et_utilisation()
+    test_utilisation_glissante()
+    benchmark_capacite()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# test_crm_timeline.py - Tests et benchmark de la timeline CRM unifiée
+# ERP Production DG Inc.
+
+"""
+Vérifie que crm_timeline.py rend les événements (interactions, activités,
+opportunités) dans le même ordre que l'ancien UNION ALL trié, page par page
+dans les deux sens sans doublon ni oubli (dates égales et dates NULL
+comprises), avec les filtres contact / entreprise, la fenêtre de dates et les
+compteurs par type, et que chaque source ne lit que la taille de page + 1.
+Lancé directement, le script compare l'ancien UNION ALL et la fusion des flux
+pour une entreprise avec 150 000 événements.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from crm import GestionnaireCRM
+from crm_timeline import TimelineEngine
+from erp_database import ERPDatabase
+from list_pagination import NEXT, PREV
+
+STATUTS_OPPORTUNITE = ['Prospection', 'Qualification', 'Gagné', 'Perdu']
+
+
+def creer_base(nb_par_source=120, nb_entreprises=3):
+    """Événements répartis sur quelques entreprises, avec dates répétées et quelques dates NULL"""
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_timeline_"), "timeline.db"))
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("DELETE FROM opportunities")
+    conn.execute("DELETE FROM crm_activities")
+    conn.execute("DELETE FROM interactions")
+    base = 900000
+    conn.executemany("INSERT INTO companies (id, nom) VALUES (?, ?)",
+                     [(base + e, f"Entreprise {e}") for e in range(nb_entreprises)])
+    conn.executemany("INSERT INTO contacts (id, prenom, nom_famille, company_id) VALUES (?, ?, ?, ?)",
+                     [(base + e, 'Contact', str(e), base + e) for e in range(nb_entreprises)])
+
+    def date(i):
+        # Une date sur trois répétée, une sur 37 absente
+        if i % 37 == 5:
+            return None
+        return f"2023-{i // 28 % 12 + 1:02d}-{i % 28 + 1:02d} {(i // 3) % 24:02d}:00:00"
+
+    conn.executemany('''INSERT INTO interactions (contact_id, company_id, type_interaction, date_interaction, resume,
+                        resultat) VALUES (?, ?, ?, ?, ?, ?)''',
+                     [(base + i % nb_entreprises, base + i % nb_entreprises, ['Email', 'Appel', 'Réunion'][i % 3],
+                       date(i), f"Interaction {i}", ['Positif', 'Neutre'][i % 2]) for i in range(nb_par_source)])
+    conn.executemany('''INSERT INTO crm_activities (contact_id, company_id, type_activite, sujet, date_activite, statut)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                     [(base + i % nb_entreprises, base + i % nb_entreprises, ['Appel', 'Tâche'][i % 2],
+                       f"Activité {i}", date(i + 1), 'Planifié') for i in range(nb_par_source)])
+    conn.executemany('''INSERT INTO opportunities (contact_id, company_id, nom, statut, montant_estime, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                     [(base + i % nb_entreprises, base + i % nb_entreprises, f"Opportunité {i}",
+                       STATUTS_OPPORTUNITE[i % 4], i * 1000.0, date(i + 2)) for i in range(nb_par_source)])
+    conn.commit()
+    conn.close()
+    return db, base
+
+
+def ancienne_timeline(db, company_id=None, statuts=('Prospection', 'Gagné', 'Perdu')):
+    """Ancien UNION ALL sans LIMIT, trié sur (date, type, id) décroissants"""
+    filtre = " AND {}.company_id = ?" if company_id else ""
+    params = (company_id,) * 3 if company_id else ()
+    rows = db.execute_query(f"""
+        SELECT 'interaction' as type, i.id, i.date_interaction as date FROM interactions i
+        WHERE 1=1 {filtre.format('i')}
+        UNION ALL
+        SELECT 'activite' as type, a.id, a.date_activite as date FROM crm_activities a
+        WHERE 1=1 {filtre.format('a')}
+        UNION ALL
+        SELECT 'opportunite' as type, o.id, o.created_at as date FROM opportunities o
+        WHERE o.statut IN ({', '.join('?' for _ in statuts)}) {filtre.format('o')}
+    """, params[:2] + tuple(statuts) + params[2:])
+    return sorted(((r['date'] or '', r['type'], r['id']) for r in rows), reverse=True)
+
+
+def parcourir(engine, limit, **filtres):
+    """Toutes les pages en avant puis en arrière"""
+    avant, page = [], engine.page(limit=limit, **filtres)
+    avant.append(page)
+    while page['has_next']:
+        page = engine.page(cursor=page['next_cursor'], direction=NEXT, limit=limit, **filtres)
+        avant.append(page)
+    arriere = [page]
+    while page['has_prev']:
+        page = engine.page(cursor=page['prev_cursor'], direction=PREV, limit=limit, **filtres)
+        arriere.append(page)
+    return avant, arriere
+
+
+def cles(pages):
+    return [((r['date'] or ''), r['type'], r['id']) for p in pages for r in p['rows']]
+
+
+def test_pages_identiques_a_l_ancien_tri():
+    """Pages en avant et en arrière = ancien UNION ALL trié, avec et sans filtre entreprise"""
+    db, base = creer_base()
+    engine = TimelineEngine(db)
+    for company_id in (None, base + 1):
+        attendu = ancienne_timeline(db, company_id)
+        for limit in (7, 50):
+            avant, arriere = parcourir(engine, limit, company_id=company_id)
+            assert cles(avant) == attendu, (company_id, limit)
+            assert cles(reversed(arriere)) == attendu, (company_id, limit)
+            assert not avant[0]['has_prev'] and not avant[-1]['has_next']
+    # Première page = les 50 plus récents ; les dates NULL à la fin
+    page = engine.page(limit=50)
+    assert cles([page]) == ancienne_timeline(db)[:50]
+    assert all(r['date'] is None for r in engine.page(limit=10, date_to='0')['rows'])
+    print("✅ Pages identiques à l'ancien tri")
+
+
+def test_filtres_fenetre_et_compteurs():
+    """Contact, fenêtre de dates (début inclus, fin exclue), statuts d'opportunité et compteurs"""
+    db, base = creer_base()
+    engine = TimelineEngine(db)
+    page = engine.page(contact_id=base + 2, date_from='2023-03-01', date_to='2023-05-01', limit=500)
+    assert page['rows'] and not page['has_next']
+    assert all(r['contact_id'] == base + 2 and '2023-03-01' <= r['date'] < '2023-05-01' for r in page['rows'])
+    compteurs = engine.counts(contact_id=base + 2, date_from='2023-03-01', date_to='2023-05-01')
+    assert sum(compteurs.values()) == len(page['rows'])
+    for type_ in ('interaction', 'activite', 'opportunite'):
+        assert compteurs[type_] == sum(1 for r in page['rows'] if r['type'] == type_)
+    assert not any(r['type'] == 'opportunite' and r['statut'] == 'Qualification'
+                   for r in engine.page(limit=500)['rows'])
+    toutes = engine.page(limit=500, opportunity_statuts=None)['rows']
+    assert any(r['statut'] == 'Qualification' for r in toutes)
+    print("✅ Filtres, fenêtre de dates et compteurs")
+
+
+def test_interfaces_existantes():
+    """ERPDatabase.get_unified_timeline et GestionnaireCRM.get_unified_timeline gardent leur forme"""
+    db, base = creer_base()
+    timeline = db.get_unified_timeline({'company_id': base, 'limit': 20})
+    assert len(timeline) == 20 and all(r['company_id'] == base for r in timeline)
+    assert all('icon' in r and 'color' in r for r in timeline)
+    assert all('date_formatted' in r for r in timeline if r['date'])
+    assert {r['company_name'] for r in timeline} == {'Entreprise 0'}
+    crm = GestionnaireCRM(db)
+    rows = crm.get_unified_timeline(company_id=base, limit=300)
+    assert all(r['statut'] == r['resultat'] for r in rows if r['type'] == 'interaction')
+    assert any(r['type'] == 'opportunite' and r['statut'] == 'Qualification' for r in rows)
+    print("✅ Interfaces existantes")
+
+
+def test_lectures_bornees_par_source():
+    """Chaque source ne rend que limit + 1 lignes, quelle que soit la profondeur de la page"""
+    db, base = creer_base(nb_par_source=600)
+    lus = []
+    execute = db.execute_query
+    db.execute_query = lambda *a, **k: (lambda rows: (lus.append(len(rows)), rows)[1])(execute(*a, **k))
+    engine = TimelineEngine(db)
+    page = engine.page(limit=20)
+    for _ in range(10):
+        page = engine.page(cursor=page['next_cursor'], limit=20)
+    assert len(lus) == 33 and max(lus) == 21
+    print("✅ Lectures bornées par source")
+
+
+def benchmark_timeline(nb_par_source=50000):
+    """Entreprise avec des années d'historique : ancien UNION ALL + LIMIT 50 vs fusion des flux"""
+    db, base = creer_base(nb_par_source, nb_entreprises=1)
+    print(f"📊 Benchmark: {nb_par_source * 3} événements pour une entreprise")
+    t0 = time.perf_counter()
+    db.execute_query("""
+        SELECT 'interaction' as type, i.id, i.date_interaction as date, i.resume as titre FROM interactions i
+        WHERE i.company_id = ?
+        UNION ALL
+        SELECT 'activite' as type, a.id, a.date_activite as date, a.sujet as titre FROM crm_activities a
+        WHERE a.company_id = ?
+        UNION ALL
+        SELECT 'opportunite' as type, o.id, o.created_at as date, o.nom as titre FROM opportunities o
+        WHERE o.statut IN ('Prospection', 'Gagné', 'Perdu') AND o.company_id = ?
+        ORDER BY date DESC LIMIT 50
+    """, (base, base, base))
+    print(f"  {'UNION ALL trié (ancien)':<34} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+    engine = TimelineEngine(db)
+    t0 = time.perf_counter()
+    page = engine.page(company_id=base, limit=50)
+    print(f"  {'Fusion des flux, page 1 (nouveau)':<34} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+    for _ in range(20):
+        page = engine.page(company_id=base, cursor=page['next_cursor'], limit=50)
+    t0 = time.perf_counter()
+    engine.page(company_id=base, cursor=page['next_cursor'], limit=50)
+    print(f"  {'Fusion des flux, page 22 (nouveau)':<34} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    test_pages_identiques_a_l_ancien_tri()
+    test_filtres_fenetre_et_compteurs()
+    test_interfaces_existantes()
+    test_lectures_bornees_par_source()
+    benchmark_timeline()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# test_document_extraction.py - Tests de l'extraction parallèle et du cache des documents de l'expert IA
+# ERP Production DG Inc.
+
+"""
+Vérifie que document_extraction.py extrait chaque format comme l'ancien
+ExpertAdvisor.read_file (ordre conservé, image réduite, formats refusés),
+qu'un PDF découpé en tranches de pages dans le pool de processus donne le
+même texte qu'une extraction d'un bloc, que le pool partagé n'est jamais
+redimensionné et qu'un pool arrêté par une autre session fait retomber sur
+l'extraction séquentielle, et que le cache disque (par
+empreinte du contenu) sert les fichiers déjà vus sans garder les erreurs.
+Lancé directement, le script compare l'extraction séquentielle (ancienne),
+parallèle, puis en cache, de plusieurs cahiers des charges PDF.
+"""
+
+import base64
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+import document_extraction
+from document_extraction import ExtractionCache, _plan_tasks, _pdf_pages_text, content_key, extract_documents, \
+    extract_file, is_extraction_error, shutdown_pool
+
+
+def creer_pdf(nb_pages, titre="Cahier des charges", lignes_par_page=40):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(nb_pages):
+        for ligne in range(lignes_par_page):
+            pdf.drawString(40, 750 - ligne * 17, f"{titre} page {page + 1} ligne {ligne + 1} : acier 304, soudure TIG")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def creer_image(largeur, hauteur):
+    buffer = io.BytesIO()
+    Image.new('RGB', (largeur, hauteur), (0, 169, 113)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def nouveau_cache():
+    return ExtractionCache(tempfile.mkdtemp(prefix="erp_extraction_"))
+
+
+def test_formats_et_ordre():
+    """Texte, CSV, image réduite, formats refusés ; résultats dans l'ordre des fichiers"""
+    fichiers = [
+        ('notes.txt', "Tolérance ± 0,5 mm".encode('latin1')),
+        ('pieces.csv', "code;quantité\nTRE-10;4\n".encode('utf-8')),
+        ('plan.png', creer_image(3000, 2000)),
+        ('devis.exe', b'MZ'),
+        ('specs.pdf', creer_pdf(2)),
+    ]
+    extraits = extract_documents(fichiers, use_cache=False, max_workers=1)
+    assert [e['filename'] for e in extraits] == [nom for nom, _ in fichiers]
+    texte, csv_texte, image, refuse, pdf = [e['content'] for e in extraits]
+    assert texte == "Tolérance ± 0,5 mm"
+    assert csv_texte.splitlines() == ["code;quantité", "TRE-10;4"]
+    assert image['type'] == 'image' and image['source']['media_type'] == 'image/png'
+    reduite = Image.open(io.BytesIO(base64.b64decode(image['source']['data'])))
+    assert max(reduite.size) == document_extraction.MAX_IMAGE_SIDE
+    assert is_extraction_error(refuse) and refuse.startswith("Format de fichier non supporté")
+    assert pdf.count("\n") >= 80 and "page 2 ligne 40" in pdf and not is_extraction_error(pdf)
+    vide = extract_file('vide.pdf', creer_pdf(0, lignes_par_page=0))
+    assert is_extraction_error(vide)
+    print("✅ Formats et ordre")
+
+
+def test_pdf_en_tranches_paralleles():
+    """PDF long : tranches de pages dans le pool, même texte qu'un bloc"""
+    specs = creer_pdf(20)
+    taches = _plan_tasks([(0, 'specs.pdf', specs), (1, 'court.pdf', creer_pdf(3))], workers=2)
+    tranches = [args[1:] for _, fonction, args in taches if fonction is _pdf_pages_text]
+    assert tranches == [(0, 10), (10, 20)]
+    assert sum(1 for _, fonction, _ in taches if fonction is extract_file) == 1  # PDF court d'un bloc
+    try:
+        extraits = extract_documents([('specs.pdf', specs), ('notes.txt', b'Note')], use_cache=False,
+                                     max_workers=2)
+    finally:
+        shutdown_pool()
+    assert extraits[0]['content'] == extract_file('specs.pdf', specs)
+    assert extraits[1]['content'] == 'Note'
+    print("✅ PDF en tranches parallèles")
+
+
+def test_pool_partage_non_redimensionne():
+    """Appels avec des max_workers différents : même pool ; pool arrêté ailleurs : extraction séquentielle"""
+    specs = creer_pdf(20)
+    fichiers = [('specs.pdf', specs), ('notes.txt', b'Note')]
+    attendu = [extract_file('specs.pdf', specs), 'Note']
+    try:
+        assert [e['content'] for e in extract_documents(fichiers, use_cache=False, max_workers=2)] == attendu
+        pool = document_extraction._pool
+        assert [e['content'] for e in extract_documents(fichiers, use_cache=False, max_workers=3)] == attendu
+        assert document_extraction._pool is pool
+
+        # Une autre session arrête le pool entre deux appels : pas de RuntimeError pour celle-ci
+        pool.shutdown(wait=True)
+        assert [e['content'] for e in extract_documents(fichiers, use_cache=False, max_workers=2)] == attendu
+    finally:
+        shutdown_pool()
+    print("✅ Pool partagé non redimensionné")
+
+
+def test_cache_par_contenu():
+    """Même contenu (même sous un autre nom) servi par le cache ; erreurs jamais gardées"""
+    cache = nouveau_cache()
+    specs = creer_pdf(3)
+    premier = extract_documents([('specs.pdf', specs), ('casse.pdf', b'%PDF-1.4 corrompu')], cache=cache,
+                                max_workers=1)
+    assert not premier[0]['cached'] and is_extraction_error(premier[1]['content'])
+    second = extract_documents([('copie.pdf', specs), ('casse.pdf', b'%PDF-1.4 corrompu')], cache=cache,
+                               max_workers=1)
+    assert second[0]['cached'] and second[0]['content'] == premier[0]['content']
+    assert not second[1]['cached']
+    image = creer_image(2000, 2000)
+    assert extract_documents([('plan.png', image)], cache=cache)[0]['content'] == \
+        extract_documents([('plan.png', image)], cache=cache)[0]['content']
+    assert content_key('a.txt', b'x') != content_key('a.html', b'x') != content_key('a.txt', b'y')
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['stores'] == 2
+
+    # Cache borné : les entrées les moins récemment lues partent d'abord
+    petit = ExtractionCache(tempfile.mkdtemp(prefix="erp_extraction_"), max_bytes=250)
+    for i in range(3):
+        petit.put(f"cle{i}", "x" * 100)
+        os.utime(petit._path(f"cle{i}", '.txt'), (1000 + i, 1000 + i))
+    petit.prune()
+    assert petit.get("cle0") is None and petit.get("cle2") == "x" * 100
+    print("✅ Cache par contenu")
+
+
+def benchmark_extraction(nb_fichiers=4, nb_pages=40):
+    """Analyse multi-fichiers : séquentiel (ancien), pool de processus, puis fichiers déjà vus"""
+    fichiers = [(f"cahier_{i}.pdf", creer_pdf(nb_pages, titre=f"Cahier {i}")) for i in range(nb_fichiers)]
+    print(f"📊 Benchmark: {nb_fichiers} PDF de {nb_pages} pages ({os.cpu_count()} CPU)")
+    t0 = time.perf_counter()
+    for nom, data in fichiers:
+        extract_file(nom, data)
+    print(f"  {'Séquentiel (ancien)':<24} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+    cache = nouveau_cache()
+    t0 = time.perf_counter()
+    extract_documents(fichiers, cache=cache, max_workers=max(2, os.cpu_count() or 1))
+    print(f"  {'Pool de processus':<24} {(time.perf_counter() - t0) * 1000:8.0f} ms (démarrage du pool compris)")
+    t0 = time.perf_counter()
+    extraits = extract_documents(fichiers, cache=cache)
+    assert all(e['cached'] for e in extraits)
+    print(f"  {'Déjà vus (cache disque)':<24} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    test_formats_et_ordre()
+    test_pdf_en_tranches_paralleles()
+    test_pool_partage_non_redimensionne()
+    test_cache_par_contenu()
+    benchmark_extraction()
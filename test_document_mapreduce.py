@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# test_document_mapreduce.py - Tests de l'analyse map-reduce des gros documents
+# ERP Production DG Inc.
+
+"""
+Vérifie que document_mapreduce.py découpe les documents sans perte sur
+leurs frontières structurelles, adapte la taille des extraits pour borner
+le nombre de vagues d'appels, analyse les extraits en respectant la limite
+de concurrence, fusionne les analyses partielles dans l'ordre (avec
+synthèses intermédiaires si elles dépassent le budget), et rend l'usage
+par extrait ; un extrait en erreur rend l'analyse partielle.
+Le client Anthropic est remplacé par un client factice avec latence.
+Lancé directement, le script mesure la durée de l'analyse quand la taille
+du document double.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+import document_mapreduce
+from cache_config import estimate_tokens
+from document_mapreduce import STATUT_ERREUR, analyze_in_chunks, needs_chunking, plan_chunks, split_document, \
+    usage_report
+
+
+class FakeMessages:
+    def __init__(self, delay=0.0, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.prompts = []
+        self.actifs = 0
+        self.max_actifs = 0
+        self.lock = threading.Lock()
+
+    def create(self, model, max_tokens, system, messages):
+        contenu = messages[0]['content']
+        texte = contenu if isinstance(contenu, str) else contenu[-1]['text']
+        with self.lock:
+            self.prompts.append(texte)
+            self.actifs += 1
+            self.max_actifs = max(self.max_actifs, self.actifs)
+        try:
+            time.sleep(self.delay)
+            if self.fail_on and self.fail_on in texte:
+                raise ConnectionError("surcharge")
+            reponse = f"Analyse de {len(texte)} caractères" if "EXTRAIT" in texte else "Analyse finale"
+            return SimpleNamespace(content=[SimpleNamespace(text=reponse)],
+                                   usage=SimpleNamespace(input_tokens=estimate_tokens(texte), output_tokens=10))
+        finally:
+            with self.lock:
+                self.actifs -= 1
+
+
+def devis_descriptif(nb_sections, lignes_par_section=30):
+    sections = []
+    for s in range(1, nb_sections + 1):
+        lignes = [f"{s}.{l} Fournir et installer {l} garde-corps en acier galvanisé, fini peint." for l in
+                  range(1, lignes_par_section + 1)]
+        sections.append(f"SECTION {s:02d} - OUVRAGES MÉTALLIQUES\n\n" + '\n'.join(lignes) + "\n\n")
+    return ''.join(sections)
+
+
+def test_decoupage_structurel():
+    """Découpage sans perte, aux titres de section, coupe brute seulement en dernier recours"""
+    texte = devis_descriptif(20)
+    extraits = split_document(texte, chunk_tokens=1000)
+    assert ''.join(extraits) == texte and len(extraits) > 1
+    assert all(estimate_tokens(e) <= 1000 for e in extraits)
+    assert all(e.startswith("SECTION") for e in extraits)  # sections entières regroupées
+    # Une section plus grande qu'un extrait : coupée aux paragraphes puis aux lignes
+    grosse = devis_descriptif(1, lignes_par_section=400)
+    extraits = split_document(grosse, chunk_tokens=1000)
+    assert ''.join(extraits) == grosse and all(e.endswith("\n") for e in extraits)
+    # Une seule ligne géante : coupe brute
+    ligne = "x" * 10000
+    assert split_document(ligne, chunk_tokens=500) == [ligne[i:i + 2000] for i in range(0, 10000, 2000)]
+    assert split_document("court", chunk_tokens=500) == ["court"]
+    print("✅ Découpage structurel")
+
+
+def test_taille_adaptative():
+    """Les extraits grossissent avec le document pour tenir en MAX_MAP_ROUNDS vagues"""
+    petit = plan_chunks([('a.pdf', devis_descriptif(50))], chunk_tokens=2000, max_concurrency=4)
+    gros = plan_chunks([('a.pdf', devis_descriptif(400))], chunk_tokens=2000, max_concurrency=4)
+    vagues = 4 * document_mapreduce.MAX_MAP_ROUNDS
+    assert len(petit) <= vagues + 1 and len(gros) <= vagues + 1
+    assert max(e['tokens_estimes'] for e in gros) > max(e['tokens_estimes'] for e in petit)
+    assert [(e['index'], e['total']) for e in petit] == [(i, len(petit)) for i in range(1, len(petit) + 1)]
+    assert not needs_chunking([('a.pdf', "court")]) and needs_chunking([('a.pdf', "x" * 800000)])
+    print("✅ Taille adaptative")
+
+
+def test_map_reduce_et_usage():
+    """Concurrence bornée, fusion dans l'ordre, usage par extrait, réductions intermédiaires"""
+    messages = FakeMessages(delay=0.02)
+    client = SimpleNamespace(messages=messages)
+    documents = [('cctp.pdf', devis_descriptif(30)), ('annexe.txt', devis_descriptif(10))]
+    resultat = analyze_in_chunks(client, 'm', 'Expert', documents, "Analysez ce devis", max_concurrency=3,
+                                 chunk_tokens=1500)
+    nb = len(resultat['extraits'])
+    assert nb > 3 and messages.max_actifs <= 3
+    assert resultat['analyse'] == "Analyse finale" and not resultat['partiel']
+    assert all(e['statut'] == 'ok' and e['input_tokens'] > 0 and e['output_tokens'] == 10 for e in resultat['extraits'])
+    assert resultat['usage']['output_tokens'] == 10 * (nb + len(resultat['reductions']))
+    final = messages.prompts[-1]
+    positions = [final.index(f"### {e['fichier']} — extrait {e['index']}/{e['total']}") for e in resultat['extraits']]
+    assert positions == sorted(positions) and final.endswith("Analysez ce devis")
+    assert len(usage_report(resultat)) == nb + 1
+
+    # Analyses partielles au-delà du budget : synthèses intermédiaires avant la fusion finale
+    resultat = analyze_in_chunks(SimpleNamespace(messages=FakeMessages()), 'm', 'Expert', documents, "Analysez",
+                                 max_concurrency=3, chunk_tokens=1500, reduce_input_tokens=30)
+    etapes = [r['etape'] for r in resultat['reductions']]
+    assert etapes[-1] == 'finale' and 1 in etapes
+    print("✅ Map-reduce et usage")
+
+
+def test_extrait_en_erreur():
+    """Un extrait en erreur : analyse partielle signalée ; tous en erreur : exception"""
+    documents = [('cctp.pdf', devis_descriptif(30))]
+    messages = FakeMessages(fail_on="extrait 2/")
+    resultat = analyze_in_chunks(SimpleNamespace(messages=messages), 'm', 'Expert', documents, "Analysez",
+                                 chunk_tokens=1500)
+    erreurs = [e for e in resultat['extraits'] if e['statut'] == STATUT_ERREUR]
+    assert len(erreurs) == 1 and erreurs[0]['erreur'] == "surcharge" and resultat['partiel']
+    assert "cctp.pdf 2/" in messages.prompts[-1] and "n'ont pas pu être analysés" in messages.prompts[-1]
+    try:
+        analyze_in_chunks(SimpleNamespace(messages=FakeMessages(fail_on="EXTRAIT")), 'm', 'Expert', documents,
+                          "Analysez", chunk_tokens=1500)
+        assert False, "exception attendue"
+    except ConnectionError:
+        pass
+    print("✅ Extrait en erreur")
+
+
+def benchmark_duree_bornee(latence=0.2):
+    """Durée de l'analyse quand le document double (appels factices de latence fixe)"""
+    print(f"📊 Benchmark: analyse par extraits, {document_mapreduce.MAX_CONCURRENCY} appels simultanés, "
+          f"{latence * 1000:.0f} ms par appel")
+    for nb_sections in (200, 400, 800, 1600):
+        texte = devis_descriptif(nb_sections)
+        messages = FakeMessages(delay=latence)
+        t0 = time.perf_counter()
+        resultat = analyze_in_chunks(SimpleNamespace(messages=messages), 'm', 'Expert', [('cctp.pdf', texte)],
+                                     "Analysez")
+        print(f"  {estimate_tokens(texte):>8} tokens : {len(resultat['extraits']):>3} extraits, "
+              f"{len(messages.prompts):>3} appels, {(time.perf_counter() - t0) * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+    test_decoupage_structurel()
+    test_taille_adaptative()
+    test_map_reduce_et_usage()
+    test_extrait_en_erreur()
+    benchmark_duree_bornee()
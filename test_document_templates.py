@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# test_document_templates.py - Tests et benchmark des gabarits HTML compilés (devis, DP, BA)
+# ERP Production DG Inc.
+
+"""
+Vérifie le rendu de document_templates.py (contenu, feuille de style commune,
+thèmes), puis le cache de rendu à travers GestionnaireFournisseurs : un
+document inchangé n'est pas rechargé, une modification de ligne ou du
+fournisseur le fait re-rendre, deux bases du même processus ne partagent
+pas leurs rendus, et l'export en lot (demandes de prix, bons d'achat, devis)
+charge les documents en quelques requêtes. Lancé directement, le script compare l'export document par
+document sans cache à l'export en lot, à froid puis à chaud.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from crm import GestionnaireCRM
+from devis import GestionnaireDevis
+from erp_database import ERPDatabase
+from fournisseurs import GestionnaireFournisseurs
+from document_templates import (CompiledTemplate, DOCUMENT_BASE_CSS, document_css, get_document_cache,
+                                load_document_versions, render_bon_achat_html, render_devis_html)
+
+
+def creer_base_achats(nb_documents=4):
+    """Base temporaire : un fournisseur, des DP et BA avec deux lignes chacun"""
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_docs_"), "docs.db"))
+    gestionnaire = GestionnaireFournisseurs(db)
+    with db.get_connection() as conn:
+        conn.execute("INSERT INTO companies (id, nom, adresse, site_web) VALUES (900, 'Béton Granby', '12 rue du Quai', 'beton.ca')")
+        conn.execute("INSERT INTO fournisseurs (company_id, code_fournisseur, delai_livraison_moyen, contact_commercial) "
+                     "VALUES (900, 'FOUR-900', 7, 'Julie Roy')")
+        for i in range(1, nb_documents + 1):
+            for type_formulaire, prefixe, offset in (('DEMANDE_PRIX', 'DP', 0), ('BON_ACHAT', 'BA', 1000)):
+                conn.execute("INSERT INTO formulaires (id, type_formulaire, numero_document, company_id, statut, date_echeance, notes) "
+                             "VALUES (?, ?, ?, 900, 'VALIDÉ', '2026-11-30', 'Livrer par la porte arrière')",
+                             (offset + i, type_formulaire, f"{prefixe}-TEST-{i:04d}"))
+                conn.executemany("INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description, code_article, quantite, unite, prix_unitaire) "
+                                 "VALUES (?, ?, ?, ?, ?, 'SAC', ?)",
+                                 [(offset + i, 1, 'Ciment Portland', 'CIM-30', 10, 12.5),
+                                  (offset + i, 2, 'Sable lavé', None, 4, 30.0)])
+        conn.commit()
+    get_document_cache().invalidate()
+    return db, gestionnaire
+
+
+def test_gabarit_compile():
+    """Segments découpés une fois ; les spécifications de format sont refusées"""
+    gabarit = CompiledTemplate('essai', "<p>{a}</p>{{littéral}}<b>{b}</b>")
+    assert gabarit.fields == {'a', 'b'}
+    assert gabarit.render({'a': 1, 'b': 'x'}) == "<p>1</p>{littéral}<b>x</b>"
+    try:
+        CompiledTemplate('invalide', "{montant:,.2f}")
+        assert False, "spécification de format acceptée"
+    except ValueError:
+        pass
+    print("✅ Gabarit compilé")
+
+
+def test_rendu_et_feuille_commune():
+    """Contenu des documents ; même CSS de base, seules les variables changent"""
+    html_devis = render_devis_html({
+        'numero_document': 'DEV-2026-001', 'client_nom': 'Construction ABC', 'statut': 'APPROUVÉ',
+        'date_echeance': '2026-12-01', 'notes': 'Prix ferme 30 jours',
+        'lignes': [{'description': 'Coffrage', 'code_article': 'COF-1', 'quantite': 3, 'unite': 'h', 'prix_unitaire': 85}],
+        'totaux': {'total_ht': 255, 'montant_tva': 38.19, 'total_ttc': 293.19}
+    })
+    for attendu in ('DEV-2026-001', 'Construction ABC', 'badge-completed', '01/12/2026', 'Code: COF-1',
+                    '255.00 $', '293.19 $', 'TVA (14.975%)', 'Prix ferme 30 jours', '--primary-color: #3B82F6'):
+        assert attendu in html_devis, attendu
+
+    html_ba = render_bon_achat_html({'numero_document': 'BA-1'}, {'nom': 'Béton Granby'},
+                                    [{'description': 'Ciment', 'quantite': 2, 'prix_unitaire': 10}], 20, 3, 23, {})
+    assert '--summary-columns: 4' in html_ba and '--primary-color: #00A971' in html_ba
+    assert '<strong>20.00 $</strong>' in html_ba and '23.00 $ CAD' in html_ba
+    assert DOCUMENT_BASE_CSS in html_devis and DOCUMENT_BASE_CSS in html_ba
+    assert document_css('achats') is document_css('achats')
+    print("✅ Rendu et feuille de style commune")
+
+
+def test_cache_et_invalidation_par_version():
+    """Document inchangé servi par le cache ; re-rendu après modification d'une ligne ou du fournisseur"""
+    db, gestionnaire = creer_base_achats()
+    chargements = []
+    charger = gestionnaire._load_formulaires_for_export
+    gestionnaire._load_formulaires_for_export = lambda ids: chargements.append(list(ids)) or charger(ids)
+
+    html = gestionnaire.generate_bon_achat_html(1001)
+    assert 'BA-TEST-0001' in html and 'Ciment Portland' in html and 'FOUR-900' in html and '245.00 $' in html
+    assert gestionnaire.generate_bon_achat_html(1001) == html
+    assert chargements == [[1001]]
+
+    db.execute_update("UPDATE formulaire_lignes SET description = 'Ciment blanc' WHERE formulaire_id = 1001 AND sequence_ligne = 1")
+    assert 'Ciment blanc' in gestionnaire.generate_bon_achat_html(1001)
+    db.execute_update("UPDATE fournisseurs SET contact_commercial = 'Marc Roy' WHERE company_id = 900")
+    assert 'Marc Roy' in gestionnaire.generate_bon_achat_html(1001)
+    assert chargements == [[1001], [1001], [1001]]
+    assert gestionnaire.generate_demande_prix_html(99999) == ""
+    print("✅ Cache invalidé par la version du document")
+
+
+def test_export_en_lot():
+    """Lot rendu en un seul chargement, seuls les documents absents du cache sont rechargés"""
+    db, gestionnaire = creer_base_achats(nb_documents=6)
+    requetes = []
+    execute_query = db.execute_query
+    db.execute_query = lambda *args, **kwargs: requetes.append(1) or execute_query(*args, **kwargs)
+
+    gestionnaire.generate_demande_prix_html(2)
+    requetes.clear()
+    rendus = gestionnaire.generate_formulaires_html_batch([5, 1, 2, 3, 4, 6, 77777], 'DEMANDE_PRIX')
+    assert list(rendus) == [5, 1, 2, 3, 4, 6]
+    assert all('À chiffrer' in html and f'DP-TEST-{i:04d}' in html for i, html in rendus.items())
+    assert len(requetes) == 4  # versions + formulaires + lignes + fournisseurs
+
+    requetes.clear()
+    assert gestionnaire.generate_formulaires_html_batch(list(rendus), 'DEMANDE_PRIX') == rendus
+    assert len(requetes) == 1  # versions seulement
+    db.execute_query = execute_query
+    print("✅ Export en lot")
+
+
+def test_cache_distinct_par_base():
+    """Même id et même version dans deux bases : chaque base garde son propre rendu"""
+    db_a, gestionnaire_a = creer_base_achats()
+    db_b, gestionnaire_b = creer_base_achats()
+    db_b.execute_update("UPDATE formulaire_lignes SET description = 'Ciment Portlanb' WHERE formulaire_id = 1001 AND sequence_ligne = 1")
+    for db in (db_a, db_b):
+        db.execute_update("UPDATE formulaires SET updated_at = '2026-10-01 08:00:00' WHERE id = 1001")
+        db.execute_update("UPDATE companies SET updated_at = '2026-10-01 08:00:00' WHERE id = 900")
+    assert load_document_versions(db_a, [1001], True) == load_document_versions(db_b, [1001], True)
+
+    assert 'Ciment Portland' in gestionnaire_a.generate_bon_achat_html(1001)
+    html_b = gestionnaire_b.generate_bon_achat_html(1001)
+    assert 'Ciment Portlanb' in html_b and 'Ciment Portland' not in html_b
+    get_document_cache().invalidate(db=db_b)
+    assert get_document_cache().stats()['documents'] == 1  # le rendu de la base A reste
+    print("✅ Cache distinct par base")
+
+
+def test_export_devis_en_lot():
+    """Devis d'un lot chargés en trois requêtes (devis, lignes, historique), mêmes données que get_devis_complet"""
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_docs_"), "devis.db"))
+    gestionnaire = GestionnaireDevis(db, GestionnaireCRM(db), None, None)
+    prefixe = 'EST' if gestionnaire._devis_type_db == 'ESTIMATION' else 'DEV'
+    with db.get_connection() as conn:
+        conn.execute("INSERT INTO companies (id, nom, adresse, ville) VALUES (700, 'Construction ABC', '5 rue Dufferin', 'Granby')")
+        for i in range(1, 6):
+            conn.execute("INSERT INTO formulaires (id, type_formulaire, numero_document, company_id, statut, metadonnees_json) "
+                         "VALUES (?, ?, ?, 700, 'BROUILLON', ?)",
+                         (i, gestionnaire._devis_type_db, f"{prefixe}-TEST-{i:03d}",
+                          '{"type_reel": "DEVIS", "type_client": "ENTREPRISE", "secteur_construction": "COMMERCIAL"}'))
+            conn.executemany("INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description, quantite, unite, prix_unitaire) "
+                             "VALUES (?, ?, ?, ?, 'h', ?)", [(i, 1, 'Coffrage', i, 85.0), (i, 2, 'Finition', 2, 60.0)])
+            conn.execute("INSERT INTO formulaire_validations (formulaire_id, type_validation, commentaires) "
+                         "VALUES (?, 'CREATION', 'Créé')", (i,))
+        conn.commit()
+    get_document_cache().invalidate()
+
+    requetes = []
+    execute_query = db.execute_query
+    db.execute_query = lambda *args, **kwargs: requetes.append(1) or execute_query(*args, **kwargs)
+    devis = gestionnaire._load_devis_for_export([3, 1, 2, 4, 5, 88888])
+    assert len(requetes) == 3
+    db.execute_query = execute_query
+    assert sorted(devis) == [1, 2, 3, 4, 5]
+    for devis_id, donnees in devis.items():
+        assert [l['description'] for l in donnees['lignes']] == ['Coffrage', 'Finition']
+        assert [h['commentaires'] for h in donnees['historique']] == ['Créé']
+        assert donnees['totaux'] == gestionnaire.calculer_totaux_devis(devis_id)
+        assert donnees['totaux']['total_ht'] == devis_id * 85.0 + 120.0
+        assert donnees['client_adresse_complete'].startswith('5 rue Dufferin')
+    assert gestionnaire.get_devis_complet(2) == devis[2]
+
+    rendus = gestionnaire.export_devis_html_batch([1, 2, 3, 4, 5])
+    assert all(f'{prefixe}-TEST-{i:03d}' in html and 'Construction ABC' in html for i, html in rendus.items())
+    assert list(rendus) == [1, 2, 3, 4, 5]
+    print("✅ Export des devis en lot")
+
+
+def benchmark_export(nb_documents=300):
+    """Ancien export (document par document, sans cache) vs lot à froid vs lot à chaud"""
+    db, gestionnaire = creer_base_achats(nb_documents=nb_documents)
+    ids = [1000 + i for i in range(1, nb_documents + 1)]
+    cache = get_document_cache()
+    print(f"📊 Benchmark: {nb_documents} bons d'achat")
+
+    def document_par_document():
+        for formulaire_id in ids:
+            cache.invalidate()
+            gestionnaire.generate_bon_achat_html(formulaire_id)
+
+    def lot_a_froid():
+        cache.invalidate()
+        gestionnaire.generate_formulaires_html_batch(ids, 'BON_ACHAT')
+
+    for libelle, fonction in (("Document par document, sans cache", document_par_document),
+                              ("Lot à froid", lot_a_froid),
+                              ("Lot à chaud (versions seules)", lambda: gestionnaire.generate_formulaires_html_batch(ids, 'BON_ACHAT'))):
+        t0 = time.perf_counter()
+        fonction()
+        print(f"  {libelle:<38} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+    print(f"  Cache: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    test_gabarit_compile()
+    test_rendu_et_feuille_commune()
+    test_cache_et_invalidation_par_version()
+    test_export_en_lot()
+    test_cache_distinct_par_base()
+    test_export_devis_en_lot()
+    benchmark_export()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# test_employee_roster.py - Tests et benchmark du chargement groupé des employés
+# ERP Production DG Inc.
+
+"""
+Vérifie que employee_roster.py produit exactement le même roster que l'ancien
+chargement employé par employé (compétences + assignations), en un nombre
+constant de requêtes, que les index répondent comme les anciens parcours de
+liste et que le cache partagé se recharge après une écriture externe.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from erp_database import ERPDatabase
+import employee_roster
+from employee_roster import get_shared_roster, invalidate_roster, load_employee_roster
+
+DEPARTEMENTS = ['CHANTIER', 'FINITION', 'ÉLECTRICITÉ', 'DIRECTION', 'ADMINISTRATION']
+
+
+def creer_jeu_employes(nb_employes=200, seed=3):
+    """Base temporaire avec employés hiérarchisés, compétences et assignations"""
+    rng = random.Random(seed)
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_roster_"), "roster.db"))
+    with db.get_connection() as conn:
+        conn.executemany("INSERT INTO projects (id, nom_projet) VALUES (?, ?)",
+                         [(p, f"Projet {p}") for p in range(1, 21)])
+        for emp_id in range(1, nb_employes + 1):
+            manager_id = rng.randint(1, min(10, emp_id - 1)) if emp_id > 10 else None
+            conn.execute(
+                "INSERT INTO employees (id, prenom, nom, email, departement, manager_id, statut) VALUES (?, ?, ?, ?, ?, ?, 'ACTIF')",
+                (emp_id, f"Prénom{emp_id}", f"Nom{emp_id}", f"emp{emp_id}@test.ca", rng.choice(DEPARTEMENTS), manager_id)
+            )
+            for _ in range(rng.randint(0, 4)):
+                conn.execute(
+                    "INSERT INTO employee_competences (employee_id, nom_competence, niveau, certifie) VALUES (?, ?, ?, ?)",
+                    (emp_id, f"Compétence {rng.randint(1, 30)}", rng.choice(['DÉBUTANT', 'EXPERT']), rng.randint(0, 1))
+                )
+            for projet_id in rng.sample(range(1, 21), rng.randint(0, 3)):
+                conn.execute("INSERT INTO project_assignments (project_id, employee_id, role_projet) VALUES (?, ?, 'Membre équipe')",
+                             (projet_id, emp_id))
+        conn.commit()
+    return db
+
+
+def ancien_chargement(db):
+    """Ancien _load_employes_from_db : deux requêtes par employé"""
+    employes = []
+    for emp_row in db.execute_query("""
+        SELECT e.*, m.prenom as manager_prenom, m.nom as manager_nom
+        FROM employees e LEFT JOIN employees m ON e.manager_id = m.id ORDER BY e.id
+    """):
+        employe = dict(emp_row)
+        employe['competences'] = [
+            {'nom': r['nom_competence'], 'niveau': r['niveau'], 'certifie': bool(r['certifie']), 'date_obtention': r['date_obtention']}
+            for r in db.execute_query("SELECT nom_competence, niveau, certifie, date_obtention FROM employee_competences "
+                                      "WHERE employee_id = ? ORDER BY nom_competence", (employe['id'],))
+        ]
+        employe['projets_assignes'] = [r['project_id'] for r in db.execute_query(
+            "SELECT project_id FROM project_assignments WHERE employee_id = ?", (employe['id'],))]
+        employes.append(employe)
+    return employes
+
+
+def normaliser(employes):
+    """Ordre des compétences de même nom et des projets non garanti par l'ancienne requête"""
+    return [{**e, 'competences': sorted(e['competences'], key=lambda c: (c['nom'], c['niveau'], c['certifie'])),
+             'projets_assignes': sorted(e['projets_assignes'])} for e in employes]
+
+
+def test_roster_identique_et_requetes_constantes():
+    """Même contenu que l'ancien chargement, en 3 requêtes quel que soit le nombre d'employés"""
+    db = creer_jeu_employes()
+    appels = []
+    execute_query = db.execute_query
+    db.execute_query = lambda *args, **kwargs: appels.append(1) or execute_query(*args, **kwargs)
+    roster = load_employee_roster(db)
+    db.execute_query = execute_query
+
+    assert len(appels) == 3
+    assert normaliser(roster.employes) == normaliser(ancien_chargement(db))
+    print("✅ Roster identique en 3 requêtes")
+
+
+def test_index_equivalents_aux_parcours():
+    """Les index répondent comme les anciens parcours de liste"""
+    db = creer_jeu_employes()
+    roster = load_employee_roster(db)
+    employes = roster.employes
+
+    for departement in DEPARTEMENTS + ['INCONNU']:
+        assert roster.get_by_departement(departement) == [e for e in employes if e.get('departement') == departement]
+    for manager_id in range(1, 12):
+        assert roster.get_subordinates(manager_id) == [e for e in employes if e.get('manager_id') == manager_id]
+    for projet_id in range(1, 21):
+        assert roster.get_by_projet(projet_id) == [e for e in employes if projet_id in e.get('projets_assignes', [])]
+    assert roster.get_managers() == [e for e in employes if not e.get('manager_id')
+                                     or e.get('departement') in ['DIRECTION', 'COMMERCIAL', 'ADMINISTRATION']]
+    assert roster.get_by_id(42)['id'] == 42 and roster.get_by_id(99999) is None
+    print("✅ Index équivalents aux parcours de liste")
+
+
+def test_cache_partage_et_invalidation():
+    """Même roster entre appels, sans relire la signature ; rechargé après une écriture externe"""
+    db = creer_jeu_employes(nb_employes=30)
+    premier = get_shared_roster(db)
+    signature, employee_roster.roster_signature = employee_roster.roster_signature, None
+    try:
+        # Dans l'intervalle de vérification : aucune requête (roster_signature non appelée)
+        assert all(get_shared_roster(db) is premier for _ in range(100))
+    finally:
+        employee_roster.roster_signature = signature
+
+    # Remplacement des compétences par un autre module (delete + insert), vu à la vérification suivante
+    db.execute_update("DELETE FROM employee_competences WHERE employee_id = 5")
+    db.execute_update("INSERT INTO employee_competences (employee_id, nom_competence, niveau, certifie) VALUES (5, 'Grutier', 'EXPERT', 1)")
+    assert get_shared_roster(db) is premier
+    premier.checked_at = 0.0
+    recharge = get_shared_roster(db)
+    assert recharge is not premier
+    assert [c['nom'] for c in recharge.get_by_id(5)['competences']] == ['Grutier']
+    recharge.checked_at = 0.0
+    assert get_shared_roster(db) is recharge  # signature inchangée : gardé
+
+    invalidate_roster(db)
+    assert get_shared_roster(db) is not recharge
+    print("✅ Cache partagé et invalidation")
+
+
+def benchmark_chargement(nb_employes=2000):
+    """Ancien chargement N+1 vs chargement groupé"""
+    db = creer_jeu_employes(nb_employes=nb_employes)
+    print(f"📊 Benchmark: {nb_employes} employés")
+    get_shared_roster(db)  # Cache chaud
+    for libelle, fonction in (("Ancien chargement (2 requêtes/employé)", lambda: ancien_chargement(db)),
+                              ("Chargement groupé (3 requêtes)", lambda: load_employee_roster(db))):
+        t0 = time.perf_counter()
+        fonction()
+        print(f"  {libelle:<42} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+    # Liste des employés : un get_employe_by_id (manager) par ligne
+    t0 = time.perf_counter()
+    for employe_id in range(1, nb_employes + 1):
+        get_shared_roster(db).get_by_id(employe_id)
+    print(f"  {f'{nb_employes} recherches par id (cache chaud)':<42} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    test_roster_identique_et_requetes_constantes()
+    test_index_equivalents_aux_parcours()
+    test_cache_partage_et_invalidation()
+    benchmark_chargement()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# test_erp_context.py - Tests de la collecte parallèle du contexte ERP
+# ERP Production DG Inc.
+
+"""
+Vérifie que erp_context.py exécute les collecteurs en parallèle sur des
+connexions en lecture seule, rend les données et métriques de chacun,
+interrompt un collecteur hors délai (section vide, contexte partiel) sans
+attendre sa requête, et isole les erreurs d'un collecteur.
+Lancé directement, le script compare la collecte séquentielle et parallèle
+de cinq agrégations sur une base de démonstration.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from erp_context import STATUT_DELAI, STATUT_ERREUR, STATUT_OK, ReadOnlyDatabase, collect_context, \
+    sections_indisponibles
+from erp_database import ERPDatabase
+
+# Requête volontairement longue (plusieurs secondes) pour les délais
+REQUETE_LENTE = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000000)
+    SELECT COUNT(*) as total FROM n
+"""
+
+
+def creer_base(nb_projets=200):
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_context_"), "context.db"))
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO projects (nom_projet, statut, prix_estime) VALUES (?, ?, ?)",
+                     [(f"Projet {i}", ['EN COURS', 'À FAIRE', 'TERMINÉ'][i % 3], i * 100.0)
+                      for i in range(nb_projets)])
+    conn.commit()
+    conn.close()
+    return db
+
+
+def test_collecte_parallele_en_lecture_seule():
+    """Collecteurs simultanés, chacun sur sa connexion en lecture seule"""
+    db = creer_base()
+    threads, lecteurs = set(), []
+
+    def collecteur(statut):
+        def collecter(lecteur):
+            threads.add(threading.get_ident())
+            lecteurs.append(lecteur)
+            time.sleep(0.2)
+            return lecteur.execute_query("SELECT COUNT(*) as n FROM projects WHERE statut = ?", (statut,))[0]
+        return collecter
+
+    t0 = time.perf_counter()
+    collecte = collect_context([(s, collecteur(s)) for s in ('EN COURS', 'À FAIRE', 'TERMINÉ')], db)
+    duree = time.perf_counter() - t0
+    assert duree < 0.5, duree  # ~0.2 s et non 0.6 s
+    assert {nom: d['n'] for nom, d in collecte['donnees'].items()} == {'EN COURS': 67, 'À FAIRE': 67, 'TERMINÉ': 66}
+    assert all(m['statut'] == STATUT_OK and m['ms'] >= 200 for m in collecte['metriques'].values())
+    assert not collecte['partiel'] and sections_indisponibles(collecte) == []
+    assert len(threads) == 3 and all(isinstance(lecteur, ReadOnlyDatabase) for lecteur in lecteurs)
+    assert len({id(lecteur) for lecteur in lecteurs}) == 3
+
+    # Écriture refusée : erreur isolée au collecteur, section par défaut
+    collecte = collect_context([
+        ('ecriture', lambda lecteur: lecteur.execute_query("DELETE FROM projects")),
+        ('lecture', lambda lecteur: lecteur.execute_query("SELECT COUNT(*) as n FROM projects")[0]['n']),
+    ], db)
+    assert collecte['metriques']['ecriture']['statut'] == STATUT_ERREUR
+    assert collecte['donnees']['ecriture'] == {} and collecte['donnees']['lecture'] == 200
+    assert db.get_table_count('projects') == 200
+    assert collecte['partiel'] and sections_indisponibles(collecte) == ['ecriture']
+    print("✅ Collecte parallèle en lecture seule")
+
+
+def test_delai_par_collecteur():
+    """Collecteur hors délai : requête interrompue, section vide, les autres rendues"""
+    db = creer_base(10)
+    t0 = time.perf_counter()
+    collecte = collect_context([
+        ('lent', lambda lecteur: lecteur.execute_query(REQUETE_LENTE)),
+        ('rapide', lambda lecteur: lecteur.execute_query("SELECT COUNT(*) as n FROM projects")[0]['n']),
+    ], db, timeout=5.0, timeouts={'lent': 0.3}, default=lambda: {'indisponible': True})
+    assert time.perf_counter() - t0 < 1.5
+    assert collecte['metriques']['lent']['statut'] == STATUT_DELAI
+    assert collecte['donnees'] == {'lent': {'indisponible': True}, 'rapide': 10}
+    assert collecte['partiel']
+    # La requête interrompue libère son thread
+    time.sleep(0.3)
+    assert not any(t.name.startswith('erp_context') for t in threading.enumerate())
+    print("✅ Délai par collecteur")
+
+
+def test_base_sans_fichier():
+    """Base sans fichier (objet factice) : les collecteurs reçoivent la base partagée"""
+    class BaseFactice:
+        def execute_query(self, query, params=None):
+            return [{'n': 1}]
+
+    base = BaseFactice()
+    collecte = collect_context([('a', lambda db: db), ('b', lambda db: db.execute_query("SELECT 1"))], base)
+    assert collecte['donnees']['a'] is base and collecte['donnees']['b'] == [{'n': 1}]
+    assert collect_context([], base) == {'donnees': {}, 'metriques': {}, 'partiel': False, 'duree_ms': 0.0}
+    print("✅ Base sans fichier")
+
+
+def benchmark_collecte(nb_projets=300000):
+    """Cinq agrégations indépendantes : séquentiel (ancien) vs parallèle"""
+    db = creer_base(nb_projets)
+    print(f"📊 Benchmark: 5 agrégations sur {nb_projets} projets ({os.cpu_count()} CPU)")
+    agregations = [
+        (f"agregat_{i}", lambda lecteur, i=i: lecteur.execute_query(
+            f"SELECT statut, COUNT(*) as n, SUM(prix_estime * {i + 1}) as total, "
+            f"AVG(length(nom_projet)) as l FROM projects GROUP BY statut"))
+        for i in range(5)
+    ]
+    t0 = time.perf_counter()
+    for _, collecter in agregations:
+        collecter(db)
+    print(f"  {'Séquentiel (ancien)':<24} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+    t0 = time.perf_counter()
+    collect_context(agregations, db)
+    print(f"  {'Parallèle (nouveau)':<24} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    test_collecte_parallele_en_lecture_seule()
+    test_delai_par_collecteur()
+    test_base_sans_fichier()
+    benchmark_collecte()
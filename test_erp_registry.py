@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# test_erp_registry.py - Tests du registre partagé et de l'empreinte du schéma
+# ERP Production DG Inc.
+
+"""
+Vérifie que les ressources ERP sont construites une seule fois par processus
+(même avec des sessions concurrentes), que LazyResource ne les construit
+qu'au premier accès, et que ERPDatabase saute le DDL quand l'empreinte du
+schéma enregistrée est à jour.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+import erp_database
+from erp_database import ERPDatabase
+from erp_registry import LazyResource, clear_shared_resources, get_registry_stats, get_shared_resource
+
+
+def test_registre_construit_une_seule_fois():
+    """Dix sessions simultanées obtiennent la même instance"""
+    clear_shared_resources()
+    constructions = []
+
+    def factory():
+        constructions.append(1)
+        time.sleep(0.05)
+        return object()
+
+    resultats = []
+    threads = [threading.Thread(target=lambda: resultats.append(get_shared_resource('gestionnaire', factory, key='a.db')))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(constructions) == 1
+    assert all(r is resultats[0] for r in resultats)
+    assert get_shared_resource('gestionnaire', factory, key='b.db') is not resultats[0]
+    assert get_registry_stats()['nb_ressources'] == 2
+    clear_shared_resources()
+    print("✅ Ressource construite une seule fois")
+
+
+def test_ressource_paresseuse():
+    """Construite au premier accès seulement, partagée par les sessions ; indisponible = faux"""
+    clear_shared_resources()
+    constructions = []
+
+    class Gestionnaire:
+        def __init__(self):
+            constructions.append(1)
+            self.nom = 'crm'
+
+    def factory():
+        return Gestionnaire()
+
+    session_a = LazyResource('gestionnaire_crm', factory, key='a.db')
+    session_b = LazyResource('gestionnaire_crm', factory, key='a.db')
+    assert constructions == [] and get_registry_stats()['nb_ressources'] == 0
+    assert session_a.nom == 'crm' and session_b.nom == 'crm'
+    assert constructions == [1]
+    session_b.filtre = 'actifs'
+    assert session_a.resolve().filtre == 'actifs'
+
+    absente = LazyResource('gestionnaire_devis', lambda: None, key='a.db')
+    assert not absente and not hasattr(absente, 'nom')
+    clear_shared_resources()
+    print("✅ Ressource paresseuse")
+
+
+def test_empreinte_schema_saute_ddl():
+    """Deuxième ouverture : pas de DDL ; schéma modifié : DDL relancé"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="erp_registre_"), "registre.db")
+
+    t0 = time.perf_counter()
+    ERPDatabase(db_path)
+    duree_init = time.perf_counter() - t0
+
+    # Nouveau processus simulé : seule l'empreinte stockée en base fait foi
+    erp_database._SCHEMA_READY_PATHS.clear()
+    appels = []
+    original = ERPDatabase.init_database
+    ERPDatabase.init_database = lambda self: appels.append(1) or original(self)
+    try:
+        t0 = time.perf_counter()
+        ERPDatabase(db_path)
+        duree_reouverture = time.perf_counter() - t0
+        assert appels == [], "DDL relancé malgré une empreinte à jour"
+
+        # Schéma modifié hors de l'application : l'empreinte ne correspond plus
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE table_externe (id INTEGER)")
+        erp_database._SCHEMA_READY_PATHS.clear()
+        ERPDatabase(db_path)
+        assert appels == [1]
+    finally:
+        ERPDatabase.init_database = original
+
+    print(f"📊 Initialisation complète {duree_init * 1000:.0f} ms, réouverture {duree_reouverture * 1000:.1f} ms")
+    assert duree_reouverture < duree_init
+
+
+if __name__ == "__main__":
+    test_registre_construit_une_seule_fois()
+    test_ressource_paresseuse()
+    test_empreinte_schema_saute_ddl()
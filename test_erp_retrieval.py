@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# test_erp_retrieval.py - Tests de l'index de recherche BM25 des enregistrements ERP
+# ERP Production DG Inc.
+
+"""
+Vérifie que erp_retrieval.py retrouve les enregistrements pertinents d'une
+question en langage naturel (sans mot déclencheur), classe par BM25 (termes
+rares et nom avant description), filtre par type, et se tient à jour :
+seuls les enregistrements modifiés sont re-tokenisés, les supprimés
+disparaissent, refresh_record() met à jour un enregistrement précis, et
+un UPDATE de produits ou des compétences est vu par la recherche suivante.
+La conversation naturelle de l'assistant simple joint au prompt les
+enregistrements trouvés, pas les tables entières, et une écriture dans une
+table source invalide sa réponse en cache.
+Lancé directement, le script compare l'ancienne recherche LIKE à l'index sur
+une base de démonstration.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+import erp_retrieval
+from erp_database import ERPDatabase
+from erp_retrieval import RETRIEVAL_SOURCES, RetrievalIndex, describe_record, get_retrieval_index, \
+    invalidate_index, refresh_record, search_records
+from fake_anthropic_server import FakeMessagesServer, MessagesHTTPClient
+
+
+def creer_base(nb_projets=0):
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_retrieval_"), "retrieval.db"))
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("INSERT INTO companies (id, nom, secteur) VALUES (1, 'Hydro Québec', 'Énergie')")
+    conn.execute("INSERT INTO companies (id, nom, secteur) VALUES (2, 'Métallurgie Laval', 'Fabrication')")
+    conn.execute("INSERT INTO projects (id, nom_projet, client_company_id, statut, description) VALUES "
+                 "(1, 'Passerelle acier inoxydable', 1, 'EN COURS', 'Soudure TIG et garde-corps')")
+    conn.execute("INSERT INTO projects (id, nom_projet, client_company_id, statut, description) VALUES "
+                 "(2, 'Réservoir aluminium', 2, 'À FAIRE', 'Découpe plasma, passerelle d''accès')")
+    conn.execute("INSERT INTO contacts (id, prenom, nom_famille, company_id, role_poste) VALUES "
+                 "(1, 'Julie', 'Tremblay', 1, 'Acheteuse')")
+    conn.execute("INSERT INTO interactions (id, contact_id, company_id, type_interaction, resume) VALUES "
+                 "(1, 1, 1, 'Appel', 'Relance sur le délai de livraison de la passerelle')")
+    conn.execute("INSERT INTO formulaires (id, type_formulaire, numero_document, statut, metadonnees_json) VALUES "
+                 "(1, 'BON_TRAVAIL', 'BT-2024-001', 'VALIDÉ', ?)",
+                 (json.dumps({'project_name': 'Passerelle acier inoxydable', 'client_name': 'Hydro Québec'}),))
+    conn.execute("INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description) VALUES "
+                 "(1, 1, 'Soudage des montants')")
+    conn.execute("INSERT INTO formulaires (id, type_formulaire, numero_document, statut, montant_total) VALUES "
+                 "(2, 'ESTIMATION', 'EST-2024-007', 'BROUILLON', 12500)")
+    conn.execute("INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description) VALUES "
+                 "(2, 1, 'Réservoir aluminium 5000 litres')")
+    conn.executemany("INSERT INTO projects (nom_projet, statut, description) VALUES (?, 'EN COURS', ?)",
+                     [(f"Projet démo {i}", f"Fabrication pièce {i} en acier") for i in range(nb_projets)])
+    conn.commit()
+    conn.close()
+    return db
+
+
+def test_recherche_en_langage_naturel():
+    """Question sans mot déclencheur : projets, BT, devis, contacts et interactions pertinents"""
+    db = creer_base()
+    index = RetrievalIndex()
+    changes = index.sync(db)
+    assert changes['projets'] == 2 and changes['bons_travail'] == 1 and changes['devis'] == 1
+    assert changes['produits'] == 0  # table absente de cette base : source ignorée
+    hits = index.search("Où en est la passerelle en inox pour Hydro-Québec ?")
+    assert hits[0]['type'] in ('projets', 'bons_travail', 'interactions') and hits[0]['id'] == 1
+    assert {(h['type'], h['id']) for h in hits} >= {('projets', 1), ('bons_travail', 1), ('interactions', 1)}
+    assert all(h['score'] > 0 for h in hits) and hits == sorted(hits, key=lambda h: -h['score'])
+
+    # Le nom compte plus que la description
+    assert [h['id'] for h in index.search("passerelle", types=['projets'])] == [1, 2]
+    assert index.search("réservoirs")[0]['record']['nom_projet'] == 'Réservoir aluminium'
+    devis = index.search("EST-2024-007")[0]
+    assert devis['type'] == 'devis' and devis['record']['titre'] == 'Réservoir aluminium 5000 litres'
+    assert index.search("Julie Tremblay", types=['contacts'])[0]['record']['entreprise_nom'] == 'Hydro Québec'
+    assert index.search("météo de demain") == [] and index.search("") == []
+    assert index.search("passerelle", k=1)[0]['id'] == 1
+    assert 'Passerelle acier inoxydable' in describe_record('bons_travail', index.search("BT-2024-001")[0]['record'])
+    print("✅ Recherche en langage naturel")
+
+
+def test_mise_a_jour_incrementale():
+    """Seuls les enregistrements modifiés sont re-tokenisés ; supprimés retirés ; refresh_record"""
+    db = creer_base(50)
+    index = RetrievalIndex()
+    index.sync(db)
+    assert index.sync(db) == {}  # empreintes inchangées : aucune source relue
+
+    db.execute_update("UPDATE projects SET nom_projet = 'Escalier hélicoïdal' WHERE id = 2")
+    assert index.sync(db) == {'projets': 1}
+    assert index.search("escalier")[0]['id'] == 2 and not index.search("réservoir", types=['projets'])
+    db.execute_update("UPDATE projects SET statut = 'TERMINÉ' WHERE id = 1")
+    assert index.sync(db) == {'projets': 1}
+    assert index.search("terminé")[0]['record']['statut'] == 'TERMINÉ'
+    db.execute_update("DELETE FROM projects WHERE id = 1")
+    db.execute_insert("INSERT INTO projects (nom_projet, statut) VALUES ('Garde-corps galvanisé', 'EN COURS')")
+    assert index.sync(db) == {'projets': 2}
+    assert [h['id'] for h in index.search("passerelle", types=['projets'])] == [2]  # description du 2
+    assert index.search("galvanisé")[0]['record']['nom_projet'] == 'Garde-corps galvanisé'
+
+    # Index partagé : refresh_record après une écriture, sans attendre la vérification des empreintes
+    invalidate_index(db)
+    shared = get_retrieval_index(db)
+    assert get_retrieval_index(db) is shared and len(shared) == len(index)
+    db.execute_update("UPDATE contacts SET role_poste = 'Directrice des achats' WHERE id = 1")
+    refresh_record(db, 'contacts', 1)
+    assert search_records(db, "directrice achats")['contacts'][0]['nom_famille'] == 'Tremblay'
+    db.execute_update("DELETE FROM interactions WHERE contact_id = 1")
+    db.execute_update("DELETE FROM contacts WHERE id = 1")
+    refresh_record(db, 'contacts', 1)
+    assert 'contacts' not in search_records(db, "Tremblay")
+    print("✅ Mise à jour incrémentale")
+
+
+def test_produits_et_competences_suivis():
+    """UPDATE de produits (table créée par le gestionnaire) et des compétences vu par la recherche suivante"""
+    from produits import GestionnaireProduits
+    db = creer_base()
+    GestionnaireProduits(db)
+    db.execute_insert("INSERT INTO employees (id, prenom, nom, poste) VALUES (1, 'Marc', 'Gagnon', 'Soudeur')")
+    db.execute_insert("INSERT INTO employee_competences (employee_id, nom_competence, niveau) VALUES (1, 'MIG', 'AVANCÉ')")
+    versions = {r['table_name'] for r in db.execute_query("SELECT table_name FROM data_versions")}
+    assert {'produits', 'employee_competences'} <= versions
+
+    invalidate_index(db)
+    erp_retrieval.SYNC_CHECK_SECONDS, delai = 0.0, erp_retrieval.SYNC_CHECK_SECONDS
+    try:
+        produit = search_records(db, "gypse", types=['produits'])['produits'][0]
+        db.execute_update("UPDATE produits SET stock_disponible = 3, prix_unitaire = 99 WHERE id = ?",
+                          (produit['id'],))
+        modifie = search_records(db, "gypse", types=['produits'])['produits'][0]
+        assert (modifie['id'], modifie['stock_disponible'], modifie['prix_unitaire']) == (produit['id'], 3, 99)
+
+        assert 'MIG' in search_records(db, "Gagnon")['employes'][0]['competences']
+        db.execute_update("UPDATE employee_competences SET nom_competence = 'TIG' WHERE employee_id = 1")
+        assert 'TIG' in search_records(db, "Gagnon")['employes'][0]['competences']
+    finally:
+        erp_retrieval.SYNC_CHECK_SECONDS = delai
+    print("✅ Produits et compétences suivis")
+
+
+def test_conversation_naturelle_par_recherche():
+    """Prompt de conversation : top-k de la recherche ; cache invalidé par les tables sources"""
+    try:
+        from assistant_ia_simple import CONVERSATION_TABLES, AssistantIASimple
+    except ImportError as e:
+        print(f"⚠️ Test conversation sauté - assistant non importable : {e}")
+        return
+    assert {table for source in RETRIEVAL_SOURCES for table in source[1]} <= set(CONVERSATION_TABLES)
+
+    db = creer_base(nb_projets=50)
+    invalidate_index(db)
+    question = "Où en est le délai de livraison pour Julie Tremblay ?"
+    with FakeMessagesServer(default_text="Livraison prévue vendredi.") as server:
+        assistant = AssistantIASimple(db, api_key="cle-test")
+        assistant.client = MessagesHTTPClient(server.url)
+        assert assistant.conversation_naturelle(question) == "Livraison prévue vendredi."
+        prompt = server.requests[-1]['messages'][0]['content']
+        assert "Relance sur le délai de livraison de la passerelle" in prompt
+        assert "projets_actifs" not in prompt and "Projet démo" not in prompt  # plus de dump des tables
+
+        assert assistant.conversation_naturelle(question) == "Livraison prévue vendredi."
+        assert len(server.requests) == 1  # réponse en cache
+        # Interactions : source de la recherche hors des anciennes tables du prompt
+        db.execute_update("UPDATE interactions SET resultat = 'Livré' WHERE id = 1")
+        assistant.conversation_naturelle(question)
+        assert len(server.requests) == 2
+    print("✅ Conversation naturelle par recherche")
+
+
+def benchmark_recherche(nb_projets=20000, nb_questions=200):
+    """Ancienne recherche LIKE (question entière) vs index BM25"""
+    db = creer_base(nb_projets)
+    question = "Quel est le statut de la passerelle en acier inoxydable pour Hydro Québec ?"
+    print(f"📊 Benchmark: {nb_questions} questions sur {nb_projets} projets")
+    t0 = time.perf_counter()
+    for _ in range(nb_questions):
+        anciens = db.execute_query("SELECT * FROM projects WHERE nom_projet LIKE ? OR description LIKE ? LIMIT 5",
+                                   (f'%{question}%', f'%{question}%'))
+    print(f"  {'LIKE (ancien)':<28} {(time.perf_counter() - t0) / nb_questions * 1000:8.2f} ms / question"
+          f" ({len(anciens)} résultat)")
+    invalidate_index(db)
+    t0 = time.perf_counter()
+    index = get_retrieval_index(db)
+    print(f"  {'Construction index':<28} {(time.perf_counter() - t0) * 1000:8.0f} ms ({len(index)} documents)")
+    t0 = time.perf_counter()
+    for _ in range(nb_questions):
+        hits = index.search(question, k=erp_retrieval.DEFAULT_TOP_K)
+    print(f"  {'BM25 (nouveau)':<28} {(time.perf_counter() - t0) / nb_questions * 1000:8.2f} ms / question"
+          f" (premier : {hits[0]['type']} {hits[0]['id']})")
+    db.execute_update("UPDATE projects SET nom_projet = 'Passerelle modifiée' WHERE id = 5")
+    t0 = time.perf_counter()
+    index.sync(db)
+    print(f"  {'Resynchronisation (1 modif)':<28} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    test_recherche_en_langage_naturel()
+    test_mise_a_jour_incrementale()
+    test_produits_et_competences_suivis()
+    test_conversation_naturelle_par_recherche()
+    benchmark_recherche()
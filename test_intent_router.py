@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# test_intent_router.py - Tests du routage compilé des messages de l'assistant
+# ERP Production DG Inc.
+
+"""
+Vérifie que les tables d'intention de intent_router.py (celles des deux
+assistants) donnent la même intention que la cascade de any(mot in message
+...) qu'elles remplacent (priorités comprises, mots-clés qui se chevauchent,
+modification en lot), reconnaît et normalise les numéros BT-, EST-, DP-, BA- et
+PRJ- (en conversation et après /erp), ne traite localement que les simples
+demandes de fiche, et compte les décisions de routage.
+Lancé directement, le script compare la durée de la cascade et du routeur
+compilé sur des messages réalistes.
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from intent_router import INTENTIONS_ASSISTANT, INTENTIONS_CONVERSATION, MODIFICATION_EN_LOT, KeywordRouter, \
+    conversation_intent, find_document, is_lookup, local_share, record_route, reset_routing_stats, routing_stats
+
+MOTS = ['bonjour', 'le', 'projet', 'garde-corps', 'de', 'la', 'semaine', 'est', '?', 'pour', 'Lévis', 'acier',
+        'BT-2025-001', 'demain', 'tous']
+
+
+def cascade(message_lower, routeur=INTENTIONS_CONVERSATION):
+    """La détection d'origine : un any(...) par intention, dans l'ordre de la table"""
+    for intention, mots in routeur.rules:
+        if any(mot in message_lower for mot in mots):
+            return intention
+    return routeur.default
+
+
+def cascade_conversation(message_lower):
+    """_detecter_intention_conversation d'origine : cascade, puis 'tous'/'toutes'... pour une modification en lot"""
+    intention = cascade(message_lower)
+    if intention == 'modifier_projet' and any(mot in message_lower for _, mots in MODIFICATION_EN_LOT.rules
+                                              for mot in mots):
+        return 'modifier_projets_multiple'
+    return intention
+
+
+def messages_aleatoires(nombre, graine=7):
+    hasard = random.Random(graine)
+    mots_cles = [mot for routeur in (INTENTIONS_CONVERSATION, MODIFICATION_EN_LOT, INTENTIONS_ASSISTANT)
+                 for _, mots in routeur.rules for mot in mots]
+    messages = []
+    for _ in range(nombre):
+        mots = [hasard.choice(MOTS) for _ in range(hasard.randint(3, 25))]
+        for _ in range(hasard.randint(0, 3)):
+            mots.insert(hasard.randint(0, len(mots)), hasard.choice(mots_cles))
+        messages.append(' '.join(mots).lower())
+    return messages
+
+
+def test_meme_intention_que_la_cascade():
+    """Tables des assistants : même intention que la cascade (priorités, chevauchements, modification en lot)"""
+    cas = ["qu'en penses-tu du budget ?", "mettre le projet en pause", "le stock manque, quel état ?",
+           "comment ça va", "passer à la tâche 1.2", "bonjour", "", "client : loc nguyen, budget 10 000 $",
+           "mettre tous les projets en pause", "change le statut de toutes les soumissions",
+           "nom du projet : passerelle", "créer ces projets", "un devis pour ce prospect"]
+    for message in cas + messages_aleatoires(3000):
+        assert conversation_intent(message) == cascade_conversation(message), message
+        assert INTENTIONS_ASSISTANT.route(message) == cascade(message, INTENTIONS_ASSISTANT), message
+    assert conversation_intent("mettre le projet en pause") == 'modifier_projet'
+    assert conversation_intent("mettre tous les projets en pause") == 'modifier_projets_multiple'
+    assert conversation_intent("nom du projet : passerelle") == 'creer_projet'
+    # 'tous' hors modification : pas une modification en lot
+    assert conversation_intent("quel budget pour tous les projets ?") == 'analyse_financiere'
+    # 'prix' l'emporte sur 'client :' : l'ordre de la table fait la priorité
+    assert conversation_intent("client : loc nguyen, prix 10 000 $") == 'analyse_financiere'
+    assert INTENTIONS_ASSISTANT.route("un devis pour ce prospect") == 'gestion_devis'
+    assert KeywordRouter((), default='aucune').route("n'importe quoi") == 'aucune'
+    print("✅ Même intention que la cascade")
+
+
+def test_numeros_de_documents():
+    """Numéros reconnus et normalisés ; simples demandes de fiche seulement"""
+    assert find_document("montre-moi le BT-2025-001")[:2] == ('bt', 'BT-2025-001')
+    assert find_document("affiche est2025003 stp")[:2] == ('devis', 'EST-2025-003')
+    assert find_document("Détails du DP-2025 004")[:2] == ('dp', 'DP-2025-004')
+    assert find_document("ba-2025-002")[:2] == ('ba', 'BA-2025-002')
+    assert find_document("fiche PRJ-25-251")[:2] == ('projet', '25-251')
+    assert find_document("le prix est 2025 001 $") is None  # pas un devis
+    assert find_document("ABT-2025-001") is None and find_document("BT-2025-0012") is None
+    # Après /erp : en tête seulement, projet sans préfixe accepté, séparateurs espace
+    assert find_document("bt 2025 001", command=True)[:2] == ('bt', 'BT-2025-001')
+    assert find_document("25 251", command=True)[:2] == ('projet', '25-251')
+    assert find_document("rapport bt BT-2025-001", command=True) is None
+
+    for message, local in (("montre-moi le BT-2025-001", True), ("BT-2025-001", True),
+                           ("Où en est le bon de travail BT-2025-001 ?", True),
+                           ("Pourquoi le BT-2025-001 est en retard ?", False),
+                           ("Compare EST-2025-003 avec le budget du projet", False)):
+        assert is_lookup(message, find_document(message)[2]) == local, message
+    print("✅ Numéros de documents")
+
+
+def test_statistiques():
+    """Décisions comptées par point d'entrée ; part traitée localement"""
+    reset_routing_stats()
+    assert local_share() is None
+    for route in ('document_bt', 'conversation', 'conversation', '/help', 'local_creer_projet', 'local_erp', 'erp',
+                  'local_cache'):
+        record_route('process_input', route)
+    record_route('intention_conversation', 'demande_status')
+    assert routing_stats() == {'intention_conversation': {'demande_status': 1},
+                               'process_input': {'/help': 1, 'conversation': 2, 'document_bt': 1, 'erp': 1,
+                                                 'local_cache': 1, 'local_creer_projet': 1, 'local_erp': 1}}
+    # conversation et erp seuls ont appelé Claude
+    assert local_share() == 5 / 8
+    reset_routing_stats()
+    print("✅ Statistiques de routage")
+
+
+def benchmark_routage(nb_messages=20000):
+    """Cascade de any(...) contre routeur compilé"""
+    routeur = INTENTIONS_CONVERSATION
+    messages = messages_aleatoires(nb_messages, graine=11)
+    longueur = sum(len(m) for m in messages) // nb_messages
+    print(f"📊 Benchmark: {nb_messages} messages, {longueur} caractères en moyenne")
+    for libelle, fonction in (("Cascade any(...)", cascade), ("Routeur compilé", routeur.route)):
+        t0 = time.perf_counter()
+        for message in messages:
+            fonction(message)
+        print(f"  {libelle:<28} {(time.perf_counter() - t0) / nb_messages * 1e6:8.2f} µs / message")
+
+
+if __name__ == "__main__":
+    test_meme_intention_que_la_cascade()
+    test_numeros_de_documents()
+    test_statistiques()
+    benchmark_routage()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# test_job_queue.py - Tests et benchmark de la file de tâches d'arrière-plan
+# ERP Production DG Inc.
+
+"""
+Vérifie que job_queue.py exécute les tâches dans l'ordre d'ajout, réutilise
+une tâche identique déjà en file, publie la progression, annule une tâche en
+attente ou en cours, retente un échec avec délai puis abandonne, remet en
+attente une tâche dont le travailleur s'est arrêté, et que les tâches de
+maintenance ERP s'exécutent réellement (annulation et erreurs de la
+vérification des pièces jointes comprises). Lancé directement, le script mesure
+le temps de réponse d'un « clic » : exécution synchrone vs mise en file.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+import job_queue
+from erp_database import ERPDatabase
+from job_queue import (STATUT_ANNULE, STATUT_ATTENTE, STATUT_ECHEC, STATUT_EN_COURS, STATUT_TERMINE, JobQueue,
+                       register_job)
+
+EXECUTIONS = []
+
+
+@register_job('test_etapes', "Tâche de test par étapes")
+def _job_test_etapes(ctx):
+    etapes = ctx.params.get('etapes', 3)
+    for i in range(etapes):
+        ctx.progress(i / etapes, f"étape {i + 1}", force=True)
+        if ctx.params.get('pause'):
+            time.sleep(ctx.params['pause'])
+    EXECUTIONS.append(ctx.job_id)
+    return {'etapes': etapes}
+
+
+@register_job('test_echec', "Tâche de test en échec", max_attempts=2)
+def _job_test_echec(ctx):
+    raise RuntimeError(f"échec tentative {ctx.attempt}")
+
+
+def creer_file():
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_jobs_"), "jobs.db"))
+    return db, JobQueue(db)
+
+
+def test_ordre_dedoublonnage_et_resultat():
+    """Tâches exécutées dans l'ordre ; une tâche identique active est réutilisée ; résultat JSON conservé"""
+    db, queue = creer_file()
+    del EXECUTIONS[:]
+    premier = queue.enqueue('test_etapes', {'etapes': 2})
+    assert queue.enqueue('test_etapes', {'etapes': 2}) == premier
+    second = queue.enqueue('test_etapes', {'etapes': 4})
+    assert queue.enqueue('test_etapes', {'etapes': 2}, dedupe=False) not in (premier, second)
+    assert queue.run_pending() == 3 and EXECUTIONS[:2] == [premier, second]
+    job = queue.get(second)
+    assert job['statut'] == STATUT_TERMINE and job['result'] == {'etapes': 4} and job['progress'] == 1.0
+    assert job['titre'] == "Tâche de test par étapes" and job['attempts'] == 1
+    # Terminée : une nouvelle demande crée une nouvelle tâche
+    assert queue.enqueue('test_etapes', {'etapes': 2}) != premier
+    try:
+        queue.enqueue('inconnue')
+        raise AssertionError("type inconnu accepté")
+    except ValueError:
+        pass
+    print("✅ Ordre, dédoublonnage et résultat")
+
+
+def test_annulation():
+    """En attente : annulée sans exécution ; en cours : arrêtée à la progression suivante"""
+    db, queue = creer_file()
+    del EXECUTIONS[:]
+    en_attente = queue.enqueue('test_etapes', {'etapes': 1})
+    assert queue.cancel(en_attente) and queue.get(en_attente)['statut'] == STATUT_ANNULE
+    assert queue.run_pending() == 0 and not EXECUTIONS
+
+    longue = queue.enqueue('test_etapes', {'etapes': 50, 'pause': 0.02})
+    thread = threading.Thread(target=queue.run_next)
+    thread.start()
+    while queue.get(longue)['statut'] != STATUT_EN_COURS:
+        time.sleep(0.01)
+    assert queue.cancel(longue)
+    thread.join(5)
+    job = queue.get(longue)
+    assert job['statut'] == STATUT_ANNULE and not EXECUTIONS and job['progress'] < 1.0
+    assert queue.retry(longue) and queue.get(longue)['statut'] == STATUT_ATTENTE
+    print("✅ Annulation")
+
+
+def test_nouvel_essai_puis_echec_definitif():
+    """Échec retenté après un délai croissant, puis ÉCHEC ; retry() relance"""
+    db, queue = creer_file()
+    delai = job_queue.RETRY_DELAY_SECONDS
+    job_queue.RETRY_DELAY_SECONDS = 0
+    try:
+        job_id = queue.enqueue('test_echec')
+        queue.run_next()
+        job = queue.get(job_id)
+        assert job['statut'] == STATUT_ATTENTE and job['attempts'] == 1 and 'tentative 1' in job['error']
+        queue.run_next()
+        job = queue.get(job_id)
+        assert job['statut'] == STATUT_ECHEC and job['attempts'] == 2 and 'tentative 2' in job['error']
+        assert queue.run_next() is None
+        assert queue.retry(job_id) and queue.get(job_id)['attempts'] == 0
+    finally:
+        job_queue.RETRY_DELAY_SECONDS = delai
+    # Délai respecté : la tâche n'est pas reprise avant run_after
+    job_id = queue.enqueue('test_echec')
+    queue.run_next()
+    assert queue.get(job_id)['statut'] == STATUT_ATTENTE and queue.run_next() is None
+    print("✅ Nouvel essai puis échec définitif")
+
+
+def test_reprise_apres_arret_du_travailleur():
+    """Tâche EN_COURS sans battement de cœur récent : remise en attente puis exécutée"""
+    db, queue = creer_file()
+    job_id = queue.enqueue('test_etapes', {'etapes': 1})
+    queue._claim()
+    db.execute_update("UPDATE background_jobs SET heartbeat_at = '2000-01-01 00:00:00' WHERE id = ?", (job_id,))
+    assert queue.recover_stale_jobs() == 1
+    assert queue.run_next()['statut'] == STATUT_TERMINE
+    print("✅ Reprise après arrêt du travailleur")
+
+
+def test_taches_de_maintenance():
+    """Les tâches ERP enregistrées s'exécutent et rendent leur résultat"""
+    db, queue = creer_file()
+    db.execute_update("INSERT INTO inventory_items (nom, quantite_metric, limite_minimale_metric) VALUES ('Vis', 0, 5)")
+    ids = {kind: queue.enqueue(kind) for kind in ('bt_timetracker_sync', 'bt_sessions_cleanup',
+                                                  'inventory_status_refresh', 'timetracker_diagnostic')}
+    queue.run_pending()
+    jobs = {kind: queue.get(job_id) for kind, job_id in ids.items()}
+    assert all(job['statut'] == STATUT_TERMINE for job in jobs.values()), jobs
+    assert jobs['inventory_status_refresh']['result'] == {'articles_mis_a_jour': 1}
+    assert db.execute_query("SELECT statut FROM inventory_items")[0]['statut'] == 'ÉPUISÉ'
+    assert 'problemes_detectes' in jobs['timetracker_diagnostic']['result']
+    print("✅ Tâches de maintenance")
+
+
+def test_verification_pieces_jointes():
+    """Annulation et erreur SQL de 'attachments_verify' non avalées par le except du gestionnaire"""
+    from attachments_manager import AttachmentsManager
+    db, queue = creer_file()
+    AttachmentsManager(db, verify_in_background=False, run_startup_checks=False)
+    db.execute_update("INSERT INTO projects (id, nom_projet) VALUES (1, 'Projet pièces jointes')")
+    for i in range(3):
+        db.execute_update("INSERT INTO project_attachments (project_id, filename, original_filename, file_size, "
+                          "file_type, category, file_path) VALUES (1, ?, ?, 10, 'pdf', 'DOCUMENT', ?)",
+                          (f"f{i}.pdf", f"f{i}.pdf", f"/introuvable/f{i}.pdf"))
+
+    # Annulation demandée : arrêt à la première progression, aucune référence désactivée
+    job_id = queue.enqueue('attachments_verify')
+    db.execute_update("UPDATE background_jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+    job = queue.run_next()
+    assert job['statut'] == STATUT_ANNULE and job['result'] is None, job
+    assert db.execute_query("SELECT COUNT(*) AS n FROM project_attachments WHERE is_active = 1")[0]['n'] == 3
+
+    # Erreur SQL : nouvel essai planifié, pas TERMINÉ avec des compteurs à zéro
+    db.execute_update("CREATE TRIGGER trg_test_verrou BEFORE UPDATE ON project_attachments "
+                      "BEGIN SELECT RAISE(ABORT, 'database is locked'); END")
+    job_id = queue.enqueue('attachments_verify')
+    job = queue.run_next()
+    assert job['id'] == job_id and job['statut'] == STATUT_ATTENTE and 'locked' in job['error'], job
+
+    db.execute_update("DROP TRIGGER trg_test_verrou")
+    db.execute_update("UPDATE background_jobs SET run_after = NULL WHERE id = ?", (job_id,))
+    job = queue.run_next()
+    assert job['statut'] == STATUT_TERMINE and job['result']['perdus'] == 3, job
+    print("✅ Vérification des pièces jointes : annulation et erreur")
+
+
+def test_travailleur_en_arriere_plan():
+    """Le thread de travail exécute une tâche ajoutée sans appel explicite"""
+    db, queue = creer_file()
+    queue.start()
+    try:
+        job_id = queue.enqueue('test_etapes', {'etapes': 2})
+        limite = time.time() + 10
+        while queue.get(job_id)['statut'] != STATUT_TERMINE and time.time() < limite:
+            time.sleep(0.05)
+        assert queue.get(job_id)['statut'] == STATUT_TERMINE
+    finally:
+        queue.stop()
+    print("✅ Travailleur en arrière-plan")
+
+
+def benchmark_temps_de_reponse(etapes=20, pause=0.05):
+    """Temps pendant lequel la session est bloquée : exécution dans le clic vs mise en file"""
+    db, queue = creer_file()
+    print(f"📊 Benchmark: tâche de {etapes * pause:.1f} s")
+    t0 = time.perf_counter()
+    queue.enqueue('test_etapes', {'etapes': etapes, 'pause': pause})
+    queue.run_next()
+    print(f"  {'Exécution dans le clic (ancien)':<34} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+    queue.start()
+    t0 = time.perf_counter()
+    job_id = queue.enqueue('test_etapes', {'etapes': etapes, 'pause': pause})
+    print(f"  {'Mise en file (nouveau)':<34} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+    while queue.get(job_id)['statut'] != STATUT_TERMINE:
+        time.sleep(0.05)
+    queue.stop()
+
+
+if __name__ == "__main__":
+    test_ordre_dedoublonnage_et_resultat()
+    test_annulation()
+    test_nouvel_essai_puis_echec_definitif()
+    test_reprise_apres_arret_du_travailleur()
+    test_taches_de_maintenance()
+    test_verification_pieces_jointes()
+    test_travailleur_en_arriere_plan()
+    benchmark_temps_de_reponse()
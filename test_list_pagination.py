@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# test_list_pagination.py - Tests et benchmark de la pagination par curseur des listes
+# ERP Production DG Inc.
+
+"""
+Vérifie que list_pagination.py parcourt une liste page par page, dans les deux
+sens et avec des valeurs de tri égales, sans doublon ni oubli, et que les
+listes paginées des devis, bons de travail et articles d'inventaire rendent
+les mêmes lignes (filtres, ordre, totaux) que les anciennes listes complètes,
+avec un nombre de requêtes par page qui ne dépend pas de la taille de la table,
+et que les prix saisis en texte (« 25 000 $ ») sont triés et sommés par leur
+valeur.
+Lancé directement, le script compare le chargement complet et une page sur
+5 000 devis et 5 000 bons de travail.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from devis import GestionnaireDevis
+from erp_database import ERPDatabase
+from inventory import GestionnaireInventaire
+from list_pagination import NEXT, PREV, ListQuery, amount_sql, count_rows, decode_cursor, fetch_page
+from production_management import GestionnaireBonsTravail
+
+STATUTS = ['BROUILLON', 'VALIDÉ', 'ENVOYÉ', 'APPROUVÉ']
+
+
+def creer_base(nb_devis=60, nb_bt=60, nb_articles=60):
+    """Base ERP avec devis (mode ESTIMATION), estimations ordinaires, BT et articles d'inventaire"""
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_pagination_"), "pagination.db"))
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("DELETE FROM inventory_items")
+    formulaires, lignes = [], []
+    for i in range(nb_devis):
+        meta = {'type_reel': 'DEVIS', 'taux_tps': 5.0, 'taux_tvq': 9.975,
+                'type_client': 'PARTICULIER' if i % 2 else 'ENTREPRISE',
+                'secteur_construction': 'RÉSIDENTIEL' if i % 3 else 'COMMERCIAL'}
+        if i % 5 == 0:
+            meta['prix_estime'] = 1000 + i
+        formulaires.append(('ESTIMATION', f"EST-D{i:06d}", STATUTS[i % 4], 'NORMAL',
+                            f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d} {i % 24:02d}:{i % 60:02d}:00",
+                            f"2024-01-01 00:00:{i % 60:02d}", json.dumps(meta, ensure_ascii=False)))
+    for i in range(nb_devis // 4):
+        formulaires.append(('ESTIMATION', f"EST-E{i:06d}", 'BROUILLON', 'NORMAL', '2024-06-01', '2024-06-01',
+                            json.dumps({'type_reel': 'ESTIMATION'})))
+    for i in range(nb_bt):
+        meta = {'project_name': f"Projet {'Alpha' if i % 3 == 0 else 'Beta'} {i}",
+                'client_name': f"Client {i % 7}", 'project_manager': 'Marie'}
+        # Dates de création égales par groupes de 4 : la clé id départage
+        formulaires.append(('BON_TRAVAIL', f"BT-{i:06d}", STATUTS[i % 3], ['NORMAL', 'URGENT'][i % 2], None,
+                            f"2024-03-{i // 4 % 28 + 1:02d} 08:00:00", json.dumps(meta)))
+    conn.executemany('''INSERT INTO formulaires (type_formulaire, numero_document, statut, priorite, date_creation,
+                        created_at, metadonnees_json) VALUES (?, ?, ?, ?, ?, ?, ?)''', formulaires)
+    for row in conn.execute("SELECT id, type_formulaire FROM formulaires").fetchall():
+        if row[0] % 5:
+            lignes += [(row[0], seq, f"Ligne {seq}", 2.0 + seq, 10.0 * seq) for seq in (1, 2, 1001)]
+    conn.executemany('''INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description, quantite,
+                        prix_unitaire) VALUES (?, ?, ?, ?, ?)''', lignes)
+    conn.executemany('''INSERT INTO inventory_items (nom, type_produit, quantite_metric, limite_minimale_metric,
+                        statut, code_interne, description) VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                     [(f"Article {i % 20:02d}", ['Bois', 'Acier'][i % 2], i, 5, STATUTS[i % 4], f"INV-{i:04d}",
+                       'vis' if i % 4 == 0 else '') for i in range(nb_articles)])
+    conn.commit()
+    conn.close()
+    return db
+
+
+def toutes_les_pages(lire, page_size):
+    """Parcourt les pages en avant puis en arrière ; rend (pages avant, pages arrière)"""
+    avant, page = [], lire(None, NEXT, page_size)
+    avant.append(page)
+    while page['has_next']:
+        page = lire(page['next_cursor'], NEXT, page_size)
+        avant.append(page)
+    arriere = [page]
+    while page['has_prev']:
+        page = lire(page['prev_cursor'], PREV, page_size)
+        arriere.append(page)
+    return avant, arriere
+
+
+def test_parcours_avant_arriere_avec_egalites():
+    """Toutes les lignes une seule fois, dans l'ordre du tri complet, dans les deux sens"""
+    db = creer_base(0, 0, 0)
+    db.execute_update("CREATE TABLE liste_test (id INTEGER PRIMARY KEY, groupe TEXT)")
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO liste_test (id, groupe) VALUES (?, ?)", [(i, f"g{i % 4}") for i in range(1, 51)])
+    conn.commit()
+    conn.close()
+    query = ListQuery("id, groupe", "liste_test", {'groupe': ("groupe", True), 'id': ("id", False)})
+    for tri in ('groupe', 'id'):
+        attendu = [r['id'] for r in db.execute_query(
+            f"SELECT id FROM liste_test ORDER BY {query.sorts[tri][0]} {'DESC' if query.sorts[tri][1] else 'ASC'}, "
+            f"id {'DESC' if query.sorts[tri][1] else 'ASC'}")]
+        avant, arriere = toutes_les_pages(
+            lambda cursor, direction, size: fetch_page(db, query, sort=tri, cursor=cursor, direction=direction,
+                                                       page_size=size), 7)
+        assert [r['id'] for p in avant for r in p['rows']] == attendu
+        assert [r['id'] for p in reversed(arriere) for r in p['rows']] == attendu
+        assert len(avant) == 8 and not avant[0]['has_prev'] and not avant[-1]['has_next']
+        assert all('_page_sort' not in r for p in avant for r in p['rows'])
+    # Filtre + total ; curseur illisible : première page
+    page = fetch_page(db, query, ["groupe = ?"], ['g1'], page_size=5)
+    assert [r['id'] for r in page['rows']] == [49, 45, 41, 37, 33]
+    assert count_rows(db, query, ["groupe = ?"], ['g1'])['total'] == 13
+    assert decode_cursor("pas-un-curseur") is None
+    assert fetch_page(db, query, cursor="pas-un-curseur", page_size=5)['rows'] == fetch_page(db, query, page_size=5)['rows']
+    print("✅ Parcours avant/arrière avec égalités")
+
+
+def test_montants_texte_tries_et_sommes():
+    """Prix des projets en texte : tri et CA comme la normalisation Python du tableau de bord"""
+    db = creer_base(0, 0, 0)
+    prix = ['25 000 $', '$1,250.50', '900', '12000.75', None, '']
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO projects (id, nom_projet, prix_estime) VALUES (?, ?, ?)",
+                     [(i, f"Projet {i}", p) for i, p in enumerate(prix, 1)])
+    conn.commit()
+    conn.close()
+    query = ListQuery("p.*", "projects p", {"Prix": (f"COALESCE({amount_sql('p.prix_estime')}, 0)", True)},
+                      key_expr='p.id')
+
+    def en_nombre(valeur):
+        texte = str(valeur or '0').replace('$', '').replace(',', '').replace(' ', '')
+        return float(texte) if texte else 0.0
+    page = fetch_page(db, query, sort="Prix", page_size=10)
+    assert [r['id'] for r in page['rows']] == [1, 4, 2, 3, 6, 5]  # 0 à égalité : clé décroissante
+    resume = count_rows(db, query, aggregates={'ca_total': f"COALESCE(SUM({amount_sql('p.prix_estime')}), 0)"})
+    assert resume['total'] == 6 and resume['ca_total'] == sum(en_nombre(p) for p in prix) == 39151.25
+    print("✅ Montants texte triés et sommés")
+
+
+def test_devis_page_et_resume():
+    """Pages de devis = ancienne liste complète ; résumé SQL = totaux calculés devis par devis"""
+    db = creer_base(nb_devis=60)
+    gestionnaire = GestionnaireDevis(db, None, None, None)
+    for filters in ({}, {'statut': 'ENVOYÉ'}, {'date_debut': '2024-03-01', 'date_fin': '2024-08-31'}):
+        complet = gestionnaire.get_all_devis(filters)
+        avant, _ = toutes_les_pages(
+            lambda cursor, direction, size: gestionnaire.get_devis_page(filters, cursor, direction, size), 9)
+        pages = [d for p in avant for d in p['rows']]
+        assert [d['id'] for d in pages] == [d['id'] for d in complet]
+        assert [d['totaux'] for d in pages] == [d['totaux'] for d in complet]
+        resume = gestionnaire.get_devis_summary(filters)
+        assert resume['total'] == len(complet)
+        assert resume['brouillons'] == len([d for d in complet if d['statut'] == 'BROUILLON'])
+        assert resume['envoyes'] == len([d for d in complet if d['statut'] == 'ENVOYÉ'])
+        # Arrondi au cent par devis : au plus un cent d'écart chacun
+        assert abs(resume['ca_total'] - sum(d['totaux']['total_ttc'] for d in complet)) <= 0.01 * len(complet)
+    assert len(gestionnaire.get_all_devis()) == 60
+    print("✅ Devis : pages et résumé")
+
+
+def test_bons_travail_filtres():
+    """Pages de BT filtrées côté SQL = ancien filtrage Python de get_all_bons_travail"""
+    db = creer_base(nb_bt=60)
+    gestionnaire = GestionnaireBonsTravail(db)
+    tous = gestionnaire.get_all_bons_travail()
+    for statut, priorite, recherche in ((None, None, ''), ('VALIDÉ', None, ''), (None, 'URGENT', 'alpha'),
+                                        (None, None, 'client 3'), (None, None, 'BT-00001')):
+        attendu = [b for b in tous
+                   if (not statut or b['statut'] == statut) and (not priorite or b['priorite'] == priorite)
+                   and (not recherche or any(recherche.lower() in b[k].lower()
+                                             for k in ('numero_document', 'project_name', 'client_name')))]
+        avant, _ = toutes_les_pages(
+            lambda cursor, direction, size: gestionnaire.get_bons_travail_page(statut, priorite, recherche, cursor,
+                                                                               direction, size), 8)
+        assert [b['id'] for p in avant for b in p['rows']] == [b['id'] for b in attendu], (statut, priorite, recherche)
+        assert [b for p in avant for b in p['rows']] == attendu
+        assert avant[0]['total'] == len(attendu)
+        assert gestionnaire.get_bons_travail_ids(statut, priorite, recherche) == [b['id'] for b in attendu]
+    valeurs = gestionnaire.get_bt_filter_values()
+    assert valeurs == {'statuts': sorted(STATUTS[:3]), 'priorites': ['NORMAL', 'URGENT']}
+    print("✅ Bons de travail : filtres et pages")
+
+
+def test_inventaire_pages():
+    """Pages d'articles = search_items, avec et sans filtres"""
+    db = creer_base(nb_articles=60)
+    gestionnaire = GestionnaireInventaire(db)
+    for terme, filtres in (("", {}), ("vis", {}), ("", {'type_produit': 'Bois', 'stock_critique_only': True})):
+        attendu = gestionnaire.search_items(terme, filtres)
+        avant, arriere = toutes_les_pages(
+            lambda cursor, direction, size: gestionnaire.search_items_page(terme, filtres, cursor, direction, size), 7)
+        assert [i['id'] for p in avant for i in p['rows']] == [i['id'] for i in attendu]
+        assert [i['id'] for p in reversed(arriere) for i in p['rows']] == [i['id'] for i in attendu]
+        assert avant[0]['total'] == len(attendu)
+    print("✅ Inventaire : pages")
+
+
+def test_requetes_par_page_constantes():
+    """Le nombre de requêtes d'une page ne dépend pas du nombre de lignes de la table"""
+    compteurs = []
+    for taille in (40, 400):
+        db = creer_base(nb_devis=taille, nb_bt=taille, nb_articles=0)
+        appels = [0]
+        execute = db.execute_query
+        db.execute_query = lambda *a, **k: (appels.__setitem__(0, appels[0] + 1), execute(*a, **k))[1]
+        devis = GestionnaireDevis(db, None, None, None)
+        appels[0] = 0
+        devis.get_devis_page(page_size=25)
+        devis.get_devis_summary()
+        GestionnaireBonsTravail(db).get_bons_travail_page(page_size=25)
+        compteurs.append(appels[0])
+    assert compteurs[0] == compteurs[1], compteurs
+    print(f"✅ Requêtes par page constantes ({compteurs[0]})")
+
+
+def benchmark_listes(nb=5000):
+    """Ancien chargement complet vs une page de 25 et le résumé"""
+    db = creer_base(nb_devis=nb, nb_bt=nb, nb_articles=0)
+    devis = GestionnaireDevis(db, None, None, None)
+    bt = GestionnaireBonsTravail(db)
+    print(f"📊 Benchmark: {nb} devis, {nb} bons de travail")
+    for nom, fn in (("Devis : liste complète (ancien)", lambda: devis.get_all_devis({})),
+                    ("Devis : page + résumé (nouveau)", lambda: (devis.get_devis_page({}), devis.get_devis_summary({}))),
+                    ("BT : liste complète (ancien)", bt.get_all_bons_travail),
+                    ("BT : page + total (nouveau)", bt.get_bons_travail_page)):
+        t0 = time.perf_counter()
+        fn()
+        print(f"  {nom:<34} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    test_parcours_avant_arriere_avec_egalites()
+    test_montants_texte_tries_et_sommes()
+    test_devis_page_et_resume()
+    test_bons_travail_filtres()
+    test_inventaire_pages()
+    test_requetes_par_page_constantes()
+    benchmark_listes()
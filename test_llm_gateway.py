@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# test_llm_gateway.py - Tests de la passerelle instrumentée des appels Claude
+# ERP Production DG Inc.
+
+"""
+Vérifie que llm_gateway.py enregistre chaque appel (create ou flux) avec sa
+fonctionnalité, l'opération appelante, les tokens d'entrée / sortie / cache,
+la latence, le délai du premier token et le coût ; que les erreurs sont
+mesurées puis relevées ; que le CacheOptimizer attaché reçoit les vrais
+chiffres de cache ; que les appels faits plus tard (flux, threads de
+l'analyse par extraits) restent attribués à la méthode d'origine ; et que
+les synthèses donnent les bons percentiles par groupe.
+Le client Anthropic est remplacé par un client factice.
+Lancé directement, le script mesure le surcoût de l'instrumentation par
+appel et la durée d'une synthèse sur une grosse table.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from cache_config import CacheOptimizer
+from document_mapreduce import analyze_in_chunks
+from llm_gateway import STATUT_ERREUR, LLMMetricsStore, estimate_cost, instrument, percentile
+from llm_streaming import stream_message
+
+
+def usage(input_tokens=100, output_tokens=20, cache_read=0, cache_creation=0):
+    return SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens,
+                           cache_read_input_tokens=cache_read, cache_creation_input_tokens=cache_creation)
+
+
+class FakeStream:
+    def __init__(self, tokens, delay):
+        self.tokens = tokens
+        self.delay = delay
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        for token in self.tokens:
+            time.sleep(self.delay)
+            yield token
+
+    def get_final_message(self):
+        return SimpleNamespace(usage=usage(output_tokens=len(self.tokens)))
+
+
+class FakeMessages:
+    def __init__(self, delay=0.0, cache_read=0, fail=False):
+        self.delay = delay
+        self.cache_read = cache_read
+        self.fail = fail
+
+    def create(self, **request):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("surcharge")
+        return SimpleNamespace(content=[SimpleNamespace(text="Réponse")],
+                               usage=usage(cache_read=self.cache_read, cache_creation=0 if self.cache_read else 50))
+
+    def stream(self, **request):
+        return FakeStream(["Bon", "jour", " !"], self.delay)
+
+
+def nouveau_store():
+    return LLMMetricsStore(os.path.join(tempfile.mkdtemp(prefix="erp_llm_metrics_"), "metrics.db"),
+                           flush_seconds=60)
+
+
+def analyser_devis_avec_ia(client):
+    return client.messages.create(model='claude-sonnet-4-20250514', max_tokens=100,
+                                  messages=[{'role': 'user', 'content': "Devis"}])
+
+
+def test_appels_mesures():
+    """Fonctionnalité, opération appelante, tokens, coût ; erreurs mesurées puis relevées ; CacheOptimizer"""
+    store = nouveau_store()
+    optimizer = CacheOptimizer(config_file=os.path.join(tempfile.mkdtemp(), "cache_config.json"))
+    client = instrument(SimpleNamespace(messages=FakeMessages(cache_read=400)), 'assistant_ia', store=store,
+                        cache_optimizer=optimizer)
+    assert instrument(client, 'autre') is client
+    assert analyser_devis_avec_ia(client).content[0].text == "Réponse"
+    appel = store.recent()[0]
+    assert (appel['feature'], appel['operation'], appel['status']) == ('assistant_ia', 'analyser_devis_avec_ia', 'ok')
+    assert (appel['input_tokens'], appel['output_tokens'], appel['cache_read_tokens']) == (100, 20, 400)
+    assert abs(appel['cost_usd'] - estimate_cost('claude-sonnet-4-20250514', 100, 20, 400)) < 1e-12
+    assert optimizer.cache_stats['cache_hits'] == 1 and optimizer.cache_stats['total_tokens_saved'] == 400
+
+    client.cache_optimizer = None
+    analyser_devis_avec_ia(client.with_operation('resume_projet'))
+    assert store.recent()[0]['operation'] == 'resume_projet'
+
+    en_panne = instrument(SimpleNamespace(messages=FakeMessages(fail=True)), 'expert_advisor', store=store,
+                          cache_optimizer=optimizer)
+    try:
+        analyser_devis_avec_ia(en_panne)
+        assert False, "exception attendue"
+    except ConnectionError:
+        pass
+    erreur = store.recent(errors_only=True)[0]
+    assert erreur['status'] == STATUT_ERREUR and erreur['error'] == "ConnectionError: surcharge"
+    assert optimizer.cache_stats['total_requests'] == 1  # erreurs non comptées dans le cache
+    assert len(store.recent()) == 3
+    print("✅ Appels mesurés")
+
+
+def test_flux_et_threads_attribues():
+    """Flux itéré plus tard et threads de l'analyse par extraits : attribués à la méthode d'origine"""
+    store = nouveau_store()
+    client = instrument(SimpleNamespace(messages=FakeMessages(delay=0.01)), 'assistant_ia_simple', store=store)
+
+    def conversation_naturelle():
+        return stream_message(client, label='test', model='claude-sonnet-4-20250514', max_tokens=50,
+                              messages=[{'role': 'user', 'content': "Bonjour"}])
+
+    reponse = conversation_naturelle()
+    assert reponse.consume() == "Bonjour !"
+    appel = store.recent()[0]
+    assert appel['operation'] == 'conversation_naturelle' and appel['streamed'] == 1
+    assert appel['output_tokens'] == 3 and 5 <= appel['ttft_ms'] < appel['latency_ms']
+
+    def analyser_documents():
+        return analyze_in_chunks(client, 'claude-sonnet-4-20250514', 'Expert', [('cctp.txt', "x\n" * 200000)],
+                                 "Analysez", chunk_tokens=20000)
+
+    resultat = analyser_documents()
+    appels = store.recent(limit=100)[:-1]
+    assert len(appels) == len(resultat['extraits']) + len(resultat['reductions']) > 2
+    assert {a['operation'] for a in appels} == {'analyser_documents'}
+    print("✅ Flux et threads attribués")
+
+
+def test_synthese_percentiles():
+    """Percentiles de latence, tokens et coût par groupe, tri, fenêtre de temps, purge"""
+    store = nouveau_store()
+    for i in range(1, 101):
+        store.record({'created_at': '2099-01-01 10:00:00', 'feature': 'assistant_ia', 'operation': 'lent',
+                      'model': 'm', 'status': 'ok', 'latency_ms': float(i * 10), 'input_tokens': 10,
+                      'output_tokens': 1, 'cost_usd': 0.001})
+    store.record({'created_at': '2099-01-01 10:00:00', 'feature': 'expert_advisor', 'operation': 'rapide',
+                  'model': 'm', 'status': 'ok', 'latency_ms': 5.0, 'input_tokens': 5000, 'cache_read_tokens': 5000,
+                  'cost_usd': 1.0})
+    store.record({'created_at': '2000-01-01 10:00:00', 'feature': 'ancien', 'operation': 'x', 'model': 'm',
+                  'status': 'ok', 'latency_ms': 1.0})
+    par_feature = store.summary(('feature',))
+    assert [r['feature'] for r in par_feature] == ['expert_advisor', 'assistant_ia']  # coût décroissant
+    lent = par_feature[1]
+    assert (lent['calls'], lent['p50_ms'], lent['p95_ms'], lent['p99_ms']) == (100, 505.0, 950.5, 990.1)
+    assert lent['input_tokens'] == 1000 and lent['cost_usd'] == 0.1
+    assert par_feature[0]['cache_read_ratio'] == 0.5
+    assert store.summary(('feature', 'operation'), order_by='p95_ms')[0]['operation'] == 'lent'
+    assert store.totals(days=None)['calls'] == 102 and store.summary(('bidon',))[0]['calls'] == 101
+    assert percentile([], 50) is None and percentile([7.0], 99) == 7.0
+    assert store.purge(older_than_days=365) == 1 and store.totals(days=None)['calls'] == 101
+    print("✅ Synthèse et percentiles")
+
+
+def benchmark_instrumentation(nb_appels=5000, nb_lignes=100000):
+    """Surcoût par appel (client factice instantané) et durée d'une synthèse"""
+    store = nouveau_store()
+    brut = SimpleNamespace(messages=FakeMessages())
+    client = instrument(brut, 'benchmark', store=store)
+    print(f"📊 Benchmark: {nb_appels} appels, synthèse sur {nb_lignes} appels enregistrés")
+    for libelle, cible in (("Client brut", brut), ("Client instrumenté", client)):
+        t0 = time.perf_counter()
+        for _ in range(nb_appels):
+            analyser_devis_avec_ia(cible)
+        print(f"  {libelle:<28} {(time.perf_counter() - t0) / nb_appels * 1e6:8.1f} µs / appel")
+    t0 = time.perf_counter()
+    store.flush()
+    print(f"  {'Écriture du dernier lot':<28} {(time.perf_counter() - t0) * 1000:8.1f} ms ({nb_appels} lignes)")
+    for i in range(nb_lignes // 1000):
+        for j in range(1000):
+            store.record({'created_at': '2099-01-01 10:00:00', 'feature': f"f{j % 5}", 'operation': f"op{j % 40}",
+                          'model': 'm', 'status': 'ok', 'latency_ms': float(j), 'input_tokens': 100})
+        store.flush()
+    t0 = time.perf_counter()
+    lignes = store.summary(('feature', 'operation'), days=None)
+    print(f"  {'Synthèse par opération':<28} {(time.perf_counter() - t0) * 1000:8.0f} ms ({len(lignes)} groupes)")
+
+
+if __name__ == "__main__":
+    test_appels_mesures()
+    test_flux_et_threads_attribues()
+    test_synthese_percentiles()
+    benchmark_instrumentation()
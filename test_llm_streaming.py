@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# test_llm_streaming.py - Tests des réponses Claude en flux
+# ERP Production DG Inc.
+
+"""
+Vérifie que llm_streaming.py rend les fragments de texte dès leur arrivée,
+mesure le délai du premier token et le débit, appelle on_complete une seule
+fois avec le texte complet, transforme les erreurs de l'API en message, et
+retombe sur messages.create pour un client sans messages.stream.
+Le client Anthropic est remplacé par un client factice qui produit ses
+tokens avec un délai, comme l'API.
+Lancé directement, le script compare le délai avant le premier texte affiché
+(réponse bloquante vs flux).
+"""
+
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from llm_streaming import StreamedResponse, recent_stream_metrics, response_text, stream_message, \
+    stream_metrics_summary
+
+
+class FakeStream:
+    def __init__(self, tokens, delay, fail_after=None):
+        self.tokens = tokens
+        self.delay = delay
+        self.fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        for i, token in enumerate(self.tokens):
+            if self.fail_after is not None and i == self.fail_after:
+                raise ConnectionError("connexion coupée")
+            time.sleep(self.delay)
+            yield token
+
+    def get_final_message(self):
+        return SimpleNamespace(usage=SimpleNamespace(output_tokens=len(self.tokens)))
+
+
+class FakeMessages:
+    def __init__(self, tokens, delay, fail_after=None):
+        self.tokens = tokens
+        self.delay = delay
+        self.fail_after = fail_after
+        self.requests = []
+
+    def stream(self, **request):
+        self.requests.append(request)
+        return FakeStream(self.tokens, self.delay, self.fail_after)
+
+    def create(self, **request):
+        # Réponse bloquante : tous les tokens sont générés avant le retour
+        self.requests.append(request)
+        time.sleep(self.delay * len(self.tokens))
+        return SimpleNamespace(content=[SimpleNamespace(text=''.join(self.tokens))],
+                               usage=SimpleNamespace(output_tokens=len(self.tokens)))
+
+
+class OldSdkMessages:
+    """SDK sans messages.stream"""
+
+    def __init__(self, tokens):
+        self.create = FakeMessages(tokens, delay=0).create
+
+
+def fake_client(messages):
+    return SimpleNamespace(messages=messages)
+
+
+def mots(n):
+    return [f"mot{i} " for i in range(n)]
+
+
+def test_fragments_et_metriques():
+    """Fragments rendus dans l'ordre, premier token mesuré, tokens/s, on_complete une fois"""
+    messages = FakeMessages(mots(20), delay=0.005)
+    persistes = []
+    response = stream_message(fake_client(messages), label='test', on_complete=persistes.append,
+                              model='claude-test', max_tokens=100, messages=[{'role': 'user', 'content': 'Bonjour'}])
+    assert isinstance(response, StreamedResponse) and not messages.requests  # rien avant l'itération
+    fragments = list(response)
+    assert fragments == mots(20)
+    assert messages.requests[0]['model'] == 'claude-test' and messages.requests[0]['max_tokens'] == 100
+    assert response.text == ''.join(mots(20)) and persistes == [response.text]
+    metrics = response.metrics
+    assert metrics['streamed'] and metrics['output_tokens'] == 20 and metrics['error'] is None
+    assert 0 < metrics['ttft_ms'] < metrics['duration_ms']
+    assert metrics['tokens_per_s'] > 0
+    # Seconde itération : le texte complet, sans nouvel appel ni nouvelle persistance
+    assert list(response) == [response.text] and len(messages.requests) == 1 and len(persistes) == 1
+    assert recent_stream_metrics(1)[0] is metrics
+    assert stream_metrics_summary()['avg_ttft_ms'] is not None
+    print("✅ Fragments et métriques")
+
+
+def test_erreurs_et_reponse_vide():
+    """Erreur pendant le flux : texte partiel + message ; réponse vide : empty_text"""
+    messages = FakeMessages(mots(10), delay=0, fail_after=4)
+    persistes = []
+    response = stream_message(fake_client(messages), on_complete=persistes.append,
+                              error_text=lambda e: f"Désolé ({type(e).__name__})", model='m', messages=[])
+    texte = response_text(response)
+    assert texte.startswith(''.join(mots(4))) and texte.endswith("Désolé (ConnectionError)")
+    assert isinstance(response.error, ConnectionError) and response.metrics['error'] == 'ConnectionError'
+    assert persistes == [texte]
+    vide = stream_message(fake_client(FakeMessages([], delay=0)), empty_text="Réponse vide", model='m', messages=[])
+    assert str(vide) == "Réponse vide" and vide.metrics['ttft_ms'] is None
+    assert response_text("déjà calculé") == "déjà calculé"
+    print("✅ Erreurs et réponse vide")
+
+
+def test_sdk_sans_stream():
+    """Client sans messages.stream : une seule réponse complète via messages.create"""
+    response = stream_message(fake_client(OldSdkMessages(mots(5))), model='m', messages=[])
+    assert list(response) == [''.join(mots(5))]
+    assert not response.metrics['streamed'] and response.metrics['output_tokens'] == 5
+    print("✅ SDK sans messages.stream")
+
+
+def benchmark_premier_token(nb_tokens=400, delai=0.005):
+    """Réponse de nb_tokens : attente avant le premier texte affiché"""
+    print(f"📊 Benchmark: réponse de {nb_tokens} tokens ({delai * 1000:.0f} ms par token)")
+    messages = FakeMessages(mots(nb_tokens), delai)
+    t0 = time.perf_counter()
+    messages.create(model='m', messages=[])
+    print(f"  {'messages.create (ancien)':<28} {(time.perf_counter() - t0) * 1000:8.0f} ms avant affichage")
+    response = stream_message(fake_client(messages), model='m', messages=[])
+    response.consume()
+    print(f"  {'messages.stream (nouveau)':<28} {response.metrics['ttft_ms']:8.0f} ms avant affichage"
+          f" ({response.metrics['tokens_per_s']:.0f} tokens/s)")
+
+
+if __name__ == "__main__":
+    test_fragments_et_metriques()
+    test_erreurs_et_reponse_vide()
+    test_sdk_sans_stream()
+    benchmark_premier_token()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# test_monthly_reports.py - Tests et benchmark des rapports mensuels
+# ERP Production DG Inc.
+
+"""
+Vérifie que monthly_reports.py donne les mêmes chiffres que l'ancien
+generate_monthly_report (requêtes strftime mois par mois), regroupe les mois
+consécutifs en une plage, ne recalcule pas les mois clos (sauf après un
+balayage en échec ou une écriture rétroactive) et recalcule le mois en cours. Lancé directement, le script compare les deux approches sur un
+rapport de douze mois.
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from erp_database import ERPDatabase
+from monthly_reports import MonthlyReportEngine, contiguous_ranges, invalidate_monthly_reports
+
+
+def creer_base(nb_par_mois=40, annees=(2023, 2024), seed=5):
+    """Base temporaire avec formulaires, projets, pointages, opérations... répartis sur les mois"""
+    rng = random.Random(seed)
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_rapports_"), "rapports.db"))
+    conn = sqlite3.connect(db.db_path)
+    conn.executemany("INSERT INTO companies (id, nom) VALUES (?, ?)", [(i, f"Fournisseur {i}") for i in range(1, 16)])
+    conn.executemany("INSERT INTO work_centers (id, nom, capacite_theorique, statut) VALUES (?, ?, 8, ?)",
+                     [(i, f"Poste {i}", 'ACTIF' if i < 5 else 'INACTIF') for i in range(1, 7)])
+    numero, bts = 0, []
+    for annee in annees:
+        for mois in range(1, 13):
+            for _ in range(nb_par_mois):
+                numero += 1
+                jour = f"{annee}-{mois:02d}-{rng.randint(1, 28):02d}"
+                heure = f"{jour} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+                type_f, prefixe = rng.choice([('BON_TRAVAIL', 'BT'), ('BON_ACHAT', 'BA'), ('BON_COMMANDE', 'BC')])
+                conn.execute('''INSERT INTO formulaires (id, type_formulaire, numero_document, statut, company_id, montant_total, date_creation)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                             (numero, type_f, f"{prefixe}-{numero:06d}", rng.choice(['BROUILLON', 'TERMINÉ', 'VALIDÉ']),
+                              rng.randint(1, 15), round(rng.uniform(100, 5000), 2), rng.choice([jour, heure])))
+                if type_f == 'BON_TRAVAIL':
+                    bts.append(numero)
+                bt_id = rng.choice([None] + bts[-20:])
+                conn.execute("INSERT INTO projects (id, nom_projet, statut, updated_at) VALUES (?, ?, ?, ?)",
+                             (numero, f"Projet {numero}", rng.choice(['TERMINÉ', 'EN COURS']), heure))
+                conn.execute("INSERT INTO inventory_history (action, created_at) VALUES ('AJOUT', ?)", (heure,))
+                conn.execute("INSERT INTO bt_assignations (bt_id, date_assignation) VALUES (?, ?)", (numero, heure))
+                conn.execute('''INSERT INTO operations (id, project_id, work_center_id, formulaire_bt_id, temps_estime, created_at)
+                                VALUES (?, ?, ?, ?, ?, ?)''',
+                             (numero, numero, rng.randint(1, 6), bt_id,
+                              rng.uniform(1, 10), heure))
+                conn.execute("INSERT INTO materials (project_id, created_at) VALUES (?, ?)",
+                             (rng.choice([None, numero]), heure))
+                conn.execute('''INSERT INTO time_entries (employee_id, operation_id, formulaire_bt_id, punch_in, total_hours, total_cost)
+                                VALUES (1, ?, ?, ?, ?, ?)''',
+                             (rng.randint(1, numero), bt_id, heure, rng.uniform(1, 8), rng.uniform(50, 400)))
+    conn.commit()
+    conn.close()
+    invalidate_monthly_reports(db)
+    return db
+
+
+def ancien_rapport(db, year, month):
+    """Ancien generate_monthly_report : une requête strftime par indicateur"""
+    p = (f"{year}-{month:02d}",)
+    q = lambda sql: db.execute_query(sql, p)[0]
+    f = q("SELECT COUNT(*) as count, SUM(montant_total) as montant FROM formulaires WHERE strftime('%Y-%m', date_creation) = ?")
+    total_bt = q("SELECT COUNT(*) as n FROM formulaires WHERE type_formulaire = 'BON_TRAVAIL' AND strftime('%Y-%m', date_creation) = ?")['n']
+    termines = q("SELECT COUNT(*) as n FROM formulaires WHERE type_formulaire = 'BON_TRAVAIL' AND statut = 'TERMINÉ' AND strftime('%Y-%m', date_creation) = ?")['n']
+    tt = q("SELECT COUNT(*) as s, COALESCE(SUM(total_hours), 0) as h, COALESCE(SUM(total_cost), 0) as c FROM time_entries WHERE formulaire_bt_id IS NOT NULL AND strftime('%Y-%m', punch_in) = ?")
+    wc = q('''SELECT COALESCE(AVG(wc.capacite_theorique), 0) as cap, COALESCE(SUM(te.total_hours), 0) as h, COALESCE(SUM(te.total_cost), 0) as r
+              FROM work_centers wc LEFT JOIN operations o ON wc.id = o.work_center_id
+              LEFT JOIN time_entries te ON o.id = te.operation_id AND strftime('%Y-%m', te.punch_in) = ? WHERE wc.statut = 'ACTIF' ''')
+    ops = q('''SELECT COUNT(*) as n, SUM(formulaire_bt_id IS NOT NULL) as bt, COUNT(DISTINCT formulaire_bt_id) as dbt,
+                      COALESCE(SUM(CASE WHEN formulaire_bt_id IS NOT NULL THEN temps_estime END), 0) as t
+               FROM operations WHERE strftime('%Y-%m', created_at) = ?''')
+    return {
+        'formulaires_crees': f['count'], 'montant_commandes': f['montant'] or 0.0,
+        'projets_livres': q("SELECT COUNT(*) as n FROM projects WHERE statut = 'TERMINÉ' AND strftime('%Y-%m', updated_at) = ?")['n'],
+        'stocks_mouvements': q("SELECT COUNT(*) as n FROM inventory_history WHERE strftime('%Y-%m', created_at) = ?")['n'],
+        'performances_fournisseurs': db.execute_query('''
+            SELECT c.nom, COUNT(f.id) as commandes, SUM(f.montant_total) as montant FROM formulaires f JOIN companies c ON f.company_id = c.id
+            WHERE f.type_formulaire IN ('BON_ACHAT', 'BON_COMMANDE') AND strftime('%Y-%m', f.date_creation) = ?
+            GROUP BY c.id, c.nom ORDER BY montant DESC LIMIT 10''', p),
+        'bt_performance': {'total_bt': total_bt,
+                           'assignations_mois': q("SELECT COUNT(*) as n FROM bt_assignations WHERE strftime('%Y-%m', date_assignation) = ?")['n'],
+                           'completion_rate': termines / total_bt * 100 if total_bt else 0.0},
+        'timetracker_bt_mensuel': {'sessions_bt': tt['s'], 'heures_bt': round(tt['h'], 1), 'cout_bt': round(tt['c'], 2)},
+        'work_centers_performance': {'nouveaux_postes': q("SELECT COUNT(*) as n FROM work_centers WHERE strftime('%Y-%m', created_at) = ?")['n'],
+                                     'utilisation_moyenne': round(wc['h'] / (wc['cap'] * 30) * 100, 2),
+                                     'revenus_generes': round(wc['r'], 2)},
+        'production_performance': {'nouveaux_bom': q("SELECT COUNT(*) as n FROM materials WHERE strftime('%Y-%m', created_at) = ?")['n'],
+                                   'nouvelles_operations': ops['n'],
+                                   'projets_production': q("SELECT COUNT(DISTINCT project_id) as n FROM materials WHERE strftime('%Y-%m', created_at) = ? AND project_id IS NOT NULL")['n']},
+        'operations_bt_performance': {'operations_bt_creees': ops['bt'] or 0, 'bt_operations_mois': ops['dbt'],
+                                      'temps_operations_bt': round(ops['t'], 2)},
+    }
+
+
+def test_plages_contigues():
+    """Mois consécutifs fusionnés, y compris au changement d'année ; mois disjoints séparés"""
+    assert contiguous_ranges([(2024, 2), (2023, 12), (2024, 1), (2024, 5)]) == [
+        ('2023-12-01', '2024-03-01'), ('2024-05-01', '2024-06-01')]
+    assert contiguous_ranges([(2023, 3), (2024, 3)]) == [('2023-03-01', '2023-04-01'), ('2024-03-01', '2024-04-01')]
+    print("✅ Plages contiguës")
+
+
+def test_memes_chiffres_que_l_ancien_rapport():
+    """Chaque indicateur identique à l'ancien rapport, mois par mois et sur plusieurs mois"""
+    db = creer_base(nb_par_mois=15)
+    rapports = db.generate_monthly_reports([(2023, m) for m in range(1, 13)] + [(2024, 2)])
+    assert list(rapports) == [f"2023-{m:02d}" for m in range(1, 13)] + ["2024-02"]
+    for periode, rapport in rapports.items():
+        annee, mois = map(int, periode.split('-'))
+        attendu = ancien_rapport(db, annee, mois)
+        for cle, valeur in attendu.items():
+            if cle == 'montant_commandes':
+                assert abs(rapport[cle] - valeur) < 1e-6, (periode, cle)
+            elif cle == 'performances_fournisseurs':
+                assert [(f['nom'], f['commandes'], round(f['montant'], 6)) for f in rapport[cle]] == \
+                       [(f['nom'], f['commandes'], round(f['montant'], 6)) for f in valeur], periode
+            else:
+                assert rapport[cle] == valeur, (periode, cle, rapport[cle], valeur)
+    assert db.generate_monthly_report(2023, 7) == rapports['2023-07']
+    assert db.generate_monthly_report(1999, 1)['formulaires_crees'] == 0
+    print("✅ Mêmes chiffres que l'ancien rapport")
+
+
+def test_cache_des_mois_clos():
+    """Mois clos servis du cache sans requête ; mois en cours toujours recalculé ; invalidation"""
+    db = creer_base(nb_par_mois=5, annees=(2024,))
+    moteur = MonthlyReportEngine(db, max_workers=1)
+    aujourd_hui = date(2024, 6, 15)
+    premier = moteur.reports([(2024, 5), (2024, 6)], today=aujourd_hui)
+
+    requetes = []
+    executer = db.execute_query
+    db.execute_query = lambda *args: requetes.append(args[0]) or executer(*args)
+    try:
+        rapports = list(moteur.iter_reports([(2024, 5)], today=aujourd_hui))
+        assert rapports == [premier['2024-05']] and not requetes
+        rapports[0]['formulaires_crees'] = -1  # une copie : le cache n'est pas modifié
+        assert moteur.reports([(2024, 5)], today=aujourd_hui)['2024-05'] == premier['2024-05']
+
+        moteur.reports([(2024, 6)], today=aujourd_hui)
+        assert requetes  # mois en cours : recalculé
+        del requetes[:]
+        invalidate_monthly_reports(db, '2024-05')
+        moteur.reports([(2024, 5)], today=aujourd_hui)
+        assert requetes
+    finally:
+        db.execute_query = executer
+    print("✅ Cache des mois clos")
+
+
+def test_echec_et_ecritures_retroactives():
+    """Balayage en échec : mois clos non mis en cache ; pointage fermé après la fin du mois : recalculé"""
+    db = creer_base(nb_par_mois=5, annees=(2024,))
+    moteur = MonthlyReportEngine(db, max_workers=1)
+    aujourd_hui = date(2024, 6, 15)
+    executer = db.execute_query
+
+    def verrouillee(query, params=None):
+        if 'FROM time_entries' in query:
+            raise sqlite3.OperationalError("database is locked")
+        return executer(query, params)
+
+    db.execute_query = verrouillee
+    try:
+        partiel = moteur.reports([(2024, 5)], today=aujourd_hui)['2024-05']
+    finally:
+        db.execute_query = executer
+    assert partiel['timetracker_bt_mensuel']['sessions_bt'] == 0
+    complet = moteur.reports([(2024, 5)], today=aujourd_hui)['2024-05']
+    assert complet['timetracker_bt_mensuel']['sessions_bt'] > 0  # zéros non figés dans le cache
+
+    # Pointage ouvert en mai, fermé plus tard : le rapport de mai (en cache) est recalculé
+    bt_id = db.execute_query("SELECT id FROM formulaires WHERE type_formulaire = 'BON_TRAVAIL' LIMIT 1")[0]['id']
+    db.execute_insert("INSERT OR IGNORE INTO employees (id, prenom, nom) VALUES (1, 'Marc', 'Gagnon')")
+    entry_id = db.execute_insert("INSERT INTO time_entries (employee_id, formulaire_bt_id, punch_in) "
+                                 "VALUES (1, ?, '2024-05-31 22:00:00')", (bt_id,))
+    assert moteur.reports([(2024, 5)], today=aujourd_hui)['2024-05'] == complet  # servi du cache
+    assert db.close_time_entry_for_bt(entry_id, hourly_rate=50.0)
+    recalcule = moteur.reports([(2024, 5)], today=aujourd_hui)['2024-05']
+    assert recalcule['timetracker_bt_mensuel']['sessions_bt'] == complet['timetracker_bt_mensuel']['sessions_bt'] + 1
+    assert recalcule['timetracker_bt_mensuel']['heures_bt'] > complet['timetracker_bt_mensuel']['heures_bt']
+    print("✅ Échec de balayage et écritures rétroactives")
+
+
+def benchmark_rapport_annuel(nb_par_mois=3000):
+    """Douze mois : ancien rapport mois par mois vs balayages planifiés en parallèle"""
+    db = creer_base(nb_par_mois=nb_par_mois, annees=(2024,))
+    print(f"📊 Benchmark: {nb_par_mois * 12} lignes par table, rapport sur 12 mois")
+    t0 = time.perf_counter()
+    for mois in range(1, 13):
+        ancien_rapport(db, 2024, mois)
+    print(f"  {'Ancien (strftime, mois par mois)':<36} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+    t0 = time.perf_counter()
+    MonthlyReportEngine(db).months_range((2024, 1), (2024, 12))
+    print(f"  {'Balayages planifiés (nouveau)':<36} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+    t0 = time.perf_counter()
+    MonthlyReportEngine(db).months_range((2024, 1), (2024, 12))
+    print(f"  {'Mois clos en cache':<36} {(time.perf_counter() - t0) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    test_plages_contigues()
+    test_memes_chiffres_que_l_ancien_rapport()
+    test_cache_des_mois_clos()
+    test_echec_et_ecritures_retroactives()
+    benchmark_rapport_annuel()
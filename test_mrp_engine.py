@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# test_mrp_engine.py - Tests et benchmark du calcul des besoins nets (MRP)
+# ERP Production DG Inc.
+
+"""
+Vérifie que mrp_engine.py nette correctement le stock, les réservations
+actives, les matériaux des BT ouverts (pris dans le stock interne, non déjà
+réservés) et les bons d'achat en cours, arrondit au lot de commande et regroupe
+les propositions par fournisseur, le tout en un nombre fixe de requêtes.
+Lancé directement, le script mesure le calcul sur un catalogue de 20 000
+produits.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from erp_database import ERPDatabase
+from produits import GestionnaireProduits
+from mrp_engine import MRPEngine, FOURNISSEUR_NON_DEFINI
+
+
+def materiau(nom, description, fournisseur='-- Interne --'):
+    """Ligne matériau telle qu'enregistrée par production_management (séquence >= 1000)"""
+    return f"MATERIAU: {nom} - {description}", json.dumps({'type': 'material', 'fournisseur': fournisseur, 'available': 'partial'})
+
+
+def creer_base_mrp():
+    """Base temporaire : cinq produits, réservations, BT ouverts/terminés et bons d'achat"""
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_mrp_"), "mrp.db"))
+    gestionnaire = GestionnaireProduits(db)
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM produits")  # produits d'exemple créés par GestionnaireProduits
+        conn.executemany('''
+            INSERT INTO produits (id, code_produit, nom, categorie, unite_vente, prix_unitaire, stock_disponible,
+                                  stock_minimum, point_commande, lot_commande, fournisseur_principal, actif)
+            VALUES (?, ?, ?, 'Béton', 'SAC', ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (1, 'CIM-30', 'Ciment Portland', 12.5, 10, 0, 20, 25, 'Béton Granby', 1),
+            (2, 'SAB-01', 'Sable lavé', 4.0, 100, 30, 0, 0, 'Carrière Nord', 1),
+            (3, 'VIS-8', 'Vis 8mm', 0.2, 5, 0, 10, 100, 'Quincaillerie Pro', 1),
+            (4, 'ANC-1', 'Quincaillerie X', 3.0, 0, 0, 0, 0, None, 1),
+            (5, 'OLD-1', 'Produit retiré', 1.0, 0, 50, 50, 0, 'Béton Granby', 0),
+        ])
+        conn.executemany('''
+            INSERT INTO reservations_stock (produit_id, quantite_reservee, reference_document, reference_type, statut)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (1, 5, 'BT-0001', 'BON_TRAVAIL', 'ACTIVE'),
+            (2, 50, 'DEV-0001', 'DEVIS', 'ACTIVE'),
+            (2, 20, 'DEV-0002', 'DEVIS', 'LIBEREE'),
+        ])
+
+        conn.executemany("INSERT INTO formulaires (id, type_formulaire, numero_document, statut) VALUES (?, ?, ?, ?)", [
+            (1, 'BON_TRAVAIL', 'BT-0001', 'VALIDÉ'),
+            (2, 'BON_TRAVAIL', 'BT-0002', 'TERMINÉ'),
+            (3, 'BON_ACHAT', 'BA-0001', 'ENVOYÉ'),
+            (4, 'BON_ACHAT', 'BA-0002', 'TERMINÉ'),
+        ])
+        lignes_bt = [
+            (1, 1000, *materiau('Ciment Portland', 'déjà réservé'), 5),
+            (1, 1001, *materiau('Sable lavé', 'pour dalle'), 30),
+            (1, 1002, *materiau('Sable lavé', 'livré direct', 'Carrière Nord'), 500),
+            (1, 1003, *materiau('quincaillerie  x', ''), 4),
+            (1, 1, 'Opération de coffrage', None, 99),
+            (2, 1000, *materiau('Sable lavé', 'BT terminé'), 999),
+        ]
+        conn.executemany("INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description, notes_ligne, quantite) "
+                         "VALUES (?, ?, ?, ?, ?)", lignes_bt)
+        conn.executemany("INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description, code_article, quantite) "
+                         "VALUES (?, ?, ?, ?, ?)", [
+                             (3, 1, 'Vis 8 mm zinguée', 'VIS-8', 10),
+                             (4, 1, 'Vis 8 mm zinguée', 'VIS-8', 1000),
+                         ])
+        conn.commit()
+    return db, gestionnaire
+
+
+def test_besoins_nets():
+    """Stock projeté = stock + entrant - réservé - besoins BT ; quantité arrondie au lot"""
+    db, _ = creer_base_mrp()
+    plan = {p['code_produit']: p for p in MRPEngine(db).compute_plan(seulement_a_commander=False).to_dict('records')}
+    assert 'OLD-1' not in plan
+
+    ciment = plan['CIM-30']  # besoin BT couvert par la réservation du même BT
+    assert (ciment['reserve'], ciment['besoins_bt'], ciment['stock_projete']) == (5, 0, 5)
+    assert (ciment['besoin_net'], ciment['qte_proposee'], ciment['cout_estime']) == (15, 25, 312.5)
+
+    sable = plan['SAB-01']  # seuil = stock minimum, BT terminé et fournisseur externe ignorés
+    assert (sable['reserve'], sable['besoins_bt'], sable['seuil'], sable['qte_proposee']) == (50, 30, 30, 10)
+
+    vis = plan['VIS-8']  # BA en cours rapproché par code article, BA reçu ignoré
+    assert (vis['entrant'], vis['stock_projete'], vis['qte_proposee']) == (10, 15, 0)
+
+    ancre = plan['ANC-1']  # sans seuil : commandé seulement si le stock projeté est négatif
+    assert (ancre['besoins_bt'], ancre['qte_proposee'], ancre['fournisseur_principal']) == (4, 4, FOURNISSEUR_NON_DEFINI)
+    print("✅ Besoins nets")
+
+
+def test_propositions_par_fournisseur():
+    """Seuls les produits à commander, regroupés par fournisseur, en requêtes fixes"""
+    db, _ = creer_base_mrp()
+    requetes = []
+    execute_query = db.execute_query
+    db.execute_query = lambda *args, **kwargs: requetes.append(1) or execute_query(*args, **kwargs)
+    propositions = MRPEngine(db).propose_purchase_orders()
+    db.execute_query = execute_query
+    assert len(requetes) == 5  # catalogue + réservations + lignes BT + réservations BT + lignes BA
+
+    assert sorted(propositions) == ['Béton Granby', 'Carrière Nord', FOURNISSEUR_NON_DEFINI]
+    assert propositions['Béton Granby']['nb_produits'] == 1
+    assert propositions['Béton Granby']['cout_total'] == 312.5
+    assert propositions['Carrière Nord']['produits'][0]['code_produit'] == 'SAB-01'
+    print("✅ Propositions par fournisseur")
+
+
+def test_gestionnaire_produits():
+    """Réservations en une requête ; stock complet inchangé ; plan exposé par le gestionnaire"""
+    db, gestionnaire = creer_base_mrp()
+    assert gestionnaire.get_total_reserve_par_produit() == {1: 5.0, 2: 50.0}
+    sable = gestionnaire.get_stock_complet(2)
+    assert (sable['total_reserve'], sable['stock_libre']) == (50, 50)
+    vis = gestionnaire.get_stock_complet(3)
+    assert (vis['total_reserve'], vis['stock_libre']) == (0, 5)
+    assert [p['code_produit'] for p in gestionnaire.get_plan_reapprovisionnement()] == ['CIM-30', 'SAB-01', 'ANC-1']
+    print("✅ Gestionnaire produits")
+
+
+def benchmark_catalogue(nb_produits=20000):
+    """Ancien stock complet produit par produit vs plan MRP de tout le catalogue"""
+    rng = random.Random(5)
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_mrp_bench_"), "mrp.db"))
+    gestionnaire = GestionnaireProduits(db)
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM produits")  # produits d'exemple créés par GestionnaireProduits
+        conn.executemany('''
+            INSERT INTO produits (id, code_produit, nom, categorie, unite_vente, prix_unitaire, stock_disponible,
+                                  stock_minimum, point_commande, lot_commande, fournisseur_principal)
+            VALUES (?, ?, ?, 'Divers', 'UN', ?, ?, ?, ?, ?, ?)
+        ''', [(i, f"P-{i:05d}", f"Produit {i}", rng.uniform(1, 50), rng.randint(0, 200), rng.randint(0, 50),
+               rng.randint(0, 80), rng.choice([0, 10, 25]), f"Fournisseur {i % 40}") for i in range(1, nb_produits + 1)])
+        conn.executemany("INSERT INTO reservations_stock (produit_id, quantite_reservee, reference_document, reference_type) "
+                         "VALUES (?, ?, 'DEV-BENCH', 'DEVIS')",
+                         [(rng.randint(1, nb_produits), rng.randint(1, 20)) for _ in range(nb_produits // 2)])
+        conn.executemany("INSERT INTO formulaires (id, type_formulaire, numero_document, statut) VALUES (?, ?, ?, ?)",
+                         [(i, 'BON_TRAVAIL', f"BT-B{i:04d}", 'VALIDÉ') for i in range(1, 501)]
+                         + [(1000 + i, 'BON_ACHAT', f"BA-B{i:04d}", 'ENVOYÉ') for i in range(1, 301)])
+        conn.executemany("INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description, notes_ligne, quantite) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         [(bt, 1000 + j, *materiau(f"Produit {rng.randint(1, nb_produits)}", 'bench'), rng.randint(1, 10))
+                          for bt in range(1, 501) for j in range(10)])
+        conn.executemany("INSERT INTO formulaire_lignes (formulaire_id, sequence_ligne, description, code_article, quantite) "
+                         "VALUES (?, ?, 'Achat', ?, ?)",
+                         [(1000 + ba, j, f"P-{rng.randint(1, nb_produits):05d}", rng.randint(5, 50))
+                          for ba in range(1, 301) for j in range(1, 11)])
+        conn.commit()
+
+    print(f"📊 Benchmark: {nb_produits} produits")
+    ids = [row['id'] for row in db.execute_query("SELECT id FROM produits")]
+    for libelle, fonction in (("Stock complet produit par produit", lambda: [gestionnaire.get_stock_complet(i) for i in ids]),
+                              ("Réservations groupées", gestionnaire.get_total_reserve_par_produit),
+                              ("Plan MRP complet", lambda: MRPEngine(db).compute_plan())):
+        t0 = time.perf_counter()
+        resultat = fonction()
+        print(f"  {libelle:<36} {(time.perf_counter() - t0) * 1000:8.1f} ms ({len(resultat)} lignes)")
+
+
+if __name__ == "__main__":
+    test_besoins_nets()
+    test_propositions_par_fournisseur()
+    test_gestionnaire_produits()
+    benchmark_catalogue()
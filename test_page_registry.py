@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# test_page_registry.py - Tests et profil d'import du chargement paresseux des pages
+# ERP Production DG Inc.
+
+"""
+Vérifie que page_registry.py n'importe un module de page qu'au premier appel,
+que les indicateurs *_AVAILABLE suivent les échecs d'import et que le profil
+`-X importtime` est correctement analysé. Lancé directement, le script affiche
+le profil d'import de l'ancien démarrage (imports en tête de app.py) comparé
+au démarrage paresseux.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from page_registry import ModuleFlag, lazy_import, lazy_module, parse_importtime, profile_import_time
+
+REPO_DIR = str(Path(__file__).parent)
+
+# Imports exécutés par l'ancien app.py avant le premier affichage du portail
+MODULES_ANCIEN_DEMARRAGE = [
+    'pandas', 'plotly.express', 'plotly.graph_objects', 'backup_scheduler', 'fournisseurs',
+    'assistant_ia_simple', 'conformite_construction', 'erp_database', 'production_management', 'crm',
+    'produits', 'devis', 'employees', 'timetracker_unified', 'kanban', 'attachments_manager'
+]
+# Chaque import est tenté séparément : le profil reste exploitable si une dépendance manque
+ANCIEN_DEMARRAGE = (
+    f"for m in {MODULES_ANCIEN_DEMARRAGE!r}:\n"
+    "    try: __import__(m)\n"
+    "    except ImportError: pass"
+)
+DEMARRAGE_PARESSEUX = (
+    "import erp_database, erp_registry, page_registry; "
+    "page_registry.lazy_module('pandas'); page_registry.lazy_import('crm', 'GestionnaireCRM')"
+)
+
+
+def test_import_au_premier_appel():
+    """Le module n'est pas importé à la déclaration, seulement au premier appel"""
+    script = textwrap.dedent('''
+        import sys
+        from page_registry import lazy_import, get_import_report
+        classify = lazy_import('capacity_engine', 'classify_utilization')
+        assert 'capacity_engine' not in sys.modules
+        assert classify(90) == 'ÉLEVÉE'
+        assert 'capacity_engine' in sys.modules
+        assert 'capacity_engine' in get_import_report()['modules']
+    ''')
+    result = subprocess.run([sys.executable, '-c', script], cwd=REPO_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    print("✅ Import différé au premier appel")
+
+
+def test_indicateur_disponibilite():
+    """Module absent → faux ; module dont l'import échoue → faux après le premier appel"""
+    tmp_dir = tempfile.mkdtemp(prefix="erp_pages_")
+    with open(os.path.join(tmp_dir, "page_cassee_test.py"), "w", encoding="utf-8") as f:
+        f.write("import module_inexistant_xyz\n\ndef show_page():\n    return 'ok'\n")
+    sys.path.insert(0, tmp_dir)
+    try:
+        assert not ModuleFlag('module_inexistant_xyz')
+        assert ModuleFlag('capacity_engine')
+
+        flag = ModuleFlag('page_cassee_test')
+        assert flag  # find_spec trouve le fichier sans l'exécuter
+        assert lazy_import('page_cassee_test', 'show_page')() is None
+        assert not flag
+    finally:
+        sys.path.remove(tmp_dir)
+    print("✅ Indicateurs de disponibilité")
+
+
+def test_module_paresseux():
+    """Les attributs du proxy sont ceux du vrai module"""
+    json_lazy = lazy_module('json')
+    assert json_lazy.dumps({'a': 1}) == '{"a": 1}'
+    print("✅ Proxy de module")
+
+
+def test_analyse_importtime():
+    """Analyse d'une sortie -X importtime"""
+    sortie = textwrap.dedent('''\
+        import time: self [us] | cumulative | imported package
+        import time:       120 |        120 |   _json
+        import time:       800 |        920 | json
+        import time:      1500 |       1500 | page_registry
+    ''')
+    entries = parse_importtime(sortie)
+    assert [e['module'] for e in entries] == ['_json', 'json', 'page_registry']
+    assert entries[0]['depth'] == 1 and entries[1]['depth'] == 0
+    assert entries[1]['cumulative_us'] == 920
+
+    profil = profile_import_time("import page_registry", cwd=REPO_DIR)
+    assert profil['returncode'] == 0 and profil['nb_modules'] > 0
+    print("✅ Profil importtime analysé")
+
+
+def benchmark_demarrage():
+    """Profil -X importtime : ancien démarrage (imports en tête de app.py) vs paresseux"""
+    for libelle, statement in (("Ancien démarrage", ANCIEN_DEMARRAGE), ("Démarrage paresseux", DEMARRAGE_PARESSEUX)):
+        profil = profile_import_time(statement, cwd=REPO_DIR, top=8)
+        print(f"📊 {libelle}: {profil['total_ms']:.1f} ms, {profil['nb_modules']} modules")
+        for entry in profil['plus_couteux']:
+            print(f"    {entry['cumulative_us'] / 1000:8.1f} ms  {'  ' * entry['depth']}{entry['module']}")
+
+
+if __name__ == "__main__":
+    test_import_au_premier_appel()
+    test_indicateur_disponibilite()
+    test_module_paresseux()
+    test_analyse_importtime()
+    benchmark_demarrage()
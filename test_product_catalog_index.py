@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# test_product_catalog_index.py - Tests et benchmark de l'index du catalogue produits
+# ERP Production DG Inc.
+
+"""
+Vérifie que product_catalog_index.py trouve les mêmes produits que l'ancien
+LIKE '%terme%' (et en plus sans accents), classe les codes d'abord, gère les
+préfixes courts et les termes à plusieurs mots, et se met à jour produit par
+produit après les écritures de GestionnaireProduits ou d'autres modules.
+Lancé directement, le script compare les deux recherches sur 20 000 produits.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+import product_catalog_index
+from erp_database import ERPDatabase
+from produits import GestionnaireProduits
+from product_catalog_index import ProductCatalogIndex, get_shared_index, invalidate_index, normalize_text
+
+MATERIAUX = ['Béton', 'Acier', 'Bois', 'Granulat', 'Mortier', 'Isolant']
+NOMS = ['Armature', 'Coffrage', 'Planche', 'Treillis', 'Sable', 'Ciment', 'Poutre', 'Dalle', 'Brique', 'Membrane']
+QUALIFICATIFS = ['renforcé', 'traité', 'léger', 'haute résistance', 'standard', 'préfabriqué']
+
+
+def creer_catalogue(nb_produits=300, seed=3):
+    """Base temporaire avec un catalogue aléatoire (les produits d'exemple sont retirés)"""
+    rng = random.Random(seed)
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_catalogue_"), "catalogue.db"))
+    gestionnaire = GestionnaireProduits(db)
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM produits")
+        conn.executemany('''
+            INSERT INTO produits (id, code_produit, nom, description, categorie, materiau, unite_vente, prix_unitaire, actif)
+            VALUES (?, ?, ?, ?, ?, ?, 'UN', ?, ?)
+        ''', [(i, f"{rng.choice(['BET', 'ACI', 'BOI', 'GRA'])}-{i:05d}",
+               f"{rng.choice(NOMS)} {rng.choice(QUALIFICATIFS)} {rng.randint(10, 30)}M",
+               f"{rng.choice(QUALIFICATIFS)} pour {rng.choice(['fondation', 'mur', 'toiture', 'dalle'])}",
+               rng.choice(['Béton', 'Acier', 'Bois']), rng.choice(MATERIAUX), rng.uniform(1, 100),
+               0 if i % 25 == 0 else 1) for i in range(1, nb_produits + 1)])
+        conn.commit()
+    invalidate_index(db)
+    return db, gestionnaire
+
+
+def ancienne_recherche(db, terme):
+    """Ancien search_produits : LIKE sur quatre colonnes"""
+    terme = f"%{terme.lower()}%"
+    return db.execute_query('''
+        SELECT * FROM produits
+        WHERE actif = 1 AND (LOWER(nom) LIKE ? OR LOWER(code_produit) LIKE ? OR LOWER(description) LIKE ? OR LOWER(materiau) LIKE ?)
+        ORDER BY nom
+    ''', (terme, terme, terme, terme))
+
+
+def test_normalisation_et_classement():
+    """Accents et casse ignorés ; code exact puis préfixe de code puis nom"""
+    assert normalize_text("  Béton  ARMÉ ") == "beton arme"
+    index = ProductCatalogIndex([
+        {'id': 1, 'code_produit': 'TRE-10', 'nom': 'Treillis soudé', 'materiau': 'Acier', 'description': 'Pour dalle'},
+        {'id': 2, 'code_produit': 'DAL-01', 'nom': 'Dalle alvéolée', 'materiau': 'Béton', 'description': None},
+        {'id': 3, 'code_produit': 'DAL', 'nom': 'Accessoire', 'materiau': None, 'description': 'Support de dalle'},
+        {'id': 4, 'code_produit': 'OLD', 'nom': 'Dalle retirée', 'actif': 0},
+    ])
+    assert len(index) == 3
+    assert index.search_ids("dal") == [3, 2, 1]
+    assert index.search_ids("BETON") == [2] and index.search_ids("alveolee") == [2]
+    assert index.search_ids("soude acier") == [1] and index.search_ids("soude béton") == []
+    assert index.search_ids("10") == [1]  # préfixe court sur un mot
+    assert index.search_ids("dal", limit=1) == [3]
+    assert index.search_ids("   ") == [] and index.search_ids("xyz") == []
+    print("✅ Normalisation et classement")
+
+
+def test_resultats_identiques_au_like():
+    """Pour des termes ASCII de 3 lettres et plus : mêmes produits que l'ancien LIKE"""
+    db, gestionnaire = creer_catalogue()
+    for terme in ('arm', 'ACI-0001', 'fondation', 'haute', '20m', 'ment', 'toit', 'inexistant'):
+        attendus = {row['id'] for row in ancienne_recherche(db, terme)}
+        trouves = [p['id'] for p in gestionnaire.search_produits(terme)]
+        assert set(trouves) == attendus and len(trouves) == len(attendus), terme
+    # Sans accents : "beton" trouve aussi "Béton" (l'ancien LIKE non)
+    assert len(gestionnaire.search_produits("beton")) > len(ancienne_recherche(db, "beton"))
+    assert [p['id'] for p in gestionnaire.get_all_products()] == [
+        row['id'] for row in db.execute_query("SELECT id FROM produits WHERE actif = 1 ORDER BY categorie, nom")
+    ]
+    print("✅ Résultats identiques au LIKE")
+
+
+def test_mise_a_jour_incrementale():
+    """Écritures du gestionnaire appliquées produit par produit ; écritures externes resynchronisées"""
+    db, gestionnaire = creer_catalogue(nb_produits=50)
+    index = get_shared_index(db)
+    chargements = []
+    charger = product_catalog_index.load_catalog_index
+    product_catalog_index.load_catalog_index = lambda *args: chargements.append(1) or charger(*args)
+    try:
+        gestionnaire.modifier_produit(1, {'nom': 'Poutrelle galvanisée'})
+        assert [p['id'] for p in gestionnaire.search_produits("galvanisee")] == [1]
+        gestionnaire.supprimer_produit(1)
+        assert gestionnaire.search_produits("galvanisee") == []
+        nouveau_id = gestionnaire.ajouter_produit({'code_produit': 'NEW-1', 'nom': 'Équerre inox', 'categorie': 'Acier'})
+        assert [p['id'] for p in gestionnaire.search_produits("equerre")] == [nouveau_id]
+
+        db.execute_update("UPDATE produits SET nom = 'Cornière zinguée', updated_at = '2999-01-01 00:00:00' WHERE id = 2")
+        assert gestionnaire.search_produits("corniere") == []  # signature pas encore revérifiée
+        index.checked_at = 0
+        assert [p['id'] for p in gestionnaire.search_produits("corniere")] == [2]
+        assert get_shared_index(db) is index and not chargements
+
+        db.execute_update("DELETE FROM produits WHERE id = 3")
+        index.checked_at = 0
+        assert get_shared_index(db) is not index and len(chargements) == 1  # suppression physique : rechargement
+    finally:
+        product_catalog_index.load_catalog_index = charger
+    print("✅ Mise à jour incrémentale")
+
+
+def benchmark_autocompletion(nb_produits=20000):
+    """Ancien LIKE sur quatre colonnes vs index en mémoire, frappe par frappe"""
+    db, gestionnaire = creer_catalogue(nb_produits=nb_produits)
+    t0 = time.perf_counter()
+    get_shared_index(db)
+    print(f"📊 Benchmark: {nb_produits} produits (index construit en {(time.perf_counter() - t0) * 1000:.0f} ms)")
+    frappes = ['a', 'ar', 'arm', 'arma', 'armat', 'armature', 'armature r', 'armature ren', 'armature renf']
+    for libelle, fonction in (("LIKE '%terme%' (ancien)", lambda t: ancienne_recherche(db, t)),
+                              ("Index, tous les résultats", gestionnaire.search_produits),
+                              ("Index, 20 premiers", lambda t: gestionnaire.search_produits(t, limit=20))):
+        t0 = time.perf_counter()
+        for terme in frappes:
+            fonction(terme)
+        print(f"  {libelle:<28} {(time.perf_counter() - t0) * 1000 / len(frappes):8.2f} ms/frappe")
+
+
+if __name__ == "__main__":
+    test_normalisation_et_classement()
+    test_resultats_identiques_au_like()
+    test_mise_a_jour_incrementale()
+    benchmark_autocompletion()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# test_scheduling_engine.py - Tests de la planification à capacité finie
+# ERP Production DG Inc.
+
+"""
+Vérifie que l'échéancier calculé par scheduling_engine.py est réalisable :
+pas de chevauchement sur un poste, séquence des opérations de chaque BT
+respectée, réservations de postes honorées, et temps de calcul borné
+pour plusieurs milliers d'opérations.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from erp_database import ERPDatabase
+from scheduling_engine import FiniteCapacityScheduler, WorkingCalendar
+
+LUNDI = date(2025, 3, 3)
+TOLERANCE = timedelta(minutes=1)  # Dates arrondies à la minute
+
+
+def generer_operations(nb_bts=100, ops_par_bt=5, nb_postes=10, seed=7):
+    """Opérations synthétiques triées par BT puis séquence"""
+    rng = random.Random(seed)
+    operations, op_id = [], 0
+    for bt_id in range(1, nb_bts + 1):
+        priorite = rng.choice(['NORMAL', 'NORMAL', 'URGENT', 'CRITIQUE'])
+        for seq in range(1, ops_par_bt + 1):
+            op_id += 1
+            wc_id = rng.randint(1, nb_postes)
+            operations.append({
+                'id': op_id, 'bt_id': bt_id, 'work_center_id': wc_id, 'sequence_number': seq * 10,
+                'temps_estime': rng.uniform(1, 16), 'statut': 'À FAIRE',
+                'numero_document': f"BT-{bt_id:05d}", 'priorite': priorite, 'date_echeance': None,
+                'work_center_name': f"Poste {wc_id}", 'capacite_theorique': rng.choice([8, 16])
+            })
+    return operations
+
+
+def verifier_faisabilite(operations, result):
+    """Aucun chevauchement par poste et précédence respectée dans chaque BT"""
+    par_id = {op['id']: op for op in operations}
+    par_poste, par_bt = {}, {}
+    for planif in result['operations']:
+        debut = datetime.fromisoformat(planif['date_debut_planifiee'])
+        fin = datetime.fromisoformat(planif['date_fin_planifiee'])
+        assert fin >= debut
+        op = par_id[planif['operation_id']]
+        par_poste.setdefault(op['work_center_id'], []).append((debut, fin))
+        par_bt.setdefault(op['bt_id'], []).append((op['sequence_number'], debut, fin))
+
+    for intervalles in par_poste.values():
+        intervalles.sort()
+        for (_, fin_prec), (debut_suiv, _) in zip(intervalles, intervalles[1:]):
+            assert debut_suiv >= fin_prec - TOLERANCE, "Chevauchement sur un poste"
+
+    for etapes in par_bt.values():
+        etapes.sort()
+        for (_, _, fin_prec), (_, debut_suiv, _) in zip(etapes, etapes[1:]):
+            assert debut_suiv >= fin_prec - TOLERANCE, "Séquence BT non respectée"
+
+
+def test_calendrier_ouvrable():
+    """Les jours ouvrables sautent les fins de semaine"""
+    calendrier = WorkingCalendar(LUNDI)
+    assert calendrier.jour_ouvrable(4) == date(2025, 3, 7)    # vendredi
+    assert calendrier.jour_ouvrable(5) == date(2025, 3, 10)   # lundi suivant
+    assert calendrier.index_de(date(2025, 3, 10)) == 5
+    assert calendrier.index_de(date(2025, 3, 8)) == 5         # samedi → lundi
+    assert WorkingCalendar(date(2025, 3, 1)).origine == LUNDI
+    print("✅ Calendrier ouvrable correct")
+
+
+def test_echeancier_realisable():
+    """Capacité et séquences respectées sur un jeu aléatoire"""
+    operations = generer_operations()
+    result = FiniteCapacityScheduler(None).schedule(operations, origine=LUNDI)
+    assert result['nb_operations'] == len(operations)
+    verifier_faisabilite(operations, result)
+    print("✅ Échéancier réalisable")
+
+
+def test_priorite_et_reservation():
+    """Le BT critique passe en premier ; une réservation retarde le début"""
+    operations = [
+        {'id': 1, 'bt_id': 1, 'work_center_id': 1, 'sequence_number': 1, 'temps_estime': 8, 'statut': 'À FAIRE',
+         'priorite': 'NORMAL', 'date_echeance': None, 'capacite_theorique': 8},
+        {'id': 2, 'bt_id': 2, 'work_center_id': 1, 'sequence_number': 1, 'temps_estime': 8, 'statut': 'À FAIRE',
+         'priorite': 'CRITIQUE', 'date_echeance': None, 'capacite_theorique': 8},
+        {'id': 3, 'bt_id': 3, 'work_center_id': 2, 'sequence_number': 1, 'temps_estime': 4, 'statut': 'À FAIRE',
+         'priorite': 'NORMAL', 'date_echeance': None, 'capacite_theorique': 8},
+    ]
+    result = FiniteCapacityScheduler(None).schedule(operations, {(3, 2): '2025-03-05'}, origine=LUNDI)
+    dates = {op['operation_id']: op for op in result['operations']}
+    assert dates[2]['date_debut_planifiee'].startswith('2025-03-03')
+    assert dates[1]['date_debut_planifiee'].startswith('2025-03-04')
+    assert dates[3]['date_debut_planifiee'].startswith('2025-03-05')
+    print("✅ Priorité BT et réservation respectées")
+
+
+def test_performance_milliers_operations():
+    """5000 opérations planifiées en moins d'une seconde"""
+    operations = generer_operations(nb_bts=1000, ops_par_bt=5, nb_postes=60)
+    t0 = time.perf_counter()
+    result = FiniteCapacityScheduler(None).schedule(operations, origine=LUNDI)
+    duree = time.perf_counter() - t0
+    print(f"📊 {result['nb_operations']} opérations planifiées en {duree * 1000:.1f} ms")
+    assert duree < 1.0
+    verifier_faisabilite(operations, result)
+
+
+def test_ecriture_dates_planifiees():
+    """Les dates sont écrites dans operations et lisibles par les pages capacité"""
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_planif_"), "planif.db"))
+    with db.get_connection() as conn:
+        conn.execute("INSERT INTO work_centers (id, nom, capacite_theorique, statut) VALUES (1, 'Soudage', 8, 'ACTIF')")
+        conn.execute("INSERT INTO formulaires (id, type_formulaire, numero_document, statut, priorite) "
+                     "VALUES (1, 'BON_TRAVAIL', 'BT-TEST-001', 'VALIDÉ', 'NORMAL')")
+        conn.executemany(
+            "INSERT INTO operations (id, formulaire_bt_id, work_center_id, sequence_number, temps_estime, statut) "
+            "VALUES (?, 1, 1, ?, ?, 'À FAIRE')",
+            [(1, 10, 6.0), (2, 20, 4.0)]
+        )
+        conn.commit()
+
+    result = db.planifier_operations_capacite_finie()
+    assert result['nb_operations'] == 2
+    rows = db.execute_query("SELECT date_debut_planifiee, date_fin_planifiee FROM operations ORDER BY sequence_number")
+    assert all(row['date_debut_planifiee'] and row['date_fin_planifiee'] for row in rows)
+    assert rows[1]['date_debut_planifiee'] >= rows[0]['date_fin_planifiee']
+
+    synthese = db.get_planned_load_by_work_center()
+    assert synthese[0]['nb_operations'] == 2 and synthese[0]['heures_planifiees'] == 10.0
+    print("✅ Dates planifiées enregistrées")
+
+
+if __name__ == "__main__":
+    test_calendrier_ouvrable()
+    test_echeancier_realisable()
+    test_priorite_et_reservation()
+    test_performance_milliers_operations()
+    test_ecriture_dates_planifiees()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# test_schema_migrations.py - Tests et benchmark des migrations de schéma
+# ERP Production DG Inc.
+
+"""
+Vérifie que schema_migrations.py applique les migrations dans l'ordre et une
+seule fois, qu'une migration en échec est annulée sans être enregistrée, que
+le dry-run ne touche pas la base, et que la reconstruction en ligne de
+projects (ID en TEXT) reprend après interruption, répercute les écritures
+faites pendant la copie et conserve vues, index et triggers.
+Lancé directement, le script compare l'ancienne copie de table en mémoire et
+la reconstruction par lots sur 200 000 projets.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+import erp_database
+import schema_migrations
+from erp_database import ERPDatabase
+from schema_migrations import (MigrationContext, MigrationRunner, connect, get_progress, latest_version,
+                               migrate_projects_to_text_ids, projects_need_text_ids)
+
+
+def creer_base_projets(nb_projets=500):
+    """Base minimale : projects en ID INTEGER, une table liée, une vue, un index et un trigger"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="erp_migrations_"), "migrations.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE projects (
+            id INTEGER PRIMARY KEY,
+            nom_projet TEXT NOT NULL,
+            statut TEXT DEFAULT 'À FAIRE',
+            priorite TEXT DEFAULT 'MOYEN',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX idx_projects_statut ON projects(statut);
+        CREATE TABLE operations (id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER, description TEXT);
+        CREATE TABLE formulaires (id INTEGER PRIMARY KEY AUTOINCREMENT, project_id, statut TEXT);
+        CREATE VIEW view_projets_operations AS
+            SELECT p.id, p.nom_projet, COUNT(o.id) AS nb_operations
+            FROM projects p LEFT JOIN operations o ON o.project_id = p.id GROUP BY p.id;
+        CREATE TRIGGER trg_projects_updated AFTER UPDATE OF statut ON projects
+        BEGIN UPDATE projects SET updated_at = '2000-01-01' WHERE id = NEW.id; END;
+    ''')
+    conn.executemany("INSERT INTO projects (id, nom_projet, statut) VALUES (?, ?, ?)",
+                     [(i, f"Projet {i}", 'EN COURS' if i % 3 else 'À FAIRE') for i in range(1, nb_projets + 1)])
+    conn.executemany("INSERT INTO operations (project_id, description) VALUES (?, ?)",
+                     [(i % nb_projets + 1, f"Op {i}") for i in range(nb_projets * 2)])
+    conn.executemany("INSERT INTO formulaires (project_id, statut) VALUES (?, 'BROUILLON')",
+                     [(i,) for i in range(1, nb_projets + 1)])
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def test_migrations_ordonnees_et_uniques():
+    """Base neuve : v1..vN appliquées une fois ; base à jour : rien à refaire"""
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_migrations_"), "erp.db"))
+    versions = [row['version'] for row in db.execute_query("SELECT version FROM schema_version ORDER BY id")]
+    assert versions[-latest_version():] == list(range(1, latest_version() + 1))
+    assert db.get_schema_version() == latest_version()
+    assert MigrationRunner(db.db_path).pending() == [] and MigrationRunner(db.db_path).run() == []
+    regles = db.execute_query("SELECT nom FROM workflow_rules")
+    assert len(regles) == len({r['nom'] for r in regles}) == 2
+    print("✅ Migrations ordonnées et uniques")
+
+
+def test_migration_en_echec_annulee():
+    """Une migration transactionnelle qui échoue n'applique rien et n'est pas enregistrée"""
+    db_path = creer_base_projets(10)
+    MigrationRunner(db_path).run()
+    version = latest_version() + 1
+
+    def fautive(ctx):
+        ctx.execute("CREATE TABLE table_partielle (id INTEGER)")
+        ctx.execute("SELECT * FROM table_inexistante")
+
+    schema_migrations.migration(version, "Migration fautive")(fautive)
+    try:
+        report = MigrationRunner(db_path).run()
+        assert [r['status'] for r in report] == ['ERREUR']
+        assert not MigrationContext(connect(db_path), 'test').table_exists('table_partielle')
+        assert MigrationRunner(db_path).current_version() == version - 1
+    finally:
+        del schema_migrations._MIGRATIONS[version]
+    print("✅ Migration en échec annulée")
+
+
+def test_migration_en_echec_retentee_au_demarrage():
+    """Une migration en échec ne laisse pas d'empreinte : l'ouverture suivante la retente"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="erp_migrations_"), "retente.db")
+    ERPDatabase._schema_code_hash()  # empreinte du code calculée avant le remplacement
+    derniere = schema_migrations._MIGRATIONS[latest_version()]
+    original = derniere.apply
+
+    def panne(ctx):
+        raise sqlite3.OperationalError("disque plein")
+
+    derniere.apply = panne
+    try:
+        db = ERPDatabase(db_path)
+        assert "disque plein" in db.schema_error
+        assert db.get_schema_version() == latest_version() - 1
+    finally:
+        derniere.apply = original
+
+    # Redémarrage : l'empreinte absente et la version en retard forcent une nouvelle tentative
+    erp_database._SCHEMA_READY_PATHS.clear()
+    assert not db._schema_is_current()
+    db = ERPDatabase(db_path)
+    assert db.schema_error is None
+    assert db.get_schema_version() == latest_version()
+    erp_database._SCHEMA_READY_PATHS.clear()
+    assert db._schema_is_current()
+    print("✅ Migration en échec retentée au démarrage")
+
+
+def test_migrations_en_arriere_plan():
+    """wait_for_schema=False : le constructeur rend la main, le drapeau se lève à la fin"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="erp_migrations_"), "arriere_plan.db")
+    ERPDatabase._schema_code_hash()
+    derniere = schema_migrations._MIGRATIONS[latest_version()]
+    original = derniere.apply
+    feu_vert = threading.Event()
+
+    def lente(ctx):
+        feu_vert.wait(10)
+        original(ctx)
+
+    derniere.apply = lente
+    try:
+        db = ERPDatabase(db_path, wait_for_schema=False)
+        assert not db.wait_for_schema(timeout=0.1)
+        # Une seconde ouverture pendant la mise à jour ne relance rien
+        assert not db.start_schema_upgrade()
+        feu_vert.set()
+        assert db.wait_for_schema(timeout=10)
+    finally:
+        derniere.apply = original
+    assert db.schema_error is None
+    assert db.get_schema_version() == latest_version()
+    print("✅ Migrations en arrière-plan")
+
+
+def test_dry_run_sans_effet():
+    """Le dry-run mesure les migrations sur une copie, la base réelle reste intacte"""
+    db_path = creer_base_projets(50)
+    runner = MigrationRunner(db_path)
+    with open(db_path, 'rb') as f:
+        avant = f.read()
+    report = runner.dry_run()
+    assert [r['version'] for r in report] == list(range(1, latest_version() + 1))
+    assert all(r['status'] == 'OK' and r['duration_ms'] >= 0 for r in report)
+    with open(db_path, 'rb') as f:
+        assert f.read() == avant
+    assert schema_migrations.main([db_path, '--dry-run', '--projects-text-ids']) == 0
+    assert projects_need_text_ids(db_path)
+    print("✅ Dry-run sans effet")
+
+
+def test_reconstruction_reprise_et_synchronisation():
+    """Copie interrompue puis reprise ; écritures pendant la copie répercutées ; vue, index, trigger conservés"""
+    db_path = creer_base_projets(500)
+    conn = connect(db_path)
+    ctx = MigrationContext(conn, 'projects_text_ids', chunk_size=100)
+    MigrationRunner(db_path)._ensure_tables(conn)
+
+    # Interruption après 2 lots
+    lots = []
+    ecrire = ctx._save_progress
+    def interrompre(step, phase, *args):
+        ecrire(step, phase, *args)
+        if phase == 'copy' and args[0] is not None:
+            lots.append(args[0])
+            if len(lots) == 2:
+                raise KeyboardInterrupt
+    ctx._save_progress = interrompre
+    try:
+        ctx.rebuild_table('projects', lambda sql: sql.replace('id INTEGER PRIMARY KEY', 'id TEXT PRIMARY KEY'),
+                          {'id': "CAST({row}.id AS TEXT)"})
+        raise AssertionError("interruption attendue")
+    except KeyboardInterrupt:
+        pass
+    conn.close()
+    etape = get_progress(db_path, 'projects_text_ids')[0]
+    assert etape['phase'] == 'copy' and etape['rows_done'] == 100 and etape['total_rows'] == 500
+
+    # Écritures applicatives pendant la copie, sur des lignes déjà copiées et pas encore copiées
+    app = sqlite3.connect(db_path)
+    app.execute("UPDATE projects SET nom_projet = 'Renommé' WHERE id IN (50, 450)")
+    app.execute("DELETE FROM projects WHERE id IN (60, 460)")
+    app.execute("INSERT INTO projects (id, nom_projet) VALUES (9001, 'Ajouté pendant la copie')")
+    app.commit()
+    app.close()
+
+    result = migrate_projects_to_text_ids(db_path, chunk_size=100)
+    assert result['status'] == 'OK', result
+    assert not projects_need_text_ids(db_path)
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0] == 499
+    assert conn.execute("SELECT COUNT(*) FROM projects WHERE nom_projet = 'Renommé'").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM projects WHERE id IN ('60', '460')").fetchone()[0] == 0
+    assert conn.execute("SELECT typeof(id) FROM projects WHERE id = '9001'").fetchone()[0] == 'text'
+    assert conn.execute("SELECT DISTINCT typeof(project_id) FROM formulaires").fetchall() == [('text',)]
+    assert result['tables_liees'] == {'formulaires': 500}  # operations.project_id INTEGER : comparée par affinité
+    assert conn.execute("SELECT nb_operations FROM view_projets_operations WHERE id = '1'").fetchone()[0] == 2
+    noms = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'projects'")}
+    assert {'idx_projects_statut', 'trg_projects_updated'} <= noms and not any('__new' in n for n in noms)
+    conn.execute("UPDATE projects SET statut = 'TERMINÉ' WHERE id = '1'")
+    assert conn.execute("SELECT updated_at FROM projects WHERE id = '1'").fetchone()[0] == '2000-01-01'
+    conn.execute("INSERT INTO projects (id, nom_projet) VALUES ('PRJ-A1', 'Alphanumérique')")
+    conn.close()
+
+    # Déjà converti : sans effet
+    assert migrate_projects_to_text_ids(db_path)['rows'] == 0
+    print("✅ Reconstruction reprise et synchronisée")
+
+
+def ancienne_migration(db_path):
+    """Ancien run_database_migration : fetchall, RENAME, CREATE, INSERT SELECT, UPDATE global"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("DROP VIEW IF EXISTS view_projets_operations")
+    conn.execute("SELECT * FROM projects").fetchall()
+    conn.execute("ALTER TABLE projects RENAME TO projects_old")
+    conn.execute('''CREATE TABLE projects (id TEXT PRIMARY KEY, nom_projet TEXT NOT NULL,
+                    statut TEXT DEFAULT 'À FAIRE', priorite TEXT DEFAULT 'MOYEN', updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute("INSERT INTO projects SELECT CAST(id AS TEXT), nom_projet, statut, priorite, updated_at FROM projects_old")
+    conn.execute("UPDATE formulaires SET project_id = CAST(project_id AS TEXT) WHERE project_id IS NOT NULL")
+    conn.execute("UPDATE operations SET project_id = CAST(project_id AS TEXT) WHERE project_id IS NOT NULL")
+    conn.execute("DROP TABLE projects_old")
+    conn.commit()
+    conn.close()
+
+
+def benchmark_reconstruction(nb_projets=200000):
+    """Verrou d'écriture le plus long : ancienne copie en une transaction vs lots de 2000"""
+    print(f"📊 Benchmark: {nb_projets} projets, {nb_projets * 2} opérations")
+    db_path = creer_base_projets(nb_projets)
+    t0 = time.perf_counter()
+    ancienne_migration(db_path)
+    duree = time.perf_counter() - t0
+    print(f"  {'Copie en une transaction (ancien)':<36} total {duree:6.2f} s, verrou max {duree * 1000:8.0f} ms")
+
+    db_path = creer_base_projets(nb_projets)
+    verrous = []
+    debut = [time.perf_counter()]
+    def mesurer(progression):
+        maintenant = time.perf_counter()
+        verrous.append(maintenant - debut[0])
+        debut[0] = maintenant
+    t0 = time.perf_counter()
+    migrate_projects_to_text_ids(db_path, progress_callback=mesurer)
+    duree = time.perf_counter() - t0
+    print(f"  {'Reconstruction par lots (nouveau)':<36} total {duree:6.2f} s, verrou max {max(verrous) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    test_migrations_ordonnees_et_uniques()
+    test_migration_en_echec_annulee()
+    test_migration_en_echec_retentee_au_demarrage()
+    test_migrations_en_arriere_plan()
+    test_dry_run_sans_effet()
+    test_reconstruction_reprise_et_synchronisation()
+    benchmark_reconstruction()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# test_supplier_scorecards.py - Tests et benchmark des scorecards fournisseurs
+# ERP Production DG Inc.
+
+"""
+Vérifie que supplier_scorecards.py donne, pour chaque fournisseur, les mêmes
+volumes, ponctualité et retard que l'ancien calcul à deux requêtes par
+fournisseur, en une seule requête pour tous, puis le cycle du snapshot
+(création, lecture, recalcul quand il est périmé ou forcé).
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Ajouter le répertoire parent au PATH pour les imports
+sys.path.append(str(Path(__file__).parent))
+
+from erp_database import ERPDatabase
+from supplier_scorecards import SupplierScorecardEngine, compute_score_global
+
+# Préfixes imposés par trigger_validate_numero_document ; les DP ne sont pas des commandes
+PREFIXES = {'BON_ACHAT': 'BA', 'BON_COMMANDE': 'BC', 'DEMANDE_PRIX': 'DP'}
+
+
+def creer_jeu_fournisseurs(nb_fournisseurs=20, commandes_par_fournisseur=15, seed=11):
+    """Base temporaire : fournisseurs, bons d'achat sur deux ans et livraisons à l'heure ou en retard"""
+    rng = random.Random(seed)
+    db = ERPDatabase(os.path.join(tempfile.mkdtemp(prefix="erp_scorecards_"), "scorecards.db"))
+    maintenant = datetime.now()
+    with db.get_connection() as conn:
+        formulaire_id = 0
+        for i in range(1, nb_fournisseurs + 1):
+            company_id = 5000 + i
+            conn.execute("INSERT INTO companies (id, nom) VALUES (?, ?)", (company_id, f"Fournisseur {i:03d}"))
+            conn.execute("INSERT INTO fournisseurs (id, company_id, code_fournisseur, evaluation_qualite) VALUES (?, ?, ?, ?)",
+                         (i, company_id, f"F-{i:03d}", rng.randint(3, 10)))
+            for _ in range(rng.randint(0, commandes_par_fournisseur)):
+                formulaire_id += 1
+                type_formulaire = rng.choice(list(PREFIXES))
+                date_commande = maintenant - timedelta(days=rng.randint(0, 700))
+                conn.execute("INSERT INTO formulaires (id, type_formulaire, numero_document, company_id, montant_total, date_creation) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (formulaire_id, type_formulaire, f"{PREFIXES[type_formulaire]}-{formulaire_id:05d}", company_id,
+                              round(rng.uniform(100, 20000), 2), date_commande.strftime('%Y-%m-%d %H:%M:%S')))
+                if rng.random() < 0.7:
+                    prevue = date_commande + timedelta(days=rng.randint(3, 20))
+                    reelle = prevue + timedelta(days=rng.randint(-3, 8)) if rng.random() < 0.9 else None
+                    conn.execute("INSERT INTO approvisionnements (formulaire_id, date_commande, date_livraison_prevue, date_livraison_reelle) "
+                                 "VALUES (?, ?, ?, ?)",
+                                 (formulaire_id, date_commande.strftime('%Y-%m-%d'), prevue.strftime('%Y-%m-%d'),
+                                  reelle.strftime('%Y-%m-%d') if reelle else None))
+        conn.commit()
+    return db
+
+
+def ancienne_performance(db, fournisseur_id, days):
+    """Ancien get_fournisseur_performance : deux requêtes pour un fournisseur"""
+    performance = dict(db.execute_query('''
+        SELECT COUNT(*) as total_commandes, SUM(f.montant_total) as montant_total, AVG(f.montant_total) as montant_moyen,
+               MIN(f.date_creation) as premiere_commande, MAX(f.date_creation) as derniere_commande
+        FROM formulaires f JOIN companies c ON f.company_id = c.id JOIN fournisseurs fou ON c.id = fou.company_id
+        WHERE fou.id = ? AND f.type_formulaire IN ('BON_ACHAT', 'BON_COMMANDE')
+        AND f.date_creation >= DATE('now', '-{} days')
+    '''.format(days), (fournisseur_id,))[0])
+    livraisons = dict(db.execute_query('''
+        SELECT COUNT(*) as total_livraisons,
+               COUNT(CASE WHEN a.date_livraison_reelle <= a.date_livraison_prevue THEN 1 END) as livraisons_temps,
+               AVG(JULIANDAY(a.date_livraison_reelle) - JULIANDAY(a.date_livraison_prevue)) as retard_moyen_jours
+        FROM approvisionnements a JOIN formulaires f ON a.formulaire_id = f.id
+        JOIN companies c ON f.company_id = c.id JOIN fournisseurs fou ON c.id = fou.company_id
+        WHERE fou.id = ? AND a.date_livraison_reelle IS NOT NULL AND a.date_commande >= DATE('now', '-{} days')
+    '''.format(days), (fournisseur_id,))[0])
+    performance.update(livraisons)
+    if livraisons['total_livraisons'] > 0:
+        performance['taux_ponctualite'] = livraisons['livraisons_temps'] / livraisons['total_livraisons'] * 100
+    return performance
+
+
+def test_scorecards_identiques_a_l_ancien_calcul():
+    """Même résultat que l'ancien calcul pour chaque fournisseur, en une requête"""
+    db = creer_jeu_fournisseurs()
+    engine = SupplierScorecardEngine(db)
+    for days in (90, 365):
+        appels = []
+        execute_query = db.execute_query
+        db.execute_query = lambda *args, **kwargs: appels.append(1) or execute_query(*args, **kwargs)
+        scorecards = engine.compute_scorecards(days)
+        db.execute_query = execute_query
+        assert len(appels) == 1 and len(scorecards) == 20
+
+        for card in scorecards:
+            ancien = ancienne_performance(db, card['fournisseur_id'], days)
+            assert card['total_commandes'] == ancien['total_commandes']
+            assert abs(card['montant_total'] - (ancien['montant_total'] or 0)) < 1e-6
+            assert card['derniere_commande'] == ancien['derniere_commande']
+            assert card['total_livraisons'] == ancien['total_livraisons']
+            assert card['livraisons_temps'] == ancien['livraisons_temps']
+            assert card['retard_moyen_jours'] == ancien['retard_moyen_jours']
+            assert card['taux_ponctualite'] == ancien.get('taux_ponctualite')
+    print("✅ Scorecards identiques à l'ancien calcul")
+
+
+def test_classement_et_score():
+    """Rangs consécutifs par score décroissant ; score borné et sans livraison = note qualité"""
+    db = creer_jeu_fournisseurs()
+    scorecards = SupplierScorecardEngine(db).compute_scorecards(365)
+    assert [c['rang'] for c in scorecards] == list(range(1, 21))
+    assert all(a['score_global'] >= b['score_global'] for a, b in zip(scorecards, scorecards[1:]))
+    assert compute_score_global(None, 8, None) == 80.0
+    assert compute_score_global(100, 10, -2) == 100.0
+    assert compute_score_global(0, 0, 50) == 0.0
+    print("✅ Classement et score global")
+
+
+def test_snapshot():
+    """Créé au premier accès, relu ensuite, recalculé si périmé ou forcé"""
+    db = creer_jeu_fournisseurs(nb_fournisseurs=5)
+    engine = SupplierScorecardEngine(db)
+    assert engine.get_snapshot_age(365) is None
+
+    premier = engine.get_scorecards(365)
+    assert len(premier) == 5 and engine.get_snapshot_age(365) < timedelta(minutes=1)
+
+    calculs = []
+    compute = engine.compute_scorecards
+    engine.compute_scorecards = lambda *args, **kwargs: calculs.append(1) or compute(*args, **kwargs)
+    relu = engine.get_scorecards(365)
+    assert not calculs
+    assert [c['fournisseur_id'] for c in relu] == [c['fournisseur_id'] for c in premier]
+    assert relu[0]['score_global'] == premier[0]['score_global']
+
+    db.execute_update("UPDATE fournisseur_scorecards SET calcule_le = '2000-01-01 00:00:00'")
+    engine.get_scorecards(365)
+    engine.get_scorecards(365, force_refresh=True)
+    engine.invalidate_snapshot(365)
+    engine.get_scorecards(365)
+    assert len(calculs) == 3
+    print("✅ Snapshot des scorecards")
+
+
+def benchmark_classement(nb_fournisseurs=300):
+    """Ancien classement (2 requêtes par fournisseur) vs requête groupée vs snapshot"""
+    db = creer_jeu_fournisseurs(nb_fournisseurs=nb_fournisseurs, commandes_par_fournisseur=40)
+    engine = SupplierScorecardEngine(db)
+    engine.refresh_snapshot(365)
+    ids = [row['id'] for row in db.execute_query("SELECT id FROM fournisseurs")]
+    print(f"📊 Benchmark: {len(ids)} fournisseurs")
+    for libelle, fonction in (("Ancien (2 requêtes/fournisseur)", lambda: [ancienne_performance(db, i, 365) for i in ids]),
+                              ("Requête groupée", lambda: engine.compute_scorecards(365)),
+                              ("Snapshot", lambda: engine.get_scorecards(365))):
+        t0 = time.perf_counter()
+        fonction()
+        print(f"  {libelle:<34} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    test_scorecards_identiques_a_l_ancien_calcul()
+    test_classement_et_score()
+    test_snapshot()
+    benchmark_classement()
@@ -8,6 +8,9 @@ import logging
 import json
 import io
 
+from job_queue import get_job_queue, show_job_status, show_jobs_overview
+from monthly_reports import invalidate_monthly_reports
+
 logger = logging.getLogger(__name__)
 
 class TimeTrackerUnified:
@@ -229,6 +232,8 @@ class TimeTrackerUnified:
                 notes or active_punch.get('notes', ''),
                 entry_id
             ))
+            # Pointage ouvert le mois dernier : le rapport de ce mois clos change
+            invalidate_monthly_reports(self.db, active_punch['punch_in'][:7])
             
             # Si c'était une opération, mettre à jour le statut si nécessaire
             if active_punch.get('operation_id'):
@@ -1425,6 +1430,7 @@ class TimeTrackerUnified:
             result['success'] = True
             
             if orphan_count > 0:
+                invalidate_monthly_reports(self.db)
                 result['message'] = f"✅ {orphan_count} entrées orphelines supprimées"
                 logger.warning(f"SUPPRESSION ORPHELINS: {orphan_count} entrées supprimées - {orphan_details}")
             else:
@@ -1696,6 +1702,8 @@ class TimeTrackerUnified:
                 except Exception as e:
                     corrections['erreurs'].append(f"Erreur ID {orphelin['id']}: {e}")
             
+            if corrections['corrections_effectuees']:
+                invalidate_monthly_reports(self.db)
             return corrections
             
         except Exception as e:
@@ -2738,24 +2746,31 @@ def show_admin_interface(tt):
         st.markdown("#### 🗑️ Nettoyer les Données Orphelines")
         st.info("💡 Supprime les pointages liés à des employés, projets, opérations ou BT supprimés")
         
-        # Diagnostic préalable
+        queue = get_job_queue(tt.db)
+        
+        # Diagnostic préalable (tâche d'arrière-plan)
         if st.button("🔍 Analyser les Orphelins", key="analyze_orphans"):
-            diagnostic = tt.diagnostic_timetracker_data()
-            
-            if diagnostic.get('problemes_detectes'):
-                st.markdown("**🚨 Problèmes détectés:**")
-                for probleme in diagnostic['problemes_detectes']:
-                    st.warning(probleme)
-            else:
-                st.success("✅ Aucun problème détecté dans les données")
+            st.session_state.tt_orphans_diagnostic_job = queue.enqueue('timetracker_diagnostic')
+        if st.session_state.get('tt_orphans_diagnostic_job'):
+            def afficher_problemes(diagnostic):
+                if diagnostic.get('problemes_detectes'):
+                    st.markdown("**🚨 Problèmes détectés:**")
+                    for probleme in diagnostic['problemes_detectes']:
+                        st.warning(probleme)
+                else:
+                    st.success("✅ Aucun problème détecté dans les données")
+            show_job_status(tt.db, st.session_state.tt_orphans_diagnostic_job, afficher_problemes, key="tt_orphans_diag")
         
         create_backup_orphans = st.checkbox("📦 Créer une sauvegarde avant suppression", value=True, key="backup_orphans")
         
         if st.button("🗑️ Nettoyer les Orphelins", key="delete_orphans_btn"):
-            with st.spinner("Nettoyage en cours..."):
-                result = tt.clear_orphaned_entries(create_backup_orphans)
-            
-            if result['success']:
+            st.session_state.tt_orphans_cleanup_job = queue.enqueue(
+                'timetracker_orphans_cleanup', {'create_backup': create_backup_orphans})
+        if st.session_state.get('tt_orphans_cleanup_job'):
+            def afficher_nettoyage(result):
+                if not result['success']:
+                    st.error(result['message'])
+                    return
                 st.success(result['message'])
                 
                 if result.get('orphan_details'):
@@ -2770,10 +2785,7 @@ def show_admin_interface(tt):
                         file_name=result['backup_filename'],
                         mime="application/json"
                     )
-                
-                st.rerun()
-            else:
-                st.error(result['message'])
+            show_job_status(tt.db, st.session_state.tt_orphans_cleanup_job, afficher_nettoyage, key="tt_orphans_cleanup")
     
     st.markdown("---")
     
@@ -2784,22 +2796,24 @@ def show_admin_interface(tt):
     
     with col_diag1:
         if st.button("🩺 Diagnostic Complet", key="full_diagnostic"):
-            diagnostic = tt.diagnostic_timetracker_data()
-            
-            st.markdown("**📊 Résultats du Diagnostic:**")
-            
-            # Afficher les statistiques principales
-            if diagnostic.get('time_entries'):
-                te_stats = diagnostic['time_entries']
-                st.json(te_stats)
-            
-            # Afficher les problèmes
-            if diagnostic.get('problemes_detectes'):
-                st.markdown("**🚨 Problèmes détectés:**")
-                for probleme in diagnostic['problemes_detectes']:
-                    st.error(probleme)
-            else:
-                st.success("✅ Système en bon état")
+            st.session_state.tt_full_diagnostic_job = get_job_queue(tt.db).enqueue('timetracker_diagnostic')
+        if st.session_state.get('tt_full_diagnostic_job'):
+            def afficher_diagnostic(diagnostic):
+                st.markdown("**📊 Résultats du Diagnostic:**")
+                
+                # Afficher les statistiques principales
+                if diagnostic.get('time_entries'):
+                    te_stats = diagnostic['time_entries']
+                    st.json(te_stats)
+                
+                # Afficher les problèmes
+                if diagnostic.get('problemes_detectes'):
+                    st.markdown("**🚨 Problèmes détectés:**")
+                    for probleme in diagnostic['problemes_detectes']:
+                        st.error(probleme)
+                else:
+                    st.success("✅ Système en bon état")
+            show_job_status(tt.db, st.session_state.tt_full_diagnostic_job, afficher_diagnostic, key="tt_full_diag")
     
     with col_diag2:
         if st.button("🔧 Corriger les Orphelins BT", key="fix_orphans"):
@@ -2814,6 +2828,19 @@ def show_admin_interface(tt):
                     st.warning("⚠️ Erreurs lors de certaines corrections:")
                     for erreur in result['erreurs']:
                         st.write(f"- {erreur}")
+    
+    # Maintenance BT ↔ TimeTracker et inventaire : tâches d'arrière-plan
+    st.markdown("##### 🧰 Tâches de Maintenance")
+    col_maint1, col_maint2, col_maint3 = st.columns(3)
+    queue = get_job_queue(tt.db)
+    for colonne, kind, libelle in ((col_maint1, 'bt_timetracker_sync', "🔄 Synchroniser BT ↔ TimeTracker"),
+                                   (col_maint2, 'bt_sessions_cleanup', "🧹 Nettoyer les sessions BT vides"),
+                                   (col_maint3, 'inventory_status_refresh', "📦 Recalculer les statuts d'inventaire")):
+        with colonne:
+            if st.button(libelle, key=f"maintenance_{kind}"):
+                queue.enqueue(kind)
+                st.toast(f"Tâche ajoutée : {libelle}")
+    show_jobs_overview(tt.db)
 
 # =========================================================================
 # INTERFACE PRINCIPALE MODIFIÉE - MODE EMPLOYÉ DIRECT